@@ -10,6 +10,7 @@
   - Семафор (макс 4 параллельных запроса) чтобы не пробить rate limit
   - Retry с exponential backoff при 429 Too Many Requests
   - Retry с пересозданием клиента при ReadTimeout/ConnectTimeout (до 5 попыток)
+  - MeteredTransport: латентность / байты / ошибки / повторы → /metrics
 """
 
 import asyncio
@@ -20,6 +21,7 @@ from typing import Any
 import httpx
 
 from config import FINTABLO_BASE_URL, FINTABLO_TOKEN
+from utils.metrics import MeteredTransport, record_retry
 
 logger = logging.getLogger(__name__)
 
@@ -49,7 +51,9 @@ async def _get_client() -> httpx.AsyncClient:
                 "Accept": "application/json",
             },
             timeout=_TIMEOUT,
-            limits=_LIMITS,
+            transport=MeteredTransport(
+                "fintablo_api", httpx.AsyncHTTPTransport(limits=_LIMITS)
+            ),
         )
     return _client
 
@@ -111,6 +115,7 @@ async def _fetch_list(endpoint: str, label: str, **params) -> list[dict[str, Any
                     )
                     await close_client()
                     client = await _get_client()
+                    record_retry("fintablo_api", f"/v1/{endpoint}")
                     await asyncio.sleep(delay)
                 else:
                     logger.error(
@@ -131,6 +136,7 @@ async def _fetch_list(endpoint: str, label: str, **params) -> list[dict[str, Any
                         _MAX_RETRIES,
                         delay,
                     )
+                    record_retry("fintablo_api", f"/v1/{endpoint}")
                     await asyncio.sleep(delay)
                 else:
                     raise
@@ -280,6 +286,7 @@ async def _put(endpoint: str, label: str, body: dict[str, Any]) -> dict[str, Any
                     )
                     await close_client()
                     client = await _get_client()
+                    record_retry("fintablo_api", f"/v1/{endpoint}")
                     await asyncio.sleep(delay)
                 else:
                     logger.error(
@@ -299,6 +306,7 @@ async def _put(endpoint: str, label: str, body: dict[str, Any]) -> dict[str, Any
                         _MAX_RETRIES,
                         delay,
                     )
+                    record_retry("fintablo_api", f"/v1/{endpoint}")
                     await asyncio.sleep(delay)
                 else:
                     logger.error(
@@ -359,6 +367,7 @@ async def _post(endpoint: str, label: str, body: dict[str, Any]) -> dict[str, An
                     )
                     await close_client()
                     client = await _get_client()
+                    record_retry("fintablo_api", f"/v1/{endpoint}")
                     await asyncio.sleep(delay)
                 else:
                     logger.error(
@@ -378,6 +387,7 @@ async def _post(endpoint: str, label: str, body: dict[str, Any]) -> dict[str, An
                         _MAX_RETRIES,
                         delay,
                     )
+                    record_retry("fintablo_api", f"/v1/{endpoint}")
                     await asyncio.sleep(delay)
                 else:
                     raise
@@ -429,6 +439,7 @@ async def _delete(endpoint: str, label: str) -> dict[str, Any]:
                     )
                     await close_client()
                     client = await _get_client()
+                    record_retry("fintablo_api", f"/v1/{endpoint}")
                     await asyncio.sleep(delay)
                 else:
                     logger.error(
@@ -448,6 +459,7 @@ async def _delete(endpoint: str, label: str) -> dict[str, Any]:
                         _MAX_RETRIES,
                         delay,
                     )
+                    record_retry("fintablo_api", f"/v1/{endpoint}")
                     await asyncio.sleep(delay)
                 else:
                     raise
@@ -19,20 +19,30 @@ import json
 import logging
 import random as _random
 import re
+import threading
 import time
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable
 
 import gspread
+import requests
 from google.oauth2.service_account import Credentials
 
 from config import (
+    GOOGLE_SHEETS_API_URL,
     GOOGLE_SHEETS_CREDENTIALS,
     MIN_STOCK_SHEET_ID,
     INVOICE_PRICE_SHEET_ID,
     DAY_REPORT_SHEET_ID,
     SALARY_SHEET_ID,
 )
+from adapters import sheet_diff
+from utils.metrics import (
+    observe_external,
+    record_external_error,
+    record_retry,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -51,17 +61,28 @@ SCOPES = [
 
 _client: gspread.Client | None = None
 
+_GOOGLE_API_PREFIXES = ("https://sheets.googleapis.com", "https://www.googleapis.com")
 
-def _get_client() -> gspread.Client:
-    """Получить (lazy) авторизованный gspread клиент."""
-    global _client
-    if _client is not None:
-        return _client
 
+class _BaseUrlSession(requests.Session):
+    """Сессия без OAuth: запросы gspread к Google → на GOOGLE_SHEETS_API_URL."""
+
+    def __init__(self, base_url: str):
+        super().__init__()
+        self.base_url = base_url.rstrip("/")
+
+    def request(self, method, url, *args, **kwargs):
+        for prefix in _GOOGLE_API_PREFIXES:
+            if url.startswith(prefix):
+                url = self.base_url + url[len(prefix) :]
+                break
+        return super().request(method, url, *args, **kwargs)
+
+
+def _load_credentials() -> Credentials:
+    """Service Account из GOOGLE_SHEETS_CREDENTIALS (inline JSON или путь к файлу)."""
     if not GOOGLE_SHEETS_CREDENTIALS:
         raise RuntimeError("GOOGLE_SHEETS_CREDENTIALS не задан в .env")
-    if not MIN_STOCK_SHEET_ID:
-        raise RuntimeError("MIN_STOCK_SHEET_ID не задан в .env")
 
     raw = GOOGLE_SHEETS_CREDENTIALS.strip()
 
@@ -86,8 +107,23 @@ def _get_client() -> gspread.Client:
                 f"Задайте GOOGLE_SHEETS_CREDENTIALS как путь к файлу или inline JSON."
             )
 
-    creds = Credentials.from_service_account_info(creds_info, scopes=SCOPES)
-    _client = gspread.authorize(creds)
+    return Credentials.from_service_account_info(creds_info, scopes=SCOPES)
+
+
+def _get_client() -> gspread.Client:
+    """Получить (lazy) авторизованный gspread клиент."""
+    global _client
+    if _client is not None:
+        return _client
+
+    if not MIN_STOCK_SHEET_ID:
+        raise RuntimeError("MIN_STOCK_SHEET_ID не задан в .env")
+
+    if GOOGLE_SHEETS_API_URL:
+        # Локальный стенд (tests/fakes): тот же gspread, другой хост, без OAuth
+        _client = gspread.Client(None, session=_BaseUrlSession(GOOGLE_SHEETS_API_URL))
+    else:
+        _client = gspread.authorize(_load_credentials())
 
     # ── Monkey-patch: retry on transient errors (429 / 500 / 502 / 503 / 504) ──
     _original_request = _client.http_client.request
@@ -95,12 +131,25 @@ def _get_client() -> gspread.Client:
 
     def _request_with_retry(*args, **kwargs):
         _MAX_RETRIES = 3
+        endpoint = kwargs.get("endpoint") or (args[1] if len(args) > 1 else "")
+        method = kwargs.get("method") or (args[0] if args else "get")
+        if method.lower() != "get" and _snapshots:
+            _invalidate_snapshot(endpoint)
         for attempt in range(_MAX_RETRIES + 1):
+            t0 = time.perf_counter()
             try:
-                return _original_request(*args, **kwargs)
+                resp = _original_request(*args, **kwargs)
+                observe_external(
+                    "sheets", endpoint, time.perf_counter() - t0, len(resp.content)
+                )
+                return resp
             except gspread.exceptions.APIError as exc:
                 status = getattr(getattr(exc, "response", None), "status_code", 0)
+                observe_external(
+                    "sheets", endpoint, time.perf_counter() - t0, status=status
+                )
                 if status in _RETRYABLE_STATUSES and attempt < _MAX_RETRIES:
+                    record_retry("sheets", endpoint)
                     if status == 429:
                         delay = 30 * (2**attempt) + _random.uniform(1, 5)
                     else:
@@ -117,6 +166,9 @@ def _get_client() -> gspread.Client:
                     time.sleep(delay)
                 else:
                     raise
+            except Exception as exc:
+                record_external_error("sheets", endpoint, exc)
+                raise
 
     _client.http_client.request = _request_with_retry
     logger.info("[%s] Клиент инициализирован (с retry 429/5xx)", LABEL)
@@ -135,6 +187,145 @@ def _get_worksheet() -> gspread.Worksheet:
     return ws
 
 
+# ═══════════════════════════════════════════════════════
+# Снимок таблицы: все читаемые вкладки одним values:batchGet
+# ═══════════════════════════════════════════════════════
+
+# Снимок отдаётся без запросов _SNAPSHOT_TTL сек; дальше — сверка modifiedTime
+# из Drive (лёгкий GET): не менялась → тот же снимок. _SNAPSHOT_MAX_AGE —
+# страховка от задержки modifiedTime у Drive.
+_SNAPSHOT_TTL = 30.0
+_SNAPSHOT_MAX_AGE = 600.0
+
+
+@dataclass(slots=True)
+class _Snapshot:
+    """Значения вкладок одной таблицы (строки выровнены, как у get_all_values)."""
+
+    tabs: dict[str, list[list[str]]]
+    modified: str
+    fetched_at: float = field(default_factory=time.monotonic)
+    checked_at: float = field(default_factory=time.monotonic)
+
+
+_snapshots: dict[str, _Snapshot] = {}
+_snapshot_locks: dict[str, threading.Lock] = {}
+_snapshot_stats = {"hits": 0, "revalidated": 0, "loads": 0}
+
+
+def _snapshot_tabs(spreadsheet_id: str) -> list[str]:
+    """Вкладки, которые читают read_*-функции (одна таблица может быть обеими)."""
+    tabs: list[str] = []
+    if spreadsheet_id == MIN_STOCK_SHEET_ID:
+        tabs += [PERMS_TAB, SETTINGS_TAB, _MAPPING_BASE_TAB]
+    if spreadsheet_id == SALARY_SHEET_ID:
+        tabs += [_SALARY_TAB, _FINTAB_MAPPING_TAB]
+    return tabs
+
+
+def _load_snapshot(client: gspread.Client, spreadsheet_id: str) -> _Snapshot:
+    tabs = _snapshot_tabs(spreadsheet_id)
+    ranges = [gspread.utils.absolute_range_name(t) for t in tabs]
+    try:
+        resp = client.http_client.values_batch_get(spreadsheet_id, ranges)
+    except gspread.exceptions.APIError as exc:
+        if getattr(getattr(exc, "response", None), "status_code", 0) != 400:
+            raise
+        # Какой-то вкладки нет (batchGet падает целиком) — берём существующие
+        meta = client.http_client.fetch_sheet_metadata(
+            spreadsheet_id, params={"fields": "sheets.properties.title"}
+        )
+        existing = {s["properties"]["title"] for s in meta.get("sheets", [])}
+        tabs = [t for t in tabs if t in existing]
+        ranges = [gspread.utils.absolute_range_name(t) for t in tabs]
+        resp = (
+            client.http_client.values_batch_get(spreadsheet_id, ranges) if tabs else {}
+        )
+    values = {
+        tab: gspread.utils.fill_gaps(vr.get("values", []))
+        for tab, vr in zip(tabs, resp.get("valueRanges", []))
+    }
+    return _Snapshot(tabs=values, modified="")
+
+
+def _snapshot_tab(spreadsheet_id: str, tab: str) -> list[list[str]] | None:
+    """
+    Значения вкладки из снимка таблицы (синхронно — вызывать из to_thread).
+
+    Первый вызов грузит ВСЕ вкладки _snapshot_tabs() одним batchGet — соседние
+    read_* в том же update_opiu / update_fot_sheet уже не ходят в API.
+    Наши записи в таблицу сбрасывают снимок (_request_with_retry).
+    None — вкладки нет. Возвращаемые строки общие — не изменять.
+    """
+    lock = _snapshot_locks.setdefault(spreadsheet_id, threading.Lock())
+    with lock:
+        snap = _snapshots.get(spreadsheet_id)
+        now = time.monotonic()
+        if snap is not None and now - snap.checked_at < _SNAPSHOT_TTL:
+            _snapshot_stats["hits"] += 1
+            return snap.tabs.get(tab)
+
+        client = _get_client()
+        modified = ""
+        try:
+            modified = client.get_file_drive_metadata(spreadsheet_id).get(
+                "modifiedTime", ""
+            )
+        except Exception:
+            logger.debug("[%s] modifiedTime недоступен", LABEL, exc_info=True)
+        if (
+            snap is not None
+            and modified
+            and modified == snap.modified
+            and now - snap.fetched_at < _SNAPSHOT_MAX_AGE
+        ):
+            snap.checked_at = now
+            _snapshot_stats["revalidated"] += 1
+            return snap.tabs.get(tab)
+
+        snap = _load_snapshot(client, spreadsheet_id)
+        snap.modified = modified
+        _snapshots[spreadsheet_id] = snap
+        _snapshot_stats["loads"] += 1
+        logger.info(
+            "[%s] Снимок таблицы: %d вкладок одним batchGet", LABEL, len(snap.tabs)
+        )
+        return snap.tabs.get(tab)
+
+
+def _invalidate_snapshot(endpoint: str) -> None:
+    """Запись в таблицу → её снимок устарел."""
+    for spreadsheet_id in list(_snapshots):
+        if spreadsheet_id in endpoint:
+            _snapshots.pop(spreadsheet_id, None)
+
+
+def _snapshot_tab_or_create(
+    spreadsheet_id: str, tab: str, get_worksheet: Callable[[], gspread.Worksheet]
+) -> list[list[str]]:
+    """
+    _snapshot_tab, но вкладки нет → get_worksheet() создаёт её, как раньше.
+
+    Создание — запись в таблицу: снимок сбрасывается сам (_request_with_retry).
+    """
+    rows = _snapshot_tab(spreadsheet_id, tab)
+    if rows is None:
+        rows = get_worksheet().get_all_values()
+    return rows
+
+
+def refresh_snapshot(tab: str) -> None:
+    """
+    Явное обновление (кнопка, сброс кеша прав/маппинга): следующий read_*
+    по вкладке tab перечитает таблицу, не дожидаясь _SNAPSHOT_TTL —
+    правки руками в GSheet видны сразу, даже если Drive ещё не обновил
+    modifiedTime.
+    """
+    for spreadsheet_id in list(_snapshots):
+        if tab in _snapshot_tabs(spreadsheet_id):
+            _snapshots.pop(spreadsheet_id, None)
+
+
 # ═══════════════════════════════════════════════════════
 # Синхронизация номенклатуры → таблицу
 # ═══════════════════════════════════════════════════════
@@ -232,174 +423,138 @@ async def sync_products_to_sheet(
                     row.extend(["", ""])
             data_rows.append(row)
 
-        # ── 4. Очищаем лист и записываем ──
+        # ── 4. Дифф-запись: только изменившиеся ячейки + вставка/удаление строк ──
         all_rows = [meta, dept_row, sub_headers] + data_rows
-        needed_rows = len(all_rows) + 10
-        needed_cols = max(num_cols, 2)
-
-        if ws.row_count < needed_rows or ws.col_count < needed_cols:
-            ws.resize(
-                rows=max(needed_rows, ws.row_count),
-                cols=max(needed_cols, ws.col_count),
-            )
-
-        # gspread 6.x может вернуть пустой body → JSONDecodeError
-        try:
-            ws.clear()
-        except json.JSONDecodeError:
-            logger.debug("[%s] clear() вернул пустой body (ОК)", LABEL)
-
-        if all_rows:
-            end_cell = gspread.utils.rowcol_to_a1(len(all_rows), num_cols)
-            try:
-                ws.update(
-                    f"A1:{end_cell}",
-                    all_rows,
-                    value_input_option="RAW",
-                )
-            except json.JSONDecodeError:
-                logger.debug("[%s] update() вернул пустой body (ОК)", LABEL)
-
-        # Форматирование
-        try:
-            # Мета-строка — мелкий серый шрифт
-            ws.format(
-                "A1:ZZ1",
-                {
-                    "textFormat": {
-                        "fontSize": 8,
-                        "foregroundColor": {"red": 0.6, "green": 0.6, "blue": 0.6},
-                    },
-                },
-            )
-            # Dept names — жирные, по центру
-            ws.format(
-                "A2:ZZ2",
-                {
-                    "textFormat": {"bold": True},
-                    "horizontalAlignment": "CENTER",
-                },
-            )
-            # Sub-headers МИН/МАКС — жирные, по центру
-            ws.format(
-                "A3:ZZ3",
-                {
-                    "textFormat": {"bold": True},
-                    "horizontalAlignment": "CENTER",
-                },
-            )
-            ws.freeze(rows=3)
+        sheet_id = ws.id
 
-            # Объединяем ячейки dept name попарно (C2:D2, E2:F2, ...)
-            for di in range(len(departments)):
-                start_col = 2 + di * 2  # 0-based → C=3(1-based), E=5 ...
-                range_str = (
+        _META_FMT = {
+            "textFormat": {
+                "fontSize": 8,
+                "foregroundColor": {"red": 0.6, "green": 0.6, "blue": 0.6},
+            },
+        }
+        _HEADER_FMT = {
+            "textFormat": {"bold": True},
+            "horizontalAlignment": "CENTER",
+        }
+        fmt_requests: list[dict] = [
+            # Мета-строка — мелкий серый шрифт; dept names и МИН/МАКС — жирные
+            sheet_diff.repeat_cell(sheet_id, "A1:ZZ1", _META_FMT),
+            sheet_diff.repeat_cell(sheet_id, "A2:ZZ2", _HEADER_FMT),
+            sheet_diff.repeat_cell(sheet_id, "A3:ZZ3", _HEADER_FMT),
+            sheet_diff.freeze(sheet_id, rows=3),
+            # Старые объединения (подразделения могли смениться) → заново попарно
+            {
+                "unmergeCells": {
+                    "range": gspread.utils.a1_range_to_grid_range("A2:ZZ2", sheet_id)
+                }
+            },
+        ]
+        for di in range(len(departments)):
+            start_col = 2 + di * 2  # 0-based → C=3(1-based), E=5 ...
+            fmt_requests.append(
+                sheet_diff.merge_cells(
+                    sheet_id,
                     gspread.utils.rowcol_to_a1(2, start_col + 1)
                     + ":"
-                    + gspread.utils.rowcol_to_a1(2, start_col + 2)
+                    + gspread.utils.rowcol_to_a1(2, start_col + 2),
                 )
-                ws.merge_cells(range_str, merge_type="MERGE_ALL")
-        except Exception:
-            logger.warning("[%s] Ошибка форматирования текста", LABEL, exc_info=True)
-
-        # batch_update: скрыть строку 1 / колонку B + жирные границы
-        try:
-            spreadsheet = ws.spreadsheet
-            total_rows = len(all_rows)
+            )
+        fmt_requests += [
+            # Скрыть колонку B (index 1)
+            {
+                "updateDimensionProperties": {
+                    "range": {
+                        "sheetId": sheet_id,
+                        "dimension": "COLUMNS",
+                        "startIndex": 1,
+                        "endIndex": 2,
+                    },
+                    "properties": {"hiddenByUser": True},
+                    "fields": "hiddenByUser",
+                }
+            },
+            # Скрыть строку 1 (index 0)
+            {
+                "updateDimensionProperties": {
+                    "range": {
+                        "sheetId": sheet_id,
+                        "dimension": "ROWS",
+                        "startIndex": 0,
+                        "endIndex": 1,
+                    },
+                    "properties": {"hiddenByUser": True},
+                    "fields": "hiddenByUser",
+                }
+            },
+        ]
 
-            requests: list[dict] = [
-                # Скрыть колонку B (index 1)
+        # Жирные вертикальные границы между парами МИН/МАКС
+        _THICK = {
+            "style": "SOLID_MEDIUM",
+            "colorStyle": {"rgbColor": {"red": 0, "green": 0, "blue": 0}},
+        }
+        for di in range(len(departments)):
+            col_start = 2 + di * 2  # 0-based column index (C=2, E=4, ...)
+            fmt_requests.append(
                 {
-                    "updateDimensionProperties": {
+                    "updateBorders": {
                         "range": {
-                            "sheetId": ws.id,
-                            "dimension": "COLUMNS",
-                            "startIndex": 1,
-                            "endIndex": 2,
+                            "sheetId": sheet_id,
+                            # row 2 (skip meta) → до конца листа: раскладка не
+                            # зависит от числа товаров, формат не переотправляется
+                            "startRowIndex": 1,
+                            "startColumnIndex": col_start,
+                            "endColumnIndex": col_start + 2,
                         },
-                        "properties": {"hiddenByUser": True},
-                        "fields": "hiddenByUser",
-                    }
-                },
-                # Скрыть строку 1 (index 0)
-                {
-                    "updateDimensionProperties": {
-                        "range": {
-                            "sheetId": ws.id,
-                            "dimension": "ROWS",
-                            "startIndex": 0,
-                            "endIndex": 1,
-                        },
-                        "properties": {"hiddenByUser": True},
-                        "fields": "hiddenByUser",
-                    }
-                },
-            ]
-
-            # Жирные вертикальные границы между парами МИН/МАКС
-            _THICK = {
-                "style": "SOLID_MEDIUM",
-                "colorStyle": {"rgbColor": {"red": 0, "green": 0, "blue": 0}},
-            }
-            for di in range(len(departments)):
-                col_start = 2 + di * 2  # 0-based column index (C=2, E=4, ...)
-                requests.append(
-                    {
-                        "updateBorders": {
-                            "range": {
-                                "sheetId": ws.id,
-                                "startRowIndex": 1,  # row 2 (skip meta)
-                                "endRowIndex": total_rows,
-                                "startColumnIndex": col_start,
-                                "endColumnIndex": col_start + 2,
-                            },
-                            "left": _THICK,
-                            "right": _THICK,
-                        }
-                    }
-                )
-
-            # Авто-ширина только для колонки A (товар)
-            requests.append(
-                {
-                    "autoResizeDimensions": {
-                        "dimensions": {
-                            "sheetId": ws.id,
-                            "dimension": "COLUMNS",
-                            "startIndex": 0,
-                            "endIndex": 1,
-                        }
+                        "left": _THICK,
+                        "right": _THICK,
                     }
                 }
             )
 
-            # Фиксированная равная ширина для всех МИН/МАКС колонок (C, D, E, F, ...)
-            _COL_WIDTH = 60  # пикселей — компактно для чисел
-            requests.append(
-                {
-                    "updateDimensionProperties": {
-                        "range": {
-                            "sheetId": ws.id,
-                            "dimension": "COLUMNS",
-                            "startIndex": 2,
-                            "endIndex": num_cols,
-                        },
-                        "properties": {"pixelSize": _COL_WIDTH},
-                        "fields": "pixelSize",
+        # Авто-ширина только для колонки A (товар)
+        fmt_requests.append(
+            {
+                "autoResizeDimensions": {
+                    "dimensions": {
+                        "sheetId": sheet_id,
+                        "dimension": "COLUMNS",
+                        "startIndex": 0,
+                        "endIndex": 1,
                     }
                 }
-            )
+            }
+        )
 
-            spreadsheet.batch_update({"requests": requests})
-            logger.info(
-                "[%s] batch_update: скрыты строка 1 + колонка B, границы для %d подр.",
-                LABEL,
-                len(departments),
-            )
-        except Exception:
-            logger.warning(
-                "[%s] Ошибка batch_update (скрытие/границы)", LABEL, exc_info=True
-            )
+        # Фиксированная равная ширина для всех МИН/МАКС колонок (C, D, E, F, ...)
+        _COL_WIDTH = 60  # пикселей — компактно для чисел
+        fmt_requests.append(
+            {
+                "updateDimensionProperties": {
+                    "range": {
+                        "sheetId": sheet_id,
+                        "dimension": "COLUMNS",
+                        "startIndex": 2,
+                        "endIndex": num_cols,
+                    },
+                    "properties": {"pixelSize": _COL_WIDTH},
+                    "fields": "pixelSize",
+                }
+            }
+        )
+
+        sheet_diff.apply_grid(
+            ws,
+            existing_data,
+            all_rows,
+            name="min_stock",
+            key=lambda row: row[1] if len(row) > 1 else "",
+            header_rows=3,
+            format_requests=fmt_requests,
+        )
+        # Лист приведён к all_rows — индекс ячеек min/max строим из записанного
+        _set_minmax_index(all_rows, ws)
 
         return len(data_rows)
 
@@ -434,6 +589,7 @@ async def read_all_levels() -> list[dict[str, Any]]:
     def _sync_read() -> list[dict[str, Any]]:
         ws = _get_worksheet()
         all_values = ws.get_all_values()
+        _set_minmax_index(all_values, ws)  # лист уже прочитан — индекс бесплатно
 
         if len(all_values) < 4:
             return []
@@ -512,80 +668,191 @@ async def read_all_levels() -> list[dict[str, Any]]:
 
 
 # ═══════════════════════════════════════════════════════
-# Обновление min/max для одного товара × ресторана
+# Индекс ячеек min/max + пакетная запись
 # ═══════════════════════════════════════════════════════
 
+# Индекс живёт, пока его не обновит полная запись / чтение листа; TTL —
+# страховка от ручных правок структуры (вставили строку руками).
+_MINMAX_INDEX_TTL = 3600
+# Перечитать индекс из-за «нет в таблице» — не чаще раза в минуту
+_MINMAX_INDEX_MIN_AGE = 60
+
+
+@dataclass(slots=True)
+class MinMaxIndex:
+    """Координаты листа «Минимальные остатки» (1-based, как в gspread)."""
+
+    rows: dict[str, int]  # product_id → номер строки
+    cols: dict[str, int]  # department_id → колонка МИН (МАКС — следующая)
+    ws: gspread.Worksheet | None = None
+    built_at: float = field(default_factory=time.monotonic)
+
+    def cell(self, product_id: str, department_id: str) -> tuple[int, int] | None:
+        row = self.rows.get(product_id)
+        col = self.cols.get(department_id)
+        return (row, col) if row is not None and col is not None else None
+
+
+_minmax_index: MinMaxIndex | None = None
+
+
+def _build_minmax_index(
+    meta_row: list[str], product_ids: list[str], ws: gspread.Worksheet | None
+) -> MinMaxIndex:
+    """meta_row — строка 1 (UUID подразделений), product_ids[i] — колонка B строки i+1."""
+    cols = {}
+    for col in range(2, len(meta_row), 2):
+        dept_id = meta_row[col].strip()
+        if dept_id:
+            cols[dept_id] = col + 1
+    rows = {}
+    for i in range(3, len(product_ids)):  # данные с 4-й строки
+        product_id = product_ids[i].strip()
+        if product_id:
+            rows.setdefault(product_id, i + 1)
+    return MinMaxIndex(rows=rows, cols=cols, ws=ws)
+
+
+def _set_minmax_index(all_values: list[list[str]], ws: gspread.Worksheet) -> None:
+    """Индекс из уже прочитанного / записанного листа — без запросов к API."""
+    global _minmax_index
+    if not all_values:
+        _minmax_index = _build_minmax_index([], [], ws)
+        return
+    ids = [row[1] if len(row) > 1 else "" for row in all_values]
+    _minmax_index = _build_minmax_index(all_values[0], ids, ws)
 
-async def update_min_max(
-    product_id: str,
-    department_id: str,
-    min_level: float,
-    max_level: float = 0.0,
-) -> bool:
-    """
-    Обновить min и max для конкретного товара и ресторана в Google Таблице.
 
-    Находит строку по product_id (колонка B) и колонку по
-    department_id (строка 1 мета).
-    Возвращает True если ячейка найдена и обновлена.
-    """
-    t0 = time.monotonic()
+def _load_minmax_index() -> MinMaxIndex:
+    """Строка 1 + колонка B одним batchGet (вместо get_all_values)."""
+    global _minmax_index
+    ws = _get_worksheet()
+    meta, ids = ws.batch_get(["1:1", "B:B"])
+    _minmax_index = _build_minmax_index(
+        meta[0] if meta else [], [row[0] if row else "" for row in ids], ws
+    )
+    logger.info(
+        "[%s] Индекс min/max: %d товаров × %d подразделений",
+        LABEL,
+        len(_minmax_index.rows),
+        len(_minmax_index.cols),
+    )
+    return _minmax_index
 
-    def _sync_update() -> bool:
-        ws = _get_worksheet()
-        all_values = ws.get_all_values()
 
-        if len(all_values) < 4:
-            return False
+def _current_minmax_index() -> MinMaxIndex:
+    index = _minmax_index
+    if index is None or time.monotonic() - index.built_at > _MINMAX_INDEX_TTL:
+        index = _load_minmax_index()
+    return index
 
-        meta_row = all_values[0]
 
-        # Найти колонку для department (0-based → 1-based для gspread)
-        dept_min_col: int | None = None
-        col = 2
-        while col < len(meta_row):
-            if meta_row[col].strip() == department_id:
-                dept_min_col = col + 1  # 0-based → 1-based
-                break
-            col += 2
+async def has_min_max_cell(product_id: str, department_id: str) -> bool:
+    """
+    Есть ли в таблице строка товара и колонки подразделения.
+    Тёплый индекс — без запросов; промах перечитывает индекс (не чаще
+    раза в _MINMAX_INDEX_MIN_AGE — таблицу могли перевыгрузить руками).
+    """
 
-        if dept_min_col is None:
-            logger.warning(
-                "[%s] Department %s не найден в таблице", LABEL, department_id
-            )
+    def _sync_check() -> bool:
+        index = _current_minmax_index()
+        if index.cell(product_id, department_id) is not None:
+            return True
+        if time.monotonic() - index.built_at < _MINMAX_INDEX_MIN_AGE:
             return False
+        return _load_minmax_index().cell(product_id, department_id) is not None
 
-        # Найти строку для product (1-based row number, данные с row 4)
-        product_row: int | None = None
-        for i, row in enumerate(all_values[3:], start=4):
-            if len(row) >= 2 and row[1].strip() == product_id:
-                product_row = i
-                break
+    return await asyncio.to_thread(_sync_check)
 
-        if product_row is None:
-            logger.warning("[%s] Product %s не найден в таблице", LABEL, product_id)
-            return False
 
-        min_val = str(min_level) if min_level > 0 else ""
-        max_val = str(max_level) if max_level > 0 else ""
+def _level_str(value: float) -> str:
+    return str(value) if value > 0 else ""
 
-        ws.update_cell(product_row, dept_min_col, min_val)
-        ws.update_cell(product_row, dept_min_col + 1, max_val)
-        return True
 
-    result = await asyncio.to_thread(_sync_update)
-    elapsed = time.monotonic() - t0
+def _write_min_max_sync(
+    updates: dict[tuple[str, str], tuple[float, float]],
+) -> list[tuple[str, str]]:
+    index = _current_minmax_index()
+    ws = index.ws or _get_worksheet()
+
+    cells = {key: index.cell(*key) for key in updates}
+    rows = sorted({cell[0] for cell in cells.values() if cell is not None})
+    # Строки могли сдвинуть руками: сверяем product_id в колонке B
+    # (один лёгкий batchGet) и при расхождении перечитываем индекс.
+    stale = any(cell is None for cell in cells.values())
+    if rows and not stale:
+        found = ws.batch_get([f"B{row}" for row in rows])
+        by_row = {
+            row: (vr[0][0] if vr and vr[0] else "") for row, vr in zip(rows, found)
+        }
+        stale = any(
+            cell is not None and by_row.get(cell[0], "").strip() != key[0]
+            for key, cell in cells.items()
+        )
+    if stale:
+        index = _load_minmax_index()
+        ws = index.ws or ws
+        cells = {key: index.cell(*key) for key in updates}
+
+    data = []
+    missing = []
+    for key, (min_level, max_level) in updates.items():
+        cell = cells[key]
+        if cell is None:
+            missing.append(key)
+            continue
+        row, col = cell
+        a1 = gspread.utils.rowcol_to_a1(row, col) + ":"
+        a1 += gspread.utils.rowcol_to_a1(row, col + 1)
+        data.append(
+            {"range": a1, "values": [[_level_str(min_level), _level_str(max_level)]]}
+        )
+    if data:
+        ws.batch_update(data, value_input_option="RAW")
+    return missing
+
+
+async def write_min_max_batch(
+    updates: dict[tuple[str, str], tuple[float, float]],
+) -> list[tuple[str, str]]:
+    """
+    Записать min/max пачкой: {(product_id, department_id): (min, max)} →
+    один values:batchUpdate по диапазонам «МИН:МАКС» из индекса ячеек.
+
+    Возвращает ключи, которых нет в таблице (не записаны).
+    """
+    global _minmax_index
+    t0 = time.monotonic()
+    try:
+        missing = await asyncio.to_thread(_write_min_max_sync, updates)
+    except Exception:
+        _minmax_index = None  # следующая попытка — с новым листом и индексом
+        raise
     logger.info(
-        "[%s] update_min_max: product=%s, dept=%s, min=%s, max=%s — %.1f сек (ok=%s)",
+        "[%s] write_min_max_batch: %d ячеек, не найдено %d — %.1f сек",
         LABEL,
-        product_id,
-        department_id,
-        min_level,
-        max_level,
-        elapsed,
-        result,
+        len(updates) - len(missing),
+        len(missing),
+        time.monotonic() - t0,
     )
-    return result
+    return missing
+
+
+async def update_min_max(
+    product_id: str,
+    department_id: str,
+    min_level: float,
+    max_level: float = 0.0,
+) -> bool:
+    """
+    Обновить min и max для конкретного товара и ресторана в Google Таблице
+    (сразу, без очереди). True — ячейка найдена и обновлена.
+    Правки из бота идут через очередь edit_min_stock (write-behind).
+    """
+    missing = await write_min_max_batch(
+        {(product_id, department_id): (min_level, max_level)}
+    )
+    return not missing
 
 
 # ═══════════════════════════════════════════════════════
@@ -836,86 +1103,35 @@ async def sync_invoice_prices_to_sheet(
 
             data_rows.append(row)
 
-        # ── 7. Записываем ──
+        # ── 7. Форматирование (отправляется только при смене раскладки) ──
         all_rows = [meta, headers] + data_rows
-        needed_rows = len(all_rows) + 10
-        needed_cols = num_cols
-
-        if ws.row_count < needed_rows or ws.col_count < needed_cols:
-            ws.resize(
-                rows=max(needed_rows, ws.row_count),
-                cols=max(needed_cols, ws.col_count),
-            )
-
-        try:
-            ws.clear()
-        except json.JSONDecodeError:
-            logger.debug("[%s] clear() вернул пустой body (ОК)", LABEL)
+        sheet_id = ws.id
+        last_col_letter = chr(ord("A") + num_cols - 1)
+        fmt_requests: list[dict] = []
 
-        if all_rows:
-            end_cell = gspread.utils.rowcol_to_a1(len(all_rows), num_cols)
-            try:
-                ws.update(
-                    f"A1:{end_cell}",
-                    all_rows,
-                    value_input_option="RAW",
+        # Dropdown складов в колонке C (строки 3+)
+        if store_name_list and len(data_rows) > 0:
+            fmt_requests.append(
+                sheet_diff.one_of_list(
+                    sheet_id, f"C3:C{2 + len(data_rows)}", store_name_list
                 )
-            except json.JSONDecodeError:
-                logger.debug("[%s] update() вернул пустой body (ОК)", LABEL)
+            )
 
-        # ── 9. Dropdown складов в колонке C (строки 3+) ──
-        try:
-            from gspread.worksheet import ValidationConditionType
-
-            if store_name_list and len(data_rows) > 0:
-                store_range = f"C3:C{2 + len(data_rows)}"
-                ws.add_validation(
-                    store_range,
-                    ValidationConditionType.one_of_list,
-                    store_name_list,
-                    showCustomUi=True,
-                    strict=False,
-                )
-                logger.info(
-                    "[%s] Dropdown заведений: %d вариантов в %d строках",
-                    LABEL,
-                    len(store_name_list),
-                    len(data_rows),
+        # Dropdown поставщиков в заголовках (строка 2, столбцы E..N)
+        supplier_name_list = sorted(
+            [s["name"] for s in suppliers if s.get("name")],
+        )
+        if supplier_name_list:
+            last_supplier_letter = chr(ord("E") + num_supplier_cols - 1)
+            fmt_requests.append(
+                sheet_diff.one_of_list(
+                    sheet_id, f"E2:{last_supplier_letter}2", supplier_name_list
                 )
-        except Exception:
-            logger.warning("[%s] Ошибка dropdown заведений", LABEL, exc_info=True)
-
-        # ── 10. Dropdown поставщиков в заголовках (строка 2, столбцы E..N) ──
-        try:
-            from gspread.worksheet import ValidationConditionType
-
-            supplier_name_list = sorted(
-                [s["name"] for s in suppliers if s.get("name")],
             )
-            if supplier_name_list:
-                for ci in range(num_supplier_cols):
-                    col_letter = chr(ord("E") + ci)
-                    cell = f"{col_letter}2"
-                    ws.add_validation(
-                        cell,
-                        ValidationConditionType.one_of_list,
-                        supplier_name_list,
-                        showCustomUi=True,
-                        strict=False,
-                    )
-                logger.info(
-                    "[%s] Dropdown поставщиков: %d вариантов в %d столбцах",
-                    LABEL,
-                    len(supplier_name_list),
-                    num_supplier_cols,
-                )
-        except Exception:
-            logger.warning("[%s] Ошибка dropdown поставщиков", LABEL, exc_info=True)
 
-        # ── 10. Форматирование ──
-        try:
-            last_col_letter = chr(ord("A") + num_cols - 1)
-            ws.format(
+        fmt_requests += [
+            sheet_diff.repeat_cell(
+                sheet_id,
                 f"A1:{last_col_letter}1",
                 {
                     "textFormat": {
@@ -923,20 +1139,24 @@ async def sync_invoice_prices_to_sheet(
                         "foregroundColor": {"red": 0.6, "green": 0.6, "blue": 0.6},
                     },
                 },
-            )
-            ws.format(
+            ),
+            sheet_diff.repeat_cell(
+                sheet_id,
                 f"A2:{last_col_letter}2",
                 {
                     "textFormat": {"bold": True},
                     "horizontalAlignment": "CENTER",
                 },
-            )
-            ws.freeze(rows=2, cols=1)
+            ),
+            sheet_diff.freeze(sheet_id, rows=2, cols=1),
+        ]
 
-            # Форматирование разделительных строк (заголовки блоков)
-            for i, row in enumerate(data_rows, start=3):
-                if row[0] in ["🍽 БЛЮДА", "📦 ТОВАРЫ"]:
-                    ws.format(
+        # Форматирование разделительных строк (заголовки блоков)
+        for i, row in enumerate(data_rows, start=3):
+            if row[0] in ["🍽 БЛЮДА", "📦 ТОВАРЫ"]:
+                fmt_requests.append(
+                    sheet_diff.repeat_cell(
+                        sheet_id,
                         f"A{i}:{last_col_letter}{i}",
                         {
                             "textFormat": {
@@ -951,113 +1171,111 @@ async def sync_invoice_prices_to_sheet(
                             "horizontalAlignment": "LEFT",
                         },
                     )
-        except Exception:
-            logger.warning(
-                "[%s] Ошибка форматирования прайс-листа", LABEL, exc_info=True
-            )
-
-        # ── 11. batch_update: скрыть строку 1 + колонку B, ширина столбцов ──
-        try:
-            spreadsheet = ws.spreadsheet
+                )
 
-            requests: list[dict] = [
-                # Скрыть колонку B (index 1) — UUID
-                {
-                    "updateDimensionProperties": {
-                        "range": {
-                            "sheetId": ws.id,
-                            "dimension": "COLUMNS",
-                            "startIndex": 1,
-                            "endIndex": 2,
-                        },
-                        "properties": {"hiddenByUser": True},
-                        "fields": "hiddenByUser",
-                    }
-                },
-                # Скрыть строку 1 (index 0) — мета
-                {
-                    "updateDimensionProperties": {
-                        "range": {
-                            "sheetId": ws.id,
-                            "dimension": "ROWS",
-                            "startIndex": 0,
-                            "endIndex": 1,
-                        },
-                        "properties": {"hiddenByUser": True},
-                        "fields": "hiddenByUser",
-                    }
-                },
-                # Авто-ширина колонки A
-                {
-                    "autoResizeDimensions": {
-                        "dimensions": {
-                            "sheetId": ws.id,
-                            "dimension": "COLUMNS",
-                            "startIndex": 0,
-                            "endIndex": 1,
-                        }
-                    }
-                },
-                # Ширина колонки C (Склад) — 200px
-                {
-                    "updateDimensionProperties": {
-                        "range": {
-                            "sheetId": ws.id,
-                            "dimension": "COLUMNS",
-                            "startIndex": 2,
-                            "endIndex": 3,
-                        },
-                        "properties": {"pixelSize": 200},
-                        "fields": "pixelSize",
-                    }
-                },
-                # Ширина колонки D (Себестоимость) — 120px
-                {
-                    "updateDimensionProperties": {
-                        "range": {
-                            "sheetId": ws.id,
-                            "dimension": "COLUMNS",
-                            "startIndex": 3,
-                            "endIndex": 4,
-                        },
-                        "properties": {"pixelSize": 120},
-                        "fields": "pixelSize",
-                    }
-                },
-                # Ширина столбцов E..N (поставщики) — 130px
-                {
-                    "updateDimensionProperties": {
-                        "range": {
-                            "sheetId": ws.id,
-                            "dimension": "COLUMNS",
-                            "startIndex": 4,
-                            "endIndex": 4 + num_supplier_cols,
-                        },
-                        "properties": {"pixelSize": 130},
-                        "fields": "pixelSize",
-                    }
-                },
-                # Очистка валидации колонки D (Себестоимость) — пустое правило = удаление
-                {
-                    "setDataValidation": {
-                        "range": {
-                            "sheetId": ws.id,
-                            "startRowIndex": 2,
-                            "endRowIndex": 2 + len(data_rows),
-                            "startColumnIndex": 3,
-                            "endColumnIndex": 4,
-                        },
-                        # rule отсутствует → валидация снимается
+        # Скрыть строку 1 + колонку B, ширина столбцов
+        fmt_requests += [
+            # Скрыть колонку B (index 1) — UUID
+            {
+                "updateDimensionProperties": {
+                    "range": {
+                        "sheetId": sheet_id,
+                        "dimension": "COLUMNS",
+                        "startIndex": 1,
+                        "endIndex": 2,
+                    },
+                    "properties": {"hiddenByUser": True},
+                    "fields": "hiddenByUser",
+                }
+            },
+            # Скрыть строку 1 (index 0) — мета
+            {
+                "updateDimensionProperties": {
+                    "range": {
+                        "sheetId": sheet_id,
+                        "dimension": "ROWS",
+                        "startIndex": 0,
+                        "endIndex": 1,
+                    },
+                    "properties": {"hiddenByUser": True},
+                    "fields": "hiddenByUser",
+                }
+            },
+            # Авто-ширина колонки A
+            {
+                "autoResizeDimensions": {
+                    "dimensions": {
+                        "sheetId": sheet_id,
+                        "dimension": "COLUMNS",
+                        "startIndex": 0,
+                        "endIndex": 1,
                     }
-                },
-            ]
+                }
+            },
+            # Ширина колонки C (Склад) — 200px
+            {
+                "updateDimensionProperties": {
+                    "range": {
+                        "sheetId": sheet_id,
+                        "dimension": "COLUMNS",
+                        "startIndex": 2,
+                        "endIndex": 3,
+                    },
+                    "properties": {"pixelSize": 200},
+                    "fields": "pixelSize",
+                }
+            },
+            # Ширина колонки D (Себестоимость) — 120px
+            {
+                "updateDimensionProperties": {
+                    "range": {
+                        "sheetId": sheet_id,
+                        "dimension": "COLUMNS",
+                        "startIndex": 3,
+                        "endIndex": 4,
+                    },
+                    "properties": {"pixelSize": 120},
+                    "fields": "pixelSize",
+                }
+            },
+            # Ширина столбцов E..N (поставщики) — 130px
+            {
+                "updateDimensionProperties": {
+                    "range": {
+                        "sheetId": sheet_id,
+                        "dimension": "COLUMNS",
+                        "startIndex": 4,
+                        "endIndex": 4 + num_supplier_cols,
+                    },
+                    "properties": {"pixelSize": 130},
+                    "fields": "pixelSize",
+                }
+            },
+            # Очистка валидации колонки D (Себестоимость) — пустое правило = удаление
+            {
+                "setDataValidation": {
+                    "range": {
+                        "sheetId": sheet_id,
+                        "startRowIndex": 2,
+                        "endRowIndex": 2 + len(data_rows),
+                        "startColumnIndex": 3,
+                        "endColumnIndex": 4,
+                    },
+                    # rule отсутствует → валидация снимается
+                }
+            },
+        ]
 
-            spreadsheet.batch_update({"requests": requests})
-            logger.info(
-                "[%s] batch_update прайс-листа: скрыты строка 1 + колонка B", LABEL
-            )
-        except Exception:
-            logger.warning("[%s] Ошибка batch_update прайс-листа", LABEL, exc_info=True)
+        # ── 8. Дифф-запись: строки выравниваются по product_id (разделители — по тексту) ──
+        sheet_diff.apply_grid(
+            ws,
+            existing_data,
+            all_rows,
+            name="invoice_prices",
+            key=lambda row: (row[1] if len(row) > 1 else "") or (row[0] if row else ""),
+            header_rows=2,
+            format_requests=fmt_requests,
+        )
 
         return len(data_rows)
 
@@ -1238,8 +1456,9 @@ async def read_permissions_sheet() -> list[dict[str, Any]]:
     t0 = time.monotonic()
 
     def _sync_read() -> list[dict[str, Any]]:
-        ws = _get_permissions_worksheet()
-        all_values = ws.get_all_values()
+        all_values = _snapshot_tab_or_create(
+            MIN_STOCK_SHEET_ID, PERMS_TAB, _get_permissions_worksheet
+        )
 
         if len(all_values) < 3:
             return []
@@ -1299,7 +1518,7 @@ async def sync_permissions_to_sheet(
       - Новые столбцы добавляются пустыми
       - Существующие ✅/❌ НЕ перезаписываются (для оставшихся ключей)
       - Строки уволенных НЕ удаляются (но и не добавляются новые)
-      - НЕ стирает лист целиком (в отличие от номенклатуры)
+      - НЕ стирает лист: пишутся только изменившиеся ячейки (adapters/sheet_diff.py)
 
     Auto-sync столбцов:
       Столбцы прав целиком определяются `permission_keys` (из bot/permission_map.py).
@@ -1415,41 +1634,16 @@ async def sync_permissions_to_sheet(
                     row.append(False)
             data_rows.append(row)
 
-        # ── 6. Записываем ──
+        # ── 6. Форматирование (отправляется только при смене раскладки) ──
         all_rows = [meta, headers] + data_rows
-        needed_rows = len(all_rows) + 10
-        needed_cols = max(num_cols, 2)
-
-        if ws.row_count < needed_rows or ws.col_count < needed_cols:
-            ws.resize(
-                rows=max(needed_rows, ws.row_count),
-                cols=max(needed_cols, ws.col_count),
-            )
-
-        # gspread 6.x может вернуть пустой body → JSONDecodeError
-        try:
-            ws.clear()
-        except json.JSONDecodeError:
-            logger.debug("[%s] clear() вернул пустой body (ОК)", LABEL)
-
-        if all_rows:
-            end_cell = gspread.utils.rowcol_to_a1(len(all_rows), num_cols)
-            try:
-                ws.update(
-                    f"A1:{end_cell}",
-                    all_rows,
-                    value_input_option="RAW",
-                )
-            except json.JSONDecodeError:
-                logger.debug("[%s] update() вернул пустой body (ОК)", LABEL)
-
-        # ── 7. Форматирование ──
-        try:
-            last_col = (
-                gspread.utils.rowcol_to_a1(1, num_cols)[-1] if num_cols <= 26 else "Z"
-            )
+        sheet_id = ws.id
+        last_col = (
+            gspread.utils.rowcol_to_a1(1, num_cols)[-1] if num_cols <= 26 else "Z"
+        )
+        fmt_requests: list[dict] = [
             # Мета-строка — мелкий серый шрифт
-            ws.format(
+            sheet_diff.repeat_cell(
+                sheet_id,
                 f"A1:{last_col}1",
                 {
                     "textFormat": {
@@ -1457,117 +1651,111 @@ async def sync_permissions_to_sheet(
                         "foregroundColor": {"red": 0.6, "green": 0.6, "blue": 0.6},
                     },
                 },
-            )
+            ),
             # Заголовки — жирные, по центру
-            ws.format(
+            sheet_diff.repeat_cell(
+                sheet_id,
                 f"A2:{last_col}2",
                 {
                     "textFormat": {"bold": True},
                     "horizontalAlignment": "CENTER",
                 },
+            ),
+            sheet_diff.freeze(sheet_id, rows=2, cols=1),
+        ]
+        if merged_keys:
+            # Столбцы прав — по центру, чекбоксы (Boolean data validation)
+            perm_end_letter = re.sub(
+                r"\d+", "", gspread.utils.rowcol_to_a1(1, num_cols)
             )
-            # Столбцы прав — по центру
-            if len(merged_keys) > 0:
-                perm_start = gspread.utils.rowcol_to_a1(3, 3)[:1]  # "C"
-                perm_end_col = gspread.utils.rowcol_to_a1(1, num_cols)
-                # Удалим цифры — оставим букву
-                perm_end_letter = re.sub(r"\d+", "", perm_end_col)
-                ws.format(
-                    f"{perm_start}3:{perm_end_letter}{len(all_rows)}",
-                    {
-                        "horizontalAlignment": "CENTER",
-                    },
+            fmt_requests.append(
+                sheet_diff.repeat_cell(
+                    sheet_id,
+                    f"C3:{perm_end_letter}{len(all_rows)}",
+                    {"horizontalAlignment": "CENTER"},
                 )
-            ws.freeze(rows=2, cols=1)
-
-            # Чекбоксы (Boolean data validation) для столбцов прав
-            if merged_keys:
-                checkbox_requests = []
-                for ci in range(len(merged_keys)):
-                    checkbox_requests.append(
-                        {
-                            "setDataValidation": {
-                                "range": {
-                                    "sheetId": ws.id,
-                                    "startRowIndex": 2,  # строка 3 (0-based)
-                                    "endRowIndex": len(all_rows),
-                                    "startColumnIndex": 2 + ci,
-                                    "endColumnIndex": 3 + ci,
-                                },
-                                "rule": {
-                                    "condition": {"type": "BOOLEAN"},
-                                    "strict": True,
-                                    "showCustomUi": True,
-                                },
-                            }
-                        }
-                    )
-                ws.spreadsheet.batch_update({"requests": checkbox_requests})
-
-        except Exception:
-            logger.warning("[%s] Ошибка форматирования прав", LABEL, exc_info=True)
-
-        # ── 8. batch_update: скрыть строку 1 (мета) ──
-        try:
-            spreadsheet = ws.spreadsheet
-            requests: list[dict] = [
-                # Скрыть строку 1 (index 0) — мета
-                {
-                    "updateDimensionProperties": {
-                        "range": {
-                            "sheetId": ws.id,
-                            "dimension": "ROWS",
-                            "startIndex": 0,
-                            "endIndex": 1,
-                        },
-                        "properties": {"hiddenByUser": True},
-                        "fields": "hiddenByUser",
-                    }
-                },
-                # Авто-ширина колонки A (имя)
-                {
-                    "autoResizeDimensions": {
-                        "dimensions": {
-                            "sheetId": ws.id,
-                            "dimension": "COLUMNS",
-                            "startIndex": 0,
-                            "endIndex": 1,
-                        }
-                    }
-                },
-                # Ширина колонки B (Telegram ID) — 130px
+            )
+            fmt_requests.append(
                 {
-                    "updateDimensionProperties": {
+                    "setDataValidation": {
                         "range": {
-                            "sheetId": ws.id,
-                            "dimension": "COLUMNS",
-                            "startIndex": 1,
-                            "endIndex": 2,
+                            "sheetId": sheet_id,
+                            "startRowIndex": 2,  # строка 3 (0-based)
+                            "endRowIndex": len(all_rows),
+                            "startColumnIndex": 2,
+                            "endColumnIndex": num_cols,
                         },
-                        "properties": {"pixelSize": 130},
-                        "fields": "pixelSize",
-                    }
-                },
-                # Ширина столбцов прав — 140px
-                {
-                    "updateDimensionProperties": {
-                        "range": {
-                            "sheetId": ws.id,
-                            "dimension": "COLUMNS",
-                            "startIndex": 2,
-                            "endIndex": num_cols,
+                        "rule": {
+                            "condition": {"type": "BOOLEAN"},
+                            "strict": True,
+                            "showCustomUi": True,
                         },
-                        "properties": {"pixelSize": 140},
-                        "fields": "pixelSize",
                     }
-                },
-            ]
-            spreadsheet.batch_update({"requests": requests})
-            logger.info(
-                "[%s] batch_update прав: скрыта строка 1, ширины столбцов", LABEL
+                }
             )
-        except Exception:
-            logger.warning("[%s] Ошибка batch_update прав", LABEL, exc_info=True)
+        fmt_requests += [
+            # Скрыть строку 1 (index 0) — мета
+            {
+                "updateDimensionProperties": {
+                    "range": {
+                        "sheetId": sheet_id,
+                        "dimension": "ROWS",
+                        "startIndex": 0,
+                        "endIndex": 1,
+                    },
+                    "properties": {"hiddenByUser": True},
+                    "fields": "hiddenByUser",
+                }
+            },
+            # Авто-ширина колонки A (имя)
+            {
+                "autoResizeDimensions": {
+                    "dimensions": {
+                        "sheetId": sheet_id,
+                        "dimension": "COLUMNS",
+                        "startIndex": 0,
+                        "endIndex": 1,
+                    }
+                }
+            },
+            # Ширина колонки B (Telegram ID) — 130px
+            {
+                "updateDimensionProperties": {
+                    "range": {
+                        "sheetId": sheet_id,
+                        "dimension": "COLUMNS",
+                        "startIndex": 1,
+                        "endIndex": 2,
+                    },
+                    "properties": {"pixelSize": 130},
+                    "fields": "pixelSize",
+                }
+            },
+            # Ширина столбцов прав — 140px
+            {
+                "updateDimensionProperties": {
+                    "range": {
+                        "sheetId": sheet_id,
+                        "dimension": "COLUMNS",
+                        "startIndex": 2,
+                        "endIndex": num_cols,
+                    },
+                    "properties": {"pixelSize": 140},
+                    "fields": "pixelSize",
+                }
+            },
+        ]
+
+        # ── 7. Дифф-запись: строки сотрудников выравниваются по telegram_id ──
+        sheet_diff.apply_grid(
+            ws,
+            existing_data,
+            all_rows,
+            name="permissions",
+            key=lambda row: row[1] if len(row) > 1 else "",
+            header_rows=2,
+            format_requests=fmt_requests,
+        )
 
         return len(data_rows)
 
@@ -1684,29 +1872,9 @@ async def sync_request_stores_to_sheet(
 
         block.append(["", "", "", ""])  # финальный разделитель
 
-        # ── Очистить старую секцию (только до следующего ##) ──
-        if section_start_row is not None:
-            if section_end_row is not None:
-                clear_end = section_end_row
-            else:
-                clear_end = section_start_row + len(block) + 10
-            # Гарантируем что очистим достаточно строк для нового блока
-            clear_end = max(clear_end, section_start_row + len(block) + 5)
-            try:
-                ws.batch_clear([f"A{section_start_row + 1}:Z{clear_end}"])
-            except Exception:
-                logger.debug("suppressed", exc_info=True)
-        # ── Записать (USER_ENTERED чтобы формулы работали) ──
-        ws.update(
-            f"A{start_row}",
-            block,
-            value_input_option="USER_ENTERED",
-        )
-
         # ════════════════════════════════════════════════
         #  Форматирование
         # ════════════════════════════════════════════════
-        spreadsheet = _get_client().open_by_key(MIN_STOCK_SHEET_ID)
         fmt_requests: list[dict] = []
 
         marker_0 = start_row - 1  # 0-based
@@ -1894,14 +2062,24 @@ async def sync_request_stores_to_sheet(
                 }
             )
 
-        try:
-            spreadsheet.batch_update({"requests": fmt_requests})
-        except Exception:
-            logger.warning(
-                "[%s] Ошибка форматирования секции Заведение для заявок",
-                LABEL,
-                exc_info=True,
-            )
+        # ── Дифф-запись секции (только до следующего ##) ──
+        # Секция в середине листа (tail=False) растёт/сжимается вставкой/удалением
+        # строк — соседние секции не перетираются. USER_ENTERED — чтобы формулы
+        # работали (ячейка VLOOKUP читается вычисленной и переписывается всегда).
+        if section_start_row is not None:
+            current = all_values[section_start_row:section_end_row]
+        else:
+            current = []
+        sheet_diff.apply_grid(
+            ws,
+            current,
+            block,
+            name="request_stores",
+            row_offset=start_row - 1,
+            tail=section_end_row is None,
+            format_requests=fmt_requests,
+            value_input_option="USER_ENTERED",
+        )
 
         return len(store_names)
 
@@ -1928,8 +2106,9 @@ async def read_request_stores() -> list[dict[str, str]]:
     t0 = time.monotonic()
 
     def _sync_read() -> list[dict[str, str]]:
-        ws = _get_settings_worksheet()
-        all_values = ws.get_all_values()
+        all_values = _snapshot_tab_or_create(
+            MIN_STOCK_SHEET_ID, SETTINGS_TAB, _get_settings_worksheet
+        )
 
         result: list[dict[str, str]] = []
         in_section = False
@@ -2013,8 +2192,9 @@ async def read_cloud_org_mapping() -> dict[str, str]:
     t0 = time.monotonic()
 
     def _sync_read() -> dict[str, str]:
-        ws = _get_settings_worksheet()
-        all_values = ws.get_all_values()
+        all_values = _snapshot_tab_or_create(
+            MIN_STOCK_SHEET_ID, SETTINGS_TAB, _get_settings_worksheet
+        )
 
         mapping: dict[str, str] = {}
         in_section = False
@@ -2615,8 +2795,11 @@ def read_base_mapping_sheet() -> list[dict[str, str]]:
     Прочитать базовую таблицу маппинга «Маппинг».
     Возвращает list[{type, ocr_name, iiko_name, iiko_id, store_type}].
     """
-    ws = _get_mapping_worksheet(_MAPPING_BASE_TAB)
-    rows = ws.get_all_values()
+    rows = _snapshot_tab_or_create(
+        MIN_STOCK_SHEET_ID,
+        _MAPPING_BASE_TAB,
+        lambda: _get_mapping_worksheet(_MAPPING_BASE_TAB),
+    )
     if len(rows) < 2:
         return []
 
@@ -3524,237 +3707,175 @@ async def sync_salary_sheet(employees: list[dict]) -> int:
             sal_type = emp.get("sal_type", "")
             rate = emp.get("rate", "")
             mot_pct = emp.get("mot_pct", "")
-            mot_base = emp.get("mot_base", "")
-            data_rows.append([name, sal_type, rate, mot_pct, mot_base, iiko_id])
-
-        all_rows = [_SALARY_HEADERS] + data_rows
-        n_rows = len(all_rows)
-        n_cols = len(_SALARY_HEADERS)
-
-        # ── 3. Resize до точного числа строк ──
-        # ws.resize() — СТРУКТУРНАЯ операция (не values.clear): физически удаляет
-        # строки/столбцы за пределами указанного диапазона. Это гарантированно
-        # убирает стрелки/данные строк с исключёнными сотрудниками без зависимости
-        # от values.batchClear, который молча не работает при пустом HTTP-ответе.
-        ws.resize(rows=n_rows, cols=n_cols)
-
-        # ── 4. Записываем актуальные данные ──
-        end_cell = gspread.utils.rowcol_to_a1(n_rows, n_cols)
-        try:
-            ws.update(f"A1:{end_cell}", all_rows, value_input_option="USER_ENTERED")
-        except json.JSONDecodeError:
-            logger.debug("[%s] update() пустой body (ОК)", LABEL)
-
-        # Добавляем несколько пустых строк для удобства ввода
-        ws.resize(rows=n_rows + 15, cols=n_cols)
-
-        try:
-            # Заголовок — жирный и по центру
-            ws.format(
-                "A1:E1",
-                {
-                    "textFormat": {"bold": True},
-                    "horizontalAlignment": "CENTER",
-                    "backgroundColor": {"red": 0.85, "green": 0.91, "blue": 0.98},
-                },
-            )
-            # Колонки B и E — по центру
-            ws.format("B2:B1000", {"horizontalAlignment": "CENTER"})
-            ws.format("E2:E1000", {"horizontalAlignment": "CENTER"})
-            # Колонки C и D (ставка, %) — по центру
-            ws.format("C2:C1000", {"horizontalAlignment": "CENTER"})
-            ws.format("D2:D1000", {"horizontalAlignment": "CENTER"})
-            # Заморозить заголовок
-            ws.freeze(rows=1)
-        except Exception:
-            logger.warning(
-                "[%s] Ошибка форматирования «%s»", LABEL, _SALARY_TAB, exc_info=True
-            )
-
-        # ── 6. batch_update: выпадающие списки + ширина колонок ──
-        try:
-            spreadsheet = ws.spreadsheet
-
-            def _one_of_list(values: list[str]) -> dict:
-                """Правило валидации «список значений»."""
-                return {
-                    "condition": {
-                        "type": "ONE_OF_LIST",
-                        "values": [{"userEnteredValue": v} for v in values],
-                    },
-                    "showCustomUi": True,
-                    "strict": False,
-                }
-
-            requests: list[dict] = [
-                # Сброс старой валидации на всём листе (убирает стрелки в пустых строках)
-                {
-                    "setDataValidation": {
-                        "range": {
-                            "sheetId": sheet_id,
-                            "startRowIndex": 1,
-                            "endRowIndex": 1000,
-                            "startColumnIndex": 0,
-                            "endColumnIndex": n_cols,
-                        }
-                        # rule отсутствует → удаляет валидацию
-                    }
-                },
-                # Dropdown: Тип расчёта (колонка B = index 1) — только строки с данными
-                {
-                    "setDataValidation": {
-                        "range": {
-                            "sheetId": sheet_id,
-                            "startRowIndex": 1,
-                            "endRowIndex": n_rows,
-                            "startColumnIndex": 1,
-                            "endColumnIndex": 2,
-                        },
-                        "rule": _one_of_list(_SALARY_TYPE_OPTIONS),
-                    }
-                },
-                # Dropdown: База мотивации (колонка E = index 4) — только строки с данными
-                {
-                    "setDataValidation": {
-                        "range": {
-                            "sheetId": sheet_id,
-                            "startRowIndex": 1,
-                            "endRowIndex": n_rows,
-                            "startColumnIndex": 4,
-                            "endColumnIndex": 5,
-                        },
-                        "rule": _one_of_list(_SALARY_BASE_OPTIONS),
-                    }
-                },
-                # Авто-ширина колонки A (Сотрудник)
-                {
-                    "autoResizeDimensions": {
-                        "dimensions": {
-                            "sheetId": sheet_id,
-                            "dimension": "COLUMNS",
-                            "startIndex": 0,
-                            "endIndex": 1,
-                        }
-                    }
-                },
-                # Фиксированная ширина B (тип расчёта)
-                {
-                    "updateDimensionProperties": {
-                        "range": {
-                            "sheetId": sheet_id,
-                            "dimension": "COLUMNS",
-                            "startIndex": 1,
-                            "endIndex": 2,
-                        },
-                        "properties": {"pixelSize": 140},
-                        "fields": "pixelSize",
-                    }
+            mot_base = emp.get("mot_base", "")
+            data_rows.append([name, sal_type, rate, mot_pct, mot_base, iiko_id])
+
+        all_rows = [_SALARY_HEADERS] + data_rows
+        n_rows = len(all_rows)
+        n_cols = len(_SALARY_HEADERS)
+
+        # ── 2. Текущее содержимое (FORMULA — сырые числа, как их пишет USER_ENTERED) ──
+        current = ws.get_all_values(
+            value_render_option=gspread.utils.ValueRenderOption.formula,
+        )
+        spreadsheet = ws.spreadsheet
+
+        # ── 3. Форматирование (отправляется только при смене раскладки) ──
+        def _one_of_list(values: list[str]) -> dict:
+            """Правило валидации «список значений»."""
+            return {
+                "condition": {
+                    "type": "ONE_OF_LIST",
+                    "values": [{"userEnteredValue": v} for v in values],
                 },
-                # Фиксированная ширина C (ставка)
+                "showCustomUi": True,
+                "strict": False,
+            }
+
+        fmt_requests: list[dict] = [
+            # Заголовок — жирный и по центру
+            sheet_diff.repeat_cell(
+                sheet_id,
+                "A1:E1",
                 {
-                    "updateDimensionProperties": {
-                        "range": {
-                            "sheetId": sheet_id,
-                            "dimension": "COLUMNS",
-                            "startIndex": 2,
-                            "endIndex": 3,
-                        },
-                        "properties": {"pixelSize": 110},
-                        "fields": "pixelSize",
-                    }
+                    "textFormat": {"bold": True},
+                    "horizontalAlignment": "CENTER",
+                    "backgroundColor": {"red": 0.85, "green": 0.91, "blue": 0.98},
                 },
-                # Фиксированная ширина D (мотивация %)
-                {
-                    "updateDimensionProperties": {
-                        "range": {
-                            "sheetId": sheet_id,
-                            "dimension": "COLUMNS",
-                            "startIndex": 3,
-                            "endIndex": 4,
-                        },
-                        "properties": {"pixelSize": 110},
-                        "fields": "pixelSize",
+            ),
+            # Колонки B-E (тип, ставка, %, база) — по центру
+            sheet_diff.repeat_cell(
+                sheet_id, "B2:E1000", {"horizontalAlignment": "CENTER"}
+            ),
+            # Заморозить заголовок
+            sheet_diff.freeze(sheet_id, rows=1),
+            # Сброс старой валидации на всём листе (убирает стрелки в пустых строках)
+            {
+                "setDataValidation": {
+                    "range": {
+                        "sheetId": sheet_id,
+                        "startRowIndex": 1,
+                        "endRowIndex": 1000,
+                        "startColumnIndex": 0,
+                        "endColumnIndex": n_cols,
                     }
-                },
-                # Фиксированная ширина E (база мотивации)
-                {
-                    "updateDimensionProperties": {
-                        "range": {
-                            "sheetId": sheet_id,
-                            "dimension": "COLUMNS",
-                            "startIndex": 4,
-                            "endIndex": 5,
-                        },
-                        "properties": {"pixelSize": 220},
-                        "fields": "pixelSize",
+                    # rule отсутствует → удаляет валидацию
+                }
+            },
+            # Dropdown: Тип расчёта (колонка B = index 1) — только строки с данными
+            {
+                "setDataValidation": {
+                    "range": {
+                        "sheetId": sheet_id,
+                        "startRowIndex": 1,
+                        "endRowIndex": n_rows,
+                        "startColumnIndex": 1,
+                        "endColumnIndex": 2,
+                    },
+                    "rule": _one_of_list(_SALARY_TYPE_OPTIONS),
+                }
+            },
+            # Dropdown: База мотивации (колонка E = index 4) — только строки с данными
+            {
+                "setDataValidation": {
+                    "range": {
+                        "sheetId": sheet_id,
+                        "startRowIndex": 1,
+                        "endRowIndex": n_rows,
+                        "startColumnIndex": 4,
+                        "endColumnIndex": 5,
+                    },
+                    "rule": _one_of_list(_SALARY_BASE_OPTIONS),
+                }
+            },
+            # Авто-ширина колонки A (Сотрудник)
+            {
+                "autoResizeDimensions": {
+                    "dimensions": {
+                        "sheetId": sheet_id,
+                        "dimension": "COLUMNS",
+                        "startIndex": 0,
+                        "endIndex": 1,
                     }
-                },
-                # Скрыть столбец F (iiko_id)
+                }
+            },
+        ]
+        # Фиксированные ширины B (тип), C (ставка), D (мотивация %), E (база)
+        for ci, px in ((1, 140), (2, 110), (3, 110), (4, 220)):
+            fmt_requests.append(
                 {
                     "updateDimensionProperties": {
                         "range": {
                             "sheetId": sheet_id,
                             "dimension": "COLUMNS",
-                            "startIndex": 5,
-                            "endIndex": 6,
-                        },
-                        "properties": {"hiddenByUser": True},
-                        "fields": "hiddenByUser",
-                    }
-                },
-                # Высота строк данных
-                {
-                    "updateDimensionProperties": {
-                        "range": {
-                            "sheetId": sheet_id,
-                            "dimension": "ROWS",
-                            "startIndex": 1,
-                            "endIndex": n_rows,
+                            "startIndex": ci,
+                            "endIndex": ci + 1,
                         },
-                        "properties": {"pixelSize": 22},
+                        "properties": {"pixelSize": px},
                         "fields": "pixelSize",
                     }
-                },
-                # Вертикальное выравнивание + белый фон данных (сбрасываем серый от dropdown)
-                {
-                    "repeatCell": {
-                        "range": {
-                            "sheetId": sheet_id,
-                            "startRowIndex": 1,
-                            "endRowIndex": n_rows,
-                            "startColumnIndex": 0,
-                            "endColumnIndex": n_cols,
-                        },
-                        "cell": {
-                            "userEnteredFormat": {
-                                "verticalAlignment": "MIDDLE",
-                                "backgroundColor": {
-                                    "red": 1.0,
-                                    "green": 1.0,
-                                    "blue": 1.0,
-                                },
-                            }
-                        },
-                        "fields": "userEnteredFormat(verticalAlignment,backgroundColor)",
-                    }
-                },
-            ]
-
-            spreadsheet.batch_update({"requests": requests})
-            logger.info(
-                "[%s] batch_update «%s»: dropdowns + ширины применены (%d строк)",
-                LABEL,
-                _SALARY_TAB,
-                len(data_rows),
+                }
             )
+        fmt_requests += [
+            # Скрыть столбец F (iiko_id)
+            {
+                "updateDimensionProperties": {
+                    "range": {
+                        "sheetId": sheet_id,
+                        "dimension": "COLUMNS",
+                        "startIndex": 5,
+                        "endIndex": 6,
+                    },
+                    "properties": {"hiddenByUser": True},
+                    "fields": "hiddenByUser",
+                }
+            },
+            # Высота строк данных
+            {
+                "updateDimensionProperties": {
+                    "range": {
+                        "sheetId": sheet_id,
+                        "dimension": "ROWS",
+                        "startIndex": 1,
+                        "endIndex": n_rows,
+                    },
+                    "properties": {"pixelSize": 22},
+                    "fields": "pixelSize",
+                }
+            },
+            # Вертикальное выравнивание + белый фон данных (сбрасываем серый от dropdown)
+            {
+                "repeatCell": {
+                    "range": {
+                        "sheetId": sheet_id,
+                        "startRowIndex": 1,
+                        "endRowIndex": n_rows,
+                        "startColumnIndex": 0,
+                        "endColumnIndex": n_cols,
+                    },
+                    "cell": {
+                        "userEnteredFormat": {
+                            "verticalAlignment": "MIDDLE",
+                            "backgroundColor": {
+                                "red": 1.0,
+                                "green": 1.0,
+                                "blue": 1.0,
+                            },
+                        }
+                    },
+                    "fields": "userEnteredFormat(verticalAlignment,backgroundColor)",
+                }
+            },
+        ]
 
-            # Защита листа: редактировать может ТОЛЬКО сервисный аккаунт бота
+        def _protection() -> list[dict]:
+            """Защита листа: редактировать может ТОЛЬКО сервисный аккаунт бота."""
             bot_email = ""
             try:
                 bot_email = spreadsheet.client.auth.service_account_email
             except Exception:
                 logger.debug("suppressed", exc_info=True)
-            prot_reqs = _get_protection_delete_requests(sheet_id, spreadsheet) + [
+            return _get_protection_delete_requests(sheet_id, spreadsheet) + [
                 {
                     "addProtectedRange": {
                         "protectedRange": {
@@ -3769,12 +3890,23 @@ async def sync_salary_sheet(employees: list[dict]) -> int:
                     }
                 }
             ]
-            if prot_reqs:
-                spreadsheet.batch_update({"requests": prot_reqs})
-        except Exception:
-            logger.warning(
-                "[%s] Ошибка batch_update «%s»", LABEL, _SALARY_TAB, exc_info=True
-            )
+
+        # ── 4. Дифф-запись: строки по iiko_id; уволенные удаляются, хвост чистится ──
+        # + 15 пустых строк для удобства ввода (лист дорастёт, если короче)
+        padding = [[""] * n_cols for _ in range(15)]
+        sheet_diff.apply_grid(
+            ws,
+            current,
+            all_rows + padding,
+            name="salary",
+            key=lambda row: (
+                str(row[5]) if len(row) > 5 and row[5] else str(row[0]) if row else ""
+            ),
+            header_rows=1,
+            format_requests=fmt_requests,
+            on_layout_change=_protection,
+            value_input_option="USER_ENTERED",
+        )
 
         return len(data_rows)
 
@@ -3813,8 +3945,9 @@ async def read_salary_settings() -> dict[str, dict]:
     """
 
     def _sync_read() -> dict[str, dict]:
-        ws = _get_salary_worksheet()
-        rows = ws.get_all_values()
+        rows = _snapshot_tab_or_create(
+            SALARY_SHEET_ID, _SALARY_TAB, _get_salary_worksheet
+        )
         settings: dict[str, dict] = {}
         for row in rows[1:]:  # пропускаем заголовок
             if not row or not (row[0] or "").strip():
@@ -3935,8 +4068,9 @@ async def sync_fot_sheet(
         sheet_id = ws.id
 
         # ── 0. Прочитать существующие user-editable значения (F-J) ──
-        #   Используем UNFORMATTED_VALUE чтобы получить сырые числа (float/int)
-        #   и не терять точность при парсинге форматированных строк.
+        #   FORMULA: сырые числа (float/int) без потери точности, а формулы —
+        #   текстом: их же сравнивает дифф-запись, и ручные формулы в F-J
+        #   переносятся как формулы.
         #   Храним по ключу (sect_name, name) + fallback по name-only.
         # Ключи: (section, iiko_id), (section, name), name — от самого точного к фоллбэку.
         # Не храним по голому iiko_id — один сотрудник может быть
@@ -3945,10 +4079,11 @@ async def sync_fot_sheet(
         saved_sect_name: dict[tuple[str, str], list] = {}  # (section, name)
         saved_by_name: dict[str, list] = {}  # name only (fallback)
         known_iiko_ids: set[str] = set()  # iiko_id встречающиеся в saved
+        existing: list[list] = []
         if not is_new:
             try:
                 existing = ws.get_all_values(
-                    value_render_option=gspread.utils.ValueRenderOption.unformatted,
+                    value_render_option=gspread.utils.ValueRenderOption.formula,
                 )
                 cur_section = ""
                 format_valid = False  # флаг: заголовки нового формата
@@ -3973,10 +4108,12 @@ async def sync_fot_sheet(
                     if not cell_a or not format_valid:
                         continue
 
-                    def _raw_fj(idx: int, _row: list = row) -> float:
+                    def _raw_fj(idx: int, _row: list = row) -> float | str:
                         v = _row[idx] if len(_row) > idx else 0
                         if isinstance(v, (int, float)):
                             return float(v)
+                        if str(v).startswith("="):
+                            return str(v)
                         return _parse_fot_num(str(v))
 
                     iiko_id_cell = str(row[11]).strip() if len(row) > 11 else ""
@@ -3997,22 +4134,6 @@ async def sync_fot_sheet(
                     exc_info=True,
                 )
 
-        # Очистка значений + форматирования
-        ws.clear()
-        spreadsheet.batch_update(
-            {
-                "requests": [
-                    {
-                        "repeatCell": {
-                            "range": {"sheetId": sheet_id},
-                            "cell": {"userEnteredFormat": {}},
-                            "fields": "userEnteredFormat",
-                        }
-                    }
-                ]
-            }
-        )
-
         # ── 1. Построить массив данных ──
         all_values: list[list] = []
         all_values.append([period_label] + [""] * (_FOT_NCOLS - 1))
@@ -4164,14 +4285,17 @@ async def sync_fot_sheet(
             logger.info("[%s] sync_fot_sheet: нет данных, лист не обновлён", LABEL)
             return 0
 
-        ws.update(
-            range_name=f"A1:{gspread.utils.rowcol_to_a1(len(all_values), _FOT_NCOLS)}",
-            values=all_values,
-            value_input_option="USER_ENTERED",
-        )
-
-        # ── 2. Форматирование ──
-        requests: list[dict] = []
+        # ── 2. Форматирование (отправляется только при смене раскладки) ──
+        # Сначала сброс старого форматирования всего листа
+        requests: list[dict] = [
+            {
+                "repeatCell": {
+                    "range": {"sheetId": sheet_id},
+                    "cell": {"userEnteredFormat": {}},
+                    "fields": "userEnteredFormat",
+                }
+            }
+        ]
 
         # -- Период (строка 1): серый, жирный, по центру --
         requests.append(
@@ -4410,50 +4534,57 @@ async def sync_fot_sheet(
         )
 
         # ── 3. Защита: весь лист, кроме F-J и L в данных ──
-        bot_email = ""
-        try:
-            bot_email = spreadsheet.client.auth.service_account_email
-        except Exception:
-            logger.debug("suppressed", exc_info=True)
-        prot_reqs = _get_protection_delete_requests(sheet_id, spreadsheet)
-        unprotected = []
-        for ds, de in data_row_ranges:
-            # F-J (cols 5-9)
-            unprotected.append(
+        def _protection() -> list[dict]:
+            bot_email = ""
+            try:
+                bot_email = spreadsheet.client.auth.service_account_email
+            except Exception:
+                logger.debug("suppressed", exc_info=True)
+            prot_reqs = _get_protection_delete_requests(sheet_id, spreadsheet)
+            unprotected = []
+            for ds, de in data_row_ranges:
+                # F-J (cols 5-9)
+                unprotected.append(
+                    {
+                        "sheetId": sheet_id,
+                        "startRowIndex": ds,
+                        "endRowIndex": de,
+                        "startColumnIndex": 5,
+                        "endColumnIndex": 10,
+                    }
+                )
+            prot_reqs.append(
                 {
-                    "sheetId": sheet_id,
-                    "startRowIndex": ds,
-                    "endRowIndex": de,
-                    "startColumnIndex": 5,
-                    "endColumnIndex": 10,
-                }
-            )
-        prot_reqs.append(
-            {
-                "addProtectedRange": {
-                    "protectedRange": {
-                        "range": {"sheetId": sheet_id},
-                        "description": "ФОТ — расчётные колонки защищены",
-                        "warningOnly": False,
-                        "editors": {
-                            "users": [bot_email] if bot_email else [],
-                            "domainUsersCanEdit": False,
-                        },
-                        "unprotectedRanges": unprotected,
+                    "addProtectedRange": {
+                        "protectedRange": {
+                            "range": {"sheetId": sheet_id},
+                            "description": "ФОТ — расчётные колонки защищены",
+                            "warningOnly": False,
+                            "editors": {
+                                "users": [bot_email] if bot_email else [],
+                                "domainUsersCanEdit": False,
+                            },
+                            "unprotectedRanges": unprotected,
+                        }
                     }
                 }
-            }
-        )
-        requests.extend(prot_reqs)
-
-        try:
-            spreadsheet.batch_update({"requests": requests})
-        except Exception:
-            logger.warning(
-                "[%s] sync_fot_sheet batch_update ошибка",
-                LABEL,
-                exc_info=True,
             )
+            return prot_reqs
+
+        # ── 4. Дифф-запись: строки по (имя, iiko_id) ──
+        sheet_diff.apply_grid(
+            ws,
+            existing,
+            all_values,
+            name="fot",
+            key=lambda row: (
+                str(row[0]) if row else "",
+                str(row[11]) if len(row) > 11 else "",
+            ),
+            format_requests=requests,
+            on_layout_change=_protection,
+            value_input_option="USER_ENTERED",
+        )
 
         return total_emp_count
 
@@ -5122,14 +5253,9 @@ async def read_fintab_employee_mapping() -> list[dict]:
     """
 
     def _sync() -> list[dict]:
-        client = _get_client()
-        spreadsheet = client.open_by_key(SALARY_SHEET_ID)
-        try:
-            ws = spreadsheet.worksheet(_FINTAB_MAPPING_TAB)
-        except gspread.exceptions.WorksheetNotFound:
+        all_rows = _snapshot_tab(SALARY_SHEET_ID, _FINTAB_MAPPING_TAB)
+        if all_rows is None:
             return []
-
-        all_rows = ws.get_all_values()
         results: list[dict] = []
         for row in all_rows[3:]:  # пропускаем 3 строки шапки
             iiko_dropdown = str(row[0]).strip() if len(row) > 0 else ""
@@ -5202,14 +5328,9 @@ async def read_fintab_dept_direction_mapping() -> list[dict]:
     """
 
     def _sync() -> list[dict]:
-        client = _get_client()
-        spreadsheet = client.open_by_key(SALARY_SHEET_ID)
-        try:
-            ws = spreadsheet.worksheet(_FINTAB_MAPPING_TAB)
-        except gspread.exceptions.WorksheetNotFound:
+        all_rows = _snapshot_tab(SALARY_SHEET_ID, _FINTAB_MAPPING_TAB)
+        if all_rows is None:
             return []
-
-        all_rows = ws.get_all_values()
         results: list[dict] = []
         for row in all_rows[3:]:  # пропускаем 3 строки шапки
             d_val = str(row[3]).strip() if len(row) > 3 else ""
@@ -5253,14 +5374,9 @@ async def read_fintab_opiu_mapping() -> list[dict]:
     """
 
     def _sync() -> list[dict]:
-        client = _get_client()
-        spreadsheet = client.open_by_key(SALARY_SHEET_ID)
-        try:
-            ws = spreadsheet.worksheet(_FINTAB_MAPPING_TAB)
-        except gspread.exceptions.WorksheetNotFound:
+        all_rows = _snapshot_tab(SALARY_SHEET_ID, _FINTAB_MAPPING_TAB)
+        if all_rows is None:
             return []
-
-        all_rows = ws.get_all_values()
         results: list[dict] = []
         for row in all_rows[3:]:  # пропускаем 3 строки шапки
             f_val = str(row[5]).strip() if len(row) > 5 else ""
@@ -5323,11 +5439,8 @@ async def read_fintab_all_mappings() -> dict[str, list[dict]]:
     """
 
     def _sync() -> dict[str, list[dict]]:
-        client = _get_client()
-        spreadsheet = client.open_by_key(SALARY_SHEET_ID)
-        try:
-            ws = spreadsheet.worksheet(_FINTAB_MAPPING_TAB)
-        except gspread.exceptions.WorksheetNotFound:
+        all_rows = _snapshot_tab(SALARY_SHEET_ID, _FINTAB_MAPPING_TAB)
+        if all_rows is None:
             logger.warning("[%s] read_fintab_all_mappings: вкладка не найдена", LABEL)
             return {
                 "opiu": [],
@@ -5338,8 +5451,6 @@ async def read_fintab_all_mappings() -> dict[str, list[dict]]:
                 "purchase_store_type": [],
             }
 
-        all_rows = ws.get_all_values()
-
         # ── Маппинг ОПИУ (F-G) ──
         opiu_results: list[dict] = []
         for row in all_rows[3:]:
@@ -5,15 +5,17 @@ GPT-5.2 Vision OCR — прямое распознавание документ
 бухгалтерских документов (УПД, чеки, акты, ордера) напрямую из изображений.
 """
 
-import io
 import json
 import re
 import base64
 import logging
 from typing import Dict, Any
-from openai import AsyncOpenAI
-from PIL import Image, ImageOps
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 from config import OPENAI_API_KEY
+from utils.metrics import MeteredTransport
+from utils.cpu_pool import run_cpu
+from utils.image_prep import prepare_model_jpeg_sync
 
 logger = logging.getLogger(__name__)
 
@@ -28,7 +30,16 @@ def _get_client() -> AsyncOpenAI:
     """Получить singleton AsyncOpenAI клиент."""
     global _client
     if _client is None:
-        _client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+        # Повторы 429/5xx делает use_cases/ocr_scheduler (он же снижает
+        # параллельность) — встроенные повторы SDK прятали бы 429.
+        # MeteredTransport — латентность / байты / ошибки для /metrics.
+        _client = AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            max_retries=0,
+            http_client=DefaultAsyncHttpxClient(
+                transport=MeteredTransport("openai", httpx.AsyncHTTPTransport())
+            ),
+        )
     return _client
 
 
@@ -185,70 +196,55 @@ SYSTEM_PROMPT = """
 
 def _auto_rotate(image_bytes: bytes) -> bytes:
     """
-    Исправить ориентацию изображения по EXIF-тегу.
+    Исправить ориентацию изображения по EXIF-тегу и ужать под модель.
     Телефоны часто сохраняют фото повёрнутыми с EXIF-пометкой о повороте —
     exif_transpose() физически поворачивает пиксели и убирает тег.
     Горизонтальные документы НЕ трогаем: А4 может быть сфотографирован
     в ландшафтной ориентации — это нормально.
+    JPEG без поворота и в пределах MODEL_MAX_SIDE уходит без пересжатия.
     """
     try:
-        img = Image.open(io.BytesIO(image_bytes))
-        img = ImageOps.exif_transpose(img)  # убираем EXIF-поворот, если есть
-        buf = io.BytesIO()
-        img.save(buf, format="JPEG", quality=95)
-        return buf.getvalue()
+        return prepare_model_jpeg_sync(image_bytes)
     except Exception:
         return image_bytes  # при ошибке возвращаем исходные байты
 
 
-async def recognize_document(image_bytes: bytes) -> Dict[str, Any]:
-    """
-    Распознать документ через GPT-5.2 Vision.
+_INSTRUCTIONS = (
+    "ОБЯЗАТЕЛЬНО:\n"
+    "1. Сначала посчитай строки с товарами в таблице (не считая заголовок и 'Итого').\n"
+    "2. Пиши названия товаров и имена ТОЧНО как видишь — букву за буквой.\n"
+    "3. НЕ заменяй непонятные слова похожими по смыслу — если не уверен, пиши то что видишь.\n"
+    "4. Количество items в JSON = количество строк в таблице (не больше, не меньше)."
+)
 
-    Args:
-        image_bytes: Изображение в формате JPEG/PNG
+# Потолок ответа для многостраничного запроса (items со всех страниц)
+_MAX_COMPLETION_TOKENS = 4096
+_MAX_COMPLETION_TOKENS_MULTI = 16384
 
-    Returns:
-        Словарь с распознанными данными
-    """
-    client = _get_client()
 
-    # Авто-поворот: коррекция EXIF + горизонтальные → портрет
-    image_bytes = _auto_rotate(image_bytes)
-
-    # Кодируем изображение в base64
+def _image_part(image_bytes: bytes) -> dict:
     base64_image = base64.b64encode(image_bytes).decode("utf-8")
+    return {
+        "type": "image_url",
+        "image_url": {
+            "url": f"data:image/jpeg;base64,{base64_image}",
+            "detail": "high",
+        },
+    }
+
+
+async def _complete(content: list[dict], max_tokens: int) -> Dict[str, Any]:
+    """Один вызов GPT Vision + разбор JSON. Исключения API пробрасываются."""
+    client = _get_client()
 
     # Вызываем GPT-5.2 Vision
     response = await client.chat.completions.create(
         model=OCR_MODEL,
         messages=[
             {"role": "system", "content": SYSTEM_PROMPT},
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": (
-                            "Распознай этот документ и извлеки все данные в JSON.\n"
-                            "ОБЯЗАТЕЛЬНО:\n"
-                            "1. Сначала посчитай строки с товарами в таблице (не считая заголовок и 'Итого').\n"
-                            "2. Пиши названия товаров и имена ТОЧНО как видишь — букву за буквой.\n"
-                            "3. НЕ заменяй непонятные слова похожими по смыслу — если не уверен, пиши то что видишь.\n"
-                            "4. Количество items в JSON = количество строк в таблице (не больше, не меньше)."
-                        ),
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_image}",
-                            "detail": "high",
-                        },
-                    },
-                ],
-            },
+            {"role": "user", "content": content},
         ],
-        max_completion_tokens=4096,  # GPT-5.2 использует этот параметр
+        max_completion_tokens=max_tokens,  # GPT-5.2 использует этот параметр
         # temperature не поддерживается (только 1 по умолчанию)
     )
 
@@ -291,3 +287,77 @@ async def recognize_document(image_bytes: bytes) -> Dict[str, Any]:
     }
 
     return result
+
+
+async def recognize_document(
+    image_bytes: bytes, *, prepared: bool = False
+) -> Dict[str, Any]:
+    """
+    Распознать документ через GPT-5.2 Vision.
+
+    Args:
+        image_bytes: Изображение в формате JPEG/PNG
+        prepared: Байты уже прошли utils/image_prep (поворот + размер) —
+            повторно не декодируем
+
+    Returns:
+        Словарь с распознанными данными
+    """
+    # Авто-поворот по EXIF + размер под модель — в пуле процессов
+    if not prepared:
+        image_bytes = await run_cpu(_auto_rotate, image_bytes)
+
+    return await _complete(
+        [
+            {
+                "type": "text",
+                "text": (
+                    "Распознай этот документ и извлеки все данные в JSON.\n"
+                    + _INSTRUCTIONS
+                ),
+            },
+            _image_part(image_bytes),
+        ],
+        _MAX_COMPLETION_TOKENS,
+    )
+
+
+async def recognize_pages(
+    pages: list[bytes], *, prepared: bool = False
+) -> Dict[str, Any]:
+    """
+    Распознать несколько страниц ОДНОГО документа одним запросом.
+
+    Модель видит все страницы сразу и возвращает один JSON: items со всех
+    страниц по порядку, page_number=1; _pages_in_request — сколько фото
+    покрыл ответ (для проверки полноты). Системный промпт тот же,
+    что у recognize_document.
+
+    Args:
+        pages: Изображения страниц по порядку
+        prepared: Байты уже прошли utils/image_prep
+
+    Returns:
+        Словарь с распознанными данными (как у recognize_document)
+    """
+    if len(pages) == 1:
+        return await recognize_document(pages[0], prepared=prepared)
+    if not prepared:
+        pages = [await run_cpu(_auto_rotate, p) for p in pages]
+
+    text = (
+        f"Это {len(pages)} страниц(ы) ОДНОГО документа, по порядку.\n"
+        "Распознай документ целиком и верни ОДИН JSON: шапка — с первой страницы, "
+        "items — со всех страниц подряд, total_amount — итог документа, "
+        "page_number=1, total_pages — сколько листов у документа по тексту.\n"
+        + _INSTRUCTIONS
+    )
+    result = await _complete(
+        [{"type": "text", "text": text}, *(_image_part(p) for p in pages)],
+        min(_MAX_COMPLETION_TOKENS * len(pages), _MAX_COMPLETION_TOKENS_MULTI),
+    )
+    if "error" not in result:
+        result["page_number"] = 1
+        result["total_pages"] = max(result.get("total_pages") or 1, len(pages))
+        result["_pages_in_request"] = len(pages)
+    return result
@@ -7,6 +7,7 @@
   - Один persistent httpx.AsyncClient с keep-alive connection pool
   - Нет пересоздания TCP/TLS на каждый запрос
   - limits: до 20 параллельных коннектов (для asyncio.gather)
+  - MeteredTransport: латентность / байты / ошибки / повторы → /metrics
 """
 
 import asyncio
@@ -19,6 +20,7 @@ from typing import Any
 import httpx
 
 from iiko_auth import get_auth_token, get_base_url
+from utils.metrics import MeteredTransport, record_retry
 
 logger = logging.getLogger(__name__)
 
@@ -38,12 +40,16 @@ async def _get_client() -> httpx.AsyncClient:
     if _client is None or _client.is_closed:
         from config import IIKO_VERIFY_SSL
 
-        _client = httpx.AsyncClient(
+        # verify/limits — у транспорта: MeteredTransport пишет метрики /metrics
+        transport = httpx.AsyncHTTPTransport(
             verify=IIKO_VERIFY_SSL,
-            timeout=_TIMEOUT,
             limits=_LIMITS,
             http2=False,  # iiko не поддерживает h2
         )
+        _client = httpx.AsyncClient(
+            timeout=_TIMEOUT,
+            transport=MeteredTransport("iiko_api", transport),
+        )
     return _client
 
 
@@ -100,6 +106,7 @@ async def _get_with_retry(
             last_exc = exc
             if attempt < _MAX_RETRIES:
                 delay = _RETRY_DELAYS[attempt - 1]
+                record_retry("iiko_api", url)
                 logger.warning(
                     "[API] %s — попытка %d/%d: %s. Повтор через %d сек...",
                     label,
@@ -889,6 +896,7 @@ async def send_writeoff(document: dict[str, Any]) -> dict[str, Any]:
                 raise
 
             delay = backoff[attempt] if attempt < len(backoff) else backoff[-1]
+            record_retry("iiko_api", url)
             logger.warning(
                 "[API] POST writeoff retry %d/%d: %s. Waiting %ds...",
                 attempt + 1,
@@ -10,6 +10,8 @@
 Авторизация:
   Токен берётся из таблицы iiko_access_tokens (внешний cron обновляет каждые 5 мин).
   НЕ создаём/обновляем токен сами — «работает, не трогай».
+  Токен кешируется в памяти на _TOKEN_TTL_SEC; 401 от iikoCloud → сброс кеша,
+  повторное чтение из БД и один повтор запроса.
 """
 
 import hmac
@@ -22,6 +24,7 @@ from sqlalchemy import text
 
 from config import IIKO_CLOUD_BASE_URL, IIKO_CLOUD_WEBHOOK_SECRET
 from db.engine import async_session_factory
+from utils.metrics import MeteredTransport, record_retry
 
 logger = logging.getLogger(__name__)
 
@@ -38,7 +41,9 @@ async def _get_client() -> httpx.AsyncClient:
     if _client is None or _client.is_closed:
         _client = httpx.AsyncClient(
             timeout=_TIMEOUT,
-            http2=False,
+            transport=MeteredTransport(
+                "iiko_cloud_api", httpx.AsyncHTTPTransport(http2=False)
+            ),
         )
     return _client
 
@@ -57,11 +62,24 @@ async def close_client() -> None:
 # ═══════════════════════════════════════════════════════
 
 
+_TOKEN_TTL_SEC = 60  # внешний cron обновляет токен раз в 5 мин
+
+# (token, monotonic-время чтения из БД)
+_token_cache: tuple[str, float] | None = None
+
+
 async def get_cloud_token() -> str:
     """
-    Получить последний iikoCloud access token из таблицы iiko_access_tokens.
+    Получить последний iikoCloud access token из таблицы iiko_access_tokens
+    (из памяти, если прочитан не раньше _TOKEN_TTL_SEC назад).
     Поднимается RuntimeError если токен отсутствует.
     """
+    global _token_cache
+    if _token_cache is not None:
+        token, ts = _token_cache
+        if time.monotonic() - ts < _TOKEN_TTL_SEC:
+            return token
+
     async with async_session_factory() as session:
         result = await session.execute(
             text(
@@ -73,9 +91,16 @@ async def get_cloud_token() -> str:
         raise RuntimeError(
             "No iikoCloud token in iiko_access_tokens — проверь внешний cron"
         )
+    _token_cache = (token, time.monotonic())
     return token
 
 
+def invalidate_cloud_token() -> None:
+    """Сбросить кеш токена (следующий запрос перечитает из БД)."""
+    global _token_cache
+    _token_cache = None
+
+
 async def _headers() -> dict[str, str]:
     """Authorization header для запросов к iikoCloud."""
     token = await get_cloud_token()
@@ -85,6 +110,24 @@ async def _headers() -> dict[str, str]:
     }
 
 
+async def _post(path: str, payload: dict[str, Any]) -> httpx.Response:
+    """
+    POST в iikoCloud. 401 → токен протух раньше TTL кеша:
+    сбрасываем кеш и повторяем один раз со свежим токеном из БД.
+    """
+    client = await _get_client()
+    url = f"{IIKO_CLOUD_BASE_URL}{path}"
+
+    resp = await client.post(url, headers=await _headers(), json=payload)
+    if resp.status_code == 401:
+        logger.info("[%s] 401 на %s — перечитываю токен", LABEL, path)
+        invalidate_cloud_token()
+        record_retry("iiko_cloud_api", path)
+        resp = await client.post(url, headers=await _headers(), json=payload)
+    resp.raise_for_status()
+    return resp
+
+
 # ═══════════════════════════════════════════════════════
 # Организации
 # ═══════════════════════════════════════════════════════
@@ -96,15 +139,7 @@ async def get_organizations() -> list[dict[str, Any]]:
     Нужно для определения Organization ID (один раз).
     """
     t0 = time.monotonic()
-    client = await _get_client()
-    headers = await _headers()
-
-    resp = await client.post(
-        f"{IIKO_CLOUD_BASE_URL}/api/1/organizations",
-        headers=headers,
-        json={},
-    )
-    resp.raise_for_status()
+    resp = await _post("/api/1/organizations", {})
     data = resp.json()
 
     orgs = data.get("organizations", [])
@@ -126,15 +161,7 @@ async def get_webhook_settings(organization_id: str) -> dict[str, Any]:
     """
     POST /api/1/webhooks/settings — текущие настройки вебхука.
     """
-    client = await _get_client()
-    headers = await _headers()
-
-    resp = await client.post(
-        f"{IIKO_CLOUD_BASE_URL}/api/1/webhooks/settings",
-        headers=headers,
-        json={"organizationId": organization_id},
-    )
-    resp.raise_for_status()
+    resp = await _post("/api/1/webhooks/settings", {"organizationId": organization_id})
     return resp.json()
 
 
@@ -151,9 +178,6 @@ async def register_webhook(
       - TableOrder: статус Closed
     """
     t0 = time.monotonic()
-    client = await _get_client()
-    headers = await _headers()
-
     payload = {
         "organizationId": organization_id,
         "webHooksUri": webhook_url,
@@ -173,12 +197,7 @@ async def register_webhook(
         },
     }
 
-    resp = await client.post(
-        f"{IIKO_CLOUD_BASE_URL}/api/1/webhooks/update_settings",
-        headers=headers,
-        json=payload,
-    )
-    resp.raise_for_status()
+    resp = await _post("/api/1/webhooks/update_settings", payload)
     result = resp.json()
 
     logger.info(
@@ -224,15 +243,7 @@ async def fetch_terminal_groups(organization_id: str) -> list[dict[str, Any]]:
     Возвращает список объектов {id, name, organizationId, ...}.
     """
     t0 = time.monotonic()
-    client = await _get_client()
-    headers = await _headers()
-
-    resp = await client.post(
-        f"{IIKO_CLOUD_BASE_URL}/api/1/terminal_groups",
-        headers=headers,
-        json={"organizationIds": [organization_id]},
-    )
-    resp.raise_for_status()
+    resp = await _post("/api/1/terminal_groups", {"organizationIds": [organization_id]})
     data = resp.json()
 
     # Ответ: {terminalGroups: [{organizationId, items: [...]}], terminalGroupsInSleep: [...]}
@@ -268,19 +279,11 @@ async def fetch_stop_lists(
     Если terminal_group_ids не указаны — возвращаются все терминальные группы.
     """
     t0 = time.monotonic()
-    client = await _get_client()
-    headers = await _headers()
-
     payload: dict[str, Any] = {"organizationIds": [organization_id]}
     if terminal_group_ids:
         payload["terminalGroupsIds"] = terminal_group_ids
 
-    resp = await client.post(
-        f"{IIKO_CLOUD_BASE_URL}/api/1/stop_lists",
-        headers=headers,
-        json=payload,
-    )
-    resp.raise_for_status()
+    resp = await _post("/api/1/stop_lists", payload)
     data = resp.json()
 
     result = data.get("terminalGroupStopLists", [])
@@ -0,0 +1,518 @@
+"""
+Дифф-запись листов Google Sheets.
+
+Вместо «прочитать всё → ws.clear() → переписать всё → десяток ws.format()»
+писатель сравнивает желаемую сетку с текущей и отправляет минимум:
+
+  1. spreadsheets.batchUpdate — вставка/удаление строк (снизу вверх) +
+     форматирование, но форматирование — только если изменился хеш
+     раскладки (хеш хранится в developer metadata листа);
+  2. values.batchUpdate — только изменившиеся прямоугольники ячеек.
+
+Строки данных выравниваются по ключу (difflib.SequenceMatcher): новый товар
+в середине списка — одна insertDimension + одна строка значений, а не
+перезапись всех строк ниже.
+
+Модуль синхронный (gspread) — вызывается из asyncio.to_thread, как и весь
+adapters/google_sheets.py.
+"""
+
+import hashlib
+import json
+import logging
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+from typing import Any, Callable, Hashable, Sequence
+
+import gspread
+
+logger = logging.getLogger(__name__)
+
+LABEL = "SheetDiff"
+
+# Больше прямоугольников — пишем один охватывающий диапазон (запрос не раздуваем)
+MAX_RANGES = 400
+# Разрыв в N неизменных ячеек внутри строки дешевле переписать, чем резать диапазон
+MERGE_GAP = 2
+
+LAYOUT_KEY_PREFIX = "layout_hash:"
+
+# (spreadsheet_id, sheet_id, name) → (hash, metadataId)
+_layout_cache: dict[tuple[str, int, str], tuple[str | None, int | None]] = {}
+
+
+@dataclass(slots=True)
+class GridDiff:
+    """Результат сравнения сеток: структура + значения для batchUpdate."""
+
+    structure: list[dict] = field(default_factory=list)
+    values: list[dict] = field(default_factory=list)
+    cells: int = 0
+    rows_inserted: int = 0
+    rows_deleted: int = 0
+
+
+# ═══════════════════════════════════════════════════════
+# Сравнение сеток
+# ═══════════════════════════════════════════════════════
+
+
+def _norm(value: Any) -> str:
+    """Значение ячейки в виде, в котором его вернёт get_all_values."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _out(value: Any) -> Any:
+    return "" if value is None else value
+
+
+def _is_formula(value: Any) -> bool:
+    return isinstance(value, str) and value.startswith("=")
+
+
+def _runs(cols: list[int]) -> list[tuple[int, int]]:
+    """Отсортированные колонки → полуинтервалы [c0, c1) с допуском MERGE_GAP."""
+    runs: list[tuple[int, int]] = []
+    start = prev = cols[0]
+    for c in cols[1:]:
+        if c - prev > MERGE_GAP + 1:
+            runs.append((start, prev + 1))
+            start = c
+        prev = c
+    runs.append((start, prev + 1))
+    return runs
+
+
+def _rects(row_runs: dict[int, list[tuple[int, int]]]) -> list[tuple[int, ...]]:
+    """Склеить одинаковые отрезки соседних строк в прямоугольники (r0, r1, c0, c1)."""
+    rects: list[tuple[int, ...]] = []
+    open_: dict[tuple[int, int], list[int]] = {}
+    for r in sorted(row_runs):
+        still_open: dict[tuple[int, int], list[int]] = {}
+        for run in row_runs[r]:
+            rect = open_.pop(run, None)
+            if rect is not None and rect[1] == r:
+                rect[1] = r + 1
+            else:
+                if rect is not None:
+                    rects.append((rect[0], rect[1], *run))
+                rect = [r, r + 1]
+            still_open[run] = rect
+        rects.extend((rect[0], rect[1], *run) for run, rect in open_.items())
+        open_ = still_open
+    rects.extend((rect[0], rect[1], *run) for run, rect in open_.items())
+    return rects
+
+
+def _dimension(sheet_id: int, start: int, end: int, dim: str = "ROWS") -> dict:
+    return {
+        "sheetId": sheet_id,
+        "dimension": dim,
+        "startIndex": start,
+        "endIndex": end,
+    }
+
+
+def diff_grid(
+    current: Sequence[Sequence[Any]],
+    desired: Sequence[Sequence[Any]],
+    *,
+    sheet_id: int,
+    key: Callable[[Sequence[Any]], Hashable] | None = None,
+    header_rows: int = 0,
+    row_offset: int = 0,
+    tail: bool = True,
+    row_count: int | None = None,
+    col_count: int | None = None,
+    max_ranges: int = MAX_RANGES,
+) -> GridDiff:
+    """
+    Сравнить сетки и построить запросы записи.
+
+    current / desired — строки листа начиная с row_offset (0-based).
+    key     — ключ строки данных: строки с одинаковым ключом считаются одной
+              (сдвиг → insert/deleteDimension вместо перезаписи). None —
+              сравнение по позиции.
+    header_rows — первые строки сравниваются только по позиции.
+    tail    — за сеткой на листе ничего нет: рост в конец пишется в пустые
+              строки, лишние строки в конце очищаются (без структурных правок).
+              False — сетка стоит в середине листа (секция), лишние/новые
+              строки удаляются/вставляются, чтобы не задеть соседей.
+    row_count / col_count — размер листа (для appendDimension).
+    """
+    diff = GridDiff()
+    cur_head = [list(r) for r in current[:header_rows]]
+    cur_head += [[] for _ in range(header_rows - len(cur_head))]
+    cur_body = current[header_rows:]
+    des_body = desired[header_rows:]
+    base = row_offset + header_rows
+
+    if key is None:
+        n = min(len(cur_body), len(des_body))
+        opcodes = [("replace", 0, n, 0, n)] if n else []
+        if len(cur_body) > n:
+            opcodes.append(("delete", n, len(cur_body), n, n))
+        elif len(des_body) > n:
+            opcodes.append(("insert", n, n, n, len(des_body)))
+    else:
+        matcher = SequenceMatcher(
+            None,
+            [key(r) for r in cur_body],
+            [key(r) for r in des_body],
+            autojunk=False,
+        )
+        opcodes = matcher.get_opcodes()
+
+    # Выравнивание: aligned[j] — текущее содержимое строки, которая станет
+    # строкой j желаемой сетки; trailing — хвост, который останется ниже.
+    aligned: list[Sequence[Any]] = []
+    trailing: list[Sequence[Any]] = []
+    ops: list[tuple[int, int, int]] = []  # (индекс, 0=insert/1=delete, кол-во)
+    at_end = len(cur_body)
+    for _tag, i1, i2, j1, j2 in opcodes:
+        n = min(i2 - i1, j2 - j1)
+        aligned.extend(cur_body[i1 : i1 + n])
+        if i2 - i1 > n:
+            if tail and i2 == at_end:
+                trailing.extend(cur_body[i1 + n : i2])
+            else:
+                ops.append((i1 + n, 1, i2 - i1 - n))
+        if j2 - j1 > n:
+            if not (tail and i2 == at_end):
+                ops.append((i2, 0, j2 - j1 - n))
+            aligned.extend([] for _ in range(j2 - j1 - n))
+
+    # Снизу вверх: индексы выше по листу остаются валидными
+    for index, is_delete, count in sorted(ops, reverse=True):
+        start = base + index
+        if is_delete:
+            diff.structure.append(
+                {
+                    "deleteDimension": {
+                        "range": _dimension(sheet_id, start, start + count)
+                    }
+                }
+            )
+            diff.rows_deleted += count
+        else:
+            diff.structure.append(
+                {
+                    "insertDimension": {
+                        "range": _dimension(sheet_id, start, start + count),
+                        "inheritFromBefore": start > 0,
+                    }
+                }
+            )
+            diff.rows_inserted += count
+
+    # Формулы со ссылками на строки Sheets сдвигает сам — после структурных
+    # правок сравнивать их текст с исходным нельзя, переписываем.
+    structured = bool(diff.structure)
+    post = cur_head + aligned + trailing
+    row_runs: dict[int, list[tuple[int, int]]] = {}
+    for r in range(max(len(desired), len(post))):
+        want = desired[r] if r < len(desired) else ()
+        have = post[r] if r < len(post) else ()
+        force = structured and any(_is_formula(v) for v in want)
+        if not force and list(want) == list(have):
+            continue
+        changed = []
+        for c in range(max(len(want), len(have))):
+            w = want[c] if c < len(want) else ""
+            h = have[c] if c < len(have) else ""
+            if _norm(w) != _norm(h) or (force and _is_formula(w)):
+                changed.append(c)
+        if changed:
+            diff.cells += len(changed)
+            row_runs[r] = _runs(changed)
+
+    rects = _rects(row_runs)
+    if len(rects) > max_ranges:
+        rects = [
+            (
+                min(r[0] for r in rects),
+                max(r[1] for r in rects),
+                min(r[2] for r in rects),
+                max(r[3] for r in rects),
+            )
+        ]
+    rects.sort()
+
+    def _value(r: int, c: int) -> Any:
+        row = desired[r] if r < len(desired) else ()
+        return _out(row[c]) if c < len(row) else ""
+
+    for r0, r1, c0, c1 in rects:
+        a1 = (
+            gspread.utils.rowcol_to_a1(row_offset + r0 + 1, c0 + 1)
+            + ":"
+            + gspread.utils.rowcol_to_a1(row_offset + r1, c1)
+        )
+        diff.values.append(
+            {
+                "range": a1,
+                "values": [
+                    [_value(r, c) for c in range(c0, c1)] for r in range(r0, r1)
+                ],
+            }
+        )
+
+    # Не хватает строк/колонок — appendDimension (до вставок: индексы не трогает)
+    grow: list[dict] = []
+    if row_count is not None:
+        need = row_offset + max(len(desired), len(post))
+        have_rows = row_count + diff.rows_inserted - diff.rows_deleted
+        if need > have_rows:
+            grow.append(
+                {
+                    "appendDimension": {
+                        "sheetId": sheet_id,
+                        "dimension": "ROWS",
+                        "length": need - have_rows,
+                    }
+                }
+            )
+    if col_count is not None and rects:
+        need = max(r[3] for r in rects)
+        if need > col_count:
+            grow.append(
+                {
+                    "appendDimension": {
+                        "sheetId": sheet_id,
+                        "dimension": "COLUMNS",
+                        "length": need - col_count,
+                    }
+                }
+            )
+    diff.structure[:0] = grow
+    return diff
+
+
+# ═══════════════════════════════════════════════════════
+# Запросы форматирования (то, что раньше делали ws.format / freeze / merge)
+# ═══════════════════════════════════════════════════════
+
+
+def repeat_cell(sheet_id: int, a1_range: str, fmt: dict) -> dict:
+    """Аналог ws.format(a1_range, fmt) в виде запроса batchUpdate."""
+    return {
+        "repeatCell": {
+            "range": gspread.utils.a1_range_to_grid_range(a1_range, sheet_id),
+            "cell": {"userEnteredFormat": fmt},
+            "fields": "userEnteredFormat(" + ",".join(fmt) + ")",
+        }
+    }
+
+
+def freeze(sheet_id: int, rows: int | None = None, cols: int | None = None) -> dict:
+    """Аналог ws.freeze(rows, cols): не указанное измерение не трогается."""
+    grid: dict[str, int] = {}
+    if rows is not None:
+        grid["frozenRowCount"] = rows
+    if cols is not None:
+        grid["frozenColumnCount"] = cols
+    return {
+        "updateSheetProperties": {
+            "properties": {"sheetId": sheet_id, "gridProperties": grid},
+            "fields": ",".join(f"gridProperties/{p}" for p in grid),
+        }
+    }
+
+
+def merge_cells(sheet_id: int, a1_range: str) -> dict:
+    """Аналог ws.merge_cells(a1_range, merge_type="MERGE_ALL")."""
+    return {
+        "mergeCells": {
+            "mergeType": "MERGE_ALL",
+            "range": gspread.utils.a1_range_to_grid_range(a1_range, sheet_id),
+        }
+    }
+
+
+def one_of_list(sheet_id: int, a1_range: str, values: list[str]) -> dict:
+    """Аналог ws.add_validation(..., one_of_list, values, showCustomUi=True)."""
+    return {
+        "setDataValidation": {
+            "range": gspread.utils.a1_range_to_grid_range(a1_range, sheet_id),
+            "rule": {
+                "condition": {
+                    "type": "ONE_OF_LIST",
+                    "values": [{"userEnteredValue": v} for v in values],
+                },
+                "showCustomUi": True,
+                "strict": False,
+            },
+        }
+    }
+
+
+def layout_hash(requests: Sequence[dict]) -> str:
+    """Хеш раскладки: одинаковые запросы форматирования → одинаковый хеш."""
+    raw = json.dumps(list(requests), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+# ═══════════════════════════════════════════════════════
+# Применение
+# ═══════════════════════════════════════════════════════
+
+
+def _stored_layout(
+    spreadsheet: gspread.Spreadsheet, sheet_id: int, name: str
+) -> tuple[str | None, int | None]:
+    """Хеш раскладки из developer metadata листа (кешируется в процессе)."""
+    cache_key = (spreadsheet.id, sheet_id, name)
+    if cache_key in _layout_cache:
+        return _layout_cache[cache_key]
+    stored: tuple[str | None, int | None] = (None, None)
+    try:
+        meta = spreadsheet.fetch_sheet_metadata(
+            {"fields": "sheets(properties.sheetId,developerMetadata)"}
+        )
+        for sheet in meta.get("sheets", []):
+            if sheet.get("properties", {}).get("sheetId") != sheet_id:
+                continue
+            for item in sheet.get("developerMetadata", []):
+                if item.get("metadataKey") == LAYOUT_KEY_PREFIX + name:
+                    stored = (item.get("metadataValue"), item.get("metadataId"))
+    except Exception:
+        # Не прочитали — отформатируем заново, это безопасно
+        logger.warning("[%s] Не удалось прочитать хеш раскладки", LABEL, exc_info=True)
+        return stored
+    _layout_cache[cache_key] = stored
+    return stored
+
+
+def _layout_requests(
+    sheet_id: int, name: str, value: str, old_id: int | None
+) -> list[dict]:
+    requests: list[dict] = []
+    if old_id is not None:
+        requests.append(
+            {
+                "deleteDeveloperMetadata": {
+                    "dataFilter": {"developerMetadataLookup": {"metadataId": old_id}}
+                }
+            }
+        )
+    requests.append(
+        {
+            "createDeveloperMetadata": {
+                "developerMetadata": {
+                    "metadataKey": LAYOUT_KEY_PREFIX + name,
+                    "metadataValue": value,
+                    "location": {"sheetId": sheet_id},
+                    "visibility": "DOCUMENT",
+                }
+            }
+        }
+    )
+    return requests
+
+
+def apply_grid(
+    ws: gspread.Worksheet,
+    current: Sequence[Sequence[Any]],
+    desired: Sequence[Sequence[Any]],
+    *,
+    name: str,
+    key: Callable[[Sequence[Any]], Hashable] | None = None,
+    header_rows: int = 0,
+    row_offset: int = 0,
+    tail: bool = True,
+    format_requests: Sequence[dict] = (),
+    on_layout_change: Callable[[], list[dict]] | None = None,
+    value_input_option: str = "RAW",
+) -> dict[str, int]:
+    """
+    Привести лист к desired: ≤ 1 spreadsheets.batchUpdate + ≤ 1 values.batchUpdate.
+
+    name — имя раскладки (несколько секций одного листа хранят свои хеши).
+    format_requests — полное форматирование для desired; отправляется, только
+        если его хеш отличается от сохранённого.
+    on_layout_change — дополнительные запросы (защиты и т.п.), которые дорого
+        строить; вызывается только при смене раскладки, в хеш не входит.
+
+    Ошибка форматирования не валит запись значений (как и раньше, когда
+    ws.format() был в try/except) — структура отправляется повторно без него.
+    """
+    diff = diff_grid(
+        current,
+        desired,
+        sheet_id=ws.id,
+        key=key,
+        header_rows=header_rows,
+        row_offset=row_offset,
+        tail=tail,
+        row_count=ws.row_count,
+        col_count=ws.col_count,
+    )
+    spreadsheet = ws.spreadsheet
+    fmt: list[dict] = []
+    meta: list[dict] = []
+    new_hash = None
+    if format_requests or on_layout_change is not None:
+        new_hash = layout_hash(format_requests)
+        old_hash, old_id = _stored_layout(spreadsheet, ws.id, name)
+        if old_hash != new_hash:
+            fmt = list(format_requests)
+            if on_layout_change is not None:
+                fmt += on_layout_change()
+            meta = _layout_requests(ws.id, name, new_hash, old_id)
+
+    if diff.structure or fmt:
+        try:
+            reply = spreadsheet.batch_update({"requests": diff.structure + fmt + meta})
+        except Exception:
+            if not fmt:
+                raise
+            logger.warning(
+                "[%s] Ошибка форматирования «%s» — пишем без него",
+                LABEL,
+                name,
+                exc_info=True,
+            )
+            fmt = []
+            _layout_cache.pop((spreadsheet.id, ws.id, name), None)
+            if diff.structure:
+                spreadsheet.batch_update({"requests": diff.structure})
+        else:
+            if meta:
+                created = (reply or {}).get("replies", [{}])[-1]
+                metadata_id = (
+                    created.get("createDeveloperMetadata", {})
+                    .get("developerMetadata", {})
+                    .get("metadataId")
+                )
+                _layout_cache[(spreadsheet.id, ws.id, name)] = (new_hash, metadata_id)
+
+    if diff.values:
+        try:
+            ws.batch_update(diff.values, value_input_option=value_input_option)
+        except json.JSONDecodeError:
+            logger.debug("[%s] batch_update() вернул пустой body (ОК)", LABEL)
+
+    stats = {
+        "cells": diff.cells,
+        "ranges": len(diff.values),
+        "rows_inserted": diff.rows_inserted,
+        "rows_deleted": diff.rows_deleted,
+        "formatted": int(bool(fmt)),
+    }
+    logger.info(
+        "[%s] «%s»: %d ячеек в %d диапазонах, +%d/−%d строк, формат %s",
+        LABEL,
+        name,
+        stats["cells"],
+        stats["ranges"],
+        stats["rows_inserted"],
+        stats["rows_deleted"],
+        "обновлён" if fmt else "без изменений",
+    )
+    return stats
@@ -47,7 +47,7 @@ from bot.middleware import (
 )
 from use_cases import user_context as uctx
 from use_cases import pending_incoming_invoice as pending_inv_uc
-from use_cases.ocr_pipeline import process_photo_batch, OCRResult
+from use_cases.ocr_pipeline import PhotoStream, process_photo_batch, OCRResult
 
 logger = logging.getLogger(__name__)
 
@@ -55,8 +55,14 @@ router = Router(name="document_handlers")
 
 MAX_OCR_PHOTOS = 10
 _ALBUM_DEBOUNCE_SEC = 1.5
-
-# ── Album buffer ──
+# Подпись к фото → распознать заново мимо OCR-кеша (use_cases/ocr_cache.py)
+_NO_CACHE_CAPTIONS = ("заново", "без кеша")
+# Подпись к альбому → все фото — страницы одного документа, один запрос в GPT
+_ONE_DOCUMENT_CAPTIONS = ("страницы", "один документ")
+
+# ── Album buffer: group_id → {"stream": PhotoStream, "file_ids": [...]} ──
+# Фото альбома уходят в PhotoStream сразу по приходу (скачивание + OCR),
+# debounce только закрывает альбом и собирает документы.
 _album_buffer: dict[str, dict[str, Any]] = {}
 _album_tasks: dict[str, asyncio.Task] = {}
 
@@ -260,13 +266,17 @@ def _format_summary(
 async def _do_process_photos(
     tg_id: int,
     chat_id: int,
-    photos: list[bytes],
+    photos: list[bytes] | PhotoStream,
     bot: Bot,
     state: FSMContext,
     prompt_msg_id: int,
     file_ids: list[str] | None = None,
+    use_cache: bool = True,
 ) -> None:
-    """Запустить OCR pipeline, применить маппинг, уведомить, показать сводку."""
+    """Запустить OCR pipeline, применить маппинг, уведомить, показать сводку.
+    PhotoStream — альбом, распознавание которого уже идёт: дожидаемся его.
+    use_cache=False — распознать заново мимо OCR-кеша (подпись «заново»).
+    """
     logger.info("[ocr] Обработка %d фото tg:%d", len(photos), tg_id)
 
     prompt_msg_id = await _push_progress(
@@ -279,7 +289,12 @@ async def _do_process_photos(
     start_t = time.monotonic()
 
     try:
-        results: list[OCRResult] = await process_photo_batch(photos, user_id=tg_id)
+        if isinstance(photos, PhotoStream):
+            results: list[OCRResult] = await photos.finish()
+        else:
+            results = await process_photo_batch(
+                photos, user_id=tg_id, use_cache=use_cache
+            )
     except Exception as exc:
         logger.exception("[ocr] process_photo_batch failed tg:%d", tg_id)
         await _push_progress(
@@ -420,6 +435,27 @@ async def _save_ocr_document(
 # ════════════════════════════════════════════════════════
 
 
+def _caption_has(message: Message, phrases: tuple[str, ...]) -> bool:
+    """В подписи есть одна из фраз («заново страницы» — обе подсказки)."""
+    caption = (message.caption or "").lower()
+    return any(phrase in caption for phrase in phrases)
+
+
+def _wants_fresh_ocr(message: Message) -> bool:
+    return _caption_has(message, _NO_CACHE_CAPTIONS)
+
+
+def _is_one_document(message: Message) -> bool:
+    return _caption_has(message, _ONE_DOCUMENT_CAPTIONS)
+
+
+async def _download_photo(bot: Bot, file_id: str) -> bytes:
+    file_info = await bot.get_file(file_id)
+    buf = BytesIO()
+    await bot.download_file(file_info.file_path, destination=buf)
+    return buf.getvalue()
+
+
 async def _process_album_debounce(
     tg_id: int,
     chat_id: int,
@@ -430,8 +466,10 @@ async def _process_album_debounce(
 ) -> None:
     await asyncio.sleep(_ALBUM_DEBOUNCE_SEC)
     if await state.get_state() != OcrStates.waiting_photos.state:
-        _album_buffer.pop(group_id, None)
+        dropped = _album_buffer.pop(group_id, None)
         _album_tasks.pop(group_id, None)
+        if dropped:
+            dropped["stream"].cancel()
         return
     buffer_data = _album_buffer.pop(group_id, None)
     _album_tasks.pop(group_id, None)
@@ -442,7 +480,7 @@ async def _process_album_debounce(
         await _do_process_photos(
             tg_id,
             chat_id,
-            buffer_data["photos"],
+            buffer_data["stream"],
             bot,
             state,
             prompt_msg_id,
@@ -471,7 +509,9 @@ async def btn_ocr_start(message: Message, state: FSMContext) -> None:
         "📷 <b>Отправьте фото накладных</b> (до 10 штук)\n\n"
         "Можно отправить сразу несколько фото одним альбомом.\n"
         "Поддерживаемые: УПД, Накладные, Акты, Расходные ордера.\n\n"
-        "Кассовые чеки с QR-кодом отклоняются автоматически.\n\n"
+        "Кассовые чеки с QR-кодом отклоняются автоматически.\n"
+        "Подпись <b>заново</b> к фото — распознать повторно, без кеша.\n"
+        "Подпись <b>страницы</b> к альбому — это страницы одного документа.\n\n"
         "⚡ Нажмите <b>❌ Отмена</b> для выхода.",
         parse_mode="HTML",
     )
@@ -485,33 +525,35 @@ async def handle_ocr_photo(message: Message, state: FSMContext) -> None:
     tg_id = message.from_user.id
     chat_id = message.chat.id
 
-    try:
-        best_size = message.photo[-1]
-        file_id = (
-            best_size.file_id
-        )  # сохраняем file_id до скачивания — позволит повторно отправить фото бухгалтеру
-        file_info = await message.bot.get_file(file_id)
-        buf = BytesIO()
-        await message.bot.download_file(file_info.file_path, destination=buf)
-        photo_bytes = buf.getvalue()
-    except Exception as exc:
-        logger.warning("[ocr] Не удалось скачать фото tg:%d: %s", tg_id, exc)
-        await message.answer("❌ Не удалось загрузить фото. Попробуйте ещё раз.")
-        return
-
-    data = await state.get_data()
-    prompt_msg_id = data.get("prompt_msg_id", 0)
+    # file_id сохраняем — позволит повторно отправить фото бухгалтеру
+    file_id = message.photo[-1].file_id
     group_id = message.media_group_id
+    fresh = _wants_fresh_ocr(message)
+    one_document = _is_one_document(message)
 
     if group_id:
+        # Альбом: скачивание и OCR стартуют сразу, не дожидаясь остальных фото
         if group_id not in _album_buffer:
-            _album_buffer[group_id] = {"photos": [], "file_ids": []}
+            _album_buffer[group_id] = {
+                "stream": PhotoStream(
+                    user_id=tg_id, use_cache=not fresh, one_document=one_document
+                ),
+                "file_ids": [],
+            }
         buf_data = _album_buffer[group_id]
-        if len(buf_data["photos"]) < MAX_OCR_PHOTOS:
-            buf_data["photos"].append(photo_bytes)
+        if fresh:
+            # Подпись альбома Telegram вешает на одно из фото, не обязательно первое
+            buf_data["stream"].use_cache = False
+        if one_document:
+            buf_data["stream"].one_document = True
+        if len(buf_data["file_ids"]) < MAX_OCR_PHOTOS:
+            buf_data["stream"].add(_download_photo(message.bot, file_id))
             buf_data["file_ids"].append(file_id)
+        first_in_album = len(buf_data["file_ids"]) == 1
 
-        if len(buf_data["photos"]) == 1 and prompt_msg_id:
+        data = await state.get_data()
+        prompt_msg_id = data.get("prompt_msg_id", 0)
+        if first_in_album and prompt_msg_id:
             try:
                 new_id = await _push_progress(
                     message.bot,
@@ -533,6 +575,15 @@ async def handle_ocr_photo(message: Message, state: FSMContext) -> None:
         )
         return
 
+    try:
+        photo_bytes = await _download_photo(message.bot, file_id)
+    except Exception as exc:
+        logger.warning("[ocr] Не удалось скачать фото tg:%d: %s", tg_id, exc)
+        await message.answer("❌ Не удалось загрузить фото. Попробуйте ещё раз.")
+        return
+
+    data = await state.get_data()
+    prompt_msg_id = data.get("prompt_msg_id", 0)
     await _do_process_photos(
         tg_id,
         chat_id,
@@ -541,6 +592,7 @@ async def handle_ocr_photo(message: Message, state: FSMContext) -> None:
         state,
         prompt_msg_id,
         file_ids=[file_id],
+        use_cache=not fresh,
     )
 
 
@@ -1,12 +1,14 @@
 """
 Telegram-хэндлеры: просмотр и управление хранилищем ошибок бота.
 
-/errors — показать последние нерешённые ошибки (только сисадмины).
+/errors         — нерешённые группы ошибок (только сисадмины): одна строка
+                  на отпечаток с числом повторов, свежие сверху.
+/errors <текст> — поиск образцов по сообщению / логгеру (в т.ч. решённые).
 Callbacks:
   err:detail:<pk>  — развёрнутая информация об ошибке
   err:resolve:<pk> — пометить ошибку как решённую
   err:resolveall   — пометить все нерешённые как решённые
-  err:page:<offset>— пагинация
+  err:page:<offset>— пагинация групп
   err:stats        — статистика
   err:cleanup      — удалить старые решённые (30+ дней)
 """
@@ -66,14 +68,31 @@ def _fmt_error_short(err) -> str:
     return f"{emoji} <b>#{err.pk}</b> [{_fmt_time(err.created_at)}]\n<code>{msg}</code>"
 
 
-def _fmt_error_detail(err) -> str:
-    """Подробная информация об ошибке."""
+def _fmt_group_short(group) -> str:
+    """Группа ошибок для списка: повторы, логгер, последнее событие, заголовок."""
+    emoji = "🔴" if group.level == "CRITICAL" else "🟠"
+    title = (group.title or "")[:80].replace("<", "&lt;").replace(">", "&gt;")
+    return (
+        f"{emoji} <b>×{group.count}</b> {group.logger_name.split('.')[-1]} "
+        f"[{_fmt_time(group.last_seen)}]\n<code>{title}</code>"
+    )
+
+
+def _fmt_error_detail(err, group=None) -> str:
+    """Подробная информация об ошибке (+ счётчики её группы)."""
     lines = [
         f"{'🔴' if err.level == 'CRITICAL' else '🟠'} <b>Ошибка #{err.pk}</b>",
         f"<b>Уровень:</b> {err.level}",
         f"<b>Время:</b> {_fmt_time(err.created_at)}",
         f"<b>Логгер:</b> <code>{err.logger_name}</code>",
         f"<b>Статус:</b> {'✅ Решена' if err.resolved else '❌ Не решена'}",
+    ]
+    if group is not None:
+        lines.append(
+            f"<b>Повторов:</b> {group.count} "
+            f"({_fmt_time(group.first_seen)} — {_fmt_time(group.last_seen)})"
+        )
+    lines += [
         "",
         f"<b>Сообщение:</b>\n<pre>{(err.message or '')[:2000]}</pre>",
     ]
@@ -92,17 +111,21 @@ def _fmt_error_detail(err) -> str:
 
 
 def _list_keyboard(
-    errors: list, offset: int = 0, total_unresolved: int = 0
+    items: list, offset: int = 0, total_unresolved: int = 0
 ) -> InlineKeyboardMarkup:
-    """Клавиатура списка ошибок."""
+    """Клавиатура списка: группы (образец — last_error_pk) или найденные ошибки."""
     buttons = []
 
-    for err in errors:
+    for item in items:
+        pk = getattr(item, "last_error_pk", None) or getattr(item, "pk", None)
+        if pk is None:
+            continue  # образец группы ещё не записан
+        label = getattr(item, "title", None) or item.message or ""
         buttons.append(
             [
                 InlineKeyboardButton(
-                    text=f"{'🔴' if err.level == 'CRITICAL' else '🟠'} #{err.pk} — {(err.message or '')[:40]}",
-                    callback_data=f"err:detail:{err.pk}",
+                    text=f"{'🔴' if item.level == 'CRITICAL' else '🟠'} #{pk} — {label[:40]}",
+                    callback_data=f"err:detail:{pk}",
                 )
             ]
         )
@@ -115,7 +138,7 @@ def _list_keyboard(
                 text="⬅️", callback_data=f"err:page:{max(0, offset - PAGE_SIZE)}"
             )
         )
-    if len(errors) == PAGE_SIZE:
+    if len(items) == PAGE_SIZE:
         nav.append(
             InlineKeyboardButton(
                 text="➡️", callback_data=f"err:page:{offset + PAGE_SIZE}"
@@ -164,16 +187,33 @@ def _detail_keyboard(pk: int, resolved: bool) -> InlineKeyboardMarkup:
 @router.message(Command("errors"), _is_sysadmin_check())
 @auth_required
 async def cmd_errors(message: Message, **kwargs):
-    """Показать последние нерешённые ошибки."""
-    await _show_error_list(message, offset=0)
-
-
-async def _show_error_list(target, offset: int = 0):
-    """Отобразить список ошибок (message.answer или callback.message.edit)."""
-    errors = await error_store.get_recent(limit=PAGE_SIZE, resolved=False)
+    """Показать нерешённые группы ошибок / найти образцы по тексту."""
+    args = (message.text or "").split(maxsplit=1)
+    search = args[1].strip() if len(args) > 1 else None
+    await _show_error_list(message, search=search or None)
+
+
+async def _show_error_list(
+    target,
+    offset: int = 0,
+    search: str | None = None,
+):
+    """Отобразить список (message.answer или callback.message.edit)."""
     stats = await error_store.get_stats()
+    if search:
+        items = await error_store.get_recent(
+            limit=PAGE_SIZE, resolved=None, search=search
+        )
+    else:
+        items = await error_store.get_groups(limit=PAGE_SIZE, offset=offset)
 
-    if not errors:
+    if search:
+        safe = search.replace("<", "&lt;").replace(">", "&gt;")
+        lines = [f"🔍 <b>Ошибки «{safe}»</b>\n"]
+        lines += [_fmt_error_short(err) for err in items] or ["Ничего не найдено"]
+        text = "\n".join(lines)
+        kb = _list_keyboard(items, 0, stats["unresolved"])
+    elif not items:
         text = "✅ <b>Нет нерешённых ошибок!</b>"
         kb = InlineKeyboardMarkup(
             inline_keyboard=[
@@ -186,11 +226,14 @@ async def _show_error_list(target, offset: int = 0):
             ]
         )
     else:
-        lines = [f"🚨 <b>Ошибки бота</b> ({stats['unresolved']} нерешённых)\n"]
-        for err in errors:
-            lines.append(_fmt_error_short(err))
+        lines = [
+            f"🚨 <b>Ошибки бота</b> ({stats['unresolved']} групп, "
+            f"{stats['unresolved_events']} событий)\n"
+        ]
+        for group in items:
+            lines.append(_fmt_group_short(group))
         text = "\n".join(lines)
-        kb = _list_keyboard(errors, offset, stats["unresolved"])
+        kb = _list_keyboard(items, offset, stats["unresolved"])
 
     if isinstance(target, Message):
         await target.answer(text, parse_mode="HTML", reply_markup=kb)
@@ -209,7 +252,8 @@ async def cb_error_detail(callback: CallbackQuery):
     if not err:
         await callback.answer("Ошибка не найдена", show_alert=True)
         return
-    text = _fmt_error_detail(err)
+    group = await error_store.get_group(err.fingerprint) if err.fingerprint else None
+    text = _fmt_error_detail(err, group)
     kb = _detail_keyboard(err.pk, err.resolved)
     try:
         await callback.message.edit_text(text, parse_mode="HTML", reply_markup=kb)
@@ -244,7 +288,7 @@ async def cb_resolve_error(callback: CallbackQuery):
 async def cb_resolve_all(callback: CallbackQuery):
     count = await error_store.mark_all_resolved()
     await callback.answer(f"✅ Решено: {count}", show_alert=True)
-    await _show_error_list(callback, offset=0)
+    await _show_error_list(callback)
 
 
 # ── Пагинация ──
@@ -262,9 +306,10 @@ async def cb_error_stats(callback: CallbackQuery):
     day_detail = ", ".join(f"{k}: {v}" for k, v in stats["last_24h"].items()) or "—"
     text = (
         f"📊 <b>Статистика ошибок</b>\n\n"
-        f"🔴 Нерешённых: <b>{stats['unresolved']}</b>\n"
-        f"📅 За 24 часа: <b>{day_detail}</b>\n"
-        f"📆 За 7 дней: <b>{stats['last_7d']}</b>"
+        f"🔴 Нерешённых групп: <b>{stats['unresolved']}</b> "
+        f"(событий: {stats['unresolved_events']})\n"
+        f"📅 Групп за 24 часа: <b>{day_detail}</b>\n"
+        f"📆 Групп за 7 дней: <b>{stats['last_7d']}</b>"
     )
     kb = InlineKeyboardMarkup(
         inline_keyboard=[
@@ -282,4 +327,4 @@ async def cb_error_stats(callback: CallbackQuery):
 async def cb_cleanup(callback: CallbackQuery):
     count = await error_store.cleanup_old(days=30)
     await callback.answer(f"🗑 Удалено решённых старше 30д: {count}", show_alert=True)
-    await _show_error_list(callback, offset=0)
+    await _show_error_list(callback)
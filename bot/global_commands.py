@@ -6,12 +6,14 @@ NavResetMiddleware — outer-middleware, сбрасывает FSM при наж
 навигационной Reply-кнопки, пока пользователь в каком-либо состоянии.
 PermissionMiddleware — outer-middleware, автоматическая проверка прав
 на Reply-кнопки и Callback-кнопки по централизованной карте (permission_map.py).
+HandlerMetricsMiddleware — inner-middleware, латентность хэндлеров для /metrics.
 
 Этот роутер должен быть подключён к Dispatcher ДО всех остальных,
 чтобы команда /cancel перехватывалась раньше остальных хэндлеров.
 """
 
 import logging
+import time
 from typing import Any, Awaitable, Callable
 
 from aiogram import BaseMiddleware, F, Router
@@ -25,6 +27,7 @@ from bot.permission_map import (
     CALLBACK_PERMISSIONS,
 )
 from use_cases import blocked_users as block_uc
+from utils.metrics import HANDLER_ERRORS, HANDLER_LATENCY
 
 logger = logging.getLogger(__name__)
 
@@ -303,6 +306,67 @@ class PermissionMiddleware(BaseMiddleware):
         return await handler(event, data)
 
 
+# ═══════════════════════════════════════════════════════════════
+# Inner-middleware: латентность хэндлеров для /metrics
+# ═══════════════════════════════════════════════════════════════
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Время и исключения сработавшего хэндлера → bot_handler_duration_seconds /
+    bot_handler_errors_total с метками (router, handler).
+
+    Inner-middleware: вызывается только для хэндлера, прошедшего фильтры
+    (data["handler"]). Серии метрик кешируются по callback — на апдейт
+    только perf_counter и observe. Ставится на каждый роутер: setup(dp).
+    """
+
+    def __init__(self, router_name: str) -> None:
+        self._router_name = router_name
+        self._series: dict[Any, tuple] = {}
+
+    @classmethod
+    def setup(cls, dispatcher: Router) -> None:
+        """Повесить на message / callback_query всех роутеров дерева."""
+        for r in dispatcher.chain_tail:
+            mw = cls(r.name)
+            r.message.middleware(mw)
+            r.callback_query.middleware(mw)
+
+    def _series_for(self, handler_obj: Any) -> tuple:
+        callback = getattr(handler_obj, "callback", None)
+        name = getattr(callback, "__name__", "unknown")
+        router_name = self._router_name
+        if router_name.startswith("0x"):  # Router() без name — имя модуля
+            module = getattr(callback, "__module__", "") or ""
+            router_name = module.rsplit(".", 1)[-1] or router_name
+        series = (
+            HANDLER_LATENCY.labels(router_name, name),
+            HANDLER_ERRORS.labels(router_name, name),
+        )
+        self._series[callback] = series
+        return series
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        handler_obj = data.get("handler")
+        series = self._series.get(getattr(handler_obj, "callback", None))
+        if series is None:
+            series = self._series_for(handler_obj)
+        t0 = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            series[1].inc()
+            raise
+        finally:
+            series[0].observe(time.perf_counter() - t0)
+
+
 # ═══════════════════════════════════════════════════════════════
 # /cancel — ручной сброс из любой точки
 # ═══════════════════════════════════════════════════════════════
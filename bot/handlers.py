@@ -1038,7 +1038,8 @@ async def btn_sync_fot_combined(message: Message) -> None:
 
     Последовательность:
       1. export_salary_sheet  — sync history → mirror Зарплаты
-      2. update_fot_sheet     — пересчёт ФОТ текущего месяца
+      2. update_fot_sheet     — пересчёт ФОТ текущего месяца целиком из iiko
+                                (full=True: подхватить явки, исправленные задним числом)
       3. sync_fot_to_fintablo — выгрузка дельт в FinTablo
     """
     from use_cases.salary import export_salary_sheet
@@ -1050,7 +1051,7 @@ async def btn_sync_fot_combined(message: Message) -> None:
 
     async def _combined(triggered_by: str | None = None) -> int:
         await export_salary_sheet(triggered_by=triggered_by)
-        count = await update_fot_sheet(triggered_by=triggered_by)
+        count = await update_fot_sheet(triggered_by=triggered_by, full=True)
         await sync_fot_to_fintablo(triggered_by=triggered_by)
         return count
 
@@ -1162,24 +1163,27 @@ async def btn_sync_entities(message: Message) -> None:
     triggered = f"tg:{message.from_user.id}"
     logger.info("[sync] справочники tg:%d", message.from_user.id)
     lock = get_sync_lock("sync_entities")
-    if lock.locked():
+    if not await lock.acquire_nowait():
         await message.answer(
             "⏳ Синхронизация справочников уже выполняется. Подождите."
         )
         return
-    placeholder = await message.answer("⏳ Синхронизация справочников (16 типов)...")
-
     try:
-        async with lock:
+        placeholder = await message.answer(
+            "⏳ Синхронизация справочников (16 типов)..."
+        )
+        try:
             results = await sync_uc.sync_all_entities(triggered_by=triggered)
-        lines = []
-        for rt, cnt in results.items():
-            status = f"✅ {cnt}" if cnt >= 0 else "❌ Ошибка"
-            lines.append(f"  {rt}: {status}")
-        await placeholder.edit_text("📋 Справочники:\n" + "\n".join(lines))
-    except Exception as exc:
-        logger.exception("btn_sync_entities failed")
-        await placeholder.edit_text(f"❌ Справочники: {exc}")
+            lines = []
+            for rt, cnt in results.items():
+                status = f"✅ {cnt}" if cnt >= 0 else "❌ Ошибка"
+                lines.append(f"  {rt}: {status}")
+            await placeholder.edit_text("📋 Справочники:\n" + "\n".join(lines))
+        except Exception as exc:
+            logger.exception("btn_sync_entities failed")
+            await placeholder.edit_text(f"❌ Справочники: {exc}")
+    finally:
+        await lock.release()
 
 
 @router.message(F.text == "🏢 Синхр. подразделения")
@@ -1295,15 +1299,17 @@ async def btn_sync_all_iiko(message: Message) -> None:
     triggered = f"tg:{message.from_user.id}"
     logger.info("[sync] всё iiko tg:%d", message.from_user.id)
     lock = get_sync_lock("sync_all_iiko")
-    if lock.locked():
+    if not await lock.acquire_nowait():
         await message.answer("⏳ Синхр. iiko уже выполняется. Подождите.")
         return
-    placeholder = await message.answer(
-        "⏳ Запускаем полную синхронизацию iiko (параллельно)..."
-    )
-    async with lock:
+    try:
+        placeholder = await message.answer(
+            "⏳ Запускаем полную синхронизацию iiko (параллельно)..."
+        )
         report = await sync_uc.sync_all_iiko_with_report(triggered)
-    await placeholder.edit_text("✅ iiko — результаты:\n\n" + "\n".join(report))
+        await placeholder.edit_text("✅ iiko — результаты:\n\n" + "\n".join(report))
+    finally:
+        await lock.release()
 
 
 # -----------------------------------------------------
@@ -1390,21 +1396,24 @@ async def btn_ft_sync_all(message: Message) -> None:
     triggered = f"tg:{message.from_user.id}"
     logger.info("[sync-ft] всё FT tg:%d", message.from_user.id)
     lock = get_sync_lock("sync_all_ft")
-    if lock.locked():
+    if not await lock.acquire_nowait():
         await message.answer("⏳ Синхр. FinTablo уже выполняется. Подождите.")
         return
-    placeholder = await message.answer(
-        "⏳ FinTablo: синхронизация всех 13 справочников запущена..."
-    )
-
     try:
-        async with lock:
+        placeholder = await message.answer(
+            "⏳ FinTablo: синхронизация всех 13 справочников запущена..."
+        )
+        try:
             results = await ft_uc.sync_all_fintablo(triggered_by=triggered)
-        lines = ft_uc.format_ft_report(results)
-        await placeholder.edit_text("✅ FinTablo — результаты:\n\n" + "\n".join(lines))
-    except Exception as exc:
-        logger.exception("FT sync all failed")
-        await placeholder.edit_text(f"❌ FinTablo ошибка: {exc}")
+            lines = ft_uc.format_ft_report(results)
+            await placeholder.edit_text(
+                "✅ FinTablo — результаты:\n\n" + "\n".join(lines)
+            )
+        except Exception as exc:
+            logger.exception("FT sync all failed")
+            await placeholder.edit_text(f"❌ FinTablo ошибка: {exc}")
+    finally:
+        await lock.release()
 
 
 @router.message(F.text == "⚡ Синхр. ВСЁ (iiko + FT)")
@@ -1414,20 +1423,22 @@ async def btn_sync_everything(message: Message) -> None:
     triggered = f"tg:{message.from_user.id}"
     logger.info("[sync] всё iiko+FT tg:%d", message.from_user.id)
     lock = get_sync_lock("sync_everything")
-    if lock.locked():
+    if not await lock.acquire_nowait():
         await message.answer("⏳ Полная синхронизация уже выполняется. Подождите.")
         return
-    placeholder = await message.answer(
-        "⏳ Запускаем полную синхронизацию iiko + FinTablo..."
-    )
+    try:
+        placeholder = await message.answer(
+            "⏳ Запускаем полную синхронизацию iiko + FinTablo..."
+        )
 
-    async with lock:
         iiko_lines, ft_lines = await sync_uc.sync_everything_with_report(triggered)
 
-    lines = ["-- iiko --"] + iiko_lines + ["\n-- FinTablo --"] + ft_lines
-    await placeholder.edit_text(
-        "✅ Итоговые результаты синхронизации:\n\n" + "\n".join(lines)
-    )
+        lines = ["-- iiko --"] + iiko_lines + ["\n-- FinTablo --"] + ft_lines
+        await placeholder.edit_text(
+            "✅ Итоговые результаты синхронизации:\n\n" + "\n".join(lines)
+        )
+    finally:
+        await lock.release()
 
 
 # ─────────────────────────────────────────────────────
@@ -1450,18 +1461,18 @@ async def btn_unified_iiko_ft(message: Message) -> None:
     logger.info("[sync] unified iiko+FT+ОПИУ tg:%d", message.from_user.id)
 
     lock = get_sync_lock("sync_unified_iiko_ft")
-    if lock.locked():
+    if not await lock.acquire_nowait():
         await message.answer(
             "⏳ Синхронизация iiko + FinTablo уже выполняется. Подождите."
         )
         return
 
-    placeholder = await message.answer(
-        "⏳ Запускаем полную синхронизацию iiko + FinTablo + ОПИУ...\n"
-        "Это может занять несколько минут."
-    )
+    try:
+        placeholder = await message.answer(
+            "⏳ Запускаем полную синхронизацию iiko + FinTablo + ОПИУ...\n"
+            "Это может занять несколько минут."
+        )
 
-    async with lock:
         # 1) iiko + FT справочники
         try:
             iiko_lines, ft_lines = await sync_uc.sync_everything_with_report(triggered)
@@ -1496,17 +1507,66 @@ async def btn_unified_iiko_ft(message: Message) -> None:
             logger.exception("[sync] unified permissions failed")
             perms_line = f"  ❌ Ошибка: {exc}"
 
-    lines = (
-        ["-- iiko --"]
-        + iiko_lines
-        + ["\n-- FinTablo --"]
-        + ft_lines
-        + ["\n-- ОПИУ --", opiu_line]
-        + ["\n-- Права доступа --", perms_line]
-    )
-    await placeholder.edit_text(
-        "✅ Полная синхронизация iiko + FinTablo:\n\n" + "\n".join(lines)
-    )
+        lines = (
+            ["-- iiko --"]
+            + iiko_lines
+            + ["\n-- FinTablo --"]
+            + ft_lines
+            + ["\n-- ОПИУ --", opiu_line]
+            + ["\n-- Права доступа --", perms_line]
+        )
+        await placeholder.edit_text(
+            "✅ Полная синхронизация iiko + FinTablo:\n\n" + "\n".join(lines)
+        )
+    finally:
+        await lock.release()
+
+
+# ─────────────────────────────────────────────────────
+# Повтор упавших этапов 07:00 (кнопка в уведомлении админам)
+# ─────────────────────────────────────────────────────
+
+
+@router.callback_query(F.data == "dsync_retry")
+@permission_required(PERM_SETTINGS)
+async def cb_daily_sync_retry(callback: CallbackQuery) -> None:
+    """Перезапустить только упавшие этапы последней авто-синхронизации."""
+    await callback.answer("⏳ Повторяю упавшие этапы...")
+    tg_id = callback.from_user.id
+    logger.info("[sync] retry daily stages tg:%d", tg_id)
+    from use_cases.scheduler import retry_failed_daily_stages
+
+    await callback.message.edit_text("⏳ Повторяю упавшие этапы авто-синхронизации...")
+    result = await retry_failed_daily_stages(triggered_by=f"tg:{tg_id}")
+    status = result["status"]
+
+    if status == "locked":
+        text = "⏳ Авто-синхронизация уже выполняется. Подождите завершения."
+    elif status == "no_run":
+        text = "ℹ️ Авто-синхронизация ещё не запускалась."
+    elif status == "nothing":
+        text = "✅ Все этапы последней авто-синхронизации уже успешны."
+    else:
+        header = (
+            "⚠️ <b>Повтор этапов</b> — остались ошибки:"
+            if result["failed"]
+            else "✅ <b>Повтор этапов</b> — успешно:"
+        )
+        text = header + "\n" + "\n".join(result["lines"])
+
+    kb = None
+    if status == "ok" and result["failed"]:
+        kb = InlineKeyboardMarkup(
+            inline_keyboard=[
+                [
+                    InlineKeyboardButton(
+                        text="🔁 Повторить упавшие этапы",
+                        callback_data="dsync_retry",
+                    )
+                ]
+            ]
+        )
+    await callback.message.edit_text(text[:4000], parse_mode="HTML", reply_markup=kb)
 
 
 # ─────────────────────────────────────────────────────
@@ -1541,36 +1601,36 @@ async def btn_unified_gsheet(message: Message) -> None:
     logger.info("[sync] unified GSheet tg:%d", message.from_user.id)
 
     lock = get_sync_lock("sync_unified_gsheet")
-    if lock.locked():
+    if not await lock.acquire_nowait():
         await message.answer(
             "⏳ Синхронизация Google Таблиц уже выполняется. Подождите."
         )
         return
 
-    placeholder = await message.answer(
-        "⏳ Запускаем синхронизацию всех Google Таблиц...\n"
-        "Операции выполняются последовательно (≈2-5 мин)."
-    )
+    try:
+        placeholder = await message.answer(
+            "⏳ Запускаем синхронизацию всех Google Таблиц...\n"
+            "Операции выполняются последовательно (≈2-5 мин)."
+        )
 
-    results: list[str] = []
+        results: list[str] = []
 
-    async def _step(label: str, coro) -> None:
-        try:
-            await placeholder.edit_text(
-                f"⏳ Google Таблицы: {label}...\n\n" + "\n".join(results)
-            )
-        except Exception:
-            logger.debug("suppressed", exc_info=True)
-        try:
-            count = await coro
-            results.append(f"✅ {label}: {count}")
-        except Exception as exc:
-            logger.exception("[sync] GSheet %s failed", label)
-            results.append(f"❌ {label}: {exc}")
-        # пауза между операциями — защита от 429
-        await asyncio.sleep(_GSHEET_DELAY)
+        async def _step(label: str, coro) -> None:
+            try:
+                await placeholder.edit_text(
+                    f"⏳ Google Таблицы: {label}...\n\n" + "\n".join(results)
+                )
+            except Exception:
+                logger.debug("suppressed", exc_info=True)
+            try:
+                count = await coro
+                results.append(f"✅ {label}: {count}")
+            except Exception as exc:
+                logger.exception("[sync] GSheet %s failed", label)
+                results.append(f"❌ {label}: {exc}")
+            # пауза между операциями — защита от 429
+            await asyncio.sleep(_GSHEET_DELAY)
 
-    async with lock:
         # 1) Номенклатура → GSheet
         await _step(
             "Номенклатура → GSheet",
@@ -1597,7 +1657,7 @@ async def btn_unified_gsheet(message: Message) -> None:
         try:
             await export_salary_sheet(triggered_by=triggered)
             await asyncio.sleep(_GSHEET_DELAY)
-            fot_count = await update_fot_sheet(triggered_by=triggered)
+            fot_count = await update_fot_sheet(triggered_by=triggered, full=True)
             await asyncio.sleep(_GSHEET_DELAY)
             await sync_fot_to_fintablo(triggered_by=triggered)
             results.append(f"✅ ФОТ (salary + payroll + FT): {fot_count}")
@@ -1612,9 +1672,11 @@ async def btn_unified_gsheet(message: Message) -> None:
             perm_uc.sync_permissions_to_gsheet(triggered_by=triggered),
         )
 
-    await placeholder.edit_text(
-        "✅ Google Таблицы — результаты:\n\n" + "\n".join(results)
-    )
+        await placeholder.edit_text(
+            "✅ Google Таблицы — результаты:\n\n" + "\n".join(results)
+        )
+    finally:
+        await lock.release()
 
 
 # -----------------------------------------------------
@@ -1792,6 +1854,37 @@ async def btn_cloud_webhook_status(message: Message) -> None:
     except Exception as exc:
         await message.answer(f"❌ Ошибка: {exc}")
 
+    # Очередь входящих вебхуков (Redis Stream)
+    try:
+        from use_cases.webhook_queue import get_queue_stats
+
+        q = await get_queue_stats()
+        lines = [
+            "📥 Очередь вебхуков:",
+            f"  В stream: {q['stream_len']}, не прочитано: {q['lag'] if q['lag'] is not None else '?'}",
+            f"  Без ACK: {q['pending']}"
+            + (
+                f" (старейшее {q['oldest_pending_sec']} сек)"
+                if q["oldest_pending_sec"] is not None
+                else ""
+            ),
+            f"  Ждут flush стоп-листа: {q['due_orgs']} org",
+        ]
+        if "throughput_per_min" in q:
+            lines.append(
+                f"  Эта реплика: {q['throughput_per_min']} соб/мин, "
+                f"задержка {q['last_event_lag_sec'] or 0} сек, "
+                f"flush ✅{q['flushes_ok']} ❌{q['flushes_failed']}"
+            )
+        for oid, lat in sorted(q["flush_latency"].items()):
+            lines.append(
+                f"  org …{oid[-6:]}: {lat['total']} сек "
+                f"(fetch {lat['fetch']} / diff {lat['diff']} / send {lat['send']})"
+            )
+        await message.answer("\n".join(lines))
+    except Exception as exc:
+        await message.answer(f"⚠️ Очередь вебхуков недоступна: {exc}")
+
 
 @router.message(F.text == "🔄 Обновить остатки сейчас")
 @permission_required(PERM_SETTINGS)
@@ -5,13 +5,17 @@ Telegram-хэндлеры: просмотр логов бота из БД.
 /logs error    — только ошибки
 /logs warning  — только предупреждения
 /logs <текст>  — поиск по тексту
+/lag           — задержка event loop и блокировки за 24ч (сторож loop)
 
 Callbacks:
-  log:page:<offset>:<level>  — пагинация
+  log:page:0:<level>         — первая страница
+  log:older:<cursor>:<level> — следующая (keyset по created_at, pk)
+  log:newer:<cursor>:<level> — предыдущая
   log:detail:<pk>            — подробности записи (traceback)
   log:stats                  — статистика
   log:cleanup                — очистка по retention
   log:lvl:<level>            — фильтр по уровню
+  lag:refresh                — обновить /lag
 """
 
 import logging
@@ -111,9 +115,8 @@ def _fmt_log_detail(log) -> str:
 
 def _list_keyboard(
     logs: list,
-    offset: int = 0,
     level: str = "",
-    total: int = 0,
+    first_page: bool = True,
 ) -> InlineKeyboardMarkup:
     """Клавиатура списка логов."""
     buttons = []
@@ -134,18 +137,18 @@ def _list_keyboard(
 
     # Навигация
     nav = []
-    if offset > 0:
+    if not first_page and logs:
         nav.append(
             InlineKeyboardButton(
                 text="⬅️",
-                callback_data=f"log:page:{max(0, offset - PAGE_SIZE)}:{level}",
+                callback_data=f"log:newer:{log_store.encode_cursor(logs[0])}:{level}",
             )
         )
     if len(logs) == PAGE_SIZE:
         nav.append(
             InlineKeyboardButton(
                 text="➡️",
-                callback_data=f"log:page:{offset + PAGE_SIZE}:{level}",
+                callback_data=f"log:older:{log_store.encode_cursor(logs[-1])}:{level}",
             )
         )
     if nav:
@@ -212,22 +215,31 @@ async def cmd_logs(message: Message, **kwargs):
         else:
             search = args[1].strip()
 
-    await _show_log_list(message, offset=0, level=level, search=search)
+    await _show_log_list(message, level=level, search=search)
 
 
 async def _show_log_list(
     target,
-    offset: int = 0,
     level: str = "",
     search: str | None = None,
+    before: log_store.Cursor | None = None,
+    after: log_store.Cursor | None = None,
 ):
-    """Отобразить список логов."""
+    """Отобразить список логов (страница по курсору)."""
     logs = await log_store.get_recent(
         limit=PAGE_SIZE,
         level=level or None,
         search=search,
-        offset=offset,
+        before=before,
+        after=after,
     )
+    if after is not None and len(logs) < PAGE_SIZE:
+        # Дошли до самых новых — показываем полную первую страницу
+        after = None
+        logs = await log_store.get_recent(
+            limit=PAGE_SIZE, level=level or None, search=search
+        )
+    first_page = before is None and after is None
     total = await log_store.count_by_filter(
         level=level or None,
         search=search,
@@ -237,7 +249,7 @@ async def _show_log_list(
         level_hint = f" ({level})" if level else ""
         search_hint = f" «{search}»" if search else ""
         text = f"📋 <b>Логов нет</b>{level_hint}{search_hint}"
-        kb = _list_keyboard([], level=level)
+        kb = _list_keyboard([], level=level, first_page=first_page)
     else:
         level_hint = f" <b>[{level}]</b>" if level else ""
         lines = [f"📋 <b>Логи бота</b>{level_hint} — {total} записей\n"]
@@ -246,7 +258,7 @@ async def _show_log_list(
         text = "\n".join(lines)
         if len(text) > 4000:
             text = text[:3950] + "\n..."
-        kb = _list_keyboard(logs, offset, level, total)
+        kb = _list_keyboard(logs, level, first_page)
 
     if isinstance(target, Message):
         await target.answer(text, parse_mode="HTML", reply_markup=kb)
@@ -279,16 +291,27 @@ async def cb_log_detail(callback: CallbackQuery):
 @router.callback_query(F.data.startswith("log:page:"), _is_sysadmin_check())
 async def cb_log_page(callback: CallbackQuery):
     parts = callback.data.split(":")
-    offset = int(parts[2])
     level = parts[3] if len(parts) > 3 else ""
-    await _show_log_list(callback, offset=offset, level=level)
+    await _show_log_list(callback, level=level)
+
+
+@router.callback_query(
+    F.data.startswith("log:older:") | F.data.startswith("log:newer:"),
+    _is_sysadmin_check(),
+)
+async def cb_log_cursor(callback: CallbackQuery):
+    _, direction, cursor, level = callback.data.split(":")
+    key = "before" if direction == "older" else "after"
+    await _show_log_list(
+        callback, level=level, **{key: log_store.decode_cursor(cursor)}
+    )
 
 
 # ── Фильтр по уровню ──
 @router.callback_query(F.data.startswith("log:lvl:"), _is_sysadmin_check())
 async def cb_log_level(callback: CallbackQuery):
     level = callback.data.split(":")[2]
-    await _show_log_list(callback, offset=0, level=level)
+    await _show_log_list(callback, level=level)
 
 
 # ── Статистика ──
@@ -334,4 +357,116 @@ async def cb_log_cleanup(callback: CallbackQuery):
         await callback.answer(f"🗑 Удалено: {detail}", show_alert=True)
     else:
         await callback.answer("✅ Нечего удалять", show_alert=True)
-    await _show_log_list(callback, offset=0)
+    await _show_log_list(callback)
+
+
+# ═══════════════════════════════════════════════════════
+# /lag — блокировки event loop
+# ═══════════════════════════════════════════════════════
+
+
+def _fmt_ms(ms: float) -> str:
+    if ms >= 1000:
+        return f"{ms / 1000:.1f} с"
+    return f"{ms:.1f} мс" if ms < 10 else f"{round(ms)} мс"
+
+
+def _fmt_lag(lag: dict, watchdog: dict, summary: dict) -> str:
+    """Текст /lag: семплер задержки, сторож с запуска, сводка из bot_log."""
+    lines = [
+        "⏱ <b>Event loop</b>\n",
+        f"Задержка сейчас: <b>{_fmt_ms(lag['last_ms'])}</b>, "
+        f"средняя {_fmt_ms(lag['mean_ms'])} "
+        f"(замеров {lag['samples']}, &gt; {lag['slow_ms']} мс: {lag['slow']})",
+    ]
+    if watchdog["running"]:
+        lines.append(
+            f"Сторож: порог {watchdog['threshold_ms']} мс, с запуска "
+            f"<b>{watchdog['stalls']}</b> блокировок "
+            f"(max {_fmt_ms(watchdog['max_ms'])}"
+            + (
+                f", без записи в лог {watchdog['suppressed']}"
+                if watchdog["suppressed"]
+                else ""
+            )
+            + ")"
+        )
+    else:
+        lines.append("Сторож: <i>выключен</i> (LOOP_STALL_THRESHOLD_MS)")
+
+    if not summary["count"]:
+        lines.append("\n✅ За 24 часа блокировок нет")
+        return "\n".join(lines)
+
+    more = "+" if summary["truncated"] else ""
+    lines.append(
+        f"\n<b>За 24 часа:</b> {summary['count']}{more} блокировок, "
+        f"в сумме {_fmt_ms(summary['total_ms'])}, max {_fmt_ms(summary['max_ms'])}"
+    )
+    lines.append("\n<b>Где дольше всего:</b>")
+    for n, place in enumerate(summary["places"], 1):
+        lines.append(
+            f"{n}. <code>{_escape(place['where'])}</code>\n"
+            f"    {place['count']}×, {_fmt_ms(place['total_ms'])} "
+            f"(max {_fmt_ms(place['max_ms'])})"
+        )
+    lines.append("\n<b>Последние:</b>")
+    for stall in summary["recent"]:
+        lines.append(
+            f"<code>{_fmt_time(stall['created_at'])}</code> {_fmt_ms(stall['ms'])} "
+            f"<code>{_escape(stall['where'])}</code>\n"
+            f"    <i>{_escape(stall['task'])}</i>"
+        )
+    text = "\n".join(lines)
+    return text if len(text) <= 4000 else text[:3950] + "\n..."
+
+
+def _escape(value: str) -> str:
+    return value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _lag_keyboard(summary: dict) -> InlineKeyboardMarkup:
+    """Стек последних блокировок (log:detail) + обновить."""
+    buttons = [
+        [
+            InlineKeyboardButton(
+                text=f"🔍 #{stall['pk']} {_fmt_ms(stall['ms'])} {stall['where'][-30:]}",
+                callback_data=f"log:detail:{stall['pk']}",
+            )
+        ]
+        for stall in summary["recent"]
+        if stall["has_stack"]
+    ]
+    buttons.append(
+        [InlineKeyboardButton(text="🔄 Обновить", callback_data="lag:refresh")]
+    )
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+async def _lag_report() -> tuple[str, InlineKeyboardMarkup]:
+    from use_cases.loop_stalls import get_stall_summary
+    from utils.loop_watchdog import get_watchdog_stats
+    from utils.metrics import get_loop_lag_stats
+
+    summary = await get_stall_summary(hours=24)
+    text = _fmt_lag(get_loop_lag_stats(), get_watchdog_stats(), summary)
+    return text, _lag_keyboard(summary)
+
+
+@router.message(Command("lag"), _is_sysadmin_check())
+@auth_required
+async def cmd_lag(message: Message, **kwargs):
+    """/lag — задержка event loop и блокировки за 24ч."""
+    text, kb = await _lag_report()
+    await message.answer(text, parse_mode="HTML", reply_markup=kb)
+
+
+@router.callback_query(F.data == "lag:refresh", _is_sysadmin_check())
+async def cb_lag_refresh(callback: CallbackQuery):
+    text, kb = await _lag_report()
+    try:
+        await callback.message.edit_text(text, parse_mode="HTML", reply_markup=kb)
+    except Exception:
+        await callback.answer("Обновлено", show_alert=False)
+        return
+    await callback.answer()
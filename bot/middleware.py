@@ -18,6 +18,7 @@ from aiogram.fsm.context import FSMContext
 from use_cases import admin as admin_uc
 from use_cases import user_context as uctx
 from use_cases import permissions as perm_uc
+from use_cases.redis_lock import DistributedLock
 
 logger = logging.getLogger(__name__)
 
@@ -188,23 +189,25 @@ def permission_required(perm_key: str):
 # 3. Sync-lock и Cooldown
 # ═══════════════════════════════════════════════════════
 
-_sync_locks: dict[str, asyncio.Lock] = {}
 
-
-def get_sync_lock(entity: str) -> asyncio.Lock:
-    """Получить lock для конкретного типа синхронизации."""
-    if entity not in _sync_locks:
-        _sync_locks[entity] = asyncio.Lock()
-    return _sync_locks[entity]
+def get_sync_lock(entity: str) -> DistributedLock:
+    """
+    Lock для конкретного типа синхронизации — общий для всех реплик бота
+    (Redis, см. use_cases/redis_lock.py). Новый объект на каждый захват.
+    """
+    return DistributedLock(f"sync:{entity}")
 
 
 async def run_sync_with_lock(entity: str, sync_coro):
     """Запуск синхронизации с гарантией единственного выполнения."""
     lock = get_sync_lock(entity)
-    if lock.locked():
+    if not await lock.acquire_nowait():
+        sync_coro.close()
         return None  # уже запущено
-    async with lock:
+    try:
         return await sync_coro
+    finally:
+        await lock.release()
 
 
 def with_cooldown(action: str, seconds: float = 1.0):
@@ -255,27 +258,22 @@ async def sync_with_progress(
 
     Исключает дублирование кода в десятках sync-handler'ов.
     """
-    if lock_key:
-        lock = get_sync_lock(lock_key)
-        if lock.locked():
-            await message.answer(f"⏳ {label} уже выполняется. Подождите завершения.")
-            return
-
-    loading = await message.answer(f"⏳ {label}...")
+    lock = get_sync_lock(lock_key) if lock_key else None
+    if lock is not None and not await lock.acquire_nowait():
+        await message.answer(f"⏳ {label} уже выполняется. Подождите завершения.")
+        return
 
-    async def _do_sync():
+    try:
+        loading = await message.answer(f"⏳ {label}...")
         try:
             count = await sync_fn(**kwargs)
             await loading.edit_text(f"✅ {label}: {count} записей")
         except Exception as exc:
             logger.exception("[sync] %s failed", label)
             await loading.edit_text(f"❌ {label}: {exc}")
-
-    if lock_key:
-        async with get_sync_lock(lock_key):
-            await _do_sync()
-    else:
-        await _do_sync()
+    finally:
+        if lock is not None:
+            await lock.release()
 
 
 # ═══════════════════════════════════════════════════════
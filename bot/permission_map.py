@@ -217,4 +217,6 @@ CALLBACK_PERMISSIONS: dict[str, str] = {
     "pastry_": PERM_PASTRY_MANAGE,
     # ОПИУ: маппинг iiko→FinTablo
     "pnl_": PERM_SETTINGS,
+    # Авто-синхронизация 07:00: повтор упавших этапов
+    "dsync_": PERM_SETTINGS,
 }
@@ -60,6 +60,9 @@ TELEGRAM_BOT_TOKEN: str = _require("TELEGRAM_BOT_TOKEN")
 # Секрет для верификации запросов Telegram → set_webhook(secret_token=...)
 # Если не задан в env — генерируется при каждом старте (безопасно, Telegram пересогласует).
 WEBHOOK_SECRET: str = os.getenv("WEBHOOK_SECRET") or secrets.token_hex(32)
+# Bearer-токен для GET /metrics на публичном порту вебхука.
+# Не задан — /metrics не регистрируется (метрики наружу не отдаются).
+METRICS_TOKEN: str | None = os.getenv("METRICS_TOKEN") or None
 
 # ── Webhook (Railway) ──
 # Если WEBHOOK_URL задан — бот работает на вебхуке, иначе — polling.
@@ -89,6 +92,9 @@ WEBAPP_PORT: int = int(os.getenv("PORT", "8080"))  # Railway пробрасыв
 GOOGLE_SHEETS_CREDENTIALS: str = os.getenv(
     "GOOGLE_SHEETS_CREDENTIALS", "pizzayolo-ocr-3898e5dddcff.json"
 )
+# Базовый URL Sheets/Drive API вместо Google (локальный стенд tests/fakes).
+# Задан → gspread ходит туда без OAuth; пусто → боевой Google API.
+GOOGLE_SHEETS_API_URL: str | None = os.getenv("GOOGLE_SHEETS_API_URL") or None
 MIN_STOCK_SHEET_ID: str = os.getenv(
     "MIN_STOCK_SHEET_ID", "1cKQAPXDap6sSAmGROYE-kqyNrVzJnf0bPpTjPyRKa_8"
 )
@@ -139,6 +145,8 @@ TIMEZONE: str = "Europe/Kaliningrad"
 
 # ── Logging ──
 LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
+# Шаг event loop дольше порога → стек в bot_log (utils/loop_watchdog.py); 0 — выкл.
+LOOP_STALL_THRESHOLD_MS: int = int(os.getenv("LOOP_STALL_THRESHOLD_MS", "250"))
 
 # ── OpenAI GPT-5.2 (OCR) ──
 OPENAI_API_KEY: str | None = os.getenv("OPENAI_API_KEY")
@@ -147,6 +155,22 @@ if not OPENAI_API_KEY:
         "OPENAI_API_KEY не задан — OCR функции будут недоступны"
     )
 
+# ── Кеш результатов OCR по содержимому фото (use_cases/ocr_cache.py) ──
+OCR_CACHE_ENABLED: bool = os.getenv("OCR_CACHE_ENABLED", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+OCR_CACHE_TTL_DAYS: int = int(os.getenv("OCR_CACHE_TTL_DAYS", "30"))
+
+# ── Пул процессов для CPU-bound задач (фото, PDF) — utils/cpu_pool.py ──
+# 0 — пул выключен, задачи идут в asyncio.to_thread
+CPU_POOL_WORKERS: int = int(
+    os.getenv("CPU_POOL_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) - 1))))
+)
+# Сколько задач может ждать свободного воркера; дальше — отказ (CpuPoolBusy)
+CPU_POOL_MAX_WAITING: int = int(os.getenv("CPU_POOL_MAX_WAITING", "32"))
+
 # ── Авто-перемещение отрицательных остатков расходных материалов ──
 # Запускается ежедневно в 23:00 по Калининграду.
 # Ресторан определяется автоматически по паттерну имени склада: "TYPE (РЕСТОРАН)"
@@ -25,6 +25,7 @@ from sqlalchemy.ext.asyncio import (
 )
 
 from config import DATABASE_URL
+from utils.metrics import CallbackGauge
 
 logger = logging.getLogger(__name__)
 
@@ -43,6 +44,21 @@ engine = create_async_engine(
     },
 )
 
+# ── /metrics: пул соединений (значения берутся в момент scrape) ──
+CallbackGauge(
+    "db_pool_size", "Соединений в пуле SQLAlchemy", lambda: engine.pool.size()
+)
+CallbackGauge(
+    "db_pool_checked_out",
+    "Соединений пула, выданных сессиям",
+    lambda: engine.pool.checkedout(),
+)
+CallbackGauge(
+    "db_pool_overflow",
+    "Соединений сверх pool_size (max_overflow); < 0 — пул ещё не заполнен",
+    lambda: engine.pool.overflow(),
+)
+
 # ── Session factory ──
 async_session_factory = async_sessionmaker(
     bind=engine,
@@ -56,6 +56,7 @@ MIGRATIONS: list[str] = [
     # min_stock_level — мин/макс остатки из Google Таблицы
     "CREATE INDEX IF NOT EXISTS ix_min_stock_level_product ON min_stock_level (product_id)",
     "CREATE INDEX IF NOT EXISTS ix_min_stock_level_dept ON min_stock_level (department_id)",
+    "ALTER TABLE min_stock_level ADD COLUMN IF NOT EXISTS sheet_pending BOOLEAN NOT NULL DEFAULT FALSE",
     # writeoff_history — история списаний
     "CREATE INDEX IF NOT EXISTS ix_writeoff_history_tg ON writeoff_history (telegram_id)",
     "CREATE INDEX IF NOT EXISTS ix_writeoff_history_dept ON writeoff_history (department_id)",
@@ -158,10 +159,114 @@ MIGRATIONS: list[str] = [
     "CREATE INDEX IF NOT EXISTS ix_bot_error_created ON bot_error (created_at)",
     "CREATE INDEX IF NOT EXISTS ix_bot_error_level ON bot_error (level)",
     "CREATE INDEX IF NOT EXISTS ix_bot_error_resolved ON bot_error (resolved)",
-    # bot_log — все логи бота в БД
+    "ALTER TABLE bot_error ADD COLUMN IF NOT EXISTS fingerprint VARCHAR(16)",
+    "CREATE INDEX IF NOT EXISTS ix_bot_error_fingerprint ON bot_error (fingerprint)",
+    # bot_log — все логи бота в БД.
+    # Секционирование: LIST (level) → группы, в группе RANGE (created_at) по дням.
+    # Старая обычная таблица → bot_log_legacy (данные переносятся ниже).
+    """DO $$ BEGIN
+    IF EXISTS (SELECT 1 FROM pg_class WHERE relname = 'bot_log' AND relkind = 'r') THEN
+        ALTER TABLE bot_log RENAME TO bot_log_legacy;
+        ALTER TABLE bot_log_legacy RENAME CONSTRAINT bot_log_pkey TO bot_log_legacy_pkey;
+        ALTER SEQUENCE IF EXISTS bot_log_pk_seq RENAME TO bot_log_legacy_pk_seq;
+        DROP INDEX IF EXISTS ix_bot_log_created, ix_bot_log_created_at,
+            ix_bot_log_level, ix_bot_log_logger;
+        CREATE TABLE bot_log (
+            pk BIGSERIAL NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            level VARCHAR(10) NOT NULL,
+            logger_name VARCHAR(300) NOT NULL,
+            message TEXT NOT NULL,
+            traceback TEXT,
+            PRIMARY KEY (pk, created_at, level)
+        ) PARTITION BY LIST (level);
+    END IF;
+    END $$""",
+    "CREATE TABLE IF NOT EXISTS bot_log_info PARTITION OF bot_log FOR VALUES IN ('DEBUG', 'INFO') PARTITION BY RANGE (created_at)",
+    "CREATE TABLE IF NOT EXISTS bot_log_warning PARTITION OF bot_log FOR VALUES IN ('WARNING') PARTITION BY RANGE (created_at)",
+    "CREATE TABLE IF NOT EXISTS bot_log_error PARTITION OF bot_log FOR VALUES IN ('ERROR', 'CRITICAL') PARTITION BY RANGE (created_at)",
+    "CREATE TABLE IF NOT EXISTS bot_log_other PARTITION OF bot_log DEFAULT",
+    "CREATE TABLE IF NOT EXISTS bot_log_info_default PARTITION OF bot_log_info DEFAULT",
+    "CREATE TABLE IF NOT EXISTS bot_log_warning_default PARTITION OF bot_log_warning DEFAULT",
+    "CREATE TABLE IF NOT EXISTS bot_log_error_default PARTITION OF bot_log_error DEFAULT",
+    # Дневные секции bot_log_<группа>_pYYYYMMDD на base .. base + days_ahead.
+    # Секция, чей диапазон уже есть в DEFAULT, не создаётся (WARNING, не ошибка).
+    """CREATE OR REPLACE FUNCTION bot_log_ensure_partitions(base DATE, days_ahead INT)
+    RETURNS INT LANGUAGE plpgsql AS $$
+    DECLARE
+        grp TEXT;
+        d DATE;
+        part TEXT;
+        created INT := 0;
+    BEGIN
+        FOR grp IN
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'bot_log'::regclass AND c.relkind = 'p'
+        LOOP
+            FOR d IN SELECT generate_series(base, base + days_ahead, interval '1 day')::date
+            LOOP
+                part := format('%s_p%s', grp, to_char(d, 'YYYYMMDD'));
+                CONTINUE WHEN to_regclass(part) IS NOT NULL;
+                BEGIN
+                    EXECUTE format(
+                        'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                        part, grp, d, d + 1
+                    );
+                    created := created + 1;
+                EXCEPTION WHEN others THEN
+                    RAISE WARNING 'bot_log partition % skipped: %', part, SQLERRM;
+                END;
+            END LOOP;
+        END LOOP;
+        RETURN created;
+    END $$""",
+    "SELECT bot_log_ensure_partitions((now() AT TIME ZONE 'Europe/Kaliningrad')::date, 2)",
+    # Перенос из старой таблицы: в пределах максимального retention (90 дней)
+    """DO $$ BEGIN
+    IF to_regclass('bot_log_legacy') IS NOT NULL THEN
+        INSERT INTO bot_log (pk, created_at, level, logger_name, message, traceback)
+        SELECT pk, created_at, level, logger_name, message, traceback
+        FROM bot_log_legacy
+        WHERE created_at >= (now() AT TIME ZONE 'Europe/Kaliningrad') - interval '90 days';
+        PERFORM setval('bot_log_pk_seq', COALESCE((SELECT max(pk) FROM bot_log_legacy), 1));
+        DROP TABLE bot_log_legacy;
+    END IF;
+    END $$""",
     "CREATE INDEX IF NOT EXISTS ix_bot_log_created ON bot_log (created_at)",
     "CREATE INDEX IF NOT EXISTS ix_bot_log_level ON bot_log (level)",
     "CREATE INDEX IF NOT EXISTS ix_bot_log_logger ON bot_log (logger_name)",
+    # Поиск по логам: keyset-пагинация (created_at, pk) + pg_trgm для ILIKE '%…%'
+    "CREATE INDEX IF NOT EXISTS ix_bot_log_keyset ON bot_log (created_at, pk)",
+    "CREATE INDEX IF NOT EXISTS ix_bot_log_level_keyset ON bot_log (level, created_at, pk)",
+    "CREATE INDEX IF NOT EXISTS ix_bot_error_keyset ON bot_error (created_at, pk)",
+    """CREATE INDEX IF NOT EXISTS ix_bot_error_unresolved
+        ON bot_error (created_at, pk) WHERE resolved = false""",
+    # pg_trgm — trusted-расширение (PG13+), но без прав на CREATE пропускаем:
+    # поиск работает и без индекса, только медленнее.
+    """DO $$ BEGIN
+    BEGIN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+    EXCEPTION WHEN others THEN
+        RAISE WARNING 'pg_trgm unavailable: %', SQLERRM;
+    END;
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN
+        CREATE INDEX IF NOT EXISTS ix_bot_log_message_trgm
+            ON bot_log USING gin (message gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS ix_bot_log_logger_trgm
+            ON bot_log USING gin (logger_name gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS ix_bot_error_message_trgm
+            ON bot_error USING gin (message gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS ix_bot_error_logger_trgm
+            ON bot_error USING gin (logger_name gin_trgm_ops);
+    END IF;
+    END $$""",
+    # bot_log_hourly: счётчики по уже записанным логам (одноразово, если пусто)
+    """INSERT INTO bot_log_hourly (hour, level, cnt)
+        SELECT date_trunc('hour', created_at), level, count(*)
+        FROM bot_log
+        WHERE NOT EXISTS (SELECT 1 FROM bot_log_hourly)
+        GROUP BY 1, 2""",
     # pnl_account_mapping — маппинг iiko Account.Name → FinTablo PnL category (ОПИУ)
     """CREATE TABLE IF NOT EXISTS pnl_account_mapping (
         id SERIAL PRIMARY KEY,
@@ -174,6 +279,8 @@ MIGRATIONS: list[str] = [
     )""",
     "CREATE INDEX IF NOT EXISTS ix_pnl_account_map_iiko ON pnl_account_mapping (iiko_account_name)",
     "CREATE INDEX IF NOT EXISTS ix_pnl_account_map_ft ON pnl_account_mapping (ft_pnl_category_id)",
+    # ocr_result_cache: выдача только по точному content_hash — phash не нужен
+    "ALTER TABLE ocr_result_cache DROP COLUMN IF EXISTS phash",
 ]
 
 
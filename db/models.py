@@ -15,6 +15,7 @@ from sqlalchemy import (
     Column,
     Date,
     DateTime,
+    Float,
     Integer,
     Numeric,
     String,
@@ -401,6 +402,8 @@ class MinStockLevel(Base):
     Минимальные и максимальные остатки по (товар, ресторан).
     Источник истины — Google Таблица.
     Синхронизируется: GSheet → эта таблица (вручную или по расписанию).
+    sheet_pending — правка из бота, которую импорт из GSheet не трогает,
+    пока она не записана в таблицу.
     """
 
     __tablename__ = "min_stock_level"
@@ -447,6 +450,13 @@ class MinStockLevel(Base):
         default=0,
         comment="Максимальный остаток",
     )
+    sheet_pending = Column(
+        Boolean,
+        nullable=False,
+        default=False,
+        server_default="false",
+        comment="Правка из бота ещё не записана в Google Таблицу",
+    )
     updated_at = Column(
         DateTime,
         default=_utcnow,
@@ -1429,6 +1439,49 @@ class BotError(Base):
         index=True,
         comment="Отмечено как решённое",
     )
+    fingerprint = Column(
+        String(16),
+        nullable=True,
+        index=True,
+        comment="Отпечаток группы (→ bot_error_group)",
+    )
+
+
+class BotErrorGroup(Base):
+    """
+    Группа одинаковых ошибок по отпечатку: тип исключения + верхние кадры
+    traceback + логгер (без traceback — шаблон сообщения).
+    Счётчики копит DBErrorHandler в памяти и сливает UPSERT-ом;
+    в bot_error — только образцы (не чаще SAMPLE_INTERVAL на группу).
+    """
+
+    __tablename__ = "bot_error_group"
+
+    fingerprint = Column(String(16), primary_key=True, comment="sha1[:16]")
+    level = Column(String(20), nullable=False, comment="Уровень последнего события")
+    logger_name = Column(String(300), nullable=False, comment="Имя логгера")
+    exc_type = Column(String(200), nullable=True, comment="Тип исключения")
+    title = Column(Text, nullable=False, comment="Первая строка сообщения")
+    first_seen = Column(
+        DateTime, nullable=False, comment="Первое событие (Калининград)"
+    )
+    last_seen = Column(
+        DateTime,
+        nullable=False,
+        index=True,
+        comment="Последнее событие (Калининград)",
+    )
+    count = Column(BigInteger, nullable=False, default=0, comment="Кол-во событий")
+    last_error_pk = Column(
+        BigInteger, nullable=True, comment="Последний образец (bot_error.pk)"
+    )
+    resolved = Column(
+        Boolean,
+        nullable=False,
+        default=False,
+        index=True,
+        comment="Решена (новое событие снимает флаг)",
+    )
 
 
 # ═══════════════════════════════════════════════════════
@@ -1439,15 +1492,20 @@ class BotError(Base):
 class BotLog(Base):
     """
     Все логи бота в одной таблице.
-    Записываются буферизованным logging handler (batch INSERT).
+    Записываются буферизованным logging handler (asyncpg COPY).
+    Секционирована: LIST (level) → bot_log_info / _warning / _error,
+    каждая — RANGE (created_at) по дням; секции создаёт init_db + log_store.
+    Ключ секционирования входит в PK → PK (pk, created_at, level).
     Просмотр: /logs в Telegram (только сисадмины).
     """
 
     __tablename__ = "bot_log"
+    __table_args__ = {"postgresql_partition_by": "LIST (level)"}
 
     pk = Column(BigInteger, primary_key=True, autoincrement=True)
     created_at = Column(
         DateTime,
+        primary_key=True,
         nullable=False,
         default=_now_kgd,
         index=True,
@@ -1455,6 +1513,7 @@ class BotLog(Base):
     )
     level = Column(
         String(10),
+        primary_key=True,
         nullable=False,
         index=True,
         comment="DEBUG, INFO, WARNING, ERROR, CRITICAL",
@@ -1476,8 +1535,35 @@ class BotLog(Base):
     )
 
 
+class BotLogHourly(Base):
+    """
+    Счётчики bot_log по часу × уровню (для /logs «Стат» и итогов списка).
+    Пополняются writer-ом log_store в той же транзакции, что и COPY;
+    retention чистит их вместе с логами.
+    """
+
+    __tablename__ = "bot_log_hourly"
+
+    hour = Column(
+        DateTime,
+        primary_key=True,
+        comment="Начало часа (Калининград)",
+    )
+    level = Column(
+        String(10),
+        primary_key=True,
+        comment="DEBUG, INFO, WARNING, ERROR, CRITICAL",
+    )
+    cnt = Column(
+        BigInteger,
+        nullable=False,
+        default=0,
+        comment="Кол-во записей за час",
+    )
+
+
 # ─────────────────────────────────────────────────────
-# Итого 29 таблиц (+ bot_error, bot_log):
+# Итого 29 таблиц (+ bot_error, bot_error_group, bot_log, bot_log_hourly):
 #   iiko_entity        — все справочники (1 кнопка)
 #   iiko_department    — подразделения
 #   iiko_store         — склады
@@ -1606,6 +1692,77 @@ class SalaryExclusion(Base):
     excluded_at = Column(DateTime, default=_utcnow, nullable=False)
 
 
+# ─────────────────────────────────────────────────────
+# Дневные итоги ФОТ (инкрементальный расчёт)
+# ─────────────────────────────────────────────────────
+
+
+class PayrollDay(Base):
+    """
+    Закрытый день месяца в инкрементальном расчёте ФОТ (use_cases/payroll_partials.py).
+
+    Строка есть — день посчитан, его явки / выручка / накладные повторно из iiko
+    не запрашиваются. dirty=True ставит синхронизация «Истории ставок», если
+    правка меняет ставки начиная с этого дня.
+    """
+
+    __tablename__ = "payroll_day"
+
+    day = Column(Date, primary_key=True)
+    revenue = Column(
+        JSONB,
+        nullable=False,
+        default=dict,
+        comment="{подразделение: выручка} из OLAP «Отчет по мотивации БОТ» за день",
+    )
+    pastry_sum = Column(
+        Float,
+        nullable=False,
+        default=0.0,
+        comment="Сумма кондитерских позиций расходных накладных за день",
+    )
+    dirty = Column(
+        Boolean,
+        nullable=False,
+        default=False,
+        comment="Пересчитать при следующем запуске ФОТ",
+    )
+    computed_at = Column(DateTime, default=_utcnow, nullable=False)
+
+
+class PayrollDayPartial(Base):
+    """Смены / часы / начисления сотрудника в подразделении за один день."""
+
+    __tablename__ = "payroll_day_partial"
+
+    day = Column(Date, primary_key=True)
+    employee_id = Column(String(36), primary_key=True, comment="iiko UUID")
+    dept_id = Column(String(36), primary_key=True, comment="iiko UUID цеха или ''")
+    seq = Column(
+        Integer,
+        nullable=False,
+        comment="Порядок первой явки пары в дне (порядок подразделений в листе)",
+    )
+    dept_name = Column(
+        String(500),
+        nullable=False,
+        comment="Название для листа (departmentName / dept_id / «Без цеха»)",
+    )
+    dept_title = Column(
+        String(500),
+        nullable=False,
+        default="",
+        comment="departmentName из iiko как есть — ключ выручки для мотивации",
+    )
+    shifts = Column(Integer, nullable=False)
+    hours = Column(Float, nullable=False)
+    earnings = Column(
+        Float,
+        nullable=False,
+        comment="Начисление за смены по ставке на этот день (посменная/почасовая)",
+    )
+
+
 # ─────────────────────────────────────────────────────
 # Гостевые пользователи (не из iiko)
 # ─────────────────────────────────────────────────────
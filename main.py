@@ -18,16 +18,26 @@ sys.stderr.reconfigure(line_buffering=True)
 
 from aiohttp import web
 from aiogram import Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.fsm.storage.base import BaseStorage
 from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 
 from logging_config import setup_logging
 
-# Логирование — первым делом
-setup_logging()
+# setup_logging() — в точке входа, не при импорте: воркеры cpu_pool (spawn)
+# импортируют этот модуль как __mp_main__ и не должны вешать Telegram/БД-хендлеры
 logger = logging.getLogger(__name__)
 
 
-def _build_bot_and_dp() -> tuple[Bot, Dispatcher]:
+def _build_bot_and_dp(
+    session: BaseSession | None = None,
+    storage: BaseStorage | None = None,
+) -> tuple[Bot, Dispatcher]:
+    """
+    Bot + Dispatcher со всеми роутерами и middleware.
+    session / storage — для нагрузочного стенда (tests/load): фейковый
+    Bot API и FSM в fakeredis; по умолчанию — боевые.
+    """
     from config import TELEGRAM_BOT_TOKEN
     from bot.global_commands import (
         router as global_router,
@@ -56,9 +66,11 @@ def _build_bot_and_dp() -> tuple[Bot, Dispatcher]:
     from aiogram.fsm.storage.redis import RedisStorage
     from config import REDIS_URL
 
-    session = RetryAiohttpSession(max_retries=3, base_delay=1.0)
+    if session is None:
+        session = RetryAiohttpSession(max_retries=3, base_delay=1.0)
     bot = Bot(token=TELEGRAM_BOT_TOKEN, session=session)
-    storage = RedisStorage.from_url(REDIS_URL)
+    if storage is None:
+        storage = RedisStorage.from_url(REDIS_URL)
     dp = Dispatcher(storage=storage)
     # Outer-middleware: блокировка пользователей (ПЕРВЫЙ — до всех остальных)
     dp.message.outer_middleware(BlockCheckMiddleware())
@@ -85,14 +97,16 @@ def _build_bot_and_dp() -> tuple[Bot, Dispatcher]:
     dp.include_router(error_router)  # /errors — хранилище ошибок (сисадмины)
     dp.include_router(log_router)  # /logs — все логи из БД (сисадмины)
     dp.include_router(router)
+    # Inner-middleware: латентность хэндлеров по роутерам → /metrics
+    from bot.global_commands import HandlerMetricsMiddleware
+
+    HandlerMetricsMiddleware.setup(dp)
 
     # Error handler: ловим оставшиеся сетевые ошибки (после retry)
     from aiogram.exceptions import TelegramNetworkError, TelegramServerError
     from aiogram.types import ErrorEvent
     from use_cases._helpers import mask_secrets
     from use_cases.admin import alert_admins
-    from use_cases.error_store import save_error
-    import traceback as _tb
 
     @dp.errors()
     async def _global_error_handler(event: ErrorEvent):
@@ -105,11 +119,9 @@ def _build_bot_and_dp() -> tuple[Bot, Dispatcher]:
             )
             return True  # mark handled, don't crash
 
-        # Логируем с маскировкой секретов
         error_msg = mask_secrets(str(exception))
-        logger.exception("[error-handler] Unhandled exception: %s", error_msg)
 
-        # Собираем контекст для error_store
+        # Контекст для error_store (образец группы в bot_error)
         ctx: dict = {"source": "global_error_handler"}
         try:
             upd = event.update
@@ -124,17 +136,12 @@ def _build_bot_and_dp() -> tuple[Bot, Dispatcher]:
         except Exception:
             pass
 
-        # Сохраняем в БД (fire-and-forget, safe)
-        await save_error(
-            level="ERROR",
-            logger_name="aiogram.errors",
-            message=f"{type(exception).__name__}: {error_msg}"[:4000],
-            traceback="".join(
-                _tb.format_exception(
-                    type(exception), exception, exception.__traceback__
-                )
-            )[:20_000],
-            context=ctx,
+        # Логируем с маскировкой секретов → DBErrorHandler (группа + образец)
+        logger.error(
+            "[error-handler] Unhandled exception: %s",
+            error_msg,
+            exc_info=exception,
+            extra={"error_context": ctx},
         )
 
         # Отправляем алерт админам
@@ -234,9 +241,14 @@ async def _check_staleness() -> None:
 
 
 async def _warmup_caches() -> None:
-    """Прогрев кешей при старте бота: permissions + user_context."""
+    """Прогрев кешей при старте бота: permissions + user_context + CPU-пул."""
     import time as _time
 
+    from utils.cpu_pool import start_cpu_pool
+
+    # spawn воркеров (cv2 / reportlab / шрифты) — фоном, параллельно с кешами
+    cpu_pool_task = asyncio.create_task(start_cpu_pool())
+
     t0 = _time.monotonic()
     try:
         from use_cases.permissions import _ensure_cache
@@ -263,6 +275,7 @@ async def _warmup_caches() -> None:
         )
     except Exception:
         logger.warning("[startup] Cache warmup failed (non-critical)", exc_info=True)
+    await cpu_pool_task
 
 
 async def _cleanup() -> None:
@@ -272,6 +285,9 @@ async def _cleanup() -> None:
     from adapters.gpt5_vision_ocr import close_client as close_openai
     from db.engine import dispose_engine
     from bot.middleware import cancel_tracked_tasks
+    from utils.cpu_pool import shutdown_cpu_pool
+    from utils.metrics import stop_loop_lag_monitor
+    from utils.loop_watchdog import stop_loop_watchdog
 
     # Pending writeoffs теперь в PostgreSQL — переживают рестарт, логировать не нужно
     try:
@@ -287,10 +303,27 @@ async def _cleanup() -> None:
     except Exception:
         logger.debug("suppressed", exc_info=True)
     await cancel_tracked_tasks()
+    # Очередь правок min/max → Google Таблица (write-behind)
+    try:
+        from use_cases.edit_min_stock import flush_pending as flush_min_stock
+
+        await flush_min_stock()
+    except Exception:
+        logger.warning("[shutdown] Очередь min/max → GSheet не записана", exc_info=True)
+    await stop_loop_lag_monitor()
+    stop_loop_watchdog()
     await close_iiko()
     await close_iiko_cloud()
     await close_ft()
     await close_openai()
+    shutdown_cpu_pool()
+    try:
+        from use_cases import error_store, log_store
+
+        await error_store.flush_pending()
+        await log_store.flush_pending()
+    except Exception:
+        logger.debug("suppressed", exc_info=True)
     await dispose_engine()
 
     # Закрываем Redis-соединение FSM storage
@@ -325,6 +358,14 @@ async def on_startup(bot: Bot) -> None:
 
     get_telegram_handler().attach_bot(bot)
 
+    # Задержка event loop → /metrics (event_loop_lag_seconds)
+    from utils.metrics import start_loop_lag_monitor
+    from utils.loop_watchdog import start_loop_watchdog
+
+    start_loop_lag_monitor()
+    # Шаги loop дольше LOOP_STALL_THRESHOLD_MS → стек в bot_log (/lag)
+    start_loop_watchdog()
+
     # Инициализация БД: создание таблиц + миграции (идемпотентно)
     await _check_db()
     await _init_db()
@@ -391,12 +432,21 @@ async def on_startup(bot: Bot) -> None:
 
     start_scheduler(bot)
 
+    # Worker очереди вебхуков iikoCloud (consumer group — в каждой реплике)
+    from use_cases.webhook_queue import start_worker
+
+    start_worker(bot)
+
 
 async def on_shutdown(bot: Bot) -> None:
     # Останавливаем планировщик
     from use_cases.scheduler import stop_scheduler
 
-    stop_scheduler()
+    await stop_scheduler()
+
+    from use_cases.webhook_queue import stop_worker
+
+    await stop_worker()
     # НЕ удаляем вебхук при shutdown — иначе при редеплое Railway
     # старый контейнер удалит вебхук, который новый уже поставил (гонка).
     # Вебхук будет перезаписан при следующем on_startup.
@@ -405,7 +455,10 @@ async def on_shutdown(bot: Bot) -> None:
 
 
 async def _process_iiko_webhook(body: list[dict], bot: "Bot") -> None:
-    """Фоновая обработка вебхука от iikoCloud (не блокирует HTTP-ответ)."""
+    """
+    Фоновая обработка вебхука от iikoCloud в этом процессе
+    (запасной путь, когда очередь webhook_queue недоступна).
+    """
     try:
         from use_cases.iiko_webhook_handler import handle_webhook
 
@@ -439,6 +492,29 @@ def run_webhook() -> None:
 
     app.router.add_get("/health", health)
 
+    # Prometheus scrape: хэндлеры, внешние API, пул БД, кеши, задачи, event loop.
+    # Порт публичный — только с Bearer METRICS_TOKEN; без токена маршрута нет.
+    from config import METRICS_TOKEN
+
+    async def metrics(request: web.Request) -> web.Response:
+        from utils.metrics import CONTENT_TYPE, render, verify_scrape_auth
+
+        if not verify_scrape_auth(request.headers.get("Authorization"), METRICS_TOKEN):
+            logger.warning("[metrics] Отказ: неверный токен от %s", request.remote)
+            return web.Response(
+                status=401,
+                text="Unauthorized",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        return web.Response(
+            body=render().encode(), headers={"Content-Type": CONTENT_TYPE}
+        )
+
+    if METRICS_TOKEN:
+        app.router.add_get("/metrics", metrics)
+    else:
+        logger.info("[metrics] METRICS_TOKEN не задан — /metrics отключён")
+
     # iikoCloud webhook endpoint — принимает события от iikoCloud
     async def iiko_webhook(request: web.Request) -> web.Response:
         from adapters.iiko_cloud_api import verify_webhook_auth
@@ -476,11 +552,15 @@ def run_webhook() -> None:
         if not isinstance(body, list):
             body = [body]
 
-        # Обрабатываем фоновой задачей чтобы быстро вернуть 200
-        # (iikoCloud ожидает быстрый ответ, иначе может отключить вебхук)
-        from bot.middleware import track_task
+        # Кладём в durable-очередь (Redis Stream) и сразу возвращаем 200
+        # (iikoCloud ожидает быстрый ответ, иначе может отключить вебхук).
+        # Redis недоступен → старый путь: фоновая задача в этом процессе.
+        from use_cases.webhook_queue import enqueue
+
+        if await enqueue(body) is None:
+            from bot.middleware import track_task
 
-        track_task(_process_iiko_webhook(body, bot))
+            track_task(_process_iiko_webhook(body, bot))
 
         return web.Response(status=200, text="ok")
 
@@ -556,12 +636,15 @@ async def run_polling() -> None:
     finally:
         from use_cases.scheduler import stop_scheduler
 
-        stop_scheduler()
+        await stop_scheduler()
         await _cleanup()
 
 
 # ─── Entrypoint ────────────────────────────────────────────────────
 if __name__ == "__main__":
+    # Логирование — первым делом
+    setup_logging()
+
     from config import WEBHOOK_URL
 
     try:
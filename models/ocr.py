@@ -4,7 +4,7 @@ OCR модели для хранения распознанных докумен
 
 from datetime import datetime
 from decimal import Decimal
-from sqlalchemy import String, Text, Numeric, Boolean, ForeignKey
+from sqlalchemy import BigInteger, String, Text, Numeric, Boolean, ForeignKey
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from uuid import uuid4
@@ -183,4 +183,31 @@ class OcrItem(Base):
         return f"<OcrItem {self.raw_name} {self.qty} {self.unit}>"
 
 
+class OcrResultCache(Base):
+    """
+    Кеш результатов GPT Vision по содержимому фото (use_cases/ocr_cache.py).
+
+    Ключ — sha256 нормализованного JPEG (utils/image_prep); выдаётся только
+    точное совпадение.
+    """
+
+    __tablename__ = "ocr_result_cache"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=False, unique=True)
+    model: Mapped[str] = mapped_column(
+        String(60), nullable=False
+    )  # OCR_MODEL + версия промпта — смена модели = промах
+    result: Mapped[dict] = mapped_column(
+        JSONB, nullable=False
+    )  # нормализованный результат recognize_document
+    hits: Mapped[int] = mapped_column(default=0)
+    created_at: Mapped[datetime] = mapped_column(default=_utcnow)
+    last_hit_at: Mapped[datetime | None] = mapped_column(nullable=True)
+    expires_at: Mapped[datetime] = mapped_column(nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<OcrResultCache {self.content_hash[:12]} hits={self.hits}>"
+
+
 # Индексы для ускорения поиска (GIN-индексы создаются отдельно в init_db.py после CREATE EXTENSION pg_trgm)
@@ -0,0 +1,19 @@
+"""
+Сквозной бенчмарк тяжёлых пайплайнов на локальном стенде.
+
+Внешние API — фейки tests/fakes отдельным процессом, БД — локальный
+Postgres. Для каждого пайплайна (pipelines.PIPELINES) и масштаба данных
+(1× / 5× / 20× боевого объёма) снимаются время, число SQL round trip'ов,
+запросы к внешним API, пик RSS и аллокации (metrics.measure); результаты —
+JSON, который можно сравнить с сохранённым baseline (report.compare).
+
+    python -m tests.bench --scales 1 5 20 --out bench.json
+    python -m tests.bench --baseline bench.json --threshold 0.2
+
+Подробности запуска — в tests/bench/__main__.py.
+
+Микробенчмарки отдельных модулей (старый путь против нового, вывод [bench])
+— tests/bench/test_*.py с маркером bench; обычный pytest их не собирает:
+
+    pytest tests/bench -m bench -v -s
+"""
@@ -0,0 +1,149 @@
+"""
+Замеры одного прогона пайплайна: время, обращения к БД и внешним API,
+пик RSS, аллокации Python.
+
+Время и RSS снимаются в обычном прогоне; аллокации — в отдельном, под
+tracemalloc (он замедляет код в разы и исказил бы время).
+"""
+
+from __future__ import annotations
+
+import contextlib
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from collections.abc import Awaitable, Callable, Iterator
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+from sqlalchemy import event
+
+from tests.bench.stack import RemoteStack
+
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_MB = 1024 * 1024
+
+
+@dataclass(slots=True)
+class Sample:
+    """Результат одного пайплайна на одном масштабе (строка JSON-отчёта)."""
+
+    wall_sec: float = 0.0
+    db_roundtrips: int = 0
+    http_requests: dict[str, int] = field(default_factory=dict)
+    rss_peak_mb: float = 0.0
+    rss_delta_mb: float = 0.0
+    alloc_peak_mb: float = 0.0
+    alloc_retained_mb: float = 0.0
+    result: str = ""
+    error: str | None = None
+
+    def as_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+def _rss_bytes() -> int:
+    """Текущий RSS процесса: /proc/self/statm, иначе — пик из getrusage."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class RssSampler:
+    """Пик RSS за отрезок — фоновым потоком раз в interval секунд."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.start_bytes = 0
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak_bytes = max(self.peak_bytes, _rss_bytes())
+
+    def __enter__(self) -> RssSampler:
+        self.start_bytes = self.peak_bytes = _rss_bytes()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, _rss_bytes())
+
+
+@contextlib.contextmanager
+def count_statements(sync_engine) -> Iterator[list[int]]:
+    """
+    Число SQL-выполнений на engine — round trip'ы к Postgres.
+    executemany (batch INSERT) считается одним, как и уходит в asyncpg.
+    """
+    counter = [0]
+
+    def _on_execute(*_args) -> None:
+        counter[0] += 1
+
+    event.listen(sync_engine, "before_cursor_execute", _on_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", _on_execute)
+
+
+def _summary(result: Any) -> str:
+    """Короткое описание результата пайплайна для отчёта."""
+    if isinstance(result, (list, tuple, dict, set)):
+        return f"{type(result).__name__}[{len(result)}]"
+    return repr(result)[:80]
+
+
+async def measure(
+    run: Callable[[], Awaitable[Any]],
+    *,
+    stack: RemoteStack | None = None,
+    sync_engine=None,
+    allocations: bool = True,
+) -> Sample:
+    """
+    Прогнать run() и снять метрики. При allocations=True — второй прогон
+    под tracemalloc (пайплайны идемпотентны: повторная синхронизация
+    перезаписывает те же строки).
+    """
+    sample = Sample()
+    if stack is not None:
+        await stack.reset_stats()
+
+    stmts = count_statements(sync_engine) if sync_engine is not None else None
+    with stmts or contextlib.nullcontext([0]) as counter, RssSampler() as rss:
+        t0 = time.perf_counter()
+        try:
+            sample.result = _summary(await run())
+        except Exception as exc:
+            sample.error = f"{type(exc).__name__}: {exc}"
+        sample.wall_sec = round(time.perf_counter() - t0, 4)
+    sample.db_roundtrips = counter[0]
+    sample.rss_peak_mb = round(rss.peak_bytes / _MB, 1)
+    sample.rss_delta_mb = round((rss.peak_bytes - rss.start_bytes) / _MB, 1)
+    if stack is not None:
+        sample.http_requests = await stack.requests()
+
+    if allocations and sample.error is None:
+        tracemalloc.start()
+        try:
+            await run()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        sample.alloc_peak_mb = round(peak / _MB, 2)
+        sample.alloc_retained_mb = round(current / _MB, 2)
+    return sample
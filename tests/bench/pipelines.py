@@ -0,0 +1,209 @@
+"""
+Пайплайны под замером и подготовка БД к ним.
+
+Каждый пайплайн — корутина-функция (Dataset, Fixture) → результат; ошибки,
+которые пайплайн обычно проглатывает в отчёт (❌ в строках синхронизации,
+errors в ОПИУ), поднимаются исключением — иначе упавший прогон выглядел бы
+в отчёте как очень быстрый.
+
+prepare() приводит БД к «рабочему» состоянию: пересоздание таблиц →
+синхронизация справочников → остатки → мин. уровни → дневные итоги ФОТ.
+Замеряется повторный (ежедневный) прогон, а не первая заливка пустой базы.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import random
+import uuid
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from io import BytesIO
+from typing import Any
+
+import numpy as np
+from PIL import Image
+from sqlalchemy import insert
+
+from tests.fakes import Dataset
+
+logger = logging.getLogger(__name__)
+
+# «Сегодня» бенчмарка: середина месяца — ОПИУ и ФОТ считают 17 дней
+BENCH_DAY = date(2026, 3, 17)
+TRIGGER = "bench"
+PHOTOS_PER_SCALE = 10  # альбом накладных при scale=1
+MIN_LEVEL_SHARE = 0.3  # доля товаров точки с заданным мин. остатком
+
+
+@dataclass(slots=True)
+class Fixture:
+    """Данные, подготовленные один раз на масштаб."""
+
+    photos: list[bytes] = field(default_factory=list)
+    goods_costs: dict[str, float] = field(default_factory=dict)
+
+
+# ═══════════════════════════════════════════════════════
+# Подготовка
+# ═══════════════════════════════════════════════════════
+
+
+def check_database_name() -> None:
+    """Таблицы пересоздаются — только на отдельной базе (*bench* / *test*)."""
+    from db.engine import engine
+
+    name = engine.url.database or ""
+    if "bench" not in name and "test" not in name:
+        raise SystemExit(
+            f"Бенчмарк пересоздаёт таблицы, а DATABASE_URL указывает на «{name}». "
+            "Нужна отдельная база с bench или test в имени."
+        )
+
+
+def _photo(n: int, width: int = 1600, height: int = 1200) -> bytes:
+    """Синтетическая «накладная»: светлый фон + строки текста (проходит качество)."""
+    img = np.full((height, width, 3), 235, dtype=np.uint8)
+    for y in range(20 + n % 12, height - 20, 24):
+        img[y : y + 6, 20 : width - 20 : 3] = 20
+    buf = BytesIO()
+    Image.fromarray(img).save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+async def _seed_min_levels(ds: Dataset) -> int:
+    """min_stock_level: ~30% товаров каждой точки (обычно — из Google Таблицы)."""
+    from db.engine import async_session_factory
+    from db.models import MinStockLevel
+
+    rnd = random.Random(f"{ds.seed}:min_stock")
+    rows = [
+        {
+            "product_id": uuid.UUID(p["id"]),
+            "product_name": p["name"],
+            "department_id": uuid.UUID(d["id"]),
+            "department_name": d["name"],
+            "min_level": round(rnd.uniform(1, 40), 1),
+            "max_level": round(rnd.uniform(40, 120), 1),
+        }
+        for d in ds.departments
+        for p in rnd.sample(ds.goods, int(len(ds.goods) * MIN_LEVEL_SHARE))
+    ]
+    async with async_session_factory() as session:
+        await session.execute(insert(MinStockLevel), rows)
+        await session.commit()
+    return len(rows)
+
+
+async def prepare(ds: Dataset) -> Fixture:
+    """Чистая БД → справочники, остатки, мин. уровни, дневные итоги ФОТ."""
+    from db.init_db import create_tables, drop_tables
+
+    await drop_tables()
+    await create_tables()
+    await sync_everything(ds, Fixture())
+    await stock_balances(ds, Fixture())
+    levels = await _seed_min_levels(ds)
+    await fot_sheet(ds, Fixture())  # дневные итоги — как после вчерашнего прогона
+    logger.info("[bench] БД подготовлена: %d мин. уровней", levels)
+
+    return Fixture(
+        photos=[_photo(i) for i in range(math.ceil(PHOTOS_PER_SCALE * ds.scale))],
+        goods_costs={g["id"]: round(g["defaultSalePrice"] * 0.4, 2) for g in ds.goods},
+    )
+
+
+# ═══════════════════════════════════════════════════════
+# Пайплайны
+# ═══════════════════════════════════════════════════════
+
+
+async def sync_everything(ds: Dataset, fx: Fixture) -> list[str]:
+    from use_cases.sync import sync_everything_with_report
+
+    iiko_lines, ft_lines = await sync_everything_with_report(TRIGGER)
+    failed = [line.strip() for line in iiko_lines + ft_lines if "❌" in line]
+    if failed:
+        raise RuntimeError("; ".join(failed))
+    return iiko_lines + ft_lines
+
+
+async def stock_balances(ds: Dataset, fx: Fixture) -> int:
+    from use_cases.sync_stock_balances import sync_stock_balances
+
+    return await sync_stock_balances(
+        triggered_by=TRIGGER, timestamp=f"{BENCH_DAY.isoformat()}T23:59:59"
+    )
+
+
+async def min_stock(ds: Dataset, fx: Fixture) -> dict[str, int]:
+    """Все точки по очереди — как обновление закреплённых сообщений."""
+    from use_cases.check_min_stock import check_min_stock_levels
+
+    below: dict[str, int] = {}
+    for dept in ds.departments:
+        result = await check_min_stock_levels(department_id=dept["id"])
+        below[dept["name"]] = result["below_min_count"]
+    return below
+
+
+async def opiu(ds: Dataset, fx: Fixture) -> dict:
+    from use_cases.pnl_sync import update_opiu
+
+    result = await update_opiu(
+        triggered_by=TRIGGER,
+        target_date=datetime.combine(BENCH_DAY, datetime.min.time()),
+    )
+    if result["errors"]:
+        raise RuntimeError(f"ОПИУ: {result['errors']} ошибок — {result['details']}")
+    return result
+
+
+async def fot_sheet(ds: Dataset, fx: Fixture) -> int:
+    from use_cases.payroll import update_fot_sheet
+
+    return await update_fot_sheet(triggered_by=TRIGGER, target_date=BENCH_DAY)
+
+
+async def fot_sheet_full(ds: Dataset, fx: Fixture) -> int:
+    from use_cases.payroll import update_fot_sheet
+
+    return await update_fot_sheet(
+        triggered_by=TRIGGER, target_date=BENCH_DAY, full=True
+    )
+
+
+async def dish_costs(ds: Dataset, fx: Fixture) -> dict[str, float]:
+    from use_cases.outgoing_invoice import calculate_dish_cost_prices
+
+    return await calculate_dish_cost_prices(fx.goods_costs)
+
+
+async def ocr_batch(ds: Dataset, fx: Fixture) -> list[str]:
+    """Альбом накладных; кеш OCR выключен — каждый прогон идёт в «модель»."""
+    from use_cases.ocr_pipeline import process_photo_batch
+
+    results = await process_photo_batch(fx.photos, user_id=0, use_cache=False)
+    failed = [r for r in results if r.status != "success"]
+    if failed:
+        raise RuntimeError(
+            f"OCR: {len(failed)}/{len(results)} не распознаны — {failed[0].errors}"
+        )
+    return [r.doc_number or "" for r in results]
+
+
+Runner = Callable[[Dataset, Fixture], Awaitable[Any]]
+
+# Порядок = порядок прогона (как в суточном расписании: сначала справочники)
+PIPELINES: dict[str, Runner] = {
+    "sync_everything_with_report": sync_everything,
+    "sync_stock_balances": stock_balances,
+    "check_min_stock_levels": min_stock,
+    "update_opiu": opiu,
+    "update_fot_sheet": fot_sheet,
+    "update_fot_sheet_full": fot_sheet_full,
+    "calculate_dish_cost_prices": dish_costs,
+    "process_photo_batch": ocr_batch,
+}
@@ -0,0 +1,131 @@
+"""
+JSON-отчёт бенчмарка и сравнение с сохранённым baseline.
+
+Формат файла::
+
+    {
+        "meta": {"created_at": ..., "git": ..., "python": ..., "seed": ...},
+        "results": {"<пайплайн>": {"<масштаб>": {wall_sec, db_roundtrips, ...}}}
+    }
+
+Регрессия — метрика выросла больше чем на threshold (доля) И больше
+абсолютного порога шума из METRICS: 3 мс → 5 мс — не регрессия,
+хотя +66%. Пайплайн, упавший с ошибкой там, где baseline прошёл, —
+регрессия всегда.
+"""
+
+from __future__ import annotations
+
+import json
+import platform
+import subprocess
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+# метрика → абсолютный порог шума
+METRICS: dict[str, float] = {
+    "wall_sec": 0.05,
+    "db_roundtrips": 0,
+    "alloc_peak_mb": 1.0,
+    "rss_delta_mb": 32.0,
+}
+
+
+@dataclass(slots=True, frozen=True)
+class Regression:
+    pipeline: str
+    scale: str
+    metric: str
+    baseline: float | str | None
+    current: float | str | None
+
+    def __str__(self) -> str:
+        if self.metric == "error":
+            return f"{self.pipeline} ×{self.scale}: ошибка — {self.current}"
+        growth = (
+            f" (+{(self.current / self.baseline - 1) * 100:.0f}%)"
+            if self.baseline
+            else ""
+        )
+        return (
+            f"{self.pipeline} ×{self.scale}: {self.metric} "
+            f"{self.baseline} → {self.current}{growth}"
+        )
+
+
+def _git_revision() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def new_report(**meta: Any) -> dict[str, Any]:
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "git": _git_revision(),
+            "python": platform.python_version(),
+            **meta,
+        },
+        "results": {},
+    }
+
+
+def save(report: dict[str, Any], path: str | Path) -> None:
+    Path(path).write_text(
+        json.dumps(report, ensure_ascii=False, indent=2) + "\n", encoding="utf-8"
+    )
+
+
+def load(path: str | Path) -> dict[str, Any]:
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+def compare(
+    current: dict[str, Any], baseline: dict[str, Any], threshold: float = 0.2
+) -> list[Regression]:
+    """Регрессии current относительно baseline (только общие пайплайн × масштаб)."""
+    found: list[Regression] = []
+    for pipeline, by_scale in current["results"].items():
+        base_scales = baseline["results"].get(pipeline, {})
+        for scale, now in by_scale.items():
+            base = base_scales.get(scale)
+            if base is None:
+                continue
+            if now.get("error") and not base.get("error"):
+                found.append(Regression(pipeline, scale, "error", None, now["error"]))
+                continue
+            for metric, noise in METRICS.items():
+                b, c = base.get(metric), now.get(metric)
+                if b is None or c is None:
+                    continue
+                if c > b * (1 + threshold) and c - b > noise:
+                    found.append(Regression(pipeline, scale, metric, b, c))
+    return found
+
+
+def format_table(report: dict[str, Any]) -> str:
+    """Текстовая таблица для консоли."""
+    lines = [
+        f"{'пайплайн':<28} {'×':>4} {'сек':>8} {'SQL':>6} {'HTTP':>6} "
+        f"{'RSS пик':>8} {'+RSS':>6} {'alloc':>7}  результат"
+    ]
+    for pipeline, by_scale in report["results"].items():
+        for scale, s in by_scale.items():
+            http = sum(s.get("http_requests", {}).values())
+            tail = f"❌ {s['error']}" if s.get("error") else s.get("result", "")
+            lines.append(
+                f"{pipeline:<28} {scale:>4} {s['wall_sec']:>8.3f} "
+                f"{s['db_roundtrips']:>6} {http:>6} {s['rss_peak_mb']:>8.1f} "
+                f"{s['rss_delta_mb']:>6.1f} {s['alloc_peak_mb']:>7.2f}  {tail}"
+            )
+    return "\n".join(lines)
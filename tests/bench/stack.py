@@ -0,0 +1,118 @@
+"""
+Стенд внешних API отдельным процессом (python -m tests.fakes).
+
+Фейки в процессе бенчмарка делили бы с пайплайном RSS, аллокации
+и event loop — в замеры попадала бы генерация ответов. Здесь стенд живёт
+в дочернем процессе, адреса берутся из его `export …`, счётчики запросов —
+через /__fake/stats.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import signal
+import sys
+
+import httpx
+
+_READY_PREFIX = "# scale="
+_START_TIMEOUT = 60.0
+
+
+class RemoteStack:
+    """FakeStack в дочернем процессе; env() — как у FakeStack."""
+
+    def __init__(
+        self,
+        scale: float,
+        seed: int = 2026,
+        *,
+        latency_ms: float = 0.0,
+        vision_latency_ms: float = 0.0,
+    ):
+        self.args = [
+            "--scale",
+            str(scale),
+            "--seed",
+            str(seed),
+            "--latency-ms",
+            str(latency_ms),
+            "--vision-latency-ms",
+            str(vision_latency_ms),
+            "--seed-sheets",
+        ]
+        self._env: dict[str, str] = {}
+        self._proc: asyncio.subprocess.Process | None = None
+        self._http: httpx.AsyncClient | None = None
+
+    def env(self) -> dict[str, str]:
+        return dict(self._env)
+
+    @property
+    def _bases(self) -> list[str]:
+        return [
+            url.removesuffix("/v1")
+            for key, url in self._env.items()
+            if key.endswith("_URL")
+        ]
+
+    async def start(self) -> None:
+        self._proc = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-m",
+            "tests.fakes",
+            *self.args,
+            stdout=asyncio.subprocess.PIPE,
+        )
+        assert self._proc.stdout is not None
+        async with asyncio.timeout(_START_TIMEOUT):
+            while True:
+                raw = await self._proc.stdout.readline()
+                if not raw:
+                    raise RuntimeError(
+                        f"tests.fakes завершился с кодом {await self._proc.wait()}"
+                    )
+                line = raw.decode().strip()
+                if line.startswith("export "):
+                    key, _, value = line[len("export ") :].partition("=")
+                    self._env[key] = value
+                elif line.startswith(_READY_PREFIX):
+                    break
+        self._http = httpx.AsyncClient(timeout=10)
+
+    async def stop(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        if self._proc is not None and self._proc.returncode is None:
+            self._proc.send_signal(signal.SIGINT)
+            try:
+                async with asyncio.timeout(10):
+                    await self._proc.communicate()  # сводку стенда не печатаем
+            except TimeoutError:
+                self._proc.kill()
+                await self._proc.wait()
+        self._proc = None
+
+    async def __aenter__(self) -> RemoteStack:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+    async def reset_stats(self) -> None:
+        assert self._http is not None
+        for base in self._bases:
+            await self._http.post(f"{base}/__fake/reset")
+
+    async def requests(self) -> dict[str, int]:
+        """Число запросов к каждому серверу с последнего reset_stats()."""
+        assert self._http is not None
+        out: dict[str, int] = {}
+        for base in self._bases:
+            stats = (await self._http.get(f"{base}/__fake/stats")).json()
+            total = sum(stats["hits"].values())
+            if total:
+                out[stats["name"]] = total
+        return out
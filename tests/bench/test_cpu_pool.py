@@ -0,0 +1,57 @@
+"""
+Бенчмарк: задержка event loop при генерации PDF — to_thread против
+пула процессов (utils/cpu_pool.py).
+
+Запуск: pytest tests/bench/test_cpu_pool.py -m bench -v -s
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from use_cases.pdf_invoice import generate_invoice_pdf
+from utils.cpu_pool import CpuPool
+
+pytestmark = pytest.mark.bench
+
+
+@pytest.fixture
+async def pool():
+    p = CpuPool(workers=2, max_waiting=1, warmup=())
+    yield p
+    p.shutdown()
+
+
+async def _max_loop_lag(job) -> float:
+    """Макс. задержка тика event loop (мс), пока выполняется job."""
+    lag = 0.0
+    task = asyncio.create_task(job)
+    while not task.done():
+        t0 = time.perf_counter()
+        await asyncio.sleep(0.005)
+        lag = max(lag, (time.perf_counter() - t0 - 0.005) * 1000)
+    await task
+    return lag
+
+
+@pytest.mark.asyncio
+async def test_benchmark_pdf_loop_lag(pool):
+    """PDF на 300 позиций: задержка event loop — to_thread против пула."""
+    items = [
+        {"name": f"Товар {i}", "amount": 1.5, "price": 120.0, "unit_name": "кг"}
+        for i in range(300)
+    ]
+    await pool.start()
+
+    thread_lag = await _max_loop_lag(
+        asyncio.to_thread(generate_invoice_pdf, items=items)
+    )
+    pool_lag = await _max_loop_lag(pool.run(generate_invoice_pdf, items=items))
+    pdf = await pool.run(generate_invoice_pdf, items=items)
+
+    assert pdf.startswith(b"%PDF")
+    print(
+        f"\n[bench] pdf 300 items, max loop lag: to_thread {thread_lag:.1f} ms, "
+        f"pool {pool_lag:.1f} ms"
+    )
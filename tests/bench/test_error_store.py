@@ -0,0 +1,53 @@
+"""
+Бенчмарк: шторм из 1000 одинаковых ошибок через DBErrorHandler
+(use_cases/error_store.py) — стоимость emit и число записей в БД.
+
+Запуск: pytest tests/bench/test_error_store.py -m bench -v -s
+"""
+
+import asyncio
+import logging
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from use_cases import error_store
+from tests.test_error_store import _fetch_order, _raised, _record
+
+pytestmark = pytest.mark.bench
+
+
+@pytest.fixture(autouse=True)
+async def _reset_aggregator():
+    error_store._pending.clear()
+    error_store._sampled.clear()
+    for key in error_store._stats:
+        error_store._stats[key] = 0
+    yield
+    if error_store._flush_task is not None:
+        error_store._flush_task.cancel()
+        error_store._flush_task = None
+    error_store._pending.clear()
+
+
+@pytest.mark.asyncio
+async def test_benchmark_error_storm():
+    """1000 ошибок в цикле: прежний дедуп по тексту за 30 сек — 1000 INSERT."""
+    handler = error_store.DBErrorHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    save = AsyncMock(return_value=42)
+
+    with patch.object(error_store, "save_error", save):
+        t0 = time.perf_counter()
+        for order_id in range(1000):
+            handler.emit(
+                _record("sync order %s", order_id, exc=_raised(_fetch_order, order_id))
+            )
+        emit_us = (time.perf_counter() - t0) / 1000 * 1e6
+        await asyncio.sleep(0)  # образец пишется задачей
+
+    print(
+        f"\n[bench] error storm 1000 events: {save.await_count} bot_error INSERT "
+        f"(old per-message 30 s dedup: 1000), 1 UPSERT; emit {emit_us:.0f} µs/event"
+    )
@@ -0,0 +1,35 @@
+"""
+Бенчмарк: месяц явок через настоящий адаптер iiko против фейкового сервера
+(tests/fakes) с задержкой 20 мс — время и объём ответа.
+
+Запуск: pytest tests/bench/test_fake_servers.py -m bench -v -s
+"""
+
+import time
+
+import pytest
+
+from adapters import iiko_api
+from tests.fakes import Faults, FakeStack
+
+pytestmark = pytest.mark.bench
+
+
+@pytest.fixture
+async def stack():
+    async with FakeStack(scale=0.2) as st:
+        async with st.point_adapters():
+            yield st
+
+
+async def test_bench_month_attendance_over_fake(stack):
+    """Месяц явок при 20 мс задержке — время и объём ответа."""
+    stack.iiko.faults = Faults(latency_ms=20)
+    t0 = time.perf_counter()
+    att = await iiko_api.fetch_attendance("2026-03-01", "2026-03-31")
+    elapsed = time.perf_counter() - t0
+    print(
+        f"\n[bench] fakes: attendance 31 дн. scale=0.2 — {len(att)} явок, "
+        f"{stack.iiko.bytes_out / 1024:.0f} КБ, {elapsed * 1000:.0f} мс"
+    )
+    assert att
@@ -0,0 +1,32 @@
+"""
+Бенчмарк: подготовка 12 Мп фото (utils/image_prep.py) — валидатор и
+поворот по отдельности против одного декодирования.
+
+Запуск: pytest tests/bench/test_image_prep.py -m bench -v -s
+"""
+
+import time
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from utils import image_prep
+from utils.photo_validator import _validate_photo_sync
+from tests.test_image_prep import _document, _jpeg
+
+pytestmark = pytest.mark.bench
+
+
+def test_benchmark_prepare_vs_separate_decodes():
+    """12 Мп фото: валидатор + _auto_rotate по отдельности против одного прохода."""
+    data = _jpeg(_document(3000, 4000), orientation=6)
+
+    t0 = time.perf_counter()
+    _validate_photo_sync(data)
+    image_prep.prepare_model_jpeg_sync(data)
+    legacy_ms = (time.perf_counter() - t0) * 1000
+
+    prep = image_prep.prepare_image_sync(data)
+    print(f"\n[bench] image prep 12MP: separate {legacy_ms:.0f} ms, {prep.timings}")
+    assert Image.open(BytesIO(prep.jpeg)).size == (2048, 1536)
@@ -0,0 +1,86 @@
+"""
+Бенчмарк: 10k записей/сек через logging → DBLogHandler → writer →
+(фейковый) COPY (use_cases/log_store.py) — стоимость emit, число COPY,
+потери; для сравнения — ORM-объекты прежнего пути.
+
+Запуск: pytest tests/bench/test_log_store.py -m bench -v -s
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+
+from db.models import BotLog
+from use_cases import log_store
+
+pytestmark = pytest.mark.bench
+
+
+@pytest.fixture(autouse=True)
+async def _reset_sink():
+    log_store._buffer.clear()
+    for key in log_store._stats:
+        log_store._stats[key] = 0
+    log_store._stats["last_error"] = None
+    log_store._wakeup_pending = False
+    yield
+    if log_store._flush_task is not None:
+        log_store._flush_task.cancel()
+        log_store._flush_task = None
+    log_store._buffer.clear()
+
+
+@pytest.mark.asyncio
+async def test_benchmark_10k_records_per_second():
+    """1 сек логов на 10k записей/сек: без потерь, стоимость emit, число COPY."""
+
+    async def _fake_copy(rows):
+        await asyncio.sleep(0.002 + len(rows) * 1e-6)  # сеть + разбор строк
+
+    bench_logger = logging.getLogger("bench.log_store")
+    bench_logger.propagate = False
+    bench_logger.setLevel(logging.INFO)
+    handler = log_store.DBLogHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+    bench_logger.addHandler(handler)
+
+    emit_sec = 0.0
+    try:
+        with patch.object(log_store, "_copy_rows", _fake_copy):
+            for tick in range(100):  # 100 × 10 мс × 100 записей
+                t0 = time.perf_counter()
+                for i in range(100):
+                    bench_logger.info("order %d synced in %.1f ms", tick * 100 + i, 1.5)
+                emit_sec += time.perf_counter() - t0
+                await asyncio.sleep(0.01)
+            await log_store.flush_pending()
+    finally:
+        bench_logger.removeHandler(handler)
+
+    stats = log_store.get_sink_stats()
+    assert stats["written"] == 10_000
+    assert stats["dropped_overflow"] == stats["dropped_failed"] == 0
+
+    rows = [
+        {
+            "created_at": datetime(2026, 3, 17),
+            "level": "INFO",
+            "logger_name": "bench",
+            "message": "x" * 80,
+            "traceback": None,
+        }
+        for _ in range(10_000)
+    ]
+    t0 = time.perf_counter()
+    [BotLog(**row) for row in rows]
+    orm_ms = (time.perf_counter() - t0) * 1000
+
+    print(
+        f"\n[bench] bot_log 10k rec/s: emit {emit_sec / 10_000 * 1e6:.1f} µs/record, "
+        f"{stats['copies']} COPY, last {stats['last_copy_ms']} ms, dropped 0; "
+        f"ORM objects for 10k rows (old path, before INSERT): {orm_ms:.0f} ms"
+    )
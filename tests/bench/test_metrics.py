@@ -0,0 +1,58 @@
+"""
+Бенчмарк: стоимость горячего пути метрик (utils/metrics.py) — observe/inc,
+middleware хэндлеров на апдейт против пустого вызова, render().
+
+Запуск: pytest tests/bench/test_metrics.py -m bench -v -s
+"""
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from bot.global_commands import HandlerMetricsMiddleware
+from utils import metrics
+from tests.test_metrics import _handled_ok
+
+pytestmark = pytest.mark.bench
+
+
+@pytest.mark.asyncio
+async def test_benchmark_hot_path_overhead():
+    """Стоимость observe/inc и middleware на апдейт против пустого вызова."""
+    n = 100_000
+    child = metrics.HANDLER_LATENCY.labels("bench", "bench")
+    counter = metrics.EXTERNAL_RETRIES.labels("bench", "/bench")
+
+    t0 = time.perf_counter()
+    for i in range(n):
+        child.observe(i * 1e-5)
+    observe_ns = (time.perf_counter() - t0) / n * 1e9
+
+    t0 = time.perf_counter()
+    for _ in range(n):
+        counter.inc()
+    inc_ns = (time.perf_counter() - t0) / n * 1e9
+
+    mw = HandlerMetricsMiddleware("bench")
+    event = object()
+    data = {"handler": SimpleNamespace(callback=_handled_ok)}
+    t0 = time.perf_counter()
+    for _ in range(n // 10):
+        await _handled_ok(event, data)
+    bare_us = (time.perf_counter() - t0) / (n // 10) * 1e6
+    t0 = time.perf_counter()
+    for _ in range(n // 10):
+        await mw(_handled_ok, event, data)
+    mw_us = (time.perf_counter() - t0) / (n // 10) * 1e6
+
+    t0 = time.perf_counter()
+    text = metrics.render()
+    render_ms = (time.perf_counter() - t0) * 1000
+
+    assert child.count == n
+    print(
+        f"\n[bench] metrics hot path: observe {observe_ns:.0f} ns, inc {inc_ns:.0f} ns; "
+        f"handler middleware +{mw_us - bare_us:.2f} µs/update; "
+        f"render {len(text.splitlines())} lines in {render_ms:.1f} ms"
+    )
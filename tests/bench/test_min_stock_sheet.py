@@ -0,0 +1,45 @@
+"""
+Бенчмарк: поиск ячейки min/max на листе 3000 × 40 — прежний путь
+(get_all_values + перебор) против индекса ячеек (adapters/google_sheets.py).
+
+Запуск: pytest tests/bench/test_min_stock_sheet.py -m bench -v -s
+"""
+
+import time
+
+import pytest
+
+from adapters import google_sheets as gsheet
+from tests.test_min_stock_sheet import N_DEPTS, N_PRODUCTS, _FakeWorksheet, _grid
+
+pytestmark = pytest.mark.bench
+
+
+def test_benchmark_cell_lookup():
+    """Поиск ячейки: старый путь (get_all_values + перебор) против индекса."""
+    grid = _grid()
+    edits = [(f"prod-{p}", f"dept-{p % N_DEPTS}") for p in range(0, N_PRODUCTS, 150)]
+
+    t0 = time.perf_counter()
+    for product_id, dept_id in edits:
+        values = [list(r) for r in grid]  # ответ get_all_values
+        col = next(c for c in range(2, len(values[0]), 2) if values[0][c] == dept_id)
+        row = next(i for i, r in enumerate(values[3:], 4) if r[1] == product_id)
+        assert row and col
+    old_ms = (time.perf_counter() - t0) * 1000
+
+    ws = _FakeWorksheet(grid)
+    gsheet._set_minmax_index(grid, ws)
+    t0 = time.perf_counter()
+    for product_id, dept_id in edits:
+        assert gsheet._minmax_index.cell(product_id, dept_id)
+    new_ms = (time.perf_counter() - t0) * 1000
+    gsheet._minmax_index = None
+
+    n = len(edits)
+    print(
+        f"\n[bench] {n} min/max edits on {N_PRODUCTS}×{N_DEPTS * 2} sheet: "
+        f"old {n * 4} API calls (open + get_all_values + 2 update_cell each), "
+        f"lookup {old_ms:.1f} ms; new 2 API calls (verify + batchUpdate), "
+        f"lookup {new_ms:.3f} ms"
+    )
@@ -0,0 +1,53 @@
+"""
+Бенчмарк: mirror_delete на 20k ID (use_cases/sync.py) — прежний NOT IN
+с литералами против одного запроса с ID-массивом: бинды, размер SQL, рендер.
+
+Запуск: pytest tests/bench/test_mirror_delete.py -m bench -v -s
+"""
+
+import time
+import uuid
+
+import pytest
+from sqlalchemy import delete as sa_delete
+
+from db.models import Entity
+from use_cases.sync import mirror_delete
+from tests.test_mirror_delete import _DIALECT, _compiled, _session
+
+pytestmark = pytest.mark.bench
+
+
+@pytest.mark.asyncio
+async def test_benchmark_20k_ids():
+    """20k ID: старый NOT IN (литералы) против одного массива."""
+    ids = {uuid.uuid4() for _ in range(20_000)}
+    table = Entity.__table__
+    kw = {"render_postcompile": True}
+
+    t0 = time.perf_counter()
+    old = (
+        sa_delete(table)
+        .where(table.c.id.notin_(list(ids)), table.c.root_type == "Product")
+        .compile(dialect=_DIALECT, compile_kwargs=kw)
+    )
+    old_ms = (time.perf_counter() - t0) * 1000
+    old_sql, old_params = str(old), len(old.params)
+
+    session = _session(total=20_010, doomed=10, deleted=10)
+    await mirror_delete(
+        table, "id", ids, "e", session, extra_filters={"root_type": "Product"}
+    )
+    t0 = time.perf_counter()
+    new = _compiled(session)
+    new_ms = (time.perf_counter() - t0) * 1000
+    new_sql, new_params = str(new), len(new.params)
+
+    assert old_params > 20_000 and new_params == 3
+    assert len(new_sql) * 50 < len(old_sql)
+    print(
+        f"\n[bench] mirror_delete 20k IDs: old 2 queries (COUNT + DELETE), "
+        f"{old_params} binds, SQL {len(old_sql) // 1024} KB, render {old_ms:.0f} ms; "
+        f"new 1 query, {new_params} binds, SQL {len(new_sql)} B, "
+        f"render {new_ms:.1f} ms"
+    )
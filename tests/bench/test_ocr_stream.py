@@ -0,0 +1,90 @@
+"""
+Бенчмарк: альбом из 10 фото — время до первого результата OCR, пачка после
+debounce против потоковой обработки (use_cases/ocr_pipeline.PhotoStream).
+
+GPT и prepare_image подменяются задержками — мерится только конвейер.
+Запуск: pytest tests/bench/test_ocr_stream.py -m bench -v -s
+"""
+
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+
+from use_cases import ocr_scheduler
+from use_cases.ocr_pipeline import PhotoStream, process_photo_batch
+from utils.image_prep import prepare_image_sync
+from tests.test_image_prep import _document, _jpeg
+from tests.test_ocr_stream import _download, _fake_recognize
+
+pytestmark = pytest.mark.bench
+
+_ARRIVAL_GAP = 0.1  # апдейты альбома приходят по одному
+_PREPARE = 0.05
+_DEBOUNCE = 0.3
+
+
+@pytest.fixture(autouse=True)
+def _reset_scheduler():
+    ocr_scheduler._limiter = None
+    yield
+    ocr_scheduler._limiter = None
+
+
+@pytest.mark.asyncio
+async def test_benchmark_album_time_to_first_result():
+    """Альбом из 10 фото: debounce → пачка против распознавания по приходу."""
+    photos = [_jpeg(_document(800, 1100)) for _ in range(10)]
+    prep = prepare_image_sync(photos[0])
+
+    async def _prepare(photo, with_qr):
+        await asyncio.sleep(_PREPARE)
+        return prep
+
+    fast_prepare = patch("use_cases.ocr_pipeline.prepare_image", _prepare)
+
+    # Было: скачивание по приходу, OCR — после закрытия альбома
+    batch_done: list[float] = []
+    t0 = time.monotonic()
+    with (
+        fast_prepare,
+        patch(
+            "adapters.gpt5_vision_ocr.recognize_document",
+            _fake_recognize(batch_done, t0),
+        ),
+    ):
+        downloads = []
+        for photo in photos:
+            downloads.append(asyncio.create_task(_download(photo)))
+            await asyncio.sleep(_ARRIVAL_GAP)
+        downloaded = await asyncio.gather(*downloads)
+        await asyncio.sleep(_DEBOUNCE)
+        await process_photo_batch(downloaded, invoices_only=False, use_cache=False)
+    batch_total = time.monotonic() - t0
+
+    # Стало: каждое фото уходит в работу сразу
+    ocr_scheduler._limiter = None
+    stream_done: list[float] = []
+    t0 = time.monotonic()
+    with (
+        fast_prepare,
+        patch(
+            "adapters.gpt5_vision_ocr.recognize_document",
+            _fake_recognize(stream_done, t0),
+        ),
+    ):
+        stream = PhotoStream(invoices_only=False, use_cache=False)
+        for photo in photos:
+            stream.add(_download(photo))
+            await asyncio.sleep(_ARRIVAL_GAP)
+        await asyncio.sleep(_DEBOUNCE)
+        await stream.finish()
+    stream_total = time.monotonic() - t0
+
+    assert min(stream_done) < min(batch_done) / 2
+    print(
+        f"\n[bench] album 10 photos, first result: batch {min(batch_done):.2f}s, "
+        f"stream {min(stream_done):.2f}s; total: batch {batch_total:.2f}s, "
+        f"stream {stream_total:.2f}s; breakdown {stream.latency_breakdown()}"
+    )
@@ -0,0 +1,49 @@
+"""
+Бенчмарк: ФОТ 500 сотрудников × 31 день — прежний построчный расчёт против
+движка (use_cases/payroll_engine.py через compute_fot_sections).
+
+Запуск: pytest tests/bench/test_payroll_engine.py -m bench -v -s
+"""
+
+import time
+
+import pytest
+
+from use_cases.payroll import compute_fot_sections
+from tests.test_payroll_engine import (
+    MONTH_START,
+    TODAY,
+    _legacy_sections,
+    _recorded_month,
+)
+
+pytestmark = pytest.mark.bench
+
+
+def test_benchmark_500_employees_31_days():
+    attendance, history_index, employees, roles, motivation = _recorded_month(500)
+
+    def _best_ms(fn):
+        best = float("inf")
+        for _ in range(3):
+            t0 = time.perf_counter()
+            out = fn()
+            best = min(best, (time.perf_counter() - t0) * 1000)
+        return out, best
+
+    expected, old_ms = _best_ms(
+        lambda: _legacy_sections(
+            attendance, history_index, employees, roles, motivation
+        )
+    )
+    got, new_ms = _best_ms(
+        lambda: compute_fot_sections(
+            attendance, history_index, employees, roles, motivation, MONTH_START, TODAY
+        )
+    )
+
+    assert got == expected
+    print(
+        f"\n[bench] FOT 500 employees × 31 days ({len(attendance)} shifts): "
+        f"old {old_ms:.0f} ms, new {new_ms:.0f} ms ({old_ms / new_ms:.1f}×)"
+    )
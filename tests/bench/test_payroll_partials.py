@@ -0,0 +1,93 @@
+"""
+Бенчмарк: ФОТ за 31-е на 300 сотрудников — прежний запуск (весь месяц из
+iiko) против инкрементального (use_cases/payroll_partials.py: дни из БД +
+последняя неделя из iiko).
+
+Запуск: pytest tests/bench/test_payroll_partials.py -m bench -v -s
+"""
+
+import time
+from datetime import date
+from unittest.mock import patch
+
+import pytest
+
+from tests.test_payroll_engine import MONTH_START
+from tests.test_payroll_partials import (
+    PASTRY_GROUP,
+    _async,
+    _Iiko,
+    _month,
+    _run,
+    _sections,
+    _Store,
+)
+from use_cases import payroll_partials as pp
+from use_cases.payroll import compute_fot_sections
+
+pytestmark = pytest.mark.bench
+
+
+@pytest.fixture
+def env():
+    store = _Store()
+    started = []
+
+    def _patch(attendance):
+        iiko = _Iiko(attendance)
+        patches = [
+            patch.object(pp, "load_days", store.load_days),
+            patch.object(pp, "save_days", store.save_days),
+            patch.object(pp, "fetch_attendance", iiko.attendance_api),
+            patch.object(pp, "fetch_motivation_revenue_olap", iiko.olap_api),
+            patch.object(pp, "fetch_outgoing_invoices", iiko.invoices_api),
+            patch.object(pp, "_load_pastry_group_ids_expanded", _async({PASTRY_GROUP})),
+            patch.object(
+                pp, "_load_product_group_index", _async({"cake": PASTRY_GROUP})
+            ),
+        ]
+        for p in patches:
+            p.start()
+            started.append(p)
+        return iiko
+
+    yield store, _patch
+    for p in started:
+        p.stop()
+
+
+@pytest.mark.asyncio
+async def test_benchmark_daily_run_day_31(env):
+    """Запуск за 31-е: прежний — весь месяц из iiko, новый — 24 дня из БД + неделя."""
+    store, patch_iiko = env
+    attendance, history_index, employees, roles, motivation = _month(300)
+    iiko = patch_iiko(attendance)
+    for day in range(1, 31):
+        await _run(date(2026, 3, day), history_index, employees)
+    today = date(2026, 3, 31)
+
+    iiko.calls.clear()
+    iiko.records_sent = 0
+    t0 = time.perf_counter()
+    full = await iiko.attendance_api("2026-03-01", "2026-03-31")
+    compute_fot_sections(
+        full, history_index, employees, roles, motivation, MONTH_START, today
+    )
+    old_ms = (time.perf_counter() - t0) * 1000
+    old_records = iiko.records_sent
+
+    iiko.calls.clear()
+    iiko.records_sent = 0
+    t0 = time.perf_counter()
+    totals = await _run(today, history_index, employees)
+    _sections(totals, history_index, employees, roles, motivation, today)
+    new_ms = (time.perf_counter() - t0) * 1000
+
+    assert iiko.records_sent * 3 < old_records
+    print(
+        f"\n[bench] ФОТ за 31-е, 300 сотрудников: old 3 iiko reports × 31 days, "
+        f"{old_records} attendance rows, compute {old_ms:.0f} ms; "
+        f"new 3 reports × {pp.RECHECK_DAYS} days, {iiko.records_sent} rows "
+        f"(+{31 - pp.RECHECK_DAYS} days from payroll_day_partial), "
+        f"fold+compute {new_ms:.0f} ms"
+    )
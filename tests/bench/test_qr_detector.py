@@ -0,0 +1,74 @@
+"""
+Бенчмарк: детекция QR на синтетическом корпусе — прежняя схема (детектор
+на вызов, полный кадр ×1 / ×2 / ×0.5) против find_qr (utils/qr_detector.py).
+
+Запуск: pytest tests/bench/test_qr_detector.py -m bench -v -s
+"""
+
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from utils import qr_detector
+from utils.qr_detector import find_qr, get_detectors
+from tests.test_qr_detector import _corpus
+
+pytestmark = pytest.mark.bench
+
+
+def _legacy_find(gray: np.ndarray) -> bool:
+    """Прежняя схема: новый детектор на вызов, полный кадр ×1 / ×2 / ×0.5."""
+    img = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+    h, w = img.shape[:2]
+    detector = cv2.QRCodeDetector()
+    for scale in (1.0, 2.0, 0.5):
+        scaled = (
+            img if scale == 1.0 else cv2.resize(img, (int(w * scale), int(h * scale)))
+        )
+        data, _, _ = detector.detectAndDecode(scaled)
+        if data and len(data) > 10:
+            return True
+    return qr_detector._pyzbar_has_qr(gray)
+
+
+def test_benchmark_corpus_recall_and_timing():
+    """Recall / ложные срабатывания / время: прежняя схема против find_qr."""
+    corpus = _corpus()
+    get_detectors()  # как после warmup воркера
+
+    rows = []
+    totals = {"legacy": 0.0, "new": 0.0}
+    hits = {"legacy": 0, "new": 0}
+    false_pos = {"legacy": 0, "new": 0}
+    for name, gray, has_qr in corpus:
+        t0 = time.perf_counter()
+        legacy = _legacy_find(gray)
+        t1 = time.perf_counter()
+        stage = find_qr(gray)
+        t2 = time.perf_counter()
+        totals["legacy"] += t1 - t0
+        totals["new"] += t2 - t1
+        for key, found in (("legacy", legacy), ("new", stage is not None)):
+            if has_qr and found:
+                hits[key] += 1
+            if not has_qr and found:
+                false_pos[key] += 1
+        rows.append(
+            f"  {name:22s} legacy {legacy!s:5} {(t1 - t0) * 1000:7.0f} ms | "
+            f"new {stage or '-':22s} {(t2 - t1) * 1000:6.0f} ms"
+        )
+
+    positives = sum(1 for _, _, has_qr in corpus if has_qr)
+    print(
+        f"\n[bench] qr corpus {len(corpus)} images ({positives} with QR)\n"
+        + "\n".join(rows)
+        + f"\n  recall: legacy {hits['legacy']}/{positives}, new {hits['new']}/{positives}"
+        f"; false positives: legacy {false_pos['legacy']}, new {false_pos['new']}"
+        f"\n  total: legacy {totals['legacy'] * 1000:.0f} ms, "
+        f"new {totals['new'] * 1000:.0f} ms"
+    )
+    assert false_pos["new"] == 0
+    assert hits["new"] >= hits["legacy"]
+    assert totals["new"] < totals["legacy"]
@@ -0,0 +1,41 @@
+"""
+Бенчмарк: номенклатура 3000 × 42 — полная перезапись листа против
+дифф-записи (adapters/sheet_diff.py): ячейки, диапазоны, время диффа.
+
+Запуск: pytest tests/bench/test_sheet_diff.py -m bench -v -s
+"""
+
+import time
+
+import pytest
+
+from adapters import sheet_diff
+from tests.test_sheet_diff import N_DEPTS, N_PRODUCTS, _min_stock_grid
+
+pytestmark = pytest.mark.bench
+
+
+def test_benchmark_full_rewrite_vs_diff():
+    """Номенклатура 3000×42: одна новая позиция + 5 правок min/max."""
+    products = [f"{p:04d}" for p in range(N_PRODUCTS)]
+    current = _min_stock_grid(products)
+    desired = [list(r) for r in current]
+    desired.insert(1500, ["Товар new", "prod-new"] + [""] * (N_DEPTS * 2))
+    for i in range(5):
+        desired[100 + i * 400][2 + i] = str(i + 1)
+    key = lambda row: row[1]  # noqa: E731
+
+    t0 = time.perf_counter()
+    diff = sheet_diff.diff_grid(
+        current, desired, sheet_id=7, key=key, header_rows=3, row_count=4000
+    )
+    diff_ms = (time.perf_counter() - t0) * 1000
+
+    old_cells = len(desired) * len(desired[0])
+    assert diff.cells == 2 + 5 and diff.rows_inserted == 1
+    print(
+        f"\n[bench] sheet diff {len(desired)}×{len(desired[0])}: old clear+update "
+        f"{old_cells} cells + ~{4 + N_DEPTS * 2} format calls; new {diff.cells} cells "
+        f"in {len(diff.values)} ranges + 1 insertDimension, 2 API calls, "
+        f"diff {diff_ms:.0f} ms"
+    )
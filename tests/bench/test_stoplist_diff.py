@@ -0,0 +1,33 @@
+"""
+Бенчмарк: set-based запись диффа стоп-листа (use_cases/stoplist.sync_and_diff)
+на 500 позициях — время и число SQL-записей.
+
+Запуск: pytest tests/bench/test_stoplist_diff.py -m bench -v -s
+"""
+
+import time
+
+import pytest
+
+from tests.test_stoplist_diff import _item, _old_row, _run
+
+pytestmark = pytest.mark.bench
+
+
+@pytest.mark.asyncio
+async def test_benchmark_500_items():
+    """500 позиций: 50 вышли, 50 вошли, 50 изменили баланс — 4 SQL-записи."""
+    old = [_old_row(i, f"p{i}", balance=1.0) for i in range(500)]
+    new = [_item(f"p{i}", balance=2.0 if i < 100 else 1.0) for i in range(50, 500)]
+    new += [_item(f"n{i}") for i in range(50)]
+
+    t0 = time.perf_counter()
+    session, (added, removed, changed, existing) = await _run(old, new)
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+
+    assert (len(added), len(removed), len(changed), len(existing)) == (50, 50, 50, 400)
+    assert len(session.dml) == 4  # было: 1 DELETE + 500 INSERT + история поштучно
+    print(f"\n[bench] stoplist diff 500 items: {elapsed_ms:.1f} ms, 4 statements")
+
+    noop_session, _ = await _run(old, [_item(f"p{i}", 1.0) for i in range(500)])
+    assert noop_session.dml == []
@@ -2,8 +2,9 @@
 conftest.py — заглушки env-переменных для тестовой среды.
 
 Устанавливает все обязательные переменные окружения перед импортом
-любого модуля проекта, чтобы config.py не падал с RuntimeError.
-Должен находиться в папке tests/ и загружается pytest первым.
+любого модуля проекта, чтобы config.py не падал с RuntimeError:
+pytest — в pytest_configure (до сбора тестов), CLI tests.bench / tests.load —
+сами вызывают set_dummy_env() в main(). Импорт модуля env не трогает.
 """
 
 import os
@@ -23,7 +24,15 @@ _DUMMY_VARS = {
     "INVOICE_PRICE_SHEET_ID": "test_sheet_id",
     "DAY_REPORT_SHEET_ID": "test_sheet_id",
     "IIKO_CLOUD_WEBHOOK_SECRET": "test_webhook_secret",
+    "CPU_POOL_WORKERS": "0",  # общий пул процессов → to_thread; пул — в test_cpu_pool
 }
 
-for _key, _val in _DUMMY_VARS.items():
-    os.environ.setdefault(_key, _val)
+
+def set_dummy_env() -> None:
+    """Заглушки в os.environ (не перезаписывая заданные). Для CLI tests.bench / tests.load."""
+    for key, value in _DUMMY_VARS.items():
+        os.environ.setdefault(key, value)
+
+
+def pytest_configure(config) -> None:
+    set_dummy_env()
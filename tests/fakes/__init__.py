@@ -0,0 +1,202 @@
+"""
+Локальный стенд внешних API для офлайн-тестов производительности.
+
+Фейковые aiohttp-серверы отвечают в форматах, которые разбирают настоящие
+адаптеры (adapters/iiko_api.py, fintablo_api.py, iiko_cloud_api.py,
+google_sheets.py, gpt5_vision_ocr.py), на синтетических данных заданного масштаба (Dataset),
+и умеют подмешивать задержку, 429 и обрывы соединения (Faults).
+
+В тесте:
+
+    async with FakeStack(scale=5, faults=Faults(latency_ms=30)) as stack:
+        async with stack.point_adapters():
+            await iiko_api.fetch_attendance("2026-03-01", "2026-03-31")
+        print(stack.iiko.hits)
+
+Отдельным процессом (адреса — в переменные окружения бота):
+
+    python -m tests.fakes --scale 5 --latency-ms 30 --rate-429 0.05
+"""
+
+from __future__ import annotations
+
+import contextlib
+from collections.abc import AsyncIterator
+
+from tests.fakes._server import Faults, FakeServer
+from tests.fakes.data import Dataset
+from tests.fakes.fintablo import FakeFinTablo
+from tests.fakes.iiko import FakeIiko
+from tests.fakes.iiko_cloud import FakeIikoCloud
+from tests.fakes.sheets import FakeSheets
+from tests.fakes.vision import FakeVision
+
+__all__ = [
+    "Dataset",
+    "Faults",
+    "FakeFinTablo",
+    "FakeIiko",
+    "FakeIikoCloud",
+    "FakeServer",
+    "FakeSheets",
+    "FakeStack",
+    "FakeVision",
+    "point_adapters",
+]
+
+CLOUD_TOKEN = "fake-iiko-cloud-token"
+OPENAI_KEY = "fake-openai-key"
+
+
+class FakeStack:
+    """
+    Все пять фейков на одном Dataset.
+
+    faults — общие для всех серверов; точечно — stack.iiko.faults = Faults(...)
+    (менять можно и на ходу, между запросами).
+    """
+
+    def __init__(
+        self,
+        scale: float = 1.0,
+        seed: int = 2026,
+        faults: Faults | None = None,
+        *,
+        host: str = "127.0.0.1",
+        ports: tuple[int, int, int, int, int] = (0, 0, 0, 0, 0),
+    ):
+        self.dataset = Dataset(scale, seed)
+        self.iiko = FakeIiko(self.dataset, faults, host=host, port=ports[0])
+        self.fintablo = FakeFinTablo(self.dataset, faults, host=host, port=ports[1])
+        self.iiko_cloud = FakeIikoCloud(self.dataset, faults, host=host, port=ports[2])
+        self.sheets = FakeSheets(faults, host=host, port=ports[3])
+        self.vision = FakeVision(self.dataset, faults, host=host, port=ports[4])
+
+    @property
+    def servers(self) -> tuple[FakeServer, ...]:
+        return (self.iiko, self.fintablo, self.iiko_cloud, self.sheets, self.vision)
+
+    async def start(self) -> None:
+        for server in self.servers:
+            await server.start()
+
+    async def stop(self) -> None:
+        for server in self.servers:
+            await server.stop()
+
+    async def __aenter__(self) -> FakeStack:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+    def reset_stats(self) -> None:
+        for server in self.servers:
+            server.reset_stats()
+
+    def env(self) -> dict[str, str]:
+        """Переменные окружения, направляющие бота на стенд."""
+        return {
+            "IIKO_BASE_URL": self.iiko.url,
+            "FINTABLO_BASE_URL": self.fintablo.url,
+            "IIKO_CLOUD_BASE_URL": self.iiko_cloud.url,
+            "GOOGLE_SHEETS_API_URL": self.sheets.url,
+            # Читает сам openai SDK; ключ — любой непустой
+            "OPENAI_BASE_URL": f"{self.vision.url}/v1",
+        }
+
+    def seed_sheets(self) -> None:
+        """
+        Заполнить таблицу зарплат: «История ставок» — сотрудниками Dataset,
+        «Маппинг FinTablo» — точки → направления (D-E) и счета ОПИУ →
+        PnL-категории FinTablo (F-G), как их размечают вручную.
+        """
+        from adapters.google_sheets import (
+            _FINTAB_MAPPING_TAB,
+            _HISTORY_HEADERS,
+            _HISTORY_TAB,
+        )
+        from config import SALARY_SHEET_ID
+        from tests.fakes.data import OPIU_ACCOUNTS
+
+        self.sheets.seed(
+            SALARY_SHEET_ID,
+            _HISTORY_TAB,
+            [_HISTORY_HEADERS, *self.dataset.salary_history_rows()],
+        )
+        depts = [d["name"] for d in self.dataset.departments]
+        categories = self.dataset.fintablo["pnl-category"]
+        header = ["", "", "", "Подразделение", "Направление", "Счёт iiko", "Статья"]
+        mapping: list[list[str]] = [["Маппинг FinTablo"], [], header]
+        for i in range(max(len(depts), len(OPIU_ACCOUNTS))):
+            row = ["", "", "", "", "", "", ""]
+            if i < len(depts):
+                row[3] = row[4] = depts[i]  # направления FinTablo = точки
+            if i < len(OPIU_ACCOUNTS):
+                cat = categories[i % len(categories)]
+                row[5] = OPIU_ACCOUNTS[i]
+                row[6] = f"{cat['name']} ({cat['id']})"
+            mapping.append(row)
+        self.sheets.seed(SALARY_SHEET_ID, _FINTAB_MAPPING_TAB, mapping)
+
+    @contextlib.asynccontextmanager
+    async def point_adapters(self) -> AsyncIterator[FakeStack]:
+        """Перенаправить адаптеры текущего процесса на этот стенд."""
+        async with point_adapters(self.env()):
+            yield self
+
+
+@contextlib.asynccontextmanager
+async def point_adapters(env: dict[str, str]) -> AsyncIterator[None]:
+    """
+    В текущем процессе перенаправить адаптеры на стенд по его env()
+    (стенд может работать и отдельным процессом): базовые URL, сброс
+    persistent-клиентов и кешей токенов. Токен iikoCloud берётся не из БД
+    (iiko_access_tokens), а подкладывается в кеш адаптера; OCR получает
+    свой клиент OpenAI на фейковую vision-модель.
+    """
+    from unittest.mock import patch
+
+    from openai import AsyncOpenAI
+
+    import iiko_auth
+    from adapters import (
+        fintablo_api,
+        google_sheets,
+        gpt5_vision_ocr,
+        iiko_api,
+        iiko_cloud_api,
+    )
+
+    vision = AsyncOpenAI(
+        api_key=OPENAI_KEY, base_url=env["OPENAI_BASE_URL"], max_retries=0
+    )
+    patches = [
+        patch.object(iiko_auth, "IIKO_BASE_URL", env["IIKO_BASE_URL"]),
+        patch.object(iiko_api, "_client", None),
+        patch.object(fintablo_api, "FINTABLO_BASE_URL", env["FINTABLO_BASE_URL"]),
+        patch.object(fintablo_api, "_client", None),
+        patch.object(iiko_cloud_api, "IIKO_CLOUD_BASE_URL", env["IIKO_CLOUD_BASE_URL"]),
+        patch.object(iiko_cloud_api, "_client", None),
+        patch.object(iiko_cloud_api, "_token_cache", (CLOUD_TOKEN, float("inf"))),
+        patch.object(
+            google_sheets, "GOOGLE_SHEETS_API_URL", env["GOOGLE_SHEETS_API_URL"]
+        ),
+        patch.object(google_sheets, "_client", None),
+        patch.dict(google_sheets._snapshots, clear=True),
+        patch.object(gpt5_vision_ocr, "_client", vision),
+    ]
+    iiko_auth.invalidate_token_cache()
+    with contextlib.ExitStack() as stack:
+        for p in patches:
+            stack.enter_context(p)
+        try:
+            yield
+        finally:
+            # Клиенты, открытые на стенд, закрываем до возврата боевых
+            await iiko_api.close_client()
+            await fintablo_api.close_client()
+            await iiko_cloud_api.close_client()
+            await vision.close()
+            iiko_auth.invalidate_token_cache()
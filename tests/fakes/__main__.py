@@ -0,0 +1,93 @@
+"""
+Запуск стенда отдельным процессом:
+
+    python -m tests.fakes --scale 5 --latency-ms 30 --rate-429 0.05
+
+Печатает переменные окружения для бота и работает до Ctrl+C; при остановке —
+сводка запросов по серверам (на ходу — GET <url>/__fake/stats). Токен iikoCloud бот по-прежнему читает из
+iiko_access_tokens — фейк принимает любой, достаточно одной строки в таблице.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+
+from tests.fakes import Faults, FakeStack
+
+
+def _parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="python -m tests.fakes", description=__doc__)
+    p.add_argument("--scale", type=float, default=1.0, help="масштаб данных")
+    p.add_argument("--seed", type=int, default=2026)
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument(
+        "--base-port",
+        type=int,
+        default=0,
+        help="порты iiko/FinTablo/iikoCloud/Sheets/vision = base..base+4 (0 — свободные)",
+    )
+    p.add_argument("--latency-ms", type=float, default=0.0)
+    p.add_argument("--jitter-ms", type=float, default=0.0)
+    p.add_argument("--rate-429", type=float, default=0.0, help="доля ответов 429")
+    p.add_argument("--disconnect", type=float, default=0.0, help="доля обрывов")
+    p.add_argument("--retry-after", type=int, default=1)
+    p.add_argument(
+        "--vision-latency-ms",
+        type=float,
+        default=None,
+        help="задержка vision-модели OpenAI (отдельно от общей --latency-ms)",
+    )
+    p.add_argument(
+        "--seed-sheets",
+        action="store_true",
+        help="заполнить «Историю ставок» и «Маппинг FinTablo» (см. FakeStack)",
+    )
+    return p.parse_args()
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    faults = Faults(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        rate_429=args.rate_429,
+        rate_disconnect=args.disconnect,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    base = args.base_port
+    ports = tuple(base + i if base else 0 for i in range(5))
+    stack = FakeStack(args.scale, args.seed, faults, host=args.host, ports=ports)
+    async with stack:
+        if args.seed_sheets:
+            stack.seed_sheets()
+        if args.vision_latency_ms is not None:
+            stack.vision.faults = Faults(latency_ms=args.vision_latency_ms)
+        for key, value in stack.env().items():
+            print(f"export {key}={value}")
+        print(
+            f"# scale={args.scale}: {len(stack.dataset.products)} товаров, "
+            f"{len(stack.dataset.employees)} сотрудников, "
+            f"{len(stack.dataset.departments)} точек. Ctrl+C — остановить.",
+            flush=True,
+        )
+        try:
+            await asyncio.Event().wait()
+        finally:
+            for server in stack.servers:
+                total = sum(server.hits.values())
+                print(
+                    f"# {server.name}: {total} запросов, сбоев {dict(server.injected)}"
+                )
+                for key, n in server.hits.most_common(10):
+                    print(f"#   {n:6d}  {key}")
+
+
+def main() -> None:
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(_serve(_parse_args()))
+
+
+if __name__ == "__main__":
+    main()
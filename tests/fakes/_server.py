@@ -0,0 +1,184 @@
+"""
+Общая часть фейковых серверов: aiohttp-приложение на 127.0.0.1:<свободный порт>,
+учёт запросов и внедрение сбоев (задержка, 429, обрыв соединения).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+from collections import Counter
+from dataclasses import dataclass
+
+from aiohttp import web
+
+
+@dataclass(slots=True)
+class Faults:
+    """
+    Сбои, которые сервер подмешивает в ответы.
+
+    latency_ms ± jitter_ms — задержка перед каждым ответом;
+    rate_429              — доля ответов 429 Too Many Requests (с Retry-After);
+    rate_disconnect       — доля запросов, на которых соединение рвётся без ответа
+                            (у httpx — RemoteProtocolError);
+    paths                 — применять только к путям с этими префиксами
+                            (пусто — ко всем).
+    """
+
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    rate_429: float = 0.0
+    rate_disconnect: float = 0.0
+    retry_after: int = 1
+    paths: tuple[str, ...] = ()
+    seed: int | None = None
+
+
+class FakeServer:
+    """
+    Базовый фейковый сервер. Наследник объявляет маршруты в routes().
+
+    hits     — «METHOD /шаблон/пути» → число запросов (включая сбойные);
+    injected — «429» / «disconnect» → сколько сбоев подмешано;
+    bytes_out — объём тел ответов.
+
+    Служебные GET /__fake/stats и POST /__fake/reset отдают и сбрасывают
+    эти счётчики, когда стенд запущен отдельным процессом; сами в hits
+    не попадают и сбоям не подвержены.
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        faults: Faults | None = None,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self._rnd = random.Random()
+        self.faults = faults or Faults()
+        self.host = host
+        self.port = port
+        self.url = ""
+        self.hits: Counter[str] = Counter()
+        self.injected: Counter[str] = Counter()
+        self.bytes_out = 0
+        self._runner: web.AppRunner | None = None
+        self.app = web.Application(
+            middlewares=[self._middleware], client_max_size=64 * 1024**2
+        )
+        self.app.router.add_get("/__fake/stats", self._stats)
+        self.app.router.add_post("/__fake/reset", self._reset)
+        self.routes(self.app.router)
+
+    @property
+    def faults(self) -> Faults:
+        return self._faults
+
+    @faults.setter
+    def faults(self, value: Faults) -> None:
+        # Новые сбои с seed — воспроизводимая последовательность с начала
+        self._faults = value
+        if value.seed is not None:
+            self._rnd.seed(value.seed)
+
+    def routes(self, router: web.UrlDispatcher) -> None:
+        raise NotImplementedError
+
+    def route_key(self, request: web.Request) -> str:
+        """Ключ для hits: шаблон маршрута (наследник может уточнить)."""
+        resource = request.match_info.route.resource
+        return resource.canonical if resource is not None else request.path
+
+    # ── Жизненный цикл ──
+
+    async def start(self) -> str:
+        """Поднять сервер; вернуть базовый URL (http://127.0.0.1:<порт>)."""
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> FakeServer:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+    def reset_stats(self) -> None:
+        self.hits.clear()
+        self.injected.clear()
+        self.bytes_out = 0
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "hits": dict(self.hits),
+            "injected": dict(self.injected),
+            "bytes_out": self.bytes_out,
+        }
+
+    async def _stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats())
+
+    async def _reset(self, request: web.Request) -> web.Response:
+        self.reset_stats()
+        return web.json_response({"ok": True})
+
+    # ── Сбои и учёт ──
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler) -> web.StreamResponse:
+        if request.path.startswith("/__fake/"):
+            return await handler(request)
+        self.hits[f"{request.method} {self.route_key(request)}"] += 1
+
+        f = self.faults
+        if not f.paths or request.path.startswith(f.paths):
+            if f.latency_ms or f.jitter_ms:
+                delay = f.latency_ms + self._rnd.uniform(-f.jitter_ms, f.jitter_ms)
+                await asyncio.sleep(max(0.0, delay) / 1000)
+            roll = self._rnd.random()
+            if roll < f.rate_disconnect:
+                self.injected["disconnect"] += 1
+                request.transport.close()
+                return web.Response()  # уже некуда писать — клиент видит обрыв
+            if roll < f.rate_disconnect + f.rate_429:
+                self.injected["429"] += 1
+                # Тело в формате Google API — его разбирает gspread.APIError
+                return web.json_response(
+                    {
+                        "error": {
+                            "code": 429,
+                            "message": "Too Many Requests",
+                            "status": "RESOURCE_EXHAUSTED",
+                        }
+                    },
+                    status=429,
+                    headers={"Retry-After": str(f.retry_after)},
+                )
+
+        resp = await handler(request)
+        if isinstance(resp, web.Response) and resp.body is not None:
+            self.bytes_out += len(resp.body)
+        return resp
+
+
+def xml_response(body: str) -> web.Response:
+    """Ответ iiko REST с XML-телом."""
+    return web.Response(
+        text='<?xml version="1.0" encoding="UTF-8"?>\n' + body,
+        content_type="application/xml",
+        charset="utf-8",
+    )
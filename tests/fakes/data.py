@@ -0,0 +1,656 @@
+"""
+Синтетические данные для фейковых серверов.
+
+Dataset(scale, seed) детерминирован: одинаковые (scale, seed) → байт-в-байт
+одинаковые ответы. Справочники (подразделения, склады, номенклатура,
+сотрудники, техкарты, списки FinTablo) строятся один раз в конструкторе;
+дневные ряды (явки, продажи, накладные, проводки ОПИУ) — лениво, по дню,
+от своего Random("seed:вид:день") — поэтому запрос за любой период
+не требует генерировать всё заранее, а повторный — отдаётся из кеша.
+
+Базовые размеры (scale=1) примерно соответствуют боевой базе: 3 точки,
+2500 позиций номенклатуры, 150 сотрудников.
+"""
+
+from __future__ import annotations
+
+import math
+import random
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any
+
+# Базовые размеры при scale=1
+BASE_DEPARTMENTS = 3
+STORES_PER_DEPARTMENT = 3
+BASE_PRODUCTS = 2500
+BASE_PRODUCT_GROUPS = 150
+BASE_SUPPLIERS = 200
+BASE_EMPLOYEES = 150
+BASE_CHARTS = 600
+BASE_ENTITIES = 40  # на каждый rootType
+BASE_PARTNERS = 300
+BASE_STORE_GOODS = 600  # позиций с остатком на одном складе
+
+ROLE_NAMES = (
+    "Повар",
+    "Пиццамейкер",
+    "Кассир",
+    "Бармен",
+    "Официант",
+    "Кондитер",
+    "Курьер",
+    "Мойщик",
+    "Уборщик",
+    "Администратор",
+    "Управляющий",
+    "Су-шеф",
+    "Технолог",
+    "Кладовщик",
+    "Бухгалтер",
+)
+SALARY_TYPES = ("посменная", "почасовая", "ежемесячная")
+PAY_TYPES = ("Наличные", "Банковская карта", "СБП")
+COOKING_PLACES = ("Кухня", "Пицца", "Бар", "Кондитерская")
+OPIU_ACCOUNTS = (
+    "Выручка от продаж",
+    "Себестоимость продаж",
+    "Списание",
+    "Скидки",
+    "Инвентаризация",
+    "Порча",
+    "Питание персонала",
+    "Хозяйственные расходы",
+    "Упаковка",
+    "Доставка",
+    "Аренда",
+    "Коммунальные услуги",
+)
+TRANSACTION_TYPES = ("SESSION_WRITEOFF", "WRITEOFF", "INVOICE", "INVENTORY_CORRECTION")
+STORE_KINDS = ("Кухня", "Бар", "Хоз")
+UNITS = ("кг", "л", "шт", "порц")
+
+
+def _uid(rnd: random.Random) -> str:
+    return str(uuid.UUID(int=rnd.getrandbits(128), version=4))
+
+
+def _n(base: int, scale: float) -> int:
+    return max(1, math.ceil(base * scale))
+
+
+def _money(x: float) -> float:
+    return round(x, 2)
+
+
+class Dataset:
+    """Детерминированный набор данных для всех фейковых серверов."""
+
+    def __init__(self, scale: float = 1.0, seed: int = 2026):
+        self.scale = scale
+        self.seed = seed
+        rnd = random.Random(f"{seed}:catalog")
+        self._day_cache: dict[tuple[str, date], Any] = {}
+
+        # ── Подразделения и склады (corporation/*) ──
+        self.departments: list[dict[str, Any]] = []
+        self.stores: list[dict[str, Any]] = []
+        self.store_department: dict[str, str] = {}
+        for i in range(_n(BASE_DEPARTMENTS, scale)):
+            dept = {
+                "id": _uid(rnd),
+                "parentId": None,
+                "code": str(100 + i),
+                "name": f"Пиццерия №{i + 1}",
+                "type": "DEPARTMENT",
+            }
+            self.departments.append(dept)
+            for kind in STORE_KINDS[:STORES_PER_DEPARTMENT]:
+                store = {
+                    "id": _uid(rnd),
+                    "parentId": dept["id"],
+                    "code": f"{dept['code']}-{len(self.stores) + 1}",
+                    "name": f"{kind} ({dept['name']})",
+                    "type": "STORE",
+                }
+                self.stores.append(store)
+                self.store_department[store["id"]] = dept["id"]
+        self.corporate_groups = [
+            {
+                "id": _uid(rnd),
+                "name": f"Группа {d['name']}",
+                "departmentId": d["id"],
+            }
+            for d in self.departments
+        ]
+
+        # ── Номенклатура ──
+        self.product_groups: list[dict[str, Any]] = []
+        for i in range(_n(BASE_PRODUCT_GROUPS, scale)):
+            parent = (
+                rnd.choice(self.product_groups)["id"]
+                if self.product_groups and rnd.random() < 0.6
+                else None
+            )
+            self.product_groups.append(
+                {
+                    "id": _uid(rnd),
+                    "parent": parent,
+                    "name": f"Группа {i + 1}",
+                    "code": f"G{i + 1:04d}",
+                    "num": f"G{i + 1:04d}",
+                    "description": None,
+                    "deleted": False,
+                }
+            )
+        self.products: list[dict[str, Any]] = []
+        for i in range(_n(BASE_PRODUCTS, scale)):
+            ptype = rnd.choices(("GOODS", "DISH", "PREPARED"), (6, 3, 1))[0]
+            self.products.append(
+                {
+                    "id": _uid(rnd),
+                    "parent": rnd.choice(self.product_groups)["id"],
+                    "name": f"{'Товар' if ptype == 'GOODS' else 'Блюдо'} {i + 1}",
+                    "code": str(10000 + i),
+                    "num": f"{'T' if ptype == 'GOODS' else 'D'}{i + 1:05d}",
+                    "description": None,
+                    "type": ptype,
+                    "mainUnit": _uid(random.Random(f"{seed}:unit:{i % 4}")),
+                    "category": None,
+                    "accountingCategory": None,
+                    "taxCategory": None,
+                    "defaultSalePrice": _money(rnd.uniform(50, 900)),
+                    "unitWeight": _money(rnd.uniform(0.05, 2)),
+                    "unitCapacity": 0,
+                    "deleted": rnd.random() < 0.02,
+                }
+            )
+        self.product_unit = {p["id"]: UNITS[i % 4] for i, p in enumerate(self.products)}
+        self.product_price = {
+            p["id"]: p["defaultSalePrice"] for p in self.products if not p["deleted"]
+        }
+        self.goods = [
+            p for p in self.products if p["type"] == "GOODS" and not p["deleted"]
+        ]
+        self.dishes = [
+            p for p in self.products if p["type"] != "GOODS" and not p["deleted"]
+        ]
+        self._product_by_id = {p["id"]: p for p in self.products}
+        self._group_by_id = {g["id"]: g for g in self.product_groups}
+
+        # ── Контрагенты и персонал ──
+        self.suppliers = [
+            {
+                "id": _uid(rnd),
+                "code": str(5000 + i),
+                "name": f"ООО «Поставщик {i + 1}»",
+                "supplier": "true",
+                "employee": "false",
+                "client": "false",
+                "deleted": "false",
+            }
+            for i in range(_n(BASE_SUPPLIERS, scale))
+        ]
+        self.roles = [
+            {
+                "id": _uid(rnd),
+                "code": f"R{i + 1:02d}",
+                "name": name,
+                "paymentPerHour": str(_money(rnd.uniform(200, 450))),
+                "steadySalary": "0",
+                "scheduleType": "STATIC",
+                "deleted": "false",
+            }
+            for i, name in enumerate(ROLE_NAMES)
+        ]
+        self.employees: list[dict[str, Any]] = []
+        self.employee_department: dict[str, str] = {}
+        for i in range(_n(BASE_EMPLOYEES, scale)):
+            last, first, middle = f"Фамилия{i + 1}", f"Имя{i + 1}", "Отчество"
+            emp = {
+                "id": _uid(rnd),
+                "code": str(1000 + i),
+                "name": f"{last} {first}",
+                "firstName": first,
+                "lastName": last,
+                "middleName": middle,
+                "mainRoleId": self.roles[i % len(self.roles)]["id"],
+                "employee": "true",
+                "supplier": "false",
+                "client": "false",
+                "deleted": "true" if rnd.random() < 0.05 else "false",
+            }
+            self.employees.append(emp)
+            self.employee_department[emp["id"]] = self.departments[
+                i % len(self.departments)
+            ]["id"]
+        self._active_employees = [e for e in self.employees if e["deleted"] == "false"]
+
+        # ── Техкарты ──
+        self.assembly_charts: list[dict[str, Any]] = []
+        self.prepared_charts: list[dict[str, Any]] = []
+        goods_ids = [g["id"] for g in self.goods] or [self.products[0]["id"]]
+        for i, dish in enumerate(self.dishes[: _n(BASE_CHARTS, scale)]):
+            chart = {
+                "id": _uid(rnd),
+                "assembledProductId": dish["id"],
+                "dateFrom": "2024-01-01",
+                "dateTo": None,
+                "assembledAmount": 1,
+                "items": [
+                    {
+                        "id": _uid(rnd),
+                        "sortWeight": n,
+                        "productId": pid,
+                        "amountIn": round(rnd.uniform(0.01, 0.5), 3),
+                        "amountMiddle": 0,
+                        "amountOut": round(rnd.uniform(0.01, 0.5), 3),
+                    }
+                    for n, pid in enumerate(
+                        rnd.sample(goods_ids, min(8, len(goods_ids)))
+                    )
+                ],
+            }
+            (self.prepared_charts if i % 5 == 0 else self.assembly_charts).append(chart)
+
+        # ── iikoCloud ──
+        self.organization_id = _uid(rnd)
+        self.terminal_groups = [
+            {
+                "id": _uid(rnd),
+                "organizationId": self.organization_id,
+                "name": f"Касса {d['name']}",
+                "address": "",
+                "timeZone": "Europe/Kaliningrad",
+            }
+            for d in self.departments
+        ]
+
+        # ── FinTablo ──
+        self.fintablo: dict[str, list[dict[str, Any]]] = self._build_fintablo(rnd)
+        self.pnl_items: list[dict[str, Any]] = []
+
+    # ═════════════════════════════════════════════════
+    # Справочники по запросу
+    # ═════════════════════════════════════════════════
+
+    def entities(self, root_type: str) -> list[dict[str, Any]]:
+        """entities/list?rootType=… — свой детерминированный список на тип."""
+        key = ("entities", root_type)
+        if key not in self._day_cache:
+            rnd = random.Random(f"{self.seed}:entities:{root_type}")
+            self._day_cache[key] = [
+                {
+                    "id": _uid(rnd),
+                    "rootType": root_type,
+                    "name": f"{root_type} {i + 1}",
+                    "code": str(i + 1),
+                    "deleted": rnd.random() < 0.05,
+                }
+                for i in range(_n(BASE_ENTITIES, self.scale))
+            ]
+        return self._day_cache[key]
+
+    def _build_fintablo(self, rnd: random.Random) -> dict[str, list[dict[str, Any]]]:
+        ids = iter(range(1, 10**9))
+        directions = [
+            {
+                "id": next(ids),
+                "name": d["name"],
+                "parentId": None,
+                "description": None,
+                "archived": 0,
+            }
+            for d in self.departments
+        ]
+        categories = [
+            {
+                "id": next(ids),
+                "name": f"Статья {i + 1}",
+                "parentId": None,
+                "group": rnd.choice(("income", "outcome", "transfer")),
+                "type": rnd.choice(("operating", "financial", "investment")),
+                "pnlType": rnd.choice(("income", "direct", "indirect", None)),
+                "description": None,
+                "isBuiltIn": 0,
+            }
+            for i in range(120)
+        ]
+        moneybag_groups = [
+            {"id": next(ids), "name": f"Группа счетов {i + 1}", "isBuiltIn": 0}
+            for i in range(4)
+        ]
+        moneybags = [
+            {
+                "id": next(ids),
+                "name": f"Счёт {i + 1}",
+                "type": rnd.choice(("bank", "cash", "card")),
+                "number": str(40702810000000000000 + i),
+                "currency": "RUB",
+                "balance": _money(rnd.uniform(0, 1e6)),
+                "surplus": 0,
+                "surplusTimestamp": None,
+                "groupId": rnd.choice(moneybag_groups)["id"],
+                "archived": 0,
+                "hideInTotal": 0,
+                "withoutNds": 1,
+            }
+            for i in range(20)
+        ]
+        partners = [
+            {
+                "id": next(ids),
+                "name": s["name"],
+                "inn": str(3900000000 + i),
+                "groupId": None,
+                "comment": None,
+            }
+            for i, s in enumerate(self.suppliers[: _n(BASE_PARTNERS, self.scale)])
+        ]
+        goods = [
+            {
+                "id": next(ids),
+                "name": g["name"],
+                "cost": g["defaultSalePrice"],
+                "comment": None,
+                "quantity": 0,
+                "startQuantity": 0,
+                "avgCost": g["defaultSalePrice"],
+            }
+            for g in self.goods[:200]
+        ]
+        pnl_categories = [
+            {
+                "id": next(ids),
+                "name": f"Категория ОПИУ {i + 1}",
+                "type": rnd.choice(("income", "outcome")),
+                "pnlType": rnd.choice(("income", "direct", "indirect")),
+                "categoryId": c["id"],
+                "comment": None,
+            }
+            for i, c in enumerate(categories[:60])
+        ]
+        employees = [
+            {
+                "id": next(ids),
+                "name": e["name"],
+                "date": "01.2024",
+                "currency": "RUB",
+                "regularfix": _money(rnd.uniform(20000, 80000)),
+                "regularfee": 0,
+                "regulartax": 0,
+                "inn": None,
+                "hired": "2024-01-01",
+                "fired": None,
+                "comment": None,
+                "directionId": directions[i % len(directions)]["id"],
+            }
+            for i, e in enumerate(self._active_employees)
+        ]
+        statuses = [
+            {"id": next(ids), "name": n} for n in ("Новое", "В работе", "Исполнено")
+        ]
+        return {
+            "category": categories,
+            "moneybag": moneybags,
+            "partner": partners,
+            "direction": directions,
+            "moneybag-group": moneybag_groups,
+            "goods": goods,
+            "obtaining": [],
+            "job": [],
+            "deal": [],
+            "obligation-status": statuses,
+            "obligation": [],
+            "pnl-category": pnl_categories,
+            "employees": employees,
+            "salary": [],
+        }
+
+    def stop_list(self, terminal_group_id: str) -> list[dict[str, Any]]:
+        """Позиции стоп-листа терминальной группы (~3% блюд)."""
+        key = ("stoplist", terminal_group_id)
+        if key not in self._day_cache:
+            rnd = random.Random(f"{self.seed}:stoplist:{terminal_group_id}")
+            k = max(1, len(self.dishes) * 3 // 100)
+            self._day_cache[key] = [
+                {
+                    "productId": p["id"],
+                    "balance": 0,
+                    "sku": p["num"],
+                    "dateAdd": "2026-01-01 10:00:00.000",
+                }
+                for p in rnd.sample(self.dishes, min(k, len(self.dishes)))
+            ]
+        return self._day_cache[key]
+
+    def salary_history_rows(self) -> list[list[str]]:
+        """Строки вкладки «История ставок» (без заголовка) — по одной на сотрудника."""
+        rnd = random.Random(f"{self.seed}:history")
+        rows: list[list[str]] = []
+        for e in self._active_employees:
+            sal_type = rnd.choice(SALARY_TYPES)
+            rate = {"посменная": 2500, "почасовая": 300, "ежемесячная": 60000}[sal_type]
+            rows.append(
+                [
+                    e["name"],
+                    sal_type,
+                    str(rate),
+                    str(rnd.choice((0, 0, 1, 2))),
+                    "от выручки",
+                    "01.01.2024",
+                    "",
+                    e["id"],
+                ]
+            )
+        return rows
+
+    # ═════════════════════════════════════════════════
+    # Дневные ряды
+    # ═════════════════════════════════════════════════
+
+    def _cached(self, kind: str, day: date, build) -> Any:
+        key = (kind, day)
+        if key not in self._day_cache:
+            rnd = random.Random(f"{self.seed}:{kind}:{day.toordinal()}")
+            self._day_cache[key] = build(rnd, day)
+        return self._day_cache[key]
+
+    def attendance(self, day: date) -> list[dict[str, str]]:
+        """Явки за день: ~60% активных сотрудников, смена 8–12 часов."""
+
+        def build(rnd: random.Random, d: date) -> list[dict[str, str]]:
+            names = {x["id"]: x["name"] for x in self.departments}
+            out = []
+            for e in self._active_employees:
+                if rnd.random() > 0.6:
+                    continue
+                start = datetime(d.year, d.month, d.day, rnd.choice((8, 9, 10, 11)))
+                end = start + timedelta(
+                    hours=rnd.randint(8, 12), minutes=rnd.choice((0, 15, 30, 45))
+                )
+                dept_id = self.employee_department[e["id"]]
+                out.append(
+                    {
+                        "id": _uid(rnd),
+                        "employeeId": e["id"],
+                        "roleId": e["mainRoleId"],
+                        "dateFrom": start.strftime("%Y-%m-%dT%H:%M:%S"),
+                        "dateTo": end.strftime("%Y-%m-%dT%H:%M:%S"),
+                        "departmentId": dept_id,
+                        "departmentName": names[dept_id],
+                    }
+                )
+            return out
+
+        return self._cached("attendance", day, build)
+
+    def sales_facts(self, day: date) -> list[dict[str, Any]]:
+        """
+        Факты продаж за день: точка × час × тип оплаты × место приготовления.
+        OLAP-ответы — агрегаты этих фактов по запрошенным groupRow.
+        """
+
+        def build(rnd: random.Random, d: date) -> list[dict[str, Any]]:
+            out = []
+            for dept in self.departments:
+                for hour in range(10, 23):
+                    close = datetime(d.year, d.month, d.day, hour, rnd.randint(0, 59))
+                    for pay in PAY_TYPES:
+                        for place in COOKING_PLACES:
+                            revenue = _money(rnd.uniform(300, 4000))
+                            out.append(
+                                {
+                                    "Department": dept["name"],
+                                    "Department.Id": dept["id"],
+                                    "CloseTime": close.strftime("%d.%m.%Y %H:%M:%S"),
+                                    "OpenDate.Typed": d.isoformat(),
+                                    "PayTypes": pay,
+                                    "CookingPlaceType": place,
+                                    "DishDiscountSumInt": revenue,
+                                    "DishSumInt": _money(revenue * 1.05),
+                                    "ProductCostBase.ProductCost": _money(
+                                        revenue * rnd.uniform(0.25, 0.4)
+                                    ),
+                                    "DishAmountInt": rnd.randint(1, 20),
+                                }
+                            )
+            return out
+
+        return self._cached("sales", day, build)
+
+    def opiu_facts(self, day: date) -> list[dict[str, Any]]:
+        """Проводки ОПИУ за день: точка × счёт × тип транзакции."""
+
+        def build(rnd: random.Random, d: date) -> list[dict[str, Any]]:
+            return [
+                {
+                    "Account.Name": account,
+                    "TransactionType": rnd.choice(TRANSACTION_TYPES),
+                    "Department": dept["name"],
+                    "Sum.Incoming": _money(rnd.uniform(100, 20000)),
+                    "Sum.Outgoing": _money(rnd.uniform(100, 20000)),
+                }
+                for dept in self.departments
+                for account in OPIU_ACCOUNTS
+            ]
+
+        return self._cached("opiu", day, build)
+
+    def invoices(self, kind: str, day: date) -> list[dict[str, Any]]:
+        """
+        Накладные за день. kind="incoming" — 2 приходные на склад кухни точки,
+        "outgoing" — 1 расходная на точку.
+        """
+
+        def build(rnd: random.Random, d: date) -> list[dict[str, Any]]:
+            per_dept = 2 if kind == "incoming" else 1
+            docs = []
+            for dept in self.departments:
+                store = next(
+                    s
+                    for s in self.stores
+                    if self.store_department[s["id"]] == dept["id"]
+                )
+                for _ in range(per_dept):
+                    items = []
+                    for p in rnd.sample(
+                        self.goods, min(rnd.randint(5, 20), len(self.goods))
+                    ):
+                        amount = round(rnd.uniform(0.5, 30), 3)
+                        price = p["defaultSalePrice"]
+                        items.append(
+                            {
+                                "productId": p["id"],
+                                "storeId": store["id"],
+                                "amount": amount,
+                                "price": price,
+                                "sum": _money(amount * price),
+                            }
+                        )
+                    docs.append(
+                        {
+                            "id": _uid(rnd),
+                            "documentNumber": f"{kind[:3].upper()}-{rnd.randint(1, 10**6)}",
+                            "dateIncoming": f"{d.isoformat()}T{rnd.randint(8, 20):02d}:00:00",
+                            "status": "PROCESSED",
+                            "counterpartyId": rnd.choice(self.suppliers)["id"],
+                            "defaultStore": store["id"],
+                            "items": items,
+                        }
+                    )
+            return docs
+
+        return self._cached(f"invoices:{kind}", day, build)
+
+    def balances(self, on: date) -> list[dict[str, Any]]:
+        """
+        Остатки на дату: каждый склад держит ~BASE_STORE_GOODS товаров —
+        от масштаба не зависит (склад точки не растёт вместе с сетью), так что
+        строк остатков ∝ числу складов, а не складов × номенклатуры.
+        """
+
+        def build(rnd: random.Random, d: date) -> list[dict[str, Any]]:
+            out = []
+            held = min(BASE_STORE_GOODS, len(self.goods))
+            for store in self.stores:
+                for p in rnd.sample(self.goods, held):
+                    amount = round(rnd.uniform(-2, 50), 3)
+                    out.append(
+                        {
+                            "store": store["id"],
+                            "product": p["id"],
+                            "amount": amount,
+                            "sum": _money(amount * p["defaultSalePrice"] * 0.4),
+                        }
+                    )
+            return out
+
+        return self._cached("balances", on, build)
+
+    def balance_facts(self, on: date) -> list[dict[str, Any]]:
+        """Те же остатки в виде OLAP TRANSACTIONS (имена вместо UUID)."""
+        stores = {s["id"]: s["name"] for s in self.stores}
+        out = []
+        for b in self.balances(on):
+            p = self._product_by_id[b["product"]]
+            top = self._group_by_id[p["parent"]]
+            while top["parent"]:
+                top = self._group_by_id[top["parent"]]
+            out.append(
+                {
+                    "Account.Name": stores[b["store"]],
+                    "Product.TopParent": top["name"],
+                    "Product.Name": p["name"],
+                    "Product.MeasureUnit": self.product_unit[p["id"]],
+                    "FinalBalance.Amount": b["amount"],
+                    "FinalBalance.Money": b["sum"],
+                }
+            )
+        return out
+
+
+def days(date_from: date, date_to: date) -> list[date]:
+    """Дни отрезка [date_from, date_to] включительно."""
+    return [
+        date_from + timedelta(days=i) for i in range((date_to - date_from).days + 1)
+    ]
+
+
+def aggregate(
+    facts: list[dict[str, Any]], dims: list[str], metrics: list[str]
+) -> list[dict[str, Any]]:
+    """GROUP BY dims, SUM(metrics) — как OLAP iiko."""
+    acc: dict[tuple, dict[str, float]] = defaultdict(
+        lambda: dict.fromkeys(metrics, 0.0)
+    )
+    for f in facts:
+        key = tuple(f.get(d) for d in dims)
+        row = acc[key]
+        for m in metrics:
+            row[m] += f.get(m) or 0
+    return [
+        {**dict(zip(dims, key)), **{m: _money(v) for m, v in sums.items()}}
+        for key, sums in acc.items()
+    ]
@@ -0,0 +1,136 @@
+"""
+Фейковый FinTablo (/v1/...): list-эндпоинты справочников, pnl-item
+(GET с фильтрами / POST / DELETE), salary и employees (GET / PUT).
+
+Ответы в формате FinTablo: {"status": 200, "items": [...]}.
+Созданные pnl-item живут в Dataset.pnl_items до остановки сервера.
+"""
+
+from __future__ import annotations
+
+from itertools import count
+
+from aiohttp import web
+
+from tests.fakes._server import Faults, FakeServer
+from tests.fakes.data import Dataset
+
+
+def _items(items: list[dict]) -> web.Response:
+    return web.json_response({"status": 200, "items": items})
+
+
+class FakeFinTablo(FakeServer):
+    """FinTablo REST API на синтетическом Dataset."""
+
+    name = "fintablo"
+
+    def __init__(self, dataset: Dataset, faults: Faults | None = None, **kw):
+        self.data = dataset
+        self._ids = count(10**6)
+        super().__init__(faults, **kw)
+
+    def routes(self, r: web.UrlDispatcher) -> None:
+        r.add_get("/v1/pnl-item", self.list_pnl)
+        r.add_post("/v1/pnl-item", self.create_pnl)
+        r.add_delete("/v1/pnl-item/{id}", self.delete_pnl)
+        r.add_get("/v1/salary", self.list_salary)
+        r.add_get("/v1/salary/{id}", self.get_salary)
+        r.add_put("/v1/salary/{id}", self.put_salary)
+        r.add_get("/v1/employees/{id}", self.get_employee)
+        r.add_put("/v1/employees/{id}", self.put_employee)
+        r.add_get("/v1/{endpoint}", self.list_endpoint)
+
+    def _check_auth(self, request: web.Request) -> None:
+        if not request.headers.get("Authorization", "").startswith("Bearer "):
+            raise web.HTTPUnauthorized(text="Bearer token required")
+
+    async def list_endpoint(self, request: web.Request) -> web.Response:
+        self._check_auth(request)
+        items = self.data.fintablo.get(request.match_info["endpoint"])
+        if items is None:
+            raise web.HTTPNotFound()
+        return _items(items)
+
+    # ── ОПИУ ──
+
+    async def list_pnl(self, request: web.Request) -> web.Response:
+        self._check_auth(request)
+        q = request.query
+        items = self.data.pnl_items
+        if "categoryId" in q:
+            items = [i for i in items if str(i["categoryId"]) == q["categoryId"]]
+        if "date" in q:
+            items = [i for i in items if i["date"] == q["date"]]
+        if "directionId" in q:
+            items = [i for i in items if str(i.get("directionId")) == q["directionId"]]
+        return _items(items)
+
+    async def create_pnl(self, request: web.Request) -> web.Response:
+        self._check_auth(request)
+        body = await request.json()
+        missing = [k for k in ("categoryId", "value", "date") if k not in body]
+        if missing:
+            raise web.HTTPUnprocessableEntity(text=f"required: {', '.join(missing)}")
+        item = {"id": next(self._ids), **body}
+        self.data.pnl_items.append(item)
+        return _items([item])
+
+    async def delete_pnl(self, request: web.Request) -> web.Response:
+        self._check_auth(request)
+        item_id = int(request.match_info["id"])
+        before = len(self.data.pnl_items)
+        self.data.pnl_items[:] = [i for i in self.data.pnl_items if i["id"] != item_id]
+        if len(self.data.pnl_items) == before:
+            raise web.HTTPNotFound()
+        return web.json_response({"status": 200})
+
+    # ── Зарплата и сотрудники ──
+
+    async def list_salary(self, request: web.Request) -> web.Response:
+        self._check_auth(request)
+        q = request.query
+        items = self.data.fintablo["salary"]
+        if "employeeId" in q:
+            items = [i for i in items if str(i["employeeId"]) == q["employeeId"]]
+        if "date" in q:
+            items = [i for i in items if i["date"] == q["date"]]
+        return _items(items)
+
+    async def get_salary(self, request: web.Request) -> web.Response:
+        self._check_auth(request)
+        emp = int(request.match_info["id"])
+        return _items(
+            [i for i in self.data.fintablo["salary"] if i["employeeId"] == emp]
+        )
+
+    async def put_salary(self, request: web.Request) -> web.Response:
+        self._check_auth(request)
+        emp = int(request.match_info["id"])
+        body = await request.json()
+        salary = self.data.fintablo["salary"]
+        salary[:] = [
+            i
+            for i in salary
+            if not (i["employeeId"] == emp and i["date"] == body.get("date"))
+        ]
+        item = {"employeeId": emp, **body}
+        salary.append(item)
+        return _items([item])
+
+    def _employee(self, request: web.Request) -> dict:
+        emp = int(request.match_info["id"])
+        for e in self.data.fintablo["employees"]:
+            if e["id"] == emp:
+                return e
+        raise web.HTTPNotFound()
+
+    async def get_employee(self, request: web.Request) -> web.Response:
+        self._check_auth(request)
+        return _items([self._employee(request)])
+
+    async def put_employee(self, request: web.Request) -> web.Response:
+        self._check_auth(request)
+        emp = self._employee(request)
+        emp.update(await request.json())
+        return _items([emp])
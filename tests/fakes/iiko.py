@@ -0,0 +1,287 @@
+"""
+Фейковый iiko REST (/resto/api/...) — подмножество, которым пользуется
+adapters/iiko_api.py: справочники, номенклатура, OLAP v1/v2, остатки,
+экспорт/импорт документов, явки, техкарты.
+
+Ключ (?key=…) проверяется только на наличие: токен выдаёт /resto/api/auth
+на любой логин. Отправленные документы копятся в .documents[тип].
+"""
+
+from __future__ import annotations
+
+import json
+import uuid
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Any
+from xml.etree import ElementTree as ET
+from xml.sax.saxutils import escape
+
+from aiohttp import web
+
+from tests.fakes._server import Faults, FakeServer, xml_response
+from tests.fakes.data import Dataset, aggregate, days
+
+PRESET_SALES = "96df1c31-a77f-4b7c-94db-55db656aae6a"
+PRESET_OPIU = "4120ac6e-b8b3-4e97-bd75-dda8c864b4c3"
+
+
+def _xml_items(tag: str, items: list[dict[str, Any]]) -> str:
+    parts = []
+    for item in items:
+        fields = "".join(
+            f"<{k}>{escape(str(v))}</{k}>" for k, v in item.items() if v is not None
+        )
+        parts.append(f"<{tag}>{fields}</{tag}>")
+    return "".join(parts)
+
+
+def _parse_day(raw: str) -> date:
+    """YYYY-MM-DD[THH:MM:SS] или DD.MM.YYYY → date."""
+    raw = raw.strip()
+    if "." in raw[:3]:
+        return datetime.strptime(raw[:10], "%d.%m.%Y").date()
+    return date.fromisoformat(raw[:10])
+
+
+class FakeIiko(FakeServer):
+    """iiko Server REST API на синтетическом Dataset."""
+
+    name = "iiko"
+
+    def __init__(self, dataset: Dataset, faults: Faults | None = None, **kw):
+        self.data = dataset
+        self.token = uuid.uuid4().hex
+        self.documents: dict[str, list[Any]] = defaultdict(list)
+        super().__init__(faults, **kw)
+
+    def routes(self, r: web.UrlDispatcher) -> None:
+        api = "/resto/api"
+        r.add_post(f"{api}/auth", self.auth)
+        r.add_get(f"{api}/logout", self.logout)
+        r.add_get(f"{api}/v2/entities/list", self.entities)
+        r.add_get(f"{api}/suppliers", self.suppliers)
+        r.add_get(f"{api}/employees", self.employees)
+        r.add_get(f"{api}/employees/roles", self.roles)
+        r.add_get(f"{api}/employees/attendance", self.attendance)
+        r.add_get(f"{api}/corporation/departments", self.departments)
+        r.add_get(f"{api}/corporation/stores", self.stores)
+        r.add_get(f"{api}/corporation/groups", self.groups)
+        r.add_get(f"{api}/v2/entities/products/list", self.products)
+        r.add_get(f"{api}/v2/entities/products/group/list", self.product_groups)
+        r.add_get(f"{api}/v2/reports/balance/stores", self.balance)
+        r.add_get(f"{api}/reports/olap", self.olap_v1)
+        r.add_get(f"{api}/v2/reports/olap/byPresetId/{{preset}}", self.olap_preset)
+        r.add_get(f"{api}/v2/assemblyCharts/getAll", self.charts)
+        r.add_get(f"{api}/documents/export/{{kind}}", self.export_documents)
+        r.add_post(f"{api}/documents/import/{{kind}}", self.import_document)
+        r.add_post(f"{api}/v2/documents/{{kind}}", self.post_document)
+
+    def _check_key(self, request: web.Request) -> None:
+        if not request.query.get("key"):
+            raise web.HTTPUnauthorized(text="key required")
+
+    # ── Авторизация ──
+
+    async def auth(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        if not form.get("login"):
+            raise web.HTTPUnauthorized(text="login required")
+        return web.Response(text=self.token)
+
+    async def logout(self, request: web.Request) -> web.Response:
+        return web.Response(text="")
+
+    # ── Справочники ──
+
+    async def entities(self, request: web.Request) -> web.Response:
+        self._check_key(request)
+        items = self.data.entities(request.query.get("rootType", ""))
+        if request.query.get("includeDeleted", "true") == "false":
+            items = [e for e in items if not e["deleted"]]
+        return web.json_response(items)
+
+    async def suppliers(self, request: web.Request) -> web.Response:
+        self._check_key(request)
+        body = _xml_items("employee", self.data.suppliers)
+        return xml_response(f"<employees>{body}</employees>")
+
+    async def employees(self, request: web.Request) -> web.Response:
+        self._check_key(request)
+        items = self.data.employees
+        if request.query.get("includeDeleted", "false") != "true":
+            items = [e for e in items if e["deleted"] == "false"]
+        return xml_response(f"<employees>{_xml_items('employee', items)}</employees>")
+
+    async def roles(self, request: web.Request) -> web.Response:
+        self._check_key(request)
+        return xml_response(f"<roles>{_xml_items('role', self.data.roles)}</roles>")
+
+    async def departments(self, request: web.Request) -> web.Response:
+        self._check_key(request)
+        body = _xml_items("corporateItemDto", self.data.departments)
+        return xml_response(f"<corporateItemDtoes>{body}</corporateItemDtoes>")
+
+    async def stores(self, request: web.Request) -> web.Response:
+        self._check_key(request)
+        body = _xml_items("corporateItemDto", self.data.stores)
+        return xml_response(f"<corporateItemDtoes>{body}</corporateItemDtoes>")
+
+    async def groups(self, request: web.Request) -> web.Response:
+        self._check_key(request)
+        body = _xml_items("groupDto", self.data.corporate_groups)
+        return xml_response(f"<groupDtoes>{body}</groupDtoes>")
+
+    async def products(self, request: web.Request) -> web.Response:
+        self._check_key(request)
+        items = self.data.products
+        if request.query.get("includeDeleted", "false") != "true":
+            items = [p for p in items if not p["deleted"]]
+        return web.json_response(items)
+
+    async def product_groups(self, request: web.Request) -> web.Response:
+        self._check_key(request)
+        return web.json_response(self.data.product_groups)
+
+    async def charts(self, request: web.Request) -> web.Response:
+        self._check_key(request)
+        prepared = request.query.get("includePreparedCharts", "false") == "true"
+        return web.json_response(
+            {
+                "assemblyCharts": self.data.assembly_charts,
+                "preparedCharts": self.data.prepared_charts if prepared else [],
+            }
+        )
+
+    # ── Явки ──
+
+    async def attendance(self, request: web.Request) -> web.Response:
+        self._check_key(request)
+        lo, hi = _parse_day(request.query["from"]), _parse_day(request.query["to"])
+        employee = request.query.get("employeeId")
+        rows = [
+            a
+            for d in days(lo, hi)
+            for a in self.data.attendance(d)
+            if employee is None or a["employeeId"] == employee
+        ]
+        return xml_response(
+            f"<attendances>{_xml_items('attendance', rows)}</attendances>"
+        )
+
+    # ── Остатки и OLAP ──
+
+    async def balance(self, request: web.Request) -> web.Response:
+        self._check_key(request)
+        ts = request.query.get("timestamp") or date.today().isoformat()
+        return web.json_response(self.data.balances(_parse_day(ts)))
+
+    async def olap_v1(self, request: web.Request) -> web.Response:
+        self._check_key(request)
+        q = request.query
+        lo, hi = _parse_day(q["from"]), _parse_day(q["to"])
+        dims, metrics = q.getall("groupRow", []), q.getall("agr", [])
+        report = q.get("report", "SALES")
+        if report == "SALES":
+            facts = [f for d in days(lo, hi) for f in self.data.sales_facts(d)]
+        elif report == "TRANSACTIONS":
+            facts = self.data.balance_facts(hi)
+        else:
+            raise web.HTTPBadRequest(text=f"Unknown report {report}")
+        rows = aggregate(facts, dims, metrics)
+        return xml_response(f"<report>{_xml_items('r', rows)}</report>")
+
+    async def olap_preset(self, request: web.Request) -> web.Response:
+        self._check_key(request)
+        q = request.query
+        lo, hi = _parse_day(q["dateFrom"]), _parse_day(q["dateTo"])
+        preset = request.match_info["preset"]
+        if preset == PRESET_SALES:
+            facts = [f for d in days(lo, hi) for f in self.data.sales_facts(d)]
+            rows = aggregate(
+                facts,
+                ["Department", "PayTypes", "CookingPlaceType"],
+                ["DishDiscountSumInt", "ProductCostBase.ProductCost"],
+            )
+        elif preset == PRESET_OPIU:
+            facts = [f for d in days(lo, hi) for f in self.data.opiu_facts(d)]
+            rows = aggregate(
+                facts,
+                ["Account.Name", "TransactionType", "Department"],
+                ["Sum.Incoming", "Sum.Outgoing"],
+            )
+        else:
+            # Как у iiko для пресета не того типа / чужого
+            raise web.HTTPConflict(text=f"Preset {preset} is not available")
+        return web.json_response({"data": rows, "summary": []})
+
+    # ── Документы ──
+
+    async def export_documents(self, request: web.Request) -> web.Response:
+        self._check_key(request)
+        kind = request.match_info["kind"]
+        if kind not in ("incomingInvoice", "outgoingInvoice"):
+            raise web.HTTPNotFound()
+        lo, hi = _parse_day(request.query["from"]), _parse_day(request.query["to"])
+        short = "incoming" if kind == "incomingInvoice" else "outgoing"
+        party = "supplier" if short == "incoming" else "counteragent"
+        product_tag = "product" if short == "incoming" else "productId"
+        store_tag = "store" if short == "incoming" else "storeId"
+        docs = []
+        for d in days(lo, hi):
+            for doc in self.data.invoices(short, d):
+                items = "".join(
+                    f"<item><{product_tag}>{it['productId']}</{product_tag}>"
+                    f"<{store_tag}>{it['storeId']}</{store_tag}>"
+                    f"<amount>{it['amount']}</amount><price>{it['price']}</price>"
+                    f"<sum>{it['sum']}</sum></item>"
+                    for it in doc["items"]
+                )
+                docs.append(
+                    f"<document><id>{doc['id']}</id>"
+                    f"<documentNumber>{doc['documentNumber']}</documentNumber>"
+                    f"<dateIncoming>{doc['dateIncoming']}</dateIncoming>"
+                    f"<status>{doc['status']}</status>"
+                    f"<{party}>{doc['counterpartyId']}</{party}>"
+                    f"<defaultStore>{doc['defaultStore']}</defaultStore>"
+                    f"<items>{items}</items></document>"
+                )
+        return xml_response(f"<{kind}Dtoes>{''.join(docs)}</{kind}Dtoes>")
+
+    async def import_document(self, request: web.Request) -> web.Response:
+        """XML-импорт накладной: iiko отвечает 200 и <valid> в теле."""
+        self._check_key(request)
+        kind = request.match_info["kind"]
+        raw = await request.text()
+        try:
+            root = ET.fromstring(raw)
+        except ET.ParseError as exc:
+            return xml_response(
+                "<documentValidationResult><valid>false</valid>"
+                f"<errorMessage>{escape(str(exc))}</errorMessage>"
+                "</documentValidationResult>"
+            )
+        number = (
+            root.findtext("documentNumber") or f"FAKE-{len(self.documents[kind]) + 1}"
+        )
+        self.documents[kind].append(raw)
+        return xml_response(
+            "<documentValidationResult><valid>true</valid><warning>false</warning>"
+            f"<documentNumber>{escape(number)}</documentNumber>"
+            "</documentValidationResult>"
+        )
+
+    async def post_document(self, request: web.Request) -> web.Response:
+        """JSON v2: internalTransfer / writeoff."""
+        self._check_key(request)
+        kind = request.match_info["kind"]
+        try:
+            doc = await request.json()
+        except json.JSONDecodeError:
+            raise web.HTTPBadRequest(text="invalid JSON")
+        if not doc.get("items"):
+            raise web.HTTPBadRequest(text="items required")
+        self.documents[kind].append(doc)
+        return web.json_response(
+            {"result": "SUCCESS", "errors": [], "response": {"id": str(uuid.uuid4())}}
+        )
@@ -0,0 +1,96 @@
+"""
+Фейковый iikoCloud (/api/1/...): организации, терминальные группы,
+стоп-листы, настройки вебхука. Все методы — POST с JSON, как у iikoCloud.
+
+Принимается любой Bearer-токен; чтобы проверить ветку «401 → перечитать
+токен», задайте reject_tokens — эти токены получат 401.
+"""
+
+from __future__ import annotations
+
+from aiohttp import web
+
+from tests.fakes._server import Faults, FakeServer
+from tests.fakes.data import Dataset
+
+
+class FakeIikoCloud(FakeServer):
+    """iikoCloud API на синтетическом Dataset."""
+
+    name = "iiko_cloud"
+
+    def __init__(self, dataset: Dataset, faults: Faults | None = None, **kw):
+        self.data = dataset
+        self.reject_tokens: set[str] = set()
+        self.webhook: dict = {}
+        super().__init__(faults, **kw)
+
+    def routes(self, r: web.UrlDispatcher) -> None:
+        r.add_post("/api/1/organizations", self.organizations)
+        r.add_post("/api/1/terminal_groups", self.terminal_groups)
+        r.add_post("/api/1/stop_lists", self.stop_lists)
+        r.add_post("/api/1/webhooks/settings", self.webhook_settings)
+        r.add_post("/api/1/webhooks/update_settings", self.update_webhook)
+
+    async def _body(self, request: web.Request) -> dict:
+        auth = request.headers.get("Authorization", "")
+        if not auth.startswith("Bearer ") or auth[7:] in self.reject_tokens:
+            raise web.HTTPUnauthorized(text="Invalid token")
+        return await request.json()
+
+    def _check_org(self, org_ids: list[str]) -> None:
+        if self.data.organization_id not in org_ids:
+            raise web.HTTPBadRequest(text="Unknown organization")
+
+    async def organizations(self, request: web.Request) -> web.Response:
+        await self._body(request)
+        return web.json_response(
+            {
+                "correlationId": "fake",
+                "organizations": [
+                    {"id": self.data.organization_id, "name": "Фейковая сеть"}
+                ],
+            }
+        )
+
+    async def terminal_groups(self, request: web.Request) -> web.Response:
+        body = await self._body(request)
+        self._check_org(body.get("organizationIds") or [])
+        return web.json_response(
+            {
+                "correlationId": "fake",
+                "terminalGroups": [
+                    {
+                        "organizationId": self.data.organization_id,
+                        "items": self.data.terminal_groups,
+                    }
+                ],
+                "terminalGroupsInSleep": [],
+            }
+        )
+
+    async def stop_lists(self, request: web.Request) -> web.Response:
+        body = await self._body(request)
+        self._check_org(body.get("organizationIds") or [])
+        wanted = set(body.get("terminalGroupsIds") or [])
+        groups = [
+            {"terminalGroupId": tg["id"], "items": self.data.stop_list(tg["id"])}
+            for tg in self.data.terminal_groups
+            if not wanted or tg["id"] in wanted
+        ]
+        return web.json_response(
+            {
+                "correlationId": "fake",
+                "terminalGroupStopLists": [
+                    {"organizationId": self.data.organization_id, "items": groups}
+                ],
+            }
+        )
+
+    async def webhook_settings(self, request: web.Request) -> web.Response:
+        await self._body(request)
+        return web.json_response({"correlationId": "fake", **self.webhook})
+
+    async def update_webhook(self, request: web.Request) -> web.Response:
+        self.webhook = await self._body(request)
+        return web.json_response({"correlationId": "fake"})
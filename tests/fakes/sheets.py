@@ -0,0 +1,549 @@
+"""
+Фейковый Google Sheets API v4 + Drive v3 (только modifiedTime) —
+то, что вызывает gspread из adapters/google_sheets.py и adapters/sheet_diff.py.
+
+Таблица создаётся при первом обращении к её ID (с пустым листом «Sheet1»),
+данные хранятся в памяти сеткой строк. Поддерживаются:
+  GET  /v4/spreadsheets/{id}                    — метаданные (+ developerMetadata)
+  POST /v4/spreadsheets/{id}:batchUpdate        — addSheet / deleteSheet /
+       updateSheetProperties / insert|delete|appendDimension /
+       create|deleteDeveloperMetadata; форматирование,
+       защиты и проч. принимаются и игнорируются (пустой reply)
+  GET|PUT /v4/spreadsheets/{id}/values/{range}  — чтение / запись диапазона
+  POST .../values/{range}:append | :clear
+  GET  .../values:batchGet, POST .../values:batchUpdate | :batchClear
+  GET  /drive/v3/files/{id}                     — modifiedTime (меняется при записи)
+
+Ошибки — в формате Google ({"error": {"code", "message", "status"}}), чтобы
+gspread поднимал APIError с правильным кодом: например, batchGet с
+несуществующей вкладкой падает 400 целиком, как настоящий API.
+Запись за пределы сетки не запрещается — сетка растёт (в отличие от Google).
+
+Формулы не вычисляются (читаются текстом), но ссылки на строки в них
+сдвигаются при insert/deleteDimension строк, как в Sheets: дифф-запись,
+забывшая переписать сдвинутую формулу, видна в тесте.
+"""
+
+from __future__ import annotations
+
+import re
+import time
+from datetime import datetime, timezone
+from itertools import count
+from typing import Any
+from urllib.parse import unquote
+
+from aiohttp import web
+
+from tests.fakes._server import Faults, FakeServer
+
+_A1 = re.compile(r"^([A-Za-z]*)(\d*)$")
+# Диапазон без имени листа: A1, A1:C10, A:C, 2:5, A2:C
+_CELLS = re.compile(r"^([A-Za-z]{1,3}\d*|\d+)(:([A-Za-z]{1,3}\d*|\d+))?$")
+# Ссылка или диапазон в формуле: B2, $E$5, C3:C10 (имя листа не учитывается)
+_FORMULA_REF = re.compile(
+    r"(?<![A-Za-z0-9_$])(\$?[A-Z]{1,3}\$?)(\d+)(?::(\$?[A-Z]{1,3}\$?)(\d+))?(?![\w(])"
+)
+
+
+def _error(code: int, message: str, status: str) -> web.Response:
+    return web.json_response(
+        {"error": {"code": code, "message": message, "status": status}},
+        status=code,
+    )
+
+
+class _ApiError(Exception):
+    def __init__(self, code: int, message: str, status: str = "INVALID_ARGUMENT"):
+        super().__init__(message)
+        self.code, self.status = code, status
+
+
+def _col_index(letters: str) -> int:
+    n = 0
+    for ch in letters.upper():
+        n = n * 26 + ord(ch) - 64
+    return n - 1
+
+
+def _col_letters(idx: int) -> str:
+    s = ""
+    idx += 1
+    while idx:
+        idx, rem = divmod(idx - 1, 26)
+        s = chr(65 + rem) + s
+    return s
+
+
+def split_range(a1: str) -> tuple[str | None, str]:
+    """ "'Лист'!A1:B2" → ("Лист", "A1:B2"); "A1:B2" → (None, "A1:B2"); "Лист" → ("Лист", "")."""
+    if a1.startswith("'"):
+        end = 1
+        while True:
+            end = a1.index("'", end)
+            if a1[end + 1 : end + 2] == "'":
+                end += 2
+                continue
+            break
+        title = a1[1:end].replace("''", "'")
+        rest = a1[end + 1 :]
+        return title, rest[1:] if rest.startswith("!") else rest
+    if "!" in a1:
+        title, cells = a1.split("!", 1)
+        return title, cells
+    if _CELLS.match(a1) and (":" in a1 or any(c.isdigit() for c in a1)):
+        return None, a1
+    return a1, ""
+
+
+def parse_cells(cells: str) -> tuple[int, int, int | None, int | None]:
+    """'A2:C' → (r0=1, c0=0, r1=None, c1=3); пусто — весь лист. Конец исключён."""
+    if not cells:
+        return 0, 0, None, None
+    first, _, last = cells.partition(":")
+    m1, m2 = _A1.match(first), _A1.match(last or first)
+    if not m1 or not m2:
+        raise _ApiError(400, f"Unable to parse range: {cells}")
+    c0 = _col_index(m1[1]) if m1[1] else 0
+    r0 = int(m1[2]) - 1 if m1[2] else 0
+    c1 = _col_index(m2[1]) + 1 if m2[1] else None
+    r1 = int(m2[2]) if m2[2] else None
+    return r0, c0, r1, c1
+
+
+def _shift_formula(formula: str, lo: int, n: int) -> str:
+    """
+    Сдвинуть ссылки на строки после вставки (n > 0) или удаления (n < 0)
+    строк с 0-based индекса lo. Удалённые строки: начало диапазона → первая
+    строка после удаления, конец → последняя до неё (диапазон сжимается).
+    Текст в кавычках не трогается.
+    """
+
+    def _row(row: int, is_end: bool) -> int:
+        if row <= lo:
+            return row
+        if n > 0 or row > lo - n:
+            return row + n
+        return lo if is_end else lo + 1
+
+    def _ref(m: re.Match) -> str:
+        if m[3] is None:
+            return f"{m[1]}{_row(int(m[2]), False)}"
+        start, end = _row(int(m[2]), False), _row(int(m[4]), True)
+        return f"{m[1]}{start}:{m[3]}{max(start, end)}"
+
+    parts = formula.split('"')
+    parts[::2] = [_FORMULA_REF.sub(_ref, part) for part in parts[::2]]
+    return '"'.join(parts)
+
+
+def _rendered(v: Any, render: str) -> Any:
+    if render in ("UNFORMATTED_VALUE", "FORMULA"):
+        return v
+    if v is None:
+        return ""
+    if isinstance(v, bool):
+        return "TRUE" if v else "FALSE"
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v)
+
+
+class _Sheet:
+    def __init__(self, sheet_id: int, title: str, index: int, rows=1000, cols=26):
+        self.props: dict[str, Any] = {
+            "sheetId": sheet_id,
+            "title": title,
+            "index": index,
+            "sheetType": "GRID",
+            "gridProperties": {"rowCount": rows, "columnCount": cols},
+        }
+        self.grid: list[list[Any]] = []
+        self.metadata: list[dict[str, Any]] = []
+
+    @property
+    def title(self) -> str:
+        return self.props["title"]
+
+    def _grow(self, rows: int, cols: int) -> None:
+        gp = self.props["gridProperties"]
+        gp["rowCount"] = max(gp["rowCount"], rows)
+        gp["columnCount"] = max(gp["columnCount"], cols)
+
+    def read(self, cells: str, render: str) -> list[list[Any]]:
+        r0, c0, r1, c1 = parse_cells(cells)
+        out = []
+        for row in self.grid[r0:r1]:
+            out.append([_rendered(v, render) for v in row[c0:c1]])
+        # Sheets не отдаёт хвостовые пустые ячейки и строки
+        for row in out:
+            while row and row[-1] in ("", None):
+                row.pop()
+        while out and not out[-1]:
+            out.pop()
+        return out
+
+    def write(self, r0: int, c0: int, values: list[list[Any]]) -> None:
+        for i, src in enumerate(values):
+            r = r0 + i
+            while len(self.grid) <= r:
+                self.grid.append([])
+            row = self.grid[r]
+            if len(row) < c0 + len(src):
+                row.extend([""] * (c0 + len(src) - len(row)))
+            for j, v in enumerate(src):
+                if v is not None:  # null в values.update — «не трогать ячейку»
+                    row[c0 + j] = v
+        width = c0 + max((len(v) for v in values), default=0)
+        self._grow(r0 + len(values), width)
+
+    def dimension(self, kind: str, args: dict) -> None:
+        """insert/delete/appendDimension: строки двигают сетку, столбцы — ячейки."""
+        gp = self.props["gridProperties"]
+        if kind == "appendDimension":
+            key = "rowCount" if args["dimension"] == "ROWS" else "columnCount"
+            gp[key] += args["length"]
+            return
+        rng = args["range"]
+        lo, hi = rng["startIndex"], rng["endIndex"]
+        n = hi - lo
+        if rng["dimension"] == "ROWS":
+            if kind == "deleteDimension":
+                del self.grid[lo:hi]
+                gp["rowCount"] -= n
+            else:
+                self.grid[lo:lo] = [[] for _ in range(n)]
+                gp["rowCount"] += n
+            shift = -n if kind == "deleteDimension" else n
+            for row in self.grid:
+                for j, v in enumerate(row):
+                    if isinstance(v, str) and v.startswith("="):
+                        row[j] = _shift_formula(v, lo, shift)
+        else:
+            for row in self.grid:
+                if kind == "deleteDimension":
+                    del row[lo:hi]
+                elif len(row) > lo:
+                    row[lo:lo] = [""] * n
+            gp["columnCount"] += -n if kind == "deleteDimension" else n
+
+    def clear(self, cells: str) -> None:
+        r0, c0, r1, c1 = parse_cells(cells)
+        for row in self.grid[r0:r1]:
+            end = len(row) if c1 is None else min(c1, len(row))
+            for j in range(c0, end):
+                row[j] = ""
+
+    def last_row(self, cells: str) -> int:
+        """Индекс строки после последней непустой в столбцах диапазона (для append)."""
+        r0, c0, r1, c1 = parse_cells(cells)
+        last = r0
+        for i, row in enumerate(self.grid[r0:r1], start=r0):
+            if any(v not in ("", None) for v in row[c0:c1]):
+                last = i + 1
+        return last
+
+
+class _Spreadsheet:
+    def __init__(self, spreadsheet_id: str):
+        self.id = spreadsheet_id
+        self.sheets: list[_Sheet] = []
+        self._sheet_ids = count(0)
+        self._meta_ids = count(1)
+        self.modified = 0.0
+        self.add_sheet("Sheet1")
+        self.touch()
+
+    def touch(self) -> None:
+        # Монотонно растущее время — две записи в одну миллисекунду различимы
+        self.modified = max(time.time(), self.modified + 0.001)
+
+    @property
+    def modified_time(self) -> str:
+        dt = datetime.fromtimestamp(self.modified, tz=timezone.utc)
+        return dt.strftime("%Y-%m-%dT%H:%M:%S.") + f"{dt.microsecond // 1000:03d}Z"
+
+    def add_sheet(self, title: str, rows: int = 1000, cols: int = 26) -> _Sheet:
+        if self.find(title) is not None:
+            raise _ApiError(400, f'A sheet with the name "{title}" already exists.')
+        sheet = _Sheet(next(self._sheet_ids), title, len(self.sheets), rows, cols)
+        self.sheets.append(sheet)
+        return sheet
+
+    def find(self, title: str | None) -> _Sheet | None:
+        if title is None:
+            return self.sheets[0] if self.sheets else None
+        return next((s for s in self.sheets if s.title == title), None)
+
+    def by_id(self, sheet_id: int) -> _Sheet:
+        for s in self.sheets:
+            if s.props["sheetId"] == sheet_id:
+                return s
+        raise _ApiError(400, f"No grid with id: {sheet_id}")
+
+    def resolve(self, a1: str) -> tuple[_Sheet, str]:
+        title, cells = split_range(a1)
+        sheet = self.find(title)
+        if sheet is None:
+            raise _ApiError(400, f"Unable to parse range: {a1}")
+        return sheet, cells
+
+    def range_name(self, sheet: _Sheet, r0: int, c0: int, rows: int, cols: int) -> str:
+        quoted = sheet.title.replace("'", "''")
+        end = f"{_col_letters(c0 + max(cols, 1) - 1)}{r0 + max(rows, 1)}"
+        return f"'{quoted}'!{_col_letters(c0)}{r0 + 1}:{end}"
+
+
+class FakeSheets(FakeServer):
+    """Google Sheets v4 / Drive v3 в памяти."""
+
+    name = "sheets"
+
+    def __init__(self, faults: Faults | None = None, **kw):
+        self.spreadsheets: dict[str, _Spreadsheet] = {}
+        super().__init__(faults, **kw)
+
+    def routes(self, r: web.UrlDispatcher) -> None:
+        r.add_route("*", "/v4/spreadsheets/{tail:.+}", self.dispatch)
+        r.add_get("/drive/v3/files/{id}", self.drive_file)
+
+    # ── Доступ к данным из тестов ──
+
+    def spreadsheet(self, spreadsheet_id: str) -> _Spreadsheet:
+        if spreadsheet_id not in self.spreadsheets:
+            self.spreadsheets[spreadsheet_id] = _Spreadsheet(spreadsheet_id)
+        return self.spreadsheets[spreadsheet_id]
+
+    def seed(self, spreadsheet_id: str, title: str, rows: list[list[Any]]) -> None:
+        """Создать (или перезаписать) вкладку с данными."""
+        ss = self.spreadsheet(spreadsheet_id)
+        sheet = ss.find(title) or ss.add_sheet(title)
+        sheet.grid = []
+        sheet.write(0, 0, rows)
+        ss.touch()
+
+    def values(self, spreadsheet_id: str, title: str) -> list[list[Any]]:
+        """Сырые значения вкладки (как лежат в памяти)."""
+        sheet = self.spreadsheet(spreadsheet_id).find(title)
+        return [] if sheet is None else [list(r) for r in sheet.grid]
+
+    # ── Маршрутизация ──
+
+    def _split(self, request: web.Request) -> tuple[str, str, str]:
+        """raw path → (spreadsheet_id, range или "", операция)."""
+        tail = request.raw_path.split("?", 1)[0].split("/v4/spreadsheets/", 1)[1]
+        sid, _, rest = tail.partition("/")
+        if not rest:
+            sid, _, op = sid.partition(":")
+            return sid, "", op or "metadata"
+        if rest.startswith("values:"):
+            return sid, "", "values:" + rest[len("values:") :]
+        if rest.startswith("values/"):
+            rng, _, op = rest[len("values/") :].partition(":")
+            return sid, unquote(rng), f"values:{op}" if op else "values"
+        raise _ApiError(404, f"Unknown path {tail}", "NOT_FOUND")
+
+    def route_key(self, request: web.Request) -> str:
+        if request.path.startswith("/v4/"):
+            try:
+                return self._split(request)[2]
+            except (_ApiError, IndexError):
+                pass
+        return super().route_key(request)
+
+    async def dispatch(self, request: web.Request) -> web.Response:
+        try:
+            sid, rng, op = self._split(request)
+            handler = self._ops.get((request.method, op))
+            if handler is None:
+                raise _ApiError(
+                    404, f"{request.method} {op} not supported", "NOT_FOUND"
+                )
+            body = await request.json() if request.can_read_body else {}
+            return web.json_response(
+                handler(self, self.spreadsheet(sid), rng, request, body)
+            )
+        except _ApiError as exc:
+            return _error(exc.code, str(exc), exc.status)
+
+    async def drive_file(self, request: web.Request) -> web.Response:
+        ss = self.spreadsheet(request.match_info["id"])
+        return web.json_response(
+            {
+                "id": ss.id,
+                "name": ss.id,
+                "createdTime": "2024-01-01T00:00:00.000Z",
+                "modifiedTime": ss.modified_time,
+            }
+        )
+
+    # ── Операции ──
+
+    def _metadata(self, ss: _Spreadsheet, rng, request, body) -> dict:
+        return {
+            "spreadsheetId": ss.id,
+            "properties": {
+                "title": f"Fake {ss.id}",
+                "locale": "ru_RU",
+                "timeZone": "Europe/Kaliningrad",
+            },
+            "sheets": [
+                {
+                    "properties": s.props,
+                    "developerMetadata": s.metadata,
+                    "protectedRanges": [],
+                }
+                for s in ss.sheets
+            ],
+        }
+
+    def _batch_update(self, ss: _Spreadsheet, rng, request, body) -> dict:
+        replies = []
+        for req in body.get("requests", []):
+            ((kind, args),) = req.items()
+            reply: dict = {}
+            if kind == "addSheet":
+                p = args.get("properties", {})
+                gp = p.get("gridProperties", {})
+                sheet = ss.add_sheet(
+                    p.get("title", f"Sheet{len(ss.sheets) + 1}"),
+                    gp.get("rowCount", 1000),
+                    gp.get("columnCount", 26),
+                )
+                reply = {"addSheet": {"properties": sheet.props}}
+            elif kind == "deleteSheet":
+                ss.sheets.remove(ss.by_id(args["sheetId"]))
+            elif kind == "updateSheetProperties":
+                p = args["properties"]
+                sheet = ss.by_id(p.get("sheetId", 0))
+                for key, value in p.items():
+                    if key == "gridProperties":
+                        sheet.props["gridProperties"].update(value)
+                    elif key != "sheetId":
+                        sheet.props[key] = value
+            elif kind in ("insertDimension", "deleteDimension"):
+                ss.by_id(args["range"]["sheetId"]).dimension(kind, args)
+            elif kind == "appendDimension":
+                ss.by_id(args["sheetId"]).dimension(kind, args)
+            elif kind == "createDeveloperMetadata":
+                meta = dict(args["developerMetadata"])
+                meta["metadataId"] = next(ss._meta_ids)
+                ss.by_id(meta["location"]["sheetId"]).metadata.append(meta)
+                reply = {"createDeveloperMetadata": {"developerMetadata": meta}}
+            elif kind == "deleteDeveloperMetadata":
+                lookup = args["dataFilter"]["developerMetadataLookup"]
+                for s in ss.sheets:
+                    s.metadata = [
+                        m
+                        for m in s.metadata
+                        if m["metadataId"] != lookup.get("metadataId")
+                    ]
+            replies.append(reply)
+        ss.touch()
+        return {"spreadsheetId": ss.id, "replies": replies}
+
+    def _value_range(self, ss: _Spreadsheet, a1: str, render: str) -> dict:
+        sheet, cells = ss.resolve(a1)
+        values = sheet.read(cells, render)
+        r0, c0, _, _ = parse_cells(cells)
+        out = {
+            "range": ss.range_name(
+                sheet, r0, c0, len(values), max((len(r) for r in values), default=1)
+            ),
+            "majorDimension": "ROWS",
+        }
+        if values:
+            out["values"] = values
+        return out
+
+    def _values_get(self, ss: _Spreadsheet, rng, request, body) -> dict:
+        render = request.query.get("valueRenderOption", "FORMATTED_VALUE")
+        return self._value_range(ss, rng, render)
+
+    def _values_batch_get(self, ss: _Spreadsheet, rng, request, body) -> dict:
+        render = request.query.get("valueRenderOption", "FORMATTED_VALUE")
+        ranges = request.query.getall("ranges", [])
+        return {
+            "spreadsheetId": ss.id,
+            "valueRanges": [self._value_range(ss, r, render) for r in ranges],
+        }
+
+    def _write(self, ss: _Spreadsheet, a1: str, values: list[list[Any]]) -> dict:
+        sheet, cells = ss.resolve(a1)
+        r0, c0, _, _ = parse_cells(cells)
+        sheet.write(r0, c0, values)
+        rows, cols = len(values), max((len(v) for v in values), default=0)
+        return {
+            "spreadsheetId": ss.id,
+            "updatedRange": ss.range_name(sheet, r0, c0, rows, cols),
+            "updatedRows": rows,
+            "updatedColumns": cols,
+            "updatedCells": sum(len(v) for v in values),
+        }
+
+    def _values_update(self, ss: _Spreadsheet, rng, request, body) -> dict:
+        result = self._write(ss, rng, body.get("values", []))
+        ss.touch()
+        return result
+
+    def _values_batch_update(self, ss: _Spreadsheet, rng, request, body) -> dict:
+        responses = [
+            self._write(ss, d["range"], d.get("values", []))
+            for d in body.get("data", [])
+        ]
+        ss.touch()
+        return {
+            "spreadsheetId": ss.id,
+            "totalUpdatedRows": sum(r["updatedRows"] for r in responses),
+            "totalUpdatedCells": sum(r["updatedCells"] for r in responses),
+            "responses": responses,
+        }
+
+    def _values_append(self, ss: _Spreadsheet, rng, request, body) -> dict:
+        sheet, cells = ss.resolve(rng)
+        _, c0, _, _ = parse_cells(cells)
+        start = sheet.last_row(cells)
+        sheet.write(start, c0, body.get("values", []))
+        ss.touch()
+        values = body.get("values", [])
+        return {
+            "spreadsheetId": ss.id,
+            "tableRange": ss.range_name(sheet, 0, c0, start, 1),
+            "updates": {
+                "spreadsheetId": ss.id,
+                "updatedRange": ss.range_name(
+                    sheet,
+                    start,
+                    c0,
+                    len(values),
+                    max((len(v) for v in values), default=0),
+                ),
+                "updatedRows": len(values),
+                "updatedCells": sum(len(v) for v in values),
+            },
+        }
+
+    def _values_clear(self, ss: _Spreadsheet, rng, request, body) -> dict:
+        sheet, cells = ss.resolve(rng)
+        sheet.clear(cells)
+        ss.touch()
+        return {"spreadsheetId": ss.id, "clearedRange": rng}
+
+    def _values_batch_clear(self, ss: _Spreadsheet, rng, request, body) -> dict:
+        for a1 in body.get("ranges", []):
+            sheet, cells = ss.resolve(a1)
+            sheet.clear(cells)
+        ss.touch()
+        return {"spreadsheetId": ss.id, "clearedRanges": body.get("ranges", [])}
+
+    _ops = {
+        ("GET", "metadata"): _metadata,
+        ("POST", "batchUpdate"): _batch_update,
+        ("GET", "values"): _values_get,
+        ("PUT", "values"): _values_update,
+        ("POST", "values:append"): _values_append,
+        ("POST", "values:clear"): _values_clear,
+        ("GET", "values:batchGet"): _values_batch_get,
+        ("POST", "values:batchUpdate"): _values_batch_update,
+        ("POST", "values:batchClear"): _values_batch_clear,
+    }
@@ -0,0 +1,106 @@
+"""
+Фейковый OpenAI Chat Completions (/v1/chat/completions) для OCR-пайплайна.
+
+Отвечает как vision-модель adapters/gpt5_vision_ocr.py: в content — JSON
+УПД по схеме SYSTEM_PROMPT, собранный из приходных накладных Dataset
+(поставщик и позиции настоящие для стенда), в usage — токены,
+пропорциональные объёму картинок в запросе. Задержку «модели» задаёт
+Faults.latency_ms — как у остальных фейков.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from datetime import date, timedelta
+
+from aiohttp import web
+
+from tests.fakes._server import Faults, FakeServer
+from tests.fakes.data import Dataset
+
+# ~ как считает OpenAI: токены на картинку зависят от размера, здесь — от байт
+_BYTES_PER_IMAGE_TOKEN = 750
+
+
+class FakeVision(FakeServer):
+    """Vision-модель OpenAI: каждый запрос — очередная накладная Dataset."""
+
+    name = "vision"
+
+    def __init__(self, dataset: Dataset, faults: Faults | None = None, **kw):
+        self.data = dataset
+        self._products = {p["id"]: p for p in dataset.products}
+        self.requests = 0
+        self.images = 0
+        super().__init__(faults, **kw)
+
+    def routes(self, r: web.UrlDispatcher) -> None:
+        r.add_post("/v1/chat/completions", self.completions)
+
+    def invoice(self, n: int) -> dict:
+        """n-я накладная стенда в формате ответа модели."""
+        suppliers = {s["id"]: s for s in self.data.suppliers}
+        day = date(2026, 3, 1) + timedelta(days=n // 2)
+        doc = self.data.invoices("incoming", day)[n % 2]
+        supplier = suppliers[doc["counterpartyId"]]
+        items = [
+            {
+                "name": self._products[it["productId"]]["name"],
+                "unit": self.data.product_unit[it["productId"]],
+                "qty": it["amount"],
+                "price": it["price"],
+                "sum": it["sum"],
+                "vat_rate": 20,
+            }
+            for it in doc["items"]
+        ]
+        inn = str(3900000000 + int(supplier["code"]))
+        return {
+            "doc_type": "upd",
+            "doc_number": doc["documentNumber"],
+            "date": day.isoformat(),
+            "supplier": {"name": supplier["name"], "inn": inn},
+            "buyer": {"name": "ООО «Пиццерия»", "inn": "3906000000"},
+            "items": items,
+            "total_amount": round(sum(i["sum"] for i in items), 2),
+            "page_number": 1,
+            "total_pages": 1,
+            "group_key": f"{inn}_{doc['documentNumber']}_{day.isoformat()}",
+            "has_qr": False,
+            "confidence_score": 92,
+        }
+
+    async def completions(self, request: web.Request) -> web.Response:
+        if not request.headers.get("Authorization", "").startswith("Bearer "):
+            raise web.HTTPUnauthorized(text="api key required")
+        body = await request.json()
+        content = body["messages"][-1]["content"]
+        images = [p for p in content if p.get("type") == "image_url"]
+        image_bytes = sum(len(p["image_url"]["url"]) for p in images)
+
+        answer = json.dumps(self.invoice(self.requests), ensure_ascii=False)
+        self.requests += 1
+        self.images += len(images)
+        prompt_tokens = 1200 + image_bytes // _BYTES_PER_IMAGE_TOKEN
+        completion_tokens = len(answer) // 3
+        return web.json_response(
+            {
+                "id": f"chatcmpl-fake-{self.requests}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": answer},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            }
+        )
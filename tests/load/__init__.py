@@ -0,0 +1,15 @@
+"""
+Нагрузочный стенд бота: сколько сотрудников одновременно выдерживает
+Dispatcher, прежде чем латентность хэндлеров начнёт расти.
+
+Настоящий Dispatcher из main._build_bot_and_dp с фейковой сессией Bot API
+(telegram.FakeTelegramSession) и FSM в fakeredis; сотни виртуальных
+сотрудников проходят сценарии (journeys.JOURNEYS) — списание с поиском
+товара, накладная по шаблону, заявка с одобрением, отчёт дня. В отчёте —
+p50/p95/p99 латентности апдейтов по шагам, пропускная способность, исходы
+сценариев и задержка event loop (stats).
+
+    python -m tests.load --users 300 --duration 120 --out load.json
+
+Подробности запуска — в tests/load/__main__.py.
+"""
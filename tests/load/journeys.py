@@ -0,0 +1,210 @@
+"""
+Сценарии виртуальных сотрудников — пошаговые скрипты по экранам бота.
+
+Шаг — текст (Text), нажатие кнопки по префиксу callback_data (Press) или
+альбом фото (Photos). Press ждёт кнопку среди сообщений, которые бот прислал
+или изменил после предыдущего действия; не дождался — сценарий «застрял»
+и засчитывается как неуспешный с причиной «сценарий:шаг».
+
+Одобряющие (approve_loop) не ходят по сценариям: они ждут карточки
+списаний и заявок в своём чате и жмут «Одобрить», как админ точки.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import re
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from tests.load.telegram import VirtualUser
+
+STEP_TIMEOUT = 10.0  # сек ожидания кнопки после действия
+
+
+class Stuck(Exception):
+    """Бот не показал ожидаемую кнопку — сценарий дальше не пройти."""
+
+    def __init__(self, step: str, last_text: str):
+        super().__init__(f"{step}: {last_text[:120]!r}")
+        self.step = step
+
+
+@dataclass(slots=True, frozen=True)
+class Text:
+    label: str
+    text: str | Callable[[VirtualUser], str]
+
+
+@dataclass(slots=True, frozen=True)
+class Press:
+    label: str
+    prefix: str
+    optional: bool = False  # нет кнопки сразу — шаг пропускается
+    pick_random: bool = False
+
+
+@dataclass(slots=True, frozen=True)
+class Photos:
+    label: str
+    count: int | Callable[[], int]
+
+
+Step = Text | Press | Photos
+
+
+# ── генераторы ввода ──
+
+
+def product_query(vu: VirtualUser) -> str:
+    """«Товар 12» — находит «Товар 12», «Товар 120»… (до 11 позиций)."""
+    return f"Товар {vu.rnd.randint(1, 99)}"
+
+
+def grams(vu: VirtualUser) -> str:
+    return str(vu.rnd.choice((50, 100, 250, 500, 1000)))
+
+
+def template_quantities(vu: VirtualUser) -> str:
+    """По числу на позицию шаблона — их количество есть в тексте карточки."""
+    found = re.search(r"Позиции \((\d+) шт", vu.screen.last_text(vu.since))
+    count = int(found.group(1)) if found else 1
+    return "\n".join(str(vu.rnd.randint(1, 20) * 100) for _ in range(count))
+
+
+def _day_report_photos() -> int:
+    from bot.day_report_handlers import REQUIRED_PHOTOS
+
+    return REQUIRED_PHOTOS
+
+
+def _writeoff_item() -> tuple[Step, ...]:
+    return (
+        Text("search", product_query),
+        Press("product", "wo_prod:", pick_random=True),
+        Text("quantity", grams),
+    )
+
+
+def _request_item() -> tuple[Step, ...]:
+    return (
+        Text("search", product_query),
+        Press("product", "reqp:", pick_random=True),
+        Text("quantity", lambda vu: str(vu.rnd.randint(1, 10))),
+    )
+
+
+JOURNEYS: dict[str, tuple[Step, ...]] = {
+    # Списание: склад по должности (или выбором) → счёт → причина → товары
+    "writeoff": (
+        Text("start", "📝 Создать списание"),
+        Press("store", "wo_store:", optional=True),
+        Press("account", "wo_acc:", pick_random=True),
+        Text("reason", "Порча при хранении"),
+        *_writeoff_item(),
+        *_writeoff_item(),
+        Press("send", "wo_send"),
+    ),
+    # Расходная накладная по шаблону: шаблон → количества → отправка в iiko
+    "invoice_template": (
+        Text("start", "📦 Создать по шаблону"),
+        Press("template", "inv_tmpl:", pick_random=True),
+        Text("quantities", template_quantities),
+        Press("confirm", "inv_confirm_send"),
+    ),
+    # Заявка на точку-получатель → карточка одобряющим (approve_loop)
+    "request": (
+        Text("start", "✏️ Создать заявку"),
+        *_request_item(),
+        *_request_item(),
+        Press("send", "req_send"),
+        Press("confirm", "req_confirm_send"),
+    ),
+    # Отчёт дня: плюсы → минусы → альбом фото блюд
+    "day_report": (
+        Text("start", "📋 Отчёт дня"),
+        Text("positives", "Быстрая отдача, чистый зал"),
+        Text("negatives", "Задержка поставки теста"),
+        Photos("photos", _day_report_photos),
+    ),
+}
+
+# Доля сценариев в смене (по логам: списания и заявки — основная нагрузка)
+DEFAULT_MIX: dict[str, float] = {
+    "writeoff": 0.4,
+    "request": 0.3,
+    "invoice_template": 0.2,
+    "day_report": 0.1,
+}
+
+APPROVE_PREFIXES = {"woa_approve:": "writeoff", "req_approve:": "request"}
+
+
+async def run_journey(
+    vu: VirtualUser,
+    name: str,
+    *,
+    think: Callable[[], float] = lambda: 0.0,
+    timeout: float = STEP_TIMEOUT,
+) -> None:
+    """Пройти сценарий; Stuck — если бот не показал нужную кнопку."""
+    for step in JOURNEYS[name]:
+        label = f"{name}:{step.label}"
+        if isinstance(step, Press):
+            wait = 0.0 if step.optional else timeout
+            found = await vu.screen.wait_buttons(step.prefix, vu.since, wait)
+            if not found:
+                if step.optional:
+                    continue
+                text = vu.screen.last_alert or vu.screen.last_text(vu.since)
+                raise Stuck(label, text)
+            message, data = vu.rnd.choice(found) if step.pick_random else found[0]
+            await asyncio.sleep(think())
+            await vu.press(label, message, data)
+        elif isinstance(step, Text):
+            text = step.text(vu) if callable(step.text) else step.text
+            await asyncio.sleep(think())
+            await vu.send_text(label, text)
+        else:
+            count = step.count() if callable(step.count) else step.count
+            await asyncio.sleep(think())
+            await vu.send_photos(label, count)
+
+
+def _approve_button(message: dict) -> tuple[str, str] | None:
+    rows = (message.get("reply_markup") or {}).get("inline_keyboard", [])
+    for row in rows:
+        for b in row:
+            data = b.get("callback_data") or ""
+            for prefix, kind in APPROVE_PREFIXES.items():
+                if data.startswith(prefix):
+                    return kind, data
+    return None
+
+
+async def approve_loop(
+    vu: VirtualUser,
+    stop: asyncio.Event,
+    *,
+    think: Callable[[], float] = lambda: 0.0,
+    on_approve: Callable[[str], None] = lambda kind: None,
+) -> None:
+    """Одобряющий: каждая новая карточка с «Одобрить» — одно нажатие."""
+    handled: set[int] = set()
+    seen = 0
+    while not stop.is_set():
+        current = vu.screen.rev
+        for message in vu.screen.newer(seen):
+            if message["message_id"] in handled or not _approve_button(message):
+                continue
+            handled.add(message["message_id"])
+            await asyncio.sleep(think())
+            # Карточку мог уже одобрить другой — тогда кнопки у нас сняты
+            fresh = vu.screen.messages.get(message["message_id"])
+            button = fresh and _approve_button(fresh)
+            if button:
+                kind, data = button
+                await vu.press(f"approve:{kind}", fresh, data)
+                on_approve(kind)
+        seen = current
+        await vu.screen.wait_changed(seen, 0.5)
@@ -0,0 +1,246 @@
+"""
+Подготовка БД и Google Таблицы к нагрузочному прогону.
+
+Справочники — обычной синхронизацией с фейкового iiko (как в tests/bench);
+поверх — то, что в боевой базе настраивают руками: счета списания, склады
+как контрагенты, папки номенклатуры для списаний, прайс-лист, шаблоны
+накладных. Виртуальные сотрудники — настоящие iiko_employee с telegram_id и
+рестораном, права — вкладка «Права доступа» на фейковом Sheets.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import uuid
+from dataclasses import dataclass
+
+from sqlalchemy import insert, update
+
+from tests.bench import pipelines
+from tests.fakes import Dataset
+
+logger = logging.getLogger(__name__)
+
+TG_ID_BASE = 900_000_000  # telegram_id виртуальных сотрудников
+TEMPLATES_PER_DEPARTMENT = 3
+TEMPLATE_ITEMS = 8
+WRITEOFF_ACCOUNTS = ("Списание кухня", "Списание бар")
+REVENUE_ACCOUNT = "Реализация на точки"
+
+
+@dataclass(slots=True, frozen=True)
+class Staff:
+    """Виртуальный сотрудник: кем он пишет боту."""
+
+    tg_id: int
+    name: str
+    department_id: str
+    approver: bool = False
+
+
+def _staff_permissions(approver: bool) -> set[str]:
+    from bot import permission_map as pm
+
+    perms = {
+        pm.PERM_WRITEOFF_CREATE,
+        pm.PERM_INVOICE_CREATE,
+        pm.PERM_REQUEST_CREATE,
+        pm.PERM_REPORT_VIEW,
+        pm.PERM_DAY_REPORT,
+    }
+    if approver:
+        perms |= {
+            pm.PERM_WRITEOFF_APPROVE,
+            pm.PERM_REQUEST_APPROVE,
+            pm.PERM_DAY_REPORT_RECEIVE,
+            pm.PERM_PENDING_VIEW,
+        }
+    return perms
+
+
+def _kind_stores(ds: Dataset, dept_id: str) -> dict[str, dict]:
+    """{'кухня': store, 'бар': store} подразделения."""
+    result: dict[str, dict] = {}
+    for store in ds.stores:
+        if ds.store_department[store["id"]] == dept_id:
+            result.setdefault(store["name"].split(" ", 1)[0].lower(), store)
+    return result
+
+
+async def _seed_catalogs(ds: Dataset) -> None:
+    """Ручные настройки боевой базы, без которых сценарии упираются в «не найдено»."""
+    from db.engine import async_session_factory
+    from db.models import (
+        Entity,
+        GSheetExportGroup,
+        InvoiceTemplate,
+        PriceProduct,
+        Supplier,
+    )
+
+    rnd = random.Random(f"{ds.seed}:load")
+    accounts = [
+        {"id": uuid.uuid4(), "root_type": "Account", "name": name, "deleted": False}
+        for name in (*WRITEOFF_ACCOUNTS, REVENUE_ACCOUNT)
+    ]
+    revenue = accounts[-1]
+    # Склады зарегистрированы в iiko контрагентами — для заявок между точками
+    store_suppliers = [
+        {"id": uuid.uuid4(), "name": s["name"], "code": s["code"], "deleted": False}
+        for s in ds.stores
+    ]
+    roots = [
+        {"group_id": uuid.UUID(g["id"]), "group_name": g["name"]}
+        for g in ds.product_groups
+        if g["parent"] is None
+    ]
+    # Прайс-лист: отгрузка с кухни / бара точки, куда приходят заявки
+    source = list(_kind_stores(ds, ds.departments[0]["id"]).values())[:2]
+    price = [
+        {
+            "product_id": uuid.UUID(g["id"]),
+            "product_name": g["name"],
+            "product_type": "GOODS",
+            "cost_price": round(g["defaultSalePrice"] * 0.4, 2),
+            "unit_name": ds.product_unit[g["id"]],
+            "store_id": uuid.UUID(source[i % len(source)]["id"]),
+            "store_name": source[i % len(source)]["name"],
+        }
+        for i, g in enumerate(ds.goods)
+    ]
+    templates = []
+    for dept in ds.departments:
+        kitchen = _kind_stores(ds, dept["id"]).get("кухня") or ds.stores[0]
+        for n in range(TEMPLATES_PER_DEPARTMENT):
+            supplier = rnd.choice(ds.suppliers)
+            templates.append(
+                {
+                    "name": f"Шаблон {n + 1} ({dept['name']})",
+                    "created_by": 0,
+                    "department_id": uuid.UUID(dept["id"]),
+                    "counteragent_id": uuid.UUID(supplier["id"]),
+                    "counteragent_name": supplier["name"],
+                    "account_id": revenue["id"],
+                    "account_name": revenue["name"],
+                    "store_id": uuid.UUID(kitchen["id"]),
+                    "store_name": kitchen["name"],
+                    "items": [
+                        {
+                            "product_id": g["id"],
+                            "name": g["name"],
+                            "unit_name": ds.product_unit[g["id"]],
+                            "main_unit": g["mainUnit"],
+                        }
+                        for g in rnd.sample(ds.goods, TEMPLATE_ITEMS)
+                    ],
+                }
+            )
+
+    async with async_session_factory() as session:
+        await session.execute(insert(Entity), accounts)
+        await session.execute(insert(Supplier), store_suppliers)
+        await session.execute(insert(GSheetExportGroup), roots)
+        await session.execute(insert(PriceProduct), price)
+        await session.execute(insert(InvoiceTemplate), templates)
+        await session.commit()
+    logger.info(
+        "[load] Каталоги: %d позиций прайса, %d шаблонов", len(price), len(templates)
+    )
+
+
+async def _seed_staff(ds: Dataset, users: int, approvers: int) -> list[Staff]:
+    """telegram_id + ресторан сотрудникам iiko. Точка-получатель заявок — не их."""
+    from db.engine import async_session_factory
+    from db.models import Employee
+
+    active = [e for e in ds.employees if e["deleted"] == "false"]
+    if users + approvers > len(active):
+        raise SystemExit(
+            f"Сотрудников в наборе {len(active)}, а нужно {users + approvers} — "
+            "увеличьте --scale."
+        )
+    depts = ds.departments[1:] or ds.departments
+    staff = [
+        Staff(
+            tg_id=TG_ID_BASE + i,
+            name=emp["name"],
+            department_id=(
+                ds.departments[0] if i < approvers else depts[i % len(depts)]
+            )["id"],
+            approver=i < approvers,
+        )
+        for i, emp in enumerate(active[: users + approvers])
+    ]
+    rows = [
+        {
+            "id": uuid.UUID(emp["id"]),
+            "telegram_id": s.tg_id,
+            "department_id": uuid.UUID(s.department_id),
+        }
+        for s, emp in zip(staff, active)
+    ]
+    async with async_session_factory() as session:
+        await session.execute(update(Employee), rows)
+        await session.commit()
+    return staff
+
+
+def _write_tabs(tabs: dict[str, list[list[str]]]) -> None:
+    """Перезаписать вкладки MIN_STOCK_SHEET_ID (синхронно — gspread)."""
+    import gspread
+
+    from adapters import google_sheets as gsheet
+    from config import MIN_STOCK_SHEET_ID
+
+    spreadsheet = gsheet._get_client().open_by_key(MIN_STOCK_SHEET_ID)
+    for title, rows in tabs.items():
+        try:
+            ws = spreadsheet.worksheet(title)
+        except gspread.exceptions.WorksheetNotFound:
+            ws = spreadsheet.add_worksheet(
+                title=title, rows=len(rows) + 10, cols=max(map(len, rows)) + 2
+            )
+        ws.clear()
+        ws.update(rows, "A1")
+    gsheet._snapshots.clear()
+
+
+async def _seed_sheets(ds: Dataset, staff: list[Staff]) -> None:
+    """Матрица прав и «Заведение для заявок» — как их заполняют админы."""
+    from adapters.google_sheets import PERMS_TAB, SETTINGS_TAB
+    from bot.permission_map import ALL_COLUMN_KEYS
+
+    perms = [["", "telegram_id", *ALL_COLUMN_KEYS], ["Сотрудник", "Telegram ID"]]
+    perms[1] += ALL_COLUMN_KEYS
+    for s in staff:
+        granted = _staff_permissions(s.approver)
+        perms.append(
+            [
+                s.name,
+                str(s.tg_id),
+                *("✅" if k in granted else "" for k in ALL_COLUMN_KEYS),
+            ]
+        )
+    hub = ds.departments[0]
+    settings = [
+        ["## Заведение для заявок"],
+        ["Заведение куда приходят заявки", "", hub["name"], hub["id"]],
+    ]
+    await asyncio.to_thread(_write_tabs, {PERMS_TAB: perms, SETTINGS_TAB: settings})
+
+
+async def prepare(ds: Dataset, users: int, approvers: int) -> list[Staff]:
+    """Чистая БД → справочники → ручные настройки → сотрудники и права."""
+    from db.init_db import create_tables, drop_tables
+
+    pipelines.check_database_name()
+    await drop_tables()
+    await create_tables()
+    await pipelines.sync_everything(ds, pipelines.Fixture())
+    await _seed_catalogs(ds)
+    staff = await _seed_staff(ds, users, approvers)
+    await _seed_sheets(ds, staff)
+    logger.info("[load] Стенд готов: %d сотрудников, %d одобряющих", users, approvers)
+    return staff
@@ -0,0 +1,181 @@
+"""
+Метрики нагрузочного прогона: латентность апдейтов по шагам сценариев,
+пропускная способность, исходы сценариев и задержка event loop.
+
+Латентность — полное время dp.feed_raw_update (middleware + хэндлер +
+ответы Bot API), как его видит webhook. Задержка loop — отдельным
+семплером с шагом 50 мс (боевой монитор utils.metrics меряет раз в 0.5 с —
+для p99 под нагрузкой этого мало).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import Counter, defaultdict
+from typing import Any
+
+LAG_INTERVAL = 0.05
+
+
+def percentile(values: list[float], q: float) -> float:
+    """q-й перцентиль (0..100) с линейной интерполяцией; [] → 0."""
+    if not values:
+        return 0.0
+    data = sorted(values)
+    pos = (len(data) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(data) - 1)
+    return data[lo] + (data[hi] - data[lo]) * (pos - lo)
+
+
+def distribution_ms(values: list[float]) -> dict[str, float]:
+    """count / p50 / p95 / p99 / max в миллисекундах."""
+    return {
+        "count": len(values),
+        "p50": round(percentile(values, 50) * 1000, 1),
+        "p95": round(percentile(values, 95) * 1000, 1),
+        "p99": round(percentile(values, 99) * 1000, 1),
+        "max": round(max(values, default=0.0) * 1000, 1),
+    }
+
+
+class Recorder:
+    """Сырые замеры прогона: апдейты по шагам, исходы сценариев, одобрения."""
+
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.journeys: Counter[str] = Counter()
+        self.failures: Counter[str] = Counter()
+        self.approvals: Counter[str] = Counter()
+        self.started = time.perf_counter()
+        self.finished: float | None = None
+
+    def observe(self, label: str, seconds: float) -> None:
+        self.latencies[label].append(seconds)
+
+    def journey(self, name: str, error: BaseException | None = None) -> None:
+        self.journeys[f"{name}:{'failed' if error else 'ok'}"] += 1
+        if error is not None:
+            step = getattr(error, "step", None) or f"{name}:{type(error).__name__}"
+            self.failures[step] += 1
+
+    def approved(self, kind: str) -> None:
+        self.approvals[kind] += 1
+
+    def start(self) -> None:
+        self.started = time.perf_counter()
+
+    def stop(self) -> None:
+        self.finished = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+
+class LoopLagSampler:
+    """Насколько sleep(interval) просыпается позже срока — все замеры подряд."""
+
+    def __init__(self, interval: float = LAG_INTERVAL):
+        self.interval = interval
+        self.samples: list[float] = []
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            t0 = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - t0 - self.interval))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def _handler_totals(top: int = 10) -> list[dict[str, Any]]:
+    """Самые затратные хэндлеры по bot_handler_duration_seconds (sum)."""
+    from utils.metrics import HANDLER_LATENCY
+
+    rows = [
+        {
+            "handler": "/".join(labels),
+            "count": child.count,
+            "total_sec": round(child.sum, 3),
+            "mean_ms": round(child.sum / child.count * 1000, 1) if child.count else 0,
+        }
+        for labels, child in HANDLER_LATENCY._children.items()
+    ]
+    return sorted(rows, key=lambda r: r["total_sec"], reverse=True)[:top]
+
+
+def summarize(
+    rec: Recorder,
+    lag: LoopLagSampler,
+    *,
+    telegram_calls: Counter[str] | None = None,
+    meta: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """JSON-отчёт прогона."""
+    every = [v for values in rec.latencies.values() for v in values]
+    elapsed = rec.elapsed
+    return {
+        "meta": {**(meta or {}), "elapsed_sec": round(elapsed, 1)},
+        "updates": {
+            "count": len(every),
+            "per_sec": round(len(every) / elapsed, 1) if elapsed else 0.0,
+        },
+        "latency_ms": distribution_ms(every),
+        "latency_by_step_ms": {
+            label: distribution_ms(values)
+            for label, values in sorted(rec.latencies.items())
+        },
+        "journeys": dict(sorted(rec.journeys.items())),
+        "failures": dict(rec.failures.most_common()),
+        "approvals": dict(rec.approvals),
+        "loop_lag_ms": distribution_ms(lag.samples),
+        "telegram_calls": dict((telegram_calls or Counter()).most_common()),
+        "handlers": _handler_totals(),
+    }
+
+
+def format_summary(report: dict[str, Any]) -> str:
+    """Короткая таблица для консоли."""
+    lat, lag, upd = report["latency_ms"], report["loop_lag_ms"], report["updates"]
+    lines = [
+        f"апдейтов: {upd['count']} за {report['meta']['elapsed_sec']} сек "
+        f"({upd['per_sec']}/сек)",
+        f"латентность, мс: p50 {lat['p50']}  p95 {lat['p95']}  p99 {lat['p99']}  "
+        f"max {lat['max']}",
+        f"задержка loop, мс: p50 {lag['p50']}  p95 {lag['p95']}  p99 {lag['p99']}  "
+        f"max {lag['max']}",
+        "",
+        f"{'шаг':<32}{'n':>7}{'p50':>9}{'p95':>9}{'p99':>9}",
+    ]
+    for label, d in report["latency_by_step_ms"].items():
+        lines.append(
+            f"{label:<32}{d['count']:>7}{d['p50']:>9}{d['p95']:>9}{d['p99']:>9}"
+        )
+    lines.append("")
+    lines.append(
+        "сценарии: "
+        + ", ".join(f"{k} {v}" for k, v in report["journeys"].items())
+        + (
+            "; одобрено: "
+            + ", ".join(f"{k} {v}" for k, v in report["approvals"].items())
+            if report["approvals"]
+            else ""
+        )
+    )
+    for step, n in report["failures"].items():
+        lines.append(f"  застряли на {step}: {n}")
+    return "\n".join(lines)
@@ -0,0 +1,309 @@
+"""
+Фейковый Bot API для нагрузочного стенда: сессия aiogram без сети.
+
+FakeTelegramSession отвечает на методы Bot API так, как ответил бы Telegram
+(Message на send*/edit*, True на остальное), и ведёт «экран» каждого чата —
+сообщения бота с inline-кнопками. Виртуальный пользователь (VirtualUser)
+шлёт в Dispatcher синтетические Update и жмёт кнопки с этого экрана.
+Ответ проходит через check_response — те же JSON-декодирование и валидация
+pydantic, что и у боевой AiohttpSession.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import random
+import time
+from collections import Counter
+from collections.abc import AsyncGenerator
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+from aiogram.types import InlineKeyboardMarkup, ReplyKeyboardMarkup, ReplyKeyboardRemove
+
+BOT_USER = {
+    "id": 1,
+    "is_bot": True,
+    "first_name": "Load Bot",
+    "username": "load_bot",
+}
+
+# Методы, возвращающие Message (или True для inline_message_id)
+_EDIT_METHODS = frozenset(
+    {"editMessageText", "editMessageCaption", "editMessageReplyMarkup"}
+)
+
+
+class Screen:
+    """
+    Что видит пользователь в чате с ботом: сообщения бота (сырой JSON, как
+    пришёл бы в Update) и reply-клавиатура. Каждое изменение сообщения
+    получает номер ревизии — пользователь жмёт только кнопки, появившиеся
+    после его последнего действия.
+    """
+
+    def __init__(self, chat_id: int):
+        self.chat_id = chat_id
+        self.messages: dict[int, dict[str, Any]] = {}
+        self.revisions: dict[int, int] = {}
+        self.reply_keyboard: list[str] = []
+        self.last_alert = ""
+        self.rev = 0
+        self._changed = asyncio.Event()
+
+    def put(self, message: dict[str, Any]) -> None:
+        self.rev += 1
+        self.messages[message["message_id"]] = message
+        self.revisions[message["message_id"]] = self.rev
+        self._changed.set()
+
+    def delete(self, message_id: int) -> None:
+        self.messages.pop(message_id, None)
+        self.revisions.pop(message_id, None)
+
+    def newer(self, since: int) -> list[dict[str, Any]]:
+        """Сообщения, изменённые после ревизии since, — от новых к старым."""
+        ids = [mid for mid, rev in self.revisions.items() if rev > since]
+        return [self.messages[mid] for mid in sorted(ids, reverse=True)]
+
+    def buttons(self, prefix: str, since: int = 0) -> list[tuple[dict, str]]:
+        """callback_data с префиксом из самого нового сообщения, где они есть."""
+        for message in self.newer(since):
+            rows = (message.get("reply_markup") or {}).get("inline_keyboard", [])
+            found = [
+                (message, b["callback_data"])
+                for row in rows
+                for b in row
+                if (b.get("callback_data") or "").startswith(prefix)
+            ]
+            if found:
+                return found
+        return []
+
+    def last_text(self, since: int = 0) -> str:
+        newer = self.newer(since)
+        return (newer[0].get("text") or newer[0].get("caption") or "") if newer else ""
+
+    async def wait_changed(self, since: int, timeout: float) -> bool:
+        """Дождаться ревизии новее since; False — по таймауту."""
+        if self.rev > since:
+            return True
+        self._changed.clear()
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def wait_buttons(
+        self, prefix: str, since: int, timeout: float
+    ) -> list[tuple[dict, str]]:
+        """Дождаться кнопок (ответ бывает из фоновой задачи хэндлера)."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not (found := self.buttons(prefix, since)):
+            remaining = deadline - loop.time()
+            if remaining <= 0 or not await self.wait_changed(self.rev, remaining):
+                return []
+        return found
+
+
+class FakeTelegramSession(BaseSession):
+    """
+    Сессия aiogram вместо AiohttpSession: запрос к Bot API → ответ из памяти
+    через latency_ms (RTT до api.telegram.org). Счётчик вызовов по методам —
+    в calls; методы, на которые фейк не умеет ответить, — в unsupported.
+    """
+
+    def __init__(self, latency_ms: float = 0.0):
+        super().__init__()
+        self.latency = latency_ms / 1000
+        self.screens: dict[int, Screen] = {}
+        self.calls: Counter[str] = Counter()
+        self.unsupported: Counter[str] = Counter()
+        self._message_ids = itertools.count(1)
+
+    def screen(self, chat_id: int) -> Screen:
+        if chat_id not in self.screens:
+            self.screens[chat_id] = Screen(chat_id)
+        return self.screens[chat_id]
+
+    def next_message_id(self) -> int:
+        return next(self._message_ids)
+
+    async def close(self) -> None:
+        pass
+
+    async def stream_content(
+        self,
+        url: str,
+        headers: dict[str, Any] | None = None,
+        timeout: int = 30,
+        chunk_size: int = 65536,
+        raise_for_status: bool = True,
+    ) -> AsyncGenerator[bytes, None]:
+        """Скачивание файлов — пустое (сценарии стенда файлы не скачивают)."""
+        yield b""
+
+    async def make_request(
+        self, bot: Bot, method: TelegramMethod[Any], timeout: int | None = None
+    ) -> Any:
+        name = method.__api_method__
+        self.calls[name] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        result = self._result(name, method)
+        content = self.json_dumps({"ok": True, "result": result})
+        return self.check_response(bot, method, 200, content).result
+
+    # ── ответы ──
+
+    def _message(self, chat_id: int, method: Any, message_id: int | None = None):
+        message: dict[str, Any] = {
+            "message_id": message_id or self.next_message_id(),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+        }
+        text = getattr(method, "text", None)
+        caption = getattr(method, "caption", None)
+        if isinstance(text, str):
+            message["text"] = text
+        elif isinstance(caption, str):
+            message["caption"] = caption
+        markup = getattr(method, "reply_markup", None)
+        screen = self.screen(chat_id)
+        if isinstance(markup, InlineKeyboardMarkup):
+            message["reply_markup"] = markup.model_dump(mode="json", exclude_none=True)
+        elif isinstance(markup, ReplyKeyboardMarkup):
+            screen.reply_keyboard = [b.text for row in markup.keyboard for b in row]
+        elif isinstance(markup, ReplyKeyboardRemove):
+            screen.reply_keyboard = []
+        return message
+
+    def _result(self, name: str, method: Any) -> Any:
+        if name == "getMe":
+            return BOT_USER
+        if name == "sendMediaGroup":
+            screen = self.screen(int(method.chat_id))
+            messages = [self._message(screen.chat_id, m) for m in method.media]
+            for message in messages:
+                screen.put(message)
+            return messages
+        if name in _EDIT_METHODS:
+            if getattr(method, "inline_message_id", None):
+                return True
+            screen = self.screen(int(method.chat_id))
+            message = self._message(screen.chat_id, method, method.message_id)
+            if name == "editMessageReplyMarkup":
+                # Текст прежний, меняется только клавиатура
+                old = screen.messages.get(method.message_id, message)
+                kept = {k: v for k, v in old.items() if k != "reply_markup"}
+                message = {**kept, **message}
+            screen.put(message)
+            return message
+        if name == "deleteMessage":
+            self.screen(int(method.chat_id)).delete(method.message_id)
+            return True
+        if name == "answerCallbackQuery":
+            if method.show_alert and method.text:
+                # chat_id в answerCallbackQuery нет — alert по id запроса
+                chat_id = int(method.callback_query_id.split(":", 1)[0])
+                self.screen(chat_id).last_alert = method.text
+            return True
+        if name.startswith("send") and name != "sendChatAction":
+            screen = self.screen(int(method.chat_id))
+            message = self._message(screen.chat_id, method)
+            screen.put(message)
+            return message
+        if method.__returning__ is not bool:
+            self.unsupported[name] += 1
+        return True
+
+
+class VirtualUser:
+    """
+    Сотрудник на стороне Telegram: шлёт боту текст, фото и нажатия кнопок
+    синтетическими Update через dp.feed_raw_update — тем же путём, что и
+    webhook. Время обработки каждого апдейта → observe(label, секунды).
+    """
+
+    _update_ids = itertools.count(1)
+    _callback_ids = itertools.count(1)
+
+    def __init__(
+        self,
+        dp: Dispatcher,
+        bot: Bot,
+        session: FakeTelegramSession,
+        tg_id: int,
+        name: str,
+        *,
+        observe=None,
+        seed: int = 0,
+    ):
+        self.dp = dp
+        self.bot = bot
+        self.session = session
+        self.tg_id = tg_id
+        self.user = {"id": tg_id, "is_bot": False, "first_name": name}
+        self.screen = session.screen(tg_id)
+        self.observe = observe or (lambda label, seconds: None)
+        self.rnd = random.Random(f"{seed}:{tg_id}")
+        self.since = 0  # ревизия экрана перед последним действием
+
+    def _message(self, **fields) -> dict[str, Any]:
+        return {
+            "message_id": self.session.next_message_id(),
+            "date": int(time.time()),
+            "chat": {"id": self.tg_id, "type": "private"},
+            "from": self.user,
+            **fields,
+        }
+
+    async def feed(self, label: str, update: dict[str, Any]) -> None:
+        self.since = self.screen.rev
+        update = {"update_id": next(self._update_ids), **update}
+        t0 = time.perf_counter()
+        try:
+            await self.dp.feed_raw_update(self.bot, update)
+        finally:
+            self.observe(label, time.perf_counter() - t0)
+
+    async def send_text(self, label: str, text: str) -> None:
+        await self.feed(label, {"message": self._message(text=text)})
+
+    async def send_photos(self, label: str, count: int) -> None:
+        """Альбом: count апдейтов с общим media_group_id — параллельно."""
+        group = f"{self.tg_id}-{next(self._update_ids)}"
+        messages = [
+            self._message(
+                media_group_id=group,
+                photo=[
+                    {
+                        "file_id": f"photo-{group}-{i}",
+                        "file_unique_id": f"u-{group}-{i}",
+                        "width": 1280,
+                        "height": 960,
+                    }
+                ],
+            )
+            for i in range(count)
+        ]
+        since = self.screen.rev
+        await asyncio.gather(*(self.feed(label, {"message": m}) for m in messages))
+        self.since = since
+
+    async def press(self, label: str, message: dict[str, Any], data: str) -> None:
+        callback = {
+            # «chat_id:n» — по нему фейк находит чат для show_alert
+            "id": f"{self.tg_id}:{next(self._callback_ids)}",
+            "from": self.user,
+            "chat_instance": str(self.tg_id),
+            "message": message,
+            "data": data,
+        }
+        await self.feed(label, {"callback_query": callback})
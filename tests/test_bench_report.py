@@ -0,0 +1,116 @@
+"""
+Тесты: инструменты бенчмарка (tests/bench) без Postgres — замеры,
+стенд отдельным процессом, сравнение с baseline.
+
+Запуск: pytest tests/test_bench_report.py -v
+"""
+
+import asyncio
+
+from sqlalchemy import create_engine, text
+
+from adapters import iiko_api
+from tests.bench import report
+from tests.bench.metrics import Sample, count_statements, measure
+from tests.bench.stack import RemoteStack
+from tests.fakes import point_adapters
+
+
+def _report(**by_pipeline) -> dict:
+    return {"meta": {}, "results": by_pipeline}
+
+
+def _sample(**kw) -> dict:
+    base = {
+        **Sample().as_dict(),
+        "wall_sec": 1.0,
+        "db_roundtrips": 10,
+        "alloc_peak_mb": 20.0,
+        "rss_delta_mb": 50.0,
+    }
+    return {**base, **kw}
+
+
+def test_compare_threshold_and_noise_floor():
+    baseline = _report(
+        sync={"1": _sample(), "5": _sample(wall_sec=0.003)},
+        opiu={"1": _sample()},
+    )
+    current = _report(
+        sync={
+            "1": _sample(wall_sec=1.3, db_roundtrips=13),
+            "5": _sample(wall_sec=0.005),  # +66%, но в пределах шума
+        },
+        opiu={"1": _sample(wall_sec=1.1, alloc_peak_mb=30.0)},
+        new={"1": _sample()},  # нет в baseline — не сравнивается
+    )
+
+    found = report.compare(current, baseline, threshold=0.2)
+
+    assert {(r.pipeline, r.scale, r.metric) for r in found} == {
+        ("sync", "1", "wall_sec"),
+        ("sync", "1", "db_roundtrips"),
+        ("opiu", "1", "alloc_peak_mb"),
+    }
+    assert "+30%" in str(next(r for r in found if r.metric == "wall_sec"))
+
+
+def test_compare_new_error_is_regression():
+    baseline = _report(ocr={"1": _sample()})
+    current = _report(ocr={"1": _sample(wall_sec=0.1, error="RuntimeError: OCR")})
+
+    (found,) = report.compare(current, baseline)
+
+    assert found.metric == "error" and "OCR" in str(found)
+
+
+def test_report_roundtrip(tmp_path):
+    rep = report.new_report(seed=1)
+    rep["results"]["sync"] = {"1": {**_sample(), "result": "list[3]"}}
+    path = tmp_path / "bench.json"
+
+    report.save(rep, path)
+
+    assert report.load(path) == rep
+    assert "sync" in report.format_table(rep)
+
+
+def test_count_statements():
+    engine = create_engine("sqlite://")
+    with count_statements(engine) as counter, engine.connect() as conn:
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+        conn.execute(text("INSERT INTO t VALUES (:x)"), [{"x": i} for i in range(50)])
+        conn.execute(text("SELECT count(*) FROM t"))
+    assert counter[0] == 3  # executemany — один round trip
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert counter[0] == 3  # слушатель снят
+
+
+async def test_measure_error_and_allocations():
+    async def allocate():
+        data = [bytes(1024) for _ in range(4096)]  # ~4 МБ
+        await asyncio.sleep(0.01)
+        return data
+
+    async def broken():
+        raise ValueError("boom")
+
+    ok = await measure(allocate)
+    failed = await measure(broken)
+
+    assert ok.error is None and ok.result == "list[4096]"
+    assert ok.wall_sec >= 0.01 and ok.alloc_peak_mb >= 4
+    assert failed.error == "ValueError: boom" and failed.alloc_peak_mb == 0
+
+
+async def test_remote_stack_counts_requests():
+    """Стенд в дочернем процессе: адреса из export, запросы — через /__fake/stats."""
+    async with RemoteStack(scale=0.2) as stack:
+        async with point_adapters(stack.env()):
+            sample = await measure(iiko_api.fetch_departments, stack=stack)
+            again = await measure(iiko_api.fetch_departments, stack=stack)
+
+    assert sample.error is None
+    assert sample.http_requests == {"iiko": 2}  # auth + departments
+    assert again.http_requests == {"iiko": 1}  # токен уже в кеше
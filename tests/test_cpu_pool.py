@@ -0,0 +1,96 @@
+"""
+Тесты: пул процессов для CPU-bound задач (utils/cpu_pool.py).
+
+Поднимаются настоящие spawn-воркеры (без warmup — быстрее старт).
+Запуск: pytest tests/test_cpu_pool.py -v
+"""
+
+import asyncio
+import os
+import time
+
+import pytest
+
+from utils.cpu_pool import CpuPool, CpuPoolBusy
+from utils.photo_validator import _validate_photo_sync
+from tests.test_image_prep import _document, _jpeg
+
+
+def _die_once(marker: str) -> str:
+    """Первый вызов убивает воркер (как OOM), повторный — отрабатывает."""
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return "ok"
+
+
+def _sleep_ok(seconds: float) -> str:
+    time.sleep(seconds)
+    return "ok"
+
+
+@pytest.fixture
+async def pool():
+    p = CpuPool(workers=2, max_waiting=1, warmup=())
+    yield p
+    p.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_bytes_in_result_out_matches_sync(pool):
+    data = _jpeg(_document(800, 1000))
+
+    result = await pool.run(_validate_photo_sync, data)
+
+    assert result == _validate_photo_sync(data)
+    stats = pool.stats()
+    assert (stats["completed"], stats["failed"], stats["in_flight"]) == (1, 0, 0)
+    assert stats["exec_p50_ms"] > 0
+
+
+@pytest.mark.asyncio
+async def test_backpressure_waits_then_rejects():
+    pool = CpuPool(workers=1, max_waiting=1, warmup=())
+    try:
+        await pool.start()
+        running = [asyncio.create_task(pool.run(time.sleep, 0.3)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+
+        stats = pool.stats()
+        assert (stats["in_flight"], stats["queue_depth"]) == (2, 1)
+        with pytest.raises(CpuPoolBusy):
+            await pool.run(time.sleep, 0)
+
+        await asyncio.gather(*running)
+        stats = pool.stats()
+        assert (stats["completed"], stats["rejected"]) == (3, 1)
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_broken_worker_restarts_pool_and_retries(pool, tmp_path):
+    assert await pool.run(_die_once, str(tmp_path / "marker")) == "ok"
+    assert pool.stats()["restarts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_failures_restart_pool_once(pool, tmp_path):
+    """Все задачи сломанного пула падают разом — пересоздаёт только первая."""
+    await pool.start()
+    first = pool._executor
+    results = await asyncio.gather(
+        pool.run(_sleep_ok, 0.5),
+        pool.run(_die_once, str(tmp_path / "marker")),
+    )
+
+    assert results == ["ok", "ok"]
+    assert pool.stats()["restarts"] == 1
+    assert pool._executor is not first
+
+
+@pytest.mark.asyncio
+async def test_disabled_pool_runs_in_thread():
+    pool = CpuPool(workers=0)
+    assert await pool.run(sum, [1, 2, 3]) == 6
+    assert pool._executor is None
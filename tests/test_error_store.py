@@ -0,0 +1,158 @@
+"""
+Тесты: группировка ошибок по отпечатку (use_cases/error_store.py).
+
+БД не нужна: save_error и сессия подменяются, SQL компилируется
+диалектом PostgreSQL.
+Запуск: pytest tests/test_error_store.py -v
+"""
+
+import asyncio
+import logging
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from use_cases import error_store
+
+
+@pytest.fixture(autouse=True)
+async def _reset_aggregator():
+    error_store._pending.clear()
+    error_store._sampled.clear()
+    for key in error_store._stats:
+        error_store._stats[key] = 0
+    yield
+    if error_store._flush_task is not None:
+        error_store._flush_task.cancel()
+        error_store._flush_task = None
+    error_store._pending.clear()
+
+
+class _Session:
+    """Заглушка AsyncSession: запоминает запросы."""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.statements: list = []
+        self.commit = AsyncMock()
+
+    async def execute(self, stmt, params=None):
+        if self.fail:
+            raise ConnectionError("db down")
+        self.statements.append(stmt)
+        return MagicMock(
+            one=MagicMock(return_value=(0, 0, 0)), __iter__=lambda s: iter(())
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def _patch_session(session):
+    return patch.object(
+        error_store, "async_session_factory", MagicMock(return_value=session)
+    )
+
+
+def _sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+def _record(msg, *args, exc=None, name="bot.iiko") -> logging.LogRecord:
+    exc_info = (type(exc), exc, exc.__traceback__) if exc else None
+    return logging.LogRecord(name, logging.ERROR, "", 0, msg, args, exc_info)
+
+
+def _fetch_order(order_id: int) -> None:
+    raise TimeoutError(f"iiko timeout for order {order_id}")
+
+
+def _raised(fn, *args) -> BaseException:
+    try:
+        fn(*args)
+    except Exception as exc:
+        return exc
+
+
+def test_fingerprint_ignores_variable_parts():
+    fp = error_store.error_fingerprint
+
+    # Исключение: тип + кадры, без текста и номеров строк
+    a = fp(_record("sync failed", exc=_raised(_fetch_order, 1)))
+    b = fp(_record("sync failed again", exc=_raised(_fetch_order, 2)))
+    other = fp(_record("sync failed", exc=_raised(int, "x")))
+    assert a[0] == b[0] != other[0]
+    assert a[1] == "builtins.TimeoutError"
+
+    # Без исключения: шаблон сообщения (%-аргументы, f-строки, UUID)
+    c = fp(_record("order %s: HTTP %d", 101, 500))
+    d = fp(_record("order %s: HTTP %d", 202, 502))
+    e = fp(_record("store 3f2c1a9e-0b1d-4c2e-9f00-1234567890ab: got 'abc' 17 times"))
+    f = fp(_record("store 00000000-0b1d-4c2e-9f00-1234567890ab: got 'xyz' 3 times"))
+    assert c[0] == d[0] and e[0] == f[0]
+    assert c[2] == "order 101: HTTP 500"  # заголовок — реальное сообщение
+    assert fp(_record("order %s", 1, name="bot.other"))[0] != c[0]
+
+
+@pytest.mark.asyncio
+async def test_storm_is_one_sample_and_one_upsert():
+    """1000 ошибок в цикле (id в тексте разные): 1 образец + 1 UPSERT группы."""
+    handler = error_store.DBErrorHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    save = AsyncMock(return_value=42)
+
+    with patch.object(error_store, "save_error", save):
+        for order_id in range(1000):
+            handler.emit(
+                _record("sync order %s", order_id, exc=_raised(_fetch_order, order_id))
+            )
+        await asyncio.sleep(0)  # образец пишется задачей
+
+    save.assert_awaited_once()
+    fingerprint = save.await_args.kwargs["fingerprint"]
+    assert save.await_args.kwargs["traceback"].startswith("Traceback")
+
+    session = _Session()
+    with _patch_session(session):
+        await error_store.flush_pending()
+    assert len(session.statements) == 1
+    sql = _sql(session.statements[0])
+    assert "ON CONFLICT (fingerprint) DO UPDATE" in sql
+    assert "bot_error_group.count + excluded.count" in sql
+    params = session.statements[0].compile().params
+    assert params["count_m0"] == 1000
+    assert (params["fingerprint_m0"], params["last_error_pk_m0"]) == (fingerprint, 42)
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_counts_for_next_time():
+    for _ in range(3):
+        error_store._record_occurrence(
+            "f" * 16,
+            level="ERROR",
+            logger_name="bot.x",
+            exc_type=None,
+            title="t",
+            seen_at=error_store._now_kgd(),
+        )
+    with _patch_session(_Session(fail=True)):
+        assert await error_store._flush_groups() is False
+    assert error_store._pending["f" * 16]["count"] == 3
+    assert error_store.get_sink_stats()["flush_errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stats_read_aggregate_table_only():
+    session = _Session()
+    with _patch_session(session):
+        stats = await error_store.get_stats()
+
+    assert stats["unresolved"] == 0
+    for stmt in session.statements:
+        sql = _sql(stmt)
+        assert "FROM bot_error_group" in sql
+        assert "FROM bot_error " not in sql + " "
@@ -0,0 +1,133 @@
+"""
+Тесты: локальный стенд внешних API (tests/fakes) — настоящие адаптеры
+iiko / FinTablo / iikoCloud / Google Sheets работают против фейковых
+серверов без сети и БД; сбои (429, обрывы) проходят через штатные retry.
+
+Запуск: pytest tests/test_fake_servers.py -v
+"""
+
+from datetime import date
+from unittest.mock import patch
+
+import pytest
+
+from adapters import fintablo_api, google_sheets, iiko_api, iiko_cloud_api
+from tests.fakes import Dataset, Faults, FakeStack
+from tests.fakes.sheets import parse_cells, split_range
+
+
+@pytest.fixture
+async def stack():
+    async with FakeStack(scale=0.2) as st:
+        async with st.point_adapters():
+            yield st
+
+
+def test_dataset_deterministic():
+    a, b = Dataset(scale=0.2, seed=7), Dataset(scale=0.2, seed=7)
+    day = Dataset(scale=0.2, seed=8)
+    assert a.products == b.products
+    assert a.attendance(date(2026, 3, 1)) == b.attendance(date(2026, 3, 1))
+    assert a.products[0]["id"] != day.products[0]["id"]
+    # Масштаб — линейно по справочникам
+    assert len(Dataset(scale=0.4).products) == 2 * len(a.products)
+
+
+def test_a1_ranges():
+    assert split_range("'Ист''ория'!A2:C") == ("Ист'ория", "A2:C")
+    assert split_range("Лист!B3") == ("Лист", "B3")
+    assert split_range("Sheet1") == ("Sheet1", "")
+    assert split_range("A1:H10") == (None, "A1:H10")
+    assert parse_cells("A2:C") == (1, 0, None, 3)
+    assert parse_cells("B3:D10") == (2, 1, 10, 4)
+    assert parse_cells("") == (0, 0, None, None)
+
+
+async def test_iiko_catalogs_and_attendance(stack):
+    att = await iiko_api.fetch_attendance("2026-03-01", "2026-03-07")
+    employees = await iiko_api.fetch_employees()
+    depts = await iiko_api.fetch_departments()
+    products = await iiko_api.fetch_products()
+
+    assert att and all(a["dateFrom"] < a["dateTo"] for a in att)
+    assert {a["employeeId"] for a in att} <= {e["id"] for e in employees}
+    assert {d["id"] for d in depts} == {d["id"] for d in stack.dataset.departments}
+    assert not any(p["deleted"] for p in products)
+    # Один токен на все запросы
+    assert stack.iiko.hits["POST /resto/api/auth"] == 1
+
+
+async def test_iiko_olap_aggregates_by_group_rows(stack):
+    by_place = await iiko_api.fetch_olap_sales_v1("2026-03-01", "2026-03-01")
+    by_hour = await iiko_api.fetch_motivation_revenue_olap("2026-03-01", "2026-03-01")
+
+    total = sum(r["DishDiscountSumInt"] for r in by_place)
+    assert total == pytest.approx(sum(r["DishDiscountSumInt"] for r in by_hour))
+    assert {"Department", "PayTypes", "CookingPlaceType"} <= set(by_place[0])
+
+
+async def test_iiko_disconnect_is_retried(stack):
+    stack.iiko.faults = Faults(rate_disconnect=1.0, paths=("/resto/api/v2/entities",))
+    with patch.object(iiko_api, "_RETRY_DELAYS", (0, 0, 0)):
+        with pytest.raises(Exception, match="disconnected"):
+            await iiko_api.fetch_entities("Account")
+        assert stack.iiko.injected["disconnect"] == iiko_api._MAX_RETRIES
+
+        stack.iiko.faults = Faults(rate_disconnect=0.5, seed=3)
+        for _ in range(5):
+            try:
+                assert await iiko_api.fetch_entities("Account")
+            except Exception:
+                pass  # все три попытки оборвались — допустимо при 50%
+    assert stack.iiko.injected["disconnect"] > iiko_api._MAX_RETRIES
+
+
+async def test_fintablo_429_and_pnl_roundtrip(stack):
+    stack.fintablo.faults = Faults(rate_429=0.5, seed=1)
+    with patch.object(fintablo_api, "_RETRY_BASE_DELAY", 0.0):
+        directions = await fintablo_api.fetch_directions()
+        created = await fintablo_api.create_pnl_item(
+            5, 1234.5, "03.2026", direction_id=directions[0]["id"]
+        )
+        items = await fintablo_api.fetch_pnl_items(date_mm_yyyy="03.2026")
+    assert len(directions) == len(stack.dataset.departments)
+    assert items == created["items"]
+    assert stack.fintablo.injected["429"] > 0
+
+
+async def test_iiko_cloud_stop_lists(stack):
+    orgs = await iiko_cloud_api.get_organizations()
+    groups = await iiko_cloud_api.fetch_terminal_groups(orgs[0]["id"])
+    stop = await iiko_cloud_api.fetch_stop_lists(orgs[0]["id"], [groups[0]["id"]])
+
+    assert len(groups) == len(stack.dataset.departments)
+    assert [g["terminalGroupId"] for g in stop[0]["items"]] == [groups[0]["id"]]
+    assert stop[0]["items"][0]["items"]
+
+
+async def test_sheets_history_roundtrip(stack):
+    stack.seed_sheets()
+    rows = await google_sheets.read_salary_history_sheet()
+    await google_sheets.write_salary_history_valid_to(
+        [{"row": 2, "valid_to": "31.03.2026"}]
+    )
+    await google_sheets.append_salary_history_rows(
+        [
+            {
+                "name": "Новый",
+                "sal_type": "почасовая",
+                "rate": 300.0,
+                "valid_from": "01.04.2026",
+            }
+        ]
+    )
+    await google_sheets.delete_salary_history_rows([3])
+    after = await google_sheets.read_salary_history_sheet()
+
+    from config import SALARY_SHEET_ID
+
+    raw = stack.sheets.values(SALARY_SHEET_ID, google_sheets._HISTORY_TAB)
+    assert raw[1][6] == "31.03.2026" and raw[1][0] == rows[0]["name"]
+    assert len(after) == len(rows)
+    assert after[-1]["name"] == "Новый" and after[-1]["rate"] == 300.0
+    assert rows[1]["name"] not in {r["name"] for r in after}
@@ -0,0 +1,95 @@
+"""
+Тесты: подготовка фото перед OCR (utils/image_prep.py).
+
+Картинки синтетические (numpy + PIL), без файлов-фикстур.
+Запуск: pytest tests/test_image_prep.py -v
+"""
+
+from io import BytesIO
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from utils import image_prep
+from utils.photo_validator import _validate_photo_sync
+from utils.qr_detector import _detect_qr_sync
+
+
+def _document(width: int, height: int) -> np.ndarray:
+    """«Документ»: светлый фон + чёткие тёмные строки (резкость высокая)."""
+    img = np.full((height, width, 3), 235, dtype=np.uint8)
+    for y in range(20, height - 20, 24):
+        img[y : y + 6, 20 : width - 20 : 3] = 20
+    return img
+
+
+def _jpeg(rgb: np.ndarray, orientation: int | None = None) -> bytes:
+    img = Image.fromarray(rgb)
+    buf = BytesIO()
+    if orientation is None:
+        img.save(buf, format="JPEG", quality=90)
+    else:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        img.save(buf, format="JPEG", quality=90, exif=exif)
+    return buf.getvalue()
+
+
+def _with_qr(rgb: np.ndarray) -> np.ndarray:
+    code = cv2.QRCodeEncoder.create().encode("t=20260317T1200&s=1234.00&fn=99990789")
+    code = cv2.resize(code, (code.shape[1] * 8, code.shape[0] * 8), cv2.INTER_NEAREST)
+    out = rgb.copy()
+    h, w = code.shape
+    y, x = out.shape[0] - h - 40, 40
+    out[y : y + h, x : x + w] = np.repeat(code[:, :, None], 3, axis=2)
+    return out
+
+
+def test_single_decode_and_metrics_match_validator():
+    data = _jpeg(_document(1200, 1600))
+    real_open = Image.open
+    with patch("utils.image_prep.Image.open", side_effect=real_open) as opened:
+        prep = image_prep.prepare_image_sync(data, with_qr=True)
+
+    assert opened.call_count == 1
+    legacy = _validate_photo_sync(data)
+    assert prep.quality.is_good and legacy.is_good
+    assert prep.quality.blur_score == pytest.approx(legacy.blur_score, rel=0.05)
+    assert prep.quality.brightness == pytest.approx(legacy.brightness, abs=1)
+    assert prep.has_qr is False
+    assert set(prep.timings) == {"decode", "quality", "qr", "encode", "hash", "total"}
+
+
+def test_small_jpeg_passes_through_without_reencode():
+    data = _jpeg(_document(1000, 1400))
+    prep = image_prep.prepare_image_sync(data)
+    assert prep.jpeg is data
+    assert "qr" not in prep.timings
+
+
+def test_exif_rotation_and_downscale_for_model():
+    data = _jpeg(_document(4000, 3000), orientation=6)  # 90° по часовой
+    prep = image_prep.prepare_image_sync(data)
+
+    assert (prep.quality.width, prep.quality.height) == (3000, 4000)
+    out = Image.open(BytesIO(prep.jpeg))
+    assert out.size == (1536, 2048)
+    assert 0x0112 not in out.getexif()
+
+
+def test_bad_photo_is_not_encoded():
+    blurry = cv2.GaussianBlur(_document(800, 1000), (51, 51), 0)
+    prep = image_prep.prepare_image_sync(_jpeg(blurry), with_qr=True)
+
+    assert not prep.quality.is_good
+    assert prep.jpeg == b""
+    assert prep.has_qr is None
+
+
+def test_qr_found_on_shared_buffer():
+    data = _jpeg(_with_qr(_document(1200, 1600)))
+    assert image_prep.prepare_image_sync(data, with_qr=True).has_qr is True
+    assert _detect_qr_sync(data) is True
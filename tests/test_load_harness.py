@@ -0,0 +1,160 @@
+"""
+Тесты: нагрузочный стенд (tests/load) без Postgres — фейковая сессия Bot API,
+виртуальный пользователь по сценарию, одобряющий, метрики прогона.
+
+Запуск: pytest tests/test_load_harness.py -v
+"""
+
+import asyncio
+import time
+
+import pytest
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
+from aiogram.types import Message
+
+from tests.load import journeys
+from tests.load.journeys import Photos, Press, Stuck, Text, approve_loop, run_journey
+from tests.load.stats import (
+    LoopLagSampler,
+    Recorder,
+    format_summary,
+    percentile,
+    summarize,
+)
+from tests.load.telegram import FakeTelegramSession, VirtualUser
+
+TOKEN = "123456:AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA"
+
+
+def _kb(*data: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[[InlineKeyboardButton(text=d, callback_data=d)] for d in data]
+    )
+
+
+def _bot_and_dp() -> tuple[Bot, Dispatcher, FakeTelegramSession]:
+    router = Router()
+
+    @router.message(F.text == "start")
+    async def start(message: Message) -> None:
+        await message.delete()
+        await message.answer("Выберите:", reply_markup=_kb("pick:1", "pick:2"))
+
+    @router.callback_query(F.data.startswith("pick:"))
+    async def pick(callback: CallbackQuery) -> None:
+        await callback.answer()
+        await callback.message.edit_text(f"Выбрано {callback.data}")
+
+    @router.callback_query(F.data == "stale")
+    async def stale(callback: CallbackQuery) -> None:
+        await callback.answer("⚠️ Сессия истекла", show_alert=True)
+
+    @router.message(F.photo)
+    async def photo(message: Message) -> None:
+        await message.answer(f"Фото {message.photo[-1].file_id}")
+
+    @router.callback_query(F.data.startswith("woa_approve:"))
+    async def approve(callback: CallbackQuery) -> None:
+        await callback.answer()
+        await callback.message.edit_text("✅ Одобрено")  # клавиатура снимается
+
+    session = FakeTelegramSession()
+    dp = Dispatcher(storage=MemoryStorage())
+    dp.include_router(router)
+    return Bot(TOKEN, session=session), dp, session
+
+
+async def test_journey_presses_buttons_from_bot_reply(monkeypatch):
+    bot, dp, session = _bot_and_dp()
+    rec = Recorder()
+    vu = VirtualUser(dp, bot, session, 42, "Тест", observe=rec.observe)
+    monkeypatch.setitem(
+        journeys.JOURNEYS,
+        "t",
+        (
+            Text("start", "start"),
+            Press("skip", "nothing:", optional=True),
+            Press("pick", "pick:"),
+            Photos("photos", 3),
+        ),
+    )
+
+    await run_journey(vu, "t")
+
+    texts = [m.get("text") for m in vu.screen.messages.values()]
+    assert texts[0] == "Выбрано pick:1" and len(texts) == 4
+    assert {k: len(v) for k, v in rec.latencies.items()} == {
+        "t:start": 1,
+        "t:pick": 1,
+        "t:photos": 3,
+    }
+    assert session.calls["editMessageText"] == 1
+    assert session.calls["deleteMessage"] == 1
+    assert not session.unsupported
+
+
+async def test_stuck_journey_reports_step_and_alert(monkeypatch):
+    bot, dp, session = _bot_and_dp()
+    vu = VirtualUser(dp, bot, session, 7, "Тест")
+    await bot.send_message(7, "Старое меню", reply_markup=_kb("stale"))
+    monkeypatch.setitem(
+        journeys.JOURNEYS, "t", (Press("old", "stale"), Press("next", "pick:"))
+    )
+
+    with pytest.raises(Stuck) as info:
+        await run_journey(vu, "t", timeout=0.05)
+
+    assert info.value.step == "t:next"
+    assert "Сессия истекла" in str(info.value)
+    rec = Recorder()
+    rec.journey("t", info.value)
+    assert rec.journeys == {"t:failed": 1} and rec.failures == {"t:next": 1}
+
+
+async def test_approver_presses_each_card_once():
+    bot, dp, session = _bot_and_dp()
+    rec = Recorder()
+    vu = VirtualUser(dp, bot, session, 100, "Админ", observe=rec.observe)
+    stop = asyncio.Event()
+    loop_task = asyncio.create_task(approve_loop(vu, stop, on_approve=rec.approved))
+
+    await bot.send_message(100, "Списание №1", reply_markup=_kb("woa_approve:1"))
+    await bot.send_message(100, "Списание №2", reply_markup=_kb("woa_approve:2"))
+    for _ in range(50):
+        if rec.approvals["writeoff"] == 2:
+            break
+        await asyncio.sleep(0.01)
+    stop.set()
+    await loop_task
+
+    assert rec.approvals == {"writeoff": 2}
+    assert len(rec.latencies["approve:writeoff"]) == 2
+    assert all("reply_markup" not in m for m in vu.screen.messages.values())
+
+
+async def test_loop_lag_and_summary():
+    rec = Recorder()
+    lag = LoopLagSampler(interval=0.01)
+    lag.start()
+    await asyncio.sleep(0.02)
+    time.sleep(0.05)  # блокирующий вызов в хэндлере
+    await asyncio.sleep(0.02)
+    await lag.stop()
+    assert max(lag.samples) > 0  # проснулся позже срока
+
+    lag.samples = [0.001, 0.002, 0.2]
+    for ms in range(1, 101):
+        rec.observe("writeoff:search", ms / 1000)
+    rec.journey("writeoff")
+    rec.stop()
+
+    report = summarize(rec, lag, meta={"users": 1})
+
+    assert report["loop_lag_ms"]["max"] == pytest.approx(200)
+    assert report["latency_ms"]["p50"] == pytest.approx(50.5)
+    assert report["latency_ms"]["p99"] == pytest.approx(99.0, abs=0.1)
+    assert report["updates"]["count"] == 100
+    assert "writeoff:search" in format_summary(report)
+    assert percentile([], 99) == 0.0
@@ -0,0 +1,98 @@
+"""
+Тесты: запись логов в bot_log (use_cases/log_store.py) — COPY-sink,
+backpressure, retention по секциям.
+
+БД не нужна: _copy_rows подменяется.
+Запуск: pytest tests/test_log_store.py -v
+"""
+
+import logging
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from use_cases import log_store
+
+
+@pytest.fixture(autouse=True)
+async def _reset_sink():
+    log_store._buffer.clear()
+    for key in log_store._stats:
+        log_store._stats[key] = 0
+    log_store._stats["last_error"] = None
+    log_store._wakeup_pending = False
+    yield
+    if log_store._flush_task is not None:
+        log_store._flush_task.cancel()
+        log_store._flush_task = None
+    log_store._buffer.clear()
+
+
+def _row(level: str = "INFO") -> tuple:
+    return (datetime(2026, 3, 17, 12, 0), level, "test", "message", None)
+
+
+def test_overflow_drops_info_first_and_counts():
+    with (
+        patch.object(log_store, "MAX_BUFFER", 10),
+        patch.object(log_store, "PRIORITY_RESERVE", 2),
+    ):
+        for _ in range(12):
+            log_store._enqueue(_row("INFO"))
+        for _ in range(3):
+            log_store._enqueue(_row("ERROR"))
+
+    stats = log_store.get_sink_stats()
+    assert stats["buffered"] == 12  # 10 INFO + 2 ERROR в резерве
+    assert stats["dropped_overflow"] == 2 + 1
+
+
+@pytest.mark.asyncio
+async def test_failed_copy_requeues_then_drops_when_no_room():
+    copy = AsyncMock(side_effect=[ConnectionError("db down"), None])
+    for _ in range(5):
+        log_store._enqueue(_row())
+    with patch.object(log_store, "_copy_rows", copy):
+        assert await log_store._flush_buffer() is False
+        assert log_store.get_sink_stats()["buffered"] == 5  # вернулись в буфер
+        await log_store.flush_pending()
+
+    stats = log_store.get_sink_stats()
+    assert (stats["written"], stats["buffered"], stats["flush_errors"]) == (5, 0, 1)
+
+    for _ in range(3):
+        log_store._enqueue(_row())
+    with (
+        patch.object(log_store, "_copy_rows", AsyncMock(side_effect=OSError)),
+        patch.object(log_store, "MAX_BUFFER", 2),  # пока COPY шёл, буфер заполнился
+    ):
+        await log_store._flush_buffer()
+    assert log_store.get_sink_stats()["dropped_failed"] == 3
+
+
+def test_handler_row_uses_event_time():
+    record = logging.LogRecord("bot.test", logging.WARNING, "", 0, "hi", None, None)
+    record.created = datetime(2026, 3, 17, 10, 0).timestamp()
+    log_store.DBLogHandler().emit(record)
+
+    created_at, level, name, message, traceback = log_store._buffer[0]
+    expected = datetime.fromtimestamp(record.created, log_store._KGD_TZ)
+    assert created_at == expected.replace(tzinfo=None)
+    assert (level, name, message, traceback) == ("WARNING", "bot.test", "hi", None)
+
+
+def test_expired_partitions_follow_group_retention():
+    now = datetime(2026, 3, 17, 3, 10)
+    names = [
+        "bot_log_info_p20260313",  # 4 дня — старше 3
+        "bot_log_info_p20260314",  # ровно на границе — живёт
+        "bot_log_warning_p20260301",  # 16 дней — старше 14
+        "bot_log_warning_p20260305",
+        "bot_log_error_p20260101",  # 75 дней — живёт
+        "bot_log_info_default",
+    ]
+    assert log_store._expired_partitions(names, now) == [
+        "bot_log_info_p20260313",
+        "bot_log_warning_p20260301",
+    ]
@@ -0,0 +1,130 @@
+"""
+Тесты: сторож event loop (utils/loop_watchdog.py) — стек блокирующего
+шага, место без стека, лимит записей, запись в bot_log и сводка /lag.
+
+Запуск: pytest tests/test_loop_watchdog.py -v
+"""
+
+import asyncio
+import asyncio.events
+import logging
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from use_cases import log_store
+from use_cases.loop_stalls import summarize_stalls
+from utils import loop_watchdog
+from utils.loop_watchdog import (
+    STALL_LOGGER,
+    LoopWatchdog,
+    Stall,
+    format_stall,
+    parse_stall,
+)
+from utils.metrics import LOOP_STALLS
+
+
+async def test_blocking_step_reports_stack_of_offending_line():
+    stalls: list[Stall] = []
+    watchdog = LoopWatchdog(0.1, on_stall=stalls.append)
+
+    async def _parse_report():
+        await asyncio.sleep(0)
+        time.sleep(0.3)  # синхронный разбор в корутине
+
+    watchdog.start()
+    try:
+        await asyncio.create_task(_parse_report(), name="sync:report")
+        await asyncio.sleep(0.01)  # быстрые шаги — не в счёт
+    finally:
+        watchdog.stop()
+
+    assert asyncio.events.Handle._run is loop_watchdog._original_run
+    assert len(stalls) == 1
+    stall = stalls[0]
+    assert stall.duration >= 0.3
+    assert stall.task.startswith("sync:report") and "_parse_report" in stall.task
+    assert stall.where.startswith("tests/test_loop_watchdog.py:")
+    assert stall.where.endswith("_parse_report")
+    assert "time.sleep(0.3)" in stall.stack
+
+
+async def test_uncaptured_callback_and_report_budget():
+    stalls: list[Stall] = []
+    watchdog = LoopWatchdog(0.05, on_stall=stalls.append)
+    loop = asyncio.get_running_loop()
+    before = LOOP_STALLS.labels().value
+
+    def _encode_photo(done: asyncio.Event) -> None:
+        time.sleep(0.08)
+        done.set()
+
+    # Поток-сторож не успевает снять стек (как при C-коде под GIL)
+    with (
+        patch.object(LoopWatchdog, "_watch", lambda self: None),
+        patch.object(loop_watchdog, "REPORTS_PER_MINUTE", 1),
+    ):
+        watchdog.start()
+        try:
+            for _ in range(2):
+                done = asyncio.Event()
+                loop.call_soon(_encode_photo, done)
+                await done.wait()
+        finally:
+            watchdog.stop()
+
+    assert len(stalls) == 1
+    stall = stalls[0]
+    assert stall.task == "callback" and stall.stack is None
+    assert stall.where.endswith("_encode_photo")
+    assert format_stall(stall).endswith("(стек не снят)")
+    assert watchdog.stats["stalls"] == 2 and watchdog.stats["suppressed"] == 1
+    assert LOOP_STALLS.labels().value == before + 2
+
+
+def test_stall_goes_to_bot_log_with_stack_in_traceback():
+    handler = log_store.get_db_log_handler()
+    stall_logger = logging.getLogger(STALL_LOGGER)
+    stack = 'Stack (most recent call last):\n  File "x.py", line 1, in f'
+    log_store._buffer.clear()
+    stall_logger.addHandler(handler)
+    try:
+        loop_watchdog._log_stall(Stall(0.42, "sched:pnl", "x.py:1 f", stack))
+    finally:
+        stall_logger.removeHandler(handler)
+
+    _, level, name, message, traceback_text = log_store._buffer.pop()
+    assert (level, name) == ("WARNING", STALL_LOGGER)
+    assert traceback_text == stack and "Stack" not in message
+    assert parse_stall(message) == (420, "x.py:1 f", "sched:pnl")
+
+
+def test_summary_ranks_places_by_total_blocked_time():
+    def row(pk: int, ms: int, where: str) -> SimpleNamespace:
+        stall = Stall(ms / 1000, "Task-1 handler", where, "stack")
+        return SimpleNamespace(
+            pk=pk,
+            created_at=datetime(2026, 3, 17, 12, pk),
+            message=f"2026-03-17 12:00:00 | WARNING | loop_stall | {format_stall(stall)}",
+            traceback="stack",
+        )
+
+    logs = [
+        row(4, 300, "use_cases/pnl_sync.py:210 _aggregate"),
+        row(3, 900, "adapters/iiko_api.py:88 _parse_xml"),
+        row(2, 400, "use_cases/pnl_sync.py:210 _aggregate"),
+        row(1, 450, "use_cases/pnl_sync.py:210 _aggregate"),
+        SimpleNamespace(pk=0, created_at=None, message="другое", traceback=None),
+    ]
+
+    summary = summarize_stalls(logs, top=2, recent=2)
+
+    assert (summary["count"], summary["total_ms"], summary["max_ms"]) == (4, 2050, 900)
+    assert [(p["where"], p["count"], p["total_ms"]) for p in summary["places"]] == [
+        ("use_cases/pnl_sync.py:210 _aggregate", 3, 1150),
+        ("adapters/iiko_api.py:88 _parse_xml", 1, 900),
+    ]
+    assert [r["pk"] for r in summary["recent"]] == [4, 3]
+    assert not summary["truncated"]
@@ -0,0 +1,159 @@
+"""
+Тесты: метрики /metrics (utils/metrics.py) — формат Prometheus, транспорт
+httpx, middleware хэндлеров, кеши.
+
+Метрики глобальные (реестр процесса) — тесты используют свои значения меток.
+Запуск: pytest tests/test_metrics.py -v
+"""
+
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from aiogram import Router
+
+from bot.global_commands import HandlerMetricsMiddleware
+from use_cases._ttl_cache import TtlCache
+from utils import metrics
+
+
+def _sample(name: str, **labels) -> float | None:
+    """Значение серии из render() (как его увидит Prometheus)."""
+    want = ",".join(f'{k}="{v}"' for k, v in labels.items())
+    prefix = f"{name}{{{want}}} " if want else f"{name} "
+    for line in metrics.render().splitlines():
+        if line.startswith(prefix):
+            return float(line[len(prefix) :])
+    return None
+
+
+def test_histogram_renders_cumulative_buckets():
+    hist = metrics.Histogram("test_render_seconds", "тест", ("op",), buckets=(0.1, 1.0))
+    child = hist.labels('say "hi"\n')
+    for value in (0.05, 0.1, 0.5, 3.0):
+        child.observe(value)
+
+    text = hist.render()
+    assert "# TYPE test_render_seconds histogram" in text
+    labels = 'op="say \\"hi\\"\\n"'
+    assert f'test_render_seconds_bucket{{{labels},le="0.1"}} 2' in text
+    assert f'test_render_seconds_bucket{{{labels},le="1"}} 3' in text
+    assert f'test_render_seconds_bucket{{{labels},le="+Inf"}} 4' in text
+    assert f"test_render_seconds_count{{{labels}}} 4" in text
+    assert f"test_render_seconds_sum{{{labels}}} 3.65" in text
+    with pytest.raises(ValueError):
+        metrics.Counter("test_render_seconds", "дубликат")
+
+
+def test_endpoint_label_drops_ids():
+    label = metrics.endpoint_label
+    assert label("/resto/api/v2/entities/list") == "/resto/api/v2/entities/list"
+    assert label("/v1/employee/12345?date=2026-03") == "/v1/employee/{id}"
+    assert label("/api/1/organizations") == "/api/1/organizations"
+    assert (
+        label(
+            "https://sheets.googleapis.com/v4/spreadsheets/"
+            "1AbCdEfGhIjKlMnOpQrStUvWxYz0123456789abcd/values/%D0%9B%21A1:append"
+        )
+        == "/v4/spreadsheets/{id}/values/{id}"
+    )
+    assert (
+        label("/resto/api/v2/documents/3f2c1a9e-0b1d-4c2e-9f00-1234567890ab")
+        == "/resto/api/v2/documents/{id}"
+    )
+    assert label("/v4/spreadsheets/abc/values:batchGet").endswith("values:batchGet")
+
+
+@pytest.mark.asyncio
+async def test_metered_transport_records_latency_bytes_errors():
+    def _reply(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/boom"):
+            raise httpx.ReadTimeout("slow", request=request)
+        if request.url.path.endswith("/busy"):
+            return httpx.Response(503)
+        if request.url.path.endswith("/chunked"):
+            return httpx.Response(200, stream=httpx.ByteStream(b"x" * 700))
+        return httpx.Response(200, content=b"y" * 300)
+
+    transport = metrics.MeteredTransport("svc_test", httpx.MockTransport(_reply))
+    async with httpx.AsyncClient(
+        transport=transport, base_url="https://api.test"
+    ) as client:
+        await client.get("/v1/items/42")
+        await client.get("/v1/items/43")
+        await client.get("/v1/chunked")
+        assert (await client.get("/v1/busy")).status_code == 503
+        with pytest.raises(httpx.ReadTimeout):
+            await client.get("/v1/boom")
+    metrics.record_retry("svc_test", "/v1/boom")
+
+    items = {"service": "svc_test", "endpoint": "/v1/items/{id}"}
+    assert _sample("external_request_duration_seconds_count", **items) == 2
+    assert _sample("external_response_bytes_total", **items) == 600
+    chunked = {"service": "svc_test", "endpoint": "/v1/chunked"}
+    assert _sample("external_response_bytes_total", **chunked) == 700
+    assert (
+        _sample(
+            "external_request_errors_total",
+            service="svc_test",
+            endpoint="/v1/busy",
+            reason="5xx",
+        )
+        == 1
+    )
+    boom = {"service": "svc_test", "endpoint": "/v1/boom"}
+    assert _sample("external_request_errors_total", **boom, reason="ReadTimeout") == 1
+    assert _sample("external_request_duration_seconds_count", **boom) == 1
+    assert _sample("external_request_retries_total", **boom) == 1
+
+
+async def _handled_ok(event, data):
+    return "ok"
+
+
+async def _handled_fail(event, data):
+    raise ValueError("boom")
+
+
+@pytest.mark.asyncio
+async def test_handler_middleware_per_router_and_handler():
+    named = Router(name="metrics_test_router")
+    unnamed = Router()
+    dp = Router(name="metrics_test_root")
+    dp.include_routers(named, unnamed)
+    HandlerMetricsMiddleware.setup(dp)
+
+    mw = named.message.middleware._middlewares[0]
+    data = {"handler": SimpleNamespace(callback=_handled_ok)}
+    assert await mw(_handled_ok, object(), data) == "ok"
+    mw_unnamed = unnamed.callback_query.middleware._middlewares[0]
+    data = {"handler": SimpleNamespace(callback=_handled_fail)}
+    with pytest.raises(ValueError):
+        await mw_unnamed(_handled_fail, object(), data)
+
+    ok = {"router": "metrics_test_router", "handler": "_handled_ok"}
+    assert _sample("bot_handler_duration_seconds_count", **ok) == 1
+    fail = {"router": "test_metrics", "handler": "_handled_fail"}  # имя модуля
+    assert _sample("bot_handler_duration_seconds_count", **fail) == 1
+    assert _sample("bot_handler_errors_total", **fail) == 1
+
+
+def test_ttl_cache_hit_ratio():
+    cache = TtlCache(default_ttl=60, name="metrics_test")
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("a")
+    cache.get("a")
+    cache.get("missing")
+
+    assert _sample("cache_hits_total", cache="metrics_test") == 3
+    assert _sample("cache_misses_total", cache="metrics_test") == 1
+    assert _sample("cache_hit_ratio", cache="metrics_test") == 0.75
+
+
+def test_scrape_requires_bearer_token():
+    assert metrics.verify_scrape_auth("Bearer s3cret", "s3cret")
+    assert not metrics.verify_scrape_auth("Bearer wrong", "s3cret")
+    assert not metrics.verify_scrape_auth("s3cret", "s3cret")  # без схемы
+    assert not metrics.verify_scrape_auth(None, "s3cret")
+    assert not metrics.verify_scrape_auth("Bearer ", None)  # токен не задан
@@ -0,0 +1,278 @@
+"""
+Тесты: индекс ячеек min/max и write-behind очередь записи в Google Таблицу
+(adapters/google_sheets.py, use_cases/edit_min_stock.py).
+
+Google API не нужен: лист — список строк в памяти, считаются вызовы API.
+Запуск: pytest tests/test_min_stock_sheet.py -v
+"""
+
+import asyncio
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import UUID
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from adapters import google_sheets as gsheet
+from use_cases import edit_min_stock
+
+_real_mark_written = edit_min_stock._mark_written
+
+N_PRODUCTS = 3000
+N_DEPTS = 20
+
+
+class _FakeWorksheet:
+    """Лист в памяти с API gspread, которым пользуется адаптер."""
+
+    def __init__(self, grid: list[list[str]]):
+        self.grid = grid
+        self.calls: list[tuple[str, object]] = []
+
+    def _cell(self, row: int, col: int) -> str:
+        line = self.grid[row - 1] if row - 1 < len(self.grid) else []
+        return line[col - 1] if col - 1 < len(line) else ""
+
+    def get_all_values(self):
+        self.calls.append(("get_all_values", None))
+        return [list(r) for r in self.grid]
+
+    def batch_get(self, ranges):
+        self.calls.append(("batch_get", list(ranges)))
+        out = []
+        for rng in ranges:
+            if rng == "1:1":
+                out.append([list(self.grid[0])])
+            elif rng == "B:B":
+                out.append([[r[1]] if len(r) > 1 and r[1] else [] for r in self.grid])
+            else:  # "B12"
+                out.append([[self._cell(int(rng[1:]), 2)]])
+        return out
+
+    def batch_update(self, data, value_input_option=None):
+        self.calls.append(("batch_update", data))
+        for item in data:
+            start, _ = item["range"].split(":")
+            row, col = gsheet.gspread.utils.a1_to_rowcol(start)
+            for offset, value in enumerate(item["values"][0]):
+                self.grid[row - 1][col - 1 + offset] = value
+
+
+def _grid() -> list[list[str]]:
+    meta, names, subs = ["", ""], ["Товар", "ID товара"], ["", ""]
+    for d in range(N_DEPTS):
+        meta += [f"dept-{d}", ""]
+        names += [f"Ресторан {d}", ""]
+        subs += ["МИН", "МАКС"]
+    rows = [meta, names, subs]
+    for p in range(N_PRODUCTS):
+        rows.append([f"Товар {p:04d}", f"prod-{p}"] + [""] * (N_DEPTS * 2))
+    return rows
+
+
+@pytest.fixture
+def sheet():
+    ws = _FakeWorksheet(_grid())
+    gsheet._minmax_index = None
+    with patch.object(gsheet, "_get_worksheet", return_value=ws):
+        yield ws
+    gsheet._minmax_index = None
+
+
+@pytest.fixture(autouse=True)
+def persisted():
+    """sheet_pending в БД: {key: (min, max)} помеченных строк, снятые пачки."""
+    rows: dict[tuple[str, str], tuple[float, float]] = {}
+    marked: list[dict] = []
+
+    async def _mark(batch):
+        marked.append(dict(batch))
+        for key in batch:
+            rows.pop(key, None)
+
+    with (
+        patch.object(
+            edit_min_stock, "_load_persisted", AsyncMock(side_effect=lambda: dict(rows))
+        ),
+        patch.object(edit_min_stock, "_mark_written", _mark),
+    ):
+        yield rows, marked
+
+
+@pytest.fixture(autouse=True)
+def _reset_queue():
+    edit_min_stock._pending.clear()
+    for key in edit_min_stock._stats:
+        edit_min_stock._stats[key] = 0
+    yield
+    if edit_min_stock._writer_task is not None:
+        edit_min_stock._writer_task.cancel()
+        edit_min_stock._writer_task = None
+    edit_min_stock._pending.clear()
+
+
+@pytest.mark.asyncio
+async def test_index_write_is_one_verify_and_one_batch_update(sheet):
+    assert await gsheet.has_min_max_cell("prod-10", "dept-3")  # строит индекс
+    assert not await gsheet.has_min_max_cell("prod-10", "dept-404")
+    sheet.calls.clear()
+
+    missing = await gsheet.write_min_max_batch(
+        {
+            ("prod-10", "dept-3"): (5.0, 12.0),
+            ("prod-2999", "dept-0"): (1.5, 0.0),
+            ("prod-none", "dept-0"): (1.0, 2.0),
+        }
+    )
+
+    assert missing == [("prod-none", "dept-0")]
+    assert [name for name, _ in sheet.calls] == ["batch_get", "batch_update"]
+    # prod-10 → строка 14, dept-3 → колонки I:J
+    assert sheet.grid[13][8:10] == ["5.0", "12.0"]
+    assert sheet.grid[3002][2:4] == ["1.5", ""]
+
+
+@pytest.mark.asyncio
+async def test_shifted_rows_reload_index_before_write(sheet):
+    await gsheet.has_min_max_cell("prod-10", "dept-3")
+    sheet.grid.insert(5, ["Вставили руками", "", *[""] * (N_DEPTS * 2)])
+    sheet.calls.clear()
+
+    assert await gsheet.write_min_max_batch({("prod-10", "dept-3"): (7.0, 9.0)}) == []
+
+    names = [name for name, _ in sheet.calls]
+    assert names == ["batch_get", "batch_get", "batch_update"]  # сверка → индекс
+    assert sheet.grid[14][1] == "prod-10" and sheet.grid[14][8] == "7.0"
+    assert sheet.grid[13][8] == ""  # чужая строка не тронута
+
+
+@pytest.mark.asyncio
+async def test_sync_rewrite_refreshes_index_without_reads(sheet):
+    gsheet._set_minmax_index(sheet.grid, sheet)
+    sheet.calls.clear()
+    assert await gsheet.has_min_max_cell("prod-7", "dept-19")
+    assert sheet.calls == []
+
+
+@pytest.mark.asyncio
+async def test_burst_is_coalesced_into_one_write():
+    write = AsyncMock(return_value=[])
+    with (
+        patch.object(edit_min_stock.gsheet, "write_min_max_batch", write),
+        patch.object(edit_min_stock, "FLUSH_DELAY", 0.01),
+    ):
+        for i in range(30):
+            edit_min_stock.enqueue_sheet_write(f"prod-{i % 10}", "dept-1", i, 0.0)
+        await asyncio.sleep(0.05)
+
+    write.assert_awaited_once()
+    batch = write.await_args.args[0]
+    assert len(batch) == 10
+    assert batch[("prod-3", "dept-1")] == (23, 0.0)  # последняя правка
+    stats = edit_min_stock.get_queue_stats()
+    assert (stats["coalesced"], stats["written"], stats["pending"]) == (20, 10, 0)
+
+
+@pytest.mark.asyncio
+async def test_failed_write_requeues_without_overwriting_newer():
+    edit_min_stock._pending[("prod-1", "dept-1")] = (1.0, 0.0)
+    write = AsyncMock(side_effect=ConnectionError("sheets down"))
+    with patch.object(edit_min_stock.gsheet, "write_min_max_batch", write):
+        flush = asyncio.create_task(edit_min_stock.flush_pending())
+        await asyncio.sleep(0)
+        edit_min_stock._pending[("prod-1", "dept-1")] = (2.0, 0.0)  # пока шла запись
+        assert await flush is False
+
+    assert edit_min_stock._pending[("prod-1", "dept-1")] == (2.0, 0.0)
+    assert edit_min_stock.get_queue_stats()["errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_flush_picks_up_edits_persisted_by_another_process(persisted):
+    rows, marked = persisted
+    # Правка упавшего процесса — только в БД; своя свежее — из памяти
+    rows[("prod-1", "dept-1")] = (3.0, 6.0)
+    rows[("prod-2", "dept-1")] = (1.0, 0.0)
+    edit_min_stock._pending[("prod-2", "dept-1")] = (4.0, 0.0)
+    write = AsyncMock(return_value=[])
+    with patch.object(edit_min_stock.gsheet, "write_min_max_batch", write):
+        assert await edit_min_stock.flush_pending() is True
+
+    expected = {("prod-1", "dept-1"): (3.0, 6.0), ("prod-2", "dept-1"): (4.0, 0.0)}
+    assert write.await_args.args[0] == expected
+    assert marked == [expected] and rows == {}
+
+
+@pytest.mark.asyncio
+async def test_failed_write_keeps_sheet_pending(persisted):
+    rows, marked = persisted
+    rows[("prod-1", "dept-1")] = (3.0, 6.0)
+    write = AsyncMock(side_effect=ConnectionError("sheets down"))
+    with patch.object(edit_min_stock.gsheet, "write_min_max_batch", write):
+        assert await edit_min_stock.flush_pending() is False
+
+    assert marked == [] and rows == {("prod-1", "dept-1"): (3.0, 6.0)}
+
+
+@pytest.mark.asyncio
+async def test_mark_written_clears_only_values_that_reached_the_sheet():
+    session = MagicMock()
+    session.execute = AsyncMock()
+    session.commit = AsyncMock()
+    factory = MagicMock()
+    factory.return_value.__aenter__ = AsyncMock(return_value=session)
+    factory.return_value.__aexit__ = AsyncMock(return_value=False)
+    pid, did = (
+        "00000000-0000-0000-0000-000000000001",
+        "00000000-0000-0000-0000-000000000002",
+    )
+
+    with patch.object(edit_min_stock, "async_session_factory", factory):
+        await _real_mark_written({(pid, did): (0.1, 2.0)})
+
+    stmt = session.execute.await_args.args[0]
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "SET sheet_pending" in sql and "min_stock_level.sheet_pending IS true" in sql
+    params = stmt.compile(dialect=postgresql.dialect()).params
+    assert (UUID(pid), UUID(did), Decimal("0.1000"), Decimal("2.0000")) in next(
+        v for v in params.values() if isinstance(v, list)
+    )
+
+
+@pytest.mark.asyncio
+async def test_import_skips_rows_with_unwritten_edits():
+    """Sheets недоступен: импорт не перезаписывает и не удаляет sheet_pending."""
+    from use_cases import sync_min_stock
+
+    pid, did = (
+        "00000000-0000-0000-0000-000000000001",
+        "00000000-0000-0000-0000-000000000002",
+    )
+    session = MagicMock()
+    session.execute = AsyncMock(return_value=MagicMock(all=MagicMock(return_value=[])))
+    session.commit = AsyncMock()
+    factory = MagicMock()
+    factory.return_value.__aenter__ = AsyncMock(return_value=session)
+    factory.return_value.__aexit__ = AsyncMock(return_value=False)
+    level = {
+        "product_id": pid,
+        "product_name": "Молоко",
+        "department_id": did,
+        "department_name": "Ресторан",
+        "min_level": 1.0,
+        "max_level": 2.0,
+    }
+    with (
+        patch.object(sync_min_stock, "async_session_factory", factory),
+        patch.object(edit_min_stock, "flush_pending", AsyncMock(return_value=False)),
+        patch.object(gsheet, "read_all_levels", AsyncMock(return_value=[level])),
+    ):
+        assert await sync_min_stock.sync_min_stock_from_gsheet() == 1
+
+    upsert, existing = (c.args[0] for c in session.execute.await_args_list)
+    dialect = postgresql.dialect()
+    assert "WHERE min_stock_level.sheet_pending IS false" in str(
+        upsert.compile(dialect=dialect)
+    )
+    assert "sheet_pending IS false" in str(existing.compile(dialect=dialect))
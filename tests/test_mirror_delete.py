@@ -0,0 +1,79 @@
+"""
+Тесты: зеркальная очистка mirror_delete (use_cases/sync.py) — один запрос
+с ID-массивом, проверка >50% в CTE, число удалённых из RETURNING.
+
+БД не нужна: сессия подменяется, SQL компилируется диалектом asyncpg.
+Запуск: pytest tests/test_mirror_delete.py -v
+"""
+
+import uuid
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from db.ft_models import FTDirection
+from db.models import Entity
+from use_cases.sync import mirror_delete
+
+_DIALECT = postgresql.asyncpg.dialect()
+
+
+def _session(total: int, doomed: int, deleted: int):
+    result = MagicMock()
+    result.one.return_value = (total, doomed, deleted)
+    session = MagicMock()
+    session.execute = AsyncMock(return_value=result)
+    return session
+
+
+def _compiled(session):
+    stmt = session.execute.await_args.args[0]
+    return stmt.compile(dialect=_DIALECT, compile_kwargs={"render_postcompile": True})
+
+
+@pytest.mark.asyncio
+async def test_single_statement_with_array_param():
+    ids = {uuid.uuid4() for _ in range(1000)}
+    session = _session(total=1005, doomed=5, deleted=5)
+
+    count = await mirror_delete(
+        Entity.__table__,
+        "id",
+        ids,
+        "entity:Account",
+        session,
+        extra_filters={"root_type": "Account"},
+    )
+
+    assert count == 5
+    session.execute.assert_awaited_once()
+    compiled = _compiled(session)
+    sql = str(compiled)
+    assert "unnest($" in sql and "::UUID[]" in sql
+    assert "RETURNING iiko_entity.id" in sql
+    assert sql.count("iiko_entity.root_type = $") == 2  # scope и сам DELETE
+    assert set(compiled.params["mirror_ids"]) == ids
+    assert len(compiled.params) == 3  # root_type, массив ID, множитель 2
+
+
+@pytest.mark.asyncio
+async def test_bigint_ids_bind_as_bigint_array():
+    session = _session(total=3, doomed=1, deleted=1)
+    assert await mirror_delete(FTDirection.__table__, "id", {1, 2}, "FT", session) == 1
+    assert "::BIGINT[]" in str(_compiled(session))
+
+
+@pytest.mark.asyncio
+async def test_over_half_is_blocked():
+    session = _session(total=100, doomed=51, deleted=0)
+    assert (
+        await mirror_delete(Entity.__table__, "id", {uuid.uuid4()}, "e", session) == 0
+    )
+
+
+@pytest.mark.asyncio
+async def test_empty_ids_skip_query():
+    session = _session(total=0, doomed=0, deleted=0)
+    assert await mirror_delete(Entity.__table__, "id", set(), "e", session) == 0
+    session.execute.assert_not_awaited()
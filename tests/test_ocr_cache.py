@@ -0,0 +1,163 @@
+"""
+Тесты: кеш результатов OCR по содержимому фото (use_cases/ocr_cache.py).
+
+БД не нужна: сессия-заглушка, SQL компилируется диалектом PostgreSQL.
+Запуск: pytest tests/test_ocr_cache.py -v
+"""
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import cv2
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from use_cases import ocr_cache
+from use_cases.ocr_pipeline import process_photo_batch
+from utils.image_prep import prepare_image_sync
+from tests.test_image_prep import _document, _jpeg
+
+
+def _invoice(number: str):
+    """УПД одного шаблона: отличается только номер в шапке."""
+    page = _document(1200, 1600)
+    page[40:120, 600:1150] = 235
+    cv2.putText(page, number, (620, 100), cv2.FONT_HERSHEY_SIMPLEX, 2, (20, 20, 20), 4)
+    return page
+
+
+class _Session:
+    """Заглушка AsyncSession: execute() отдаёт строки по очереди."""
+
+    def __init__(self, *rows):
+        self.rows = list(rows)
+        self.statements: list = []
+        self.commit = AsyncMock()
+
+    async def execute(self, stmt, params=None):
+        self.statements.append(stmt)
+        row = self.rows.pop(0) if self.rows else None
+        return MagicMock(first=MagicMock(return_value=row))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def _patch_session(session):
+    return patch(
+        "use_cases.ocr_cache.async_session_factory", MagicMock(return_value=session)
+    )
+
+
+@pytest.fixture(autouse=True)
+def _reset_stats():
+    for key in ocr_cache._stats:
+        ocr_cache._stats[key] = 0
+
+
+@pytest.mark.asyncio
+async def test_same_template_other_number_is_a_miss():
+    """Тот же шаблон, другой номер — другой документ: кеш его не выдаёт."""
+    cached = prepare_image_sync(_jpeg(_invoice("No 1043")))
+    other = prepare_image_sync(_jpeg(_invoice("No 1048")))
+    assert cached.content_hash and other.content_hash != cached.content_hash
+
+    session = _Session(None)  # записи с таким content_hash нет
+    with _patch_session(session):
+        assert await ocr_cache.lookup(other.content_hash) is None
+
+    (stmt,) = session.statements  # одно точное сравнение, без поиска «похожих»
+    params = stmt.compile(dialect=postgresql.dialect()).params
+    assert other.content_hash in params.values()
+    assert ocr_cache.get_stats()["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_same_template_batch_recognizes_every_document():
+    """Пачка УПД одного шаблона с разными номерами: у каждого свой OCR."""
+    photos = [_jpeg(_invoice(f"No {n}")) for n in (1043, 1048, 1051)]
+    stored: dict[str, dict] = {}
+
+    async def _lookup(content_hash):
+        hit = stored.get(content_hash)
+        return None if hit is None else {**hit, "_cache": "exact"}
+
+    async def _store(content_hash, result):
+        stored[content_hash] = result
+
+    recognize = AsyncMock(
+        side_effect=[
+            {"doc_type": "upd", "doc_number": str(n), "items": []}
+            for n in (1043, 1048, 1051)
+        ]
+    )
+    with (
+        patch("adapters.gpt5_vision_ocr.recognize_document", recognize),
+        patch("use_cases.ocr_cache.lookup", _lookup),
+        patch("use_cases.ocr_cache.store", _store),
+    ):
+        results = await process_photo_batch(photos, invoices_only=False)
+
+    assert recognize.await_count == 3
+    assert len(stored) == 3
+    assert sorted(r.doc_number for r in results) == ["1043", "1048", "1051"]
+
+
+@pytest.mark.asyncio
+async def test_exact_hit_returns_copy_and_counts():
+    row = SimpleNamespace(id=7, result={"doc_type": "upd", "items": []})
+    session = _Session(row)
+    with _patch_session(session):
+        result = await ocr_cache.lookup("a" * 64)
+
+    assert result == {"doc_type": "upd", "items": [], "_cache": "exact"}
+    assert "_cache" not in row.result
+    assert len(session.statements) == 2  # SELECT + UPDATE hits
+    session.commit.assert_awaited_once()
+    stats = ocr_cache.get_stats()
+    assert (stats["hits"], stats["hit_rate"]) == (1, 1.0)
+
+
+@pytest.mark.asyncio
+async def test_store_upserts_and_skips_errors():
+    session = _Session()
+    with _patch_session(session):
+        await ocr_cache.store("c" * 64, {"error": "timeout"})
+        await ocr_cache.store("c" * 64, {"doc_type": "upd", "_cache": "x"})
+
+    assert len(session.statements) == 1
+    stmt = session.statements[0]
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (content_hash) DO UPDATE" in sql
+    assert stmt.compile().params["result"] == {"doc_type": "upd"}
+
+
+@pytest.mark.asyncio
+async def test_pipeline_hit_skips_gpt_and_bypass_flag():
+    photo = _jpeg(_document(1000, 1400))
+    prep = prepare_image_sync(photo)
+    cached = {"doc_type": "cash_order", "items": [], "_cache": "exact"}
+    recognize = AsyncMock(return_value={"doc_type": "cash_order", "items": []})
+    lookup = AsyncMock(return_value=cached)
+    store = AsyncMock()
+    with (
+        patch("adapters.gpt5_vision_ocr.recognize_document", recognize),
+        patch("use_cases.ocr_cache.lookup", lookup),
+        patch("use_cases.ocr_cache.store", store),
+    ):
+        await process_photo_batch([photo], invoices_only=False)
+        recognize.assert_not_awaited()
+        lookup.assert_awaited_once_with(prep.content_hash)
+
+        await process_photo_batch([photo], invoices_only=False, use_cache=False)
+        recognize.assert_awaited_once()
+        assert lookup.await_count == 1
+        store.assert_not_awaited()
+
+        lookup.return_value = None
+        await process_photo_batch([photo], invoices_only=False)
+        assert recognize.await_count == 2
+        store.assert_awaited_once()
@@ -0,0 +1,186 @@
+"""
+Тесты: адаптивная параллельность вызовов GPT Vision (use_cases/ocr_scheduler.py)
+и многостраничные запросы в ocr_pipeline (альбом «страницы одного документа»).
+
+GPT не вызывается: recognize_document / recognize_pages подменяются.
+Запуск: pytest tests/test_ocr_scheduler.py -v
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import openai
+import pytest
+
+from use_cases import ocr_scheduler
+from use_cases.ocr_pipeline import PhotoStream, document_usage
+from use_cases.ocr_scheduler import AdaptiveLimiter
+from tests.test_image_prep import _document, _jpeg
+
+_USAGE = {"prompt_tokens": 1000, "completion_tokens": 200, "total_tokens": 1200}
+
+
+@pytest.fixture(autouse=True)
+def _reset_scheduler():
+    ocr_scheduler._limiter = None
+    ocr_scheduler._docs.clear()
+    for key in ocr_scheduler._stats:
+        ocr_scheduler._stats[key] = 0
+    yield
+    ocr_scheduler._limiter = None
+
+
+def _rate_limit(retry_after: str = "0") -> openai.RateLimitError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(
+        429, headers={"retry-after": retry_after}, request=request
+    )
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+def _upd(**extra) -> dict:
+    return {
+        "doc_type": "cash_order",
+        "doc_number": "17",
+        "items": [],
+        "_usage": dict(_USAGE),
+        **extra,
+    }
+
+
+# ═══════════════════════════════════════════════════════
+# 1. AIMD-лимит
+# ═══════════════════════════════════════════════════════
+
+
+@pytest.mark.asyncio
+async def test_limiter_grows_additively_and_halves_on_overload():
+    limiter = AdaptiveLimiter(start=4, max_limit=6, target_latency=10)
+    for _ in range(4):
+        await limiter.on_success(1.0)
+    assert limiter.limit == 5
+
+    await limiter.on_overload("RateLimitError")
+    assert limiter.limit == 2
+    await limiter.on_success(30.0)  # медленнее цели — тоже перегрузка
+    assert limiter.limit == 1
+    await limiter.on_overload("RateLimitError")
+    assert limiter.limit == 1  # не ниже min_limit
+
+
+@pytest.mark.asyncio
+async def test_album_respects_limit_instead_of_firing_all():
+    running = peak = 0
+
+    async def _fake(image, prepared):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return _upd()
+
+    with patch("adapters.gpt5_vision_ocr.recognize_document", _fake):
+        await asyncio.gather(*(ocr_scheduler.recognize([b"x"]) for _ in range(20)))
+
+    assert peak <= ocr_scheduler.OCR_CONCURRENCY_MAX
+    assert peak < 20
+    stats = ocr_scheduler.get_ocr_stats()
+    assert stats["requests"] == 20
+    assert stats["tokens"] == 20 * 1200
+    assert stats["limit"] > ocr_scheduler.OCR_CONCURRENCY_START  # разогнался
+
+
+@pytest.mark.asyncio
+async def test_429_backs_off_retries_and_records_attempts():
+    fake = AsyncMock(side_effect=[_rate_limit(), _upd()])
+    with patch("adapters.gpt5_vision_ocr.recognize_document", fake):
+        result = await ocr_scheduler.recognize([b"x"])
+
+    assert result["_attempts"] == 2
+    stats = ocr_scheduler.get_ocr_stats()
+    assert (stats["throttled"], stats["retries"]) == (1, 1)
+    assert stats["limit"] == ocr_scheduler.OCR_CONCURRENCY_START // 2
+    assert stats["recent_docs"][-1]["total_tokens"] == 1200
+
+
+@pytest.mark.asyncio
+async def test_retries_exhausted_raise():
+    fake = AsyncMock(side_effect=_rate_limit())
+    with (
+        patch("adapters.gpt5_vision_ocr.recognize_document", fake),
+        patch.object(ocr_scheduler, "OCR_MAX_RETRIES", 1),
+    ):
+        with pytest.raises(openai.RateLimitError):
+            await ocr_scheduler.recognize([b"x"])
+    assert fake.await_count == 2
+    assert ocr_scheduler.get_ocr_stats()["failed"] == 1
+
+
+# ═══════════════════════════════════════════════════════
+# 2. Многостраничный запрос + учёт по документу
+# ═══════════════════════════════════════════════════════
+
+
+@pytest.mark.asyncio
+async def test_one_document_album_sends_one_multi_image_request():
+    photos = [_jpeg(_document(1000, 1400)) for _ in range(2)]
+    pages = AsyncMock(
+        return_value=_upd(page_number=1, total_pages=2, _pages_in_request=2)
+    )
+    single = AsyncMock(return_value=_upd(doc_number="99"))
+    with (
+        patch("adapters.gpt5_vision_ocr.recognize_pages", pages),
+        patch("adapters.gpt5_vision_ocr.recognize_document", single),
+    ):
+        stream = PhotoStream(invoices_only=False, use_cache=False)
+        stream.add(photos[0])
+        await asyncio.sleep(0.3)  # первое фото успело распознаться отдельно
+        stream.one_document = True  # подпись «страницы» пришла со вторым
+        stream.add(photos[0])
+        stream.add(photos[1])
+        results = await stream.finish()
+
+    single.assert_awaited_once()
+    pages.assert_awaited_once()
+    assert len(pages.await_args.args[0]) == 2
+    assert sorted(r.doc_number for r in results) == ["17", "99"]
+    doc = next(r for r in results if r.doc_number == "17")
+    assert doc.status != "incomplete"
+    assert (doc.page_count, doc.total_pages) == (2, 2)
+    assert (doc.usage["requests"], doc.usage["total_tokens"]) == (1, 1200)
+
+
+@pytest.mark.asyncio
+async def test_one_response_for_n_pages_counts_every_page():
+    """Ответ без полей адаптера (_pages_in_request) — страниц всё равно N."""
+    photos = [_jpeg(_document(1000, 1400)) for _ in range(3)]
+    pages = AsyncMock(return_value=_upd(total_pages=2))
+    with patch("adapters.gpt5_vision_ocr.recognize_pages", pages):
+        stream = PhotoStream(invoices_only=False, use_cache=False, one_document=True)
+        for photo in photos:
+            stream.add(photo)
+        results = await stream.finish()
+
+    assert len(results) == 1
+    doc = results[0]
+    assert doc.status != "incomplete"
+    assert (doc.page_count, doc.total_pages) == (3, 3)
+
+
+def test_document_usage_sums_calls_and_skips_cache():
+    pages = [
+        {"_usage": _USAGE, "_latency_sec": 12.5},
+        {"_usage": _USAGE, "_latency_sec": 20.0},
+        {"_usage": _USAGE, "_cache": "exact"},
+    ]
+    usage = document_usage(pages)
+    assert usage == {
+        "requests": 2,
+        "cached": 1,
+        "prompt_tokens": 2000,
+        "completion_tokens": 400,
+        "total_tokens": 2400,
+        "latency_sec": 32.5,
+    }
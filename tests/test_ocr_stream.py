@@ -0,0 +1,63 @@
+"""
+Тесты: потоковая обработка альбома (use_cases/ocr_pipeline.PhotoStream).
+
+GPT не вызывается: recognize_document подменяется задержкой.
+Запуск: pytest tests/test_ocr_stream.py -v
+"""
+
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+
+from use_cases import ocr_scheduler
+from use_cases.ocr_pipeline import PhotoStream
+from tests.test_image_prep import _document, _jpeg
+
+_DOWNLOAD = 0.05
+_RECOGNIZE = 0.3
+
+
+@pytest.fixture(autouse=True)
+def _reset_scheduler():
+    ocr_scheduler._limiter = None
+    yield
+    ocr_scheduler._limiter = None
+
+
+def _fake_recognize(first_done: list[float], t0: float):
+    async def _recognize(image, prepared):
+        await asyncio.sleep(_RECOGNIZE)
+        first_done.append(time.monotonic() - t0)
+        return {"doc_type": "cash_order", "doc_number": "1", "items": []}
+
+    return _recognize
+
+
+async def _download(photo: bytes) -> bytes:
+    await asyncio.sleep(_DOWNLOAD)
+    return photo
+
+
+@pytest.mark.asyncio
+async def test_download_failure_is_per_photo_error():
+    async def _broken() -> bytes:
+        raise ConnectionError("telegram")
+
+    photo = _jpeg(_document(1000, 1400))
+    with patch(
+        "adapters.gpt5_vision_ocr.recognize_document",
+        _fake_recognize([], time.monotonic()),
+    ):
+        stream = PhotoStream(invoices_only=False, use_cache=False)
+        stream.add(_download(photo))
+        stream.add(_broken())
+        results = await stream.finish()
+
+    assert len(stream) == 2
+    errors = [r for r in results if r.status == "error"]
+    assert [e.errors for e in errors] == [["Не удалось загрузить фото"]]
+    breakdown = stream.latency_breakdown()
+    assert breakdown["photos"] == 2
+    assert breakdown["first_result_sec"] >= _RECOGNIZE
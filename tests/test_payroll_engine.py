@@ -0,0 +1,330 @@
+"""
+Тесты: расчётный движок ФОТ (use_cases/payroll_engine.py) и
+compute_fot_sections (use_cases/payroll.py) — сверка до бита с прежним
+расчётом (get_rate_for_date / get_prorated_monthly / построчный цикл) на
+записанном месяце.
+
+БД и iiko не нужны: история, сотрудники и явки генерируются с фиксированным seed.
+Запуск: pytest tests/test_payroll_engine.py -v
+"""
+
+import random
+from collections import defaultdict
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from use_cases.payroll import (
+    _days_in_month,
+    _display_name,
+    _full_name,
+    _get_role_name,
+    compute_fot_sections,
+)
+from use_cases.payroll_engine import RateIndex, parse_dt, shift_hours
+from use_cases.salary_history import get_prorated_monthly, get_rate_for_date
+
+MONTH_START = date(2026, 3, 1)
+TODAY = date(2026, 3, 31)
+_TYPES = ("посменная", "почасовая", "ежемесячная")
+
+
+# ═══════════════════════════════════════════════════════
+# Прежний расчёт (до движка) — эталон для сверки
+# ═══════════════════════════════════════════════════════
+
+
+def _legacy_sections(
+    attendance_records,
+    history_index,
+    employees_db,
+    roles_db,
+    motivation_by_dept,
+    today=TODAY,
+):
+    month_start = MONTH_START
+    days_in_m = _days_in_month(today.year, today.month)
+
+    def _hours_from_attendance(rec):
+        return shift_hours(parse_dt(rec.get("dateFrom")), parse_dt(rec.get("dateTo")))
+
+    emp_by_iiko_id, emp_by_full_name = {}, {}
+    for emp in employees_db:
+        emp_by_iiko_id[str(emp.id)] = emp
+        fn = _full_name(emp)
+        if fn:
+            emp_by_full_name[fn] = emp
+    role_by_iiko_id = {str(r.id): r for r in roles_db}
+
+    emp_dept_stats = defaultdict(
+        lambda: defaultdict(lambda: {"dept_name": "", "shifts": 0, "hours": 0.0})
+    )
+    emp_dept_earnings = defaultdict(float)
+    _iiko_to_fn = {i: _full_name(e) for i, e in emp_by_iiko_id.items()}
+    for rec in attendance_records:
+        emp_id = (rec.get("employeeId") or "").strip()
+        dept_id = (rec.get("departmentId") or "").strip()
+        dept_name = (rec.get("departmentName") or "").strip() or dept_id or "Без цеха"
+        if not emp_id:
+            continue
+        emp_dept_stats[emp_id][dept_id]["dept_name"] = dept_name
+        emp_dept_stats[emp_id][dept_id]["shifts"] += 1
+        hours = _hours_from_attendance(rec)
+        emp_dept_stats[emp_id][dept_id]["hours"] += hours
+        fn = _iiko_to_fn.get(emp_id)
+        if fn:
+            history = history_index.get(fn, [])
+            shift_dt = parse_dt(rec.get("dateFrom"))
+            if shift_dt and history:
+                active = get_rate_for_date(history, shift_dt.date())
+                if active:
+                    shift_rate = float(active["rate"])
+                    if active["sal_type"] == "посменная":
+                        emp_dept_earnings[(emp_id, dept_id)] += shift_rate
+                    elif active["sal_type"] == "почасовая":
+                        emp_dept_earnings[(emp_id, dept_id)] += shift_rate * hours
+
+    dept_sections_map = {}
+    _fn_to_iiko = {_full_name(e): i for i, e in emp_by_iiko_id.items() if _full_name(e)}
+    for fn, history in history_index.items():
+        active = get_rate_for_date(history, today)
+        if not active or active["sal_type"] == "ежемесячная":
+            continue
+        emp_iiko_id = _fn_to_iiko.get(fn)
+        emp = emp_by_full_name.get(fn)
+        if emp is None:
+            continue
+        dept_map = emp_dept_stats.get(emp_iiko_id, {}) if emp_iiko_id else {}
+        if not dept_map:
+            continue
+        role_name = _get_role_name(emp, dept_map, role_by_iiko_id)
+        for dept_id, dept_info in dept_map.items():
+            dept_name = dept_info["dept_name"]
+            earnings = round(emp_dept_earnings.get((emp_iiko_id, dept_id), 0.0), 2)
+            bonus = round((motivation_by_dept.get(fn) or {}).get(dept_name, 0.0), 2)
+            if dept_id not in dept_sections_map:
+                dept_sections_map[dept_id] = {"dept_name": dept_name, "employees": []}
+            dept_sections_map[dept_id]["employees"].append(
+                {
+                    "name": _display_name(emp),
+                    "role": role_name,
+                    "rate_total": earnings,
+                    "bonus": bonus,
+                    "iiko_id": str(emp.id),
+                }
+            )
+
+    monthly_section = []
+    monthly_names = set()
+    for fn, hist in history_index.items():
+        active = get_rate_for_date(hist, today)
+        if active and active["sal_type"] == "ежемесячная":
+            monthly_names.add(fn)
+    for fn in monthly_names:
+        history = history_index.get(fn, [])
+        emp = emp_by_full_name.get(fn)
+        if emp is None:
+            continue
+        role_name = ""
+        if emp.role_id and str(emp.role_id) in role_by_iiko_id:
+            role_name = role_by_iiko_id[str(emp.role_id)].name or ""
+        total = get_prorated_monthly(history, month_start, today, days_in_m)
+        bonus = round(sum((motivation_by_dept.get(fn) or {}).values()), 2)
+        monthly_section.append(
+            {
+                "name": _display_name(emp),
+                "role": role_name,
+                "rate_total": round(total, 2),
+                "bonus": bonus,
+                "iiko_id": str(emp.id),
+            }
+        )
+
+    for sec in dept_sections_map.values():
+        sec["employees"].sort(key=lambda e: e["name"].lower())
+    monthly_section.sort(key=lambda e: e["name"].lower())
+    dept_sections = sorted(
+        dept_sections_map.values(), key=lambda s: s["dept_name"].lower()
+    )
+    return dept_sections, monthly_section
+
+
+# ═══════════════════════════════════════════════════════
+# Записанный месяц
+# ═══════════════════════════════════════════════════════
+
+
+def _history(rnd: random.Random) -> list[dict]:
+    """История как из load_salary_history_index: смены ставок, дыры, нахлёсты."""
+    sal_type = rnd.choice(_TYPES)
+    starts = sorted(
+        rnd.sample(range(-400, 40), rnd.choice((1, 1, 2, 3)))
+    )  # дни от 1 марта
+    out = []
+    for i, off in enumerate(starts):
+        valid_from = MONTH_START + timedelta(days=off)
+        if i + 1 < len(starts):
+            gap = rnd.choice((1, 1, 1, 4, -3))  # -3 — нахлёст ручной правкой
+            valid_to = MONTH_START + timedelta(days=starts[i + 1] - gap)
+        else:
+            valid_to = rnd.choice((None, None, None, TODAY - timedelta(days=9)))
+        if rnd.random() < 0.15:
+            sal_type = rnd.choice(_TYPES)
+        rate = {
+            "посменная": rnd.choice((1500.0, 1800.0, 2250.5)),
+            "почасовая": rnd.choice((250.0, 312.75, 400.0)),
+            "ежемесячная": rnd.choice((60000.0, 75000.0, 91234.56)),
+        }[sal_type]
+        out.append(
+            {
+                "sal_type": sal_type,
+                "rate": rate,
+                "mot_pct": None,
+                "mot_base": None,
+                "valid_from": valid_from,
+                "valid_to": valid_to,
+            }
+        )
+    return out
+
+
+def _recorded_month(n_employees: int, seed: int = 2026):
+    rnd = random.Random(seed)
+    roles = [SimpleNamespace(id=f"role-{i}", name=f"Должность {i}") for i in range(6)]
+    depts = [(f"dept-{i}", f"Цех {i}") for i in range(8)] + [("", "")]
+    employees, history_index, attendance, motivation = [], {}, [], {}
+    for i in range(n_employees):
+        emp = SimpleNamespace(
+            id=f"emp-{i:04d}",
+            last_name=f"Фамилия{i:04d}",
+            first_name=rnd.choice(("Иван", "Анна", "")),
+            middle_name=rnd.choice(("Петрович", "")),
+            name=f"Сотрудник {i}",
+            role_id=rnd.choice([r.id for r in roles] + [None]),
+        )
+        employees.append(emp)
+        fn = _full_name(emp)
+        if i % 17 == 3:
+            history_index[fn] = []  # есть в истории, но без записей
+        elif i % 23 != 5:  # часть сотрудников без истории вовсе
+            history_index[fn] = _history(rnd)
+        if rnd.random() < 0.3:
+            motivation[fn] = {
+                rnd.choice(depts)[1] or "Без цеха": rnd.uniform(100, 9000)
+            }
+
+        my_depts = rnd.sample(depts, rnd.choice((1, 1, 2)))
+        for day in range(31):
+            if rnd.random() > 0.7:
+                continue
+            dept_id, dept_name = rnd.choice(my_depts)
+            d = MONTH_START + timedelta(days=day)
+            start_h = rnd.choice((8, 9, 16, 22))
+            length = rnd.choice((4.5, 8, 11.75, 12))
+            t_from = f"{d.isoformat()}T{start_h:02d}:00:00"
+            end = (
+                d.isoformat()
+                if start_h + length < 24
+                else (d + timedelta(1)).isoformat()
+            )
+            end_h = (start_h + length) % 24
+            t_to = f"{end}T{int(end_h):02d}:{int(end_h % 1 * 60):02d}:00"
+            fmt = rnd.random()
+            if fmt < 0.4:
+                t_from, t_to = t_from + "+02:00", t_to + "+02:00"
+            elif fmt < 0.5:
+                t_from, t_to = t_from.replace("T", " "), t_to.replace("T", " ")
+            elif fmt < 0.55:
+                t_to = None  # смена не закрыта
+            attendance.append(
+                {
+                    "employeeId": emp.id,
+                    "departmentId": dept_id,
+                    "departmentName": (
+                        dept_name.upper() if rnd.random() < 0.05 else dept_name
+                    ),
+                    "dateFrom": t_from,
+                    "dateTo": t_to,
+                }
+            )
+    # Чужие явки: без сотрудника, сотрудник не в БД, неразборчивая дата
+    attendance.append({"employeeId": "", "departmentId": "dept-1"})
+    attendance.append(
+        {"employeeId": "ghost", "departmentId": "dept-1", "dateFrom": "2026-03-02"}
+    )
+    attendance.append(
+        {"employeeId": employees[0].id, "departmentId": "dept-2", "dateFrom": "вчера"}
+    )
+    rnd.shuffle(attendance)
+    return attendance, history_index, employees, roles, motivation
+
+
+# ═══════════════════════════════════════════════════════
+# Сверка
+# ═══════════════════════════════════════════════════════
+
+
+def test_rate_index_matches_linear_scan_every_day():
+    rnd = random.Random(7)
+    for _ in range(300):
+        history = _history(rnd)
+        idx = RateIndex.build(history)
+        for off in range(-420, 60):
+            d = MONTH_START + timedelta(days=off)
+            assert idx.at(d) is get_rate_for_date(history, d)
+
+
+def test_prorated_monthly_is_bit_exact():
+    rnd = random.Random(11)
+    for _ in range(300):
+        history = _history(rnd)
+        idx = RateIndex.build(history)
+        for start, end in ((MONTH_START, TODAY), (MONTH_START, date(2026, 3, 17))):
+            assert idx.prorated_monthly(start, end, 31) == get_prorated_monthly(
+                history, start, end, 31
+            )
+
+
+def test_empty_history_has_no_rate():
+    idx = RateIndex.build([])
+    assert idx.at(TODAY) is None
+    assert idx.prorated_monthly(MONTH_START, TODAY, 31) == 0.0
+
+
+def test_recorded_month_sections_are_bit_exact():
+    attendance, history_index, employees, roles, motivation = _recorded_month(120)
+    expected = _legacy_sections(attendance, history_index, employees, roles, motivation)
+
+    got = compute_fot_sections(
+        attendance_records=attendance,
+        history_index=history_index,
+        employees_db=employees,
+        roles_db=roles,
+        motivation_by_dept=motivation,
+        month_start=MONTH_START,
+        today=TODAY,
+    )
+
+    assert got == expected
+    # == на float — побитовое равенство; убедимся, что сверялось непустое
+    dept_sections, monthly_section = got
+    assert sum(len(s["employees"]) for s in dept_sections) > 50
+    assert monthly_section and any(e["rate_total"] for e in monthly_section)
+
+
+@pytest.mark.parametrize("day", [1, 17, 28])
+def test_partial_month_is_bit_exact(day):
+    """Ежедневный запуск: период 1-е … target_date внутри месяца."""
+    attendance, history_index, employees, roles, motivation = _recorded_month(60, day)
+    today = date(2026, 3, day)
+    in_period = [
+        r for r in attendance if (r.get("dateFrom") or "")[:10] <= today.isoformat()
+    ]
+    expected = _legacy_sections(
+        in_period, history_index, employees, roles, motivation, today
+    )
+    got = compute_fot_sections(
+        in_period, history_index, employees, roles, motivation, MONTH_START, today
+    )
+    assert got == expected
@@ -0,0 +1,383 @@
+"""
+Тесты: инкрементальный ФОТ (use_cases/payroll_partials.py) — дневные итоги
+месяца совпадают с расчётом за весь месяц, из iiko тянется только последняя
+неделя (исправленная задним числом явка меняет итоги), правка ставок задним
+числом пересчитывает дни с даты правки.
+
+БД и iiko не нужны: хранилище дней — словарь, запросы к iiko подменяются
+и отдают записанный месяц (tests/test_payroll_engine._recorded_month).
+Запуск: pytest tests/test_payroll_partials.py -v
+"""
+
+from datetime import date, datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from tests.test_payroll_engine import MONTH_START, _recorded_month
+from use_cases import payroll_partials as pp
+from use_cases.payroll import _full_name, build_fot_sections, compute_fot_sections
+from use_cases.payroll_engine import RateTable, build_rate_indexes, parse_dt
+from use_cases.revenue_motivation import (
+    attendance_shift_pairs,
+    attendance_work_days,
+)
+
+PASTRY_GROUP = "group-pastry"
+
+
+class _Store:
+    """payroll_day / payroll_day_partial в памяти."""
+
+    def __init__(self):
+        self.days: dict[date, pp.DayPartial] = {}
+        self.dirty: set[date] = set()
+
+    async def load_days(self, first, last):
+        return [
+            p
+            for d, p in sorted(self.days.items())
+            if first <= d <= last and d not in self.dirty
+        ]
+
+    async def save_days(self, parts):
+        for p in parts:
+            self.days[p.day] = p
+            self.dirty.discard(p.day)
+
+    async def mark_dirty_from(self, first):
+        self.dirty |= {d for d in self.days if d >= first}
+
+
+class _Iiko:
+    """Явки / OLAP / расходные накладные записанного месяца, с учётом вызовов."""
+
+    def __init__(self, attendance):
+        self.attendance = attendance
+        self.calls: list[tuple[str, str, str]] = []
+        self.records_sent = 0
+        days = sorted({r["dateFrom"][:10] for r in attendance})
+        self.olap = [
+            {"CloseTime": d, "Department": f"Цех {i}", "DishDiscountSumInt": 1000 + i}
+            for d in days
+            for i in range(8)
+        ]
+        self.docs = [
+            {
+                "dateIncoming": f"{d} 10:00:00",
+                "items": [{"productId": "cake", "sum": 2500.5}],
+            }
+            for d in days
+        ]
+
+    async def attendance_api(self, date_from, date_to, with_payment_details=False):
+        self.calls.append(("attendance", date_from, date_to))
+        out = [r for r in self.attendance if date_from <= r["dateFrom"][:10] <= date_to]
+        self.records_sent += len(out)
+        return out
+
+    async def olap_api(self, date_from, date_to):
+        self.calls.append(("olap", date_from, date_to))
+        return [r for r in self.olap if date_from <= r["CloseTime"] <= date_to]
+
+    async def invoices_api(self, date_from, date_to):
+        self.calls.append(("invoices", date_from, date_to))
+        return [d for d in self.docs if date_from <= d["dateIncoming"][:10] <= date_to]
+
+
+def _month(n_employees=80, seed=2026):
+    attendance, history_index, employees, roles, motivation = _recorded_month(
+        n_employees, seed
+    )
+    # iiko отдаёт явки с датой начала внутри диапазона, по возрастанию даты
+    attendance = sorted(
+        (r for r in attendance if parse_dt(r.get("dateFrom"))),
+        key=lambda r: r["dateFrom"][:10],
+    )
+    return attendance, history_index, employees, roles, motivation
+
+
+@pytest.fixture
+def env():
+    store = _Store()
+    started = []
+
+    def _patch(attendance):
+        iiko = _Iiko(attendance)
+        patches = [
+            patch.object(pp, "load_days", store.load_days),
+            patch.object(pp, "save_days", store.save_days),
+            patch.object(pp, "fetch_attendance", iiko.attendance_api),
+            patch.object(pp, "fetch_motivation_revenue_olap", iiko.olap_api),
+            patch.object(pp, "fetch_outgoing_invoices", iiko.invoices_api),
+            patch.object(pp, "_load_pastry_group_ids_expanded", _async({PASTRY_GROUP})),
+            patch.object(
+                pp, "_load_product_group_index", _async({"cake": PASTRY_GROUP})
+            ),
+        ]
+        for p in patches:
+            p.start()
+            started.append(p)
+        return iiko
+
+    yield store, _patch
+    for p in started:
+        p.stop()
+
+
+def _async(value):
+    async def _fn():
+        return value
+
+    return _fn
+
+
+async def _run(day: date, history_index, employees, now_day: date | None = None):
+    """Ежедневный запуск: в 07:00 следующего дня считаем месяц по day."""
+    now = datetime.combine(now_day or day + timedelta(days=1), datetime.min.time())
+    fullnames = {str(e.id): _full_name(e) for e in employees}
+    with patch.object(pp, "now_kgd", return_value=now.replace(hour=7)):
+        return await pp.month_totals(
+            MONTH_START,
+            day,
+            RateTable(build_rate_indexes(history_index)),
+            fullnames,
+        )
+
+
+def _sections(totals, history_index, employees, roles, motivation, today):
+    return build_fot_sections(
+        emp_dept_stats=totals.emp_dept_stats,
+        emp_dept_earnings=totals.emp_dept_earnings,
+        rates=build_rate_indexes(history_index),
+        employees_db=employees,
+        roles_db=roles,
+        motivation_by_dept=motivation,
+        month_start=MONTH_START,
+        today=today,
+    )
+
+
+def _assert_same_sections(got, expected):
+    """Суммы дней vs сумма месяца: порядок сложения float разный — до копейки."""
+    got_depts, got_monthly = got
+    exp_depts, exp_monthly = expected
+    assert [s["dept_name"] for s in got_depts] == [s["dept_name"] for s in exp_depts]
+    assert got_monthly == exp_monthly
+    for g, e in zip(got_depts, exp_depts):
+        assert len(g["employees"]) == len(e["employees"])
+        for ge, ee in zip(g["employees"], e["employees"]):
+            assert {**ge, "rate_total": 0} == {**ee, "rate_total": 0}
+            assert ge["rate_total"] == pytest.approx(ee["rate_total"], abs=0.011)
+
+
+@pytest.mark.asyncio
+async def test_daily_runs_equal_full_month_recompute(env):
+    store, patch_iiko = env
+    attendance, history_index, employees, roles, motivation = _month()
+    iiko = patch_iiko(attendance)
+
+    for day in range(1, 32):
+        totals = await _run(date(2026, 3, day), history_index, employees)
+        assert totals.fetched_days == min(day, pp.RECHECK_DAYS)
+    today = date(2026, 3, 31)
+
+    expected = compute_fot_sections(
+        attendance, history_index, employees, roles, motivation, MONTH_START, today
+    )
+    _assert_same_sections(
+        _sections(totals, history_index, employees, roles, motivation, today),
+        expected,
+    )
+    # Входы мотивации — те же, что из явок за месяц
+    assert totals.emp_shifts == attendance_shift_pairs(attendance)
+    emp_dates, emp_depts = attendance_work_days(attendance)
+    assert totals.emp_dates == dict(emp_dates)
+    assert {k: set(v) for k, v in totals.emp_depts.items()} == {
+        k: set(v) for k, v in emp_depts.items() if v
+    }
+    assert totals.dept_revenue() == {f"Цех {i}": (1000 + i) * 31 for i in range(8)}
+    assert totals.pastry_sum == pytest.approx(2500.5 * 31)
+    # Каждый запуск — один диапазон (окно RECHECK_DAYS) на каждый из трёх отчётов
+    assert len(iiko.calls) == 3 * 31
+    assert iiko.calls[-1] == ("invoices", "2026-03-25", "2026-03-31")
+
+
+@pytest.mark.asyncio
+async def test_open_day_is_not_saved(env):
+    store, patch_iiko = env
+    attendance, history_index, employees, _, _ = _month(20)
+    iiko = patch_iiko(attendance)
+    today = date(2026, 3, 10)
+
+    await _run(today, history_index, employees, now_day=today)
+    await _run(today, history_index, employees, now_day=today)
+
+    assert sorted(store.days) == [MONTH_START + timedelta(days=i) for i in range(9)]
+    # Второй запуск: 1…2 из хранилища, окно 3…9 и «сегодня» снова из iiko
+    assert iiko.calls[-3:] == [
+        ("attendance", "2026-03-03", "2026-03-10"),
+        ("olap", "2026-03-03", "2026-03-10"),
+        ("invoices", "2026-03-03", "2026-03-10"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_corrected_attendance_for_stored_day_changes_totals(env):
+    """Явку уже сохранённого дня исправили в iiko — следующий запуск её учтёт."""
+    store, patch_iiko = env
+    attendance, history_index, employees, roles, motivation = _month(30)
+    patch_iiko(attendance)
+    for day in range(1, 11):
+        await _run(date(2026, 3, day), history_index, employees)
+    assert date(2026, 3, 8) in store.days
+
+    # Менеджер закрыл забытую смену 8-го: в iiko конец смены позже на 4 часа
+    idx, rec = next(
+        (i, r)
+        for i, r in enumerate(attendance)
+        if r["dateFrom"].startswith("2026-03-08") and r.get("dateTo")
+    )
+    new_to = parse_dt(rec["dateTo"]) + timedelta(hours=4)
+    attendance[idx] = {**rec, "dateTo": new_to.isoformat()}
+    emp_id = rec["employeeId"]
+    before = sum(
+        h for (e, _), h in _hours(store.days[date(2026, 3, 8)]).items() if e == emp_id
+    )
+
+    today = date(2026, 3, 11)
+    totals = await _run(today, history_index, employees)
+
+    after = sum(
+        h for (e, _), h in _hours(store.days[date(2026, 3, 8)]).items() if e == emp_id
+    )
+    assert after == pytest.approx(before + 4, abs=0.01)
+    in_period = [r for r in attendance if r["dateFrom"][:10] <= today.isoformat()]
+    _assert_same_sections(
+        _sections(totals, history_index, employees, roles, motivation, today),
+        compute_fot_sections(
+            in_period, history_index, employees, roles, motivation, MONTH_START, today
+        ),
+    )
+
+
+def _hours(part: pp.DayPartial) -> dict[tuple[str, str], float]:
+    return {(r.employee_id, r.dept_id): r.hours for r in part.rows}
+
+
+@pytest.mark.asyncio
+async def test_rate_edit_recomputes_from_its_date(env):
+    store, patch_iiko = env
+    attendance, history_index, employees, roles, motivation = _month(60)
+    iiko = patch_iiko(attendance)
+    for day in range(1, 11):
+        await _run(date(2026, 3, day), history_index, employees)
+
+    # Ставку посменного сотрудника подняли задним числом с 5-го
+    fn, hist = next(
+        (fn, h)
+        for fn, h in history_index.items()
+        if h and h[-1]["sal_type"] == "посменная" and h[-1]["valid_to"] is None
+    )
+    old = [{**r, "employee_name": fn} for r in hist]
+    last = hist[-1]
+    hist[-1] = {**last, "valid_to": date(2026, 3, 4)}
+    hist.append({**last, "rate": last["rate"] + 700, "valid_from": date(2026, 3, 5)})
+    new = [{**r, "employee_name": fn} for r in hist]
+    first = pp.rate_change_start(old, new)
+    assert first == date(2026, 3, 5)
+    await store.mark_dirty_from(first)
+
+    iiko.calls.clear()
+    today = date(2026, 3, 11)
+    totals = await _run(today, history_index, employees)
+
+    assert totals.fetched_days == 7
+    assert iiko.calls[0] == ("attendance", "2026-03-05", "2026-03-11")
+    in_period = [r for r in attendance if r["dateFrom"][:10] <= today.isoformat()]
+    _assert_same_sections(
+        _sections(totals, history_index, employees, roles, motivation, today),
+        compute_fot_sections(
+            in_period, history_index, employees, roles, motivation, MONTH_START, today
+        ),
+    )
+
+
+def _rec(name, sal_type, rate, valid_from, valid_to=None):
+    return {
+        "employee_name": name,
+        "sal_type": sal_type,
+        "rate": rate,
+        "valid_from": valid_from,
+        "valid_to": valid_to,
+    }
+
+
+def test_rate_change_start_cases():
+    d = date
+    base = [
+        _rec("А", "посменная", 1500, d(2026, 1, 1), d(2026, 3, 9)),
+        _rec("А", "посменная", 1800, d(2026, 3, 10)),
+        _rec("Б", "почасовая", 250, d(2026, 2, 1)),
+    ]
+    assert pp.rate_change_start(base, [dict(r) for r in base]) is None
+    # Decimal из БД против float из листа — не правка
+    assert (
+        pp.rate_change_start(base, [{**r, "rate": float(r["rate"])} for r in base])
+        is None
+    )
+
+    changed = [dict(r) for r in base]
+    changed[2]["rate"] = 260
+    assert pp.rate_change_start(base, changed) == d(2026, 2, 1)
+
+    # Новая запись с 20-го: у прежней сдвинулся конец → дни с 20-го
+    added = base + [_rec("Б", "почасовая", 300, d(2026, 3, 20))]
+    added[2] = {**added[2], "valid_to": d(2026, 3, 19)}
+    assert pp.rate_change_start(base, added) == d(2026, 3, 20)
+
+    # Запись удалили из листа
+    assert pp.rate_change_start(base, base[:2]) == d(2026, 2, 1)
+
+
+def test_split_by_day_month_start_and_overlap():
+    recs = [
+        {"dateFrom": "2026-02-28T22:00:00"},  # ночная смена с прошлого месяца
+        {"dateFrom": "2026-03-01T09:00:00"},
+        {"dateFrom": "2026-03-04T09:00:00"},
+        {"dateFrom": "2026-03-06T09:00:00"},  # после диапазона
+        {"dateFrom": "вчера"},
+    ]
+    by_day = pp.split_by_day(recs, date(2026, 3, 1), date(2026, 3, 4), MONTH_START)
+    assert [len(by_day[MONTH_START + timedelta(days=i)]) for i in range(4)] == [
+        2,
+        0,
+        0,
+        2,
+    ]
+
+    by_day = pp.split_by_day(recs, date(2026, 3, 2), date(2026, 3, 4), MONTH_START)
+    assert [len(v) for v in by_day.values()] == [0, 0, 2]
+
+
+@pytest.mark.asyncio
+async def test_save_days_replaces_rows_in_batches():
+    rows = [
+        pp.PartialRow(f"emp-{i}", "dept-1", "Цех 1", "Цех 1", 1, 8.0, 1500.0)
+        for i in range(2500)
+    ]
+    session = MagicMock()
+    session.execute = AsyncMock()
+    session.commit = AsyncMock()
+    factory = MagicMock()
+    factory.return_value.__aenter__ = AsyncMock(return_value=session)
+    factory.return_value.__aexit__ = AsyncMock(return_value=False)
+
+    with patch.object(pp, "async_session_factory", factory):
+        await pp.save_days([pp.DayPartial(MONTH_START, rows, {"Цех 1": 1e5}, 0.0)])
+
+    stmts = [str(c.args[0]) for c in session.execute.await_args_list]
+    assert stmts[0].startswith("DELETE FROM payroll_day_partial")
+    assert "ON CONFLICT (day) DO UPDATE" in stmts[1]
+    assert len(stmts) == 2 + 2  # 2500 строк — две пачки по _INSERT_BATCH
+    session.commit.assert_awaited_once()
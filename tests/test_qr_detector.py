@@ -0,0 +1,99 @@
+"""
+Тесты: детекция QR (utils/qr_detector.py) на синтетическом корпусе.
+
+Корпус — чеки/документы numpy + JPEG-артефакты, QR от cv2.QRCodeEncoder:
+разные размеры фото и QR, положение, поворот, размытие + негативы без QR.
+Запуск: pytest tests/test_qr_detector.py -v
+"""
+
+import threading
+
+import cv2
+import numpy as np
+
+from utils.qr_detector import find_qr, get_detectors
+
+_PAYLOAD = "t=20260317T1200&s=1234.00&fn=9999078900001234&i=12345&fp=1234567890&n=1"
+
+
+def _paper(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """Ч/б лист с «текстом»: строки из слов случайной длины + шум."""
+    rng = np.random.default_rng(seed)
+    gray = np.full((height, width), 235, dtype=np.uint8)
+    for y in range(40, height - 40, 28):
+        x = 40
+        while x < width - 160:
+            word = int(rng.integers(20, 120))
+            gray[y : y + 9, x : x + word] = 30
+            x += word + int(rng.integers(10, 25))
+    noise = rng.normal(0, 6, gray.shape)
+    return np.clip(gray + noise, 0, 255).astype(np.uint8)
+
+
+def _receipt(
+    width: int,
+    height: int,
+    module: int,
+    where: str = "bottom",
+    angle: float = 0.0,
+    blur: int = 0,
+) -> np.ndarray:
+    """Ч/б «чек»: строки текста + QR (module — px на модуль QR)."""
+    gray = _paper(width, height)
+    code = cv2.QRCodeEncoder.create().encode(_PAYLOAD)
+    code = cv2.resize(
+        code, (code.shape[1] * module, code.shape[0] * module), cv2.INTER_NEAREST
+    )
+    side = code.shape[0]
+    y = {
+        "bottom": height - side - height // 20,
+        "middle": (height - side) // 2,
+        "top": height // 20,
+    }[where]
+    x = (width - side) // 2
+    gray[y : y + side, x : x + side] = code
+    if angle:
+        m = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+        gray = cv2.warpAffine(gray, m, (width, height), borderValue=235)
+    if blur:
+        gray = cv2.GaussianBlur(gray, (blur, blur), 0)
+    ok, jpeg = cv2.imencode(".jpg", gray, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    return cv2.imdecode(jpeg, cv2.IMREAD_GRAYSCALE)
+
+
+def _corpus() -> list[tuple[str, np.ndarray, bool]]:
+    return [
+        ("phone_12mp", _receipt(3000, 4000, 8), True),
+        ("phone_12mp_small_qr", _receipt(3000, 4000, 3), True),
+        ("narrow_receipt", _receipt(800, 2400, 4), True),
+        ("rotated_12deg", _receipt(1500, 2000, 6, angle=12), True),
+        ("blurred", _receipt(1500, 2000, 6, blur=5), True),
+        ("qr_middle", _receipt(1200, 1600, 6, where="middle"), True),
+        ("qr_top", _receipt(1200, 1600, 6, where="top"), True),
+        ("tiny_photo", _receipt(600, 800, 3), True),
+        ("doc_12mp", _paper(3000, 4000, seed=1), False),
+        ("doc_a4", _paper(1200, 1600, seed=2), False),
+        ("doc_narrow", _paper(800, 2400, seed=3), False),
+    ]
+
+
+def test_detectors_created_once_per_thread():
+    first = get_detectors()
+    assert get_detectors() is first
+
+    other: list = []
+    thread = threading.Thread(target=lambda: other.append(get_detectors()))
+    thread.start()
+    thread.join()
+    assert other[0] is not first
+
+
+def test_receipt_found_in_bottom_third_first():
+    assert find_qr(_receipt(3000, 4000, 8)).endswith("coarse_bottom")
+    assert find_qr(_receipt(1200, 1600, 6, where="top")) is not None
+
+
+def test_corpus_found_without_false_positives():
+    corpus = _corpus()
+    found = {name: find_qr(gray) is not None for name, gray, _ in corpus}
+    assert found == {name: has_qr for name, _, has_qr in corpus}
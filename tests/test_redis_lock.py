@@ -0,0 +1,287 @@
+"""
+Тесты: распределённые блокировки и выбор лидера (use_cases/redis_lock.py).
+
+Redis эмулируется fakeredis (с Lua — пакет lupa).
+Запуск: pytest tests/test_redis_lock.py -v
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+from use_cases import redis_lock  # noqa: E402
+from use_cases.redis_lock import (  # noqa: E402
+    DistributedLock,
+    LeaderElector,
+    LockLost,
+    check_fence,
+    run_once,
+)
+
+
+@pytest.fixture
+def fake_redis():
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    redis_lock._local_locks.clear()
+    with patch("use_cases.redis_lock.get_redis", AsyncMock(return_value=client)):
+        yield client
+
+
+def _other_replica():
+    """Пустой локальный слой — имитация захвата из другого процесса."""
+    return patch.object(redis_lock, "_local_locks", {})
+
+
+# ═══════════════════════════════════════════════════════
+# 1. DistributedLock
+# ═══════════════════════════════════════════════════════
+
+
+@pytest.mark.asyncio
+async def test_lock_is_exclusive_across_replicas(fake_redis):
+    first = DistributedLock("sync:test")
+    assert await first.acquire_nowait()
+
+    # та же реплика — отсекается локально
+    assert not await DistributedLock("sync:test").acquire_nowait()
+
+    # другая реплика — отсекается Redis-ключом
+    with _other_replica():
+        assert not await DistributedLock("sync:test").acquire_nowait()
+
+    await first.release()
+    assert await fake_redis.get("bot:lock:sync:test") is None
+
+
+@pytest.mark.asyncio
+async def test_fencing_token_grows_and_detects_stale_holder(fake_redis):
+    first = DistributedLock("sync:fence")
+    assert await first.acquire_nowait()
+    await first.release()
+
+    second = DistributedLock("sync:fence")
+    assert await second.acquire_nowait()
+    assert second.token > first.token
+    assert await check_fence("sync:fence", second.token)
+    assert not await check_fence("sync:fence", first.token)
+    await second.release()
+
+
+@pytest.mark.asyncio
+async def test_stale_holder_fails_ensure_held(fake_redis):
+    """Аренда истекла, lock взяла другая реплика — старый держатель не пишет."""
+    stale = DistributedLock("sync:stale")
+    assert await stale.acquire_nowait()
+    await stale.ensure_held()
+
+    await fake_redis.delete("bot:lock:sync:stale")  # истёк TTL (пауза GC и т.п.)
+    with _other_replica():
+        fresh = DistributedLock("sync:stale")
+        assert await fresh.acquire_nowait()
+        await fresh.ensure_held()
+        await fresh.release()
+
+    with pytest.raises(LockLost):
+        await stale.ensure_held()
+    await stale.release()
+
+
+@pytest.mark.asyncio
+async def test_renew_loop_marks_lost_lease(fake_redis):
+    lock = DistributedLock("sync:renew", ttl=0.06)
+    assert await lock.acquire_nowait()
+    await fake_redis.set("bot:lock:sync:renew", "someone-else")
+
+    await asyncio.wait_for(lock._renew_task, 1)
+    with pytest.raises(LockLost):
+        await lock.ensure_held()
+    await lock.release()
+
+
+@pytest.mark.asyncio
+async def test_release_does_not_delete_foreign_lease(fake_redis):
+    """Аренда истекла и перехвачена — release старого владельца её не трогает."""
+    lock = DistributedLock("sync:expired")
+    assert await lock.acquire_nowait()
+    await fake_redis.set("bot:lock:sync:expired", "someone-else")
+
+    await lock.release()
+    assert await fake_redis.get("bot:lock:sync:expired") == "someone-else"
+
+
+@pytest.mark.asyncio
+async def test_fence_fails_closed_when_redis_drops(fake_redis):
+    lock = DistributedLock("sync:blip")
+    assert await lock.acquire_nowait()
+    with patch(
+        "use_cases.redis_lock.get_redis", AsyncMock(side_effect=ConnectionError)
+    ):
+        assert not await check_fence("sync:blip", lock.token)
+        with pytest.raises(LockLost):
+            await lock.ensure_held()
+    await lock.release()
+
+
+@pytest.mark.asyncio
+async def test_lock_degrades_to_local_without_redis():
+    redis_lock._local_locks.clear()
+    with patch(
+        "use_cases.redis_lock.get_redis", AsyncMock(side_effect=ConnectionError)
+    ):
+        lock = DistributedLock("sync:offline")
+        assert await lock.acquire_nowait()
+        assert lock.token == 0
+        assert not await DistributedLock("sync:offline").acquire_nowait()
+        await lock.release()
+        again = DistributedLock("sync:offline")
+        assert await again.acquire_nowait()
+        await again.release()
+
+
+# ═══════════════════════════════════════════════════════
+# 2. LeaderElector
+# ═══════════════════════════════════════════════════════
+
+
+@pytest.mark.asyncio
+async def test_single_leader_and_failover(fake_redis):
+    a = LeaderElector(key="bot:leader:test", lease=3)
+    b = LeaderElector(key="bot:leader:test", lease=3)
+    b._owner = "replica-b"
+
+    await a._tick()
+    await b._tick()
+    assert a.is_leader and not b.is_leader
+
+    # лидер корректно завершился → следующий heartbeat другой реплики
+    await a.stop()
+    await b._tick()
+    assert b.is_leader
+    assert b.epoch > a.epoch
+
+
+@pytest.mark.asyncio
+async def test_leader_loses_lease_when_key_taken(fake_redis):
+    a = LeaderElector(key="bot:leader:test2", lease=3)
+    await a._tick()
+    assert a.is_leader
+
+    # аренда истекла и досталась другой реплике
+    await fake_redis.set("bot:leader:test2", "replica-b")
+    await a._tick()
+    assert not a.is_leader
+    assert not await a.wait_leader(0.01)
+
+
+@pytest.mark.asyncio
+async def test_jobs_run_locally_when_redis_was_never_up():
+    """Redis не видели ни разу (одна реплика без Redis) → задача не пропускается."""
+    from use_cases import scheduler
+
+    job = AsyncMock()
+    job.__name__ = "job"
+    elector = LeaderElector(key="bot:leader:offline", lease=0.06)
+    with (
+        patch("use_cases.redis_lock.get_redis", AsyncMock(side_effect=ConnectionError)),
+        patch.object(scheduler, "_elector", elector),
+    ):
+        elector.start()
+        try:
+            await scheduler._leader_only("offline_job", job)()
+            assert elector.degraded and not elector.is_leader
+        finally:
+            await elector.stop()
+    job.assert_awaited_once()
+
+
+def _jobs(scheduler, idempotent: bool):
+    job = AsyncMock()
+    job.__name__ = "job"
+    return job, scheduler._leader_only("split_job", job, idempotent=idempotent)
+
+
+@pytest.mark.asyncio
+async def test_only_last_leader_runs_jobs_when_redis_goes_down(fake_redis):
+    """Redis пропал у всех: идемпотентную задачу выполняет один бывший лидер,
+    неидемпотентную — никто."""
+    from use_cases import scheduler
+
+    up = [True]
+
+    async def _get_redis():
+        if up[0]:
+            return fake_redis
+        raise ConnectionError
+
+    a = LeaderElector(key="bot:leader:split", lease=0.15)
+    b = LeaderElector(key="bot:leader:split", lease=0.15)
+    b._owner = "replica-b"
+    with patch("use_cases.redis_lock.get_redis", AsyncMock(side_effect=_get_redis)):
+        a.start()
+        await asyncio.sleep(0.02)
+        b.start()
+        try:
+            await asyncio.sleep(0.06)
+            assert a.is_leader and not b.is_leader
+            up[0] = False
+            await asyncio.sleep(0.12)
+            assert a.degraded and b.degraded
+            assert a.degraded_epoch == a.epoch and b.degraded_epoch is None
+            assert await a.wait_leader(0.01) and not await b.wait_leader(0.01)
+
+            safe, transfer = _jobs(scheduler, True), _jobs(scheduler, False)
+            for elector in (a, b):
+                with patch.object(scheduler, "_elector", elector):
+                    await safe[1]()
+                    await transfer[1]()
+        finally:
+            await a.stop()
+            await b.stop()
+    safe[0].assert_awaited_once()
+    transfer[0].assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_elector_leaves_degraded_mode_when_redis_returns(fake_redis):
+    await fake_redis.set("bot:leader:back", "replica-b")  # лидер — другая реплика
+    elector = LeaderElector(key="bot:leader:back", lease=0.06)
+    outage = AsyncMock(side_effect=[ConnectionError()] + [fake_redis] * 100)
+    with patch("use_cases.redis_lock.get_redis", outage):
+        elector.start()
+        try:
+            assert await elector.wait_leader(0.01)  # первый heartbeat упал
+            await asyncio.sleep(0.05)
+            assert not elector.degraded
+            assert not await elector.wait_leader(0.01)
+        finally:
+            await elector.stop()
+
+
+# ═══════════════════════════════════════════════════════
+# 3. run_once
+# ═══════════════════════════════════════════════════════
+
+
+@pytest.mark.asyncio
+async def test_run_once_dedupes_fire(fake_redis):
+    job = AsyncMock()
+    assert await run_once("daily", "2026-03-17T07:00", job)
+    assert not await run_once("daily", "2026-03-17T07:00", job)
+    assert await run_once("daily", "2026-03-18T07:00", job)
+    assert job.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_run_once_skips_non_idempotent_job_without_redis():
+    job = AsyncMock()
+    with patch(
+        "use_cases.redis_lock.get_redis", AsyncMock(side_effect=ConnectionError)
+    ):
+        assert not await run_once("transfer", "2026-03-17T23:00", job, idempotent=False)
+        assert await run_once("cleanup", "2026-03-17T03:00", job)
+    job.assert_awaited_once()
@@ -0,0 +1,318 @@
+"""
+Тесты: дифф-запись листов Google Sheets (adapters/sheet_diff.py) и её
+использование писателями adapters/google_sheets.py.
+
+Google API не нужен: лист — список строк в памяти, spreadsheets.batchUpdate
+применяет insert/delete/appendDimension, считаются вызовы API.
+Запуск: pytest tests/test_sheet_diff.py -v
+"""
+
+import random
+from unittest.mock import patch
+
+import pytest
+
+from adapters import google_sheets as gsheet
+from adapters import sheet_diff
+from adapters.sheet_diff import _norm
+
+N_PRODUCTS = 3000
+N_DEPTS = 20
+
+
+class _FakeSpreadsheet:
+    """Таблица в памяти: структура листа + developer metadata."""
+
+    id = "spreadsheet-1"
+
+    def __init__(self):
+        self.ws: "_FakeWorksheet | None" = None
+        self.metadata: dict[int, dict] = {}  # metadataId → {key, value}
+        self.next_id = 100
+        self.calls: list[tuple[str, object]] = []
+
+    def fetch_sheet_metadata(self, params=None):
+        self.calls.append(("fetch_sheet_metadata", params))
+        items = [
+            {"metadataId": mid, "metadataKey": m["key"], "metadataValue": m["value"]}
+            for mid, m in self.metadata.items()
+        ]
+        return {
+            "sheets": [
+                {"properties": {"sheetId": self.ws.id}, "developerMetadata": items}
+            ]
+        }
+
+    def batch_update(self, body):
+        self.calls.append(("batch_update", body["requests"]))
+        grid = self.ws.grid
+        replies = []
+        for req in body["requests"]:
+            reply: dict = {}
+            if "insertDimension" in req:
+                rng = req["insertDimension"]["range"]
+                for _ in range(rng["endIndex"] - rng["startIndex"]):
+                    grid.insert(rng["startIndex"], [])
+                self.ws.row_count += rng["endIndex"] - rng["startIndex"]
+            elif "deleteDimension" in req:
+                rng = req["deleteDimension"]["range"]
+                del grid[rng["startIndex"] : rng["endIndex"]]
+                self.ws.row_count -= rng["endIndex"] - rng["startIndex"]
+            elif "appendDimension" in req:
+                if req["appendDimension"]["dimension"] == "ROWS":
+                    self.ws.row_count += req["appendDimension"]["length"]
+                else:
+                    self.ws.col_count += req["appendDimension"]["length"]
+            elif "deleteDeveloperMetadata" in req:
+                lookup = req["deleteDeveloperMetadata"]["dataFilter"]
+                del self.metadata[lookup["developerMetadataLookup"]["metadataId"]]
+            elif "createDeveloperMetadata" in req:
+                meta = req["createDeveloperMetadata"]["developerMetadata"]
+                self.next_id += 1
+                self.metadata[self.next_id] = {
+                    "key": meta["metadataKey"],
+                    "value": meta["metadataValue"],
+                }
+                reply = {
+                    "createDeveloperMetadata": {
+                        "developerMetadata": {"metadataId": self.next_id}
+                    }
+                }
+            replies.append(reply)
+        return {"replies": replies}
+
+
+class _FakeWorksheet:
+    """Лист в памяти с API gspread, которым пользуется дифф-запись."""
+
+    id = 7
+
+    def __init__(self, grid: list[list[str]], row_count: int = 0, col_count: int = 26):
+        self.grid = [list(r) for r in grid]
+        self.row_count = max(row_count, len(grid))
+        self.col_count = col_count
+        self.spreadsheet = _FakeSpreadsheet()
+        self.spreadsheet.ws = self
+        self.calls: list[tuple[str, object]] = []
+
+    def get_all_values(self, value_render_option=None):
+        self.calls.append(("get_all_values", value_render_option))
+        rows = [[_norm(v) for v in r] for r in self.grid]
+        while rows and not any(rows[-1]):
+            rows.pop()
+        width = max((len(r) for r in rows), default=0)
+        return [r + [""] * (width - len(r)) for r in rows]
+
+    def batch_update(self, data, value_input_option=None):
+        self.calls.append(("batch_update", data))
+        for item in data:
+            start, _ = item["range"].split(":")
+            row, col = gsheet.gspread.utils.a1_to_rowcol(start)
+            assert row - 1 + len(item["values"]) <= self.row_count
+            for r, values in enumerate(item["values"], row - 1):
+                while len(self.grid) <= r:
+                    self.grid.append([])
+                line = self.grid[r]
+                line.extend([""] * (col - 1 + len(values) - len(line)))
+                line[col - 1 : col - 1 + len(values)] = values
+
+    def api_calls(self) -> list[str]:
+        own = [name for name, _ in self.calls if name != "get_all_values"]
+        return [name for name, _ in self.spreadsheet.calls] + own
+
+
+def _trimmed(grid) -> list[list[str]]:
+    rows = [[_norm(v) for v in r] for r in grid]
+    rows = [r[: max((i + 1 for i, v in enumerate(r) if v), default=0)] for r in rows]
+    while rows and not rows[-1]:
+        rows.pop()
+    return rows
+
+
+def _apply(ws, desired, **kwargs):
+    return sheet_diff.apply_grid(ws, ws.get_all_values(), desired, **kwargs)
+
+
+@pytest.fixture(autouse=True)
+def _reset_layout_cache():
+    sheet_diff._layout_cache.clear()
+    yield
+    sheet_diff._layout_cache.clear()
+
+
+def _key(row):
+    return row[0] if row else ""
+
+
+def test_insert_in_middle_is_one_row_not_a_rewrite():
+    current = [["h1", "h2"]] + [[f"p{i}", str(i)] for i in range(100)]
+    desired = current[:50] + [["new", "x"]] + current[50:]
+
+    diff = sheet_diff.diff_grid(
+        current, desired, sheet_id=7, key=_key, header_rows=1, row_count=200
+    )
+
+    assert diff.structure == [
+        {
+            "insertDimension": {
+                "range": {
+                    "sheetId": 7,
+                    "dimension": "ROWS",
+                    "startIndex": 50,
+                    "endIndex": 51,
+                },
+                "inheritFromBefore": True,
+            }
+        }
+    ]
+    assert diff.values == [{"range": "A51:B51", "values": [["new", "x"]]}]
+    assert diff.cells == 2
+
+    # Без ключа — позиционная перезапись всего, что ниже вставки
+    positional = sheet_diff.diff_grid(current, desired, sheet_id=7, header_rows=1)
+    assert positional.structure == [] and positional.cells > 100
+
+
+def test_changed_cells_merge_into_rectangles():
+    current = [[str(r * 10 + c) for c in range(10)] for r in range(20)]
+    desired = [list(r) for r in current]
+    for r in range(5, 9):  # блок 4×3
+        for c in range(2, 5):
+            desired[r][c] = "x"
+    desired[15][0] = desired[15][3] = "y"  # разрыв 2 → одним диапазоном
+    desired[17] = desired[17][:4]  # укоротилась → хвост очищается
+
+    diff = sheet_diff.diff_grid(current, desired, sheet_id=7)
+
+    assert [v["range"] for v in diff.values] == ["C6:E9", "A16:D16", "E18:J18"]
+    assert diff.values[1]["values"] == [["y", "151", "152", "y"]]
+    assert diff.values[2]["values"] == [[""] * 6]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_edits_converge_to_desired(seed):
+    rnd = random.Random(seed)
+    header = [["", "id", "a", "b"], ["Имя", "ID", "A", "B"]]
+    rows = [[f"n{i}", f"id{i}", str(i), ""] for i in range(60)]
+    ws = _FakeWorksheet(header + rows, row_count=70)
+
+    for _ in range(3):
+        rows = [list(r) for r in rows if rnd.random() > 0.1]
+        for _ in range(rnd.randint(0, 8)):
+            i = rnd.randint(0, 10_000)
+            rows.insert(rnd.randint(0, len(rows)), [f"n{i}", f"id{i}", str(i), "1"])
+        for r in rnd.sample(rows, min(5, len(rows))):
+            r[2] = str(rnd.randint(0, 9))
+        header[1][3] = rnd.choice(["B", "Б"])
+        desired = header + rows
+
+        _apply(ws, desired, name="t", key=lambda r: r[1], header_rows=2)
+
+        assert _trimmed(ws.grid) == _trimmed(desired)
+
+
+@pytest.mark.parametrize("grow", [True, False])
+def test_section_in_middle_keeps_neighbours(grow):
+    above = [["## Другая секция", "1"], ["x", "2"]]
+    section = [["## Заведение", ""], ["label", "", "A"], ["", ""]]
+    below = [["## Следующая", "3"], ["y", "4"]]
+    ws = _FakeWorksheet(above + section + below, row_count=10)
+    new_section = (
+        section[:2] + [["", "", "", "", f"s{i}", "id"] for i in range(3)] + [["", ""]]
+        if grow
+        else section[:2]
+    )
+
+    sheet_diff.apply_grid(
+        ws,
+        section,
+        new_section,
+        name="section",
+        row_offset=len(above),
+        tail=False,
+    )
+
+    assert _trimmed(ws.grid) == _trimmed(above + new_section + below)
+
+
+def test_formulas_are_rewritten_after_structural_change():
+    current = [["a", "1", "=B1*2"], ["b", "2", "=B2*2"]]
+    same = sheet_diff.diff_grid(current, current, sheet_id=7, key=_key)
+    assert same.values == []
+
+    desired = [["new", "0", "=B1*2"], ["a", "1", "=B2*2"], ["b", "2", "=B3*2"]]
+    diff = sheet_diff.diff_grid(current, desired, sheet_id=7, key=_key)
+    assert diff.rows_inserted == 1
+    # Текст формулы в «a» совпал бы с исходным «=B1*2», но Sheets её сдвинул
+    assert {v["range"] for v in diff.values} == {"A1:C1", "C2:C3"}
+
+
+def test_layout_hash_skips_formatting_when_unchanged():
+    ws = _FakeWorksheet([["h"], ["a"]], row_count=10)
+    fmt = [sheet_diff.repeat_cell(ws.id, "A1:B1", {"textFormat": {"bold": True}})]
+
+    first = _apply(ws, [["h"], ["a"], ["b"]], name="t", format_requests=fmt)
+    assert first["formatted"] == 1
+
+    # Новый процесс: хеш читается из developer metadata, формат не шлётся
+    sheet_diff._layout_cache.clear()
+    ws.calls.clear()
+    ws.spreadsheet.calls.clear()
+    second = _apply(ws, [["h"], ["a"], ["c"]], name="t", format_requests=fmt)
+    assert second["formatted"] == 0
+    assert ws.api_calls() == ["fetch_sheet_metadata", "batch_update"]
+
+    # Раскладка изменилась → формат + замена метаданных одной batchUpdate
+    ws.spreadsheet.calls.clear()
+    fmt2 = [sheet_diff.repeat_cell(ws.id, "A1:C1", {"textFormat": {"bold": True}})]
+    assert _apply(ws, [["h"], ["a"], ["c"]], name="t", format_requests=fmt2)[
+        "formatted"
+    ]
+    ((name, requests),) = ws.spreadsheet.calls
+    assert [next(iter(r)) for r in requests] == [
+        "repeatCell",
+        "deleteDeveloperMetadata",
+        "createDeveloperMetadata",
+    ]
+    assert len(ws.spreadsheet.metadata) == 1
+
+
+def _min_stock_grid(products: list[str]) -> list[list[str]]:
+    meta, names, subs = ["", ""], ["Товар", "ID товара"], ["", ""]
+    for d in range(N_DEPTS):
+        meta += [f"dept-{d}", ""]
+        names += [f"Ресторан {d}", ""]
+        subs += ["МИН", "МАКС"]
+    rows = [meta, names, subs]
+    for p in products:
+        rows.append([f"Товар {p}", f"prod-{p}"] + [""] * (N_DEPTS * 2))
+    return rows
+
+
+@pytest.mark.asyncio
+async def test_sync_products_new_product_is_one_insert_and_one_range():
+    products = [f"{p:04d}" for p in range(0, N_PRODUCTS, 2)]
+    grid = _min_stock_grid(products)
+    grid[10][4] = "5"  # min/max вписаны руками — должны сохраниться
+    grid[500][5] = "7"
+    ws = _FakeWorksheet(grid, row_count=len(grid) + 10, col_count=2 + N_DEPTS * 2)
+    depts = [{"id": f"dept-{d}", "name": f"Ресторан {d}"} for d in range(N_DEPTS)]
+    catalog = [{"id": f"prod-{p}", "name": f"Товар {p}"} for p in products]
+    catalog.insert(700, {"id": "prod-new", "name": "Товар new"})
+
+    with patch.object(gsheet, "_get_worksheet", return_value=ws):
+        await gsheet.sync_products_to_sheet(catalog, depts)  # первый раз — формат
+        ws.calls.clear()
+        ws.spreadsheet.calls.clear()
+        catalog.insert(100, {"id": "prod-new2", "name": "Товар new2"})
+        count = await gsheet.sync_products_to_sheet(catalog, depts)
+    gsheet._minmax_index = None
+
+    assert count == len(catalog)
+    assert ws.api_calls() == ["batch_update", "batch_update"]  # структура + значения
+    ((_, structure),) = ws.spreadsheet.calls
+    assert [next(iter(r)) for r in structure] == ["insertDimension"]
+    ((_, values),) = [c for c in ws.calls if c[0] == "batch_update"]
+    assert values == [{"range": "A104:B104", "values": [["Товар new2", "prod-new2"]]}]
+    assert ws.grid[10][4] == "5"  # строка выше вставки не сдвинулась
+    assert ws.grid[501][1] == "prod-0994" and ws.grid[501][5] == "7"  # ниже — съехала
@@ -0,0 +1,248 @@
+"""
+Тесты: снимок таблицы для read_*-функций (adapters/google_sheets.py) —
+все вкладки одним values:batchGet, сверка modifiedTime, сброс при записи
+и явном обновлении, создание отсутствующей вкладки.
+
+Google API не нужен: клиент gspread подменяется, считаются вызовы.
+Запуск: pytest tests/test_sheet_snapshot.py -v
+"""
+
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import gspread
+import pytest
+
+from adapters import google_sheets as gsheet
+
+MIN_ID = "min-stock-sheet"
+SALARY_ID = "salary-sheet"
+
+_FT_ROWS = [
+    ["шапка"],
+    ["шапка"],
+    ["шапка"],
+    [
+        "Иванов (550e8400-e29b-41d4-a716-446655440000)",
+        "Иванов Иван (160005)",
+        "",
+        "Кухня",
+        "Производство",
+        "Аренда (550e8400-e29b-41d4-a716-446655440001)",
+        "Аренда помещений (777)",
+    ],
+]
+
+
+class _FakeHttp:
+    def __init__(self, tabs: dict[str, dict[str, list[list[str]]]]):
+        self.tabs = tabs
+        self.calls: list[str] = []
+
+    def values_batch_get(self, spreadsheet_id, ranges, params=None):
+        self.calls.append("batchGet")
+        titles = [r.strip("'") for r in ranges]
+        book = self.tabs[spreadsheet_id]
+        if any(t not in book for t in titles):
+            raise gspread.exceptions.APIError(
+                SimpleNamespace(
+                    json=lambda: {"error": {"code": 400, "message": "range"}},
+                    text="",
+                    status_code=400,
+                )
+            )
+        return {"valueRanges": [{"values": book[t]} for t in titles]}
+
+    def fetch_sheet_metadata(self, spreadsheet_id, params=None):
+        self.calls.append("metadata")
+        book = self.tabs[spreadsheet_id]
+        return {"sheets": [{"properties": {"title": t}} for t in book]}
+
+
+class _FakeWorksheet:
+    def __init__(self, http: _FakeHttp, rows: list[list[str]]):
+        self.http = http
+        self.rows = rows
+
+    def get_all_values(self):
+        self.http.calls.append("values")
+        return self.rows
+
+
+class _FakeSpreadsheet:
+    def __init__(self, http: _FakeHttp, spreadsheet_id: str):
+        self.http = http
+        self.id = spreadsheet_id
+
+    def worksheet(self, title):
+        book = self.http.tabs[self.id]
+        if title not in book:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return _FakeWorksheet(self.http, book[title])
+
+    def add_worksheet(self, title, rows, cols):
+        self.http.calls.append("addSheet")
+        self.http.tabs[self.id][title] = []
+        # Как _request_with_retry на POST batchUpdate
+        gsheet._invalidate_snapshot(
+            f"https://sheets.googleapis.com/v4/spreadsheets/{self.id}:batchUpdate"
+        )
+        return _FakeWorksheet(self.http, self.http.tabs[self.id][title])
+
+
+class _FakeClient:
+    def __init__(self, tabs):
+        self.http_client = _FakeHttp(tabs)
+        self.modified = {MIN_ID: "t1", SALARY_ID: "t1"}
+
+    def open_by_key(self, spreadsheet_id):
+        return _FakeSpreadsheet(self.http_client, spreadsheet_id)
+
+    def get_file_drive_metadata(self, spreadsheet_id):
+        self.http_client.calls.append("drive")
+        return {"modifiedTime": self.modified[spreadsheet_id]}
+
+
+@pytest.fixture
+def client():
+    fake = _FakeClient(
+        {
+            MIN_ID: {
+                gsheet.PERMS_TAB: [
+                    ["", "telegram_id", "📝 Списания"],
+                    ["Сотрудник", "Telegram ID", "📝 Списания"],
+                    ["Иванов", "123", "TRUE"],
+                ],
+                gsheet.SETTINGS_TAB: [
+                    ["## Заведение для заявок"],
+                    ["Заведение куда приходят заявки", "", "Кафе", "dept-1"],
+                    ["## Организации iikoCloud"],
+                    ["Подразделение"],
+                    ["Кафе", "dept-1", "Org", "org-1"],
+                ],
+                # «Маппинг» нет — batchGet падает целиком, берутся остальные
+            },
+            SALARY_ID: {
+                gsheet._SALARY_TAB: [
+                    ["Сотрудник"],
+                    ["Иванов Иван", "посменная", "1500", "5", "от выручки"],
+                ],
+                gsheet._FINTAB_MAPPING_TAB: _FT_ROWS,
+            },
+        }
+    )
+    gsheet._snapshots.clear()
+    with (
+        patch.object(gsheet, "_get_client", return_value=fake),
+        patch.object(gsheet, "MIN_STOCK_SHEET_ID", MIN_ID),
+        patch.object(gsheet, "SALARY_SHEET_ID", SALARY_ID),
+    ):
+        yield fake
+    gsheet._snapshots.clear()
+
+
+@pytest.mark.asyncio
+async def test_fot_flow_reads_all_tabs_once(client):
+    settings = await gsheet.read_salary_settings()
+    employees = await gsheet.read_fintab_employee_mapping()
+    directions = await gsheet.read_fintab_dept_direction_mapping()
+    opiu = await gsheet.read_fintab_opiu_mapping()
+    all_maps = await gsheet.read_fintab_all_mappings()
+
+    assert settings["Иванов Иван"]["rate"] == 1500.0
+    assert employees[0]["fintab_id"] == 160005
+    assert directions == [{"dept_name": "Кухня", "ft_direction_name": "Производство"}]
+    assert (
+        opiu[0]["iiko_account_name"]
+        == "Аренда"
+        == all_maps["opiu"][0]["iiko_account_name"]
+    )
+    assert client.http_client.calls == ["drive", "batchGet"]
+
+
+@pytest.mark.asyncio
+async def test_missing_tab_is_created_and_others_come_from_snapshot(client):
+    perms = await gsheet.read_permissions_sheet()
+    stores = await gsheet.read_request_stores()
+    orgs = await gsheet.read_cloud_org_mapping()
+
+    assert perms == [{"telegram_id": 123, "perms": {"📝 Списания": True}}]
+    assert stores == [{"id": "dept-1", "name": "Кафе"}]
+    assert orgs == {"dept-1": "org-1"}
+    assert client.http_client.calls == ["drive", "batchGet", "metadata", "batchGet"]
+
+    # «Маппинг» нет — создаётся, как раньше делал _get_mapping_worksheet
+    assert gsheet.read_base_mapping_sheet() == []
+    assert gsheet._MAPPING_BASE_TAB in client.http_client.tabs[MIN_ID]
+    assert client.http_client.calls[4:] == ["addSheet", "values"]
+    assert MIN_ID not in gsheet._snapshots  # создание вкладки — запись
+
+
+@pytest.mark.asyncio
+async def test_missing_salary_tab_is_created(client):
+    del client.http_client.tabs[SALARY_ID][gsheet._SALARY_TAB]
+
+    assert await gsheet.read_salary_settings() == {}
+    assert gsheet._SALARY_TAB in client.http_client.tabs[SALARY_ID]
+
+
+@pytest.mark.asyncio
+async def test_expired_snapshot_revalidates_by_modified_time(client):
+    await gsheet.read_salary_settings()
+    with patch.object(gsheet, "_SNAPSHOT_TTL", 0):
+        client.http_client.calls.clear()
+        await gsheet.read_salary_settings()
+        assert client.http_client.calls == ["drive"]  # не менялась — без batchGet
+
+        client.modified[SALARY_ID] = "t2"
+        client.http_client.tabs[SALARY_ID][gsheet._SALARY_TAB][1][2] = "1800"
+        settings = await gsheet.read_salary_settings()
+    assert client.http_client.calls == ["drive", "drive", "batchGet"]
+    assert settings["Иванов Иван"]["rate"] == 1800.0
+
+
+@pytest.mark.asyncio
+async def test_write_to_spreadsheet_drops_its_snapshot(client):
+    await gsheet.read_salary_settings()
+    await gsheet.read_request_stores()
+
+    gsheet._invalidate_snapshot(
+        f"https://sheets.googleapis.com/v4/spreadsheets/{SALARY_ID}/values:batchUpdate"
+    )
+
+    assert SALARY_ID not in gsheet._snapshots and MIN_ID in gsheet._snapshots
+
+
+@pytest.mark.asyncio
+async def test_refresh_rereads_tab_within_ttl(client):
+    """Кнопка «🔄 Обновить» сразу после правки прав админом в GSheet."""
+    assert await gsheet.read_permissions_sheet() == [
+        {"telegram_id": 123, "perms": {"📝 Списания": True}}
+    ]
+    # Правка руками; Drive modifiedTime ещё старый
+    client.http_client.tabs[MIN_ID][gsheet.PERMS_TAB][2][2] = ""
+    await gsheet.read_salary_settings()
+
+    gsheet.refresh_snapshot(gsheet.PERMS_TAB)
+
+    assert MIN_ID not in gsheet._snapshots and SALARY_ID in gsheet._snapshots
+    assert await gsheet.read_permissions_sheet() == [
+        {"telegram_id": 123, "perms": {"📝 Списания": False}}
+    ]
+
+
+@pytest.mark.asyncio
+async def test_update_opiu_readers_share_two_api_calls(client):
+    """update_opiu / update_fot_sheet: серия read_* по одной таблице."""
+    readers = [
+        gsheet.read_fintab_all_mappings,
+        gsheet.read_fintab_employee_mapping,
+        gsheet.read_fintab_dept_direction_mapping,
+        gsheet.read_salary_settings,
+        gsheet.read_fintab_opiu_mapping,
+    ]
+    for read in readers:
+        await read()
+    # Было на каждый read_*: open_by_key + worksheet() + get_all_values (3 × 5);
+    # стало: drive modifiedTime + один values:batchGet
+    assert len(client.http_client.calls) == 2
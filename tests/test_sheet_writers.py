@@ -0,0 +1,243 @@
+"""
+Тесты: писатели adapters/google_sheets.py сходятся к желаемой сетке на
+фейковом Google Sheets (tests/fakes/sheets.py) — лист уже заполнен прошлой
+синхронизацией и сдвинут (новые/удалённые строки, вставки руками), после
+записи вкладка равна сетке, которую писатель передал в sheet_diff.apply_grid.
+
+Фейк сдвигает ссылки формул при вставке/удалении строк, как Sheets, —
+непереписанная формула после структурной правки видна как расхождение.
+Запуск: pytest tests/test_sheet_writers.py -v
+"""
+
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+
+from adapters import google_sheets as gsheet
+from adapters import sheet_diff
+from config import INVOICE_PRICE_SHEET_ID, MIN_STOCK_SHEET_ID, SALARY_SHEET_ID
+from tests.fakes import FakeSheets
+from tests.test_sheet_diff import _trimmed
+
+FOT_TAB = "ФОТ 03.2026"
+
+
+@pytest.fixture
+async def sheets():
+    sheet_diff._layout_cache.clear()
+    async with FakeSheets() as fake:
+        with (
+            patch.object(gsheet, "GOOGLE_SHEETS_API_URL", fake.url),
+            patch.object(gsheet, "_client", None),
+            patch.dict(gsheet._snapshots, clear=True),
+        ):
+            yield fake
+    sheet_diff._layout_cache.clear()
+
+
+@pytest.fixture
+def written(monkeypatch) -> list[tuple[list[list[Any]], int]]:
+    """(desired, row_offset) каждого вызова sheet_diff.apply_grid."""
+    calls: list[tuple[list[list[Any]], int]] = []
+    apply_grid = sheet_diff.apply_grid
+
+    def _spy(ws, current, desired, **kwargs):
+        calls.append(([list(r) for r in desired], kwargs.get("row_offset", 0)))
+        return apply_grid(ws, current, desired, **kwargs)
+
+    monkeypatch.setattr(sheet_diff, "apply_grid", _spy)
+    return calls
+
+
+def _grid(fake: FakeSheets, spreadsheet_id: str, tab: str) -> list[list[str]]:
+    return _trimmed(fake.values(spreadsheet_id, tab))
+
+
+def _insert_rows(fake: FakeSheets, spreadsheet_id: str, tab: str, at: int, n: int):
+    """Пользователь вставил n пустых строк перед строкой at (0-based)."""
+    sheet = fake.spreadsheet(spreadsheet_id).find(tab)
+    rng = {"dimension": "ROWS", "startIndex": at, "endIndex": at + n}
+    sheet.dimension("insertDimension", {"range": rng})
+
+
+def _set(fake: FakeSheets, spreadsheet_id: str, tab: str, row: int, col: int, value):
+    fake.spreadsheet(spreadsheet_id).find(tab).write(row, col, [[value]])
+
+
+def _row_of(grid: list[list[Any]], col: int, value: str) -> int:
+    return next(i for i, r in enumerate(grid) if len(r) > col and r[col] == value)
+
+
+# ═══════════════════════════════════════════════════════
+# ФОТ: секции, формулы, ручные F-J
+# ═══════════════════════════════════════════════════════
+
+
+def _emp(name: str, rate: float, bonus: float = 0) -> dict:
+    return {
+        "name": name,
+        "role": "Повар",
+        "rate_total": rate,
+        "bonus": bonus,
+        "iiko_id": f"id-{name}",
+    }
+
+
+async def _sync_fot(sections: dict[str, list[dict]], revenue: dict[str, float]):
+    return await gsheet.sync_fot_sheet(
+        [{"dept_name": n, "employees": e} for n, e in sections.items()],
+        [_emp("Директор", 90000)],
+        FOT_TAB,
+        "Март 2026",
+        dept_revenue=revenue,
+    )
+
+
+async def test_fot_converges_from_shifted_sheet(sheets, written):
+    kitchen = [_emp("Анна", 30000, 1500), _emp("Борис", 28000), _emp("Вера", 25000)]
+    bar = [_emp("Глеб", 27000), _emp("Дина", 26000, 800)]
+    await _sync_fot({"Кухня": kitchen, "Бар": bar}, {"Кухня": 900000})
+    first, _ = written[-1]
+    assert _grid(sheets, SALARY_SHEET_ID, FOT_TAB) == _trimmed(first)
+
+    # Руками: премия Глебу, аванс Дине, две пустые строки внутри «Бара»
+    _set(sheets, SALARY_SHEET_ID, FOT_TAB, _row_of(first, 0, "Глеб"), 5, 3000)
+    _set(sheets, SALARY_SHEET_ID, FOT_TAB, _row_of(first, 0, "Дина"), 7, 5000)
+    _insert_rows(sheets, SALARY_SHEET_ID, FOT_TAB, _row_of(first, 0, "Дина"), 2)
+
+    # Борис уволен, Алла — в конец «Кухни»: текст SUM итогов тот же, но Sheets
+    # при вставке на границе диапазон не расширил — формулу нужно переписать
+    kitchen = [kitchen[0], kitchen[2], _emp("Алла", 24000)]
+    count = await _sync_fot({"Кухня": kitchen, "Бар": bar}, {"Кухня": 950000})
+    desired, _ = written[-1]
+
+    assert count == 6
+    assert _grid(sheets, SALARY_SHEET_ID, FOT_TAB) == _trimmed(desired)
+    gleb, dina = _row_of(desired, 0, "Глеб"), _row_of(desired, 0, "Дина")
+    assert desired[gleb][5] == 3000 and desired[dina][7] == 5000
+    assert desired[dina][2] == f"=D{dina + 1}+E{dina + 1}+F{dina + 1}-G{dina + 1}"
+    assert desired[dina + 1][2] == f"=SUM(C{gleb + 1}:C{dina + 1})"
+
+
+# ═══════════════════════════════════════════════════════
+# Секция «Заведение для заявок» посреди листа «Настройки»
+# ═══════════════════════════════════════════════════════
+
+_ABOVE = [["## Права бота", "", ""], ["Администратор", "", "123"], ["", "", ""]]
+_BELOW = [["## iikoCloud", "", ""], ["Организация", "", "org-1"]]
+
+
+def _stores(*names: str) -> list[dict[str, str]]:
+    return [{"id": f"uuid-{n}", "name": n} for n in names]
+
+
+@pytest.mark.parametrize(
+    "after",
+    [("Ресторан А", "Ресторан Б", "Ресторан В", "Ресторан Г"), ("Ресторан Б",)],
+    ids=["grow", "shrink"],
+)
+async def test_request_stores_section_keeps_neighbours(sheets, written, after):
+    sheets.seed(MIN_STOCK_SHEET_ID, gsheet.SETTINGS_TAB, _ABOVE + _BELOW)
+    # Первая запись — секции нет, блок дописывается в конец листа;
+    # дальше переносим её руками между соседями
+    await gsheet.sync_request_stores_to_sheet(_stores("Ресторан Б", "Ресторан В"))
+    block, offset = written[-1]
+    assert _grid(sheets, MIN_STOCK_SHEET_ID, gsheet.SETTINGS_TAB) == _trimmed(
+        _ABOVE + _BELOW + [[]] + block
+    )
+    section = [list(r) for r in block]
+    section[1][2] = "Ресторан Б"  # выбор пользователя в dropdown
+    above = _ABOVE + [["Заметка", "", ""]]
+    sheets.seed(MIN_STOCK_SHEET_ID, gsheet.SETTINGS_TAB, above + section + _BELOW)
+
+    count = await gsheet.sync_request_stores_to_sheet(_stores(*after))
+    desired, offset = written[-1]
+
+    assert count == len(after)
+    assert offset == len(above)
+    assert desired[1][2] == "Ресторан Б"  # выбор сохранён
+    assert desired[1][3].endswith(
+        f'$E${offset + 4}:$F${offset + 3 + len(after)},2,FALSE),"")'
+    )
+    assert _grid(sheets, MIN_STOCK_SHEET_ID, gsheet.SETTINGS_TAB) == _trimmed(
+        above + desired + _BELOW
+    )
+
+
+# ═══════════════════════════════════════════════════════
+# Прайс-лист, права, зарплаты — строки по ключу
+# ═══════════════════════════════════════════════════════
+
+
+async def test_invoice_prices_converge_with_manual_prices(sheets, written):
+    suppliers = [{"id": "sup-1", "name": "ООО Молоко"}]
+    products = [
+        {"id": f"p{i:02d}", "name": f"Товар {i:02d}", "product_type": "GOODS"}
+        for i in range(10)
+    ]
+    await gsheet.sync_invoice_prices_to_sheet(products, {}, suppliers)
+    first, _ = written[-1]
+    tab = gsheet.PRICE_TAB
+    _set(sheets, INVOICE_PRICE_SHEET_ID, tab, 1, 4, "ООО Молоко")  # dropdown E2
+    _set(sheets, INVOICE_PRICE_SHEET_ID, tab, _row_of(first, 1, "p07"), 4, "95.5")
+    _insert_rows(sheets, INVOICE_PRICE_SHEET_ID, tab, 4, 1)
+
+    dish = {"id": "d01", "name": "Борщ", "product_type": "DISH"}
+    products = (
+        [dish]
+        + products[:3]
+        + products[4:]
+        + [{"id": "p10", "name": "Товар 10", "product_type": "GOODS"}]
+    )
+    await gsheet.sync_invoice_prices_to_sheet(products, {"p02": 12.0}, suppliers)
+    desired, _ = written[-1]
+
+    assert _grid(sheets, INVOICE_PRICE_SHEET_ID, tab) == _trimmed(desired)
+    assert desired[1][4] == "ООО Молоко" and desired[0][4] == "sup-1"
+    assert desired[_row_of(desired, 1, "p07")][4] == "95.5"
+    assert desired[_row_of(desired, 1, "p02")][3] == "12.00"
+
+
+async def test_permissions_converge_and_keep_marks(sheets, written):
+    keys = ["📝 Списания", "📦 Накладные", "📊 Отчёты"]
+    employees = [{"name": f"Сотрудник {i}", "telegram_id": 1000 + i} for i in range(5)]
+    await gsheet.sync_permissions_to_sheet(employees, keys)
+    first, _ = written[-1]
+    tab = gsheet.PERMS_TAB
+    row = _row_of(first, 1, "1003")
+    _set(sheets, MIN_STOCK_SHEET_ID, tab, row, 3, "✅")  # Накладные
+    _set(sheets, MIN_STOCK_SHEET_ID, tab, row, 4, "✅")  # Отчёты
+    _insert_rows(sheets, MIN_STOCK_SHEET_ID, tab, 3, 2)
+
+    # Отчёты убраны из permission_map, добавлен новый ключ; новый сотрудник
+    keys = ["📝 Списания", "📦 Накладные", "🧾 Заявки"]
+    employees.append({"name": "Новый", "telegram_id": 2000})
+    count = await gsheet.sync_permissions_to_sheet(employees, keys)
+    desired, _ = written[-1]
+
+    assert count == 6
+    assert _grid(sheets, MIN_STOCK_SHEET_ID, tab) == _trimmed(desired)
+    assert desired[_row_of(desired, 1, "1003")][2:] == [False, True, False]
+
+
+async def test_salary_converges_from_shifted_sheet(sheets, written):
+    employees = [
+        {"id": f"e{i}", "name": f"Сотрудник {i}", "sal_type": "почасовая", "rate": 300}
+        for i in range(6)
+    ]
+    await gsheet.sync_salary_sheet(employees)
+    first, _ = written[-1]
+    _insert_rows(sheets, SALARY_SHEET_ID, gsheet._SALARY_TAB, 2, 3)
+
+    employees = (
+        [{"id": "e9", "name": "Аркадий", "sal_type": "ежемесячная", "rate": 80000}]
+        + employees[:2]
+        + employees[3:]
+    )
+    employees[-1]["rate"] = 350
+    count = await gsheet.sync_salary_sheet(employees)
+    desired, _ = written[-1]
+
+    assert count == 6 and len(first) == len(desired)
+    assert _grid(sheets, SALARY_SHEET_ID, gsheet._SALARY_TAB) == _trimmed(desired)
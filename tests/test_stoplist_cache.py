@@ -0,0 +1,169 @@
+"""
+Тесты: кеши стоп-листа — терминальные группы, токен iikoCloud, имена товаров.
+
+Запуск: pytest tests/test_stoplist_cache.py -v
+"""
+
+import uuid
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+
+from adapters import iiko_cloud_api
+from use_cases import product_ref_cache, stoplist
+
+ORG = "org-1"
+
+
+def _stop_lists(product_id: str) -> list[dict]:
+    return [
+        {
+            "organizationId": ORG,
+            "items": [
+                {
+                    "terminalGroupId": "tg-1",
+                    "items": [{"productId": product_id, "balance": 0}],
+                }
+            ],
+        }
+    ]
+
+
+def _http_error(status: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://cloud/api/1/stop_lists")
+    return httpx.HTTPStatusError(
+        "err", request=request, response=httpx.Response(status, request=request)
+    )
+
+
+@pytest.fixture(autouse=True)
+def _reset_caches():
+    stoplist.invalidate_terminal_groups()
+    product_ref_cache.invalidate()
+    iiko_cloud_api.invalidate_cloud_token()
+    yield
+    stoplist.invalidate_terminal_groups()
+    product_ref_cache.invalidate()
+    iiko_cloud_api.invalidate_cloud_token()
+
+
+def _session_factory(*results):
+    """async_session_factory, отдающий результаты execute() по очереди."""
+    session = MagicMock()
+    session.execute = AsyncMock(
+        side_effect=[MagicMock(all=MagicMock(return_value=r)) for r in results]
+    )
+    ctx = MagicMock()
+    ctx.__aenter__ = AsyncMock(return_value=session)
+    ctx.__aexit__ = AsyncMock(return_value=False)
+    return MagicMock(return_value=ctx), session
+
+
+# ═══════════════════════════════════════════════════════
+# 1. Терминальные группы
+# ═══════════════════════════════════════════════════════
+
+
+@pytest.mark.asyncio
+async def test_terminal_groups_fetched_once_per_org():
+    pid = str(uuid.uuid4())
+    tg = AsyncMock(return_value=[{"id": "tg-1"}])
+    with (
+        patch("adapters.iiko_cloud_api.fetch_terminal_groups", tg),
+        patch(
+            "adapters.iiko_cloud_api.fetch_stop_lists",
+            AsyncMock(return_value=_stop_lists(pid)),
+        ),
+        patch(
+            "use_cases.stoplist._map_product_names",
+            AsyncMock(return_value={pid: "Борщ"}),
+        ),
+    ):
+        first = await stoplist.fetch_stoplist_items(ORG)
+        second = await stoplist.fetch_stoplist_items(ORG)
+
+    assert tg.await_count == 1
+    assert first == second
+    assert first[0]["name"] == "Борщ"
+
+
+@pytest.mark.asyncio
+async def test_stale_terminal_groups_refreshed_on_400():
+    pid = str(uuid.uuid4())
+    tg = AsyncMock(side_effect=[[{"id": "tg-old"}], [{"id": "tg-1"}]])
+    stop_lists = AsyncMock(side_effect=[_http_error(400), _stop_lists(pid)])
+    with (
+        patch("adapters.iiko_cloud_api.fetch_terminal_groups", tg),
+        patch("adapters.iiko_cloud_api.fetch_stop_lists", stop_lists),
+        patch("use_cases.stoplist._map_product_names", AsyncMock(return_value={})),
+    ):
+        items = await stoplist.fetch_stoplist_items(ORG)
+
+    assert len(items) == 1
+    assert stop_lists.await_args_list[1].args == (ORG, ["tg-1"])
+
+
+# ═══════════════════════════════════════════════════════
+# 2. Токен iikoCloud
+# ═══════════════════════════════════════════════════════
+
+
+@pytest.mark.asyncio
+async def test_cloud_token_cached_and_refreshed_on_401():
+    token_result = MagicMock()
+    token_result.scalar_one_or_none = MagicMock(side_effect=["old", "new"])
+    session = MagicMock()
+    session.execute = AsyncMock(return_value=token_result)
+    ctx = MagicMock()
+    ctx.__aenter__ = AsyncMock(return_value=session)
+    ctx.__aexit__ = AsyncMock(return_value=False)
+
+    request = httpx.Request("POST", "https://cloud/api/1/organizations")
+    client = MagicMock()
+    client.post = AsyncMock(
+        side_effect=[
+            httpx.Response(200, json={"organizations": []}, request=request),
+            httpx.Response(401, request=request),
+            httpx.Response(200, json={"organizations": [{"id": "o"}]}, request=request),
+        ]
+    )
+    with (
+        patch(
+            "adapters.iiko_cloud_api.async_session_factory",
+            MagicMock(return_value=ctx),
+        ),
+        patch("adapters.iiko_cloud_api._get_client", AsyncMock(return_value=client)),
+    ):
+        await iiko_cloud_api.get_organizations()
+        orgs = await iiko_cloud_api.get_organizations()
+
+    assert orgs == [{"id": "o"}]
+    assert session.execute.await_count == 2  # 1 чтение + 1 после 401
+    auth = [c.kwargs["headers"]["Authorization"] for c in client.post.await_args_list]
+    assert auth == ["Bearer old", "Bearer old", "Bearer new"]
+
+
+# ═══════════════════════════════════════════════════════
+# 3. Имена товаров
+# ═══════════════════════════════════════════════════════
+
+
+@pytest.mark.asyncio
+async def test_product_names_loaded_once_and_new_ids_fetched():
+    known, fresh, ghost = (uuid.uuid4() for _ in range(3))
+    factory, session = _session_factory(
+        [(known, "Борщ")],  # полная загрузка
+        [(fresh, None)],  # дозагрузка новых id
+    )
+    with patch("use_cases.product_ref_cache.async_session_factory", factory):
+        first = await product_ref_cache.get_product_names([str(known)])
+        second = await product_ref_cache.get_product_names(
+            [str(known), str(fresh), str(ghost), "not-a-uuid"]
+        )
+        third = await product_ref_cache.get_product_names([str(ghost), str(fresh)])
+
+    assert first == {str(known): "Борщ"}
+    assert second == {str(known): "Борщ", str(fresh): "[без названия]"}
+    assert third == {str(fresh): "[без названия]"}
+    assert session.execute.await_count == 2  # ghost не запрашивается повторно
@@ -0,0 +1,113 @@
+"""
+Тесты: set-based запись диффа стоп-листа (use_cases/stoplist.sync_and_diff).
+
+БД не нужна: сессия-заглушка запоминает выполненные statement'ы,
+SQL компилируется диалектом PostgreSQL.
+Запуск: pytest tests/test_stoplist_diff.py -v
+"""
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql.dml import Delete, Insert, Update
+
+from use_cases.stoplist import sync_and_diff
+
+ORG = "org-1"
+
+
+def _old_row(pk: int, pid: str, balance: float = 0.0, name: str | None = None):
+    return SimpleNamespace(
+        pk=pk,
+        product_id=pid,
+        name=name or f"Блюдо {pid}",
+        balance=balance,
+        terminal_group_id="tg-1",
+    )
+
+
+def _item(pid: str, balance: float = 0.0) -> dict:
+    return {
+        "product_id": pid,
+        "name": f"Блюдо {pid}",
+        "balance": balance,
+        "terminal_group_id": "tg-1",
+        "organization_id": ORG,
+    }
+
+
+class _Session:
+    """Заглушка AsyncSession: SELECT → old_rows, DML → в список."""
+
+    def __init__(self, old_rows):
+        self.old_rows = old_rows
+        self.dml: list = []
+        self.commit = AsyncMock()
+
+    async def execute(self, stmt, params=None):
+        if isinstance(stmt, (Insert, Update, Delete)):
+            self.dml.append((stmt, params))
+            return MagicMock()
+        return MagicMock(all=MagicMock(return_value=self.old_rows))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+async def _run(old_rows, new_items):
+    session = _Session(old_rows)
+    with patch(
+        "use_cases.stoplist.async_session_factory", MagicMock(return_value=session)
+    ):
+        result = await sync_and_diff(new_items, org_id=ORG)
+    return session, result
+
+
+def _sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+@pytest.mark.asyncio
+async def test_noop_cycle_issues_zero_writes():
+    old = [_old_row(i, f"p{i}") for i in range(20)]
+    new = [_item(f"p{i}") for i in range(20)]
+
+    session, (added, removed, changed, existing) = await _run(old, new)
+
+    assert session.dml == []
+    session.commit.assert_not_awaited()
+    assert (len(added), len(removed), len(changed), len(existing)) == (0, 0, 0, 20)
+
+
+@pytest.mark.asyncio
+async def test_diff_applied_set_wise_in_one_transaction():
+    old = [_old_row(1, "gone"), _old_row(2, "same"), _old_row(3, "bal", 1.0)]
+    new = [_item("same"), _item("bal", 2.0), _item("new")]
+
+    session, (added, removed, changed, existing) = await _run(old, new)
+
+    assert [it["product_id"] for it in added] == ["new"]
+    assert [it["product_id"] for it in removed] == ["gone"]
+    assert changed[0]["old_balance"] == 1.0
+    session.commit.assert_awaited_once()
+
+    kinds = [(type(stmt).__name__, stmt.table.name) for stmt, _ in session.dml]
+    assert sorted(kinds) == [
+        ("Delete", "active_stoplist"),
+        ("Insert", "active_stoplist"),
+        ("Insert", "stoplist_history"),
+        ("Update", "stoplist_history"),
+    ]
+
+    sql = {
+        (type(stmt).__name__, stmt.table.name): _sql(stmt) for stmt, _ in session.dml
+    }
+    assert "pk = ANY (%(pks)s" in sql[("Delete", "active_stoplist")]
+    upsert = sql[("Insert", "active_stoplist")]
+    assert "ON CONFLICT ON CONSTRAINT uq_active_stoplist_product_tg" in upsert
+    assert upsert.count("%(product_id_m") == 2  # new + bal одним VALUES
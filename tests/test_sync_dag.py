@@ -0,0 +1,180 @@
+"""
+Тесты: DAG-оркестратор этапов синхронизации (use_cases/sync_dag.py).
+
+Запуск: pytest tests/test_sync_dag.py -v
+"""
+
+import asyncio
+from contextlib import contextmanager
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from use_cases.sync_dag import (
+    Stage,
+    StageResult,
+    critical_path,
+    report_lines,
+    run_dag,
+    topo_order,
+    with_descendants,
+)
+
+
+@contextmanager
+def _no_db():
+    """Заглушки записи в iiko_sync_log."""
+    with (
+        patch("use_cases.sync_dag._start_run_log", AsyncMock(return_value=1)),
+        patch("use_cases.sync_dag._finish_run_log", AsyncMock()),
+        patch("use_cases.sync_dag._save_stage_log", AsyncMock()) as save,
+    ):
+        yield save
+
+
+def _stage(key, deps=(), systems=(), delay=0.0, fail=False, trace=None):
+    async def _run(ctx):
+        if trace is not None:
+            trace.append(("start", key))
+        await asyncio.sleep(delay)
+        if trace is not None:
+            trace.append(("end", key))
+        if fail:
+            raise RuntimeError(f"{key} failed")
+        return StageResult([f"{key}: ok"], 1)
+
+    return Stage(key, key, _run, tuple(deps), tuple(systems))
+
+
+# ═══════════════════════════════════════════════════════
+# 1. Граф
+# ═══════════════════════════════════════════════════════
+
+
+def test_topo_order_respects_deps():
+    stages = [_stage("c", ["b"]), _stage("b", ["a"]), _stage("a")]
+    order = topo_order(stages)
+    assert order.index("a") < order.index("b") < order.index("c")
+
+
+def test_topo_order_rejects_cycle_and_unknown_dep():
+    with pytest.raises(ValueError):
+        topo_order([_stage("a", ["b"]), _stage("b", ["a"])])
+    with pytest.raises(ValueError):
+        topo_order([_stage("a", ["missing"])])
+
+
+def test_with_descendants():
+    stages = [_stage("a"), _stage("b", ["a"]), _stage("c", ["b"]), _stage("d")]
+    assert with_descendants(stages, {"b"}) == {"b", "c"}
+    assert with_descendants(stages, {"a"}) == {"a", "b", "c"}
+
+
+# ═══════════════════════════════════════════════════════
+# 2. Исполнение
+# ═══════════════════════════════════════════════════════
+
+
+@pytest.mark.asyncio
+async def test_independent_stages_run_in_parallel():
+    """Независимые этапы перекрываются, зависимый ждёт обоих."""
+    trace: list = []
+    stages = [
+        _stage("a", delay=0.05, trace=trace),
+        _stage("b", delay=0.05, trace=trace),
+        _stage("c", ["a", "b"], trace=trace),
+    ]
+    with _no_db():
+        outcomes = await run_dag(stages, ctx={}, prefix="t", triggered_by="test")
+
+    assert trace[:2] == [("start", "a"), ("start", "b")]
+    assert trace.index(("start", "c")) > trace.index(("end", "a"))
+    assert trace.index(("start", "c")) > trace.index(("end", "b"))
+    assert all(o.status == "success" for o in outcomes.values())
+
+
+@pytest.mark.asyncio
+async def test_system_limit_serializes_stages():
+    """Лимит 1 на систему — этапы одной системы не пересекаются."""
+    trace: list = []
+    stages = [
+        _stage("a", systems=["gsheet"], delay=0.02, trace=trace),
+        _stage("b", systems=["gsheet"], delay=0.02, trace=trace),
+    ]
+    with _no_db():
+        await run_dag(
+            stages, ctx={}, prefix="t", triggered_by="test", limits={"gsheet": 1}
+        )
+
+    assert trace == [("start", "a"), ("end", "a"), ("start", "b"), ("end", "b")]
+
+
+@pytest.mark.asyncio
+async def test_failed_stage_is_logged_and_does_not_block_dependents():
+    stages = [_stage("a", fail=True), _stage("b", ["a"])]
+    with _no_db() as save:
+        outcomes = await run_dag(stages, ctx={}, prefix="t", triggered_by="test")
+
+    assert outcomes["a"].status == "error"
+    assert outcomes["a"].lines == ["a: ❌ ошибка"]
+    assert outcomes["b"].status == "success"
+    statuses = {c.args[1]: c.args[3] for c in save.await_args_list}
+    assert statuses == {"a": "error", "b": "success"}
+
+
+async def test_guard_failure_stops_remaining_stages():
+    """Lock потерян между этапами → следующие этапы не запускаются."""
+    trace: list = []
+    checks = iter([None, RuntimeError("lock потерян")])
+
+    async def _guard():
+        err = next(checks)
+        if err is not None:
+            raise err
+
+    stages = [_stage("a", trace=trace), _stage("b", ["a"], trace=trace)]
+    with _no_db():
+        outcomes = await run_dag(
+            stages, ctx={}, prefix="t", triggered_by="test", guard=_guard
+        )
+
+    assert outcomes["a"].status == "success"
+    assert outcomes["b"].status == "error" and outcomes["b"].error == "lock потерян"
+    assert ("start", "b") not in trace
+
+
+@pytest.mark.asyncio
+async def test_only_subset_skips_run_marker():
+    """Retry: выполняются только выбранные этапы, маркер прогона не пишется."""
+    stages = [_stage("a"), _stage("b", ["a"]), _stage("c")]
+    with (
+        patch("use_cases.sync_dag._start_run_log", AsyncMock(return_value=1)) as start,
+        patch("use_cases.sync_dag._finish_run_log", AsyncMock()),
+        patch("use_cases.sync_dag._save_stage_log", AsyncMock()),
+    ):
+        outcomes = await run_dag(
+            stages, ctx={}, prefix="t", triggered_by="test", only={"b"}
+        )
+
+    assert set(outcomes) == {"b"}
+    start.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_report_lines_follow_declaration_order():
+    stages = [_stage("slow", delay=0.03), _stage("fast")]
+    with _no_db():
+        outcomes = await run_dag(stages, ctx={}, prefix="t", triggered_by="test")
+
+    assert report_lines(stages, outcomes) == ["slow: ok", "fast: ok"]
+    assert critical_path(stages, outcomes) == pytest.approx(outcomes["slow"].elapsed)
+
+
+def test_daily_stages_graph_is_valid():
+    """DAILY_STAGES планировщика — корректный DAG."""
+    from use_cases.scheduler import DAILY_STAGES
+
+    order = topo_order(DAILY_STAGES)
+    assert order.index("salary_history") < order.index("fot")
+    assert order.index("fot") < order.index("fot_fintablo")
+    assert order.index("min_max") < order.index("nomenclature")
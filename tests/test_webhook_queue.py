@@ -0,0 +1,165 @@
+"""
+Тесты: durable-очередь вебхуков iikoCloud (use_cases/webhook_queue.py).
+
+Redis эмулируется fakeredis (с Lua — пакет lupa).
+Запуск: pytest tests/test_webhook_queue.py -v
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+from use_cases import webhook_queue as wq  # noqa: E402
+
+
+def _stoplist(org: str | None) -> list[dict]:
+    event = {"eventType": "StopListUpdate", "eventTime": "2026-03-17 12:00:00"}
+    if org:
+        event["organizationId"] = org
+    return [event]
+
+
+@pytest.fixture
+def fake_redis():
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    with patch("use_cases.webhook_queue.get_redis", AsyncMock(return_value=client)):
+        yield client
+
+
+async def _worker(flush_fn=None, consumer="c1") -> wq.WebhookWorker:
+    worker = wq.WebhookWorker(bot=None, consumer=consumer, flush_fn=flush_fn)
+    await worker.ensure_group()
+    return worker
+
+
+async def _make_due(redis, org: str) -> None:
+    await redis.zadd(wq.DUE_KEY, {org: wq._now_ms() - 1})
+
+
+# ═══════════════════════════════════════════════════════
+# 1. Приём и debounce
+# ═══════════════════════════════════════════════════════
+
+
+@pytest.mark.asyncio
+async def test_enqueue_then_consume_schedules_org_and_acks(fake_redis):
+    worker = await _worker(AsyncMock())
+    assert await wq.enqueue(_stoplist("org-a"))
+    assert await wq.enqueue(_stoplist("org-a"))
+    assert await wq.enqueue(_stoplist(None))
+
+    assert await worker.read_once(block_ms=None) == 3
+
+    due = dict(await fake_redis.zrange(wq.DUE_KEY, 0, -1, withscores=True))
+    assert set(due) == {"org-a", wq.ALL_ORGS}
+    assert due["org-a"] > wq._now_ms()  # ещё не созрела — debounce
+    stats = await wq.get_queue_stats()
+    assert stats["pending"] == 0
+    assert stats["stream_len"] == 3
+
+
+@pytest.mark.asyncio
+async def test_enqueue_returns_none_without_redis():
+    with patch(
+        "use_cases.webhook_queue.get_redis", AsyncMock(side_effect=ConnectionError)
+    ):
+        assert await wq.enqueue(_stoplist("org-a")) is None
+
+
+@pytest.mark.asyncio
+async def test_unprocessed_event_is_reclaimed_by_other_consumer(fake_redis):
+    dead = await _worker(consumer="dead")
+    await wq.enqueue(_stoplist("org-a"))
+    with patch("use_cases.webhook_queue.schedule_stoplist", side_effect=OSError):
+        assert await dead.read_once(block_ms=None) == 0  # упал до ACK
+
+    alive = await _worker(consumer="alive")
+    with patch.object(wq, "RECLAIM_IDLE_MS", 0):
+        assert await alive.reclaim() == 1
+    assert await fake_redis.zscore(wq.DUE_KEY, "org-a") is not None
+    assert (await wq.get_queue_stats())["pending"] == 0
+
+
+# ═══════════════════════════════════════════════════════
+# 2. Flush
+# ═══════════════════════════════════════════════════════
+
+
+@pytest.mark.asyncio
+async def test_due_orgs_flush_in_parallel_and_are_removed(fake_redis):
+    running = 0
+    peak = 0
+
+    async def _flush(org_ids, bot):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.02)
+        running -= 1
+
+    worker = await _worker(_flush)
+    for org in ("org-a", "org-b", "org-c"):
+        await _make_due(fake_redis, org)
+
+    assert await worker.flush_due(wait=True) == 3
+    assert peak == 3
+    assert await fake_redis.zcard(wq.DUE_KEY) == 0
+    assert worker.flushes_ok == 3
+
+
+@pytest.mark.asyncio
+async def test_event_during_flush_keeps_org_scheduled(fake_redis):
+    async def _flush(org_ids, bot):
+        await wq.schedule_stoplist({"org-a"})  # новый вебхук посреди flush
+
+    worker = await _worker(_flush)
+    await _make_due(fake_redis, "org-a")
+    await worker.flush_due(wait=True)
+
+    assert await fake_redis.zscore(wq.DUE_KEY, "org-a") > wq._now_ms()
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_is_retried_later(fake_redis):
+    """Реальный flush_stoplist_orgs: упавшая org не удаляется, а переносится."""
+
+    async def _fetch(org_id):
+        if org_id == "org-b":
+            raise RuntimeError("iikoCloud 500")
+        return []
+
+    worker = await _worker()  # flush_fn по умолчанию — flush_stoplist_orgs
+    for org in ("org-a", "org-b"):
+        await _make_due(fake_redis, org)
+    with (
+        patch("use_cases.stoplist.fetch_stoplist_items", _fetch),
+        patch(
+            "use_cases.stoplist.sync_and_diff",
+            AsyncMock(return_value=([], [], [], [])),
+        ),
+    ):
+        await worker.flush_due(wait=True)
+
+    assert (worker.flushes_ok, worker.flushes_failed) == (1, 1)
+    assert await fake_redis.zscore(wq.DUE_KEY, "org-a") is None
+    score = await fake_redis.zscore(wq.DUE_KEY, "org-b")
+    assert score > wq._now_ms() + (wq.FLUSH_RETRY_SEC - 5) * 1000
+
+
+@pytest.mark.asyncio
+async def test_flush_stoplist_orgs_reports_failed_orgs():
+    from use_cases.iiko_webhook_handler import StoplistFlushError, flush_stoplist_orgs
+
+    async def _flush_org(oid, bot):
+        if oid != "org-a":
+            raise RuntimeError("iikoCloud 500")
+        return True
+
+    with patch("use_cases.iiko_webhook_handler.flush_stoplist_org", _flush_org):
+        with pytest.raises(StoplistFlushError) as err:
+            await flush_stoplist_orgs({"org-a", "org-b", "org-c"}, None)
+    assert err.value.org_ids == ["org-b", "org-c"]
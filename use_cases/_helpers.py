@@ -6,6 +6,7 @@ Shared helpers for use_cases — DRY вместо дублей в каждом s
 Хеш: compute_hash() — SHA-256 для дедупликации.
 Дерево: bfs_allowed_groups() — BFS по iiko_product_group.
 Склады: load_stores_for_department() — склады подразделения (бар/кухня).
+Поиск/пагинация: ilike_pattern(), Cursor — общие для log_store и error_store.
 
 Используются в sync.py, sync_fintablo.py, sync_stock_balances.py и т.д.
 """
@@ -99,6 +100,20 @@ def compute_hash(text: str) -> str:
     return hashlib.sha256(text.encode()).hexdigest()
 
 
+# ─────────────────────────────────────────────────────
+# Поиск и keyset-пагинация (log_store, error_store)
+# ─────────────────────────────────────────────────────
+
+# Позиция записи в ленте: (created_at, pk) — ключ ORDER BY … DESC
+Cursor = tuple[datetime, int]
+
+
+def ilike_pattern(value: str) -> str:
+    """Подстрока для ILIKE … ESCAPE '\\': %/_/\\ из ввода — буквально."""
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
 # ─────────────────────────────────────────────────────
 # BFS по дереву номенклатурных групп (общий для writeoff, invoice, sync_min_stock)
 # ─────────────────────────────────────────────────────
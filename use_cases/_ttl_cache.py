@@ -2,21 +2,27 @@
 Reusable in-memory TTL-кеш.
 
 Хранит пары (data, timestamp) и автоматически удаляет протухшие записи.
-Используется writeoff_cache и invoice_cache.
+Используется writeoff_cache, invoice_cache, product_ref_cache, stoplist.
+Попадания / промахи get() — в cache_hits_total / cache_misses_total
+(метка cache = name) для /metrics.
 """
 
 import time
 from typing import Any
 
+from utils.metrics import CACHE_HITS, CACHE_MISSES
+
 
 class TtlCache:
     """Simple in-memory TTL cache backed by a plain dict."""
 
-    __slots__ = ("_store", "_default_ttl")
+    __slots__ = ("_store", "_default_ttl", "_hits", "_misses")
 
-    def __init__(self, default_ttl: float = 600) -> None:
+    def __init__(self, default_ttl: float = 600, *, name: str = "ttl") -> None:
         self._store: dict[str, tuple[Any, float]] = {}
         self._default_ttl = default_ttl
+        self._hits = CACHE_HITS.labels(name)
+        self._misses = CACHE_MISSES.labels(name)
 
     # ── core ──
 
@@ -24,11 +30,14 @@ class TtlCache:
         """Return cached value or ``None`` if missing / expired."""
         entry = self._store.get(key)
         if entry is None:
+            self._misses.inc()
             return None
         data, ts = entry
         if time.monotonic() - ts > (ttl if ttl is not None else self._default_ttl):
             del self._store[key]
+            self._misses.inc()
             return None
+        self._hits.inc()
         return data
 
     def set(self, key: str, data: Any) -> None:  # noqa: A003
@@ -116,5 +116,8 @@ async def get_departments_for_mapping():
 
 async def invalidate_cache() -> None:
     """Сбросить кеш (вызывается после обновления маппинга в GSheet)."""
+    from adapters.google_sheets import SETTINGS_TAB, refresh_snapshot
+
     await invalidate_key(_CACHE_KEY)
+    refresh_snapshot(SETTINGS_TAB)
     logger.info("[%s] Кеш инвалидирован", LABEL)
@@ -5,7 +5,8 @@ Use-case: редактирование минимальных остатков 
   1. Пользователь ищет товар по подстроке названия.
   2. Выбирает товар из inline-кнопок.
   3. Вводит новый минимальный остаток.
-  4. Бот записывает в Google Таблицу + min_stock_level (БД).
+  4. Бот сразу пишет min_stock_level (БД), а Google Таблицу — через
+     write-behind очередь: серия правок склеивается в один batchUpdate.
 
 Зависимости:
   - iiko_product           — поиск товаров
@@ -13,12 +14,14 @@ Use-case: редактирование минимальных остатков 
   - min_stock_level        — кэш в PostgreSQL
 """
 
+import asyncio
 import logging
 import time
 from dataclasses import dataclass
+from decimal import Decimal
 from uuid import UUID
 
-from sqlalchemy import select, func
+from sqlalchemy import func, select, tuple_, update
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from db.engine import async_session_factory
@@ -31,6 +34,9 @@ logger = logging.getLogger(__name__)
 
 LABEL = "EditMinStock"
 
+FLUSH_DELAY = 1.0  # сек: правки, пришедшие за это время, — один batchUpdate
+RETRY_DELAY = 30.0  # сек: пауза после ошибки Google Sheets
+
 
 # ═══════════════════════════════════════════════════════
 # Dataclasses для результатов
@@ -104,8 +110,9 @@ async def update_min_level(
     Шаги:
       1. Получить имя товара и ресторана из БД.
       2. Получить текущий min из min_stock_level (для отображения «было»).
-      3. Обновить ячейку в Google Таблице.
+      3. Проверить, что ячейка есть в Google Таблице (индекс координат).
       4. Upsert в min_stock_level (БД).
+      5. Поставить запись ячейки в очередь Google Sheets (write-behind).
 
     Возвращает текстовый статус ("✅ ..." или "❌ ...").
     """
@@ -151,15 +158,9 @@ async def update_min_level(
         ).scalar_one_or_none()
         old_min = float(old_row) if old_row is not None else None
 
-    # 3. Записать в Google Таблицу
+    # 3. Ячейка есть в Google Таблице? (индекс координат — без чтения листа)
     try:
-        ok = await gsheet.update_min_max(
-            product_id=product_id,
-            department_id=department_id,
-            min_level=new_min,
-            max_level=new_max,
-        )
-        if not ok:
+        if not await gsheet.has_min_max_cell(product_id, department_id):
             return (
                 "❌ Товар или ресторан не найден в Google Таблице.\n"
                 "Сначала нажмите «📤 Номенклатура → GSheet»."
@@ -174,7 +175,7 @@ async def update_min_level(
         )
         return f"❌ Ошибка записи в Google Таблицу: {exc}"
 
-    # 4. Upsert в min_stock_level (БД) — мгновенный кэш
+    # 4. Upsert в min_stock_level (БД) — сразу, пользователь не ждёт Sheets
     try:
         async with async_session_factory() as session:
             stmt = pg_insert(MinStockLevel).values(
@@ -184,6 +185,7 @@ async def update_min_level(
                 department_name=department_name,
                 min_level=new_min,
                 max_level=new_max,
+                sheet_pending=True,
             )
             stmt = stmt.on_conflict_do_update(
                 constraint="uq_min_stock_product_dept",
@@ -192,12 +194,18 @@ async def update_min_level(
                     "department_name": stmt.excluded.department_name,
                     "min_level": stmt.excluded.min_level,
                     "max_level": stmt.excluded.max_level,
+                    "sheet_pending": True,
                 },
             )
             await session.execute(stmt)
             await session.commit()
     except Exception:
-        logger.warning("[%s] Upsert в БД не удался (GSheet OK)", LABEL, exc_info=True)
+        logger.warning(
+            "[%s] Upsert в БД не удался (GSheet — в очереди)", LABEL, exc_info=True
+        )
+
+    # 5. Google Таблица — write-behind
+    enqueue_sheet_write(product_id, department_id, new_min, new_max)
 
     elapsed = time.monotonic() - t0
     old_str = f"{old_min:.4g}" if old_min is not None else "—"
@@ -220,6 +228,156 @@ async def update_min_level(
     )
 
 
+# ═══════════════════════════════════════════════════════
+# 2a. Write-behind очередь записи в Google Таблицу
+# ═══════════════════════════════════════════════════════
+#
+# {(product_id, department_id): (min, max)} — повторная правка той же
+# ячейки до записи заменяет предыдущую. Writer ждёт FLUSH_DELAY и пишет
+# всё накопленное одним batchUpdate; ошибка → правки возвращаются в
+# очередь (более новые не затираются), повтор через RETRY_DELAY.
+#
+# Очередь в памяти — только ускорение: незаписанная правка помечена в БД
+# min_stock_level.sheet_pending. flush_pending() добирает помеченные строки
+# (правки упавшего процесса или другой реплики) и снимает флаг после
+# записи; импорт GSheet → БД (sync_min_stock) помеченные строки не трогает,
+# даже если Google Sheets недоступен и очередь не ушла.
+
+_pending: dict[tuple[str, str], tuple[float, float]] = {}
+_flush_lock = asyncio.Lock()
+_writer_task: asyncio.Task | None = None
+_stats = {
+    "queued": 0,
+    "coalesced": 0,
+    "batches": 0,
+    "written": 0,
+    "missing": 0,
+    "errors": 0,
+}
+
+
+def enqueue_sheet_write(
+    product_id: str, department_id: str, min_level: float, max_level: float
+) -> None:
+    """Поставить запись ячейки min/max в очередь Google Sheets."""
+    global _writer_task
+    key = (product_id, department_id)
+    if key in _pending:
+        _stats["coalesced"] += 1
+    _pending[key] = (min_level, max_level)
+    _stats["queued"] += 1
+    if _writer_task is None or _writer_task.done():
+        _writer_task = asyncio.create_task(_writer())
+
+
+async def _writer() -> None:
+    delay = FLUSH_DELAY
+    while _pending:
+        await asyncio.sleep(delay)
+        delay = FLUSH_DELAY if await flush_pending() else RETRY_DELAY
+
+
+async def flush_pending() -> bool:
+    """Записать очередь в Google Таблицу сейчас. False — ошибка Sheets."""
+    async with _flush_lock:
+        for key, value in (await _load_persisted()).items():
+            _pending.setdefault(key, value)
+        if not _pending:
+            return True
+        batch = dict(_pending)
+        _pending.clear()
+        try:
+            missing = await gsheet.write_min_max_batch(batch)
+        except Exception:
+            _stats["errors"] += 1
+            for key, value in batch.items():
+                _pending.setdefault(key, value)
+            logger.warning(
+                "[%s] Запись %d правок в GSheet не удалась — повтор через %.0f сек",
+                LABEL,
+                len(batch),
+                RETRY_DELAY,
+                exc_info=True,
+            )
+            return False
+        await _mark_written(batch)
+    _stats["batches"] += 1
+    _stats["written"] += len(batch) - len(missing)
+    _stats["missing"] += len(missing)
+    if missing:
+        logger.warning(
+            "[%s] Нет в GSheet (правка осталась только в БД): %s",
+            LABEL,
+            missing,
+        )
+    return True
+
+
+async def _load_persisted() -> dict[tuple[str, str], tuple[float, float]]:
+    """Строки с sheet_pending из БД — правки, ещё не записанные в GSheet."""
+    try:
+        async with async_session_factory() as session:
+            rows = (
+                await session.execute(
+                    select(
+                        MinStockLevel.product_id,
+                        MinStockLevel.department_id,
+                        MinStockLevel.min_level,
+                        MinStockLevel.max_level,
+                    ).where(MinStockLevel.sheet_pending.is_(True))
+                )
+            ).all()
+    except Exception:
+        logger.warning("[%s] Не удалось прочитать sheet_pending", LABEL, exc_info=True)
+        return {}
+    return {
+        (str(r.product_id), str(r.department_id)): (
+            float(r.min_level),
+            float(r.max_level or 0),
+        )
+        for r in rows
+    }
+
+
+async def _mark_written(batch: dict[tuple[str, str], tuple[float, float]]) -> None:
+    """
+    Снять sheet_pending с записанных строк. Только если значение в БД то же,
+    что ушло в GSheet: правка, пришедшая во время записи, остаётся помеченной.
+    """
+    keys = [
+        (UUID(pid), UUID(did), _num(mn), _num(mx))
+        for (pid, did), (mn, mx) in batch.items()
+    ]
+    try:
+        async with async_session_factory() as session:
+            await session.execute(
+                update(MinStockLevel)
+                .where(
+                    MinStockLevel.sheet_pending.is_(True),
+                    tuple_(
+                        MinStockLevel.product_id,
+                        MinStockLevel.department_id,
+                        MinStockLevel.min_level,
+                        func.coalesce(MinStockLevel.max_level, 0),
+                    ).in_(keys),
+                )
+                .values(sheet_pending=False)
+            )
+            await session.commit()
+    except Exception:
+        logger.warning("[%s] Не удалось снять sheet_pending", LABEL, exc_info=True)
+
+
+def _num(value: float) -> Decimal:
+    """float → Decimal с точностью колонки Numeric(15, 4)."""
+    return Decimal(f"{value:.4f}")
+
+
+def get_queue_stats() -> dict[str, int]:
+    """Счётчики очереди: поставлено, склеено, пачек, записано, ошибок."""
+    return {**_stats, "pending": len(_pending)}
+
+
 # ═══════════════════════════════════════════════════════
 # 3. Высокоуровневый use-case: валидация + обновление
 # ═══════════════════════════════════════════════════════
@@ -1,30 +1,103 @@
 """
 Use-case: хранилище ошибок бота (таблица bot_error).
 
-Все ERROR/CRITICAL из logging перехватываются DBErrorHandler
-и сохраняются в PostgreSQL. Просмотр через /errors (сисадмины).
+Все ERROR/CRITICAL из logging перехватываются DBErrorHandler и
+группируются по отпечатку (fingerprint): тип исключения + верхние кадры
+traceback без номеров строк + логгер; без traceback — шаблон сообщения
+(числа, UUID, строки в кавычках вырезаны). Счётчики групп копятся в памяти
+и раз в FLUSH_INTERVAL сливаются UPSERT-ом в bot_error_group (first_seen,
+last_seen, count); в bot_error — образец группы не чаще SAMPLE_INTERVAL.
+Шторм одинаковых ошибок в цикле = 1 строка + 1 UPSERT, а не INSERT на каждую.
+Просмотр через /errors (сисадмины).
 
 Публичный API:
-  save_error()       — записать ошибку (вызывается из logging handler)
-  get_recent()       — последние N ошибок (с фильтрами)
-  get_stats()        — статистика: кол-во по уровням за 24ч / 7д / всего
-  mark_resolved()    — пометить ошибку как решённую
+  error_fingerprint() — отпечаток записи лога (fingerprint, exc_type, title)
+  save_error()       — записать образец ошибки в bot_error
+  get_groups()       — группы ошибок (нерешённые сверху по last_seen)
+  get_group()        — группа по отпечатку
+  get_recent()       — образцы ошибок (фильтры, поиск, keyset-курсор)
+  get_stats()        — статистика по bot_error_group: группы / события / 24ч / 7д
+  mark_resolved()    — пометить ошибку (и её группу) как решённую
   mark_all_resolved()— пометить все как решённые
-  cleanup_old()      — удалить ошибки старше N дней
+  cleanup_old()      — удалить решённые ошибки и группы старше N дней
+  flush_pending()    — слить счётчики групп (при остановке бота)
 """
 
+import asyncio
+import hashlib
 import logging
+import os
+import re
+import threading
+import time
 import traceback as tb_module
 from datetime import datetime, timedelta
 from typing import Any
 
-from sqlalchemy import delete, func, select, update
+from sqlalchemy import case, delete, func, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from db.engine import async_session_factory
-from db.models import BotError, _now_kgd
+from db.models import BotError, BotErrorGroup, _now_kgd
+from use_cases._helpers import Cursor, ilike_pattern
 
 logger = logging.getLogger(__name__)
 
+FLUSH_INTERVAL = 5.0  # секунд между UPSERT счётчиков групп
+SAMPLE_INTERVAL = 600.0  # образец группы в bot_error — не чаще (сек)
+TOP_FRAMES = 3  # верхних кадров traceback в отпечатке
+MAX_SAMPLED = 2000  # размер кеша «когда был образец»
+
+# Шаблон сообщения: переменные части → плейсхолдеры
+_NORMALIZE = [
+    (
+        re.compile(
+            r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", re.I
+        ),
+        "<uuid>",
+    ),
+    (re.compile(r"0x[0-9a-f]+|\b[0-9a-f]{12,}\b", re.I), "<hex>"),
+    (re.compile(r"'[^']*'|\"[^\"]*\""), "<str>"),
+    (re.compile(r"\d+(?:[.,:]\d+)*"), "<n>"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+# ═══════════════════════════════════════════════════════
+# Отпечаток ошибки
+# ═══════════════════════════════════════════════════════
+
+
+def _normalize_message(message: str) -> str:
+    """Шаблон сообщения: без чисел / UUID / hex / строк в кавычках."""
+    for pattern, repl in _NORMALIZE:
+        message = pattern.sub(repl, message)
+    return message.strip()[:300]
+
+
+def error_fingerprint(record: logging.LogRecord) -> tuple[str, str | None, str]:
+    """
+    (fingerprint, exc_type, title) записи лога.
+    С исключением — логгер + тип + TOP_FRAMES верхних кадров (файл:функция,
+    без номеров строк: правки файла не плодят новые группы); без — логгер +
+    шаблон сообщения (record.msg до подстановки аргументов, затем нормализация).
+    """
+    message = record.getMessage()
+    title = (message.strip().splitlines() or [""])[0][:300]
+    exc = record.exc_info[1] if record.exc_info else None
+    if exc is not None:
+        exc_type = f"{type(exc).__module__}.{type(exc).__qualname__}"
+        frames = tb_module.extract_tb(exc.__traceback__)[-TOP_FRAMES:]
+        parts = [record.name, exc_type] + [
+            f"{os.path.basename(f.filename)}:{f.name}" for f in frames
+        ]
+    else:
+        exc_type = None
+        template = record.msg if isinstance(record.msg, str) else message
+        parts = [record.name, _normalize_message(template)]
+    digest = hashlib.sha1("\x1f".join(parts).encode()).hexdigest()[:16]
+    return digest, exc_type, title
+
 
 # ═══════════════════════════════════════════════════════
 # Запись ошибки
@@ -38,6 +111,7 @@ async def save_error(
     message: str,
     traceback: str | None = None,
     context: dict[str, Any] | None = None,
+    fingerprint: str | None = None,
 ) -> int | None:
     """
     Сохранить ошибку в БД. Возвращает pk записи или None при неудаче.
@@ -51,6 +125,7 @@ async def save_error(
                 message=message[:4000],
                 traceback=traceback[:20_000] if traceback else None,
                 context=context,
+                fingerprint=fingerprint,
             )
             session.add(err)
             await session.commit()
@@ -60,6 +135,175 @@ async def save_error(
         return None
 
 
+# ═══════════════════════════════════════════════════════
+# Агрегатор групп (память → UPSERT bot_error_group)
+# ═══════════════════════════════════════════════════════
+
+_pending: dict[str, dict[str, Any]] = {}
+_pending_lock = threading.Lock()  # emit бывает и из потоков to_thread
+_sampled: dict[str, float] = {}
+_flush_task: asyncio.Task | None = None
+
+_stats: dict[str, Any] = {
+    "events": 0,
+    "samples": 0,
+    "upserts": 0,
+    "flush_errors": 0,
+}
+
+
+def _record_occurrence(
+    fingerprint: str,
+    *,
+    level: str,
+    logger_name: str,
+    exc_type: str | None,
+    title: str,
+    seen_at: datetime,
+    count: int = 1,
+    error_pk: int | None = None,
+) -> None:
+    """Учесть событие группы в памяти (count=0 — только ссылка на образец)."""
+    with _pending_lock:
+        entry = _pending.get(fingerprint)
+        if entry is None:
+            _pending[fingerprint] = {
+                "fingerprint": fingerprint,
+                "level": level[:20],
+                "logger_name": logger_name[:300],
+                "exc_type": exc_type[:200] if exc_type else None,
+                "title": title,
+                "first_seen": seen_at,
+                "last_seen": seen_at,
+                "count": count,
+                "last_error_pk": error_pk,
+            }
+            return
+        entry["count"] += count
+        if count:
+            entry["level"] = level[:20]
+            entry["last_seen"] = max(entry["last_seen"], seen_at)
+        if error_pk is not None:
+            entry["last_error_pk"] = error_pk
+
+
+def _take_pending() -> list[dict[str, Any]]:
+    with _pending_lock:
+        rows = list(_pending.values())
+        _pending.clear()
+    return rows
+
+
+def _upsert_groups_stmt(rows: list[dict[str, Any]]):
+    """INSERT … ON CONFLICT (fingerprint): count += , last_seen = max, новое событие снимает resolved."""
+    stmt = pg_insert(BotErrorGroup).values(rows)
+    new = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=[BotErrorGroup.fingerprint],
+        set_={
+            "count": BotErrorGroup.count + new.count,
+            "first_seen": func.least(BotErrorGroup.first_seen, new.first_seen),
+            "last_seen": func.greatest(BotErrorGroup.last_seen, new.last_seen),
+            "level": case((new.count > 0, new.level), else_=BotErrorGroup.level),
+            "title": case((new.count > 0, new.title), else_=BotErrorGroup.title),
+            "last_error_pk": func.coalesce(
+                new.last_error_pk, BotErrorGroup.last_error_pk
+            ),
+            "resolved": case((new.count > 0, False), else_=BotErrorGroup.resolved),
+        },
+    )
+
+
+async def _flush_groups() -> bool:
+    """Слить накопленные счётчики одним UPSERT. False — БД недоступна (вернули в память)."""
+    rows = _take_pending()
+    if not rows:
+        return True
+    try:
+        async with async_session_factory() as session:
+            await session.execute(_upsert_groups_stmt(rows))
+            await session.commit()
+    except Exception:
+        # Внутри error handler — нельзя логировать (рекурсия)
+        _stats["flush_errors"] += 1
+        for row in rows:
+            _record_occurrence(
+                row["fingerprint"],
+                level=row["level"],
+                logger_name=row["logger_name"],
+                exc_type=row["exc_type"],
+                title=row["title"],
+                seen_at=row["last_seen"],
+                count=row["count"],
+                error_pk=row["last_error_pk"],
+            )
+        return False
+    _stats["upserts"] += 1
+    return True
+
+
+async def _periodic_flush() -> None:
+    while True:
+        await asyncio.sleep(FLUSH_INTERVAL)
+        try:
+            await _flush_groups()
+        except Exception:
+            pass
+
+
+def _ensure_flush_task() -> None:
+    """Создать фоновый flush (если ещё нет). Только из потока event loop."""
+    global _flush_task
+    if _flush_task is not None and not _flush_task.done():
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    _flush_task = loop.create_task(_periodic_flush(), name="error_store_flush")
+
+
+def _should_sample(fingerprint: str) -> bool:
+    """Пора ли писать образец группы (не чаще SAMPLE_INTERVAL)."""
+    now = time.monotonic()
+    with _pending_lock:
+        if now - _sampled.get(fingerprint, -SAMPLE_INTERVAL) < SAMPLE_INTERVAL:
+            return False
+        _sampled[fingerprint] = now
+        if len(_sampled) > MAX_SAMPLED:
+            cutoff = now - SAMPLE_INTERVAL
+            for key in [k for k, v in _sampled.items() if v <= cutoff]:
+                del _sampled[key]
+    return True
+
+
+async def _save_sample(fingerprint: str, **fields: Any) -> None:
+    """Записать образец группы и привязать его pk к группе."""
+    pk = await save_error(fingerprint=fingerprint, **fields)
+    if pk is not None:
+        _stats["samples"] += 1
+        _record_occurrence(
+            fingerprint,
+            level=fields["level"],
+            logger_name=fields["logger_name"],
+            exc_type=None,
+            title="",
+            seen_at=_now_kgd(),
+            count=0,
+            error_pk=pk,
+        )
+
+
+async def flush_pending() -> None:
+    """Слить счётчики групп (graceful shutdown)."""
+    await _flush_groups()
+
+
+def get_sink_stats() -> dict[str, Any]:
+    """События / образцы / UPSERT-ы / ошибки + групп в памяти."""
+    return {**_stats, "pending_groups": len(_pending)}
+
+
 # ═══════════════════════════════════════════════════════
 # Чтение ошибок
 # ═══════════════════════════════════════════════════════
@@ -71,11 +315,26 @@ async def get_recent(
     level: str | None = None,
     resolved: bool | None = False,
     hours: int | None = None,
+    search: str | None = None,
+    before: Cursor | None = None,
 ) -> list[BotError]:
-    """Последние ошибки с фильтрами."""
+    """
+    Последние ошибки с фильтрами. search — ILIKE по сообщению и логгеру
+    (GIN pg_trgm), before — курсор (created_at, pk) следующей страницы.
+    """
     async with async_session_factory() as session:
-        stmt = select(BotError).order_by(BotError.created_at.desc())
+        stmt = select(BotError).order_by(BotError.created_at.desc(), BotError.pk.desc())
 
+        if before is not None:
+            stmt = stmt.where(
+                tuple_(BotError.created_at, BotError.pk) < tuple_(*before)
+            )
+        if search:
+            pattern = ilike_pattern(search)
+            stmt = stmt.where(
+                BotError.message.ilike(pattern, escape="\\")
+                | BotError.logger_name.ilike(pattern, escape="\\")
+            )
         if level:
             stmt = stmt.where(BotError.level == level.upper())
         if resolved is not None:
@@ -95,37 +354,56 @@ async def get_by_pk(pk: int) -> BotError | None:
         return await session.get(BotError, pk)
 
 
+async def get_groups(
+    *, limit: int = 10, offset: int = 0, resolved: bool | None = False
+) -> list[BotErrorGroup]:
+    """Группы ошибок, свежие сверху (групп — сотни, OFFSET тут дёшев)."""
+    async with async_session_factory() as session:
+        stmt = select(BotErrorGroup).order_by(BotErrorGroup.last_seen.desc())
+        if resolved is not None:
+            stmt = stmt.where(BotErrorGroup.resolved == resolved)
+        result = await session.execute(stmt.offset(offset).limit(limit))
+        return list(result.scalars().all())
+
+
+async def get_group(fingerprint: str) -> BotErrorGroup | None:
+    """Группа по отпечатку."""
+    async with async_session_factory() as session:
+        return await session.get(BotErrorGroup, fingerprint)
+
+
 async def get_stats() -> dict[str, Any]:
-    """Статистика ошибок: кол-во за 24ч, 7д, всего (по уровням)."""
+    """
+    Статистика по bot_error_group (без скана bot_error): нерешённые группы
+    и их события, активные группы по уровням за 24ч, за 7д.
+    """
     now = _now_kgd()
     day_ago = now - timedelta(hours=24)
     week_ago = now - timedelta(days=7)
+    unresolved = BotErrorGroup.resolved == False  # noqa: E712
 
     async with async_session_factory() as session:
-        # Общее кол-во нерешённых
-        total_q = await session.execute(
-            select(func.count()).where(BotError.resolved == False)  # noqa: E712
+        totals_q = await session.execute(
+            select(
+                func.count().filter(unresolved),
+                func.coalesce(func.sum(BotErrorGroup.count).filter(unresolved), 0),
+                func.count().filter(BotErrorGroup.last_seen >= week_ago),
+            )
         )
-        total_unresolved = total_q.scalar() or 0
+        groups_unresolved, events_unresolved, week_groups = totals_q.one()
 
-        # За 24 часа по уровням
         day_q = await session.execute(
-            select(BotError.level, func.count())
-            .where(BotError.created_at >= day_ago)
-            .group_by(BotError.level)
+            select(BotErrorGroup.level, func.count())
+            .where(BotErrorGroup.last_seen >= day_ago)
+            .group_by(BotErrorGroup.level)
         )
         day_counts = {row[0]: row[1] for row in day_q}
 
-        # За 7 дней
-        week_q = await session.execute(
-            select(func.count()).where(BotError.created_at >= week_ago)
-        )
-        week_total = week_q.scalar() or 0
-
     return {
-        "unresolved": total_unresolved,
+        "unresolved": groups_unresolved,
+        "unresolved_events": int(events_unresolved),
         "last_24h": day_counts,
-        "last_7d": week_total,
+        "last_7d": week_groups,
     }
 
 
@@ -135,29 +413,47 @@ async def get_stats() -> dict[str, Any]:
 
 
 async def mark_resolved(pk: int) -> bool:
-    """Пометить ошибку как решённую."""
+    """Пометить ошибку как решённую — вместе с её группой и образцами группы."""
     async with async_session_factory() as session:
-        result = await session.execute(
-            update(BotError).where(BotError.pk == pk).values(resolved=True)
-        )
+        err = await session.get(BotError, pk)
+        if err is None:
+            return False
+        if err.fingerprint:
+            await session.execute(
+                update(BotError)
+                .where(BotError.fingerprint == err.fingerprint)
+                .values(resolved=True)
+            )
+            await session.execute(
+                update(BotErrorGroup)
+                .where(BotErrorGroup.fingerprint == err.fingerprint)
+                .values(resolved=True)
+            )
+        else:
+            err.resolved = True
         await session.commit()
-        return result.rowcount > 0
+        return True
 
 
 async def mark_all_resolved() -> int:
-    """Пометить все нерешённые ошибки как решённые. Возвращает кол-во."""
+    """Пометить все нерешённые группы и ошибки как решённые. Возвращает кол-во групп."""
     async with async_session_factory() as session:
-        result = await session.execute(
+        await session.execute(
             update(BotError)
             .where(BotError.resolved == False)  # noqa: E712
             .values(resolved=True)
         )
+        result = await session.execute(
+            update(BotErrorGroup)
+            .where(BotErrorGroup.resolved == False)  # noqa: E712
+            .values(resolved=True)
+        )
         await session.commit()
         return result.rowcount
 
 
 async def cleanup_old(days: int = 30) -> int:
-    """Удалить решённые ошибки старше N дней. Возвращает кол-во удалённых."""
+    """Удалить решённые ошибки (и группы без событий) старше N дней. Возвращает кол-во ошибок."""
     cutoff = _now_kgd() - timedelta(days=days)
     async with async_session_factory() as session:
         result = await session.execute(
@@ -166,6 +462,12 @@ async def cleanup_old(days: int = 30) -> int:
                 BotError.created_at < cutoff,
             )
         )
+        await session.execute(
+            delete(BotErrorGroup).where(
+                BotErrorGroup.resolved == True,  # noqa: E712
+                BotErrorGroup.last_seen < cutoff,
+            )
+        )
         await session.commit()
         return result.rowcount
 
@@ -177,31 +479,30 @@ async def cleanup_old(days: int = 30) -> int:
 
 class DBErrorHandler(logging.Handler):
     """
-    Logging handler: сохраняет ERROR/CRITICAL записи в таблицу bot_error.
-    Асинхронный — планирует корутину через event loop.
-    Дедупликация: не сохраняет одинаковые сообщения чаще раза в 30 сек.
+    Logging handler: ERROR/CRITICAL → группы bot_error_group + образцы в bot_error.
+    Событие — только счётчик в памяти (UPSERT раз в FLUSH_INTERVAL);
+    образец с traceback/контекстом — не чаще SAMPLE_INTERVAL на отпечаток.
     """
 
     def __init__(self) -> None:
         super().__init__(level=logging.ERROR)
-        self._recent: dict[str, float] = {}
-        self._dedup_sec = 30.0
 
     def emit(self, record: logging.LogRecord) -> None:
-        import asyncio
-        import time
+        _ensure_flush_task()
+
+        fingerprint, exc_type, title = error_fingerprint(record)
+        _stats["events"] += 1
+        _record_occurrence(
+            fingerprint,
+            level=record.levelname,
+            logger_name=record.name,
+            exc_type=exc_type,
+            title=title,
+            seen_at=_now_kgd(),
+        )
 
-        # Дедупликация: одинаковые ошибки не чаще раза в 30 сек
-        key = f"{record.name}:{record.getMessage()[:200]}"
-        now = time.monotonic()
-        if (now - self._recent.get(key, 0)) < self._dedup_sec:
+        if not _should_sample(fingerprint):
             return
-        self._recent[key] = now
-
-        # Ограничиваем размер кеша дедупликации
-        if len(self._recent) > 500:
-            cutoff = now - self._dedup_sec
-            self._recent = {k: v for k, v in self._recent.items() if v > cutoff}
 
         # Собираем traceback если есть
         traceback_text = None
@@ -220,7 +521,8 @@ class DBErrorHandler(logging.Handler):
         try:
             loop = asyncio.get_running_loop()
             loop.create_task(
-                save_error(
+                _save_sample(
+                    fingerprint,
                     level=record.levelname,
                     logger_name=record.name,
                     message=self.format(record)[:4000],
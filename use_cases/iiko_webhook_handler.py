@@ -9,6 +9,10 @@ Use-case: обработка входящих вебхуков от iikoCloud.
   3. Для StopListUpdate (debounce = 60 сек):
      - Накапливаем org_id в буфер, сбрасываем таймер при каждом вебхуке
      - Через 60 сек тишины: fetch → diff → если есть изменения → send
+
+Основной путь — durable-очередь (use_cases/webhook_queue.py: Redis Stream +
+per-org debounce в Redis). handle_webhook() с in-process буфером ниже —
+запасной путь, когда Redis недоступен.
 """
 
 import asyncio
@@ -42,6 +46,17 @@ _pending_stoplist_org_ids: set[str] = set()  # буфер org_id между ве
 _stoplist_timer: asyncio.TimerHandle | None = None  # текущий таймер
 _stoplist_bot_ref: Any = None  # ссылка на bot для отложенного вызова
 
+# Последний flush стоп-листа по каждой org: {org_id: {fetch, diff, send, total}} (сек)
+flush_latency: dict[str, dict[str, float]] = {}
+
+
+class StoplistFlushError(RuntimeError):
+    """Flush стоп-листа не удался для части организаций (org_ids — каких)."""
+
+    def __init__(self, org_ids: list[str]):
+        super().__init__(f"flush стоп-листа не удался: {', '.join(org_ids)}")
+        self.org_ids = org_ids
+
 
 # ═══════════════════════════════════════════════════════
 # Парсинг входящего вебхука
@@ -103,6 +118,15 @@ def has_stoplist_update(body: list[dict]) -> bool:
     return any(e.get("eventType") == "StopListUpdate" for e in body)
 
 
+def stoplist_org_ids(body: list[dict]) -> set[str]:
+    """organizationId всех StopListUpdate-событий тела вебхука."""
+    return {
+        e.get("organizationId")
+        for e in body
+        if e.get("eventType") == "StopListUpdate" and e.get("organizationId")
+    }
+
+
 # ═══════════════════════════════════════════════════════
 # Debounce: накопление и отложенный flush
 # ═══════════════════════════════════════════════════════
@@ -137,21 +161,73 @@ def _schedule_stoplist_flush(org_ids: set[str], bot: Any) -> None:
     )
 
 
-async def _flush_stoplist() -> None:
+async def flush_stoplist_org(oid: str, bot: Any) -> bool:
     """
-    Вызывается через 60 сек тишины.
-    Забираем накопленные org_ids, запускаем цикл стоп-листа, рассылаем.
-    Каждая org отправляется только подписчикам этой организации (per-org роутинг).
+    Обработать StopListUpdate одной организации: fetch → diff → рассылка
+    подписчикам этой org (per-org роутинг). True — были изменения.
+    Тайминги этапов → flush_latency[oid].
     """
-    global _stoplist_timer
+    from use_cases.stoplist import (
+        fetch_stoplist_items,
+        sync_and_diff,
+        format_stoplist_message,
+    )
+    from use_cases.pinned_stoplist_message import update_stoplist_messages_for_org
 
-    _stoplist_timer = None
-    bot = _stoplist_bot_ref
+    t0 = time.monotonic()
+    items = await fetch_stoplist_items(org_id=oid)
+    t_fetch = time.monotonic()
+    added, removed, changed, existing = await sync_and_diff(items, org_id=oid)
+    t_diff = time.monotonic()
+
+    sent = 0
+    has_changes = bool(added or removed or changed)
+    if has_changes:
+        text = format_stoplist_message(added, removed, changed, existing)
+        sent = await update_stoplist_messages_for_org(bot, text, oid)
+    t_end = time.monotonic()
+
+    flush_latency[oid] = {
+        "fetch": round(t_fetch - t0, 2),
+        "diff": round(t_diff - t_fetch, 2),
+        "send": round(t_end - t_diff, 2),
+        "total": round(t_end - t0, 2),
+    }
 
-    # Забираем и очищаем буфер
-    org_ids = _pending_stoplist_org_ids.copy()
-    _pending_stoplist_org_ids.clear()
+    if not has_changes:
+        logger.info(
+            "[%s] Стоп-лист без изменений (org=%s, %.2f сек), пропускаем",
+            LABEL,
+            oid,
+            t_end - t0,
+        )
+        return False
+
+    logger.info(
+        "[%s] org=%s: +%d -%d ~%d =%d, отправлено %d пользователям "
+        "(fetch %.2f / diff %.2f / send %.2f сек)",
+        LABEL,
+        oid,
+        len(added),
+        len(removed),
+        len(changed),
+        len(existing),
+        sent,
+        t_fetch - t0,
+        t_diff - t_fetch,
+        t_end - t_diff,
+    )
+    return True
 
+
+async def flush_stoplist_orgs(org_ids: set[str], bot: Any) -> None:
+    """
+    Flush нескольких организаций параллельно: каждая org → своё сообщение →
+    своим подписчикам. Ошибка одной org не мешает остальным, но после
+    обработки всех → StoplistFlushError со списком упавших (очередь
+    webhook_queue повторит их позже).
+    Пустой org_ids → все привязанные организации.
+    """
     # BUG4 FIX: fallback ДО early-return (раньше был мёртвый код после return)
     if not org_ids:
         from use_cases.cloud_org_mapping import get_all_cloud_org_ids
@@ -169,56 +245,57 @@ async def _flush_stoplist() -> None:
     )
     t0 = time.monotonic()
 
-    try:
-        from use_cases.stoplist import (
-            fetch_stoplist_items,
-            sync_and_diff,
-            format_stoplist_message,
-        )
-        from use_cases.pinned_stoplist_message import update_stoplist_messages_for_org
-
-        any_changes = False
-
-        # BUG1 FIX: каждая org → своё сообщение → своим подписчикам
-        for oid in org_ids:
-            items = await fetch_stoplist_items(org_id=oid)
-            added, removed, changed, existing = await sync_and_diff(items, org_id=oid)
-            has_changes = bool(added or removed or changed)
-
-            if not has_changes:
-                logger.info(
-                    "[%s] Стоп-лист без изменений (org=%s), пропускаем",
-                    LABEL,
-                    oid,
-                )
-                continue
-
-            any_changes = True
-            text = format_stoplist_message(added, removed, changed, existing)
-            sent = await update_stoplist_messages_for_org(bot, text, oid)
-            logger.info(
-                "[%s] org=%s: +%d -%d ~%d =%d, отправлено %d пользователям",
+    oids = sorted(org_ids)
+    results = await asyncio.gather(
+        *(flush_stoplist_org(oid, bot) for oid in oids), return_exceptions=True
+    )
+    failed: list[str] = []
+    for oid, res in zip(oids, results):
+        if isinstance(res, BaseException):
+            failed.append(oid)
+            logger.error(
+                "[%s] Ошибка при flush стоп-листа (org=%s)",
                 LABEL,
                 oid,
-                len(added),
-                len(removed),
-                len(changed),
-                len(existing),
-                sent,
+                exc_info=res,
             )
 
-        if not any_changes:
-            logger.info(
-                "[%s] Стоп-лист без изменений по всем org(s) за %.1f сек",
-                LABEL,
-                time.monotonic() - t0,
-            )
-        else:
-            logger.info(
-                "[%s] Flush завершён за %.1f сек",
-                LABEL,
-                time.monotonic() - t0,
-            )
+    if not any(res is True for res in results):
+        logger.info(
+            "[%s] Стоп-лист без изменений по всем org(s) за %.1f сек",
+            LABEL,
+            time.monotonic() - t0,
+        )
+    else:
+        logger.info(
+            "[%s] Flush завершён за %.1f сек",
+            LABEL,
+            time.monotonic() - t0,
+        )
+    if failed:
+        raise StoplistFlushError(failed)
+
+
+async def _flush_stoplist() -> None:
+    """
+    Вызывается через 60 сек тишины (in-process debounce — запасной путь,
+    когда очередь webhook_queue недоступна).
+    Забираем накопленные org_ids и обрабатываем их параллельно.
+    """
+    global _stoplist_timer
+
+    _stoplist_timer = None
+    bot = _stoplist_bot_ref
+
+    # Забираем и очищаем буфер
+    org_ids = _pending_stoplist_org_ids.copy()
+    _pending_stoplist_org_ids.clear()
+
+    try:
+        await flush_stoplist_orgs(org_ids, bot)
+    except StoplistFlushError as exc:
+        # Трейсбеки по каждой org уже в логе; повтора у запасного пути нет
+        logger.warning("[%s] %s", LABEL, exc)
     except Exception:
         logger.exception("[%s] Ошибка при flush стоп-листа", LABEL)
 
@@ -402,12 +479,7 @@ async def handle_webhook(body: list[dict], bot: Any) -> dict[str, Any]:
 
     # ── StopListUpdate → debounce (60 сек) ──
     if has_stoplist_update(body):
-        event_org_ids = {
-            e.get("organizationId")
-            for e in body
-            if e.get("eventType") == "StopListUpdate" and e.get("organizationId")
-        }
-        _schedule_stoplist_flush(event_org_ids, bot)
+        _schedule_stoplist_flush(stoplist_org_ids(body), bot)
         result["stoplist_updated"] = True  # запланировано
 
     # ── Закрытые заказы → только логируем (остатки отправляются по кнопке) ──
@@ -24,7 +24,7 @@ logger = logging.getLogger(__name__)
 CACHE_TTL = 600  # 10 минут
 PRODUCTS_TTL = 600  # 10 минут (номенклатура по дереву)
 
-_cache = TtlCache(default_ttl=CACHE_TTL)
+_cache = TtlCache(default_ttl=CACHE_TTL, name="invoice")
 
 
 # ── Контрагенты (suppliers) ──
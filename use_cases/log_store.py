@@ -1,27 +1,46 @@
 """
 Use-case: хранилище ВСЕХ логов бота в БД (таблица bot_log).
 
-Буферизованный logging handler: копит записи и пишет batch INSERT
-каждые FLUSH_INTERVAL секунд или при накоплении FLUSH_SIZE записей.
+Запись: logging handler кладёт кортеж в ограниченный буфер, фоновый
+writer сливает его пачками через asyncpg COPY (без ORM-объектов на строку).
+Backpressure: буфер ≥ FLUSH_SIZE → writer будится сразу; буфер полон →
+INFO/DEBUG отбрасываются, WARNING+ — ещё PRIORITY_RESERVE записей сверху.
+Всё отброшенное считается (get_sink_stats), а не теряется молча.
+
+bot_log секционирована: LIST (level) → bot_log_info / _warning / _error,
+каждая — RANGE (created_at) по дням (bot_log_<группа>_pYYYYMMDD) + DEFAULT.
+Retention — DROP секций старше срока вместо больших DELETE.
+
+Чтение: keyset-пагинация по (created_at, pk) вместо OFFSET, поиск ILIKE
+по GIN-индексам pg_trgm (см. db/init_db.MIGRATIONS). Счётчики по часу ×
+уровню (bot_log_hourly) пополняет writer в транзакции COPY — get_stats()
+и итоги списка без поиска не сканируют bot_log.
 
 Публичный API:
-  get_recent()       — последние N записей (фильтр по уровню, логгеру, поиск)
-  get_stats()        — кол-во логов по уровням за 24ч / 7д
-  cleanup_logs()     — удалить старые: INFO 3д, WARNING 14д, ERROR 90д
+  get_recent()       — страница записей (фильтр по уровню, логгеру, поиск, курсор)
+  encode_cursor() / decode_cursor() — курсор страницы для callback_data
+  get_stats()        — кол-во логов по уровням за 24ч / 7д (из bot_log_hourly)
+  cleanup_logs()     — retention: INFO 3д, WARNING 14д, ERROR 90д (DROP секций)
+  ensure_partitions() — создать дневные секции на сегодня + DAYS_AHEAD
+  flush_pending()    — слить буфер (при остановке бота)
+  get_sink_stats()   — записано / отброшено / ошибки COPY / размер буфера
 """
 
 import asyncio
 import logging
+import re
+import threading
 import time
 import traceback as tb_module
 from collections import deque
 from datetime import datetime, timedelta
 from typing import Any
 
-from sqlalchemy import delete, func, select
+from sqlalchemy import delete, func, select, text, tuple_
 
-from db.engine import async_session_factory
-from db.models import BotLog, _now_kgd
+from db.engine import async_session_factory, engine
+from db.models import BotLog, BotLogHourly, _KGD_TZ, _now_kgd
+from use_cases._helpers import Cursor, ilike_pattern
 
 logger = logging.getLogger(__name__)
 
@@ -29,8 +48,10 @@ logger = logging.getLogger(__name__)
 # Настройки буфера
 # ═══════════════════════════════════════════════════════
 
-FLUSH_INTERVAL = 5.0  # секунд между flush
-FLUSH_SIZE = 50  # макс записей до принудительного flush
+FLUSH_INTERVAL = 1.0  # секунд между flush
+FLUSH_SIZE = 2000  # строк в одном COPY; столько в буфере — flush сразу
+MAX_BUFFER = 20_000  # дальше INFO/DEBUG отбрасываются
+PRIORITY_RESERVE = 2_000  # сверх MAX_BUFFER — только WARNING+
 
 # Retention (дней) по уровням
 RETENTION = {
@@ -41,70 +62,177 @@ RETENTION = {
     "CRITICAL": 90,
 }
 
+# Секции bot_log по уровням (см. db/init_db.MIGRATIONS); срок группы — max по уровням
+LEVEL_GROUPS: dict[str, tuple[str, ...]] = {
+    "info": ("DEBUG", "INFO"),
+    "warning": ("WARNING",),
+    "error": ("ERROR", "CRITICAL"),
+}
+DAYS_AHEAD = 2
+_PARTITION_RE = re.compile(r"^bot_log_(\w+)_p(\d{8})$")
+
+_COLUMNS = ("created_at", "level", "logger_name", "message", "traceback")
+_PRIORITY_LEVELS = frozenset({"WARNING", "ERROR", "CRITICAL"})
+
 
 # ═══════════════════════════════════════════════════════
-# Буферизованная запись
+# Буферизованная запись (COPY)
 # ═══════════════════════════════════════════════════════
 
-_buffer: deque[dict[str, Any]] = deque(maxlen=2000)
+_buffer: deque[tuple] = deque()
 _flush_lock = asyncio.Lock()
 _flush_task: asyncio.Task | None = None
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_thread: int | None = None
+_wakeup: asyncio.Event | None = None
+_wakeup_pending = False
+
+_stats: dict[str, Any] = {
+    "written": 0,
+    "copies": 0,
+    "dropped_overflow": 0,
+    "dropped_failed": 0,
+    "flush_errors": 0,
+    "last_copy_ms": 0.0,
+    "last_error": None,
+}
+
+
+_UPSERT_HOURLY = """
+    INSERT INTO bot_log_hourly (hour, level, cnt)
+    SELECT * FROM unnest($1::timestamp[], $2::varchar[], $3::bigint[])
+    ON CONFLICT (hour, level) DO UPDATE SET cnt = bot_log_hourly.cnt + EXCLUDED.cnt
+"""
+
+
+def _hourly_counts(rows: list[tuple]) -> tuple[list, list, list]:
+    """Пачка строк → колонки (hour, level, cnt) для unnest в bot_log_hourly."""
+    counts: dict[tuple[datetime, str], int] = {}
+    for row in rows:
+        key = (row[0].replace(minute=0, second=0, microsecond=0), row[1])
+        counts[key] = counts.get(key, 0) + 1
+    hours, levels = zip(*counts) if counts else ((), ())
+    return list(hours), list(levels), list(counts.values())
+
+
+async def _copy_rows(rows: list[tuple]) -> None:
+    """COPY пачки в bot_log + счётчики bot_log_hourly одной транзакцией (asyncpg)."""
+    async with engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        driver = raw.driver_connection
+        async with driver.transaction():
+            await driver.copy_records_to_table(
+                "bot_log", records=rows, columns=_COLUMNS
+            )
+            await driver.execute(_UPSERT_HOURLY, *_hourly_counts(rows))
 
 
-async def _flush_buffer() -> None:
-    """Записать накопленный буфер в БД одним batch INSERT."""
+async def _flush_buffer() -> bool:
+    """Слить из буфера до FLUSH_SIZE строк одним COPY. False — COPY упал."""
     if not _buffer:
-        return
+        return True
 
     async with _flush_lock:
-        # Забираем всё из буфера
         batch = []
-        while _buffer:
+        while _buffer and len(batch) < FLUSH_SIZE:
             batch.append(_buffer.popleft())
+        if not batch:
+            return True
 
-    if not batch:
-        return
-
-    try:
-        async with async_session_factory() as session:
-            session.add_all([BotLog(**row) for row in batch])
-            await session.commit()
-    except Exception:
-        # Не логируем — мы внутри logging handler, рекурсия
-        pass
+        t0 = time.perf_counter()
+        try:
+            await _copy_rows(batch)
+        except Exception as exc:
+            # Не логируем — мы внутри logging handler, рекурсия
+            _stats["flush_errors"] += 1
+            _stats["last_error"] = f"{type(exc).__name__}: {exc}"[:300]
+            # Вернуть пачку в голову буфера, если влезает; иначе — в счётчик
+            if len(_buffer) + len(batch) <= MAX_BUFFER:
+                _buffer.extendleft(reversed(batch))
+            else:
+                _stats["dropped_failed"] += len(batch)
+            return False
+
+        _stats["written"] += len(batch)
+        _stats["copies"] += 1
+        _stats["last_copy_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        return True
+
+
+async def _drain() -> None:
+    """Сливать буфер пачками, пока не опустеет (или пока COPY падает)."""
+    while _buffer:
+        if not await _flush_buffer():
+            return
 
 
 async def _periodic_flush() -> None:
-    """Фоновая задача: flush буфера каждые FLUSH_INTERVAL секунд."""
+    """Фоновый writer: flush каждые FLUSH_INTERVAL сек или по сигналу буфера."""
+    global _wakeup_pending
     while True:
-        await asyncio.sleep(FLUSH_INTERVAL)
         try:
-            await _flush_buffer()
+            await asyncio.wait_for(_wakeup.wait(), FLUSH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+        _wakeup_pending = False
+        try:
+            await _drain()
         except Exception:
             pass
 
 
 def _ensure_flush_task() -> None:
-    """Создать фоновую задачу flush (если ещё нет)."""
-    global _flush_task
+    """Создать фоновый writer (если ещё нет). Только из потока event loop."""
+    global _flush_task, _loop, _loop_thread, _wakeup
     if _flush_task is not None and not _flush_task.done():
         return
     try:
         loop = asyncio.get_running_loop()
-        _flush_task = loop.create_task(_periodic_flush(), name="log_store_flush")
     except RuntimeError:
-        pass
+        return
+    _loop = loop
+    _loop_thread = threading.get_ident()
+    _wakeup = asyncio.Event()
+    _flush_task = loop.create_task(_periodic_flush(), name="log_store_flush")
 
 
-def _enqueue(row: dict[str, Any]) -> None:
-    """Добавить запись в буфер. Если буфер полон — flush."""
-    _buffer.append(row)
-    if len(_buffer) >= FLUSH_SIZE:
+def _signal_writer() -> None:
+    """Разбудить writer (потокобезопасно: логи пишут и из to_thread)."""
+    global _wakeup_pending
+    if _wakeup_pending or _loop is None or _wakeup is None:
+        return
+    _wakeup_pending = True
+    if threading.get_ident() == _loop_thread:
+        _wakeup.set()
+    else:
         try:
-            loop = asyncio.get_running_loop()
-            loop.create_task(_flush_buffer())
+            _loop.call_soon_threadsafe(_wakeup.set)
         except RuntimeError:
-            pass
+            pass  # loop закрыт
+
+
+def _enqueue(row: tuple) -> None:
+    """Добавить запись в буфер с учётом backpressure."""
+    size = len(_buffer)
+    if size >= MAX_BUFFER and (
+        row[1] not in _PRIORITY_LEVELS or size >= MAX_BUFFER + PRIORITY_RESERVE
+    ):
+        _stats["dropped_overflow"] += 1
+        return
+    _buffer.append(row)
+    if size + 1 >= FLUSH_SIZE:
+        _signal_writer()
+
+
+async def flush_pending() -> None:
+    """Слить всё накопленное (graceful shutdown)."""
+    await _drain()
+
+
+def get_sink_stats() -> dict[str, Any]:
+    """Счётчики записи логов + текущий размер буфера."""
+    return {**_stats, "buffered": len(_buffer)}
 
 
 # ═══════════════════════════════════════════════════════
@@ -112,6 +240,42 @@ def _enqueue(row: dict[str, Any]) -> None:
 # ═══════════════════════════════════════════════════════
 
 
+_CURSOR_FMT = "%y%m%d%H%M%S%f"
+
+
+def encode_cursor(log: BotLog) -> str:
+    """Курсор записи для callback_data: «ггммддЧЧММССмкс.pk» (≤ 30 символов)."""
+    return f"{log.created_at.strftime(_CURSOR_FMT)}.{log.pk}"
+
+
+def decode_cursor(value: str) -> Cursor:
+    stamp, pk = value.split(".")
+    return datetime.strptime(stamp, _CURSOR_FMT), int(pk)
+
+
+def _filtered(
+    stmt,
+    *,
+    level: str | None,
+    logger_name: str | None,
+    search: str | None,
+    hours: int | None,
+):
+    """WHERE по фильтрам /logs. ILIKE '%…%' идёт по GIN pg_trgm (от 3 символов)."""
+    if level:
+        stmt = stmt.where(BotLog.level == level.upper())
+    if logger_name:
+        stmt = stmt.where(
+            BotLog.logger_name.ilike(ilike_pattern(logger_name), escape="\\")
+        )
+    if search:
+        stmt = stmt.where(BotLog.message.ilike(ilike_pattern(search), escape="\\"))
+    if hours:
+        since = _now_kgd() - timedelta(hours=hours)
+        stmt = stmt.where(BotLog.created_at >= since)
+    return stmt
+
+
 async def get_recent(
     *,
     limit: int = 30,
@@ -119,56 +283,65 @@ async def get_recent(
     logger_name: str | None = None,
     search: str | None = None,
     hours: int | None = None,
-    offset: int = 0,
+    before: Cursor | None = None,
+    after: Cursor | None = None,
 ) -> list[BotLog]:
-    """Последние логи с фильтрами."""
+    """
+    Страница логов, новые сверху. Keyset: before — записи старше курсора
+    (следующая страница), after — новее (предыдущая); без курсора — первая.
+    """
+    key = tuple_(BotLog.created_at, BotLog.pk)
+    stmt = _filtered(
+        select(BotLog),
+        level=level,
+        logger_name=logger_name,
+        search=search,
+        hours=hours,
+    )
+    if after is not None:
+        stmt = stmt.where(key > tuple_(*after)).order_by(BotLog.created_at, BotLog.pk)
+    else:
+        if before is not None:
+            stmt = stmt.where(key < tuple_(*before))
+        stmt = stmt.order_by(BotLog.created_at.desc(), BotLog.pk.desc())
+
     async with async_session_factory() as session:
-        stmt = select(BotLog).order_by(BotLog.created_at.desc())
-
-        if level:
-            stmt = stmt.where(BotLog.level == level.upper())
-        if logger_name:
-            stmt = stmt.where(BotLog.logger_name.ilike(f"%{logger_name}%"))
-        if search:
-            stmt = stmt.where(BotLog.message.ilike(f"%{search}%"))
-        if hours:
-            since = _now_kgd() - timedelta(hours=hours)
-            stmt = stmt.where(BotLog.created_at >= since)
-
-        stmt = stmt.offset(offset).limit(limit)
-        result = await session.execute(stmt)
-        return list(result.scalars().all())
+        result = await session.execute(stmt.limit(limit))
+        logs = list(result.scalars().all())
+    if after is not None:
+        logs.reverse()
+    return logs
 
 
 async def get_stats() -> dict[str, Any]:
-    """Статистика логов: кол-во по уровням за 24ч и 7д."""
-    now = _now_kgd()
+    """Статистика логов по bot_log_hourly: по уровням за 24ч, за 7д, всего (точность — час)."""
+    now = _now_kgd().replace(minute=0, second=0, microsecond=0)
     day_ago = now - timedelta(hours=24)
     week_ago = now - timedelta(days=7)
 
     async with async_session_factory() as session:
-        # За 24 часа по уровням
         day_q = await session.execute(
-            select(BotLog.level, func.count())
-            .where(BotLog.created_at >= day_ago)
-            .group_by(BotLog.level)
+            select(BotLogHourly.level, func.sum(BotLogHourly.cnt))
+            .where(BotLogHourly.hour >= day_ago)
+            .group_by(BotLogHourly.level)
         )
-        day_counts = {row[0]: row[1] for row in day_q}
-
-        # За 7 дней
-        week_q = await session.execute(
-            select(func.count()).where(BotLog.created_at >= week_ago)
+        day_counts = {row[0]: int(row[1]) for row in day_q}
+
+        totals_q = await session.execute(
+            select(
+                func.coalesce(
+                    func.sum(BotLogHourly.cnt).filter(BotLogHourly.hour >= week_ago),
+                    0,
+                ),
+                func.coalesce(func.sum(BotLogHourly.cnt), 0),
+            )
         )
-        week_total = week_q.scalar() or 0
-
-        # Общее кол-во
-        total_q = await session.execute(select(func.count()).select_from(BotLog))
-        total = total_q.scalar() or 0
+        week_total, total = totals_q.one()
 
     return {
         "last_24h": day_counts,
-        "last_7d": week_total,
-        "total": total,
+        "last_7d": int(week_total),
+        "total": int(total),
     }
 
 
@@ -179,26 +352,38 @@ async def count_by_filter(
     search: str | None = None,
     hours: int | None = None,
 ) -> int:
-    """Подсчёт записей по фильтрам (для пагинации)."""
+    """
+    Подсчёт записей по фильтрам (итог в заголовке списка). Без текстовых
+    фильтров — сумма bot_log_hourly (hours округляется до часа).
+    """
     async with async_session_factory() as session:
-        stmt = select(func.count()).select_from(BotLog)
-        if level:
-            stmt = stmt.where(BotLog.level == level.upper())
-        if logger_name:
-            stmt = stmt.where(BotLog.logger_name.ilike(f"%{logger_name}%"))
-        if search:
-            stmt = stmt.where(BotLog.message.ilike(f"%{search}%"))
-        if hours:
-            since = _now_kgd() - timedelta(hours=hours)
-            stmt = stmt.where(BotLog.created_at >= since)
+        if not (logger_name or search):
+            stmt = select(func.coalesce(func.sum(BotLogHourly.cnt), 0))
+            if level:
+                stmt = stmt.where(BotLogHourly.level == level.upper())
+            if hours:
+                since = _now_kgd() - timedelta(hours=hours)
+                stmt = stmt.where(
+                    BotLogHourly.hour
+                    >= since.replace(minute=0, second=0, microsecond=0)
+                )
+        else:
+            stmt = _filtered(
+                select(func.count()).select_from(BotLog),
+                level=level,
+                logger_name=logger_name,
+                search=search,
+                hours=hours,
+            )
         result = await session.execute(stmt)
-        return result.scalar() or 0
+        return int(result.scalar() or 0)
 
 
 async def get_log_entry(pk: int) -> BotLog | None:
     """Получить одну запись лога по ID."""
     async with async_session_factory() as session:
-        return await session.get(BotLog, pk)
+        result = await session.execute(select(BotLog).where(BotLog.pk == pk))
+        return result.scalars().first()
 
 
 # ═══════════════════════════════════════════════════════
@@ -206,17 +391,76 @@ async def get_log_entry(pk: int) -> BotLog | None:
 # ═══════════════════════════════════════════════════════
 
 
+async def ensure_partitions(days_ahead: int = DAYS_AHEAD) -> int:
+    """Создать дневные секции bot_log на сегодня + days_ahead. Возвращает кол-во новых."""
+    async with async_session_factory() as session:
+        result = await session.execute(
+            text("SELECT bot_log_ensure_partitions(:base, :ahead)"),
+            {"base": _now_kgd().date(), "ahead": days_ahead},
+        )
+        await session.commit()
+        return result.scalar() or 0
+
+
+def _group_retention() -> dict[str, int]:
+    return {
+        group: max(RETENTION[level] for level in levels)
+        for group, levels in LEVEL_GROUPS.items()
+    }
+
+
+def _expired_partitions(names: list[str], now: datetime) -> list[str]:
+    """Дневные секции, целиком старше retention своей группы."""
+    retention = _group_retention()
+    expired = []
+    for name in names:
+        match = _PARTITION_RE.match(name)
+        if not match or match.group(1) not in retention:
+            continue
+        day = datetime.strptime(match.group(2), "%Y%m%d").date()
+        cutoff = (now - timedelta(days=retention[match.group(1)])).date()
+        if day < cutoff:
+            expired.append(name)
+    return sorted(expired)
+
+
 async def cleanup_logs() -> dict[str, int]:
     """
-    Удалить старые логи по retention-политике.
-    Возвращает кол-во удалённых по уровням.
+    Retention-политика: DROP дневных секций старше срока группы, затем
+    DELETE по уровням — он доходит только до DEFAULT-секций (партиции
+    старше cutoff уже удалены). Возвращает кол-во удалённых строк по уровням
+    + "partitions" — сколько секций удалено.
     """
     now = _now_kgd()
-    deleted = {}
+    deleted: dict[str, int] = {}
 
     async with async_session_factory() as session:
+        names = (
+            (
+                await session.execute(
+                    text(
+                        "SELECT c.relname FROM pg_inherits i "
+                        "JOIN pg_class c ON c.oid = i.inhrelid "
+                        "JOIN pg_class p ON p.oid = i.inhparent "
+                        "WHERE p.relname = ANY(:parents)"
+                    ),
+                    {"parents": [f"bot_log_{group}" for group in LEVEL_GROUPS]},
+                )
+            )
+            .scalars()
+            .all()
+        )
+        expired = _expired_partitions(list(names), now)
+        for name in expired:
+            await session.execute(text(f'DROP TABLE IF EXISTS "{name}"'))
+        if expired:
+            deleted["partitions"] = len(expired)
+
         for level_name, days in RETENTION.items():
-            cutoff = now - timedelta(days=days)
+            # По границе суток: неполная дневная секция доживёт до DROP завтра
+            cutoff = (now - timedelta(days=days)).replace(
+                hour=0, minute=0, second=0, microsecond=0
+            )
             result = await session.execute(
                 delete(BotLog).where(
                     BotLog.level == level_name,
@@ -225,6 +469,12 @@ async def cleanup_logs() -> dict[str, int]:
             )
             if result.rowcount:
                 deleted[level_name] = result.rowcount
+            await session.execute(
+                delete(BotLogHourly).where(
+                    BotLogHourly.level == level_name,
+                    BotLogHourly.hour < cutoff,
+                )
+            )
         await session.commit()
 
     return deleted
@@ -238,7 +488,7 @@ async def cleanup_logs() -> dict[str, int]:
 class DBLogHandler(logging.Handler):
     """
     Logging handler: ВСЕ логи (INFO+) → таблица bot_log.
-    Буферизованный: пишет batch INSERT каждые 5 сек / 50 записей.
+    Буферизованный: writer пишет COPY раз в секунду / по FLUSH_SIZE записей.
     """
 
     def __init__(self) -> None:
@@ -257,14 +507,23 @@ class DBLogHandler(logging.Handler):
             traceback_text = "".join(tb_module.format_exception(*record.exc_info))
             if traceback_text:
                 traceback_text = traceback_text[:20_000]
-
+        elif record.stack_info:
+            # stack_info (сторож event loop) — в traceback, а не в message
+            traceback_text = record.stack_info[:20_000]
+            record = logging.makeLogRecord({**record.__dict__, "stack_info": None})
+
+        # Время события, а не flush (калининградское, без tzinfo — как в колонке)
+        created_at = datetime.fromtimestamp(record.created, _KGD_TZ).replace(
+            tzinfo=None
+        )
         _enqueue(
-            {
-                "level": record.levelname[:10],
-                "logger_name": record.name[:300],
-                "message": self.format(record)[:4000],
-                "traceback": traceback_text,
-            }
+            (
+                created_at,
+                record.levelname[:10],
+                record.name[:300],
+                self.format(record)[:4000],
+                traceback_text,
+            )
         )
 
 
@@ -0,0 +1,63 @@
+"""
+Use-case: сводка блокировок event loop для /lag (сисадмины).
+
+Отчёты пишет сторож utils/loop_watchdog.py — WARNING логгера «loop_stall»
+в bot_log, стек в колонке traceback. Здесь они читаются за последние часы
+и сводятся по месту блокировки: где loop держали дольше всего в сумме.
+"""
+
+from typing import Any
+
+from use_cases import log_store
+from utils.loop_watchdog import STALL_LOGGER, parse_stall
+
+MAX_RECORDS = 500  # записей за период — больше не читаем (REPORTS_PER_MINUTE)
+
+
+def summarize_stalls(logs: list, *, top: int = 5, recent: int = 5) -> dict[str, Any]:
+    """Записи bot_log сторожа (новые сверху) → итоги, топ мест, последние."""
+    parsed = [
+        (log, found)
+        for log in logs
+        if (found := parse_stall(log.message or "")) is not None
+    ]
+    places: dict[str, dict[str, Any]] = {}
+    for _, (ms, where, task) in parsed:
+        place = places.setdefault(
+            where,
+            {"where": where, "task": task, "count": 0, "total_ms": 0, "max_ms": 0},
+        )
+        place["count"] += 1
+        place["total_ms"] += ms
+        place["max_ms"] = max(place["max_ms"], ms)
+    return {
+        "count": len(parsed),
+        "total_ms": sum(ms for _, (ms, _, _) in parsed),
+        "max_ms": max((ms for _, (ms, _, _) in parsed), default=0),
+        "places": sorted(places.values(), key=lambda p: p["total_ms"], reverse=True)[
+            :top
+        ],
+        "recent": [
+            {
+                "pk": log.pk,
+                "created_at": log.created_at,
+                "ms": ms,
+                "where": where,
+                "task": task,
+                "has_stack": bool(log.traceback),
+            }
+            for log, (ms, where, task) in parsed[:recent]
+        ],
+        "truncated": len(logs) >= MAX_RECORDS,
+    }
+
+
+async def get_stall_summary(hours: int = 24) -> dict[str, Any]:
+    """Сводка блокировок loop за hours часов (из bot_log)."""
+    logs = await log_store.get_recent(
+        limit=MAX_RECORDS,
+        level="WARNING",
+        logger_name=STALL_LOGGER,
+        hours=hours,
+    )
+    return summarize_stalls(logs)
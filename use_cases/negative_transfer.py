@@ -28,6 +28,7 @@ import logging
 import re
 import time
 from collections import defaultdict
+from collections.abc import Awaitable, Callable
 from datetime import datetime
 from typing import Any
 
@@ -37,13 +38,15 @@ from adapters import iiko_api
 from db.engine import async_session_factory
 from db.models import Entity, Product, Store, SyncLog
 from use_cases._helpers import now_kgd, safe_float
+from use_cases.redis_lock import DistributedLock
 
 logger = logging.getLogger(__name__)
 
 LABEL = "NegativeTransfer"
 
-# asyncio.Lock — защита от двойного запуска (например, ручной и по расписанию)
-_SYNC_LOCK = asyncio.Lock()
+# DistributedLock(LOCK_NAME) — защита от двойного запуска (ручной и по расписанию,
+# в любой из реплик)
+LOCK_NAME = "negative_transfer"
 
 
 # ═══════════════════════════════════════════════════════
@@ -308,9 +311,12 @@ def _collect_negative_items(
 
 async def run_negative_transfer_all_restaurants(
     triggered_by: str = "scheduler",
+    guard: Callable[[], Awaitable[None]] | None = None,
 ) -> dict[str, Any]:
     """
     Авто-перемещение отрицательных остатков расходных материалов по всем ресторанам.
+    guard — проверка перед отправкой каждого документа в iiko
+    (DistributedLock.ensure_held): lock потерян → прогон прерывается.
 
     Возвращает словарь с итогами:
       {
@@ -539,6 +545,8 @@ async def run_negative_transfer_all_restaurants(
                     ),
                 )
 
+                if guard is not None:
+                    await guard()  # LockLost → КРИТИЧЕСКАЯ ОШИБКА, без отправки
                 try:
                     doc = {
                         "dateIncoming": now_kgd().strftime("%Y-%m-%dT%H:%M:%S"),
@@ -647,14 +655,19 @@ async def run_negative_transfer_once(
     triggered_by: str = "scheduler",
 ) -> dict[str, Any]:
     """
-    Запуск авто-перемещения с защитой от дублирования (asyncio.Lock).
+    Запуск авто-перемещения с защитой от дублирования (DistributedLock).
     Если уже запущено — немедленно возвращает {"status": "locked"}.
     """
-    if _SYNC_LOCK.locked():
+    lock = DistributedLock(LOCK_NAME)
+    if not await lock.acquire_nowait():
         logger.warning(
             "[%s] Уже запущено, пропускаю (triggered_by=%s)", LABEL, triggered_by
         )
         return {"status": "locked"}
 
-    async with _SYNC_LOCK:
-        return await run_negative_transfer_all_restaurants(triggered_by=triggered_by)
+    try:
+        return await run_negative_transfer_all_restaurants(
+            triggered_by=triggered_by, guard=lock.ensure_held
+        )
+    finally:
+        await lock.release()
@@ -0,0 +1,158 @@
+"""
+Use-case: кеш результатов OCR по содержимому фото (таблица ocr_result_cache).
+
+Сотрудники часто присылают те же фото повторно (после ошибки маппинга,
+отменённой пачки) — и каждый раз платили за полный вызов GPT Vision.
+
+Ключ — content_hash: sha256 нормализованного JPEG (utils/image_prep, тот же
+проход, что и JPEG для модели). Выдаётся только точное совпадение: близость
+по перцептивному хешу не отличает УПД одного шаблона с другим номером или
+суммой — «похожее» фото получило бы чужой документ.
+
+Запись привязана к CACHE_MODEL_KEY (модель + хеш промпта + версия
+нормализации) — смена промпта или модели даёт промах, а не старый JSON.
+Ошибки кеша никогда не ломают OCR: lookup → None, store → warning.
+
+Публичный API:
+  lookup(content_hash)        — нормализованный результат или None
+  store(content_hash, result)
+  cleanup_expired()           — удалить записи с истёкшим TTL (03:20)
+  get_stats()                 — счётчики и hit rate процесса
+
+Распознать заново мимо кеша — process_photo_batch / PhotoStream(use_cache=False).
+"""
+
+import hashlib
+import logging
+from datetime import timedelta
+from typing import Any
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from adapters.gpt5_vision_ocr import OCR_MODEL, SYSTEM_PROMPT
+from config import OCR_CACHE_ENABLED, OCR_CACHE_TTL_DAYS
+from db.engine import async_session_factory
+from models.ocr import OcrResultCache
+from use_cases._helpers import now_kgd
+from utils.metrics import CACHE_HITS, CACHE_MISSES
+
+logger = logging.getLogger(__name__)
+
+# Бампать при изменении ocr_pipeline._normalize_invoice_result
+NORMALIZE_VERSION = 1
+CACHE_MODEL_KEY = (
+    f"{OCR_MODEL}:{hashlib.sha256(SYSTEM_PROMPT.encode()).hexdigest()[:8]}"
+    f":v{NORMALIZE_VERSION}"
+)
+
+_stats = {
+    "lookups": 0,
+    "hits": 0,
+    "misses": 0,
+    "stores": 0,
+    "errors": 0,
+}
+
+_HITS = CACHE_HITS.labels("ocr_result")
+_MISSES = CACHE_MISSES.labels("ocr_result")
+
+
+def is_enabled() -> bool:
+    return OCR_CACHE_ENABLED
+
+
+async def lookup(content_hash: str) -> dict[str, Any] | None:
+    """Результат из кеша (копия с пометкой _cache) или None."""
+    if not content_hash:
+        return None
+    _stats["lookups"] += 1
+    now = now_kgd()
+    try:
+        async with async_session_factory() as session:
+            row = (
+                await session.execute(
+                    select(OcrResultCache.id, OcrResultCache.result).where(
+                        OcrResultCache.content_hash == content_hash,
+                        OcrResultCache.model == CACHE_MODEL_KEY,
+                        OcrResultCache.expires_at > now,
+                    )
+                )
+            ).first()
+            if row is None:
+                _stats["misses"] += 1
+                _MISSES.inc()
+                return None
+
+            await session.execute(
+                update(OcrResultCache)
+                .where(OcrResultCache.id == row.id)
+                .values(hits=OcrResultCache.hits + 1, last_hit_at=now)
+            )
+            await session.commit()
+    except Exception:
+        _stats["errors"] += 1
+        logger.warning("[ocr_cache] lookup failed", exc_info=True)
+        return None
+
+    _stats["hits"] += 1
+    _HITS.inc()
+    logger.info("[ocr_cache] hit %s", content_hash[:12])
+    # токены и время оплачены при записи — в учёт документа не идут
+    result = {
+        k: v
+        for k, v in row.result.items()
+        if k not in ("_usage", "_latency_sec", "_attempts")
+    }
+    result["_cache"] = "exact"
+    return result
+
+
+async def store(content_hash: str, result: dict[str, Any]) -> None:
+    """Сохранить нормализованный результат (ошибки распознавания не кешируются)."""
+    if not content_hash or result.get("error"):
+        return
+    now = now_kgd()
+    values = {
+        "content_hash": content_hash,
+        "model": CACHE_MODEL_KEY,
+        "result": {k: v for k, v in result.items() if k != "_cache"},
+        "created_at": now,
+        "expires_at": now + timedelta(days=OCR_CACHE_TTL_DAYS),
+    }
+    stmt = pg_insert(OcrResultCache).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[OcrResultCache.content_hash],
+        set_={
+            k: stmt.excluded[k] for k in ("model", "result", "created_at", "expires_at")
+        },
+    )
+    try:
+        async with async_session_factory() as session:
+            await session.execute(stmt)
+            await session.commit()
+        _stats["stores"] += 1
+    except Exception:
+        _stats["errors"] += 1
+        logger.warning("[ocr_cache] store failed", exc_info=True)
+
+
+async def cleanup_expired() -> int:
+    """Удалить записи с истёкшим TTL. Возвращает кол-во удалённых."""
+    async with async_session_factory() as session:
+        result = await session.execute(
+            delete(OcrResultCache).where(OcrResultCache.expires_at <= now_kgd())
+        )
+        await session.commit()
+        return result.rowcount
+
+
+def get_stats() -> dict[str, Any]:
+    """Счётчики процесса + hit rate (доля попаданий среди lookup)."""
+    hits = _stats["hits"]
+    lookups = _stats["lookups"]
+    return {
+        **_stats,
+        "enabled": OCR_CACHE_ENABLED,
+        "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+    }
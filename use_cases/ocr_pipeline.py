@@ -10,18 +10,25 @@ Flow:
 6. Проверка полноты страниц
 7. Объединение страниц
 8. Возврат JSON результатов
+
+process_photo_batch — все фото уже на руках; PhotoStream — альбом:
+шаги 1-3 идут по мере прихода фото, 4-8 — после закрытия альбома.
+PhotoStream(one_document=True) — альбом заранее помечен как страницы одного
+документа (подпись «страницы»): фото только готовятся по приходу, в GPT
+уходит один запрос на все страницы (recognize_pages) при закрытии альбома.
 """
 
 import asyncio
+import hashlib
 import logging
 import time
-from typing import List, Dict, Any, Optional
+from typing import Awaitable, List, Dict, Any, Optional
 from dataclasses import dataclass, field
 from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 
-from adapters.gpt5_vision_ocr import recognize_document
-from utils.photo_validator import validate_photo, get_quality_message
-from utils.qr_detector import detect_qr
+from use_cases import ocr_cache, ocr_scheduler
+from utils.cpu_pool import CpuPoolBusy
+from utils.image_prep import PreparedImage, prepare_image
 
 logger = logging.getLogger(__name__)
 
@@ -66,6 +73,7 @@ class OCRResult:
     warnings: List[str] = field(default_factory=list)
     errors: List[str] = field(default_factory=list)
     raw_json: Dict[str, Any] | None = None
+    usage: Dict[str, Any] | None = None  # токены / латентность GPT по документу
 
     def to_dict(self) -> dict:
         return {
@@ -84,9 +92,27 @@ class OCRResult:
             "confidence_score": self.confidence_score,
             "warnings": self.warnings,
             "errors": self.errors,
+            "usage": self.usage,
         }
 
 
+def _error_result(message: str) -> OCRResult:
+    """OCRResult со статусом error для фото, не дошедшего до распознавания."""
+    return OCRResult(
+        status="error",
+        doc_type="unknown",
+        doc_number=None,
+        doc_date=None,
+        supplier=None,
+        buyer=None,
+        items=[],
+        total_amount=None,
+        page_count=0,
+        total_pages=0,
+        errors=[message],
+    )
+
+
 async def mark_docs_pending_mapping(doc_ids: list[str]) -> None:
     """Установить status='pending_mapping' для документов, ожидающих маппинг."""
     if not doc_ids:
@@ -240,6 +266,7 @@ async def process_photo_batch(
     user_id: int = 0,
     invoices_only: bool = True,
     min_confidence: int = 70,
+    use_cache: bool = True,
 ) -> List[OCRResult]:
     """
     Обработать пачку фото документов.
@@ -247,6 +274,7 @@ async def process_photo_batch(
     Args:
         photos: Список изображений в байтах
         user_id: ID пользователя (для логирования)
+        use_cache: False — распознать заново, мимо ocr_result_cache
 
     Returns:
         Список результатов OCR для каждого документа
@@ -259,91 +287,268 @@ async def process_photo_batch(
         min_confidence,
     )
 
-    results: List[OCRResult] = []
+    # ── Шаг 1: Подготовка всех фото + OCR ──
+    # Подготовка — в пуле процессов, вызовы GPT — через ocr_scheduler
+    # (адаптивный лимит параллельности вместо gather без ограничений).
+    prep_outcomes = await asyncio.gather(
+        *[
+            _prepare_photo(photo, idx, len(photos), invoices_only)
+            for idx, photo in enumerate(photos)
+        ]
+    )
+    outcomes: list[tuple[int, Any]] = []
+    prepared: dict[int, PreparedImage] = {}
+    for i, outcome in enumerate(prep_outcomes):
+        if isinstance(outcome, OCRResult):
+            outcomes.append((i, outcome))
+        else:
+            prepared[i] = outcome
 
-    # ── Шаг 1: Параллельная проверка качества + OCR всех фото ──
-    # Каждый вызов GPT Vision независим → запускаем все одновременно.
+    outcomes += await asyncio.gather(
+        *[
+            _recognize_unit([i], [prep], photos[i], invoices_only, use_cache)
+            for i, prep in prepared.items()
+        ]
+    )
+    return await _assemble_results(outcomes, min_confidence)
 
-    async def _process_one(idx: int, photo: bytes):
-        """Проверить качество + распознать одно фото. Возвращает (idx, outcome).
-        outcome — либо dict с recognized-данными, либо OCRResult с ошибкой/отклонением.
-        """
-        logger.info("[OCR Pipeline] Processing photo %d/%d", idx + 1, len(photos))
 
-        # 1.1 Проверка качества
-        quality = await validate_photo(photo)
-        if not quality.is_good:
-            logger.warning(
-                "[OCR Pipeline] Photo %d failed quality check: %s",
-                idx + 1,
-                quality.issues,
-            )
-            return idx, OCRResult(
-                status="error",
-                doc_type="unknown",
-                doc_number=None,
-                doc_date=None,
-                supplier=None,
-                buyer=None,
-                items=[],
-                total_amount=None,
-                page_count=0,
-                total_pages=0,
-                errors=[f"Плохое качество фото: {', '.join(quality.issues)}"],
+class PhotoStream:
+    """
+    Потоковая обработка альбома: каждое фото скачивается, проверяется
+    и распознаётся сразу по приходу, пока альбом ещё набирается.
+    Группировка и объединение страниц — в finish(), когда альбом закрыт.
+
+    Источник фото — bytes или awaitable (скачивание из Telegram), чтобы
+    загрузка тоже шла внутри пайплайна и не блокировала handler.
+
+    one_document=True — все фото альбома страницы одного документа: по
+    приходу только подготовка, в finish() — один запрос на все страницы.
+    Флаг можно поднять и после первых фото (подпись пришла не с первым):
+    уже распознанные по одному фото остаются как есть.
+    """
+
+    def __init__(
+        self,
+        user_id: int = 0,
+        invoices_only: bool = True,
+        min_confidence: int = 70,
+        use_cache: bool = True,
+        one_document: bool = False,
+    ) -> None:
+        self.user_id = user_id
+        self.invoices_only = invoices_only
+        self.min_confidence = min_confidence
+        self.use_cache = use_cache
+        self.one_document = one_document
+        self._photos: dict[int, bytes] = {}
+        self._t0 = time.monotonic()
+        self._closed_at: float | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._timings: list[dict[str, float]] = []
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def add(self, source: bytes | Awaitable[bytes]) -> int:
+        """Поставить фото в работу. Возвращает его индекс в альбоме."""
+        idx = len(self._tasks)
+        self._timings.append({"received": self._elapsed()})
+        self._tasks.append(asyncio.create_task(self._run(idx, source)))
+        return idx
+
+    def cancel(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+
+    async def finish(self) -> List[OCRResult]:
+        """Дождаться всех фото и собрать документы (шаги 2-5)."""
+        self._closed_at = self._elapsed()
+        outcomes = list(await asyncio.gather(*self._tasks))
+        pages = [(i, o) for i, o in outcomes if isinstance(o, PreparedImage)]
+        if pages:
+            # one_document: подготовленные страницы → один запрос по порядку
+            idxs = [i for i, _ in pages]
+            outcomes = [(i, o) for i, o in outcomes if not isinstance(o, PreparedImage)]
+            outcomes.append(
+                await _recognize_unit(
+                    idxs,
+                    [prep for _, prep in pages],
+                    self._photos[idxs[0]],
+                    self.invoices_only,
+                    self.use_cache,
+                )
             )
+            for i in idxs:
+                self._timings[i]["recognized"] = self._elapsed()
+        results = await _assemble_results(outcomes, self.min_confidence)
+        logger.info(
+            "[OCR Pipeline] Album latency user %s: %s",
+            self.user_id,
+            self.latency_breakdown(),
+        )
+        return results
 
-        # 1.2 Распознавание через GPT Vision
+    def latency_breakdown(self) -> Dict[str, Any]:
+        """Разбивка времени альбома (сек от первого фото)."""
+        t = self._timings
+
+        def _span(start: str, end: str) -> float:
+            spans = [x[end] - x[start] for x in t if start in x and end in x]
+            return round(max(spans), 2) if spans else 0.0
+
+        done = [x["recognized"] for x in t if "recognized" in x]
+        return {
+            "photos": len(t),
+            "album_open_sec": round(self._closed_at or self._elapsed(), 2),
+            "download_max_sec": _span("received", "downloaded"),
+            "prepare_max_sec": _span("downloaded", "prepared"),
+            "recognize_max_sec": _span("prepared", "recognized"),
+            "first_result_sec": round(min(done), 2) if done else 0.0,
+            "total_sec": round(self._elapsed(), 2),
+        }
+
+    def _elapsed(self) -> float:
+        return time.monotonic() - self._t0
+
+    async def _run(
+        self, idx: int, source: bytes | Awaitable[bytes]
+    ) -> tuple[int, PreparedImage | Any]:
+        """(idx, outcome распознавания); при one_document — (idx, PreparedImage)."""
+        timings = self._timings[idx]
         try:
-            result = await recognize_document(photo)
-            result = _normalize_invoice_result(result)
+            photo = source if isinstance(source, bytes) else await source
+        except Exception as exc:
+            logger.warning("[OCR Pipeline] Photo %d: download failed: %s", idx + 1, exc)
+            return idx, _error_result("Не удалось загрузить фото")
+        timings["downloaded"] = self._elapsed()
+
+        prep = await _prepare_photo(photo, idx, idx + 1, self.invoices_only)
+        timings["prepared"] = self._elapsed()
+        if isinstance(prep, OCRResult):
+            return idx, prep
+        if self.one_document:
+            self._photos[idx] = photo
+            return idx, prep  # распознается в finish() вместе с остальными
+
+        outcome = await _recognize_unit(
+            [idx], [prep], photo, self.invoices_only, self.use_cache
+        )
+        timings["recognized"] = self._elapsed()
+        return outcome
 
-            if invoices_only and result.get("doc_type") not in ALLOWED_INVOICE_TYPES:
-                logger.info(
-                    "[OCR Pipeline] Photo %d rejected: doc_type=%s is not invoice",
-                    idx + 1,
-                    result.get("doc_type"),
-                )
-                return idx, OCRResult(
-                    status=STATUS_REJECTED_NON_INVOICE,
-                    doc_type=result.get("doc_type", "unknown"),
-                    doc_number=result.get("doc_number"),
-                    doc_date=result.get("date"),
-                    supplier=result.get("supplier"),
-                    buyer=result.get("buyer"),
-                    items=[],
-                    total_amount=result.get("total_amount"),
-                    page_count=1,
-                    total_pages=1,
-                    warnings=[
-                        "Документ не является накладной/УПД и не будет загружен в систему."
-                    ],
-                )
 
+async def _prepare_photo(
+    photo: bytes, idx: int, total: int, invoices_only: bool
+) -> PreparedImage | OCRResult:
+    """Декодирование + качество + QR. Ошибка/плохое фото → OCRResult."""
+    logger.info("[OCR Pipeline] Processing photo %d/%d", idx + 1, total)
+    # QR нужен только для чеков; при invoices_only чеки отсекаются и так.
+    try:
+        prep = await prepare_image(photo, with_qr=not invoices_only)
+    except CpuPoolBusy:
+        logger.warning("[OCR Pipeline] Photo %d: CPU-пул перегружен", idx + 1)
+        return _error_result("Сервер перегружен обработкой фото — отправьте позже")
+    logger.info("[OCR Pipeline] Photo %d prepared: %s", idx + 1, prep.timings)
+    if not prep.quality.is_good:
+        logger.warning(
+            "[OCR Pipeline] Photo %d failed quality check: %s",
+            idx + 1,
+            prep.quality.issues,
+        )
+        return _error_result(f"Плохое качество фото: {', '.join(prep.quality.issues)}")
+    return prep
+
+
+async def _recognize_unit(
+    idxs: list[int],
+    unit_preps: list[PreparedImage],
+    image_bytes: bytes,
+    invoices_only: bool,
+    use_cache: bool,
+) -> tuple[int, Any]:
+    """Распознать фото или несколько страниц одного документа одним запросом.
+    Возвращает (idx первой страницы, outcome): dict с recognized-данными
+    либо OCRResult с ошибкой/отклонением.
+    """
+    idx = idxs[0]
+    if len(idxs) == 1:
+        content_hash = unit_preps[0].content_hash
+    else:
+        content_hash = hashlib.sha256(
+            "".join(p.content_hash for p in unit_preps).encode()
+        ).hexdigest()
+    caching = use_cache and ocr_cache.is_enabled()
+    try:
+        cached = None
+        if caching:
+            cached = await ocr_cache.lookup(content_hash)
+        if cached is not None:
+            result = cached
+        else:
+            result = await ocr_scheduler.recognize([p.jpeg for p in unit_preps])
+            result = _normalize_invoice_result(result)
+            if caching:
+                await ocr_cache.store(content_hash, result)
+        if len(idxs) > 1:
+            # Один ответ на N страниц: считаем страницы здесь, а не по полям
+            # адаптера — иначе _page_count() увидит 1 стр. и документ «неполный»
+            result["_pages_in_request"] = len(idxs)
+            result["page_number"] = 1
+            result["total_pages"] = max(result.get("total_pages") or 1, len(idxs))
+        if any(p.has_qr for p in unit_preps):
+            result["has_qr"] = True  # локальная детекция дополняет GPT
+
+        if invoices_only and result.get("doc_type") not in ALLOWED_INVOICE_TYPES:
             logger.info(
-                "[OCR Pipeline] Photo %d recognized: %s",
+                "[OCR Pipeline] Photo %d rejected: doc_type=%s is not invoice",
                 idx + 1,
                 result.get("doc_type"),
             )
-            return idx, {"photo_index": idx, "result": result, "image_bytes": photo}
-
-        except Exception as e:
-            logger.error("[OCR Pipeline] Photo %d recognition failed: %s", idx + 1, e)
             return idx, OCRResult(
-                status="error",
-                doc_type="unknown",
-                doc_number=None,
-                doc_date=None,
-                supplier=None,
-                buyer=None,
+                status=STATUS_REJECTED_NON_INVOICE,
+                doc_type=result.get("doc_type", "unknown"),
+                doc_number=result.get("doc_number"),
+                doc_date=result.get("date"),
+                supplier=result.get("supplier"),
+                buyer=result.get("buyer"),
                 items=[],
-                total_amount=None,
-                page_count=0,
-                total_pages=0,
-                errors=[f"Ошибка распознавания: {str(e)}"],
+                total_amount=result.get("total_amount"),
+                page_count=len(idxs),
+                total_pages=len(idxs),
+                warnings=[
+                    "Документ не является накладной/УПД и не будет загружен в систему."
+                ],
             )
 
-    # Запускаем все фото параллельно
-    outcomes = await asyncio.gather(*[_process_one(i, p) for i, p in enumerate(photos)])
+        logger.info(
+            "[OCR Pipeline] Photo(s) %s recognized: %s",
+            [i + 1 for i in idxs],
+            result.get("doc_type"),
+        )
+        return idx, {
+            "photo_index": idx,
+            "photo_indexes": idxs,
+            "result": result,
+            "image_bytes": image_bytes,
+        }
+
+    except Exception as e:
+        logger.error(
+            "[OCR Pipeline] Photo(s) %s recognition failed: %s",
+            [i + 1 for i in idxs],
+            e,
+        )
+        return idx, _error_result(f"Ошибка распознавания: {str(e)}")
+
+
+async def _assemble_results(
+    outcomes: list[tuple[int, Any]], min_confidence: int = 70
+) -> List[OCRResult]:
+    """Шаги 2-5: QR, группировка страниц, полнота, объединение.
+    outcomes — (idx фото, dict распознавания | OCRResult) в любом порядке.
+    """
+    results: List[OCRResult] = []
 
     # Разбираем результаты, сохраняя порядок
     recognized = []
@@ -376,8 +581,8 @@ async def process_photo_batch(
                     buyer=result.get("buyer"),
                     items=[],
                     total_amount=None,
-                    page_count=1,
-                    total_pages=1,
+                    page_count=result.get("_pages_in_request", 1),
+                    total_pages=result.get("_pages_in_request", 1),
                     warnings=[
                         "Чек с QR-кодом. Используйте ФНС: https://check.nalog.ru/"
                     ],
@@ -469,7 +674,7 @@ async def process_photo_batch(
     # Шаг 4: Проверка полноты страниц
     logger.info("[OCR Pipeline] Checking page completeness")
     for group_key, group in groups.items():
-        page_count = len(group.pages)
+        page_count = _page_count(group.pages)
         total_pages = group.total_pages
 
         if page_count < total_pages:
@@ -513,7 +718,7 @@ async def process_document_group(
     # Проверка на неполноту
     if not group.is_complete:
         warnings.append(
-            f"Документ неполный: загружено {len(group.pages)} из {group.total_pages} стр. "
+            f"Документ неполный: загружено {_page_count(group.pages)} из {group.total_pages} стр. "
             f"Не хватает {group.missing_pages} стр."
         )
 
@@ -550,6 +755,16 @@ async def process_document_group(
     if needs_review:
         status = STATUS_NEEDS_REVIEW
 
+    usage = document_usage(group.pages)
+    logger.info(
+        "[OCR Pipeline] Документ %s: %d стр., %d запрос(ов) к GPT, %d токенов, %.1f сек",
+        merged.get("doc_number") or "б/н",
+        len(group.pages),
+        usage["requests"],
+        usage["total_tokens"],
+        usage["latency_sec"],
+    )
+
     return OCRResult(
         status=status,
         doc_type=merged.get("doc_type", "unknown"),
@@ -559,7 +774,7 @@ async def process_document_group(
         buyer=buyer,
         items=merged.get("items", []),
         total_amount=merged.get("total_amount"),
-        page_count=len(group.pages),
+        page_count=_page_count(group.pages),
         total_pages=group.total_pages,
         is_merged=len(group.pages) > 1,
         group_key=group.group_key if len(group.pages) > 1 else None,
@@ -567,9 +782,39 @@ async def process_document_group(
         warnings=warnings,
         errors=errors,
         raw_json=merged,
+        usage=usage,
     )
 
 
+def _page_count(pages: List[Dict[str, Any]]) -> int:
+    """Сколько фото-страниц в группе (многостраничный запрос — одна запись)."""
+    return sum(p.get("_pages_in_request", 1) for p in pages)
+
+
+def document_usage(pages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Токены и время GPT по документу (сумма по вызовам; кеш — 0)."""
+    usage = {
+        "requests": 0,
+        "cached": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "total_tokens": 0,
+        "latency_sec": 0.0,
+    }
+    for page in pages:
+        if page.get("_cache"):
+            usage["cached"] += 1
+            continue
+        page_usage = page.get("_usage") or {}
+        usage["requests"] += 1
+        for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+            usage[key] += page_usage.get(key) or 0
+        usage["latency_sec"] = round(
+            usage["latency_sec"] + (page.get("_latency_sec") or 0.0), 2
+        )
+    return usage
+
+
 def merge_pages(pages: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
     Объединить несколько страниц в один документ.
@@ -596,7 +841,7 @@ def merge_pages(pages: List[Dict[str, Any]]) -> Dict[str, Any]:
         all_items.extend(items)
 
     merged["items"] = all_items
-    merged["page_count"] = len(pages)
+    merged["page_count"] = _page_count(pages)
     merged["is_merged"] = True
 
     # Пересчитываем total_amount
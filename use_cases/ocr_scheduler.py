@@ -0,0 +1,226 @@
+"""
+Use-case: планировщик вызовов GPT Vision с адаптивной параллельностью.
+
+Раньше process_photo_batch запускал recognize_document для всех фото
+разом (asyncio.gather без лимита): альбом из 20 фото — 20 одновременных
+запросов, которые вместе упирались в rate limit.
+
+AdaptiveLimiter — AIMD, как TCP congestion control:
+  - успех быстрее OCR_TARGET_LATENCY_SEC → +1 к лимиту за каждые `limit`
+    успехов подряд (аддитивный рост, не выше OCR_CONCURRENCY_MAX);
+  - 429 / 5xx / таймаут / ответ медленнее цели → лимит ÷ 2 (не ниже 1);
+  - 429 / 5xx / таймаут → повтор с backoff (Retry-After, если прислан),
+    до OCR_MAX_RETRIES раз.
+
+Лимит общий на процесс: две пачки от разных пользователей делят его.
+На каждый документ пишутся латентность, попытки и токены (get_ocr_stats).
+
+Публичный API:
+  recognize(images)  — распознать 1 фото или N страниц одного документа
+  get_ocr_stats()    — лимит, в работе, 429, p50/p95, токены
+"""
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Any
+
+import openai
+
+from adapters import gpt5_vision_ocr
+from utils.metrics import record_retry
+
+logger = logging.getLogger(__name__)
+
+OCR_CONCURRENCY_START = 4
+OCR_CONCURRENCY_MAX = 8
+OCR_TARGET_LATENCY_SEC = 45.0  # обычное фото УПД — 15-30 сек
+OCR_MAX_RETRIES = 3
+_BACKOFF_BASE_SEC = 2.0
+_BACKOFF_MAX_SEC = 30.0
+_DOC_WINDOW = 200
+
+# Повторяемые ошибки: перегрузка на стороне API, а не плохой запрос
+_RETRYABLE = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+)
+
+
+class AdaptiveLimiter:
+    """Семафор с изменяемым лимитом (AIMD)."""
+
+    def __init__(
+        self,
+        start: int = OCR_CONCURRENCY_START,
+        min_limit: int = 1,
+        max_limit: int = OCR_CONCURRENCY_MAX,
+        target_latency: float = OCR_TARGET_LATENCY_SEC,
+    ) -> None:
+        self.limit = start
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self._streak = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def release(self) -> None:
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    async def on_success(self, latency: float) -> None:
+        if latency > self.target_latency:
+            await self.on_overload("slow")
+            return
+        self._streak += 1
+        if self._streak >= self.limit and self.limit < self.max_limit:
+            self._streak = 0
+            await self._set_limit(self.limit + 1)
+
+    async def on_overload(self, reason: str) -> None:
+        self._streak = 0
+        new_limit = max(self.min_limit, self.limit // 2)
+        if new_limit != self.limit:
+            logger.warning(
+                "[ocr_scheduler] %s → лимит %d → %d", reason, self.limit, new_limit
+            )
+        await self._set_limit(new_limit)
+
+    async def _set_limit(self, limit: int) -> None:
+        async with self._cond:
+            self.limit = limit
+            self._cond.notify_all()
+
+
+def _retry_after(exc: Exception, attempt: int) -> float:
+    """Пауза перед повтором: Retry-After из ответа или экспонента с джиттером."""
+    response = getattr(exc, "response", None)
+    header = response.headers.get("retry-after") if response is not None else None
+    try:
+        if header is not None:
+            return min(float(header), _BACKOFF_MAX_SEC)
+    except ValueError:
+        pass
+    delay = min(_BACKOFF_BASE_SEC * 2**attempt, _BACKOFF_MAX_SEC)
+    return delay * (0.5 + random.random() / 2)
+
+
+_limiter: AdaptiveLimiter | None = None
+_docs: deque[dict[str, Any]] = deque(maxlen=_DOC_WINDOW)
+_stats = {"requests": 0, "retries": 0, "throttled": 0, "failed": 0, "tokens": 0}
+
+
+def _get_limiter() -> AdaptiveLimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = AdaptiveLimiter()
+    return _limiter
+
+
+async def recognize(images: list[bytes], *, prepared: bool = True) -> dict[str, Any]:
+    """
+    Распознать документ: 1 фото — recognize_document, N — recognize_pages.
+
+    В результат добавляется _latency_sec (только вызовы API, без ожидания
+    в очереди) и _attempts. Неповторяемые ошибки и исчерпанные повторы
+    пробрасываются.
+    """
+    limiter = _get_limiter()
+    for attempt in range(OCR_MAX_RETRIES + 1):
+        await limiter.acquire()
+        t0 = time.monotonic()
+        try:
+            _stats["requests"] += 1
+            if len(images) == 1:
+                result = await gpt5_vision_ocr.recognize_document(
+                    images[0], prepared=prepared
+                )
+            else:
+                result = await gpt5_vision_ocr.recognize_pages(
+                    images, prepared=prepared
+                )
+        except _RETRYABLE as exc:
+            if isinstance(exc, openai.RateLimitError):
+                _stats["throttled"] += 1
+            await limiter.on_overload(type(exc).__name__)
+            if attempt == OCR_MAX_RETRIES:
+                _stats["failed"] += 1
+                raise
+            delay = _retry_after(exc, attempt)
+            _stats["retries"] += 1
+            record_retry("openai", "/v1/chat/completions")
+            logger.info(
+                "[ocr_scheduler] %s, повтор %d/%d через %.1f сек",
+                type(exc).__name__,
+                attempt + 1,
+                OCR_MAX_RETRIES,
+                delay,
+            )
+        except Exception:
+            _stats["failed"] += 1
+            raise
+        else:
+            latency = time.monotonic() - t0
+            await limiter.on_success(latency)
+            _record(result, images, latency, attempt + 1)
+            return result
+        finally:
+            await limiter.release()
+        await asyncio.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+def _record(result: dict, images: list[bytes], latency: float, attempts: int) -> None:
+    usage = result.get("_usage") or {}
+    tokens = usage.get("total_tokens") or 0
+    _stats["tokens"] += tokens
+    result["_latency_sec"] = round(latency, 2)
+    result["_attempts"] = attempts
+    _docs.append(
+        {
+            "pages": len(images),
+            "latency_sec": round(latency, 2),
+            "attempts": attempts,
+            "prompt_tokens": usage.get("prompt_tokens") or 0,
+            "completion_tokens": usage.get("completion_tokens") or 0,
+            "total_tokens": tokens,
+        }
+    )
+    logger.info(
+        "[ocr_scheduler] документ: %d стр., %.1f сек, %d попыт., %d токенов",
+        len(images),
+        latency,
+        attempts,
+        tokens,
+    )
+
+
+def get_ocr_stats() -> dict[str, Any]:
+    """Текущий лимит, очередь и сводка по последним документам."""
+    limiter = _get_limiter()
+    latencies = sorted(d["latency_sec"] for d in _docs)
+
+    def _pct(q: float) -> float:
+        if not latencies:
+            return 0.0
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    return {
+        **_stats,
+        "limit": limiter.limit,
+        "in_flight": limiter.in_flight,
+        "latency_p50_sec": _pct(0.5),
+        "latency_p95_sec": _pct(0.95),
+        "recent_docs": list(_docs)[-10:],
+    }
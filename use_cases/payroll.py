@@ -24,7 +24,6 @@ Use-case: расчёт ФОТ (фонд оплаты труда) за текущ
 import asyncio
 import logging
 import time
-from collections import defaultdict
 from datetime import date, datetime
 
 from sqlalchemy import select
@@ -35,12 +34,19 @@ from use_cases.revenue_motivation import (
     get_revenue_motivation_map,
     get_department_revenue_totals,
     get_pastry_invoice_motivation_map,
+    pastry_motivation_from,
+    revenue_motivation_from,
 )
-from use_cases.salary_history import (
-    load_salary_history_index,
-    get_rate_for_date,
-    get_prorated_monthly,
+from use_cases.salary_history import load_salary_history_index
+from use_cases.payroll_engine import (
+    AttendanceColumns,
+    RateIndex,
+    RateTable,
+    build_rate_indexes,
+    dept_stats,
+    shift_pay,
 )
+from use_cases.payroll_partials import mark_dirty_from, month_totals
 from db.engine import async_session_factory
 from db.models import Employee, EmployeeRole
 from use_cases._helpers import now_kgd
@@ -94,36 +100,6 @@ def _full_name(emp: Employee) -> str:
     return " ".join(parts) if parts else (emp.name or "").strip()
 
 
-def _parse_dt(s: str | None) -> datetime | None:
-    """Разобрать строчку датовремени из iiko API.
-    Поддерживает форматы: ISO с таймзоной (+02:00), без таймзоны, с миллисекундами.
-    """
-    if not s:
-        return None
-    s = s.strip()
-    # Python 3.7+ fromisoformat поддерживает +HH:MM offset (Python 3.11+ полностью)
-    try:
-        return datetime.fromisoformat(s)
-    except ValueError:
-        pass
-    for fmt in ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%d %H:%M:%S"):
-        try:
-            return datetime.strptime(s, fmt)
-        except ValueError:
-            pass
-    return None
-
-
-def _hours_from_attendance(rec: dict) -> float:
-    """Вычислить кол-во рабочих часов из записи явки (dateFrom / dateTo)."""
-    dt_from = _parse_dt(rec.get("dateFrom"))
-    dt_to = _parse_dt(rec.get("dateTo"))
-    if dt_from and dt_to and dt_to > dt_from:
-        delta = dt_to - dt_from
-        return delta.total_seconds() / 3600.0
-    return 0.0
-
-
 def _days_in_month(year: int, month: int) -> int:
     """Kол-во дней в месяце."""
     if month == 12:
@@ -136,12 +112,16 @@ def _days_in_month(year: int, month: int) -> int:
 async def update_fot_sheet(
     triggered_by: str | None = None,
     target_date: date | None = None,
+    full: bool = False,
 ) -> int:
     """
     Рассчитать ФОТ за текущий месяц и записать в Google Sheets.
 
     ``target_date`` — любая дата внутри нужного месяца.
     По умолчанию (None) — текущий день по ``now_kgd()``.
+    ``full=True`` — пересчитать месяц из iiko целиком, без дневных итогов,
+    и пометить дни месяца к пересчёту (кнопка синхронизации ФОТ: явки
+    исправили в iiko задним числом раньше окна RECHECK_DAYS).
 
     Возвращает суммарное количество строк сотрудников в листе.
     """
@@ -168,22 +148,9 @@ async def update_fot_sheet(
         tab_name,
     )
 
-    # ── 1. Загружаем данные параллельно ──
-
-    # Явки из iiko
-    try:
-        attendance_records = await fetch_attendance(
-            date_from=date_from_str,
-            date_to=date_to_str,
-            with_payment_details=False,
-        )
-        logger.info("[payroll] Явки из iiko: %d записей", len(attendance_records))
-    except Exception:
-        logger.exception("[payroll] Ошибка загрузки явок из iiko")
-        attendance_records = []
-
-    # История ставок + данные из БД — параллельно
-    # Сначала синхронизируем GSheet → БД (чтобы подхватить ручные изменения)
+    # ── 1. История ставок + данные из БД ──
+    # Сначала синхронизируем GSheet → БД (чтобы подхватить ручные изменения;
+    # правка ставок задним числом помечает дневные итоги ФОТ к пересчёту)
     try:
         from use_cases.salary_history import sync_salary_history
 
@@ -195,89 +162,85 @@ async def update_fot_sheet(
         load_salary_history_index(),
         _load_db_data(),
     )
-
-    # ── 2. Индексы ──
-    # employee_id (iiko UUID) → Employee DB
-    emp_by_iiko_id: dict[str, Employee] = {}
-    emp_by_full_name: dict[str, Employee] = {}
-    for emp in employees_db:
-        iiko_id = str(emp.id)
-        emp_by_iiko_id[iiko_id] = emp
-        fn = _full_name(emp)
-        if fn:
-            emp_by_full_name[fn] = emp
-
-    # role_id (iiko UUID) → EmployeeRole DB
-    role_by_iiko_id: dict[str, EmployeeRole] = {str(r.id): r for r in roles_db}
-
-    # ── 3. Агрегация явок ПО ПОДРАЗДЕЛЕНИЯМ ──
-    # emp_iiko_id → {dept_id: {"dept_name": str, "shifts": int, "hours": float}}
-    emp_dept_stats: dict[str, dict[str, dict]] = defaultdict(
-        lambda: defaultdict(lambda: {"dept_name": "", "shifts": 0, "hours": 0.0})
-    )
-    # (emp_iiko_id, dept_id) → заработок за смены в этом подразделении
-    emp_dept_earnings: dict[tuple[str, str], float] = defaultdict(float)
-
-    # iiko_id → full_name (для доступа к history_index)
-    _iiko_to_fn: dict[str, str] = {
-        iiko_id: _full_name(emp) for iiko_id, emp in emp_by_iiko_id.items()
-    }
-
-    for rec in attendance_records:
-        emp_id = (rec.get("employeeId") or "").strip()
-        dept_id = (rec.get("departmentId") or "").strip()
-        dept_name = (rec.get("departmentName") or "").strip() or dept_id or "Без цеха"
-        if not emp_id:
-            continue
-        emp_dept_stats[emp_id][dept_id]["dept_name"] = dept_name
-        emp_dept_stats[emp_id][dept_id]["shifts"] += 1
-        hours = _hours_from_attendance(rec)
-        emp_dept_stats[emp_id][dept_id]["hours"] += hours
-
-        # Начисление за смену: ставка из «Истории ставок» на дату смены
-        fn = _iiko_to_fn.get(emp_id)
-        if fn:
-            history = history_index.get(fn, [])
-            shift_dt = _parse_dt(rec.get("dateFrom"))
-            if shift_dt and history:
-                active = get_rate_for_date(history, shift_dt.date())
-                if active:
-                    shift_rate = float(active["rate"])
-                    if active["sal_type"] == "посменная":
-                        emp_dept_earnings[(emp_id, dept_id)] += shift_rate
-                    elif active["sal_type"] == "почасовая":
-                        emp_dept_earnings[(emp_id, dept_id)] += shift_rate * hours
-
-    logger.info("[payroll] Уникальных сотрудников с явками: %d", len(emp_dept_stats))
-
-    # ── 3b. Расчёт мотивации «от выручки» (по подразделениям) ──
     emp_iiko_to_fullname: dict[str, str] = {
-        iiko_id: _full_name(emp) for iiko_id, emp in emp_by_iiko_id.items()
+        str(emp.id): _full_name(emp) for emp in employees_db
     }
-    # motivation_by_dept: {full_name: {dept_name: руб.}}
-    # dept_revenue_totals: {dept_name: total_revenue}
-    # pastry_motivation: {full_name: {dept_name: руб.}}
-    motivation_by_dept, dept_revenue_totals, pastry_result = await asyncio.gather(
-        get_revenue_motivation_map(
-            attendance_records=attendance_records,
-            emp_iiko_to_fullname=emp_iiko_to_fullname,
-            date_from=month_start,
-            date_to=today,
+    # ФИО → интервальный индекс ставок
+    rates = build_rate_indexes(history_index)
+
+    # ── 2. Явки, выручка, мотивация ──
+    # Обычно — из дневных итогов (payroll_partials): из iiko тянутся только
+    # последняя неделя (RECHECK_DAYS) и недостающие дни. full=True или сбой —
+    # весь месяц из iiko, как раньше; full=True ещё и помечает дни к пересчёту.
+    totals = None
+    if full:
+        try:
+            await mark_dirty_from(month_start)
+        except Exception:
+            logger.exception("[payroll] Не удалось пометить дневные итоги ФОТ")
+    else:
+        try:
+            totals = await month_totals(
+                month_start,
+                today,
+                RateTable(rates),
+                emp_iiko_to_fullname,
+            )
+        except Exception:
+            logger.exception(
+                "[payroll] Дневные итоги ФОТ недоступны — считаю месяц целиком"
+            )
+
+    if totals is not None:
+        # motivation_by_dept: {full_name: {dept_name: руб.}}
+        motivation_by_dept = revenue_motivation_from(
+            emp_shifts=totals.emp_shifts,
+            revenue_index=totals.revenue_index,
+            emp_full_names=emp_iiko_to_fullname,
             history_index=history_index,
-        ),
-        get_department_revenue_totals(
             date_from=month_start,
             date_to=today,
-        ),
-        get_pastry_invoice_motivation_map(
-            attendance_records=attendance_records,
-            emp_iiko_to_fullname=emp_iiko_to_fullname,
-            date_from=month_start,
-            date_to=today,
-            history_index=history_index,
-        ),
-    )
-    pastry_motivation, pastry_revenue_total = pastry_result
+        )
+        dept_revenue_totals = totals.dept_revenue()
+        pastry_revenue_total = max(totals.pastry_sum, 0.0)
+        pastry_motivation = (
+            pastry_motivation_from(
+                total_pastry_sum=pastry_revenue_total,
+                emp_dates=totals.emp_dates,
+                emp_depts=totals.emp_depts,
+                emp_full_names=emp_iiko_to_fullname,
+                history_index=history_index,
+                date_from=month_start,
+                date_to=today,
+            )
+            if pastry_revenue_total > 0
+            else {}
+        )
+    else:
+        attendance_records = await _fetch_month_attendance(date_from_str, date_to_str)
+        # dept_revenue_totals: {dept_name: total_revenue}
+        # pastry_motivation: {full_name: {dept_name: руб.}}
+        motivation_by_dept, dept_revenue_totals, pastry_result = await asyncio.gather(
+            get_revenue_motivation_map(
+                attendance_records=attendance_records,
+                emp_iiko_to_fullname=emp_iiko_to_fullname,
+                date_from=month_start,
+                date_to=today,
+                history_index=history_index,
+            ),
+            get_department_revenue_totals(
+                date_from=month_start,
+                date_to=today,
+            ),
+            get_pastry_invoice_motivation_map(
+                attendance_records=attendance_records,
+                emp_iiko_to_fullname=emp_iiko_to_fullname,
+                date_from=month_start,
+                date_to=today,
+                history_index=history_index,
+            ),
+        )
+        pastry_motivation, pastry_revenue_total = pastry_result
     logger.info(
         "[payroll] Мотивация «от выручки»: %d сотрудников с ненулёвой суммой",
         len(motivation_by_dept),
@@ -305,7 +268,125 @@ async def update_fot_sheet(
         {k: f"{v:,.0f}" for k, v in dept_revenue_totals.items()},
     )
 
-    # ── 4. Построение секций по подразделениям ──
+    # ── 3. Начисления и секции листа ──
+    if totals is not None:
+        dept_sections, monthly_section = build_fot_sections(
+            emp_dept_stats=totals.emp_dept_stats,
+            emp_dept_earnings=totals.emp_dept_earnings,
+            rates=rates,
+            employees_db=employees_db,
+            roles_db=roles_db,
+            motivation_by_dept=motivation_by_dept,
+            month_start=month_start,
+            today=today,
+        )
+    else:
+        dept_sections, monthly_section = compute_fot_sections(
+            attendance_records=attendance_records,
+            history_index=history_index,
+            employees_db=employees_db,
+            roles_db=roles_db,
+            motivation_by_dept=motivation_by_dept,
+            month_start=month_start,
+            today=today,
+        )
+
+    # ── 4. Запись в GSheets ──
+    count = await sync_fot_sheet(
+        dept_sections=dept_sections,
+        monthly_section=monthly_section,
+        tab_name=tab_name,
+        period_label=period_label,
+        dept_revenue=dept_revenue_totals,
+        pastry_revenue=pastry_revenue_total,
+        pastry_dept_names=pastry_dept_names,
+    )
+
+    elapsed = time.monotonic() - t0
+    logger.info(
+        "[payroll] ФОТ «%s» записан: %d сотрудников за %.1f сек",
+        tab_name,
+        count,
+        elapsed,
+    )
+    return count
+
+
+def compute_fot_sections(
+    attendance_records: list[dict],
+    history_index: dict[str, list[dict]],
+    employees_db: list[Employee],
+    roles_db: list[EmployeeRole],
+    motivation_by_dept: dict[str, dict[str, float]],
+    month_start: date,
+    today: date,
+) -> tuple[list[dict], list[dict]]:
+    """
+    Начисления ФОТ за период month_start … today → (dept_sections, monthly_section).
+
+    Чистый расчёт без I/O: ставки — по интервальному индексу истории
+    (payroll_engine.RateIndex), явки — колонками (AttendanceColumns),
+    начисления посменных/почасовых — одним векторным проходом.
+    """
+    # ФИО → интервальный индекс ставок
+    rates = build_rate_indexes(history_index)
+
+    # emp_iiko_id → {dept_id: {"dept_name": str, "shifts": int, "hours": float}}
+    # (emp_iiko_id, dept_id) → заработок за смены в этом подразделении
+    # (ставка из «Истории ставок» на дату каждой смены)
+    cols = AttendanceColumns.from_records(attendance_records)
+    emp_dept_earnings = shift_pay(
+        cols,
+        RateTable(rates),
+        {str(emp.id): _full_name(emp) for emp in employees_db},
+    )
+    return build_fot_sections(
+        emp_dept_stats=dept_stats(cols),
+        emp_dept_earnings=emp_dept_earnings,
+        rates=rates,
+        employees_db=employees_db,
+        roles_db=roles_db,
+        motivation_by_dept=motivation_by_dept,
+        month_start=month_start,
+        today=today,
+    )
+
+
+def build_fot_sections(
+    emp_dept_stats: dict[str, dict[str, dict]],
+    emp_dept_earnings: dict[tuple[str, str], float],
+    rates: dict[str, RateIndex],
+    employees_db: list[Employee],
+    roles_db: list[EmployeeRole],
+    motivation_by_dept: dict[str, dict[str, float]],
+    month_start: date,
+    today: date,
+) -> tuple[list[dict], list[dict]]:
+    """
+    Секции листа ФОТ по готовым явкам и начислениям за смены.
+
+    Входы — из явок за месяц (compute_fot_sections) или из свёртки
+    дневных итогов (payroll_partials.month_totals).
+    """
+    days_in_m = _days_in_month(today.year, today.month)
+
+    # ── 1. Индексы ──
+    # employee_id (iiko UUID) → Employee DB
+    emp_by_iiko_id: dict[str, Employee] = {}
+    emp_by_full_name: dict[str, Employee] = {}
+    for emp in employees_db:
+        iiko_id = str(emp.id)
+        emp_by_iiko_id[iiko_id] = emp
+        fn = _full_name(emp)
+        if fn:
+            emp_by_full_name[fn] = emp
+
+    # role_id (iiko UUID) → EmployeeRole DB
+    role_by_iiko_id: dict[str, EmployeeRole] = {str(r.id): r for r in roles_db}
+
+    logger.info("[payroll] Уникальных сотрудников с явками: %d", len(emp_dept_stats))
+
+    # ── 3. Секции по подразделениям ──
     # Источник сотрудников — «История ставок».
     # Каждый сотрудник, у которого есть активная запись:
     #   • ежемесячная → секция «Администрация»
@@ -323,8 +404,8 @@ async def update_fot_sheet(
     # Множество имён, которые уже обработаны в dept-секции (не дублировать в monthly)
     processed_in_dept: set[str] = set()
 
-    for fn, history in history_index.items():
-        active = get_rate_for_date(history, today)
+    for fn, idx in rates.items():
+        active = idx.at(today)
         if not active:
             continue
         sal_type = active["sal_type"]
@@ -375,21 +456,12 @@ async def update_fot_sheet(
                 }
             )
 
-    # ── 5. Секция «Администрация» (ежемесячные сотрудники) ──
+    # ── 4. Секция «Администрация» (ежемесячные сотрудники) ──
     monthly_section: list[dict] = []
-    monthly_names: set[str] = set()
-    for fn, hist in history_index.items():
-        active = get_rate_for_date(hist, today)
-        if active and active["sal_type"] == "ежемесячная":
-            monthly_names.add(fn)
-
-    for fn in monthly_names:
-        history = history_index.get(fn, [])
-        active = get_rate_for_date(history, today)
-        if active:
-            rate = float(active["rate"])
-        else:
-            rate = 0.0
+    for fn, idx in rates.items():
+        active = idx.at(today)
+        if not active or active["sal_type"] != "ежемесячная":
+            continue
 
         emp = emp_by_full_name.get(fn)
         if emp is None:
@@ -400,10 +472,7 @@ async def update_fot_sheet(
         if emp.role_id and str(emp.role_id) in role_by_iiko_id:
             role_name = role_by_iiko_id[str(emp.role_id)].name or ""
 
-        if history:
-            total = get_prorated_monthly(history, month_start, today, days_in_m)
-        else:
-            total = round(rate / days_in_m * days_passed, 2) if days_in_m else 0.0
+        total = idx.prorated_monthly(month_start, today, days_in_m)
 
         bonus = round(sum((motivation_by_dept.get(fn) or {}).values()), 2)
 
@@ -432,26 +501,7 @@ async def update_fot_sheet(
         len(dept_sections),
         len(monthly_section),
     )
-
-    # ── 6. Запись в GSheets ──
-    count = await sync_fot_sheet(
-        dept_sections=dept_sections,
-        monthly_section=monthly_section,
-        tab_name=tab_name,
-        period_label=period_label,
-        dept_revenue=dept_revenue_totals,
-        pastry_revenue=pastry_revenue_total,
-        pastry_dept_names=pastry_dept_names,
-    )
-
-    elapsed = time.monotonic() - t0
-    logger.info(
-        "[payroll] ФОТ «%s» записан: %d сотрудников за %.1f сек",
-        tab_name,
-        count,
-        elapsed,
-    )
-    return count
+    return dept_sections, monthly_section
 
 
 # ─────────────────────────────────────────────────────
@@ -459,6 +509,21 @@ async def update_fot_sheet(
 # ─────────────────────────────────────────────────────
 
 
+async def _fetch_month_attendance(date_from: str, date_to: str) -> list[dict]:
+    """Явки из iiko за весь период; при ошибке — пусто (лист без смен)."""
+    try:
+        attendance_records = await fetch_attendance(
+            date_from=date_from,
+            date_to=date_to,
+            with_payment_details=False,
+        )
+        logger.info("[payroll] Явки из iiko: %d записей", len(attendance_records))
+    except Exception:
+        logger.exception("[payroll] Ошибка загрузки явок из iiko")
+        attendance_records = []
+    return attendance_records
+
+
 async def _load_db_data() -> tuple[list[Employee], list[EmployeeRole]]:
     """Загрузить сотрудников и роли из БД."""
     async with async_session_factory() as session:
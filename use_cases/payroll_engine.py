@@ -0,0 +1,294 @@
+"""
+Расчётный движок ФОТ: индекс ставок по интервалам + явки в колоночном виде.
+
+  RateIndex          — история ставок сотрудника как непрерывные отрезки дат;
+                       ставка на дату — bisect вместо обратного перебора истории,
+                       пропорция ежемесячной — прыжками по отрезкам, а не по дням
+  RateTable          — RateIndex всех сотрудников, склеенные в numpy-массивы:
+                       ставки на даты всех смен месяца — один searchsorted
+  AttendanceColumns  — явки iiko в массивах (сотрудник, пара сотрудник×цех, день, часы)
+  shift_pay()        — начисления посменным/почасовым одним проходом (bincount)
+  dept_stats()       — смены/часы по (сотрудник, подразделение)
+
+Результат совпадает с get_rate_for_date / get_prorated_monthly и прежним
+циклом update_fot_sheet до бита: суммы копятся в том же порядке явок.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import date, datetime
+
+import numpy as np
+
+SHIFT, HOURLY, MONTHLY = 1, 2, 3
+_KIND = {"посменная": SHIFT, "почасовая": HOURLY, "ежемесячная": MONTHLY}
+
+_NO_DAY = -1
+
+
+def parse_dt(s: str | None) -> datetime | None:
+    """Разобрать строчку датовремени из iiko API.
+    Поддерживает форматы: ISO с таймзоной (+02:00), без таймзоны, с миллисекундами.
+    """
+    if not s:
+        return None
+    s = s.strip()
+    # Python 3.7+ fromisoformat поддерживает +HH:MM offset (Python 3.11+ полностью)
+    try:
+        return datetime.fromisoformat(s)
+    except ValueError:
+        pass
+    for fmt in ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%d %H:%M:%S"):
+        try:
+            return datetime.strptime(s, fmt)
+        except ValueError:
+            pass
+    return None
+
+
+def shift_hours(dt_from: datetime | None, dt_to: datetime | None) -> float:
+    """Кол-во рабочих часов смены (dateFrom / dateTo)."""
+    if dt_from and dt_to and dt_to > dt_from:
+        delta = dt_to - dt_from
+        return delta.total_seconds() / 3600.0
+    return 0.0
+
+
+# ═══════════════════════════════════════════════════════
+# Индекс ставок
+# ═══════════════════════════════════════════════════════
+
+
+@dataclass(slots=True)
+class RateIndex:
+    """
+    История ставок одного сотрудника, разложенная на отрезки.
+
+    starts[i] — ordinal первого дня i-го отрезка; отрезок длится до starts[i+1]-1,
+    последний — бессрочно. recs[i] — запись истории, которую на этих днях вернул
+    бы get_rate_for_date (None — дыра в истории).
+    """
+
+    starts: list[int]
+    recs: list[dict | None]
+
+    @classmethod
+    def build(cls, history: list[dict]) -> RateIndex:
+        bounds = {r["valid_from"].toordinal() for r in history}
+        bounds |= {
+            r["valid_to"].toordinal() + 1 for r in history if r["valid_to"] is not None
+        }
+        starts: list[int] = []
+        recs: list[dict | None] = []
+        for b in sorted(bounds):
+            # Внутри отрезка покрытие не меняется; как и get_rate_for_date,
+            # берём последнюю по порядку истории запись, покрывающую день.
+            active = None
+            for rec in reversed(history):
+                if rec["valid_from"].toordinal() <= b and (
+                    rec["valid_to"] is None or rec["valid_to"].toordinal() >= b
+                ):
+                    active = rec
+                    break
+            if recs and recs[-1] is active:
+                continue
+            starts.append(b)
+            recs.append(active)
+        return cls(starts, recs)
+
+    def at(self, d: date) -> dict | None:
+        """Активная запись на дату — то же, что get_rate_for_date."""
+        i = bisect_right(self.starts, d.toordinal()) - 1
+        return self.recs[i] if i >= 0 else None
+
+    def prorated_monthly(
+        self, period_start: date, period_end: date, days_in_month: int
+    ) -> float:
+        """То же, что get_prorated_monthly, но без шага по дням."""
+        total = 0.0
+        current = period_start.toordinal()
+        end = period_end.toordinal()
+        while current <= end:
+            i = bisect_right(self.starts, current) - 1
+            rec = self.recs[i] if i >= 0 else None
+            if rec and rec["sal_type"] == "ежемесячная":
+                seg_end = end
+                if rec["valid_to"] and rec["valid_to"].toordinal() < end:
+                    seg_end = rec["valid_to"].toordinal()
+                days = seg_end - current + 1
+                total += (rec["rate"] / days_in_month) * days
+                current = seg_end + 1
+            elif i + 1 < len(self.starts):
+                # На отрезке ставка не ежемесячная — весь отрезок ничего не даёт
+                current = self.starts[i + 1]
+            else:
+                break
+        return round(total, 2)
+
+
+def build_rate_indexes(history_index: dict[str, list[dict]]) -> dict[str, RateIndex]:
+    """{ФИО: история} из load_salary_history_index() → {ФИО: RateIndex}."""
+    return {name: RateIndex.build(hist) for name, hist in history_index.items()}
+
+
+class RateTable:
+    """
+    Все RateIndex в плоских отсортированных массивах.
+
+    Ключ отрезка = код_сотрудника << 32 | ordinal_начала, поэтому ставка на
+    (сотрудник, день) для всех смен сразу ищется одним np.searchsorted.
+    """
+
+    __slots__ = ("codes", "_keys", "_rates", "_kinds")
+
+    def __init__(self, indexes: dict[str, RateIndex]):
+        self.codes: dict[str, int] = {}
+        keys: list[int] = []
+        rates: list[float] = []
+        kinds: list[int] = []
+        for code, (name, idx) in enumerate(indexes.items()):
+            self.codes[name] = code
+            for start, rec in zip(idx.starts, idx.recs):
+                keys.append((code << 32) | start)
+                rates.append(float(rec["rate"]) if rec else 0.0)
+                kinds.append(_KIND.get(rec["sal_type"], 0) if rec else 0)
+        self._keys = np.asarray(keys, dtype=np.int64)
+        self._rates = np.asarray(rates, dtype=np.float64)
+        self._kinds = np.asarray(kinds, dtype=np.int8)
+
+    def lookup(
+        self, codes: np.ndarray, days: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Ставка и тип (SHIFT/HOURLY/MONTHLY, 0 — нет) на каждую пару (код, день).
+        Код или день < 0 — «нет данных».
+        """
+        n = len(codes)
+        if not len(self._keys) or not n:
+            return np.zeros(n), np.zeros(n, dtype=np.int8)
+        codes = codes.astype(np.int64)
+        query = (codes << 32) | np.maximum(days, 0)
+        pos = np.searchsorted(self._keys, query, side="right") - 1
+        ok = (codes >= 0) & (days >= 0) & (pos >= 0)
+        pos = np.where(ok, pos, 0)
+        ok &= (self._keys[pos] >> 32) == codes
+        return (
+            np.where(ok, self._rates[pos], 0.0),
+            np.where(ok, self._kinds[pos], 0).astype(np.int8),
+        )
+
+
+# ═══════════════════════════════════════════════════════
+# Явки в колонках
+# ═══════════════════════════════════════════════════════
+
+
+@dataclass(slots=True)
+class AttendanceColumns:
+    """
+    Явки за период, по строке массива на явку.
+
+    pairs — (iiko_id сотрудника, dept_id) в порядке первого появления
+    (этот порядок — порядок подразделений в листе ФОТ), dept_names — последнее
+    встреченное название подразделения пары.
+    """
+
+    emp_ids: list[str]
+    pairs: list[tuple[str, str]]
+    dept_names: list[str]
+    emp: np.ndarray  # int32: код сотрудника (индекс в emp_ids)
+    pair: np.ndarray  # int32: код пары (индекс в pairs)
+    day: np.ndarray  # int32: ordinal даты начала смены, -1 — не разобрана
+    hours: np.ndarray  # float64
+
+    @classmethod
+    def from_records(cls, records: list[dict]) -> AttendanceColumns:
+        emp_codes: dict[str, int] = {}
+        pair_codes: dict[tuple[str, str], int] = {}
+        dept_names: list[str] = []
+        # Время начала/конца смен повторяется у сотни сотрудников («09:00»),
+        # поэтому строку разбираем один раз, а часы — один раз на пару строк
+        days: dict[str | None, int] = {}
+        spans: dict[tuple[str | None, str | None], float] = {}
+        emp, pair, day, hours = [], [], [], []
+        for rec in records:
+            emp_id = (rec.get("employeeId") or "").strip()
+            if not emp_id:
+                continue
+            dept_id = (rec.get("departmentId") or "").strip()
+            dept_name = (
+                (rec.get("departmentName") or "").strip() or dept_id or "Без цеха"
+            )
+            key = (emp_id, dept_id)
+            code = pair_codes.get(key)
+            if code is None:
+                code = pair_codes[key] = len(dept_names)
+                dept_names.append(dept_name)
+            else:
+                dept_names[code] = dept_name
+            raw_from, raw_to = rec.get("dateFrom"), rec.get("dateTo")
+            span = spans.get((raw_from, raw_to))
+            if span is None:
+                dt_from = parse_dt(raw_from)
+                days[raw_from] = dt_from.date().toordinal() if dt_from else _NO_DAY
+                span = spans[(raw_from, raw_to)] = shift_hours(
+                    dt_from, parse_dt(raw_to)
+                )
+            emp.append(emp_codes.setdefault(emp_id, len(emp_codes)))
+            pair.append(code)
+            day.append(days[raw_from])
+            hours.append(span)
+        return cls(
+            emp_ids=list(emp_codes),
+            pairs=list(pair_codes),
+            dept_names=dept_names,
+            emp=np.asarray(emp, dtype=np.int32),
+            pair=np.asarray(pair, dtype=np.int32),
+            day=np.asarray(day, dtype=np.int32),
+            hours=np.asarray(hours, dtype=np.float64),
+        )
+
+
+def dept_stats(cols: AttendanceColumns) -> dict[str, dict[str, dict]]:
+    """emp_iiko_id → {dept_id: {"dept_name", "shifts", "hours"}}."""
+    n = len(cols.pairs)
+    shifts = np.bincount(cols.pair, minlength=n)
+    hours = np.bincount(cols.pair, weights=cols.hours, minlength=n)
+    out: dict[str, dict[str, dict]] = {}
+    for code, (emp_id, dept_id) in enumerate(cols.pairs):
+        out.setdefault(emp_id, {})[dept_id] = {
+            "dept_name": cols.dept_names[code],
+            "shifts": int(shifts[code]),
+            "hours": float(hours[code]),
+        }
+    return out
+
+
+def shift_pay(
+    cols: AttendanceColumns,
+    table: RateTable,
+    fullname_by_iiko: dict[str, str],
+) -> dict[tuple[str, str], float]:
+    """
+    (emp_iiko_id, dept_id) → начисление за смены в подразделении.
+
+    Ставка — на дату каждой смены: посменная — ставка за смену,
+    почасовая — ставка × часы. Ежемесячные здесь не считаются.
+    """
+    if not cols.pairs:
+        return {}
+    emp_code = np.asarray(
+        [
+            table.codes.get(fn, -1) if (fn := fullname_by_iiko.get(e)) else -1
+            for e in cols.emp_ids
+        ],
+        dtype=np.int64,
+    )
+    rates, kinds = table.lookup(emp_code[cols.emp], cols.day)
+    pay = np.where(
+        kinds == SHIFT, rates, np.where(kinds == HOURLY, rates * cols.hours, 0.0)
+    )
+    sums = np.bincount(cols.pair, weights=pay, minlength=len(cols.pairs))
+    return {key: float(sums[code]) for code, key in enumerate(cols.pairs)}
@@ -0,0 +1,482 @@
+"""
+Use-case: дневные итоги ФОТ в Postgres — инкрементальный расчёт месяца.
+
+Ежедневный update_fot_sheet(target_date=вчера) раньше заново тянул из iiko
+явки, OLAP-выручку и расходные накладные за весь месяц, хотя дни 1…N-1 почти
+никогда не меняются. Теперь закрытые дни хранятся:
+  payroll_day          — выручка подразделений и сумма кондитерки за день
+  payroll_day_partial  — смены / часы / начисления по (день, сотрудник, цех)
+
+month_totals():
+  1. Итоги закрытых дней месяца (dirty=False) старше окна RECHECK_DAYS — из БД.
+  2. Последние RECHECK_DAYS закрытых дней, недостающие / dirty дни и незакрытый
+     «сегодня» — из iiko диапазонами подряд идущих дней (обычно один диапазон
+     на неделю), расчёт движком payroll_engine.
+  3. Закрытые дни сохраняются (заменяя прежние); «сегодня» — нет (явки идут).
+  4. Дни складываются в итоги месяца (MonthTotals) → payroll.build_fot_sections.
+
+Правка «Истории ставок» меняет начисления задним числом: sync_salary_history
+вызывает mark_dirty_from(rate_change_start(...)), такие дни пересчитываются.
+Мотивация (процент на конец периода) и ежемесячные оклады считаются при
+свёртке по текущей истории — флагов не требуют.
+Явки, исправленные в iiko задним числом, подхватывает окно RECHECK_DAYS
+(правки обычно вносят за прошедшую неделю); более старые — кнопка
+синхронизации ФОТ: update_fot_sheet(full=True) считает месяц из iiko и
+помечает его дни к пересчёту.
+"""
+
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from adapters.iiko_api import (
+    fetch_attendance,
+    fetch_motivation_revenue_olap,
+    fetch_outgoing_invoices,
+)
+from db.engine import async_session_factory
+from db.models import PayrollDay, PayrollDayPartial
+from use_cases._helpers import now_kgd
+from use_cases.payroll_engine import (
+    AttendanceColumns,
+    RateTable,
+    dept_stats,
+    parse_dt,
+    shift_pay,
+)
+from use_cases.revenue_motivation import (
+    _build_revenue_index,
+    _load_pastry_group_ids_expanded,
+    _load_product_group_index,
+    _normalize_date,
+    pastry_invoice_sum,
+)
+
+logger = logging.getLogger(__name__)
+
+# 9 колонок × 2000 строк — с запасом под лимит 32767 bind-параметров asyncpg
+_INSERT_BATCH = 2000
+
+# Последние закрытые дни, которые каждый запуск пересчитываются из iiko:
+# явки / выручку правят задним числом, сохранённый день иначе не обновится
+RECHECK_DAYS = 7
+
+
+@dataclass(slots=True)
+class PartialRow:
+    employee_id: str
+    dept_id: str
+    dept_name: str  # для листа (с запасными значениями)
+    dept_title: str  # departmentName как есть — ключ выручки мотивации
+    shifts: int
+    hours: float
+    earnings: float
+
+
+@dataclass(slots=True)
+class DayPartial:
+    day: date
+    rows: list[PartialRow]  # в порядке первой явки пары за день
+    revenue: dict[str, float]  # подразделение → выручка за день
+    pastry_sum: float
+
+
+@dataclass(slots=True)
+class MonthTotals:
+    """Свёртка дней месяца — входы payroll.build_fot_sections и мотивации."""
+
+    emp_dept_stats: dict[str, dict[str, dict]]
+    emp_dept_earnings: dict[tuple[str, str], float]
+    emp_shifts: dict[str, set[tuple[str, str]]]  # → revenue_motivation_from
+    emp_dates: dict[str, set[str]]  # → pastry_motivation_from
+    emp_depts: dict[str, list[str]]
+    revenue_index: dict[tuple[str, str], float]
+    pastry_sum: float
+    fetched_days: int = 0  # сколько дней в этом запуске пришлось тянуть из iiko
+
+    def dept_revenue(self) -> dict[str, float]:
+        """{подразделение: выручка за период} — как get_department_revenue_totals."""
+        totals: dict[str, float] = defaultdict(float)
+        for (_, dept_name), rev in self.revenue_index.items():
+            totals[dept_name] += rev
+        return dict(totals)
+
+
+# ═══════════════════════════════════════════════════════
+# Расчёт дней
+# ═══════════════════════════════════════════════════════
+
+
+def _day_range(first: date, last: date) -> list[date]:
+    return [first + timedelta(days=i) for i in range((last - first).days + 1)]
+
+
+def _runs(days: list[date]) -> list[tuple[date, date]]:
+    """Отсортированные дни → диапазоны подряд идущих (один запрос к iiko на диапазон)."""
+    runs: list[tuple[date, date]] = []
+    for d in days:
+        if runs and runs[-1][1] + timedelta(days=1) == d:
+            runs[-1] = (runs[-1][0], d)
+        else:
+            runs.append((d, d))
+    return runs
+
+
+def split_by_day(
+    records: list[dict], lo: date, hi: date, month_start: date
+) -> dict[date, list[dict]]:
+    """
+    Явки диапазона lo…hi → по дням начала смены.
+
+    Смена, начатая до lo, уже учтена в своём дне; исключение — начало месяца:
+    такие смены (как и в расчёте за весь месяц) относятся к первому дню.
+    Смена, начатая после hi, посчитается со своим днём. Неразборчивая дата —
+    в последний день диапазона.
+    """
+    by_day: dict[date, list[dict]] = {d: [] for d in _day_range(lo, hi)}
+    for rec in records:
+        dt = parse_dt(rec.get("dateFrom"))
+        d = dt.date() if dt else hi
+        if d < lo:
+            if lo != month_start:
+                continue
+            d = lo
+        elif d > hi:
+            continue
+        by_day[d].append(rec)
+    return by_day
+
+
+def day_partial(
+    day: date,
+    records: list[dict],
+    table: RateTable,
+    fullname_by_iiko: dict[str, str],
+    revenue: dict[str, float],
+    pastry_sum: float,
+) -> DayPartial:
+    """Явки одного дня → итоги по (сотрудник, цех); начисления — по ставке на этот день."""
+    cols = AttendanceColumns.from_records(records)
+    stats = dept_stats(cols)
+    pay = shift_pay(cols, table, fullname_by_iiko)
+    titles: dict[tuple[str, str], str] = {}
+    for rec in records:
+        emp_id = (rec.get("employeeId") or "").strip()
+        if emp_id:
+            dept_id = (rec.get("departmentId") or "").strip()
+            titles[(emp_id, dept_id)] = (rec.get("departmentName") or "").strip()
+    rows = []
+    for emp_id, dept_id in cols.pairs:
+        info = stats[emp_id][dept_id]
+        rows.append(
+            PartialRow(
+                employee_id=emp_id,
+                dept_id=dept_id,
+                dept_name=info["dept_name"],
+                dept_title=titles[(emp_id, dept_id)],
+                shifts=info["shifts"],
+                hours=info["hours"],
+                earnings=pay[(emp_id, dept_id)],
+            )
+        )
+    return DayPartial(day, rows, revenue, pastry_sum)
+
+
+async def _fetch_run(
+    lo: date,
+    hi: date,
+    month_start: date,
+    table: RateTable,
+    fullname_by_iiko: dict[str, str],
+    pastry_groups: set[str],
+    product_index: dict[str, str],
+) -> list[DayPartial]:
+    """Явки + OLAP-выручка + расходные накладные за lo…hi → итоги по дням."""
+    lo_s, hi_s = lo.isoformat(), hi.isoformat()
+    records = await fetch_attendance(
+        date_from=lo_s, date_to=hi_s, with_payment_details=False
+    )
+    revenue_index = _build_revenue_index(
+        await fetch_motivation_revenue_olap(lo_s, hi_s)
+    )
+    docs_by_day: dict[str, list[dict]] = defaultdict(list)
+    if pastry_groups:
+        for doc in await fetch_outgoing_invoices(lo_s, hi_s):
+            doc_day = _normalize_date(doc.get("dateIncoming") or "")[:10]
+            docs_by_day[doc_day or hi_s].append(doc)
+
+    revenue_by_day: dict[str, dict[str, float]] = defaultdict(dict)
+    for (day_s, dept_name), rev in revenue_index.items():
+        revenue_by_day[day_s][dept_name] = rev
+
+    parts = []
+    for day, day_records in split_by_day(records, lo, hi, month_start).items():
+        day_s = day.isoformat()
+        docs = docs_by_day.get(day_s)
+        parts.append(
+            day_partial(
+                day,
+                day_records,
+                table,
+                fullname_by_iiko,
+                revenue_by_day.get(day_s, {}),
+                pastry_invoice_sum(docs, pastry_groups, product_index) if docs else 0.0,
+            )
+        )
+    logger.info(
+        "[payroll_partials] %s…%s: явок %d, строк выручки %d",
+        lo_s,
+        hi_s,
+        len(records),
+        len(revenue_index),
+    )
+    return parts
+
+
+def fold_month(parts: list[DayPartial]) -> MonthTotals:
+    """Сложить дни (по возрастанию) в итоги месяца."""
+    stats: dict[str, dict[str, dict]] = {}
+    earnings: dict[tuple[str, str], float] = defaultdict(float)
+    emp_shifts: dict[str, set[tuple[str, str]]] = defaultdict(set)
+    emp_dates: dict[str, set[str]] = defaultdict(set)
+    emp_depts: dict[str, list[str]] = defaultdict(list)
+    revenue_index: dict[tuple[str, str], float] = {}
+    pastry_sum = 0.0
+    for part in parts:
+        day_s = part.day.isoformat()
+        for dept_name, rev in part.revenue.items():
+            revenue_index[(day_s, dept_name)] = rev
+        pastry_sum += part.pastry_sum
+        for r in part.rows:
+            info = stats.setdefault(r.employee_id, {}).setdefault(
+                r.dept_id, {"dept_name": "", "shifts": 0, "hours": 0.0}
+            )
+            info["dept_name"] = r.dept_name
+            info["shifts"] += r.shifts
+            info["hours"] += r.hours
+            earnings[(r.employee_id, r.dept_id)] += r.earnings
+            emp_dates[r.employee_id].add(day_s)
+            if r.dept_title:
+                emp_shifts[r.employee_id].add((day_s, r.dept_title))
+                if r.dept_title not in emp_depts[r.employee_id]:
+                    emp_depts[r.employee_id].append(r.dept_title)
+    return MonthTotals(
+        emp_dept_stats=stats,
+        emp_dept_earnings=dict(earnings),
+        emp_shifts=dict(emp_shifts),
+        emp_dates=dict(emp_dates),
+        emp_depts=dict(emp_depts),
+        revenue_index=revenue_index,
+        pastry_sum=pastry_sum,
+    )
+
+
+async def month_totals(
+    month_start: date,
+    today: date,
+    table: RateTable,
+    fullname_by_iiko: dict[str, str],
+) -> MonthTotals:
+    """
+    Итоги месяца month_start … today: сохранённые дни + досчитанные из iiko.
+
+    table — ставки (RateTable по текущей истории) для начислений новых дней.
+    Последние RECHECK_DAYS закрытых дней берутся из iiko заново, даже если
+    сохранены, — так доходят исправления явок задним числом.
+    """
+    closed_until = min(today, now_kgd().date() - timedelta(days=1))
+    recheck_from = max(month_start, closed_until - timedelta(days=RECHECK_DAYS - 1))
+    stored = await load_days(month_start, recheck_from - timedelta(days=1))
+    have = {p.day for p in stored}
+    need = [d for d in _day_range(month_start, today) if d not in have]
+
+    fetched: list[DayPartial] = []
+    if need:
+        pastry_groups = await _load_pastry_group_ids_expanded()
+        product_index = await _load_product_group_index() if pastry_groups else {}
+        for lo, hi in _runs(need):
+            fetched += await _fetch_run(
+                lo,
+                hi,
+                month_start,
+                table,
+                fullname_by_iiko,
+                pastry_groups,
+                product_index,
+            )
+        closed = [p for p in fetched if p.day <= closed_until]
+        if closed:
+            await save_days(closed)
+
+    logger.info(
+        "[payroll_partials] %s…%s: из БД %d дн., из iiko %d дн.",
+        month_start,
+        today,
+        len(stored),
+        len(fetched),
+    )
+    totals = fold_month(sorted(stored + fetched, key=lambda p: p.day))
+    totals.fetched_days = len(fetched)
+    return totals
+
+
+# ═══════════════════════════════════════════════════════
+# Хранение
+# ═══════════════════════════════════════════════════════
+
+
+async def load_days(first: date, last: date) -> list[DayPartial]:
+    """Сохранённые чистые (dirty=False) дни first … last, по возрастанию."""
+    if last < first:
+        return []
+    clean = (
+        select(PayrollDay.day)
+        .where(PayrollDay.day.between(first, last))
+        .where(PayrollDay.dirty.is_(False))
+    )
+    async with async_session_factory() as session:
+        days = (
+            (await session.execute(select(PayrollDay).where(PayrollDay.day.in_(clean))))
+            .scalars()
+            .all()
+        )
+        rows = (
+            (
+                await session.execute(
+                    select(PayrollDayPartial)
+                    .where(PayrollDayPartial.day.in_(clean))
+                    .order_by(PayrollDayPartial.day, PayrollDayPartial.seq)
+                )
+            )
+            .scalars()
+            .all()
+        )
+
+    by_day: dict[date, list[PartialRow]] = defaultdict(list)
+    for r in rows:
+        by_day[r.day].append(
+            PartialRow(
+                employee_id=r.employee_id,
+                dept_id=r.dept_id,
+                dept_name=r.dept_name,
+                dept_title=r.dept_title,
+                shifts=r.shifts,
+                hours=r.hours,
+                earnings=r.earnings,
+            )
+        )
+    return sorted(
+        (
+            DayPartial(d.day, by_day.get(d.day, []), dict(d.revenue), d.pastry_sum)
+            for d in days
+        ),
+        key=lambda p: p.day,
+    )
+
+
+async def save_days(parts: list[DayPartial]) -> None:
+    """Записать итоги дней (заменяя прежние) и снять dirty — одна транзакция."""
+    now = now_kgd()
+    day_list = [p.day for p in parts]
+    rows = [
+        {
+            "day": p.day,
+            "employee_id": r.employee_id,
+            "dept_id": r.dept_id,
+            "seq": seq,
+            "dept_name": r.dept_name,
+            "dept_title": r.dept_title,
+            "shifts": r.shifts,
+            "hours": r.hours,
+            "earnings": r.earnings,
+        }
+        for p in parts
+        for seq, r in enumerate(p.rows)
+    ]
+    stmt = pg_insert(PayrollDay).values(
+        [
+            {
+                "day": p.day,
+                "revenue": p.revenue,
+                "pastry_sum": p.pastry_sum,
+                "dirty": False,
+                "computed_at": now,
+            }
+            for p in parts
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["day"],
+        set_={
+            "revenue": stmt.excluded.revenue,
+            "pastry_sum": stmt.excluded.pastry_sum,
+            "dirty": False,
+            "computed_at": stmt.excluded.computed_at,
+        },
+    )
+    async with async_session_factory() as session:
+        await session.execute(
+            delete(PayrollDayPartial).where(PayrollDayPartial.day.in_(day_list))
+        )
+        await session.execute(stmt)
+        for offset in range(0, len(rows), _INSERT_BATCH):
+            await session.execute(
+                pg_insert(PayrollDayPartial).values(
+                    rows[offset : offset + _INSERT_BATCH]
+                )
+            )
+        await session.commit()
+    logger.info(
+        "[payroll_partials] Сохранено дней: %d, строк: %d", len(parts), len(rows)
+    )
+
+
+# ═══════════════════════════════════════════════════════
+# Правки «Истории ставок»
+# ═══════════════════════════════════════════════════════
+
+
+def rate_change_start(old: list[dict], new: list[dict]) -> date | None:
+    """
+    Первая дата, с которой правка истории меняет ставку или тип — а значит,
+    начисления за смены. Записи — dict с employee_name, sal_type, rate,
+    valid_from, valid_to (до и после синхронизации).
+    Мотивация в дневных итогах не хранится, её правки дни не задевают.
+    """
+    before = {(r["employee_name"], r["valid_from"]): r for r in old}
+    after = {(r["employee_name"], r["valid_from"]): r for r in new}
+    starts: list[date] = []
+    for key in before.keys() | after.keys():
+        a, b = before.get(key), after.get(key)
+        if a is None or b is None:
+            starts.append(key[1])
+        elif (a["sal_type"], float(a["rate"])) != (b["sal_type"], float(b["rate"])):
+            starts.append(key[1])
+        elif a["valid_to"] != b["valid_to"]:
+            # Сдвинулся конец — меняются дни после более раннего из концов
+            ends = [d for d in (a["valid_to"], b["valid_to"]) if d is not None]
+            starts.append(min(ends) + timedelta(days=1))
+    return min(starts, default=None)
+
+
+async def mark_dirty_from(first: date) -> int:
+    """Пометить сохранённые дни начиная с first для пересчёта. Возвращает их число."""
+    async with async_session_factory() as session:
+        result = await session.execute(
+            update(PayrollDay)
+            .where(PayrollDay.day >= first)
+            .where(PayrollDay.dirty.is_(False))
+            .values(dirty=True)
+        )
+        await session.commit()
+    if result.rowcount:
+        logger.info(
+            "[payroll_partials] Правка «Истории ставок» с %s: пересчитать дней %d",
+            first,
+            result.rowcount,
+        )
+    return result.rowcount
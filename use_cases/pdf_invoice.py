@@ -8,6 +8,7 @@ Use-case: генерация PDF-документа расходной накл
 Используется:
   - invoice_handlers.py — при отправке накладной по шаблону
   - request_handlers.py — при одобрении заявки (approve) и при отправке заявки
+  (через render_invoice_pdf — в пуле процессов)
 """
 
 import io
@@ -16,6 +17,7 @@ import os
 import time
 from datetime import datetime
 from use_cases._helpers import now_kgd
+from utils.cpu_pool import run_cpu
 
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
@@ -404,6 +406,24 @@ def generate_invoice_pdf(
     return pdf_bytes
 
 
+async def render_invoice_pdf(**kwargs) -> bytes:
+    """
+    generate_invoice_pdf в пуле процессов (utils/cpu_pool.py).
+
+    reportlab на сотне позиций держит GIL сотни мс — в asyncio.to_thread
+    это тормозило всех пользователей бота. Аргументы те же (keyword-only).
+    """
+    t0 = time.monotonic()
+    pdf_bytes = await run_cpu(generate_invoice_pdf, **kwargs)
+    logger.info(
+        "[pdf] PDF из пула: %d позиций, %.1f КБ, %.3f сек (с очередью)",
+        len(kwargs.get("items", [])),
+        len(pdf_bytes) / 1024,
+        time.monotonic() - t0,
+    )
+    return pdf_bytes
+
+
 def generate_invoice_filename(
     *,
     counteragent_name: str = "",
@@ -66,6 +66,7 @@ _FETCH_RETRY_DELAYS = (1.5, 3.0)  # секунды между попытками
 async def invalidate_cache() -> None:
     """Принудительно сбросить основной кеш прав (stale остаётся)."""
     await invalidate_key(_CACHE_KEY)
+    gsheet.refresh_snapshot(gsheet.PERMS_TAB)
     logger.info("[%s] Кеш прав инвалидирован", LABEL)
 
 
@@ -0,0 +1,104 @@
+"""
+Общий in-memory справочник product_id → name (таблица iiko_product).
+
+Нужен там, где имена товаров маппятся на каждый вызов (стоп-лист по вебхуку,
+отправка стоп-листа пользователю): вместо SELECT ... WHERE id IN (...) на
+каждый flush — один SELECT всей номенклатуры раз в NAMES_TTL.
+
+Стратегия:
+  - первый вызов загружает все id → name (~2-3 тыс. строк, ~300 КБ RAM);
+  - id, которых нет в кеше (товар создан после загрузки), добираются
+    точечным запросом; не найденные в БД запоминаются до истечения TTL;
+  - invalidate() — после sync_products (use_cases/sync.py).
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections.abc import Iterable
+
+from sqlalchemy import select
+
+from db.engine import async_session_factory
+from db.models import Product
+from use_cases._ttl_cache import TtlCache
+
+logger = logging.getLogger(__name__)
+
+NAMES_TTL = 1800  # 30 минут; sync_products сбрасывает раньше
+
+_cache = TtlCache(default_ttl=NAMES_TTL, name="product_ref")
+_load_lock = asyncio.Lock()
+
+
+def _display_name(name: str | None) -> str:
+    return name or "[без названия]"
+
+
+async def _load_all() -> dict[str, str]:
+    t0 = time.monotonic()
+    async with async_session_factory() as session:
+        rows = (await session.execute(select(Product.id, Product.name))).all()
+    names = {str(pid): _display_name(name) for pid, name in rows}
+    logger.info(
+        "[product_ref] Загружено %d имён товаров за %.2f сек",
+        len(names),
+        time.monotonic() - t0,
+    )
+    return names
+
+
+async def _ensure_loaded() -> tuple[dict[str, str], set[str]]:
+    """(id → name, id'ы, которых нет в iiko_product) — общие объекты кеша."""
+    entry = _cache.get("names")
+    if entry is not None:
+        return entry
+    async with _load_lock:  # параллельные flush'и org'ов — одна загрузка
+        entry = _cache.get("names")
+        if entry is None:
+            entry = (await _load_all(), set())
+            _cache.set("names", entry)
+    return entry
+
+
+async def get_product_names(product_ids: Iterable[str]) -> dict[str, str]:
+    """
+    Маппинг UUID → name. Id, отсутствующих в iiko_product, в ответе нет.
+    Невалидные UUID пропускаются.
+    """
+    ids = set(product_ids)
+    if not ids:
+        return {}
+
+    names, missing = await _ensure_loaded()
+    unknown: list[uuid.UUID] = []
+    for pid in ids - names.keys() - missing:
+        try:
+            unknown.append(uuid.UUID(pid))
+        except ValueError:
+            missing.add(pid)
+
+    if unknown:
+        async with async_session_factory() as session:
+            rows = (
+                await session.execute(
+                    select(Product.id, Product.name).where(Product.id.in_(unknown))
+                )
+            ).all()
+        for pid, name in rows:
+            names[str(pid)] = _display_name(name)
+        missing.update(str(u) for u in unknown if str(u) not in names)
+        logger.debug(
+            "[product_ref] Дозагрузка: %d из %d новых id найдено",
+            len(rows),
+            len(unknown),
+        )
+
+    return {pid: names[pid] for pid in ids if pid in names}
+
+
+def invalidate() -> None:
+    """Сбросить справочник (после синхронизации номенклатуры)."""
+    if _cache.drop_all():
+        logger.debug("[product_ref] Кеш имён сброшен")
@@ -0,0 +1,406 @@
+"""
+Распределённые блокировки и выбор лидера поверх Redis.
+
+Нужны, чтобы бот можно было запускать в нескольких репликах:
+  - DistributedLock — sync-lock «одна синхронизация на все реплики»
+    с fencing-токеном (монотонный счётчик INCR на каждый захват):
+    долгая операция вызывает ensure_held() перед каждой необратимой
+    записью — держатель с потерянной арендой получает LockLost;
+  - LeaderElector   — аренда (lease) лидерства: только лидер выполняет
+    задачи APScheduler (07:00 sync, 23:00 перемещение, 03:00 очистка).
+
+Механика аренды:
+  SET key owner NX PX ttl  → захват; Lua-скрипт «PEXPIRE если владелец я» → продление;
+  Lua «DEL если владелец я» → освобождение. TTL = 2/3 LEADER_LEASE_SEC,
+  heartbeat = 1/3 → после падения лидера новый выбирается не позже
+  чем через LEADER_LEASE_SEC.
+
+Redis недоступен → деградация до локального asyncio.Lock (одна реплика
+продолжает работать, как раньше) + warning в лог. Fencing при этом
+закрыт: check_fence не подтвердить → False, держатель прерывает запись.
+Лидерство: heartbeat падает с ошибкой Redis → LeaderElector.degraded;
+задачи продолжает только последний подтверждённый лидер (его epoch),
+остальные реплики их пропускают. Неидемпотентные задачи (перемещение)
+без Redis не выполняются нигде.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+
+from use_cases.redis_cache import get_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "bot:lock:"
+LEADER_KEY = "bot:leader:scheduler"
+
+LOCK_TTL_SEC = 60  # аренда sync-lock (продлевается, пока lock удерживается)
+LEADER_LEASE_SEC = 30  # верхняя граница failover
+
+# Уникальный id процесса-реплики
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+# SET NX + INCR fencing-счётчика атомарно. Возвращает токен или 0.
+_ACQUIRE_LUA = """
+if redis.call('set', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return redis.call('incr', KEYS[2])
+end
+return 0
+"""
+
+_RENEW_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Локальный слой: повторный клик в той же реплике отсекается без round-trip в Redis
+_local_locks: dict[str, asyncio.Lock] = {}
+
+
+class LockLost(RuntimeError):
+    """Аренда lock потеряна: после нас его захватил другой держатель."""
+
+
+def _local_lock(name: str) -> asyncio.Lock:
+    if name not in _local_locks:
+        _local_locks[name] = asyncio.Lock()
+    return _local_locks[name]
+
+
+async def check_fence(name: str, token: int) -> bool:
+    """
+    True, если token — последний выданный для name (никто не захватил
+    lock после нас). Проверять перед необратимыми записями долгой операции.
+    Redis недоступен → False: аренда могла истечь, и подтвердить её нечем.
+    """
+    try:
+        redis = await get_redis()
+        current = await redis.get(f"{KEY_PREFIX}{name}:fence")
+    except Exception:
+        logger.warning("[redis_lock] check_fence(%s): Redis недоступен", name)
+        return False
+    return current is None or int(current) == token
+
+
+# ═══════════════════════════════════════════════════════
+# DistributedLock — sync-lock на все реплики
+# ═══════════════════════════════════════════════════════
+
+
+class DistributedLock:
+    """
+    Неблокирующий lock на все реплики.
+
+        lock = DistributedLock("sync_entities")
+        if not await lock.acquire_nowait():
+            return  # уже выполняется (в этой или другой реплике)
+        try:
+            ...
+        finally:
+            await lock.release()
+
+    Пока lock удерживается, фоновая задача продлевает аренду.
+    token — fencing-токен захвата (0 при деградации до локального lock).
+    Перед необратимыми записями долгой операции — await lock.ensure_held().
+    """
+
+    __slots__ = ("name", "ttl", "token", "_owner", "_renew_task", "_held", "_lost")
+
+    def __init__(self, name: str, ttl: float = LOCK_TTL_SEC) -> None:
+        self.name = name
+        self.ttl = ttl
+        self.token: int | None = None
+        self._owner = f"{INSTANCE_ID}:{uuid.uuid4().hex[:8]}"
+        self._renew_task: asyncio.Task | None = None
+        self._held = False
+        self._lost = False
+
+    @property
+    def _key(self) -> str:
+        return f"{KEY_PREFIX}{self.name}"
+
+    async def acquire_nowait(self) -> bool:
+        """Попытаться захватить без ожидания. False — уже занят."""
+        local = _local_lock(self.name)
+        if local.locked():
+            return False
+        await local.acquire()  # свободен → захват без переключения контекста
+
+        try:
+            redis = await get_redis()
+            token = await redis.eval(
+                _ACQUIRE_LUA,
+                2,
+                self._key,
+                f"{self._key}:fence",
+                self._owner,
+                int(self.ttl * 1000),
+            )
+        except Exception:
+            logger.warning(
+                "[redis_lock] %s: Redis недоступен — только локальный lock",
+                self.name,
+                exc_info=True,
+            )
+            token = 0
+        else:
+            if not token:
+                local.release()
+                return False
+            self._renew_task = asyncio.create_task(self._renew_loop())
+
+        self.token = int(token)
+        self._held = True
+        return True
+
+    async def _renew_loop(self) -> None:
+        interval = self.ttl / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                redis = await get_redis()
+                ok = await redis.eval(
+                    _RENEW_LUA, 1, self._key, self._owner, int(self.ttl * 1000)
+                )
+            except Exception:
+                logger.warning(
+                    "[redis_lock] %s: продление не удалось", self.name, exc_info=True
+                )
+                continue
+            if not ok:
+                logger.warning(
+                    "[redis_lock] %s: аренда потеряна (token=%s)",
+                    self.name,
+                    self.token,
+                )
+                self._lost = True
+                return
+
+    async def ensure_held(self) -> None:
+        """
+        Проверка перед необратимой записью: аренда не потеряна и token —
+        последний выданный (fencing). Иначе LockLost — запись не делать
+        (в том числе если Redis пропал после захвата).
+        При деградации до локального lock (token 0) проверять нечего.
+        """
+        if self._lost or (self.token and not await check_fence(self.name, self.token)):
+            self._lost = True
+            raise LockLost(f"{self.name}: lock потерян (token={self.token})")
+
+    async def release(self) -> None:
+        if not self._held:
+            return
+        self._held = False
+        if self._renew_task is not None:
+            self._renew_task.cancel()
+            self._renew_task = None
+        if self.token:
+            try:
+                redis = await get_redis()
+                await redis.eval(_RELEASE_LUA, 1, self._key, self._owner)
+            except Exception:
+                logger.warning(
+                    "[redis_lock] %s: release не удался (истечёт по TTL)",
+                    self.name,
+                    exc_info=True,
+                )
+        _local_lock(self.name).release()
+
+
+# ═══════════════════════════════════════════════════════
+# LeaderElector — только лидер выполняет задачи планировщика
+# ═══════════════════════════════════════════════════════
+
+
+class LeaderElector:
+    """
+    Выбор лидера через аренду ключа в Redis.
+
+    start() — фоновый heartbeat: лидер продлевает аренду, остальные
+    пытаются её захватить. epoch — fencing-токен текущего срока лидерства.
+    Heartbeat падает с ошибкой Redis → degraded: выбрать лидера нельзя.
+    wait_leader() отвечает True только последнему подтверждённому лидеру
+    (или реплике, которая Redis ни разу не видела, — выбирать было не из
+    кого), остальные задачи пропускают.
+    """
+
+    def __init__(self, key: str = LEADER_KEY, lease: float = LEADER_LEASE_SEC):
+        self.key = key
+        self.lease = lease
+        self.epoch: int | None = None
+        self._owner = INSTANCE_ID
+        self._is_leader = False
+        self._redis_down = False
+        self._seen_redis = False  # хоть один heartbeat прошёл
+        self._degraded_epoch: int | None = None  # наш срок на момент сбоя Redis
+        self._became_leader = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._is_leader
+
+    @property
+    def degraded(self) -> bool:
+        """Redis недоступен — лидерство не определить."""
+        return self._redis_down
+
+    @property
+    def degraded_leader(self) -> bool:
+        """
+        Redis недоступен, и эта реплика — последний подтверждённый лидер
+        (держала срок degraded_epoch) или Redis не видела ни разу.
+        """
+        return self._redis_down and (
+            self._degraded_epoch is not None or not self._seen_redis
+        )
+
+    @property
+    def degraded_epoch(self) -> int | None:
+        """Срок лидерства, с которым реплика работает без Redis."""
+        return self._degraded_epoch if self._redis_down else None
+
+    @property
+    def _ttl_ms(self) -> int:
+        return int(self.lease * 2 / 3 * 1000)
+
+    async def _tick(self) -> None:
+        """Один heartbeat: продлить аренду или попытаться её захватить."""
+        redis = await get_redis()
+        if self._is_leader:
+            ok = await redis.eval(_RENEW_LUA, 1, self.key, self._owner, self._ttl_ms)
+            if not ok:
+                self._set_leader(False)
+                logger.warning(
+                    "[leader] %s: лидерство потеряно (epoch=%s)",
+                    self._owner,
+                    self.epoch,
+                )
+            return
+
+        epoch = await redis.eval(
+            _ACQUIRE_LUA, 2, self.key, f"{self.key}:fence", self._owner, self._ttl_ms
+        )
+        if epoch:
+            self.epoch = int(epoch)
+            self._set_leader(True)
+            logger.info("[leader] %s: стал лидером (epoch=%d)", self._owner, epoch)
+
+    def _set_leader(self, value: bool) -> None:
+        self._is_leader = value
+        if value:
+            self._became_leader.set()
+        else:
+            self._became_leader.clear()
+
+    async def _loop(self) -> None:
+        interval = self.lease / 3
+        while True:
+            try:
+                await self._tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Redis недоступен: лидерство вслепую не держим, задачи
+                # продолжает только последний подтверждённый лидер
+                if not self._redis_down:
+                    self._degraded_epoch = self.epoch if self._is_leader else None
+                    logger.warning(
+                        "[leader] heartbeat не удался — задачи только на последнем "
+                        "лидере (эта реплика: epoch=%s)",
+                        self._degraded_epoch,
+                        exc_info=True,
+                    )
+                if self._is_leader:
+                    self._set_leader(False)
+                self._redis_down = True
+                self._became_leader.set()  # разбудить ждущих wait_leader()
+            else:
+                self._seen_redis = True
+                if self._redis_down:
+                    self._redis_down = False
+                    self._degraded_epoch = None
+                    logger.info("[leader] Redis снова доступен")
+                    if not self._is_leader:
+                        self._became_leader.clear()
+            await asyncio.sleep(interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Остановить heartbeat и отдать лидерство (мгновенный failover)."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._is_leader:
+            self._set_leader(False)
+            try:
+                redis = await get_redis()
+                await redis.eval(_RELEASE_LUA, 1, self.key, self._owner)
+                logger.info("[leader] %s: лидерство освобождено", self._owner)
+            except Exception:
+                logger.warning("[leader] release не удался", exc_info=True)
+
+    async def wait_leader(self, timeout: float) -> bool:
+        """
+        Дождаться лидерства не дольше timeout сек.
+        При degraded (Redis недоступен) — True только degraded_leader.
+        """
+        if self._is_leader or self.degraded_leader:
+            return True
+        try:
+            await asyncio.wait_for(self._became_leader.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return self._is_leader or self.degraded_leader
+
+
+async def run_once(
+    job_id: str,
+    fire_key: str,
+    coro_fn: Callable[[], Awaitable[None]],
+    ttl: int = 86400,
+    idempotent: bool = True,
+) -> bool:
+    """
+    Выполнить coro_fn один раз на fire_key по всем репликам
+    (SET NX маркер — защита от двойного запуска на стыке смены лидера).
+    Redis недоступен → идемпотентная задача выполняется без маркера,
+    неидемпотентная — нет (повтор на другой реплике не отсечь).
+    """
+    try:
+        redis = await get_redis()
+        first = await redis.set(
+            f"bot:job:{job_id}:{fire_key}", INSTANCE_ID, nx=True, ex=ttl
+        )
+    except Exception:
+        if not idempotent:
+            logger.warning(
+                "[leader] %s: Redis недоступен — без маркера не выполняю", job_id
+            )
+            return False
+        logger.warning("[leader] %s: Redis недоступен, run-once без маркера", job_id)
+        first = True
+    if not first:
+        logger.info("[leader] %s (%s) уже выполнен другой репликой", job_id, fire_key)
+        return False
+    t0 = time.monotonic()
+    await coro_fn()
+    logger.info("[leader] %s (%s) за %.1f сек", job_id, fire_key, time.monotonic() - t0)
+    return True
@@ -176,8 +176,20 @@ async def calculate_revenue_motivation(
         )
         return {}
 
-    # ── 3. Индексируем явки по iiko_id ──
-    # emp_iiko_id → [(shift_date_str, dept_name), ...]
+    return revenue_motivation_from(
+        emp_shifts=attendance_shift_pairs(attendance_records),
+        revenue_index=revenue_index,
+        emp_full_names=emp_full_names,
+        history_index=history_index,
+        date_from=date_from,
+        date_to=date_to,
+    )
+
+
+def attendance_shift_pairs(
+    attendance_records: list[dict],
+) -> dict[str, set[tuple[str, str]]]:
+    """emp_iiko_id → уникальные (дата смены "YYYY-MM-DD", подразделение) из явок."""
     emp_shifts: dict[str, set[tuple[str, str]]] = defaultdict(set)
     for rec in attendance_records:
         emp_id = (rec.get("employeeId") or "").strip()
@@ -187,8 +199,25 @@ async def calculate_revenue_motivation(
             continue
         shift_date_str = date_from_raw[:10]  # "YYYY-MM-DD"
         emp_shifts[emp_id].add((shift_date_str, dept_name))
+    return emp_shifts
+
+
+def revenue_motivation_from(
+    emp_shifts: dict[str, set[tuple[str, str]]],
+    revenue_index: dict[tuple[str, str], float],
+    emp_full_names: dict[str, str],
+    history_index: dict[str, list[dict]],
+    date_from: date,
+    date_to: date,
+) -> dict[str, dict[str, float]]:
+    """
+    Мотивация «от выручки» по готовым данным (без I/O).
 
-    # ── 4. Для каждого сотрудника рассчитываем мотивацию ──
+    emp_shifts    — emp_iiko_id → {(дата, подразделение)} (attendance_shift_pairs
+                    или дневные итоги payroll_partials)
+    revenue_index — (дата, подразделение) → выручка (_build_revenue_index)
+    """
+    # Для каждого сотрудника рассчитываем мотивацию
     result: dict[str, dict[str, float]] = {}
 
     for emp_iiko_id, full_name in emp_full_names.items():
@@ -450,9 +479,6 @@ async def calculate_pastry_invoice_motivation(
     t_from_str = date_from.strftime("%Y-%m-%d")
     t_to_str = date_to.strftime("%Y-%m-%d")
 
-    # Количество дней в периоде
-    period_days = (date_to - date_from).days + 1
-
     # ── 1. Параллельная загрузка данных ──
     if history_index is None:
         (
@@ -487,6 +513,30 @@ async def calculate_pastry_invoice_motivation(
         return {}, 0.0
 
     # ── 2. Суммируем ВСЕ кондитерские позиции из расходных накладных ──
+    total_pastry_sum = pastry_invoice_sum(outgoing_docs, pastry_groups, product_index)
+
+    if total_pastry_sum <= 0:
+        return {}, 0.0
+
+    emp_dates, emp_depts = attendance_work_days(attendance_records)
+    result = pastry_motivation_from(
+        total_pastry_sum=total_pastry_sum,
+        emp_dates=emp_dates,
+        emp_depts=emp_depts,
+        emp_full_names=emp_full_names,
+        history_index=history_index,
+        date_from=date_from,
+        date_to=date_to,
+    )
+    return result, total_pastry_sum
+
+
+def pastry_invoice_sum(
+    outgoing_docs: list[dict],
+    pastry_groups: set[str],
+    product_index: dict[str, str],
+) -> float:
+    """Сумма кондитерских позиций расходных накладных (product → группа ∈ pastry_groups)."""
     total_pastry_sum = 0.0
     matched_items = 0
     total_items = 0
@@ -514,11 +564,16 @@ async def calculate_pastry_invoice_motivation(
         matched_items,
         total_pastry_sum,
     )
+    return total_pastry_sum
 
-    if total_pastry_sum <= 0:
-        return {}, 0.0
 
-    # ── 3. Индексируем явки: iiko_id → уникальные даты + подразделения ──
+def attendance_work_days(
+    attendance_records: list[dict],
+) -> tuple[dict[str, set[str]], dict[str, list[str]]]:
+    """
+    Из явок: emp_iiko_id → уникальные даты работы "YYYY-MM-DD" и
+    emp_iiko_id → подразделения в порядке первого появления.
+    """
     emp_dates: dict[str, set[str]] = defaultdict(set)
     emp_depts: dict[str, list[str]] = defaultdict(list)
     for rec in attendance_records:
@@ -531,8 +586,26 @@ async def calculate_pastry_invoice_motivation(
             emp_dates[emp_id].add(date_from_raw[:10])  # "YYYY-MM-DD"
         if dept_name and dept_name not in emp_depts[emp_id]:
             emp_depts[emp_id].append(dept_name)
+    return emp_dates, emp_depts
+
+
+def pastry_motivation_from(
+    total_pastry_sum: float,
+    emp_dates: dict[str, set[str]],
+    emp_depts: dict[str, list[str]],
+    emp_full_names: dict[str, str],
+    history_index: dict[str, list[dict]],
+    date_from: date,
+    date_to: date,
+) -> dict[str, dict[str, float]]:
+    """
+    Мотивация «от накладных кондитерки» по готовым данным (без I/O):
+    бонус = total_pastry_sum × дни_работы / дни_периода × mot_pct / 100.
+    """
+    # Количество дней в периоде
+    period_days = (date_to - date_from).days + 1
 
-    # ── 4. Рассчитываем мотивацию с пропорцией по дням ──
+    # Рассчитываем мотивацию с пропорцией по дням
     result: dict[str, dict[str, float]] = {}
 
     for emp_iiko_id, full_name in emp_full_names.items():
@@ -591,7 +664,7 @@ async def calculate_pastry_invoice_motivation(
         len(result),
         total_pastry_sum,
     )
-    return result, total_pastry_sum
+    return result
 
 
 async def get_pastry_invoice_motivation_map(
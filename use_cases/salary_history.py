@@ -147,6 +147,18 @@ async def sync_salary_history(triggered_by: str | None = None) -> int:
 
     # ── 4. Upsert в БД ──
     async with async_session_factory() as session:
+        # Снимок до upsert: сверка для дневных итогов ФОТ и поиск сирот (4b)
+        all_db = (await session.execute(select(SalaryHistory))).scalars().all()
+        before = [
+            {
+                "employee_name": r.employee_name,
+                "sal_type": r.sal_type,
+                "rate": r.rate,
+                "valid_from": r.valid_from,
+                "valid_to": r.valid_to,
+            }
+            for r in all_db
+        ]
         for rec in db_records:
             stmt = pg_insert(SalaryHistory).values(**rec)
             stmt = stmt.on_conflict_do_update(
@@ -165,9 +177,9 @@ async def sync_salary_history(triggered_by: str | None = None) -> int:
     logger.info("[salary_history] Upsert в БД: %d записей", len(db_records))
 
     # ── 4b. Удаляем из БД записи, которых больше нет в GSheet ──
+    # (upsert трогает только ключи листа — сироты те же, что в снимке до него)
     sheet_keys = {(r["employee_name"], r["valid_from"]) for r in db_records}
     async with async_session_factory() as session:
-        all_db = (await session.execute(select(SalaryHistory))).scalars().all()
         orphan_ids = [
             rec.id
             for rec in all_db
@@ -185,6 +197,16 @@ async def sync_salary_history(triggered_by: str | None = None) -> int:
         else:
             logger.info("[salary_history] Нет записей для удаления из БД")
 
+    # ── 4c. Ставки изменились задним числом → дневные итоги ФОТ к пересчёту ──
+    try:
+        from use_cases.payroll_partials import mark_dirty_from, rate_change_start
+
+        first = rate_change_start(before, db_records)
+        if first is not None:
+            await mark_dirty_from(first)
+    except Exception:
+        logger.exception("[salary_history] Не удалось пометить дневные итоги ФОТ")
+
     # ── 5. Записываем valid_to обратно в GSheet ──
     await write_salary_history_valid_to(sheet_updates)
 
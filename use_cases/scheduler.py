@@ -7,12 +7,17 @@ Use-case: автоматическая ежедневная синхрониза
 
 Архитектура:
   - APScheduler AsyncIOScheduler с CronTrigger
-  - Каждая задача оборачивается в try/except + SyncLog
-  - Уведомление админов о результате через Telegram
+  - 07:00 — DAG этапов (DAILY_STAGES, use_cases/sync_dag.py): независимые
+    этапы параллельно, тайминг каждого этапа → iiko_sync_log
+  - Уведомление админов о результате через Telegram;
+    при ошибках — кнопка «повторить упавшие этапы» (retry_failed_daily_stages)
 
 Подключение:
   - start_scheduler(bot) — вызывается из main.py при старте бота
-  - stop_scheduler()     — вызывается при shutdown
+  - stop_scheduler()     — вызывается при shutdown (await, отдаёт лидерство)
+
+Несколько реплик: планировщик стартует в каждой, но задачи выполняет
+только лидер (use_cases/redis_lock.LeaderElector). Failover ≤ LEADER_LEASE_SEC.
 """
 
 import asyncio
@@ -25,6 +30,20 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 
 from use_cases._helpers import now_kgd, KGD_TZ
+from use_cases.redis_lock import INSTANCE_ID, DistributedLock, LeaderElector, run_once
+from use_cases.sync_dag import (
+    SYSTEM_FINTABLO,
+    SYSTEM_GSHEET,
+    SYSTEM_IIKO,
+    Stage,
+    StageResult,
+    critical_path,
+    get_last_run,
+    report_lines as dag_report_lines,
+    run_dag,
+    with_descendants,
+)
+from utils.metrics import JOB_DURATION, JOB_FAILURES
 
 logger = logging.getLogger(__name__)
 
@@ -34,210 +53,319 @@ TRIGGERED_BY = "scheduler"
 
 
 # ═══════════════════════════════════════════════════════
-# Основная задача: полная синхронизация
+# Основная задача: полная синхронизация (DAG этапов)
 # ═══════════════════════════════════════════════════════
 
+DAILY_PREFIX = "daily_sync"
+DAILY_RETRY_CALLBACK = "dsync_retry"
 
-async def _daily_full_sync() -> None:
-    """
-    Ежедневная полная синхронизация всех данных:
-      1. iiko: справочники + подразделения + склады + номенклатура и т.д.
-      2. FinTablo: все 13 справочников
-      3. Остатки по складам (sync_stock_balances)
-      4. Min/max из Google Таблицы → БД (sync_min_stock)
-      5. Номенклатура БД → Google Таблица «Мин.остатки» (sync_nomenclature_to_gsheet)
-      6. Обновить «Маппинг Справочник» в Google Таблице (GOODS-товары)
-    """
-    t0 = time.monotonic()
-    started = now_kgd()
-    logger.info(
-        "=== [scheduler] Ежедневная синхронизация СТАРТ (%s) ===",
-        started.strftime("%Y-%m-%d %H:%M"),
+# Один прогон за раз на все реплики: cron 07:00 и кнопка «повторить упавшие»
+# не пересекаются (DistributedLock(DAILY_PREFIX)).
+
+
+async def _stage_iiko_ft(ctx: dict) -> StageResult:
+    from use_cases.sync import sync_everything_with_report
+
+    iiko_lines, ft_lines = await sync_everything_with_report(
+        triggered_by=ctx["triggered_by"]
     )
+    lines = ["📊 <b>iiko:</b>", *iiko_lines, "", "📈 <b>FinTablo:</b>", *ft_lines]
+    return StageResult(lines)
 
-    report_lines: list[str] = []
 
-    # ── 1. iiko + FinTablo (параллельно) ──
-    try:
-        from use_cases.sync import sync_everything_with_report
+async def _stage_stock(ctx: dict) -> StageResult:
+    from use_cases.sync_stock_balances import sync_stock_balances
 
-        iiko_lines, ft_lines = await sync_everything_with_report(
-            triggered_by=TRIGGERED_BY
-        )
-        report_lines.append("📊 <b>iiko:</b>")
-        report_lines.extend(iiko_lines)
-        report_lines.append("")
-        report_lines.append("📈 <b>FinTablo:</b>")
-        report_lines.extend(ft_lines)
-    except Exception:
-        logger.exception("[scheduler] Ошибка sync iiko/FinTablo")
-        report_lines.append("❌ iiko/FinTablo: ошибка синхронизации")
+    count = await sync_stock_balances(triggered_by=ctx["triggered_by"])
+    return StageResult([f"\n📦 Остатки: ✅ {count} позиций"], count)
 
-    # ── 2. Остатки по складам ──
-    try:
-        from use_cases.sync_stock_balances import sync_stock_balances
 
-        stock_count = await sync_stock_balances(triggered_by=TRIGGERED_BY)
-        report_lines.append(f"\n📦 Остатки: ✅ {stock_count} позиций")
-    except Exception:
-        logger.exception("[scheduler] Ошибка sync остатков")
-        report_lines.append("\n📦 Остатки: ❌ ошибка")
+async def _stage_min_max(ctx: dict) -> StageResult:
+    from use_cases.sync_min_stock import sync_min_stock_from_gsheet
 
-    # ── 3. Min/max из Google Таблицы (GSheet → БД) ──
-    try:
-        from use_cases.sync_min_stock import sync_min_stock_from_gsheet
+    count = await sync_min_stock_from_gsheet(triggered_by=ctx["triggered_by"])
+    return StageResult([f"📋 Min/max GSheet→БД: ✅ {count} записей"], count)
 
-        gs_count = await sync_min_stock_from_gsheet(triggered_by=TRIGGERED_BY)
-        report_lines.append(f"📋 Min/max GSheet→БД: ✅ {gs_count} записей")
-    except Exception:
-        logger.exception("[scheduler] Ошибка sync min/max GSheet")
-        report_lines.append("📋 Min/max GSheet→БД: ❌ ошибка")
 
-    # ── 4. Номенклатура БД → GSheet (обновляет лист мин.остатков) ──
-    try:
-        from use_cases.sync_min_stock import sync_nomenclature_to_gsheet
+async def _stage_nomenclature(ctx: dict) -> StageResult:
+    from use_cases.sync_min_stock import sync_nomenclature_to_gsheet
 
-        nomen_count = await sync_nomenclature_to_gsheet(triggered_by=TRIGGERED_BY)
-        report_lines.append(f"📦 Номенкл.→GSheet: ✅ {nomen_count} товаров")
-    except Exception:
-        logger.exception("[scheduler] Ошибка sync номенклатуры в GSheet")
-        report_lines.append("📦 Номенкл.→GSheet: ❌ ошибка")
+    count = await sync_nomenclature_to_gsheet(triggered_by=ctx["triggered_by"])
+    return StageResult([f"📦 Номенкл.→GSheet: ✅ {count} товаров"], count)
 
-    # ── 5. Обновить справочник товаров для маппинга ──
-    try:
-        from use_cases.ocr_mapping import refresh_ref_sheet
 
-        ref_count = await refresh_ref_sheet()
-        report_lines.append(f"🗂 Маппинг справочник: ✅ {ref_count} товаров")
-    except Exception:
-        logger.exception("[scheduler] Ошибка обновления справочника маппинга")
-        report_lines.append("🗂 Маппинг справочник: ❌ ошибка")
+async def _stage_mapping_ref(ctx: dict) -> StageResult:
+    from use_cases.ocr_mapping import refresh_ref_sheet
 
-    # ── 6. История ставок — синхронизация перед расчётом ФОТ ──
-    try:
-        from use_cases.salary_history import sync_salary_history
+    count = await refresh_ref_sheet()
+    return StageResult([f"🗂 Маппинг справочник: ✅ {count} товаров"], count)
 
-        hist_count = await sync_salary_history(triggered_by=TRIGGERED_BY)
-        report_lines.append(f"📋 История ставок: ✅ {hist_count} записей")
-    except Exception:
-        logger.exception("[scheduler] Ошибка синхронизации истории ставок")
-        report_lines.append("📋 История ставок: ❌ ошибка")
-
-    # ── Опорная дата: вчера ──
-    # Cron запускается в 07:00 — данные «сегодня» ещё пусты.
-    # Используем вчерашний день, чтобы захватить полный предыдущий день:
-    #   1 марта 07:00 → yesterday = 28 февраля → ФОТ/ОПИУ за февраль.
-    #   2 марта 07:00 → yesterday = 1 марта   → ФОТ/ОПИУ за март.
-    yesterday = (now_kgd() - timedelta(days=1)).date()
-    yesterday_dt = datetime.combine(yesterday, datetime.min.time())
-    logger.info("[scheduler] Опорная дата: %s (yesterday)", yesterday)
-
-    # ── 7. ФОТ — расчёт зарплат ──
-    try:
-        from use_cases.payroll import update_fot_sheet
 
-        fot_count = await update_fot_sheet(
-            triggered_by=TRIGGERED_BY,
-            target_date=yesterday,
-        )
-        report_lines.append(f"💰 ФОТ: ✅ {fot_count} сотрудников")
-    except Exception:
-        logger.exception("[scheduler] Ошибка обновления ФОТ")
-        report_lines.append("💰 ФОТ: ❌ ошибка")
+async def _stage_salary_history(ctx: dict) -> StageResult:
+    from use_cases.salary_history import sync_salary_history
 
-    # ── 8. Выгрузка ФОТ → FinTablo (дельта-синхронизация) ──
-    try:
-        from use_cases.fintablo_salary_sync import sync_fot_to_fintablo
+    count = await sync_salary_history(triggered_by=ctx["triggered_by"])
+    return StageResult([f"📋 История ставок: ✅ {count} записей"], count)
 
-        ft_stats = await sync_fot_to_fintablo(
-            triggered_by=TRIGGERED_BY,
-            target_date=yesterday,
-        )
-        ft_upd = ft_stats.get("updated", 0)
-        ft_err = ft_stats.get("errors", 0)
-        ft_total = ft_stats.get("total", 0)
-        if ft_err:
-            report_lines.append(
-                f"📊 FinTablo: ⚠️ {ft_upd}/{ft_total} обновлено, {ft_err} ошибок"
-            )
-        else:
-            report_lines.append(f"📊 FinTablo: ✅ {ft_upd}/{ft_total} обновлено")
-    except Exception:
-        logger.exception("[scheduler] Ошибка выгрузки ФОТ в FinTablo")
-        report_lines.append("📊 FinTablo: ❌ ошибка")
 
-    # ── 9. ОПИУ → FinTablo (маппинг iiko Account → FT PnL) ──
-    opiu_stats: dict = {}
-    try:
-        from use_cases.pnl_sync import update_opiu
+async def _stage_fot(ctx: dict) -> StageResult:
+    from use_cases.payroll import update_fot_sheet
+
+    count = await update_fot_sheet(
+        triggered_by=ctx["triggered_by"],
+        target_date=ctx["yesterday"],
+    )
+    return StageResult([f"💰 ФОТ: ✅ {count} сотрудников"], count)
 
-        opiu_stats = await update_opiu(
-            triggered_by=TRIGGERED_BY,
-            target_date=yesterday_dt,
-        )
-        opiu_upd = opiu_stats.get("updated", 0)
-        opiu_err = opiu_stats.get("errors", 0)
-        opiu_skip = opiu_stats.get("skipped", 0)
-        unmapped = opiu_stats.get("unmapped_keys", [])
-        if opiu_err:
-            report_lines.append(
-                f"📊 ОПИУ: ⚠️ {opiu_upd} обновлено, {opiu_skip} пропущено, {opiu_err} ошибок"
-            )
-        else:
-            report_lines.append(
-                f"📊 ОПИУ: ✅ {opiu_upd} обновлено, {opiu_skip} пропущено"
-            )
-        if unmapped:
-            report_lines.append(f"   ⚠️ Не разнесено: {', '.join(unmapped[:10])}")
-    except Exception:
-        logger.exception("[scheduler] Ошибка обновления ОПИУ в FinTablo")
-        report_lines.append("📊 ОПИУ: ❌ ошибка")
 
-    # ── 10. Выручка → FinTablo (маппинг PayType / CookingPlaceType → FT PnL) ──
+async def _stage_fot_fintablo(ctx: dict) -> StageResult:
+    from use_cases.fintablo_salary_sync import sync_fot_to_fintablo
+
+    ft_stats = await sync_fot_to_fintablo(
+        triggered_by=ctx["triggered_by"],
+        target_date=ctx["yesterday"],
+    )
+    ft_upd = ft_stats.get("updated", 0)
+    ft_err = ft_stats.get("errors", 0)
+    ft_total = ft_stats.get("total", 0)
+    if ft_err:
+        line = f"📊 FinTablo: ⚠️ {ft_upd}/{ft_total} обновлено, {ft_err} ошибок"
+    else:
+        line = f"📊 FinTablo: ✅ {ft_upd}/{ft_total} обновлено"
+    return StageResult([line], ft_upd)
+
+
+async def _stage_opiu(ctx: dict) -> StageResult:
+    from use_cases.pnl_sync import update_opiu
+
+    opiu_stats = await update_opiu(
+        triggered_by=ctx["triggered_by"],
+        target_date=ctx["yesterday_dt"],
+    )
+    ctx["opiu_stats"] = opiu_stats  # для детального ОПИУ-отчёта
+    opiu_upd = opiu_stats.get("updated", 0)
+    opiu_err = opiu_stats.get("errors", 0)
+    opiu_skip = opiu_stats.get("skipped", 0)
+    unmapped = opiu_stats.get("unmapped_keys", [])
+    if opiu_err:
+        lines = [
+            f"📊 ОПИУ: ⚠️ {opiu_upd} обновлено, {opiu_skip} пропущено, {opiu_err} ошибок"
+        ]
+    else:
+        lines = [f"📊 ОПИУ: ✅ {opiu_upd} обновлено, {opiu_skip} пропущено"]
+    if unmapped:
+        lines.append(f"   ⚠️ Не разнесено: {', '.join(unmapped[:10])}")
+    return StageResult(lines, opiu_upd)
+
+
+async def _stage_revenue(ctx: dict) -> StageResult:
+    from use_cases.revenue_sync import update_revenue
+
+    rev_stats = await update_revenue(
+        triggered_by=ctx["triggered_by"],
+        target_date=ctx["yesterday_dt"],
+    )
+    rev_upd = rev_stats.get("updated", 0)
+    rev_err = rev_stats.get("errors", 0)
+    rev_skip = rev_stats.get("skipped", 0)
+    rev_unmapped = rev_stats.get("unmapped_keys", [])
+    if rev_err:
+        lines = [
+            f"💰 Выручка: ⚠️ {rev_upd} обновлено, {rev_skip} пропущено, {rev_err} ошибок"
+        ]
+    else:
+        lines = [f"💰 Выручка: ✅ {rev_upd} обновлено, {rev_skip} пропущено"]
+    if rev_unmapped:
+        lines.append(f"   ⚠️ Не разнесено: {', '.join(rev_unmapped[:10])}")
+    return StageResult(lines, rev_upd)
+
+
+# Порядок в списке = порядок строк в отчёте.
+# deps — реальные зависимости по данным; всё остальное идёт параллельно
+# в пределах SYSTEM_LIMITS (iiko ×2, FinTablo ×1, Sheets ×1).
+#   iiko_ft ─┬─ stock
+#            ├─ min_max ── nomenclature   (лист читается ДО перезаписи)
+#            ├─ mapping_ref
+#            ├─ opiu
+#            └─ revenue
+#   salary_history ── fot ── fot_fintablo  (fot также ждёт iiko_ft: сотрудники)
+DAILY_STAGES: list[Stage] = [
+    Stage(
+        "iiko_ft",
+        "📊 iiko/FinTablo",
+        _stage_iiko_ft,
+        systems=(SYSTEM_IIKO, SYSTEM_FINTABLO),
+    ),
+    Stage("stock", "\n📦 Остатки", _stage_stock, ("iiko_ft",), (SYSTEM_IIKO,)),
+    Stage(
+        "min_max",
+        "📋 Min/max GSheet→БД",
+        _stage_min_max,
+        ("iiko_ft",),
+        (SYSTEM_GSHEET,),
+    ),
+    Stage(
+        "nomenclature",
+        "📦 Номенкл.→GSheet",
+        _stage_nomenclature,
+        ("iiko_ft", "min_max"),
+        (SYSTEM_GSHEET,),
+    ),
+    Stage(
+        "mapping_ref",
+        "🗂 Маппинг справочник",
+        _stage_mapping_ref,
+        ("iiko_ft",),
+        (SYSTEM_GSHEET,),
+    ),
+    Stage(
+        "salary_history",
+        "📋 История ставок",
+        _stage_salary_history,
+        systems=(SYSTEM_GSHEET,),
+    ),
+    Stage(
+        "fot",
+        "💰 ФОТ",
+        _stage_fot,
+        ("iiko_ft", "salary_history"),
+        (SYSTEM_IIKO, SYSTEM_GSHEET),
+    ),
+    Stage(
+        "fot_fintablo", "📊 FinTablo", _stage_fot_fintablo, ("fot",), (SYSTEM_FINTABLO,)
+    ),
+    Stage("opiu", "📊 ОПИУ", _stage_opiu, ("iiko_ft",), (SYSTEM_IIKO, SYSTEM_FINTABLO)),
+    Stage(
+        "revenue",
+        "💰 Выручка",
+        _stage_revenue,
+        ("iiko_ft",),
+        (SYSTEM_IIKO, SYSTEM_FINTABLO),
+    ),
+]
+
+
+def _daily_ctx(triggered_by: str, ref: datetime) -> dict:
+    """
+    Общий контекст этапов. Опорная дата — вчера относительно старта прогона.
+    Cron запускается в 07:00 — данные «сегодня» ещё пусты:
+      1 марта 07:00 → yesterday = 28 февраля → ФОТ/ОПИУ за февраль.
+      2 марта 07:00 → yesterday = 1 марта   → ФОТ/ОПИУ за март.
+    """
+    yesterday = (ref - timedelta(days=1)).date()
+    return {
+        "triggered_by": triggered_by,
+        "yesterday": yesterday,
+        "yesterday_dt": datetime.combine(yesterday, datetime.min.time()),
+        "opiu_stats": {},
+    }
+
+
+async def _daily_full_sync() -> None:
+    """
+    Ежедневная полная синхронизация — DAG из DAILY_STAGES:
+    iiko + FinTablo, остатки, min/max, номенклатура → GSheet, справочник
+    маппинга, история ставок, ФОТ, ФОТ → FinTablo, ОПИУ, выручка.
+    Независимые этапы идут параллельно, время ≈ самая длинная цепочка.
+    """
+    lock = DistributedLock(DAILY_PREFIX)
+    if not await lock.acquire_nowait():
+        logger.warning("[scheduler] Ежедневная синхронизация уже идёт, пропускаю")
+        return
+
     try:
-        from use_cases.revenue_sync import update_revenue
+        t0 = time.monotonic()
+        started = now_kgd()
+        logger.info(
+            "=== [scheduler] Ежедневная синхронизация СТАРТ (%s) ===",
+            started.strftime("%Y-%m-%d %H:%M"),
+        )
+        ctx = _daily_ctx(TRIGGERED_BY, started)
+        logger.info("[scheduler] Опорная дата: %s (yesterday)", ctx["yesterday"])
 
-        rev_stats = await update_revenue(
+        outcomes = await run_dag(
+            DAILY_STAGES,
+            ctx=ctx,
+            prefix=DAILY_PREFIX,
             triggered_by=TRIGGERED_BY,
-            target_date=yesterday_dt,
+            guard=lock.ensure_held,
         )
-        rev_upd = rev_stats.get("updated", 0)
-        rev_err = rev_stats.get("errors", 0)
-        rev_skip = rev_stats.get("skipped", 0)
-        rev_unmapped = rev_stats.get("unmapped_keys", [])
-        if rev_err:
-            report_lines.append(
-                f"💰 Выручка: ⚠️ {rev_upd} обновлено, {rev_skip} пропущено, {rev_err} ошибок"
-            )
-        else:
-            report_lines.append(
-                f"💰 Выручка: ✅ {rev_upd} обновлено, {rev_skip} пропущено"
-            )
-        if rev_unmapped:
-            report_lines.append(f"   ⚠️ Не разнесено: {', '.join(rev_unmapped[:10])}")
-    except Exception:
-        logger.exception("[scheduler] Ошибка обновления выручки в FinTablo")
-        report_lines.append("💰 Выручка: ❌ ошибка")
+        report_lines = dag_report_lines(DAILY_STAGES, outcomes)
+        failed = [st.key for st in DAILY_STAGES if outcomes[st.key].status != "success"]
 
-    elapsed = time.monotonic() - t0
-    report_lines.append(f"\n⏱ Время: {elapsed:.1f} сек")
-    logger.info(
-        "=== [scheduler] Ежедневная синхронизация ЗАВЕРШЕНА за %.1f сек ===", elapsed
-    )
+        elapsed = time.monotonic() - t0
+        report_lines.append(
+            f"\n⏱ Время: {elapsed:.1f} сек "
+            f"(крит. путь {critical_path(DAILY_STAGES, outcomes):.1f} сек)"
+        )
+        logger.info(
+            "=== [scheduler] Ежедневная синхронизация ЗАВЕРШЕНА за %.1f сек ===",
+            elapsed,
+        )
+    finally:
+        await lock.release()
 
     # ── Уведомление админов ──
     try:
-        await _notify_admins_about_sync(report_lines)
+        await _notify_admins_about_sync(report_lines, has_failed=bool(failed))
     except Exception:
         logger.exception("[scheduler] Ошибка отправки уведомления админам")
 
     # ── Отдельный детальный ОПИУ-отчёт с кнопкой повтора ──
     try:
-        await _notify_admins_opiu(opiu_stats)
+        await _notify_admins_opiu(ctx["opiu_stats"])
     except Exception:
         logger.exception("[scheduler] Ошибка отправки ОПИУ-отчёта")
 
 
+async def retry_failed_daily_stages(triggered_by: str) -> dict:
+    """
+    Перезапустить упавшие / недошедшие этапы последнего 07:00-прогона
+    (+ их потомков — они считались на неактуальных данных).
+    Опорная дата — та же, что у исходного прогона.
+
+    Возвращает {"status": "locked" | "no_run" | "nothing" | "ok",
+                "lines": [...], "failed": [...]}.
+    """
+    lock = DistributedLock(DAILY_PREFIX)
+    if not await lock.acquire_nowait():
+        return {"status": "locked", "lines": [], "failed": []}
+
+    try:
+        last = await get_last_run(DAILY_PREFIX, DAILY_STAGES)
+        if last is None:
+            return {"status": "no_run", "lines": [], "failed": []}
+        run_started, pending = last
+        if not pending:
+            return {"status": "nothing", "lines": [], "failed": []}
+
+        keys = with_descendants(DAILY_STAGES, pending)
+        logger.info(
+            "[scheduler] Повтор этапов прогона %s: %s (%s)",
+            run_started.strftime("%Y-%m-%d %H:%M"),
+            sorted(keys),
+            triggered_by,
+        )
+        ctx = _daily_ctx(triggered_by, run_started)
+        outcomes = await run_dag(
+            DAILY_STAGES,
+            ctx=ctx,
+            prefix=DAILY_PREFIX,
+            triggered_by=triggered_by,
+            only=keys,
+            guard=lock.ensure_held,
+        )
+    finally:
+        await lock.release()
+
+    failed = [k for k, o in outcomes.items() if o.status != "success"]
+    return {
+        "status": "ok",
+        "lines": dag_report_lines(DAILY_STAGES, outcomes),
+        "failed": failed,
+    }
+
+
 # ═══════════════════════════════════════════════════════
 # Вечерний отчёт по стоп-листу (22:00)
 # ═══════════════════════════════════════════════════════
@@ -395,8 +523,13 @@ async def _notify_admins_opiu(opiu_stats: dict) -> None:
             )
 
 
-async def _notify_admins_about_sync(report_lines: list[str]) -> None:
-    """Отправить результат синхронизации всем админам в Telegram."""
+async def _notify_admins_about_sync(
+    report_lines: list[str], has_failed: bool = False
+) -> None:
+    """
+    Отправить результат синхронизации всем админам в Telegram.
+    has_failed — добавить кнопку «повторить упавшие этапы».
+    """
     from use_cases.permissions import get_sysadmin_ids
 
     admin_ids = await get_sysadmin_ids()
@@ -416,9 +549,24 @@ async def _notify_admins_about_sync(report_lines: list[str]) -> None:
         logger.warning("[scheduler] Bot reference not set, cannot notify admins")
         return
 
+    kb = None
+    if has_failed:
+        from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+        kb = InlineKeyboardMarkup(
+            inline_keyboard=[
+                [
+                    InlineKeyboardButton(
+                        text="🔁 Повторить упавшие этапы",
+                        callback_data=DAILY_RETRY_CALLBACK,
+                    )
+                ]
+            ]
+        )
+
     for admin_id in admin_ids:
         try:
-            await bot.send_message(admin_id, text, parse_mode="HTML")
+            await bot.send_message(admin_id, text, parse_mode="HTML", reply_markup=kb)
         except Exception:
             logger.warning(
                 "[scheduler] Не удалось отправить уведомление админу tg:%d", admin_id
@@ -430,6 +578,62 @@ async def _notify_admins_about_sync(report_lines: list[str]) -> None:
 # ═══════════════════════════════════════════════════════
 
 _bot_ref = None  # Ссылка на Bot-инстанс для отправки уведомлений
+_elector: LeaderElector | None = None  # лидерство среди реплик (Redis lease)
+
+
+def _leader_only(job_id: str, job_fn, *, idempotent: bool = True):
+    """
+    Обёртка задачи APScheduler: выполняется только на лидере и один раз
+    на время срабатывания (маркер run_once — защита на стыке смены лидера).
+    Не-лидер ждёт лидерства не дольше одного lease: если лидер упал прямо
+    перед cron, задачу подхватит новая реплика. Redis недоступен (лидера
+    не выбрать) → идемпотентную задачу выполняет только последний
+    подтверждённый лидер; неидемпотентная (idempotent=False) пропускается
+    везде — двойное выполнение хуже пропуска.
+    Длительность и сбои выполнения — в /metrics (scheduler_job_*).
+    """
+    duration = JOB_DURATION.labels(job_id)
+
+    async def _timed() -> None:
+        t0 = time.monotonic()
+        try:
+            await job_fn()
+        except Exception:
+            JOB_FAILURES.labels(job_id).inc()
+            raise
+        finally:
+            duration.observe(time.monotonic() - t0)
+
+    async def _job() -> None:
+        fire_key = now_kgd().strftime("%Y-%m-%d %H:%M")
+        elector = _elector
+        if elector is not None and not await elector.wait_leader(elector.lease):
+            logger.info(
+                "[scheduler] %s: реплика %s не лидер — пропускаю", job_id, INSTANCE_ID
+            )
+            return
+        if elector is not None and elector.degraded:
+            if not idempotent:
+                logger.error(
+                    "[scheduler] %s: Redis недоступен — лидерство не подтвердить, "
+                    "задача не выполняется",
+                    job_id,
+                )
+                return
+            logger.warning(
+                "[scheduler] %s: Redis недоступен — выполняю на последнем лидере "
+                "%s (epoch=%s)",
+                job_id,
+                INSTANCE_ID,
+                elector.degraded_epoch,
+            )
+        else:
+            epoch = elector.epoch if elector is not None else None
+            logger.info("[scheduler] %s: старт на лидере (epoch=%s)", job_id, epoch)
+        await run_once(job_id, fire_key, _timed, idempotent=idempotent)
+
+    _job.__name__ = job_fn.__name__
+    return _job
 
 
 async def _daily_error_cleanup() -> None:
@@ -447,10 +651,13 @@ async def _daily_error_cleanup() -> None:
 
 
 async def _daily_log_cleanup() -> None:
-    """Удалить старые логи по retention-политике (03:10)."""
+    """Секции bot_log на завтра+ и retention — DROP старых секций (03:10)."""
     try:
-        from use_cases.log_store import cleanup_logs
+        from use_cases.log_store import cleanup_logs, ensure_partitions
 
+        created = await ensure_partitions()
+        if created:
+            logger.info("[scheduler] bot_log: создано %d дневных секций", created)
         deleted = await cleanup_logs()
         if deleted:
             detail = ", ".join(f"{k}: {v}" for k, v in deleted.items())
@@ -459,22 +666,38 @@ async def _daily_log_cleanup() -> None:
         logger.exception("[scheduler] Ошибка очистки bot_log")
 
 
+async def _daily_ocr_cache_cleanup() -> None:
+    """Удалить просроченные записи OCR-кеша (03:20)."""
+    try:
+        from use_cases.ocr_cache import cleanup_expired
+
+        deleted = await cleanup_expired()
+        if deleted:
+            logger.info("[scheduler] Очистка OCR-кеша: удалено %d записей", deleted)
+    except Exception:
+        logger.exception("[scheduler] Ошибка очистки ocr_result_cache")
+
+
 def start_scheduler(bot) -> None:
     """
     Запустить APScheduler:
       - 07:00 — ежедневная синхронизация iiko + FinTablo + остатки + min/max + номенклатура GSheet + маппинг справочник
       - 22:00 — ежедневный отчёт по стоп-листу
       - 23:00 — авто-перемещение отрицательных остатков расходных материалов
-    Вызывается из main.py при старте бота.
+    Вызывается из main.py при старте бота (в каждой реплике).
+    Задачи выполняет только лидер (LeaderElector, Redis lease).
     """
-    global _scheduler, _bot_ref
+    global _scheduler, _bot_ref, _elector
     _bot_ref = bot
 
+    _elector = LeaderElector()
+    _elector.start()
+
     _scheduler = AsyncIOScheduler()
 
     # ── 07:00 — полная синхронизация ──
     _scheduler.add_job(
-        _daily_full_sync,
+        _leader_only("daily_full_sync", _daily_full_sync),
         trigger=CronTrigger(hour=7, minute=0, timezone=KGD_TZ),
         id="daily_full_sync",
         name="Ежедневная синхронизация iiko+FinTablo (07:00 Калининград)",
@@ -484,7 +707,7 @@ def start_scheduler(bot) -> None:
 
     # ── 22:00 — отчёт по стоп-листу ──
     _scheduler.add_job(
-        _daily_stoplist_report,
+        _leader_only("daily_stoplist_report", _daily_stoplist_report),
         trigger=CronTrigger(hour=22, minute=0, timezone=KGD_TZ),
         id="daily_stoplist_report",
         name="Ежедневный отчёт по стоп-листу (22:00 Калининград)",
@@ -494,7 +717,9 @@ def start_scheduler(bot) -> None:
 
     # ── 23:00 — авто-перемещение расходных материалов ──
     _scheduler.add_job(
-        _daily_negative_transfer,
+        _leader_only(
+            "daily_negative_transfer", _daily_negative_transfer, idempotent=False
+        ),
         trigger=CronTrigger(hour=23, minute=0, timezone=KGD_TZ),
         id="daily_negative_transfer",
         name="Авто-перемещение расх.мат. (23:00 Калининград)",
@@ -504,7 +729,7 @@ def start_scheduler(bot) -> None:
 
     # ── 03:00 — очистка старых решённых ошибок (30+ дней) ──
     _scheduler.add_job(
-        _daily_error_cleanup,
+        _leader_only("daily_error_cleanup", _daily_error_cleanup),
         trigger=CronTrigger(hour=3, minute=0, timezone=KGD_TZ),
         id="daily_error_cleanup",
         name="Очистка старых ошибок (03:00 Калининград)",
@@ -514,7 +739,7 @@ def start_scheduler(bot) -> None:
 
     # ── 03:10 — очистка логов по retention ──
     _scheduler.add_job(
-        _daily_log_cleanup,
+        _leader_only("daily_log_cleanup", _daily_log_cleanup),
         trigger=CronTrigger(hour=3, minute=10, timezone=KGD_TZ),
         id="daily_log_cleanup",
         name="Очистка логов по retention (03:10 Калининград)",
@@ -522,6 +747,16 @@ def start_scheduler(bot) -> None:
         misfire_grace_time=3600,
     )
 
+    # ── 03:20 — очистка просроченного OCR-кеша ──
+    _scheduler.add_job(
+        _leader_only("daily_ocr_cache_cleanup", _daily_ocr_cache_cleanup),
+        trigger=CronTrigger(hour=3, minute=20, timezone=KGD_TZ),
+        id="daily_ocr_cache_cleanup",
+        name="Очистка OCR-кеша по TTL (03:20 Калининград)",
+        replace_existing=True,
+        misfire_grace_time=3600,
+    )
+
     _scheduler.start()
 
     next_sync = _scheduler.get_job("daily_full_sync").next_run_time
@@ -535,10 +770,13 @@ def start_scheduler(bot) -> None:
     )
 
 
-def stop_scheduler() -> None:
-    """Остановить планировщик (graceful shutdown)."""
-    global _scheduler
+async def stop_scheduler() -> None:
+    """Остановить планировщик и отдать лидерство (graceful shutdown)."""
+    global _scheduler, _elector
     if _scheduler and _scheduler.running:
         _scheduler.shutdown(wait=False)
         logger.info("[scheduler] Планировщик остановлен")
         _scheduler = None
+    if _elector is not None:
+        await _elector.stop()
+        _elector = None
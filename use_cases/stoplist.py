@@ -2,17 +2,18 @@
 Use-case: стоп-лист iikoCloud — получение, диффинг, история.
 
 Логика:
-  1. Получаем терминальные группы через iikoCloud API.
+  1. Получаем терминальные группы через iikoCloud API (кеш per-org, TTL 1 час).
   2. Получаем стоп-лист по всем терминальным группам.
-  3. Маппим productId → название из таблицы nomenclature (iiko_product).
+  3. Маппим productId → название через общий справочник product_ref_cache.
   4. Сравниваем с текущим состоянием в active_stoplist (diff: added/removed/changed/existing).
   5. Обновляем stoplist_history (вход/выход из стопа).
   6. Перезаписываем active_stoplist новыми данными.
 
 Зависимости:
   - adapters/iiko_cloud_api.py  — fetch_terminal_groups, fetch_stop_lists
-  - db/models.py                — ActiveStoplist, StoplistHistory, Product
+  - db/models.py                — ActiveStoplist, StoplistHistory
   - use_cases/cloud_org_mapping — resolve_cloud_org_id (per-user org_id)
+  - use_cases/product_ref_cache — product_id → name
   - config.py                   — IIKO_CLOUD_ORG_ID (fallback)
 """
 
@@ -20,16 +21,60 @@ import logging
 import time
 from typing import Any
 
-from sqlalchemy import select, delete as sa_delete
+import httpx
+from sqlalchemy import (
+    BigInteger,
+    Integer,
+    any_,
+    bindparam,
+    cast,
+    func,
+    insert,
+    literal,
+    select,
+    tuple_,
+    update,
+    delete as sa_delete,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from db.engine import async_session_factory
-from db.models import ActiveStoplist, StoplistHistory, Product
+from db.models import ActiveStoplist, StoplistHistory
 from use_cases._helpers import now_kgd
+from use_cases._ttl_cache import TtlCache
 
 logger = logging.getLogger(__name__)
 
 LABEL = "Stoplist"
 
+# Терминальные группы почти не меняются — кешируем per-org
+TERMINAL_GROUPS_TTL = 3600
+_tg_cache = TtlCache(default_ttl=TERMINAL_GROUPS_TTL, name="terminal_groups")
+
+
+async def _get_terminal_group_ids(org_id: str, *, refresh: bool = False) -> list[str]:
+    """id терминальных групп org (из кеша, refresh=True — мимо кеша)."""
+    if not refresh:
+        cached = _tg_cache.get(org_id)
+        if cached is not None:
+            return cached
+
+    from adapters.iiko_cloud_api import fetch_terminal_groups
+
+    tg_ids = [g["id"] for g in await fetch_terminal_groups(org_id)]
+    if tg_ids:  # пустой ответ не кешируем — возможно, временный сбой
+        _tg_cache.set(org_id, tg_ids)
+    return tg_ids
+
+
+def invalidate_terminal_groups(org_id: str | None = None) -> None:
+    """Сбросить кеш терминальных групп (одной org или всех)."""
+    if org_id is None:
+        _tg_cache.drop_all()
+    else:
+        _tg_cache.drop_matching(lambda k: k == org_id)
+
 
 # ═══════════════════════════════════════════════════════
 # Получение стоп-листа из iikoCloud
@@ -51,7 +96,7 @@ async def fetch_stoplist_items(
       3. MAP productId → name из iiko_product
       4. Вернуть [{product_id, name, balance, terminal_group_id, org_id}, ...]
     """
-    from adapters.iiko_cloud_api import fetch_terminal_groups, fetch_stop_lists
+    from adapters.iiko_cloud_api import fetch_stop_lists
 
     # Fallback на env для обратной совместимости (вебхуки, CLI)
     if not org_id:
@@ -65,16 +110,30 @@ async def fetch_stoplist_items(
 
     t0 = time.monotonic()
 
-    # 1. Получаем терминальные группы
-    tg_items = await fetch_terminal_groups(org_id)
-    tg_ids = [g["id"] for g in tg_items]
+    # 1. Получаем терминальные группы (кеш)
+    tg_ids = await _get_terminal_group_ids(org_id)
 
     if not tg_ids:
         logger.warning("[%s] Нет терминальных групп для org=%s", LABEL, org_id)
         return []
 
-    # 2. Получаем стоп-лист
-    raw_groups = await fetch_stop_lists(org_id, tg_ids)
+    # 2. Получаем стоп-лист. 400/404 — скорее всего, закешированная группа
+    #    удалена в iiko: перечитываем группы и повторяем один раз.
+    try:
+        raw_groups = await fetch_stop_lists(org_id, tg_ids)
+    except httpx.HTTPStatusError as exc:
+        if exc.response.status_code not in (400, 404):
+            raise
+        logger.info(
+            "[%s] stop_lists → %d (org=%s), обновляю терминальные группы",
+            LABEL,
+            exc.response.status_code,
+            org_id,
+        )
+        tg_ids = await _get_terminal_group_ids(org_id, refresh=True)
+        if not tg_ids:
+            return []
+        raw_groups = await fetch_stop_lists(org_id, tg_ids)
 
     # Распаковываем: raw_groups = [{organizationId, items: [{terminalGroupId, items: [...]}]}]
     flat_items: list[dict[str, Any]] = []
@@ -112,26 +171,10 @@ async def fetch_stoplist_items(
 
 
 async def _map_product_names(product_ids: list[str]) -> dict[str, str]:
-    """Маппинг UUID → name из таблицы iiko_product."""
-    if not product_ids:
-        return {}
-
-    import uuid as _uuid
+    """Маппинг UUID → name (общий справочник номенклатуры в памяти)."""
+    from use_cases.product_ref_cache import get_product_names
 
-    uuids = []
-    for pid in product_ids:
-        try:
-            uuids.append(_uuid.UUID(pid))
-        except ValueError:
-            continue
-
-    async with async_session_factory() as session:
-        result = await session.execute(
-            select(Product.id, Product.name).where(Product.id.in_(uuids))
-        )
-        rows = result.all()
-
-    return {str(row[0]): row[1] or "[без названия]" for row in rows}
+    return await get_product_names(product_ids)
 
 
 # ═══════════════════════════════════════════════════════
@@ -139,6 +182,10 @@ async def _map_product_names(product_ids: list[str]) -> dict[str, str]:
 # ═══════════════════════════════════════════════════════
 
 
+def _stop_key(product_id: str, terminal_group_id: str | None) -> str:
+    return f"{product_id}:{terminal_group_id or ''}"
+
+
 async def sync_and_diff(
     new_items: list[dict[str, Any]],
     org_id: str | None = None,
@@ -147,6 +194,13 @@ async def sync_and_diff(
     Сравнить новые данные с active_stoplist и обновить БД.
     Фильтрует по organization_id — не затрагивает данные других организаций.
 
+    Запись — только разница, одной транзакцией:
+      - вышли из стопа              → один DELETE ... WHERE pk = ANY(:pks)
+      - вошли / изменились баланс, имя → один multi-row INSERT ... ON CONFLICT
+        (uq_active_stoplist_product_tg) DO UPDATE
+      - stoplist_history            → один INSERT + один UPDATE (см. _update_history)
+    Стоп-лист не изменился → ни одной записи в БД.
+
     Returns:
         (added, removed, existing)
         added    — новые позиции в стопе (или изменённый баланс)
@@ -154,78 +208,115 @@ async def sync_and_diff(
         existing — без изменений
     """
     t0 = time.monotonic()
+
+    new_map: dict[str, dict] = {}
+    for it in new_items:
+        new_map[_stop_key(it["product_id"], it.get("terminal_group_id"))] = it
+
     async with async_session_factory() as session:
         # Текущее состояние из БД — фильтр по org_id
-        stmt = select(ActiveStoplist)
+        stmt = select(
+            ActiveStoplist.pk,
+            ActiveStoplist.product_id,
+            ActiveStoplist.name,
+            ActiveStoplist.balance,
+            ActiveStoplist.terminal_group_id,
+        )
         if org_id:
             stmt = stmt.where(ActiveStoplist.organization_id == org_id)
-        rows = await session.execute(stmt)
-        old_rows = rows.scalars().all()
-
-    old_map: dict[str, dict] = {}
-    for r in old_rows:
-        key = f"{r.product_id}:{r.terminal_group_id or ''}"
-        old_map[key] = {
-            "product_id": r.product_id,
-            "name": r.name,
-            "balance": float(r.balance or 0),
-            "terminal_group_id": r.terminal_group_id,
-        }
+        old_rows = (await session.execute(stmt)).all()
+
+        old_map: dict[str, dict] = {}
+        for r in old_rows:
+            old_map[_stop_key(r.product_id, r.terminal_group_id)] = {
+                "pk": r.pk,
+                "product_id": r.product_id,
+                "name": r.name,
+                "balance": float(r.balance or 0),
+                "terminal_group_id": r.terminal_group_id,
+            }
+
+        added: list[dict] = []
+        removed: list[dict] = []
+        changed: list[dict] = []  # в стопе, но изменился баланс
+        existing: list[dict] = []
+        renamed_or_changed: list[str] = []  # ключи строк, которые надо перезаписать
 
-    new_map: dict[str, dict] = {}
-    for it in new_items:
-        key = f"{it['product_id']}:{it.get('terminal_group_id', '')}"
-        new_map[key] = it
-
-    added: list[dict] = []
-    removed: list[dict] = []
-    changed: list[dict] = []  # в стопе, но изменился баланс
-    existing: list[dict] = []
-
-    for key, item in new_map.items():
-        if key not in old_map:
-            added.append(item)
-        else:
-            old_balance = old_map[key]["balance"]
+        for key, item in new_map.items():
+            old = old_map.get(key)
+            if old is None:
+                added.append(item)
+                continue
+            old_balance = old["balance"]
             new_balance = item["balance"]
             if old_balance != new_balance:
                 # Баланс изменился — отдельный bucket, не «новое»
                 changed.append({**item, "old_balance": old_balance})
             else:
                 existing.append(item)
-
-    for key, item in old_map.items():
-        if key not in new_map:
-            removed.append(item)
-
-    # Обновляем историю
-    await _update_history(old_map, new_map)
-
-    # Перезаписываем active_stoplist — только для этой org_id
-    async with async_session_factory() as session:
-        del_stmt = sa_delete(ActiveStoplist)
-        if org_id:
-            del_stmt = del_stmt.where(ActiveStoplist.organization_id == org_id)
-        await session.execute(del_stmt)
-        for key, item in new_map.items():
-            session.add(
-                ActiveStoplist(
-                    product_id=item["product_id"],
-                    name=item.get("name"),
-                    balance=item["balance"],
-                    terminal_group_id=item.get("terminal_group_id"),
-                    organization_id=item.get("organization_id"),
+            if old_balance != new_balance or old["name"] != item.get("name"):
+                renamed_or_changed.append(key)
+
+        for key, item in old_map.items():
+            if key not in new_map:
+                removed.append(item)
+
+        writes = 0
+        if removed:
+            await session.execute(
+                sa_delete(ActiveStoplist)
+                .where(
+                    ActiveStoplist.pk
+                    == any_(
+                        bindparam(
+                            "pks",
+                            [it["pk"] for it in removed],
+                            type_=ARRAY(BigInteger),
+                        )
+                    )
                 )
+                .execution_options(synchronize_session=False)
             )
-        await session.commit()
+            writes += 1
+        upserts = added + [new_map[key] for key in renamed_or_changed]
+        if upserts:
+            stmt = pg_insert(ActiveStoplist).values(
+                [
+                    {
+                        "product_id": it["product_id"],
+                        "name": it.get("name"),
+                        "balance": it["balance"],
+                        "terminal_group_id": it.get("terminal_group_id"),
+                        "organization_id": it.get("organization_id"),
+                        "updated_at": now_kgd().replace(tzinfo=None),
+                    }
+                    for it in upserts
+                ]
+            )
+            stmt = stmt.on_conflict_do_update(
+                constraint="uq_active_stoplist_product_tg",
+                set_={
+                    k: getattr(stmt.excluded, k)
+                    for k in ("name", "balance", "organization_id", "updated_at")
+                },
+            )
+            await session.execute(stmt)
+            writes += 1
+
+        # История — в той же транзакции
+        writes += await _update_history(session, old_map, new_map)
+
+        if writes:
+            await session.commit()
 
     logger.info(
-        "[%s] Diff: +%d -%d ~%d =%d (%.1f сек)",
+        "[%s] Diff: +%d -%d ~%d =%d, SQL-записей: %d (%.2f сек)",
         LABEL,
         len(added),
         len(removed),
         len(changed),
         len(existing),
+        writes,
         time.monotonic() - t0,
     )
     return added, removed, changed, existing
@@ -237,16 +328,19 @@ async def sync_and_diff(
 
 
 async def _update_history(
+    session: AsyncSession,
     old_map: dict[str, dict],
     new_map: dict[str, dict],
-) -> None:
+) -> int:
     """
-    Обновить stoplist_history:
-      - Вошли в стоп (balance == 0 + не было раньше) → INSERT (started_at)
-      - Вышли из стопа → UPDATE (ended_at, duration_seconds)
+    Обновить stoplist_history (в транзакции вызывающего, без commit):
+      - Вошли в стоп (не было раньше) → один multi-row INSERT (started_at)
+      - Вышли из стопа → один UPDATE открытых записей (ended_at, duration_seconds)
+
+    Returns:
+        Количество выполненных SQL-записей (0, 1 или 2).
     """
     now = now_kgd().replace(tzinfo=None)
-    today = now.date()
 
     # Отслеживаем ВСЕ позиции в стопе (balance==0 и balance>0)
     old_keys = set(old_map.keys())
@@ -255,47 +349,61 @@ async def _update_history(
     entered_stop = new_keys - old_keys  # вошли в стоп
     left_stop = old_keys - new_keys  # вышли из стопа
 
-    if not entered_stop and not left_stop:
-        return
-
-    async with async_session_factory() as session:
-        # Вошли в стоп
-        for key in entered_stop:
-            item = new_map[key]
-            session.add(
-                StoplistHistory(
-                    product_id=item["product_id"],
-                    name=item.get("name"),
-                    terminal_group_id=item.get("terminal_group_id"),
-                    started_at=now,
-                    date=now,
-                )
+    writes = 0
+
+    # Вошли в стоп
+    if entered_stop:
+        await session.execute(
+            insert(StoplistHistory),
+            [
+                {
+                    "product_id": new_map[key]["product_id"],
+                    "name": new_map[key].get("name"),
+                    "terminal_group_id": new_map[key].get("terminal_group_id"),
+                    "started_at": now,
+                    "date": now,
+                }
+                for key in entered_stop
+            ],
+        )
+        writes += 1
+
+    # Вышли из стопа — закрываем открытые записи одним UPDATE
+    if left_stop:
+        pairs = [
+            (old_map[key]["product_id"], old_map[key].get("terminal_group_id") or "")
+            for key in left_stop
+        ]
+        await session.execute(
+            update(StoplistHistory)
+            .where(
+                StoplistHistory.ended_at.is_(None),
+                tuple_(
+                    StoplistHistory.product_id,
+                    func.coalesce(StoplistHistory.terminal_group_id, ""),
+                ).in_(pairs),
             )
-
-        # Вышли из стопа — закрываем открытые записи
-        for key in left_stop:
-            item = old_map[key]
-            result = await session.execute(
-                select(StoplistHistory).where(
-                    StoplistHistory.product_id == item["product_id"],
-                    StoplistHistory.terminal_group_id == item.get("terminal_group_id"),
-                    StoplistHistory.ended_at.is_(None),
-                )
+            .values(
+                ended_at=now,
+                duration_seconds=cast(
+                    func.floor(
+                        func.extract("epoch", literal(now) - StoplistHistory.started_at)
+                    ),
+                    Integer,
+                ),
             )
-            open_records = result.scalars().all()
-            for rec in open_records:
-                rec.ended_at = now
-                elapsed = (now - rec.started_at).total_seconds()
-                rec.duration_seconds = int(elapsed)
-
-        await session.commit()
-
-    logger.info(
-        "[%s] История: %d вошли в стоп, %d вышли из стопа",
-        LABEL,
-        len(entered_stop),
-        len(left_stop),
-    )
+            .execution_options(synchronize_session=False)
+        )
+        writes += 1
+
+    if writes:
+        logger.info(
+            "[%s] История: %d вошли в стоп, %d вышли из стопа",
+            LABEL,
+            len(entered_stop),
+            len(left_stop),
+        )
+    return writes
 
 
 # ═══════════════════════════════════════════════════════
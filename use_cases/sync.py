@@ -13,7 +13,11 @@ import time
 import uuid
 from typing import Any, Callable, Coroutine
 
+from sqlalchemy import bindparam
 from sqlalchemy import delete as sa_delete
+from sqlalchemy import func as sa_func
+from sqlalchemy import select as sa_select
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -102,32 +106,61 @@ async def mirror_delete(
 ) -> int:
     """
     Зеркальная очистка: удалить из БД записи, которых больше нет в API.
-    DELETE FROM table WHERE id_column NOT IN (valid_ids)
-    [AND extra_filter_col = val ...]
+
+    Один запрос, ID из API — один параметр-массив (а не тысячи литералов в NOT IN):
+      WITH scope   AS (SELECT id, keep.id IS NULL AS gone
+                       FROM table LEFT JOIN unnest($ids) keep ON … WHERE extra_filters),
+           stats   AS (SELECT count(*) total, count(*) FILTER (WHERE gone) doomed FROM scope),
+           deleted AS (DELETE FROM table WHERE id IN (SELECT id FROM scope WHERE gone)
+                       AND (SELECT doomed * 2 <= total FROM stats) RETURNING id)
+      SELECT total, doomed, (SELECT count(*) FROM deleted) FROM stats
 
     Безопасность:
       - если valid_ids пуст (API вернул 0) — пропускаем
-      - если удалить пришлось бы >50% записей — это аномалия, пропускаем
+      - если удалить пришлось бы >50% записей — это аномалия, DELETE
+        не выполняется (проверка внутри того же запроса, по точному числу)
     """
     if not valid_ids:
         logger.warning("[%s] Mirror-delete пропущен: пустой набор ID из API", label)
         return 0
 
-    # Подсчёт текущих записей для sanity-check
-    from sqlalchemy import func as sa_func, select as sa_select
-
     col = table.c[id_column]
+    scope_filters = [
+        table.c[name] == val for name, val in (extra_filters or {}).items()
+    ]
 
-    count_stmt = sa_select(sa_func.count()).select_from(table)
-    if extra_filters:
-        for col_name, val in extra_filters.items():
-            count_stmt = count_stmt.where(table.c[col_name] == val)
-    total_in_db = (await session.execute(count_stmt)).scalar() or 0
+    ids = bindparam("mirror_ids", list(valid_ids), type_=ARRAY(col.type))
+    keep = sa_func.unnest(ids).table_valued("id").alias("keep")
+    scope = (
+        sa_select(col.label("id"), keep.c.id.is_(None).label("gone"))
+        .select_from(table.outerjoin(keep, keep.c.id == col))
+        .where(*scope_filters)
+        .cte("scope")
+    )
+    stats = sa_select(
+        sa_func.count().label("total"),
+        sa_func.count().filter(scope.c.gone).label("doomed"),
+    ).cte("stats")
+    allowed = sa_select(stats.c.doomed * 2 <= stats.c.total).scalar_subquery()
+    deleted = (
+        sa_delete(table)
+        .where(
+            *scope_filters,
+            col.in_(sa_select(scope.c.id).where(scope.c.gone)),
+            allowed,
+        )
+        .returning(col)
+        .cte("deleted")
+    )
+    stmt = sa_select(
+        stats.c.total,
+        stats.c.doomed,
+        sa_select(sa_func.count()).select_from(deleted).scalar_subquery(),
+    )
 
-    to_stay = len(valid_ids)
-    to_delete = max(0, total_in_db - to_stay)
+    total_in_db, to_delete, count = (await session.execute(stmt)).one()
 
-    if total_in_db > 0 and to_delete > total_in_db * 0.5:
+    if to_delete * 2 > total_in_db:
         logger.error(
             "[%s] Mirror-delete ЗАБЛОКИРОВАН: удалили бы %d из %d (>50%%). "
             "Возможен сбой API — пропускаем.",
@@ -137,13 +170,6 @@ async def mirror_delete(
         )
         return 0
 
-    stmt = sa_delete(table).where(col.notin_(list(valid_ids)))
-    if extra_filters:
-        for col_name, val in extra_filters.items():
-            stmt = stmt.where(table.c[col_name] == val)
-
-    result = await session.execute(stmt)
-    count = result.rowcount
     if count:
         logger.info("[%s] Mirror-delete: удалено %d записей (нет в API)", label, count)
     else:
@@ -562,7 +588,9 @@ async def sync_product_groups(triggered_by: str | None = None) -> int:
 
 
 async def sync_products(triggered_by: str | None = None) -> int:
-    return await _run_sync(
+    from use_cases import product_ref_cache
+
+    count = await _run_sync(
         "Product",
         iiko_api.fetch_products(include_deleted=False),
         Product.__table__,
@@ -570,6 +598,8 @@ async def sync_products(triggered_by: str | None = None) -> int:
         ["id"],
         triggered_by,
     )
+    product_ref_cache.invalidate()
+    return count
 
 
 async def sync_employees(triggered_by: str | None = None) -> int:
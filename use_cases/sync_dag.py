@@ -0,0 +1,389 @@
+"""
+Use-case: DAG-оркестратор этапов синхронизации.
+
+Этап (Stage) — именованный шаг с явными зависимостями и списком внешних
+систем, в которые он ходит (iiko / FinTablo / Google Sheets).
+
+Оркестратор:
+  - запускает этап, как только завершились все его зависимости
+    (время всего прогона = самая длинная цепочка, а не сумма этапов);
+  - ограничивает параллелизм per-system через Semaphore (защита от 429);
+  - пишет тайминг каждого этапа в iiko_sync_log (entity_type = "<prefix>:<key>")
+    плюс строку-маркер прогона (entity_type = "<prefix>");
+  - умеет перезапустить только упавшие / недошедшие этапы + их потомков.
+
+Зависимости «мягкие»: упавший этап не отменяет потомков — так же, как
+в прежнем последовательном 07:00 (каждый шаг в своём try/except).
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import select, update
+
+from db.engine import async_session_factory
+from db.models import SyncLog
+from use_cases._helpers import now_kgd
+
+logger = logging.getLogger(__name__)
+
+# Внешние системы и лимит одновременных этапов в каждой
+SYSTEM_IIKO = "iiko"
+SYSTEM_FINTABLO = "fintablo"
+SYSTEM_GSHEET = "gsheet"
+
+SYSTEM_LIMITS: dict[str, int] = {
+    SYSTEM_IIKO: 2,
+    SYSTEM_FINTABLO: 1,
+    SYSTEM_GSHEET: 1,  # квота Sheets API — строго по одному
+}
+
+
+# ═══════════════════════════════════════════════════════
+# Dataclasses
+# ═══════════════════════════════════════════════════════
+
+
+@dataclass(slots=True)
+class StageResult:
+    """Что вернул этап: строки отчёта + кол-во записей для SyncLog."""
+
+    lines: list[str]
+    records: int | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class Stage:
+    """Описание этапа DAG."""
+
+    key: str  # короткий id (идёт в iiko_sync_log и в отчёт)
+    label: str  # человекочитаемое имя для отчёта
+    run: Callable[[dict[str, Any]], Awaitable[StageResult]]
+    deps: tuple[str, ...] = ()
+    systems: tuple[str, ...] = ()
+
+
+@dataclass(slots=True)
+class StageOutcome:
+    """Итог выполнения одного этапа."""
+
+    key: str
+    status: str  # success / error
+    elapsed: float
+    lines: list[str] = field(default_factory=list)
+    error: str | None = None
+
+
+# ═══════════════════════════════════════════════════════
+# Граф: валидация и обход
+# ═══════════════════════════════════════════════════════
+
+
+def topo_order(stages: list[Stage]) -> list[str]:
+    """
+    Топологический порядок ключей этапов.
+    ValueError — дубликат ключа, неизвестная зависимость или цикл.
+    """
+    by_key: dict[str, Stage] = {}
+    for st in stages:
+        if st.key in by_key:
+            raise ValueError(f"Duplicate stage key: {st.key}")
+        by_key[st.key] = st
+
+    for st in stages:
+        for dep in st.deps:
+            if dep not in by_key:
+                raise ValueError(f"Stage {st.key!r} depends on unknown {dep!r}")
+
+    order: list[str] = []
+    state: dict[str, int] = {}  # 1 = в обходе, 2 = готово
+
+    def _visit(key: str) -> None:
+        mark = state.get(key)
+        if mark == 2:
+            return
+        if mark == 1:
+            raise ValueError(f"Dependency cycle through stage {key!r}")
+        state[key] = 1
+        for dep in by_key[key].deps:
+            _visit(dep)
+        state[key] = 2
+        order.append(key)
+
+    for st in stages:
+        _visit(st.key)
+    return order
+
+
+def with_descendants(stages: list[Stage], keys: set[str]) -> set[str]:
+    """keys + все этапы, транзитивно зависящие от них."""
+    result = set(keys)
+    changed = True
+    while changed:
+        changed = False
+        for st in stages:
+            if st.key not in result and any(d in result for d in st.deps):
+                result.add(st.key)
+                changed = True
+    return result
+
+
+def critical_path(stages: list[Stage], outcomes: dict[str, StageOutcome]) -> float:
+    """Длина самой длинной цепочки зависимостей (сек) по фактическим таймингам."""
+    by_key = {st.key: st for st in stages}
+    finish: dict[str, float] = {}
+    for key in topo_order(stages):
+        if key not in outcomes:
+            continue
+        start = max(
+            (finish[d] for d in by_key[key].deps if d in finish),
+            default=0.0,
+        )
+        finish[key] = start + outcomes[key].elapsed
+    return max(finish.values(), default=0.0)
+
+
+# ═══════════════════════════════════════════════════════
+# iiko_sync_log: маркер прогона + строки этапов
+# ═══════════════════════════════════════════════════════
+
+
+async def _start_run_log(prefix: str, started: datetime, triggered_by: str) -> int:
+    """Создать строку-маркер прогона (status=running). Возвращает её id."""
+    async with async_session_factory() as session:
+        row = SyncLog(
+            entity_type=prefix,
+            started_at=started,
+            status="running",
+            triggered_by=triggered_by,
+        )
+        session.add(row)
+        await session.commit()
+        return row.id
+
+
+async def _finish_run_log(run_id: int, status: str, records: int) -> None:
+    async with async_session_factory() as session:
+        await session.execute(
+            update(SyncLog)
+            .where(SyncLog.id == run_id)
+            .values(finished_at=now_kgd(), status=status, records_synced=records)
+        )
+        await session.commit()
+
+
+async def _save_stage_log(
+    prefix: str,
+    key: str,
+    started: datetime,
+    status: str,
+    records: int | None,
+    error: str | None,
+    triggered_by: str,
+) -> None:
+    async with async_session_factory() as session:
+        session.add(
+            SyncLog(
+                entity_type=f"{prefix}:{key}",
+                started_at=started,
+                finished_at=now_kgd(),
+                status=status,
+                records_synced=records,
+                error_message=error[:2000] if error else None,
+                triggered_by=triggered_by,
+            )
+        )
+        await session.commit()
+
+
+async def get_last_run(
+    prefix: str, stages: list[Stage]
+) -> tuple[datetime, set[str]] | None:
+    """
+    Последний прогон DAG: (started_at, ключи этапов без успешного завершения).
+    Этап считается незавершённым, если его последняя запись после старта
+    прогона — error, либо записи нет вовсе (падение процесса посреди прогона).
+    None — прогонов ещё не было.
+    """
+    async with async_session_factory() as session:
+        run_started = (
+            await session.execute(
+                select(SyncLog.started_at)
+                .where(SyncLog.entity_type == prefix)
+                .order_by(SyncLog.started_at.desc())
+                .limit(1)
+            )
+        ).scalar()
+        if run_started is None:
+            return None
+
+        rows = (
+            await session.execute(
+                select(SyncLog.entity_type, SyncLog.status)
+                .where(
+                    SyncLog.entity_type.like(f"{prefix}:%"),
+                    SyncLog.started_at >= run_started,
+                )
+                .order_by(SyncLog.started_at, SyncLog.id)
+            )
+        ).all()
+
+    latest: dict[str, str] = {}
+    for entity_type, status in rows:
+        latest[entity_type.split(":", 1)[1]] = status  # последняя запись выигрывает
+
+    pending = {st.key for st in stages if latest.get(st.key) != "success"}
+    return run_started, pending
+
+
+# ═══════════════════════════════════════════════════════
+# Исполнитель
+# ═══════════════════════════════════════════════════════
+
+
+async def run_dag(
+    stages: list[Stage],
+    *,
+    ctx: dict[str, Any],
+    prefix: str,
+    triggered_by: str,
+    only: set[str] | None = None,
+    limits: dict[str, int] | None = None,
+    guard: Callable[[], Awaitable[None]] | None = None,
+) -> dict[str, StageOutcome]:
+    """
+    Выполнить этапы DAG с учётом зависимостей и per-system лимитов.
+
+    only — подмножество ключей (retry). Зависимости вне подмножества
+    считаются уже выполненными, маркер прогона не создаётся.
+    ctx — общий dict: этапы читают из него опорную дату и могут класть
+    результаты для последующих шагов.
+    guard — проверка перед стартом каждого этапа (DistributedLock.ensure_held):
+    исключение → этап в error без запуска (держатель потерял lock).
+    """
+    topo_order(stages)  # fail fast на кривом графе
+    selected = [st for st in stages if only is None or st.key in only]
+    selected_keys = {st.key for st in selected}
+
+    sems = {name: asyncio.Semaphore(n) for name, n in (limits or SYSTEM_LIMITS).items()}
+    done: dict[str, asyncio.Event] = {st.key: asyncio.Event() for st in selected}
+    outcomes: dict[str, StageOutcome] = {}
+
+    t0 = time.monotonic()
+    # Маркер пишется только для полного прогона: retry дописывает строки
+    # этапов к исходному прогону, get_last_run() видит их как один прогон.
+    run_id: int | None = None
+    if only is None:
+        try:
+            run_id = await _start_run_log(prefix, now_kgd(), triggered_by)
+        except Exception:
+            logger.exception("[dag:%s] Не удалось записать маркер прогона", prefix)
+    logger.info(
+        "[dag:%s] Старт: %d этапов (%s)",
+        prefix,
+        len(selected),
+        ", ".join(st.key for st in selected),
+    )
+
+    async def _run_stage(st: Stage) -> None:
+        try:
+            for dep in st.deps:
+                if dep in selected_keys:
+                    await done[dep].wait()
+
+            # Семафоры — в фиксированном порядке, чтобы не словить deadlock
+            acquired: list[asyncio.Semaphore] = []
+            try:
+                for name in sorted(set(st.systems)):
+                    sem = sems.get(name)
+                    if sem is not None:
+                        await sem.acquire()
+                        acquired.append(sem)
+
+                started = now_kgd()
+                t_stage = time.monotonic()
+                try:
+                    if guard is not None:
+                        await guard()
+                    result = await st.run(ctx)
+                    outcome = StageOutcome(
+                        key=st.key,
+                        status="success",
+                        elapsed=time.monotonic() - t_stage,
+                        lines=result.lines,
+                    )
+                    records = result.records
+                except Exception as exc:
+                    logger.exception("[dag:%s] Этап %s упал", prefix, st.key)
+                    outcome = StageOutcome(
+                        key=st.key,
+                        status="error",
+                        elapsed=time.monotonic() - t_stage,
+                        lines=[f"{st.label}: ❌ ошибка"],
+                        error=str(exc) or type(exc).__name__,
+                    )
+                    records = None
+            finally:
+                for sem in acquired:
+                    sem.release()
+
+            outcomes[st.key] = outcome
+            logger.info(
+                "[dag:%s] %s: %s за %.1f сек",
+                prefix,
+                st.key,
+                outcome.status,
+                outcome.elapsed,
+            )
+            try:
+                await _save_stage_log(
+                    prefix,
+                    st.key,
+                    started,
+                    outcome.status,
+                    records,
+                    outcome.error,
+                    triggered_by,
+                )
+            except Exception:
+                logger.exception(
+                    "[dag:%s] Не удалось записать этап %s в sync_log", prefix, st.key
+                )
+        finally:
+            done[st.key].set()
+
+    await asyncio.gather(*(_run_stage(st) for st in selected))
+
+    failed = [k for k, o in outcomes.items() if o.status != "success"]
+    if run_id is not None:
+        try:
+            await _finish_run_log(
+                run_id, "error" if failed else "success", len(outcomes) - len(failed)
+            )
+        except Exception:
+            logger.exception("[dag:%s] Не удалось закрыть маркер прогона", prefix)
+
+    logger.info(
+        "[dag:%s] Готово за %.1f сек (крит. путь %.1f сек), ошибок: %d %s",
+        prefix,
+        time.monotonic() - t0,
+        critical_path(stages, outcomes),
+        len(failed),
+        failed or "",
+    )
+    return outcomes
+
+
+def report_lines(stages: list[Stage], outcomes: dict[str, StageOutcome]) -> list[str]:
+    """Строки отчёта в порядке объявления этапов (а не завершения)."""
+    lines: list[str] = []
+    for st in stages:
+        outcome = outcomes.get(st.key)
+        if outcome is not None:
+            lines.extend(outcome.lines)
+    return lines
@@ -29,6 +29,7 @@ from db.models import (
 )
 
 from adapters import google_sheets as gsheet
+from use_cases import edit_min_stock
 from use_cases._helpers import bfs_allowed_groups
 
 logger = logging.getLogger(__name__)
@@ -110,6 +111,14 @@ async def sync_nomenclature_to_gsheet(triggered_by: str | None = None) -> int:
         logger.warning("[%s] Нет товаров в БД — пропускаю", LABEL)
         return 0
 
+    # Лист перезаписывается из своих же значений — сначала дописать очередь.
+    # Не дописалась — правки остаются помеченными в БД, writer повторит
+    # запись в уже перестроенный лист.
+    if not await edit_min_stock.flush_pending():
+        logger.warning(
+            "[%s] Очередь правок не записана в GSheet — допишется после выгрузки",
+            LABEL,
+        )
     count = await gsheet.sync_products_to_sheet(products, departments)
 
     elapsed = time.monotonic() - t0
@@ -126,13 +135,22 @@ async def sync_min_stock_from_gsheet(triggered_by: str | None = None) -> int:
     """
     Синхронизировать мин/макс остатки: Google Таблица → min_stock_level (БД).
 
-    UPSERT по (product_id, department_id) + mirror-delete.
+    UPSERT по (product_id, department_id) + mirror-delete; строки с
+    sheet_pending (правка из бота ещё не в таблице) не трогаются.
     Возвращает количество записей в БД после синхронизации.
     """
     t0 = time.monotonic()
     logger.info("[%s] GSheet → БД (by=%s)...", LABEL, triggered_by)
 
-    # 1. Прочитать все записи из Google Таблицы
+    # 1. Прочитать все записи из Google Таблицы (очередь правок — до чтения).
+    # Не дописалась — в листе старые значения: строки с sheet_pending
+    # ниже не перезаписываются и не удаляются.
+    if not await edit_min_stock.flush_pending():
+        logger.warning(
+            "[%s] Очередь правок не записана в GSheet — "
+            "строки с незаписанными правками импорт пропустит",
+            LABEL,
+        )
     rows = await gsheet.read_all_levels()
     logger.info("[%s] Из GSheet: %d записей с min/max > 0", LABEL, len(rows))
 
@@ -168,6 +186,7 @@ async def sync_min_stock_from_gsheet(triggered_by: str | None = None) -> int:
                         "min_level": stmt.excluded.min_level,
                         "max_level": stmt.excluded.max_level,
                     },
+                    where=MinStockLevel.sheet_pending.is_(False),
                 )
                 await session.execute(stmt)
 
@@ -182,7 +201,9 @@ async def sync_min_stock_from_gsheet(triggered_by: str | None = None) -> int:
         if rows:  # Не удаляем если таблица пуста (защита от сбоя API)
             existing = (
                 await session.execute(
-                    select(MinStockLevel.product_id, MinStockLevel.department_id)
+                    select(MinStockLevel.product_id, MinStockLevel.department_id).where(
+                        MinStockLevel.sheet_pending.is_(False)
+                    )
                 )
             ).all()
 
@@ -199,10 +220,11 @@ async def sync_min_stock_from_gsheet(triggered_by: str | None = None) -> int:
                     batch = to_delete[i : i + DEL_BATCH]
                     await session.execute(
                         delete(MinStockLevel).where(
+                            MinStockLevel.sheet_pending.is_(False),
                             tuple_(
                                 MinStockLevel.product_id,
                                 MinStockLevel.department_id,
-                            ).in_(batch)
+                            ).in_(batch),
                         )
                     )
                 logger.info(
@@ -0,0 +1,435 @@
+"""
+Use-case: durable-очередь вебхуков iikoCloud (Redis Stream + consumer group).
+
+Поток:
+  POST /iiko-webhook → enqueue() (XADD) → 200 сразу.
+  WebhookWorker в каждой реплике читает stream через XREADGROUP:
+    - StopListUpdate → org_id в ZSET bot:iiko_webhook:stoplist_due
+      со score = now + 60 сек (повторный вебхук сдвигает срок = debounce per-org);
+    - закрытые заказы → только лог (как и раньше);
+    - XACK после того, как событие зафиксировано в ZSET.
+  Flusher раз в секунду забирает «созревшие» org'и (Lua: score → аренда
+  FLUSH_LEASE_SEC) и обрабатывает их параллельно, не более FLUSH_CONCURRENCY.
+  Успех → ZREM, только если за время flush не пришёл новый вебхук по этой org.
+  Ошибка flush (StoplistFlushError по упавшим org) → повтор через FLUSH_RETRY_SEC.
+
+At-least-once:
+  - событие не ACK'нуто (падение до записи в ZSET) → через RECLAIM_IDLE_MS
+    его заберёт XAUTOCLAIM любая живая реплика;
+  - реплика упала посреди flush → аренда истекает, org снова «созрела».
+
+Redis недоступен → enqueue() возвращает None, main.py обрабатывает вебхук
+по-старому (in-process debounce в iiko_webhook_handler).
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Any
+
+from use_cases.redis_cache import get_redis
+from use_cases.redis_lock import INSTANCE_ID
+
+logger = logging.getLogger(__name__)
+
+LABEL = "webhook-queue"
+
+STREAM_KEY = "bot:iiko_webhook:events"
+GROUP = "iiko_webhook"
+DUE_KEY = "bot:iiko_webhook:stoplist_due"  # ZSET org_id → срок flush (ms)
+ALL_ORGS = "*"  # StopListUpdate без organizationId → все привязанные org
+
+STREAM_MAXLEN = 10_000  # ~ несколько суток вебхуков; старые обрезаются
+READ_COUNT = 100
+READ_BLOCK_MS = 2_000
+RECLAIM_IDLE_MS = 60_000  # событие без ACK дольше минуты — consumer мёртв
+RECLAIM_EVERY_SEC = 30
+DEAD_CONSUMER_IDLE_MS = 3_600_000  # пустые consumer'ы старше часа удаляются
+
+STOPLIST_DEBOUNCE_SEC = 60
+FLUSH_POLL_SEC = 1.0
+FLUSH_LEASE_SEC = 300  # аренда org на время flush
+FLUSH_RETRY_SEC = 60  # упавший flush — повтор через минуту
+FLUSH_CONCURRENCY = 4
+
+# Забрать созревшие org'и: score <= now → score = аренда. Возвращает список org.
+_CLAIM_DUE_LUA = """
+local due = redis.call('zrangebyscore', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[3])
+for _, org in ipairs(due) do
+    redis.call('zadd', KEYS[1], ARGV[2], org)
+end
+return due
+"""
+
+# Завершить flush: если score не менялся (новых вебхуков не было) —
+# ZREM (ARGV[2] == '') или перенос на ARGV[2] (повтор после ошибки).
+_FINISH_DUE_LUA = """
+local score = redis.call('zscore', KEYS[1], ARGV[1])
+if score and tonumber(score) == tonumber(ARGV[2]) then
+    if ARGV[3] == '' then
+        return redis.call('zrem', KEYS[1], ARGV[1])
+    end
+    return redis.call('zadd', KEYS[1], ARGV[3], ARGV[1])
+end
+return 0
+"""
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+# ═══════════════════════════════════════════════════════
+# Producer (HTTP endpoint)
+# ═══════════════════════════════════════════════════════
+
+
+async def enqueue(body: list[dict]) -> str | None:
+    """
+    Записать тело вебхука в stream. Возвращает id записи
+    или None, если Redis недоступен (вызывающий обрабатывает по-старому).
+    """
+    try:
+        redis = await get_redis()
+        entry_id = await redis.xadd(
+            STREAM_KEY,
+            {"body": json.dumps(body, ensure_ascii=False, default=str)},
+            maxlen=STREAM_MAXLEN,
+            approximate=True,
+        )
+    except Exception:
+        logger.warning("[%s] XADD не удался — fallback в процесс", LABEL, exc_info=True)
+        return None
+    return entry_id
+
+
+# ═══════════════════════════════════════════════════════
+# Consumer + flusher
+# ═══════════════════════════════════════════════════════
+
+
+class WebhookWorker:
+    """
+    Consumer group worker: чтение stream → per-org debounce → параллельный flush.
+
+    flush_fn(org_ids: set[str], bot) — обработка стоп-листа (по умолчанию
+    iiko_webhook_handler.flush_stoplist_orgs; пустой set = все org).
+    Исключение из flush_fn → org переносится на FLUSH_RETRY_SEC, не удаляется.
+    """
+
+    def __init__(self, bot: Any, consumer: str = INSTANCE_ID, flush_fn=None):
+        if flush_fn is None:
+            from use_cases.iiko_webhook_handler import flush_stoplist_orgs
+
+            flush_fn = flush_stoplist_orgs
+        self.bot = bot
+        self.consumer = consumer
+        self._flush_fn = flush_fn
+        self._tasks: list[asyncio.Task] = []
+        self._inflight: set[asyncio.Task] = set()
+        self._next_reclaim = 0.0
+
+        # Метрики (с момента старта реплики)
+        self.started_at = time.time()
+        self.events_in = 0
+        self.events_acked = 0
+        self.reclaimed = 0
+        self.flushes_ok = 0
+        self.flushes_failed = 0
+        self.last_event_lag_sec: float | None = None  # XADD → обработка
+        self.last_flush_sec: dict[str, float] = {}
+        self._ack_times: deque[float] = deque(maxlen=10_000)
+
+    # ── lifecycle ──
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._consume_loop()),
+                asyncio.create_task(self._flush_loop()),
+            ]
+            logger.info("[%s] Worker %s запущен", LABEL, self.consumer)
+
+    async def stop(self) -> None:
+        """Остановить чтение и flush. Незавершённые org'и добьёт другая реплика."""
+        tasks = self._tasks + list(self._inflight)
+        self._tasks = []
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        logger.info("[%s] Worker %s остановлен", LABEL, self.consumer)
+
+    # ── consumer ──
+
+    async def ensure_group(self) -> None:
+        redis = await get_redis()
+        try:
+            await redis.xgroup_create(STREAM_KEY, GROUP, id="0", mkstream=True)
+        except Exception as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+
+    async def _consume_loop(self) -> None:
+        group_ready = False
+        while True:
+            try:
+                if not group_ready:
+                    await self.ensure_group()
+                    group_ready = True
+                if time.monotonic() >= self._next_reclaim:
+                    self._next_reclaim = time.monotonic() + RECLAIM_EVERY_SEC
+                    await self.reclaim()
+                await self.read_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("[%s] Ошибка чтения stream", LABEL, exc_info=True)
+                await asyncio.sleep(5)
+
+    async def read_once(self, block_ms: int | None = READ_BLOCK_MS) -> int:
+        """Прочитать и обработать новую порцию событий. Возвращает кол-во ACK."""
+        redis = await get_redis()
+        resp = await redis.xreadgroup(
+            GROUP,
+            self.consumer,
+            {STREAM_KEY: ">"},
+            count=READ_COUNT,
+            block=block_ms,
+        )
+        acked = 0
+        for _stream, entries in resp or []:
+            acked += await self._process_entries(entries)
+        return acked
+
+    async def reclaim(self) -> int:
+        """
+        Забрать события упавших consumer'ов (без ACK дольше RECLAIM_IDLE_MS)
+        и удалить пустые consumer'ы прошлых запусков.
+        """
+        redis = await get_redis()
+        _next, entries, *_ = await redis.xautoclaim(
+            STREAM_KEY, GROUP, self.consumer, RECLAIM_IDLE_MS, "0-0", count=READ_COUNT
+        )
+        acked = 0
+        if entries:
+            self.reclaimed += len(entries)
+            logger.warning(
+                "[%s] Забрано %d событий упавших consumer'ов", LABEL, len(entries)
+            )
+            acked = await self._process_entries(entries)
+
+        for c in await redis.xinfo_consumers(STREAM_KEY, GROUP):
+            if (
+                c["name"] != self.consumer
+                and not c["pending"]
+                and c["idle"] > DEAD_CONSUMER_IDLE_MS
+            ):
+                await redis.xgroup_delconsumer(STREAM_KEY, GROUP, c["name"])
+        return acked
+
+    async def _process_entries(self, entries: list) -> int:
+        redis = await get_redis()
+        ack_ids: list[str] = []
+        for entry_id, fields in entries:
+            if fields is None:  # запись обрезана MAXLEN до обработки
+                ack_ids.append(entry_id)
+                continue
+            self.events_in += 1
+            try:
+                await self._handle_event(fields)
+            except (ValueError, TypeError):
+                logger.error(
+                    "[%s] Битое событие %s — пропускаем", LABEL, entry_id, exc_info=True
+                )
+            except Exception:
+                # Не ACK — событие заберёт reclaim()
+                logger.warning(
+                    "[%s] Событие %s не обработано", LABEL, entry_id, exc_info=True
+                )
+                continue
+            ack_ids.append(entry_id)
+            self.last_event_lag_sec = max(
+                0.0, time.time() - int(entry_id.split("-", 1)[0]) / 1000
+            )
+
+        if ack_ids:
+            await redis.xack(STREAM_KEY, GROUP, *ack_ids)
+            self.events_acked += len(ack_ids)
+            now = time.monotonic()
+            self._ack_times.extend([now] * len(ack_ids))
+        return len(ack_ids)
+
+    async def _handle_event(self, fields: dict) -> None:
+        from use_cases.iiko_webhook_handler import (
+            parse_webhook_events,
+            stoplist_org_ids,
+            has_stoplist_update,
+        )
+
+        body = json.loads(fields["body"])
+        if not isinstance(body, list):
+            body = [body]
+
+        if has_stoplist_update(body):
+            org_ids = stoplist_org_ids(body) or {ALL_ORGS}
+            await schedule_stoplist(org_ids)
+
+        closed = parse_webhook_events(body)
+        if closed:
+            logger.info(
+                "[%s] Получено %d закрытых заказов (типы: %s) — остатки НЕ проверяются (только по кнопке)",
+                LABEL,
+                len(closed),
+                ", ".join(set(e["event_type"] for e in closed)),
+            )
+
+    # ── flusher ──
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(FLUSH_POLL_SEC)
+            try:
+                await self.flush_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("[%s] Ошибка flush-цикла", LABEL, exc_info=True)
+
+    async def flush_due(self, wait: bool = False) -> int:
+        """
+        Запустить flush созревших org (не больше свободных слотов
+        FLUSH_CONCURRENCY). wait=True — дождаться завершения (тесты).
+        """
+        free = FLUSH_CONCURRENCY - len(self._inflight)
+        if free <= 0:
+            return 0
+        lease = _now_ms() + FLUSH_LEASE_SEC * 1000
+        redis = await get_redis()
+        claimed = await redis.eval(_CLAIM_DUE_LUA, 1, DUE_KEY, _now_ms(), lease, free)
+        tasks = []
+        for org in claimed:
+            task = asyncio.create_task(self._flush_org(org, lease))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+            tasks.append(task)
+        if wait and tasks:
+            await asyncio.gather(*tasks)
+        return len(tasks)
+
+    async def _flush_org(self, org: str, lease: int) -> None:
+        t0 = time.monotonic()
+        try:
+            await self._flush_fn(set() if org == ALL_ORGS else {org}, self.bot)
+        except Exception:
+            self.flushes_failed += 1
+            logger.exception("[%s] Flush org=%s упал — повтор", LABEL, org)
+            retry_at = str(_now_ms() + FLUSH_RETRY_SEC * 1000)
+        else:
+            self.flushes_ok += 1
+            retry_at = ""
+        elapsed = time.monotonic() - t0
+        self.last_flush_sec[org] = round(elapsed, 2)
+        logger.info("[%s] Flush org=%s за %.2f сек", LABEL, org, elapsed)
+
+        try:
+            redis = await get_redis()
+            await redis.eval(_FINISH_DUE_LUA, 1, DUE_KEY, org, lease, retry_at)
+        except Exception:
+            # аренда истечёт — org обработается ещё раз (at-least-once)
+            logger.warning("[%s] Не удалось закрыть org=%s", LABEL, org, exc_info=True)
+
+    # ── метрики ──
+
+    def throughput_per_min(self) -> int:
+        """ACK'нутых событий за последние 60 сек."""
+        edge = time.monotonic() - 60
+        while self._ack_times and self._ack_times[0] < edge:
+            self._ack_times.popleft()
+        return len(self._ack_times)
+
+
+async def schedule_stoplist(org_ids: set[str]) -> None:
+    """(Пере)назначить flush org'ов через STOPLIST_DEBOUNCE_SEC (debounce)."""
+    due = _now_ms() + STOPLIST_DEBOUNCE_SEC * 1000
+    redis = await get_redis()
+    await redis.zadd(DUE_KEY, {org: due for org in org_ids})
+    logger.info(
+        "[%s] StopListUpdate debounce: %s, flush через %d сек",
+        LABEL,
+        sorted(org_ids),
+        STOPLIST_DEBOUNCE_SEC,
+    )
+
+
+# ═══════════════════════════════════════════════════════
+# Singleton + статистика
+# ═══════════════════════════════════════════════════════
+
+_worker: WebhookWorker | None = None
+
+
+def start_worker(bot: Any) -> None:
+    """Запустить worker очереди (вызывается из on_startup в webhook-режиме)."""
+    global _worker
+    if _worker is None:
+        _worker = WebhookWorker(bot)
+        _worker.start()
+
+
+async def stop_worker() -> None:
+    global _worker
+    if _worker is not None:
+        await _worker.stop()
+        _worker = None
+
+
+async def get_queue_stats() -> dict[str, Any]:
+    """
+    Метрики очереди: длина stream, lag группы (ещё не прочитано),
+    pending (прочитано без ACK), возраст старейшего pending,
+    org'и в ожидании flush, throughput этой реплики.
+    """
+    redis = await get_redis()
+    stats: dict[str, Any] = {
+        "stream_len": await redis.xlen(STREAM_KEY),
+        "lag": None,
+        "pending": 0,
+        "oldest_pending_sec": None,
+        "due_orgs": await redis.zcard(DUE_KEY),
+    }
+    for g in await redis.xinfo_groups(STREAM_KEY):
+        if g["name"] == GROUP:
+            stats["lag"] = g.get("lag")
+            stats["pending"] = g["pending"]
+    if stats["pending"]:
+        oldest = await redis.xpending_range(
+            STREAM_KEY, GROUP, min="-", max="+", count=1
+        )
+        if oldest:
+            stats["oldest_pending_sec"] = round(
+                oldest[0]["time_since_delivered"] / 1000, 1
+            )
+
+    if _worker is not None:
+        stats.update(
+            consumer=_worker.consumer,
+            events_in=_worker.events_in,
+            events_acked=_worker.events_acked,
+            reclaimed=_worker.reclaimed,
+            throughput_per_min=_worker.throughput_per_min(),
+            last_event_lag_sec=(
+                round(_worker.last_event_lag_sec, 2)
+                if _worker.last_event_lag_sec is not None
+                else None
+            ),
+            flushes_ok=_worker.flushes_ok,
+            flushes_failed=_worker.flushes_failed,
+            last_flush_sec=dict(_worker.last_flush_sec),
+        )
+
+    from use_cases.iiko_webhook_handler import flush_latency
+
+    stats["flush_latency"] = dict(flush_latency)
+    return stats
@@ -23,7 +23,7 @@ logger = logging.getLogger(__name__)
 CACHE_TTL = 600  # 10 минут для складов / счетов
 UNIT_CACHE_TTL = 1800  # 30 минут для единиц измерения
 
-_cache = TtlCache(default_ttl=CACHE_TTL)
+_cache = TtlCache(default_ttl=CACHE_TTL, name="writeoff")
 
 
 def get_stores(department_id: str) -> list[dict] | None:
@@ -0,0 +1,271 @@
+"""
+Пул процессов для CPU-bound задач (OpenCV/PIL, reportlab).
+
+asyncio.to_thread не спасает от GIL: альбом из 10 фото или PDF на сотню
+позиций держали интерпретатор, и остальные пользователи бота ждали.
+Теперь такие задачи идут в ProcessPoolExecutor:
+
+  - воркеры тёплые: при старте процесса импортируются cv2 / PIL / reportlab
+    и регистрируются шрифты PDF (WARMUP) — первая задача не платит за импорт;
+  - задачи bytes-in / bytes-out: функция уровня модуля + picklable аргументы;
+  - backpressure: не больше workers × INFLIGHT_PER_WORKER задач в пуле,
+    остальные ждут в очереди; очередь длиннее CPU_POOL_MAX_WAITING —
+    CpuPoolBusy сразу (лучше «попробуйте позже», чем ответ через минуту);
+  - метрики: глубина очереди, в работе, p50/p95 ожидания и выполнения.
+
+CPU_POOL_WORKERS=0 — пул выключен, задачи идут в asyncio.to_thread
+(локальная разработка, окружения без fork/spawn).
+
+Использование:
+    result = await run_cpu(_validate_photo_sync, image_bytes)
+"""
+
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, TypeVar
+
+from config import CPU_POOL_MAX_WAITING, CPU_POOL_WORKERS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+INFLIGHT_PER_WORKER = 2  # одна задача считается, следующая уже в pipe
+_LATENCY_WINDOW = 500
+
+# Что импортировать / вызвать в каждом воркере при старте ("модуль[:функция]")
+WARMUP: tuple[str, ...] = (
+    "numpy",
+    "cv2",
+    "PIL.Image",
+    "utils.image_prep",
+    "utils.qr_detector:get_detectors",
+    "use_cases.pdf_invoice:_ensure_fonts",
+)
+
+
+class CpuPoolBusy(RuntimeError):
+    """Очередь CPU-задач переполнена — запрос отклонён."""
+
+
+def _warm_worker(warmup: tuple[str, ...]) -> None:
+    """initializer воркера: тяжёлые импорты до первой задачи."""
+    for spec in warmup:
+        module_name, _, func_name = spec.partition(":")
+        try:
+            module = importlib.import_module(module_name)
+            if func_name:
+                getattr(module, func_name)()
+        except Exception:
+            logging.getLogger(__name__).warning(
+                "[cpu_pool] warmup %s не удался", spec, exc_info=True
+            )
+
+
+def _timed_call(fn: Callable[..., T], args: tuple, kwargs: dict) -> tuple[T, float]:
+    """Выполняется в воркере: (результат, время выполнения в сек)."""
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - t0
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CpuPool:
+    """ProcessPoolExecutor с backpressure и метриками."""
+
+    def __init__(
+        self,
+        workers: int,
+        max_waiting: int = 32,
+        warmup: tuple[str, ...] = WARMUP,
+    ) -> None:
+        self.workers = workers
+        self.max_waiting = max_waiting
+        self.warmup = warmup
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()  # создание / замена _executor
+        self._slots = asyncio.Semaphore(max(1, workers) * INFLIGHT_PER_WORKER)
+        self.waiting = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.restarts = 0
+        self._wait_sec: deque[float] = deque(maxlen=_LATENCY_WINDOW)
+        self._exec_sec: deque[float] = deque(maxlen=_LATENCY_WINDOW)
+
+    # ── lifecycle ──
+
+    def _ensure_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: у бота есть потоки (asyncpg, to_thread) — fork небезопасен
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_warm_worker,
+                    initargs=(self.warmup,),
+                )
+            return self._executor
+
+    def _replace_broken(self, broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        """
+        Пересоздать пул, если сломан именно текущий. Параллельные задачи того же
+        пула получают BrokenProcessPool все разом — пересоздаёт первая, остальные
+        берут уже новый пул, а не гасят его.
+        """
+        with self._lock:
+            if self._executor is broken:
+                logger.warning("[cpu_pool] пул сломан, пересоздаю")
+                self.restarts += 1
+                self._executor = None
+                broken.shutdown(wait=False, cancel_futures=True)
+        return self._ensure_executor()
+
+    async def start(self) -> None:
+        """Поднять все воркеры заранее (иначе spawn — на первой задаче)."""
+        if self.workers <= 0:
+            return
+        t0 = time.monotonic()
+        loop = asyncio.get_running_loop()
+        executor = self._ensure_executor()
+        await asyncio.gather(
+            *(
+                loop.run_in_executor(executor, time.sleep, 0.05)
+                for _ in range(self.workers)
+            )
+        )
+        logger.info(
+            "[cpu_pool] %d воркеров готовы за %.1f сек",
+            self.workers,
+            time.monotonic() - t0,
+        )
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    # ── run ──
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Выполнить fn(*args, **kwargs) в воркере.
+
+        fn — функция уровня модуля, аргументы и результат — picklable.
+        Raises:
+            CpuPoolBusy: очередь длиннее max_waiting
+        """
+        if self.workers <= 0:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+
+        if self._slots.locked() and self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise CpuPoolBusy(f"CPU-очередь переполнена ({self.waiting} задач ждут)")
+
+        t_enqueue = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self._wait_sec.append(time.perf_counter() - t_enqueue)
+
+        self.in_flight += 1
+        try:
+            result, exec_sec = await self._submit(fn, args, kwargs)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+        self.completed += 1
+        self._exec_sec.append(exec_sec)
+        return result
+
+    async def _submit(self, fn, args, kwargs) -> tuple[Any, float]:
+        loop = asyncio.get_running_loop()
+        executor = self._ensure_executor()
+        try:
+            return await loop.run_in_executor(executor, _timed_call, fn, args, kwargs)
+        except BrokenProcessPool:
+            # Воркер убит (OOM на огромном фото и т.п.) — пул пересоздаётся,
+            # задача (чистая функция) повторяется один раз.
+            executor = self._replace_broken(executor)
+            return await loop.run_in_executor(executor, _timed_call, fn, args, kwargs)
+
+    # ── metrics ──
+
+    def stats(self) -> dict:
+        waits = list(self._wait_sec)
+        execs = list(self._exec_sec)
+        return {
+            "workers": self.workers,
+            "queue_depth": self.waiting,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+            "wait_p50_ms": round(_percentile(waits, 0.5) * 1000, 1),
+            "wait_p95_ms": round(_percentile(waits, 0.95) * 1000, 1),
+            "exec_p50_ms": round(_percentile(execs, 0.5) * 1000, 1),
+            "exec_p95_ms": round(_percentile(execs, 0.95) * 1000, 1),
+        }
+
+
+# ═══════════════════════════════════════════════════════
+# Общий пул процесса бота
+# ═══════════════════════════════════════════════════════
+
+_pool: CpuPool | None = None
+
+
+def get_cpu_pool() -> CpuPool:
+    """Общий пул (создаётся лениво; воркеры поднимаются при первой задаче)."""
+    global _pool
+    if _pool is None:
+        _pool = CpuPool(CPU_POOL_WORKERS, CPU_POOL_MAX_WAITING)
+    return _pool
+
+
+async def run_cpu(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Выполнить CPU-bound fn в общем пуле процессов."""
+    return await get_cpu_pool().run(fn, *args, **kwargs)
+
+
+async def start_cpu_pool() -> None:
+    """Прогрев воркеров при старте бота (не критично — при ошибке ленивый старт)."""
+    try:
+        await get_cpu_pool().start()
+    except Exception:
+        logger.warning("[cpu_pool] прогрев не удался", exc_info=True)
+
+
+def shutdown_cpu_pool() -> None:
+    """Остановить воркеры (on_shutdown / _cleanup)."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+
+def get_cpu_pool_stats() -> dict:
+    """Метрики общего пула (пустой пул — нули)."""
+    return get_cpu_pool().stats()
@@ -0,0 +1,143 @@
+"""
+Подготовка фото документа перед OCR: одно декодирование на всё.
+
+Раньше одно фото декодировалось 3 раза (photo_validator, qr_detector,
+gpt5_vision_ocr._auto_rotate), а JPEG q95 для модели пересобирался
+синхронно в event loop. Теперь:
+
+  decode → EXIF transpose → RGB-буфер (общий)
+    ├─ ч/б → метрики качества (Laplacian, яркость)   photo_validator
+    ├─ QR-детекция по тому же буферу (опционально)   qr_detector
+    ├─ JPEG для модели: ≤ MODEL_MAX_SIDE по длинной стороне
+    └─ ключ OCR-кеша: sha256 JPEG (use_cases/ocr_cache.py)
+
+Весь этап — одна задача в пуле процессов (utils/cpu_pool.py), с таймингами
+по шагам в PreparedImage.timings (мс).
+"""
+
+import hashlib
+import time
+from io import BytesIO
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+from PIL import Image, ImageOps
+
+from utils.cpu_pool import run_cpu
+from utils.photo_validator import QualityResult, quality_from_gray
+from utils.qr_detector import detect_qr_array
+
+# GPT Vision (detail=high) всё равно вписывает картинку в 2048×2048 —
+# больше отправлять бессмысленно: только трафик и base64 в памяти.
+MODEL_MAX_SIDE = 2048
+JPEG_QUALITY = 95
+
+_EXIF_ORIENTATION = 0x0112
+
+
+class PreparedImage(NamedTuple):
+    """Результат подготовки одного фото."""
+
+    quality: QualityResult
+    has_qr: bool | None  # None — детекция не запрашивалась
+    jpeg: bytes  # что отправлять в модель
+    timings: dict[str, float]  # шаг → мс
+    content_hash: str = ""  # sha256(jpeg), hex
+
+
+def _fit_size(width: int, height: int, max_side: int) -> tuple[int, int] | None:
+    """Новый размер под max_side или None, если уменьшать не нужно."""
+    longest = max(width, height)
+    if longest <= max_side:
+        return None
+    k = max_side / longest
+    return max(1, round(width * k)), max(1, round(height * k))
+
+
+def _decode(image_bytes: bytes) -> tuple[Image.Image, np.ndarray, bool]:
+    """(исходная картинка, RGB-буфер после EXIF transpose, был ли поворот)."""
+    img = Image.open(BytesIO(image_bytes))
+    img.load()
+    transposed = img.getexif().get(_EXIF_ORIENTATION, 1) != 1
+    rotated = ImageOps.exif_transpose(img) if transposed else img
+    if rotated.mode != "RGB":
+        rotated = rotated.convert("RGB")
+    return img, np.asarray(rotated), transposed
+
+
+def _encode_for_model(
+    image_bytes: bytes, src: Image.Image, rgb: np.ndarray, transposed: bool
+) -> bytes:
+    """JPEG для модели; исходные байты — если они уже годятся как есть."""
+    height, width = rgb.shape[:2]
+    new_size = _fit_size(width, height, MODEL_MAX_SIDE)
+    if new_size is None and not transposed and src.format == "JPEG":
+        return image_bytes  # без повторного сжатия
+
+    if new_size is not None:
+        rgb = cv2.resize(rgb, new_size, interpolation=cv2.INTER_AREA)
+    buf = BytesIO()
+    Image.fromarray(rgb).save(buf, format="JPEG", quality=JPEG_QUALITY)
+    return buf.getvalue()
+
+
+def prepare_image_sync(image_bytes: bytes, with_qr: bool = False) -> PreparedImage:
+    """Синхронная подготовка фото (CPU-bound: PIL + OpenCV)."""
+    timings: dict[str, float] = {}
+    t_start = t = time.perf_counter()
+
+    def _lap(step: str) -> None:
+        nonlocal t
+        now = time.perf_counter()
+        timings[step] = round((now - t) * 1000, 2)
+        t = now
+
+    src, rgb, transposed = _decode(image_bytes)
+    _lap("decode")
+
+    gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+    quality = quality_from_gray(gray)
+    _lap("quality")
+
+    has_qr = None
+    if with_qr and quality.is_good:
+        has_qr = detect_qr_array(rgb, gray)
+        _lap("qr")
+
+    jpeg = b""
+    content_hash = ""
+    if quality.is_good:  # плохое фото в модель не пойдёт
+        jpeg = _encode_for_model(image_bytes, src, rgb, transposed)
+        _lap("encode")
+        content_hash = hashlib.sha256(jpeg).hexdigest()
+        _lap("hash")
+
+    timings["total"] = round((time.perf_counter() - t_start) * 1000, 2)
+    return PreparedImage(
+        quality=quality,
+        has_qr=has_qr,
+        jpeg=jpeg,
+        timings=timings,
+        content_hash=content_hash,
+    )
+
+
+def prepare_model_jpeg_sync(image_bytes: bytes) -> bytes:
+    """Только EXIF transpose + JPEG для модели (без метрик и QR)."""
+    src, rgb, transposed = _decode(image_bytes)
+    return _encode_for_model(image_bytes, src, rgb, transposed)
+
+
+async def prepare_image(image_bytes: bytes, with_qr: bool = False) -> PreparedImage:
+    """
+    Подготовить фото к OCR (неблокирующая обёртка).
+
+    Args:
+        image_bytes: Изображение в байтах
+        with_qr: Искать QR-код (только для хороших по качеству фото)
+
+    Returns:
+        PreparedImage: качество, QR, JPEG для модели, тайминги
+    """
+    return await run_cpu(prepare_image_sync, image_bytes, with_qr)
@@ -0,0 +1,312 @@
+"""
+Сторож event loop: какой шаг заблокировал loop и где именно.
+
+Семплер utils.metrics видит, что loop просыпается поздно, но не видит,
+кто его держал. Сторож отвечает на второй вопрос:
+
+  - каждый шаг loop (Handle._run — шаг задачи или callback) засекается:
+    два perf_counter на шаг, дольше порога → отчёт о блокировке;
+  - поток-сторож раз в ~50 мс смотрит, не идёт ли текущий шаг дольше
+    порога, и снимает стек потока loop прямо во время блокировки —
+    отчёт показывает строку, на которой висели, а не точку await после;
+  - если стек снять не успели (C-код не отпускает GIL: json.dumps,
+    ET.fromstring), место — по корутине задачи / функции callback.
+
+Отчёт: WARNING логгера STALL_LOGGER («loop_stall») — в bot_log, стек —
+в колонку traceback; счётчик event_loop_stalls_total в /metrics. Записей
+в лог не больше REPORTS_PER_MINUTE, остальные только считаются.
+Сводка — /lag (сисадмины), use_cases/loop_stalls.py.
+
+Порог — LOOP_STALL_THRESHOLD_MS (по умолчанию 250 мс, 0 — выключен).
+"""
+
+import asyncio
+import asyncio.events
+import logging
+import re
+import sys
+import threading
+import time
+import traceback
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from types import FrameType
+from typing import Any
+
+from config import LOOP_STALL_THRESHOLD_MS
+
+logger = logging.getLogger(__name__)
+
+STALL_LOGGER = "loop_stall"  # logger_name записей о блокировках в bot_log
+WATCH_STEP = 0.05  # сек между проверками потока-сторожа
+STACK_LIMIT = 40  # кадров стека (самые глубокие)
+REPORTS_PER_MINUTE = 30
+
+_PROJECT_ROOT = str(Path(__file__).resolve().parents[1])
+_STALL_RE = re.compile(r"заблокирован на (\d+) мс: (.+?) \[(.*?)\]")
+
+
+@dataclass(slots=True, frozen=True)
+class Stall:
+    """Одна блокировка: сколько, в какой задаче, где (файл:строка функция)."""
+
+    duration: float
+    task: str
+    where: str
+    stack: str | None = None  # None — стек во время блокировки не снят
+
+
+def format_stall(stall: Stall) -> str:
+    """Текст записи в bot_log (разбирается обратно parse_stall)."""
+    text = (
+        f"Event loop заблокирован на {round(stall.duration * 1000)} мс: "
+        f"{stall.where} [{stall.task}]"
+    )
+    return text if stall.stack else text + " (стек не снят)"
+
+
+def parse_stall(message: str) -> tuple[int, str, str] | None:
+    """(мс, где, задача) из текста записи; None — не запись сторожа."""
+    match = _STALL_RE.search(message)
+    if not match:
+        return None
+    return int(match.group(1)), match.group(2), match.group(3)
+
+
+# ═══════════════════════════════════════════════════════
+# Откуда блокировка
+# ═══════════════════════════════════════════════════════
+
+
+def _is_own(filename: str) -> bool:
+    """Файл проекта, а не stdlib / site-packages."""
+    return filename.startswith(_PROJECT_ROOT) and "site-packages" not in filename
+
+
+def _location(filename: str, lineno: int, name: str) -> str:
+    if filename.startswith(_PROJECT_ROOT):
+        filename = filename[len(_PROJECT_ROOT) + 1 :]
+    return f"{filename}:{lineno} {name}"
+
+
+def _stack_where(stack: traceback.StackSummary) -> str:
+    """Самый глубокий кадр проекта (иначе — самый глубокий вообще)."""
+    own = [f for f in stack if _is_own(f.filename)]
+    frame = (own or stack)[-1]
+    return _location(frame.filename, frame.lineno, frame.name)
+
+
+def _coro_where(coro: Any) -> str:
+    """Точка, где корутина задачи (самая глубокая в цепочке await) стоит сейчас."""
+    where = ""
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        code = getattr(coro, "cr_code", None) or getattr(coro, "gi_code", None)
+        if frame is not None and (not where or _is_own(frame.f_code.co_filename)):
+            code = frame.f_code
+            where = _location(code.co_filename, frame.f_lineno, code.co_name)
+        elif code is not None and not where:
+            where = _location(code.co_filename, code.co_firstlineno, code.co_name)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return where or "?"
+
+
+def _callable_where(callback: Callable) -> str:
+    func = getattr(callback, "__func__", callback)
+    func = getattr(func, "func", func)  # functools.partial
+    code = getattr(func, "__code__", None)
+    if code is None:
+        return repr(callback)[:120]
+    return _location(code.co_filename, code.co_firstlineno, func.__qualname__)
+
+
+def _describe(handle: asyncio.Handle) -> tuple[str, str]:
+    """(задача, место) шага loop без снятого стека."""
+    callback = handle._callback
+    owner = getattr(callback, "__self__", None)
+    if isinstance(owner, asyncio.Task):
+        coro = owner.get_coro()
+        name = getattr(coro, "__qualname__", type(coro).__name__)
+        return f"{owner.get_name()} {name}", _coro_where(coro)
+    return "callback", _callable_where(callback)
+
+
+def _format_stack(stack: traceback.StackSummary) -> str:
+    return "Stack (most recent call last):\n" + "".join(stack.format()).rstrip("\n")
+
+
+# ═══════════════════════════════════════════════════════
+# Сторож
+# ═══════════════════════════════════════════════════════
+
+_original_run = asyncio.events.Handle._run
+_watchdog: "LoopWatchdog | None" = None
+
+
+def _timed_run(handle: asyncio.Handle) -> None:
+    """Handle._run с замером: один шаг задачи / callback."""
+    watchdog = _watchdog
+    if watchdog is None or handle._loop is not watchdog.loop:
+        return _original_run(handle)
+    t0 = time.perf_counter()
+    watchdog.running_since = t0
+    try:
+        _original_run(handle)
+    finally:
+        watchdog.running_since = None
+        elapsed = time.perf_counter() - t0
+        if elapsed >= watchdog.threshold:
+            watchdog.slow_step(handle, t0, elapsed)
+
+
+class LoopWatchdog:
+    """Замер шагов loop + поток, снимающий стек затянувшегося шага."""
+
+    def __init__(
+        self,
+        threshold: float,
+        *,
+        on_stall: Callable[[Stall], None] | None = None,
+    ):
+        self.threshold = threshold
+        self.on_stall = on_stall or _log_stall
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.running_since: float | None = None
+        self._loop_thread: int | None = None
+        self._captured: tuple[float, traceback.StackSummary] | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._window = (0.0, 0)  # (начало минуты, записей в логе)
+        self.stats: dict[str, Any] = {
+            "stalls": 0,
+            "reported": 0,
+            "suppressed": 0,
+            "max_ms": 0,
+            "last": None,
+        }
+
+    def start(self) -> None:
+        """Запуск из потока event loop."""
+        global _watchdog
+        if _watchdog is not None:
+            raise RuntimeError("сторож event loop уже запущен")
+        self.loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._stop.clear()
+        _watchdog = self
+        asyncio.events.Handle._run = _timed_run
+        self._thread = threading.Thread(
+            target=self._watch, name="loop-watchdog", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        global _watchdog
+        if _watchdog is self:
+            asyncio.events.Handle._run = _original_run
+            _watchdog = None
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(WATCH_STEP * 4)
+            self._thread = None
+
+    def _watch(self) -> None:
+        """Поток-сторож: шаг идёт дольше порога → стек потока loop."""
+        step = min(WATCH_STEP, self.threshold / 4)
+        while not self._stop.wait(step):
+            started = self.running_since
+            if started is None or time.perf_counter() - started < self.threshold:
+                continue
+            if self._captured is not None and self._captured[0] == started:
+                continue
+            frame: FrameType | None = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame, limit=STACK_LIMIT)
+            del frame
+            if self.running_since == started:
+                self._captured = (started, stack)
+
+    def slow_step(self, handle: asyncio.Handle, started: float, elapsed: float) -> None:
+        """Шаг дольше порога (поток loop, сразу после шага)."""
+        from utils.metrics import LOOP_STALLS
+
+        captured, self._captured = self._captured, None
+        task, where = _describe(handle)
+        stack = None
+        if captured is not None and captured[0] == started:
+            where = _stack_where(captured[1])
+            stack = _format_stack(captured[1])
+        stall = Stall(duration=elapsed, task=task, where=where, stack=stack)
+
+        LOOP_STALLS.inc()
+        self.stats["stalls"] += 1
+        self.stats["max_ms"] = max(self.stats["max_ms"], round(elapsed * 1000))
+        self.stats["last"] = format_stall(stall)
+        if not self._within_budget():
+            self.stats["suppressed"] += 1
+            return
+        self.stats["reported"] += 1
+        try:
+            self.on_stall(stall)
+        except Exception:
+            # Исключение отсюда остановило бы сам loop
+            logger.debug("[loop_watchdog] отчёт не записан", exc_info=True)
+
+    def _within_budget(self) -> bool:
+        now = time.monotonic()
+        since, count = self._window
+        if now - since >= 60:
+            since, count = now, 0
+        self._window = (since, count + 1)
+        return count < REPORTS_PER_MINUTE
+
+
+def _log_stall(stall: Stall) -> None:
+    """WARNING в STALL_LOGGER, стек — stack_info (→ bot_log.traceback)."""
+    stall_logger = logging.getLogger(STALL_LOGGER)
+    if not stall_logger.isEnabledFor(logging.WARNING):
+        return
+    record = stall_logger.makeRecord(
+        STALL_LOGGER,
+        logging.WARNING,
+        __file__,
+        0,
+        format_stall(stall),
+        (),
+        None,
+        sinfo=stall.stack,
+    )
+    stall_logger.handle(record)
+
+
+# ═══════════════════════════════════════════════════════
+# Публичный API
+# ═══════════════════════════════════════════════════════
+
+
+def start_loop_watchdog(threshold: float | None = None) -> None:
+    """Запустить сторож (порог в сек; по умолчанию LOOP_STALL_THRESHOLD_MS)."""
+    if threshold is None:
+        threshold = LOOP_STALL_THRESHOLD_MS / 1000
+    if threshold <= 0 or _watchdog is not None:
+        return
+    LoopWatchdog(threshold).start()
+    logger.info("[loop_watchdog] Запущен, порог %d мс", round(threshold * 1000))
+
+
+def stop_loop_watchdog() -> None:
+    if _watchdog is not None:
+        _watchdog.stop()
+
+
+def get_watchdog_stats() -> dict[str, Any]:
+    """Блокировки с запуска процесса: всего / записано / пропущено, max, последняя."""
+    if _watchdog is None:
+        return {"running": False, "threshold_ms": LOOP_STALL_THRESHOLD_MS}
+    return {
+        "running": True,
+        "threshold_ms": round(_watchdog.threshold * 1000),
+        **_watchdog.stats,
+    }
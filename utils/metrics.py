@@ -0,0 +1,506 @@
+"""
+Метрики процесса в формате Prometheus (text exposition 0.0.4) — GET /metrics.
+
+prometheus_client в зависимостях нет, а нужно немного: Counter, Gauge,
+Histogram с фиксированными бакетами и рендер текста при scrape.
+
+Горячий путь дешёвый:
+  - дочерняя серия (набор значений меток) создаётся один раз и кешируется
+    вызывающим кодом (middleware, транспорт httpx) — на каждый вызов
+    только inc()/observe() без новых объектов;
+  - observe: bisect по кортежу границ + два сложения, без блокировок
+    (инкременты из потоков to_thread под GIL; редкая потеря одного
+    инкремента для метрик допустима);
+  - всё «дорогое» (пул БД, hit ratio, сортировка серий) — в момент scrape.
+
+Что собирается:
+  bot_handler_*          — латентность и ошибки хэндлеров (router, handler)
+  external_*             — iiko / FinTablo / iikoCloud / Sheets / OpenAI:
+                           латентность, байты, ошибки, повторы (service, endpoint)
+  db_pool_*              — пул SQLAlchemy (db/engine.py)
+  cache_*                — попадания/промахи кешей и hit ratio
+  scheduler_job_*        — длительность и сбои задач APScheduler
+  event_loop_lag_seconds — задержка event loop (start_loop_lag_monitor)
+  event_loop_stalls_total — блокировки loop дольше порога (utils/loop_watchdog)
+"""
+
+import asyncio
+import hmac
+import logging
+import re
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+from typing import Any
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Секунды: от быстрых хэндлеров до долгих выгрузок iiko / OCR
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)  # fmt: skip
+JOB_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+_registry: dict[str, "_Metric"] = {}
+
+
+# ═══════════════════════════════════════════════════════
+# Типы метрик
+# ═══════════════════════════════════════════════════════
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """База: имя, описание, метки и кеш дочерних серий."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, doc: str, labelnames: tuple[str, ...] = ()):
+        if name in _registry:
+            raise ValueError(f"метрика {name} уже зарегистрирована")
+        self.name = name
+        self.doc = doc
+        self.labelnames = labelnames
+        self._children: dict[tuple[str, ...], Any] = {}
+        _registry[name] = self
+
+    def labels(self, *values: str):
+        """Дочерняя серия для значений меток (создаётся один раз)."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name}: ожидались метки {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _label_str(self, values: tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        head = f"# HELP {self.name} {self.doc}\n# TYPE {self.name} {self.kind}\n"
+        return head + "".join(line + "\n" for line in self._samples())
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def set(self, value: float) -> None:  # noqa: A003
+        self.value = value
+
+
+class Counter(_Metric):
+    """Монотонный счётчик."""
+
+    kind = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def _samples(self) -> Iterable[str]:
+        for values, child in sorted(self._children.items()):
+            yield f"{self.name}{self._label_str(values)} {_fmt(child.value)}"
+
+
+class Gauge(Counter):
+    """Произвольное значение (set / inc)."""
+
+    kind = "gauge"
+
+    def set(self, value: float) -> None:  # noqa: A003
+        self.labels().set(value)
+
+
+class CallbackGauge(_Metric):
+    """
+    Gauge, значение которого считается при scrape: fn() возвращает число
+    (без меток) или dict {кортеж значений меток: число}.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        doc: str,
+        fn: Callable[[], float | dict[tuple[str, ...], float]],
+        labelnames: tuple[str, ...] = (),
+    ):
+        super().__init__(name, doc, labelnames)
+        self._fn = fn
+
+    def _samples(self) -> Iterable[str]:
+        try:
+            result = self._fn()
+        except Exception:
+            logger.debug("[metrics] %s: ошибка callback", self.name, exc_info=True)
+            return
+        if not isinstance(result, dict):
+            result = {(): result}
+        for values, value in sorted(result.items()):
+            yield f"{self.name}{self._label_str(values)} {_fmt(value)}"
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self._bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # последний — +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self._bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    """Гистограмма с фиксированными бакетами (le — включительно)."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        doc: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, doc, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _samples(self) -> Iterable[str]:
+        bounds = (*self.buckets, float("inf"))
+        for values, child in sorted(self._children.items()):
+            cumulative = 0
+            for bound, n in zip(bounds, child.counts):
+                cumulative += n
+                le = f'le="{_fmt(bound)}"'
+                yield f"{self.name}_bucket{self._label_str(values, le)} {cumulative}"
+            labels = self._label_str(values)
+            yield f"{self.name}_sum{labels} {_fmt(child.sum)}"
+            yield f"{self.name}_count{labels} {child.count}"
+
+
+def render() -> str:
+    """Все метрики в text exposition format (для GET /metrics)."""
+    return "".join(_registry[name].render() for name in sorted(_registry))
+
+
+def verify_scrape_auth(auth_header: str | None, token: str | None) -> bool:
+    """
+    Authorization scrape-запроса: «Bearer <token>» (сравнение за константное
+    время). token не задан — отказ: /metrics на публичном порту без токена
+    не открывается.
+    """
+    if not token or not auth_header or not auth_header.startswith("Bearer "):
+        return False
+    return hmac.compare_digest(auth_header[7:].encode(), token.encode())
+
+
+# ═══════════════════════════════════════════════════════
+# Метрики приложения
+# ═══════════════════════════════════════════════════════
+
+HANDLER_LATENCY = Histogram(
+    "bot_handler_duration_seconds",
+    "Время выполнения хэндлера aiogram",
+    ("router", "handler"),
+)
+HANDLER_ERRORS = Counter(
+    "bot_handler_errors_total",
+    "Исключения, вышедшие из хэндлера aiogram",
+    ("router", "handler"),
+)
+
+EXTERNAL_LATENCY = Histogram(
+    "external_request_duration_seconds",
+    "Время внешнего HTTP-запроса до заголовков ответа",
+    ("service", "endpoint"),
+)
+EXTERNAL_BYTES = Counter(
+    "external_response_bytes_total",
+    "Байты тел ответов внешних API",
+    ("service", "endpoint"),
+)
+EXTERNAL_ERRORS = Counter(
+    "external_request_errors_total",
+    "Ошибки внешних запросов: HTTP 4xx/429/5xx или тип исключения",
+    ("service", "endpoint", "reason"),
+)
+EXTERNAL_RETRIES = Counter(
+    "external_request_retries_total",
+    "Повторы внешних запросов (retry-циклы адаптеров)",
+    ("service", "endpoint"),
+)
+
+CACHE_HITS = Counter("cache_hits_total", "Попадания в кеш", ("cache",))
+CACHE_MISSES = Counter("cache_misses_total", "Промахи кеша", ("cache",))
+
+
+def _cache_hit_ratios() -> dict[tuple[str, ...], float]:
+    ratios = {}
+    for key, hits in list(CACHE_HITS._children.items()):
+        misses = CACHE_MISSES._children.get(key)
+        total = hits.value + (misses.value if misses else 0.0)
+        ratios[key] = hits.value / total if total else 0.0
+    return ratios
+
+
+CACHE_HIT_RATIO = CallbackGauge(
+    "cache_hit_ratio",
+    "Доля попаданий среди обращений к кешу (с запуска процесса)",
+    _cache_hit_ratios,
+    ("cache",),
+)
+
+JOB_DURATION = Histogram(
+    "scheduler_job_duration_seconds",
+    "Длительность задач планировщика",
+    ("job",),
+    buckets=JOB_BUCKETS,
+)
+JOB_FAILURES = Counter(
+    "scheduler_job_failures_total",
+    "Задачи планировщика, завершившиеся исключением",
+    ("job",),
+)
+
+LOOP_LAG = Gauge("event_loop_lag_seconds", "Последняя измеренная задержка event loop")
+LOOP_LAG_HIST = Histogram(
+    "event_loop_lag_distribution_seconds",
+    "Распределение задержки event loop",
+    buckets=LAG_BUCKETS,
+)
+LOOP_STALLS = Counter(
+    "event_loop_stalls_total",
+    "Шаги event loop дольше порога LOOP_STALL_THRESHOLD_MS (utils/loop_watchdog)",
+)
+
+
+# ═══════════════════════════════════════════════════════
+# Внешние HTTP-вызовы
+# ═══════════════════════════════════════════════════════
+
+_MAX_ENDPOINTS = 512  # защита от взрыва кардинальности
+_SEGMENT_RE = re.compile(r"^[A-Za-z][\w.\-]{0,39}(?::\w+)?$")
+_endpoint_cache: dict[str, str] = {}
+
+
+def endpoint_label(path: str) -> str:
+    """
+    Путь URL → метка endpoint: идентификаторы (UUID, id таблиц, числа,
+    диапазоны A1) заменяются на {id}, query отбрасывается.
+    """
+    label = _endpoint_cache.get(path)
+    if label is not None:
+        return label
+    clean = path.split("?", 1)[0]
+    if "://" in clean:
+        clean = "/" + clean.split("://", 1)[1].partition("/")[2]
+    segments: list[str] = []
+    for seg in clean.split("/"):
+        if seg.isdigit() and len(seg) == 1 and segments and segments[-1] == "api":
+            pass  # версия iikoCloud: /api/1/...
+        elif seg and (
+            not _SEGMENT_RE.match(seg)
+            or len(seg) >= 24
+            or sum(ch.isdigit() for ch in seg) >= 4
+        ):
+            seg = "{id}"
+        segments.append(seg)
+    label = "/".join(segments) or "/"
+    if len(_endpoint_cache) < _MAX_ENDPOINTS:
+        _endpoint_cache[path] = label
+    return label
+
+
+def _error_reason(status: int) -> str | None:
+    if status == 429:
+        return "429"
+    if status >= 500:
+        return "5xx"
+    if status >= 400:
+        return "4xx"
+    return None
+
+
+def observe_external(
+    service: str,
+    endpoint: str,
+    seconds: float,
+    nbytes: int = 0,
+    status: int = 200,
+) -> None:
+    """Один внешний вызов (для клиентов не на httpx — gspread)."""
+    label = endpoint_label(endpoint)
+    EXTERNAL_LATENCY.labels(service, label).observe(seconds)
+    if nbytes:
+        EXTERNAL_BYTES.labels(service, label).inc(nbytes)
+    reason = _error_reason(status)
+    if reason:
+        EXTERNAL_ERRORS.labels(service, label, reason).inc()
+
+
+def record_external_error(service: str, endpoint: str, exc: BaseException) -> None:
+    """Исключение транспорта (таймаут, обрыв) — reason = имя класса."""
+    EXTERNAL_ERRORS.labels(service, endpoint_label(endpoint), type(exc).__name__).inc()
+
+
+def record_retry(service: str, endpoint: str) -> None:
+    """Повтор запроса в retry-цикле адаптера."""
+    EXTERNAL_RETRIES.labels(service, endpoint_label(endpoint)).inc()
+
+
+class _CountingStream(httpx.AsyncByteStream):
+    """Тело ответа без Content-Length: считаем байты по мере чтения."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, counter: _Value) -> None:
+        self._stream = stream
+        self._counter = counter
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self._counter.inc(len(chunk))
+            yield chunk
+
+    async def aclose(self) -> None:
+        await self._stream.aclose()
+
+
+class MeteredTransport(httpx.AsyncBaseTransport):
+    """
+    Обёртка транспорта httpx: латентность до заголовков, байты ответа,
+    ошибки по endpoint. Серии кешируются по сырому пути запроса.
+    """
+
+    def __init__(self, service: str, transport: httpx.AsyncBaseTransport) -> None:
+        self._service = service
+        self._inner = transport
+        self._series: dict[str, tuple[_HistogramChild, _Value, str]] = {}
+
+    def _series_for(self, path: str) -> tuple[_HistogramChild, _Value, str]:
+        label = endpoint_label(path)
+        series = (
+            EXTERNAL_LATENCY.labels(self._service, label),
+            EXTERNAL_BYTES.labels(self._service, label),
+            label,
+        )
+        if len(self._series) < _MAX_ENDPOINTS:
+            self._series[path] = series
+        return series
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        series = self._series.get(path) or self._series_for(path)
+        t0 = time.perf_counter()
+        try:
+            response = await self._inner.handle_async_request(request)
+        except Exception as exc:
+            EXTERNAL_ERRORS.labels(self._service, series[2], type(exc).__name__).inc()
+            raise
+        finally:
+            series[0].observe(time.perf_counter() - t0)
+        reason = _error_reason(response.status_code)
+        if reason:
+            EXTERNAL_ERRORS.labels(self._service, series[2], reason).inc()
+        length = response.headers.get("content-length")
+        if length is not None and length.isdigit():
+            series[1].inc(int(length))
+        else:
+            response.stream = _CountingStream(response.stream, series[1])
+        return response
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+# ═══════════════════════════════════════════════════════
+# Задержка event loop
+# ═══════════════════════════════════════════════════════
+
+LOOP_LAG_INTERVAL = 0.5  # секунд между замерами
+
+_lag_task: asyncio.Task | None = None
+
+
+async def _measure_loop_lag(interval: float) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        t0 = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - t0 - interval)
+        LOOP_LAG.set(lag)
+        LOOP_LAG_HIST.observe(lag)
+
+
+def start_loop_lag_monitor(interval: float = LOOP_LAG_INTERVAL) -> None:
+    """Фоновый замер: насколько sleep(interval) просыпается позже срока."""
+    global _lag_task
+    if _lag_task is None or _lag_task.done():
+        _lag_task = asyncio.create_task(_measure_loop_lag(interval))
+
+
+def get_loop_lag_stats(slow: float = 0.1) -> dict[str, Any]:
+    """Последний замер, среднее и сколько замеров дольше slow сек (с запуска)."""
+    child = LOOP_LAG_HIST._children.get(())
+    samples = child.count if child else 0
+    return {
+        "last_ms": round(LOOP_LAG.labels().value * 1000, 1),
+        "mean_ms": round(child.sum / samples * 1000, 1) if samples else 0.0,
+        "samples": samples,
+        "slow": sum(child.counts[bisect_left(LAG_BUCKETS, slow) + 1 :]) if child else 0,
+        "slow_ms": round(slow * 1000),
+    }
+
+
+async def stop_loop_lag_monitor() -> None:
+    global _lag_task
+    if _lag_task is not None:
+        _lag_task.cancel()
+        try:
+            await _lag_task
+        except asyncio.CancelledError:
+            pass
+        _lag_task = None
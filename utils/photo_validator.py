@@ -8,14 +8,14 @@
 - Разрешение (минимум 800x600)
 """
 
-import asyncio
-
 import cv2
 import numpy as np
 from typing import NamedTuple
 from io import BytesIO
 from PIL import Image
 
+from utils.cpu_pool import run_cpu
+
 
 class QualityResult(NamedTuple):
     """Результат проверки качества."""
@@ -37,20 +37,20 @@ MIN_WIDTH = 300  # Минимальная ширина (снижено для в
 MIN_HEIGHT = 300  # Минимальная высота
 
 
-def _validate_photo_sync(image_bytes: bytes) -> QualityResult:
-    """Синхронная проверка качества фото (CPU-bound: PIL + OpenCV)."""
-    img = Image.open(BytesIO(image_bytes))
-    img_np = np.array(img.convert("L"))  # Ч/б для анализа
+def quality_from_gray(gray: np.ndarray) -> QualityResult:
+    """
+    Метрики качества по уже декодированному ч/б буферу (H×W, uint8).
 
-    width, height = img.size
+    Общая точка для _validate_photo_sync и utils/image_prep: декодирование
+    делает вызывающий, здесь — только Laplacian и средняя яркость.
+    """
+    height, width = gray.shape[:2]
 
     # 1. Проверка размытости (Laplacian variance)
-    img_cv = cv2.cvtColor(img_np, cv2.COLOR_GRAY2BGR)
-    gray = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
-    blur_score = cv2.Laplacian(gray, cv2.CV_64F).var()
+    blur_score = float(cv2.Laplacian(gray, cv2.CV_64F).var())
 
     # 2. Проверка освещённости (средняя яркость)
-    brightness = np.mean(img_np)
+    brightness = float(np.mean(gray))
 
     # 3. Проверка ориентации
     is_vertical = height > width
@@ -88,6 +88,12 @@ def _validate_photo_sync(image_bytes: bytes) -> QualityResult:
     )
 
 
+def _validate_photo_sync(image_bytes: bytes) -> QualityResult:
+    """Синхронная проверка качества фото (CPU-bound: PIL + OpenCV)."""
+    img = Image.open(BytesIO(image_bytes))
+    return quality_from_gray(np.asarray(img.convert("L")))
+
+
 async def validate_photo(image_bytes: bytes) -> QualityResult:
     """
     Проверить качество фото документа (неблокирующая обёртка).
@@ -98,7 +104,7 @@ async def validate_photo(image_bytes: bytes) -> QualityResult:
     Returns:
         QualityResult с результатом проверки
     """
-    return await asyncio.to_thread(_validate_photo_sync, image_bytes)
+    return await run_cpu(_validate_photo_sync, image_bytes)
 
 
 def get_quality_message(result: QualityResult) -> str:
@@ -1,143 +1,219 @@
 """
 Детекция QR-кодов на изображениях.
 
-Использует OpenCV QRCodeDetector и pyzbar для обнаружения QR-кодов.
+Использует WeChat (если есть в сборке OpenCV), OpenCV QRCodeDetector и pyzbar.
+Детекторы создаются один раз на воркер; поиск — по уменьшенной ч/б копии
+с ранним выходом (см. find_qr).
 Если QR-код найден — чек можно распознать через ФНС (nalog.ru).
 """
 
-import asyncio
+import threading
+from io import BytesIO
+from typing import Any
 
 import cv2
 import numpy as np
-from io import BytesIO
 from PIL import Image
 
+from utils.cpu_pool import run_cpu
+
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-def _detect_qr_sync(image_bytes: bytes) -> bool:
-    """Синхронная CPU-bound детекция QR-кода (OpenCV + pyzbar)."""
-    img = Image.open(BytesIO(image_bytes))
-    img_np = np.array(img)
+# Рабочая ч/б копия: длинная сторона ≤ WORK_SIDE (12 МП фото → ~1.9 МП).
+# ×2 — только для мелких фото, а не для всех (раньше — и для 12 МП).
+WORK_SIDE = 1600
+_UPSCALE_BELOW = 900
+_RECEIPT_ROI_TOP = 2 / 3  # QR на чеках — в нижней трети
 
-    # Конвертируем в формат OpenCV
-    if len(img_np.shape) == 2:
-        img_cv = cv2.cvtColor(img_np, cv2.COLOR_GRAY2BGR)
-    else:
-        img_cv = cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR)
+# Детекторы — на поток: в воркере cpu_pool один поток → один экземпляр на процесс
+# (создаётся при warmup), в режиме to_thread — по экземпляру на поток пула.
+_local = threading.local()
 
-    found_qr = False
 
-    # 1. WeChat QR detector (самый надёжный)
-    try:
-        wechat_detector = cv2.wechat_qrcode_WeChatQRCode()
-        for scale in [1.0, 2.0, 0.5]:
-            h, w = img_cv.shape[:2]
-            if scale != 1.0:
-                test_img = cv2.resize(img_cv, (int(w * scale), int(h * scale)))
-            else:
-                test_img = img_cv
-
-            res, points = wechat_detector.detectAndDecode(test_img)
-            if res and len(res) > 0:
-                found_qr = True
-                break
-    except Exception:
-        logger.debug("suppressed", exc_info=True)
-    # 2. Стандартный QR detector
-    detector = cv2.QRCodeDetector()
-    if not found_qr:
+def get_detectors() -> tuple[Any | None, cv2.QRCodeDetector]:
+    """(WeChat или None, если нет contrib-сборки, QRCodeDetector) — создаются один раз."""
+    detectors = getattr(_local, "detectors", None)
+    if detectors is None:
         try:
-            for scale in [1.0, 2.0, 0.5]:
-                h, w = img_cv.shape[:2]
-                if scale != 1.0:
-                    test_img = cv2.resize(img_cv, (int(w * scale), int(h * scale)))
-                else:
-                    test_img = img_cv
-
-                data, _, _ = detector.detectAndDecode(test_img)
-                if data and len(data) > 10:
-                    found_qr = True
-                    break
+            wechat = cv2.wechat_qrcode_WeChatQRCode()
         except Exception:
-            logger.debug("suppressed", exc_info=True)
-    # 3. Pyzbar на оригинальном изображении
-    if not found_qr:
-        try:
-            from pyzbar import pyzbar
+            wechat = None
+            logger.debug("wechat_qrcode недоступен", exc_info=True)
+        detectors = _local.detectors = (wechat, cv2.QRCodeDetector())
+    return detectors
 
-            barcodes = pyzbar.decode(img)
-            for barcode in barcodes:
-                if barcode.type == "QRCODE":
-                    found_qr = True
-                    break
-        except ImportError:
-            pass
-        except Exception:
-            logger.debug("suppressed", exc_info=True)
-    # 4. Кадрируем нижнюю половину (там обычно QR на чеках)
-    if not found_qr:
-        try:
-            h, w = img_cv.shape[:2]
-            bottom_half = img_cv[int(h * 0.4) :, :]
 
-            data, _, _ = detector.detectAndDecode(bottom_half)
-            if data and len(data) > 10:
-                found_qr = True
-        except Exception:
-            logger.debug("suppressed", exc_info=True)
-    # 5. Pyzbar на нижней половине
-    if not found_qr:
+_pyzbar = None  # модуль pyzbar; False — не установлен / нет libzbar
+
+
+def _pyzbar_has_qr(image) -> bool:
+    """pyzbar по ч/б буферу; без pyzbar / libzbar — False (импорт пробуется один раз)."""
+    global _pyzbar
+    if _pyzbar is None:
         try:
-            from pyzbar import pyzbar
-
-            h, w = img_cv.shape[:2]
-            bottom_half = Image.fromarray(img_cv[int(h * 0.4) :, :])
-            barcodes = pyzbar.decode(bottom_half)
-            for barcode in barcodes:
-                if barcode.type == "QRCODE":
-                    found_qr = True
-                    break
+            from pyzbar import pyzbar as module
         except ImportError:
-            pass
+            module = False
+        _pyzbar = module
+    if not _pyzbar:
+        return False
+    return any(b.type == "QRCODE" for b in _pyzbar.decode(image))
+
+
+def _work_copy(gray: np.ndarray) -> np.ndarray:
+    h, w = gray.shape[:2]
+    side = max(h, w)
+    if side > WORK_SIDE:
+        scale = WORK_SIDE / side
+        return cv2.resize(
+            gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA
+        )
+    if side < _UPSCALE_BELOW:
+        return cv2.resize(gray, (w * 2, h * 2), interpolation=cv2.INTER_LINEAR)
+    return gray
+
+
+def _decoded(data) -> bool:
+    return bool(data) and len(data) > 10
+
+
+def _decode_roi(
+    detector: cv2.QRCodeDetector,
+    fine: np.ndarray,
+    points: np.ndarray,
+    scale: float,
+    top: int,
+) -> bool:
+    """Точная стадия: QR, найденный на рабочей копии, декодируется по вырезу
+    из fine (исходное разрешение или ×2 для мелких фото) с полями 25%."""
+    pts = points.reshape(-1, 2).astype(np.float32)
+    pts[:, 1] += top
+    pts *= scale
+    (x0, y0), (x1, y1) = pts.min(axis=0), pts.max(axis=0)
+    pad = 0.25 * max(x1 - x0, y1 - y0)
+    crop = fine[
+        max(0, int(y0 - pad)) : int(y1 + pad) + 1,
+        max(0, int(x0 - pad)) : int(x1 + pad) + 1,
+    ]
+    if crop.size == 0:
+        return False
+    data, _, _ = detector.detectAndDecode(crop)
+    return _decoded(data)
+
+
+def find_qr(gray: np.ndarray) -> str | None:
+    """
+    Поиск QR по ч/б буферу: грубо → точно, нижняя треть раньше кадра целиком,
+    выход на первой находке. Возвращает имя шага с находкой или None.
+
+    Шаги:
+      coarse_bottom / coarse_full — детекция на рабочей копии (≤ WORK_SIDE),
+          сначала нижняя треть (чеки); декодирование по найденным углам,
+          иначе — по вырезу в полном разрешении (на уменьшенной копии
+          углы QR бывают неточными);
+      fine_bottom — нижняя треть в исходном разрешении (QR мельче, чем
+          видно на рабочей копии), затем она же ×1.5;
+      binary — адаптивная бинаризация рабочей копии;
+      pyzbar — рабочая копия, нижняя треть исходника, бинаризация.
+    """
+    wechat, detector = get_detectors()
+    work = _work_copy(gray)
+    downscaled = gray.shape[0] > work.shape[0]
+    fine = gray if downscaled else work
+    scale = fine.shape[0] / work.shape[0]
+    binary: list[np.ndarray] = []
+
+    def _binary() -> np.ndarray:
+        if not binary:
+            binary.append(
+                cv2.adaptiveThreshold(
+                    work, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
+                )
+            )
+        return binary[0]
+
+    def _top(img: np.ndarray) -> int:
+        return int(img.shape[0] * _RECEIPT_ROI_TOP)
+
+    # 1. Грубо: детекция на рабочей копии → декодирование выреза
+    for name, top in (("coarse_bottom", _top(work)), ("coarse_full", 0)):
+        region = work[top:]
+        if wechat is not None:
+            try:
+                res, _points = wechat.detectAndDecode(region)
+                if res and len(res) > 0:
+                    return f"wechat_{name}"
+            except Exception:
+                logger.debug("suppressed", exc_info=True)
+        try:
+            found, points = detector.detect(region)
+            if found:
+                data, _ = detector.decode(region, points)
+                if _decoded(data) or _decode_roi(detector, fine, points, scale, top):
+                    return f"opencv_{name}"
         except Exception:
             logger.debug("suppressed", exc_info=True)
-    # 6. Бинаризация + WeChat
-    if not found_qr:
-        try:
-            gray = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
-            binary = cv2.adaptiveThreshold(
-                gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
-            )
-            binary_cv = cv2.cvtColor(binary, cv2.COLOR_GRAY2BGR)
 
-            wechat_detector = cv2.wechat_qrcode_WeChatQRCode()
-            res, points = wechat_detector.detectAndDecode(binary_cv)
+    # 2. Точно: нижняя треть исходника (только если рабочая копия уменьшена)
+    if downscaled:
+        bottom = gray[_top(gray) :]
+        for name, img in (
+            ("fine_bottom", lambda: bottom),
+            ("fine_bottom_x1.5", lambda: cv2.resize(bottom, None, fx=1.5, fy=1.5)),
+        ):
+            try:
+                data, _, _ = detector.detectAndDecode(img())
+                if _decoded(data):
+                    return f"opencv_{name}"
+            except Exception:
+                logger.debug("suppressed", exc_info=True)
+
+    # 3. Бинаризация
+    if wechat is not None:
+        try:
+            res, _points = wechat.detectAndDecode(_binary())
             if res and len(res) > 0:
-                found_qr = True
+                return "wechat_binary"
         except Exception:
             logger.debug("suppressed", exc_info=True)
-    # 7. Pyzbar на бинаризованном
-    if not found_qr:
-        try:
-            from pyzbar import pyzbar
+    try:
+        data, _, _ = detector.detectAndDecode(_binary())
+        if _decoded(data):
+            return "opencv_binary"
+    except Exception:
+        logger.debug("suppressed", exc_info=True)
 
-            gray = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
-            binary = cv2.adaptiveThreshold(
-                gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
-            )
-            barcodes = pyzbar.decode(binary)
-            for barcode in barcodes:
-                if barcode.type == "QRCODE":
-                    found_qr = True
-                    break
-        except ImportError:
-            pass
+    # 4. pyzbar
+    for name, region in (
+        ("pyzbar_full", lambda: work),
+        ("pyzbar_bottom", lambda: gray[_top(gray) :]),
+        ("pyzbar_binary", _binary),
+    ):
+        try:
+            if _pyzbar_has_qr(region()):
+                return name
         except Exception:
             logger.debug("suppressed", exc_info=True)
-    return found_qr
+    return None
+
+
+def detect_qr_array(rgb: np.ndarray, gray: np.ndarray | None = None) -> bool:
+    """
+    Детекция QR-кода по уже декодированному RGB-буферу (H×W×3, uint8).
+    gray можно передать готовым (utils/image_prep уже посчитал его для метрик).
+    """
+    if gray is None:
+        gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+    return find_qr(gray) is not None
+
+
+def _detect_qr_sync(image_bytes: bytes) -> bool:
+    """Синхронная CPU-bound детекция QR-кода (OpenCV + pyzbar)."""
+    img = Image.open(BytesIO(image_bytes))
+    return detect_qr_array(np.asarray(img.convert("RGB")))
 
 
 async def detect_qr(image_bytes: bytes, doc_type: str = None) -> bool:
@@ -155,4 +231,4 @@ async def detect_qr(image_bytes: bytes, doc_type: str = None) -> bool:
     if doc_type == "receipt":
         return True
 
-    return await asyncio.to_thread(_detect_qr_sync, image_bytes)
+    return await run_cpu(_detect_qr_sync, image_bytes)